@@ -0,0 +1,94 @@
+"""
+Benchmark the IQL updates of independent (non-shared) agents, with one network per agent or with the networks of all
+agents stacked into a ModuleEnsemble (use_agent_ensemble=True).
+
+For each number of agents, both learners start from the same parameters and are trained on the same random batches.
+The largest difference between their Q-values after --check-updates updates is reported to show that the ensemble
+trains the agents as independently as separate networks do, followed by the time of one update.
+
+Example:
+    python profile_agent_ensemble.py --agents 2 8 32 64 --batch-size 256 --device cuda:0
+"""
+import time
+import argparse
+import numpy as np
+import torch
+from argparse import Namespace
+from gym.spaces import Box, Discrete
+from xuance.torch import ModuleDict
+from xuance.torch.representations import Basic_MLP
+from xuance.torch.policies import REGISTRY_Policy
+from xuance.torch.learners import IQL_Learner
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark IQL updates with and without the agent ensemble.")
+    parser.add_argument("--agents", type=int, nargs="+", default=[2, 4, 8, 16, 32, 64])
+    parser.add_argument("--obs-dim", type=int, default=18)
+    parser.add_argument("--n-actions", type=int, default=5)
+    parser.add_argument("--hidden-size", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--check-updates", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    return parser.parse_args()
+
+
+def build_learner(parser, n_agents: int, use_agent_ensemble: bool):
+    torch.manual_seed(1)
+    keys = [f"agent_{i}" for i in range(n_agents)]
+    config = Namespace(n_agents=n_agents, use_parameter_sharing=False, episode_length=25, learning_rate=0.001,
+                       use_grad_clip=True, grad_clip_norm=0.5, device=parser.device, model_dir="", gamma=0.99,
+                       running_steps=100000, sync_frequency=100, double_q=True, use_rnn=False,
+                       use_actions_mask=False)
+    representation = ModuleDict({k: Basic_MLP((parser.obs_dim,), [parser.hidden_size], None,
+                                              torch.nn.init.orthogonal_, torch.nn.ReLU, parser.device)
+                                 for k in keys})
+    policy = REGISTRY_Policy["Basic_Q_network_marl"](
+        action_space={k: Discrete(parser.n_actions) for k in keys}, n_agents=n_agents,
+        representation=representation, hidden_size=[parser.hidden_size], normalize=None,
+        initialize=torch.nn.init.orthogonal_, activation=torch.nn.ReLU, device=parser.device,
+        use_parameter_sharing=False, model_keys=keys, use_rnn=False, rnn=None,
+        use_agent_ensemble=use_agent_ensemble)
+    return IQL_Learner(config, keys, keys, policy)
+
+
+def random_sample(parser, keys, rng):
+    bs = parser.batch_size
+    obs_space = Box(-1, 1, (parser.obs_dim,))
+    return dict(batch_size=bs,
+                obs={k: rng.standard_normal((bs,) + obs_space.shape).astype(np.float32) for k in keys},
+                obs_next={k: rng.standard_normal((bs,) + obs_space.shape).astype(np.float32) for k in keys},
+                actions={k: rng.integers(0, parser.n_actions, bs) for k in keys},
+                rewards={k: rng.standard_normal(bs).astype(np.float32) for k in keys},
+                terminals={k: np.zeros(bs, np.float32) for k in keys},
+                agent_mask={k: np.ones(bs, np.float32) for k in keys})
+
+
+def time_updates(learner, sample, repeat):
+    learner.update(sample)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        learner.update(sample)
+    if str(learner.device).startswith("cuda"):
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    print(f"{'agents':<8}{'max |dQ|':>11}{'per-agent (ms)':>16}{'ensemble (ms)':>15}{'speedup':>9}")
+    for n_agents in parser.agents:
+        learners = {flag: build_learner(parser, n_agents, flag) for flag in (False, True)}
+        keys = learners[False].model_keys
+        rng = np.random.default_rng(0)
+        samples = [random_sample(parser, keys, rng) for _ in range(parser.check_updates)]
+        for sample in samples:
+            for learner in learners.values():
+                learner.update(sample)
+        with torch.no_grad():
+            q = {flag: learner.policy(samples[0]['obs'])[2] for flag, learner in learners.items()}
+        max_diff = max((q[False][k] - q[True][k]).abs().max().item() for k in keys)
+        seconds = {flag: time_updates(learner, samples[0], parser.repeat) for flag, learner in learners.items()}
+        print(f"{n_agents:<8}{max_diff:>11.2e}{seconds[False] * 1e3:>16.2f}{seconds[True] * 1e3:>15.2f}"
+              f"{seconds[False] / seconds[True]:>9.2f}")
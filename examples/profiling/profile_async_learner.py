@@ -0,0 +1,92 @@
+"""
+Benchmark the asynchronous learner (use_async_learner) against the synchronous training loop of off-policy agents.
+
+Each (method, mode) pair runs in a fresh interpreter with the same seed and the same replay ratio. The agent is
+trained for a number of steps with SubprocVecEnv workers, then the sample throughput (environment transitions per
+second over the whole run, updates included), the number of updates and the mean return of a few test episodes are
+reported. The asynchronous modes differ in how many updates the learner can fall behind before acting waits.
+
+Example:
+    python profile_async_learner.py --methods dqn sac --steps 20000 --lags 0 1000
+"""
+import os
+import tempfile
+import sys
+import argparse
+import subprocess
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+BENCHMARKS = {"dqn": ("classic_control", "CartPole-v1", dict(start_training=1000, vectorize="SubprocVecEnv")),
+              "sac": ("classic_control", "Pendulum-v1", dict(start_training=1000, vectorize="SubprocVecEnv")),
+              "iql": ("mpe", "simple_spread_v3", dict(start_training=1000, parallels=8,
+                                                      vectorize="SubprocVecMultiAgentEnv"))}
+
+RUN = """
+import time
+import numpy as np
+from copy import deepcopy
+from argparse import Namespace
+from xuance import get_runner
+from xuance.environment import make_envs
+parser_args = Namespace(dl_toolbox='torch', device='{device}', test_mode=False, render=False, seed=1,
+                        use_async_learner={use_async}, max_update_lag={lag}, **{kwargs})
+runner = get_runner(method='{method}', env='{env}', env_id='{env_id}', parser_args=parser_args)
+agent = runner.agent if hasattr(runner, "agent") else runner.agents
+n_updates = [0]
+update = agent.learner.update
+
+
+def counted_update(*args, **kwargs):
+    n_updates[0] += 1
+    return update(*args, **kwargs)
+
+
+agent.learner.update = counted_update
+start = time.perf_counter()
+agent.train({steps} // agent.n_envs)
+throughput = {steps} / (time.perf_counter() - start)
+
+
+def env_fn():
+    config_test = deepcopy(agent.config)
+    config_test.parallels = 1
+    config_test.vectorize = config_test.vectorize.replace("Subproc", "Dummy")
+    return make_envs(config_test)
+
+
+scores = agent.test(env_fn, {episodes})
+agent.finish()
+runner.envs.close()
+print(throughput, n_updates[0], np.mean(scores))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the asynchronous learner against the synchronous loop.")
+    parser.add_argument("--methods", type=str, nargs="+", default=list(BENCHMARKS.keys()))
+    parser.add_argument("--lags", type=int, nargs="+", default=[0, 1000])
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--episodes", type=int, default=5)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    print(f"{'method':<8}{'mode':>12}{'steps/s':>10}{'updates':>10}{'return':>10}")
+    for method in parser.methods:
+        env, env_id, kwargs = BENCHMARKS[method]
+        for use_async, lag in [(False, 0)] + [(True, lag) for lag in parser.lags]:
+            mode = f"async-{lag}" if use_async else "sync"
+            code = RUN.format(method=method, env=env, env_id=env_id, kwargs=dict(kwargs, **OUTPUT_DIRS),
+                              device=parser.device,
+                              use_async=use_async, lag=lag, steps=parser.steps, episodes=parser.episodes)
+            result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{method:<8}{mode:>12}{'failed: ' + result.stderr.strip().splitlines()[-1]:>30}")
+                continue
+            throughput, n_updates, score = [float(v) for v in result.stdout.strip().splitlines()[-1].split()]
+            print(f"{method:<8}{mode:>12}{throughput:>10.0f}{n_updates:>10.0f}{score:>10.1f}")
@@ -0,0 +1,93 @@
+"""
+Benchmark the counterfactual critic of COMA against the critic inputs materialized for every agent.
+
+The critic of agent i takes the global state, its observation, the joint actions with the slot of agent i masked out and
+its ID. The "materialized" columns build these inputs for all agents, as the former implementation did, with
+n_agents x (dim_state + n_agents x n_actions + n_agents) features per sample, before the critic. The "blocks" columns
+are COMA_Policy.get_values(), which evaluates the blocks of the first critic layer once per sample or per agent. Each
+case times one forward and backward pass of the critic values on [rows, n_agents] samples, and reports the peak of the
+allocated memory on CUDA devices.
+
+Example:
+    python profile_coma.py --agents 3 10 27 --rows 3840 --device cuda:0
+"""
+import time
+import argparse
+import numpy as np
+import torch
+from gym.spaces import Discrete
+from torch.nn.functional import one_hot
+from xuance.torch import ModuleDict
+from xuance.torch.representations import Basic_MLP
+from xuance.torch.policies import REGISTRY_Policy
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the counterfactual critic of COMA.")
+    parser.add_argument("--agents", type=int, nargs="+", default=[3, 10, 27])
+    parser.add_argument("--rows", type=int, default=3840, help="The number of samples (environments x time steps).")
+    parser.add_argument("--actions", type=int, default=12)
+    parser.add_argument("--dim-obs", type=int, default=64)
+    parser.add_argument("--dim-state", type=int, default=128)
+    parser.add_argument("--hidden-size", type=int, default=128)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--device", type=str, default="cpu")
+    return parser.parse_args()
+
+
+def make_policy(parser, n_agents):
+    agent_keys = [f"agent_{i}" for i in range(n_agents)]
+    representation = ModuleDict({agent_keys[0]: Basic_MLP((parser.dim_obs, ), [parser.hidden_size],
+                                                          activation=torch.nn.ReLU, device=parser.device)})
+    return REGISTRY_Policy["Categorical_COMA_Policy"](
+        action_space={k: Discrete(parser.actions) for k in agent_keys}, n_agents=n_agents,
+        representation_actor=representation, representation_critic=representation,
+        actor_hidden_size=[parser.hidden_size], critic_hidden_size=[parser.hidden_size],
+        activation=torch.nn.ReLU, device=parser.device, use_parameter_sharing=True, model_keys=agent_keys[:1],
+        use_rnn=False, rnn=None, dim_global_state=parser.dim_state)
+
+
+def materialized_values(policy, state, obs, actions_onehot):
+    rows, n_agents = state.shape[0], policy.n_agents
+    obs_rep = policy.critic_representation[policy.model_keys[0]](obs)['state'].reshape(rows, n_agents, -1)
+    slots = 1 - torch.eye(n_agents, device=state.device).repeat_interleave(actions_onehot.shape[-1], dim=-1)
+    joint_actions = actions_onehot.reshape(rows, 1, -1).repeat(1, n_agents, 1)
+    agent_ids = torch.eye(n_agents, device=state.device).unsqueeze(0).repeat(rows, 1, 1)
+    critic_input = torch.concat([state.unsqueeze(1).repeat(1, n_agents, 1), obs_rep, joint_actions * slots,
+                                 agent_ids], dim=-1)
+    return policy.critic(critic_input)
+
+
+def timeit(fn, repeat, device):
+    fn().sum().backward()
+    if device.startswith("cuda"):
+        torch.cuda.synchronize(device)
+        torch.cuda.reset_peak_memory_stats(device)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn().sum().backward()
+    if device.startswith("cuda"):
+        torch.cuda.synchronize(device)
+        return (time.perf_counter() - start) / repeat * 1e3, torch.cuda.max_memory_allocated(device) / 2 ** 20
+    return (time.perf_counter() - start) / repeat * 1e3, np.nan
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    torch.manual_seed(0)
+    print(f"{parser.rows} rows, {parser.actions} actions, forward + backward time in ms (peak memory in MB)")
+    print(f"{'agents':>7}{'materialized':>22}{'blocks':>22}")
+    for n_agents in parser.agents:
+        policy = make_policy(parser, n_agents)
+        state = torch.randn(parser.rows, parser.dim_state, device=parser.device)
+        obs = torch.randn(parser.rows * n_agents, parser.dim_obs, device=parser.device)
+        actions = torch.randint(parser.actions, (parser.rows * n_agents, ), device=parser.device)
+        actions_onehot = one_hot(actions, parser.actions).float()
+        key = policy.model_keys[0]
+        values = policy.get_values(state, {key: obs}, {key: actions_onehot})[1]
+        torch.testing.assert_close(values, materialized_values(policy, state, obs, actions_onehot),
+                                   rtol=1e-4, atol=1e-4)
+        times = [timeit(lambda: materialized_values(policy, state, obs, actions_onehot), parser.repeat, parser.device),
+                 timeit(lambda: policy.get_values(state, {key: obs}, {key: actions_onehot})[1], parser.repeat,
+                        parser.device)]
+        print(f"{n_agents:>7}" + "".join(f"{t:>12.2f} ({m:>7.1f})" for t, m in times))
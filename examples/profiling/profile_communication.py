@@ -0,0 +1,78 @@
+"""
+Benchmark the communication modules against the actors without communication and a per-agent loop of messages.
+
+Each case times one forward and backward pass of an actor MLP on the features [rows, n_agents, dim_state] (the rows are
+the environments and the time steps), alone and after the communicator of xuance.torch.communications. The "loop"
+column is the same CommNet with the messages gathered by a Python loop over the receivers and their neighbors, as the
+per-agent implementations of the communication do, after checking that it gives the same messages.
+
+Example:
+    python profile_communication.py --agents 3 10 27 --rows 3840 --comm-rounds 2
+"""
+import time
+import argparse
+import torch
+import torch.nn as nn
+from xuance.torch.communications import REGISTRY_Communicator
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the communication modules.")
+    parser.add_argument("--agents", type=int, nargs="+", default=[3, 10, 27])
+    parser.add_argument("--rows", type=int, default=3840, help="The number of environments x time steps.")
+    parser.add_argument("--dim-state", type=int, default=64)
+    parser.add_argument("--msg-dim", type=int, default=64)
+    parser.add_argument("--comm-rounds", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=10)
+    return parser.parse_args()
+
+
+def commnet_loop(communicator, features, agent_mask):
+    hidden = communicator.msg_encoder(features)
+    n_agents = features.shape[-2]
+    for comm_layer in communicator.comm_layers:
+        received = []
+        for i in range(n_agents):
+            msg, count = torch.zeros_like(hidden[..., i, :]), torch.zeros_like(agent_mask[..., i:i + 1])
+            for j in range(n_agents):
+                if j != i:
+                    alive = (agent_mask[..., i:i + 1] * agent_mask[..., j:j + 1])
+                    msg, count = msg + hidden[..., j, :] * alive, count + alive
+            received.append(msg / count.clamp(min=1))
+        hidden = comm_layer(torch.concat([hidden, torch.stack(received, dim=-2)], dim=-1))
+    return hidden
+
+
+def timeit(fn, repeat):
+    fn().sum().backward()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn().sum().backward()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    torch.manual_seed(0)
+    names = [name for name in REGISTRY_Communicator if name != "BaseComm"]
+    print(f"{parser.rows} rows, {parser.comm_rounds} rounds, forward + backward time in ms")
+    print(f"{'agents':>7}{'actor':>9}" + "".join(f"{name:>15}" for name in names) + f"{'loop':>10}")
+    for n_agents in parser.agents:
+        features = torch.randn(parser.rows, n_agents, parser.dim_state)
+        agent_mask = (torch.rand(parser.rows, n_agents) < 0.8).float()
+        actor = nn.Sequential(nn.Linear(parser.dim_state + parser.msg_dim, 64), nn.ReLU(), nn.Linear(64, 64),
+                              nn.ReLU(), nn.Linear(64, 5))
+        padding = torch.zeros(parser.rows, n_agents, parser.msg_dim)
+        times = [timeit(lambda: actor(torch.concat([features, padding], dim=-1)), parser.repeat)]
+        for name in names:
+            communicator = REGISTRY_Communicator[name](parser.dim_state, n_agents, [64], parser.msg_dim,
+                                                       comm_rounds=parser.comm_rounds, activation=nn.ReLU)
+            times.append(timeit(lambda: actor(torch.concat([features, communicator(features, agent_mask)], dim=-1)),
+                                parser.repeat))
+            if name == "CommNet":
+                torch.testing.assert_close(commnet_loop(communicator, features, agent_mask),
+                                           communicator(features, agent_mask), rtol=1e-4, atol=1e-5)
+                commnet = communicator
+        times.append(timeit(lambda: actor(torch.concat([features, commnet_loop(commnet, features, agent_mask)],
+                                                       dim=-1)), parser.repeat))
+        print(f"{n_agents:>7}{times[0]:>9.2f}" + "".join(f"{t:>15.2f}" for t in times[1:-1]) + f"{times[-1]:>10.2f}")
@@ -0,0 +1,75 @@
+"""
+Benchmark the acting and update latency of agents with and without use_compile (torch.compile of the policy networks).
+
+Each (method, use_compile) pair runs in a fresh interpreter. A short training run fills the buffer and triggers the
+compilation, whose duration is reported as warm-up. Then agent.action() on the observations of all environments and
+one train_epochs() are timed.
+
+Example:
+    python profile_compile.py --methods dqn ppo mappo --repeat 200
+"""
+import os
+import tempfile
+import sys
+import argparse
+import subprocess
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+BENCHMARKS = {"dqn": ("classic_control", "CartPole-v1", dict(start_training=1000)),
+              "ppo": ("classic_control", "CartPole-v1", dict()),
+              "mappo": ("mpe", "simple_spread_v3", dict(parallels=4))}
+
+RUN = """
+import time
+from argparse import Namespace
+from xuance import get_runner
+parser_args = Namespace(dl_toolbox='torch', device='{device}', test_mode=False, render=False,
+                        use_compile={use_compile}, **{kwargs})
+runner = get_runner(method='{method}', env='{env}', env_id='{env_id}', parser_args=parser_args)
+agent = runner.agent if hasattr(runner, "agent") else runner.agents
+start = time.perf_counter()
+agent.train(2000 // agent.n_envs)  # Fill the buffer and compile.
+warm_up = time.perf_counter() - start
+if hasattr(agent, "n_minibatch"):
+    agent.memory.size = agent.memory.n_size  # The rollout buffer was cleared after training, reuse its data.
+obs, _ = agent.envs.reset()
+start = time.perf_counter()
+for _ in range({repeat}):
+    agent.action(obs)
+acting = (time.perf_counter() - start) / {repeat}
+updates = getattr(agent, "n_minibatch", 1)
+start = time.perf_counter()
+for _ in range({repeat} // 10):
+    agent.train_epochs(n_epochs=1)
+update = (time.perf_counter() - start) / ({repeat} // 10) / updates
+runner.envs.close()
+print(warm_up, acting, update)
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark acting and update latency with and without torch.compile.")
+    parser.add_argument("--methods", type=str, nargs="+", default=list(BENCHMARKS.keys()))
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--repeat", type=int, default=200)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    print(f"{'method':<8}{'compile':>8}{'warm-up (s)':>13}{'action (ms)':>13}{'update (ms)':>13}")
+    for method in parser.methods:
+        env, env_id, kwargs = BENCHMARKS[method]
+        for use_compile in (False, True):
+            code = RUN.format(method=method, env=env, env_id=env_id, kwargs=dict(kwargs, **OUTPUT_DIRS),
+                              device=parser.device,
+                              use_compile=use_compile, repeat=parser.repeat)
+            result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{method:<8}{str(use_compile):>8}{'failed: ' + result.stderr.strip().splitlines()[-1]:>39}")
+                continue
+            warm_up, acting, update = [float(v) for v in result.stdout.strip().splitlines()[-1].split()]
+            print(f"{method:<8}{str(use_compile):>8}{warm_up:>13.1f}{acting * 1e3:>13.3f}{update * 1e3:>13.3f}")
@@ -0,0 +1,93 @@
+"""
+Benchmark the acting cost of DCG with static and dynamic coordination graphs for growing numbers of agents.
+
+One call of DCG_Learner.act() evaluates the utilities and the payoffs of the graph, then runs max-sum. The FULL graph
+has n(n-1)/2 edges, whereas the dynamic KNN and RANGE graphs, built for every sample from the agents' positions,
+have O(n * n_neighbors) edges. Random hidden states and positions (uniform in a square whose area grows with the
+number of agents, i.e., a constant density) are used. Before timing, the script checks that a KNN graph whose agents
+are connected to all the others picks the same actions as the FULL graph.
+
+Example:
+    python profile_dcg_graphs.py --agents 10 25 50 100 --batch-size 16
+"""
+import time
+import argparse
+import torch
+from gym.spaces import Discrete
+from xuance.common import get_arguments
+from xuance.torch import ModuleDict
+from xuance.torch.representations import Basic_Identical
+from xuance.torch.policies import DCG_policy
+from xuance.torch.policies.coordination_graph import DCG_utility, DCG_payoff, Coordination_Graph
+from xuance.torch.learners.multi_agent_rl.dcg_learner import DCG_Learner
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark DCG with static and dynamic coordination graphs.")
+    parser.add_argument("--graphs", type=str, nargs="+", default=["FULL", "KNN", "RANGE"])
+    parser.add_argument("--agents", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--n-actions", type=int, default=5)
+    parser.add_argument("--dim-hidden", type=int, default=64)
+    parser.add_argument("--n-neighbors", type=int, default=3)
+    parser.add_argument("--graph-range", type=float, default=0.3)
+    parser.add_argument("--low-rank-payoff", action="store_true")
+    parser.add_argument("--repeat", type=int, default=10)
+    return parser.parse_args()
+
+
+def build_learner(parser, graph_type, n_agents, n_neighbors):
+    config = get_arguments(method="dcg", env="mpe", env_id="simple_spread_v3", is_test=False)
+    config.device, config.n_agents, config.graph_type, config.low_rank_payoff = "cpu", n_agents, graph_type, \
+        parser.low_rank_payoff
+    config.position_index, config.distributed_training, config.n_msg_iterations = [0, 1], False, 4
+    config.episode_length = 25
+    agent_keys = [f"agent_{i}" for i in range(n_agents)]
+    representation = ModuleDict({"agent_0": Basic_Identical((parser.dim_hidden,), device="cpu")})
+    graph = Coordination_Graph(n_agents, graph_type, "cpu", n_neighbors=n_neighbors, graph_range=parser.graph_range)
+    graph.set_coordination_graph()
+    policy = DCG_policy(action_space={k: Discrete(parser.n_actions) for k in agent_keys}, n_agents=n_agents,
+                        representation=representation,
+                        utility=DCG_utility(parser.dim_hidden, config.hidden_utility_dim, parser.n_actions),
+                        payoffs=DCG_payoff(parser.dim_hidden * 2, config.hidden_payoff_dim, parser.n_actions,
+                                           config.low_rank_payoff, config.payoff_rank),
+                        dcgraph=graph, use_parameter_sharing=True, model_keys=["agent_0"], rnn=None, use_rnn=False)
+    return DCG_Learner(config, ["agent_0"], agent_keys, policy)
+
+
+def act(learner, hidden_states, positions):
+    graph = learner.policy.graph
+    edges = graph.dynamic_edges(positions) if graph.dynamic else None
+    return learner.act(hidden_states, edges=edges), 0 if edges is None else len(edges[0])
+
+
+def timeit(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    torch.manual_seed(0)
+    hidden_states = torch.randn(parser.batch_size, 6, parser.dim_hidden)
+    positions = torch.rand(parser.batch_size, 6, 2)
+    learner_full = build_learner(parser, "FULL", 6, parser.n_neighbors)
+    learner_knn = build_learner(parser, "KNN", 6, 5)
+    learner_knn.policy.load_state_dict(learner_full.policy.state_dict())
+    assert torch.equal(act(learner_full, hidden_states, positions)[0], act(learner_knn, hidden_states, positions)[0])
+
+    print(f"batch size {parser.batch_size}, {parser.n_actions} actions, {parser.n_neighbors} neighbors, "
+          f"range {parser.graph_range}, time per act() in ms")
+    print(f"{'graph':<7}{'agents':>7}{'edges/sample':>14}{'ms':>10}{'ms/agent':>10}")
+    for graph_type in parser.graphs:
+        for n_agents in parser.agents:
+            learner = build_learner(parser, graph_type, n_agents, parser.n_neighbors)
+            hidden_states = torch.randn(parser.batch_size, n_agents, parser.dim_hidden)
+            positions = torch.rand(parser.batch_size, n_agents, 2) * (n_agents / 10) ** 0.5
+            _, n_edges = act(learner, hidden_states, positions)
+            n_edges = learner.policy.graph.n_edges if n_edges == 0 else n_edges / parser.batch_size
+            elapsed = timeit(lambda: act(learner, hidden_states, positions), parser.repeat)
+            print(f"{graph_type:<7}{n_agents:>7}{n_edges:>14.1f}{elapsed:>10.2f}{elapsed / n_agents:>10.3f}")
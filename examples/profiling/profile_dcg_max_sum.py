@@ -0,0 +1,117 @@
+"""
+Benchmark the max-sum message passing of DCG against the previous implementation.
+
+The previous implementation is reproduced below: float64 messages summed with scatter_add (torch.Tensor.scatter_add_
+stands in for torch_scatter.scatter_add, which computes the same sums) and the edge tensors of the graph filled
+element by element. Random utilities and payoffs are passed along FULL, CYCLE and STAR graphs, and the greedy
+actions of both implementations are compared. On the trees (STAR), the actions of Coordination_Graph.max_sum are also
+checked against the brute-force joint argmax for small numbers of agents.
+
+Example:
+    python profile_dcg_max_sum.py --agents 5 10 20 30 --batch-size 256 --iterations 8
+"""
+import time
+import argparse
+import itertools
+import torch
+from xuance.torch.policies.coordination_graph import Coordination_Graph
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the max-sum message passing of DCG.")
+    parser.add_argument("--graphs", type=str, nargs="+", default=["FULL", "CYCLE", "STAR"])
+    parser.add_argument("--agents", type=int, nargs="+", default=[5, 10, 20, 30])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--n-actions", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--device", type=str, default="cpu")
+    return parser.parse_args()
+
+
+def scatter_add(src, index, dim_size):
+    out = src.new_zeros(src.shape[0], dim_size, src.shape[-1])
+    return out.scatter_add_(1, index.view(1, -1, 1).expand_as(src), src)
+
+
+def set_graph_previous(graph):
+    edges_from = torch.zeros(graph.n_edges).long().to(graph.device)
+    edges_to = torch.zeros(graph.n_edges).long().to(graph.device)
+    for i, edge in enumerate(graph.edges):
+        edges_from[i] = edge[0]
+        edges_to[i] = edge[1]
+    ones = edges_to.new_ones(len(edges_to))
+    n_in = edges_to.new_zeros(graph.n_vertexes).scatter_add_(0, edges_to, ones).scatter_add_(0, edges_from, ones)
+    return edges_from, edges_to, n_in.float()
+
+
+def max_sum_previous(graph, f_i, f_ij, n_iterations, msg_normalized=True):
+    n_edges, n_vertexes = graph.n_edges, graph.n_vertexes
+    f_i_mean = f_i.double() / n_vertexes
+    f_ij_mean = f_ij.double() / n_edges
+    f_ji_mean = f_ij_mean.transpose(dim0=-1, dim1=-2).clone()
+    msg_ij = torch.zeros(f_i.shape[0], n_edges, f_i.shape[-1], device=f_i.device)
+    msg_ji = torch.zeros(f_i.shape[0], n_edges, f_i.shape[-1], device=f_i.device)
+    utility = f_i_mean + scatter_add(msg_ij, graph.edges_to, n_vertexes) + scatter_add(msg_ji, graph.edges_from,
+                                                                                        n_vertexes)
+    for _ in range(n_iterations):
+        joint_forward = (utility[:, graph.edges_from, :] - msg_ji).unsqueeze(dim=-1) + f_ij_mean
+        joint_backward = (utility[:, graph.edges_to, :] - msg_ij).unsqueeze(dim=-1) + f_ji_mean
+        msg_ij = joint_forward.max(dim=-2).values
+        msg_ji = joint_backward.max(dim=-2).values
+        if msg_normalized:
+            msg_ij -= msg_ij.mean(dim=-1, keepdim=True)
+            msg_ji -= msg_ji.mean(dim=-1, keepdim=True)
+        utility = f_i_mean + scatter_add(msg_ij, graph.edges_to, n_vertexes) + scatter_add(msg_ji, graph.edges_from,
+                                                                                            n_vertexes)
+    return utility.argmax(dim=-1)
+
+
+def max_sum_new(graph, f_i, f_ij, n_iterations, dtype):
+    utility = graph.max_sum(f_i.to(dtype) / graph.n_vertexes, f_ij.to(dtype) / graph.n_edges, n_iterations)
+    return utility.argmax(dim=-1)
+
+
+def timeit(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def check_trees(n_actions):
+    for n_agents in [3, 4, 5]:
+        graph = Coordination_Graph(n_agents, "STAR")
+        graph.set_coordination_graph()
+        f_i, f_ij = torch.randn(16, n_agents, n_actions), torch.randn(16, graph.n_edges, n_actions, n_actions)
+        actions = max_sum_new(graph, f_i, f_ij, n_agents, torch.float64)
+        joint = torch.tensor(list(itertools.product(range(n_actions), repeat=n_agents)))
+        values = f_i[:, torch.arange(n_agents), joint].sum(-1) / n_agents
+        values += f_ij[:, torch.arange(graph.n_edges), joint[:, graph.edges_from], joint[:, graph.edges_to]].sum(-1) \
+            / graph.n_edges
+        assert torch.equal(actions, joint[values.argmax(dim=-1)]), "max-sum is not exact on a tree."
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    torch.manual_seed(0)
+    check_trees(parser.n_actions)
+    print(f"batch size {parser.batch_size}, {parser.n_actions} actions, {parser.iterations} iterations, "
+          f"time per call in ms")
+    print(f"{'graph':<7}{'agents':>7}{'edges':>7}{'setup prev':>12}{'setup new':>11}{'prev f64':>10}"
+          f"{'new f64':>9}{'new f32':>9}{'speedup':>9}{'same actions':>14}")
+    for graph_type, n_agents in itertools.product(parser.graphs, parser.agents):
+        graph = Coordination_Graph(n_agents, graph_type, parser.device)
+        setup_previous = timeit(lambda: set_graph_previous(graph), 5)
+        setup_new = timeit(graph.set_coordination_graph, 5)
+        f_i = torch.randn(parser.batch_size, n_agents, parser.n_actions, device=parser.device)
+        f_ij = torch.randn(parser.batch_size, graph.n_edges, parser.n_actions, parser.n_actions, device=parser.device)
+        actions_previous = max_sum_previous(graph, f_i, f_ij, parser.iterations)
+        same = (actions_previous == max_sum_new(graph, f_i, f_ij, parser.iterations, torch.float64)).float().mean()
+        time_previous = timeit(lambda: max_sum_previous(graph, f_i, f_ij, parser.iterations), parser.repeat)
+        time_f64 = timeit(lambda: max_sum_new(graph, f_i, f_ij, parser.iterations, torch.float64), parser.repeat)
+        time_f32 = timeit(lambda: max_sum_new(graph, f_i, f_ij, parser.iterations, torch.float32), parser.repeat)
+        print(f"{graph_type:<7}{n_agents:>7}{graph.n_edges:>7}{setup_previous:>12.3f}{setup_new:>11.3f}"
+              f"{time_previous:>10.2f}{time_f64:>9.2f}{time_f32:>9.2f}{time_previous / time_f32:>9.2f}"
+              f"{same.item():>14.1%}")
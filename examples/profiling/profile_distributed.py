@@ -0,0 +1,86 @@
+"""
+Benchmark the data-parallel distributed training on the CPU, with the gloo backend.
+
+Launched with torchrun, every process trains the agent on its own vectorized environments and buffer, and the
+gradients are averaged over the processes at every optimizer step. After training, rank 0 reports the sample
+throughput of all processes together, and checks that the parameters of the policy and the observation
+statistics are the same in every process. Then the gradient all-reduce of one update is timed with one all-reduce
+per parameter (bucket_cap_mb=0) and with the flat buckets of the given sizes.
+
+Example:
+    torchrun --standalone --nproc_per_node=4 profile_distributed.py --method ppo --steps 20000
+"""
+import os
+import tempfile
+import time
+import argparse
+import torch
+import torch.distributed as dist
+from argparse import Namespace
+from xuance import get_runner
+from xuance.torch.utils import GradientAllReduce
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+BENCHMARKS = {"dqn": ("classic_control", "CartPole-v1", dict(start_training=1000)),
+              "ppo": ("classic_control", "CartPole-v1", dict()),
+              "sac": ("classic_control", "Pendulum-v1", dict(start_training=1000)),
+              "iql": ("mpe", "simple_spread_v3", dict(start_training=1000, parallels=5, use_parameter_sharing=False)),
+              "mappo": ("mpe", "simple_spread_v3", dict(parallels=5))}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the distributed training on the CPU.")
+    parser.add_argument("--method", type=str, default="ppo", choices=list(BENCHMARKS.keys()))
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--bucket-caps", type=float, nargs="+", default=[0, 25])
+    parser.add_argument("--repeat", type=int, default=200)
+    return parser.parse_args()
+
+
+def max_difference(tensor: torch.Tensor) -> float:
+    """The largest difference between the tensor of rank 0 and those of the other processes."""
+    gathered = [torch.empty_like(tensor) for _ in range(dist.get_world_size())]
+    dist.all_gather(gathered, tensor)
+    return max((other - gathered[0]).abs().max().item() for other in gathered)
+
+
+def time_all_reduce(policy: torch.nn.Module, bucket_cap_mb: float, repeat: int) -> float:
+    params = [param for param in policy.parameters() if param.requires_grad]
+    optimizer = torch.optim.SGD(params, lr=0.0)
+    for param in params:
+        param.grad = torch.randn_like(param)
+    reducer = GradientAllReduce(torch.amp.GradScaler("cpu", enabled=False), bucket_cap_mb)
+    dist.barrier()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        reducer.all_reduce(optimizer)
+        reducer._reduced.clear()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    env, env_id, kwargs = BENCHMARKS[parser.method]
+    parser_args = Namespace(dl_toolbox='torch', device='cpu', test_mode=False, render=False, seed=1,
+                            distributed_training=True, use_obsnorm=True, **kwargs, **OUTPUT_DIRS)
+    runner = get_runner(method=parser.method, env=env, env_id=env_id, parser_args=parser_args)
+    agent = runner.agent if hasattr(runner, "agent") else runner.agents
+    dist.barrier()
+    start = time.perf_counter()
+    agent.train(parser.steps // agent.n_envs)
+    dist.barrier()
+    throughput = parser.steps * agent.world_size / (time.perf_counter() - start)
+    params = torch.nn.utils.parameters_to_vector(agent.learner.policy.parameters()).detach()
+    params_diff, obs_rms_diff = max_difference(params), max_difference(agent.obs_rms.mean.clone())
+    latencies = [time_all_reduce(agent.learner.policy, cap, parser.repeat) for cap in parser.bucket_caps]
+    if agent.rank == 0:
+        print(f"{parser.method}: {agent.world_size} processes, {throughput:.0f} steps/s, "
+              f"max parameter difference {params_diff:.1e}, max obs_rms difference {obs_rms_diff:.1e}.")
+        for cap, latency in zip(parser.bucket_caps, latencies):
+            print(f"    gradient all-reduce of {params.numel()} parameters, bucket_cap_mb={cap:g}: "
+                  f"{latency * 1e3:.3f} ms")
+    agent.finish()
+    runner.envs.close()
@@ -0,0 +1,103 @@
+"""
+Benchmark the batched exploration of the off-policy MARL agents against the per-agent NumPy exploration.
+
+The "loop" columns are the exploration of the former implementation: the actions are moved to NumPy first, then the
+masked random actions are drawn by one Categorical per environment and agent, and the noises by one NumPy draw per
+agent. The "batched" columns are OffPolicyMARLAgents.exploration() on the packed actions of all agents and
+environments, including the conversion of the actions to the format of the environments.
+
+Example:
+    python profile_exploration.py --env-id simple_world_comm_v3 --envs 16 128 1024
+"""
+import os
+import tempfile
+import time
+import argparse
+import numpy as np
+import torch
+from argparse import Namespace
+from torch.distributions import Categorical
+import xuance
+from xuance import get_runner
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the exploration of the off-policy MARL agents.")
+    parser.add_argument("--envs", type=int, nargs="+", default=[16, 128, 1024])
+    parser.add_argument("--env-id", type=str, default="simple_world_comm_v3")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--device", type=str, default="cpu")
+    return parser.parse_args()
+
+
+def make_agents(parser, method):
+    config_path = os.path.join(os.path.dirname(xuance.__file__), f"configs/{method}/mpe/simple_spread_v3.yaml")
+    args = Namespace(dl_toolbox='torch', device=parser.device, test_mode=False, render=False, parallels=1,
+                     env_id=parser.env_id, use_parameter_sharing=False,
+                     continuous_action=method == "iddpg", **OUTPUT_DIRS)
+    agents = get_runner(method=method, env="mpe", env_id=parser.env_id, config_path=config_path,
+                        parser_args=args).agents
+    agents.use_actions_mask = True
+    return agents
+
+
+def egreedy_loop(agents, pi_actions, avail_actions_dict):
+    # One draw for the whole batch, then one Categorical per environment and agent.
+    actions = pi_actions.cpu().numpy()
+    actions_dict = [{k: actions[e, i] for i, k in enumerate(agents.agent_keys)} for e in range(len(actions))]
+    if np.random.rand() < agents.e_greedy:
+        actions_dict = [{k: Categorical(torch.Tensor(avail_actions_dict[e][k])).sample().numpy()
+                         for k in agents.agent_keys} for e in range(len(actions))]
+    return actions_dict
+
+
+def egreedy_batched(agents, pi_actions, avail_actions_dict):
+    avail_actions = agents._packed_avail_actions(avail_actions_dict, len(pi_actions))
+    return agents._unpack_actions(agents.exploration(pi_actions, avail_actions), len(pi_actions))
+
+
+def noise_loop(agents, pi_actions):
+    actions = {k: pi_actions[:, i, :agents.action_space[k].shape[-1]].cpu().numpy()
+               for i, k in enumerate(agents.agent_keys)}
+    for k in agents.agent_keys:
+        actions[k] += np.random.normal(0, agents.noise_scale, size=actions[k].shape)
+    return agents._env_batch(actions, len(pi_actions))
+
+
+def noise_batched(agents, pi_actions):
+    return agents._unpack_actions(agents.exploration(pi_actions), len(pi_actions))
+
+
+def timeit(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    iql, iddpg = make_agents(parser, "iql"), make_agents(parser, "iddpg")
+    iql.e_greedy, iddpg.noise_scale = 1.0, 0.1
+    print(f"{parser.env_id}, {iql.n_agents} agents, time in ms")
+    print(f"{'envs':>6}{'masked e-greedy loop':>22}{'batched':>10}{'Gaussian noise loop':>22}{'batched':>10}")
+    for n_envs in parser.envs:
+        pi_discrete = torch.zeros(n_envs, iql.n_agents, dtype=torch.long, device=parser.device)
+        pi_continuous = torch.rand(n_envs, iddpg.n_agents, iddpg.actions_low.shape[-1], device=parser.device)
+        avail_actions = [{k: (np.random.rand(iql.action_space[k].n) < 0.7).astype(np.float32)
+                          for k in iql.agent_keys} for _ in range(n_envs)]
+        for data in avail_actions:
+            for mask in data.values():
+                mask[0] = 1.0
+        times = [timeit(lambda: egreedy_loop(iql, pi_discrete, avail_actions), parser.repeat),
+                 timeit(lambda: egreedy_batched(iql, pi_discrete, avail_actions), parser.repeat),
+                 timeit(lambda: noise_loop(iddpg, pi_continuous), parser.repeat),
+                 timeit(lambda: noise_batched(iddpg, pi_continuous), parser.repeat)]
+        print(f"{n_envs:>6}{times[0]:>22.2f}{times[1]:>10.2f}{times[2]:>22.2f}{times[3]:>10.2f}")
+    iql.finish()
+    iddpg.finish()
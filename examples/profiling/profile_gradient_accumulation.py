@@ -0,0 +1,108 @@
+"""
+Benchmark the gradient accumulation of the learners: the peak memory and the time of one update on a large
+minibatch, split into a number of micro-batches.
+
+Each (method, gradient_accumulation_steps) pair runs in a fresh interpreter. The agent collects one rollout (or
+fills its buffer without training), then updates once on a minibatch of the given size. The peak memory of the
+update is the growth of the peak resident set size of the process (torch.cuda.max_memory_allocated on CUDA), and
+the parameters after the update are compared with those of one update without accumulation.
+
+Example:
+    python profile_gradient_accumulation.py --methods mappo qmix --batch-size 8192 --steps 1 4 16
+"""
+import os
+import tempfile
+import sys
+import argparse
+import subprocess
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+BENCHMARKS = {"ppo": ("classic_control", "CartPole-v1", dict(parallels=8), "on_policy"),
+              "mappo": ("mpe", "simple_spread_v3", dict(parallels=8), "on_policy"),
+              "qmix": ("mpe", "simple_spread_v3", dict(parallels=8, representation="Basic_RNN", use_rnn=True,
+                                                       rnn="GRU", N_recurrent_layers=1, fc_hidden_sizes=[64],
+                                                       recurrent_hidden_size=64, buffer_size=100000), "off_policy")}
+
+RUN = """
+import time
+import pickle
+import resource
+import numpy as np
+import torch
+from argparse import Namespace
+from xuance import get_runner
+kind, batch_size, steps, device = '{kind}', {batch_size}, {steps}, '{device}'
+if kind == "on_policy":  # One rollout of batch_size transitions.
+    kwargs = dict(buffer_size=batch_size, horizon_size=batch_size // {kwargs}['parallels'])
+else:  # Episodes of 25 steps, about batch_size transitions.
+    kwargs = dict(batch_size=batch_size // 25)
+kwargs.update({kwargs})
+parser_args = Namespace(dl_toolbox='torch', device=device, test_mode=False, render=False, seed=1,
+                        gradient_accumulation_steps=steps, **kwargs)
+runner = get_runner(method='{method}', env='{env}', env_id='{env_id}', parser_args=parser_args)
+agent = runner.agent if hasattr(runner, "agent") else runner.agents
+if kind == "on_policy":
+    agent.train_epochs, agent.memory.clear = lambda *args, **kwargs: dict(), lambda: None
+    agent.train(agent.buffer_size // agent.n_envs)
+    samples = agent.memory.sample(np.arange(agent.buffer_size))
+    samples['batch_size'] = agent.buffer_size
+else:
+    agent.start_training = np.inf
+    agent.train(2 * batch_size // agent.n_envs)
+    samples = agent.memory.sample(agent.batch_size)
+update = agent.learner.update_rnn if getattr(agent, "use_rnn", False) else agent.learner.update
+call = (lambda: update(samples)) if hasattr(agent, "agent_keys") else (lambda: update(**samples))
+if steps == 1:  # All the runs update the same parameters on the same samples.
+    torch.save(agent.learner.policy.state_dict(), '{initial}')
+    with open('{initial}.samples', 'wb') as f:
+        pickle.dump(samples, f)
+else:
+    agent.learner.policy.load_state_dict(torch.load('{initial}'))
+    with open('{initial}.samples', 'rb') as f:
+        samples = pickle.load(f)
+if device.startswith("cuda"):
+    torch.cuda.reset_peak_memory_stats()
+memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+call()
+latency = time.perf_counter() - start
+if device.startswith("cuda"):
+    peak = torch.cuda.max_memory_allocated() / 2 ** 20
+else:
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - memory) / 2 ** 10
+params = torch.nn.utils.parameters_to_vector(agent.learner.policy.parameters()).detach().cpu()
+if steps == 1:
+    torch.save(params, '{initial}.updated')
+difference = (params - torch.load('{initial}.updated')).abs().max().item()
+runner.envs.close()
+print(latency, peak, difference)
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the gradient accumulation of the learners.")
+    parser.add_argument("--methods", type=str, nargs="+", default=list(BENCHMARKS.keys()))
+    parser.add_argument("--batch-size", type=int, default=8192)
+    parser.add_argument("--steps", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--device", type=str, default="cpu")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    print(f"{'method':<8}{'steps':>6}{'update (ms)':>13}{'peak memory (MB)':>18}{'max param diff':>16}")
+    for method in parser.methods:
+        env, env_id, kwargs, kind = BENCHMARKS[method]
+        for steps in sorted(set(parser.steps) | {1}):  # The update without accumulation is the reference.
+            code = RUN.format(method=method, env=env, env_id=env_id, kwargs=dict(kwargs, **OUTPUT_DIRS),
+                              kind=kind, steps=steps, batch_size=parser.batch_size, device=parser.device,
+                              initial=f"/tmp/xuance_accumulation_{method}.pt")
+            result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{method:<8}{steps:>6}{'failed: ' + result.stderr.strip().splitlines()[-1]:>40}")
+                continue
+            latency, peak, difference = [float(v) for v in result.stdout.strip().splitlines()[-1].split()]
+            print(f"{method:<8}{steps:>6}{latency * 1e3:>13.1f}{peak:>18.1f}{difference:>16.1e}")
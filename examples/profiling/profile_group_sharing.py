@@ -0,0 +1,78 @@
+"""
+Benchmark the MARL agents with one model per group of agents (use_group_sharing) against one model per agent.
+
+The MPE scenarios with heterogeneous agents have groups of agents with the same observation and action spaces, e.g.,
+the 3 adversaries and the good agent of simple_tag_v3. With one model per agent, the policies loop over the agents;
+with the group sharing, they loop over the groups, and the agents of each group are one batch of the shared model. The
+time of one update (on the same minibatch) and of the actions of one step of the parallel environments are measured.
+
+Example:
+    python profile_group_sharing.py --method mappo --env-ids simple_tag_v3 simple_world_comm_v3 --batch-size 4096
+"""
+import os
+import tempfile
+import time
+import argparse
+import numpy as np
+import xuance
+from argparse import Namespace
+from xuance import get_runner
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the group sharing of the parameters.")
+    parser.add_argument("--method", type=str, default="mappo", choices=["ippo", "mappo"])
+    parser.add_argument("--env-ids", type=str, nargs="+", default=["simple_tag_v3", "simple_world_comm_v3"])
+    parser.add_argument("--batch-size", type=int, default=4096, help="The number of transitions of a minibatch.")
+    parser.add_argument("--parallels", type=int, default=16)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--device", type=str, default="cpu")
+    return parser.parse_args()
+
+
+def make_agent(parser, env_id, use_group_sharing):
+    hidden = [parser.hidden_size, parser.hidden_size]
+    config_path = os.path.join(os.path.dirname(xuance.__file__), f"configs/{parser.method}/mpe/simple_spread_v3.yaml")
+    args = Namespace(dl_toolbox='torch', device=parser.device, test_mode=False, render=False, seed=1,
+                     env_id=env_id, parallels=parser.parallels, continuous_action=False,
+                     policy="Categorical_MAAC_Policy", representation_hidden_size=hidden, actor_hidden_size=hidden,
+                     critic_hidden_size=hidden, buffer_size=parser.batch_size, n_minibatch=1, use_value_norm=False,
+                     use_parameter_sharing=use_group_sharing, use_group_sharing=use_group_sharing, **OUTPUT_DIRS)
+    return get_runner(method=parser.method, env="mpe", env_id=env_id, config_path=config_path,
+                      parser_args=args).agents
+
+
+def timeit(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    print(f"{parser.method}, minibatch of {parser.batch_size} transitions, {parser.parallels} environments, "
+          f"hidden size {parser.hidden_size}, time in ms")
+    print(f"{'env_id':>22}{'agents':>8}{'groups':>8}{'update':>18}{'action':>18}")
+    for env_id in parser.env_ids:
+        agent, agent_group = make_agent(parser, env_id, False), make_agent(parser, env_id, True)
+        agent.train_epochs, agent.memory.clear = lambda *args, **kwargs: {}, lambda: None
+        agent.train(agent.buffer_size // agent.n_envs)
+        samples = agent.memory.sample(np.arange(agent.buffer_size))
+        samples['batch_size'] = agent.buffer_size
+        obs = agent.envs.buf_obs
+        state = agent.envs.buf_state if agent.use_global_state else None
+        times = []
+        for a in (agent, agent_group):
+            times.append(timeit(lambda: a.learner.update(samples), parser.repeat))
+            times.append(timeit(lambda: a.action(obs_dict=obs, state=state), parser.repeat * 10))
+        print(f"{env_id:>22}{agent.n_agents:>8}{len(agent_group.model_keys):>8}"
+              f"{times[0]:>8.2f} ->{times[2]:>7.2f}{times[1]:>8.2f} ->{times[3]:>7.2f}")
+        agent.finish()
+        agent_group.finish()
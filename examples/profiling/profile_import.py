@@ -0,0 +1,78 @@
+"""
+Benchmark the import latency and memory footprint of the package entry points.
+
+Each measurement runs in a fresh interpreter, so nothing is shared between them:
+    - "import xuance": the bare package import;
+    - "runner lookup": importing the torch runner and looking up the agent class that get_runner would build;
+    - "env worker": the resident memory of one spawned SubprocVecMultiAgentEnv worker process.
+
+Example:
+    python profile_import.py --method mappo --env mpe --env-id simple_spread_v3 --repeat 5
+"""
+import argparse
+import subprocess
+import sys
+
+IMPORT_XUANCE = """
+import time, resource
+start = time.perf_counter()
+import xuance
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+RUNNER_LOOKUP = """
+import time, resource
+start = time.perf_counter()
+from xuance.common import get_arguments
+from xuance.torch.runners import REGISTRY_Runner
+from xuance.torch.agents import REGISTRY_Agents
+config = get_arguments(method="{method}", env="{env}", env_id="{env_id}", is_test=False)
+REGISTRY_Runner[config.runner], REGISTRY_Agents[config.agent]
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+ENV_WORKER = """
+import time
+from argparse import Namespace
+from xuance.common import get_arguments
+from xuance.environment import make_envs
+if __name__ == '__main__':
+    config = get_arguments(method="{method}", env="{env}", env_id="{env_id}", is_test=False)
+    config.parallels, config.vectorize, config.distributed_training = 2, "SubprocVecMultiAgentEnv", False
+    start = time.perf_counter()
+    envs = make_envs(config)
+    elapsed = time.perf_counter() - start
+    with open(f"/proc/{{envs.ps[0].pid}}/status") as f:
+        rss = [int(line.split()[1]) / 1024 for line in f if line.startswith("VmRSS")][0]
+    envs.close()
+    print(elapsed, rss)
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the import time and memory of the package entry points.")
+    parser.add_argument("--method", type=str, default="mappo")
+    parser.add_argument("--env", type=str, default="mpe")
+    parser.add_argument("--env-id", type=str, default="simple_spread_v3")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+def measure(code: str, repeat: int):
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        results.append([float(v) for v in output.strip().splitlines()[-1].split()])
+    seconds, memory = zip(*results)
+    return min(seconds), max(memory)
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    names = dict(method=parser.method, env=parser.env, env_id=parser.env_id)
+    print(f"{'entry point':<16}{'time (s, best)':>16}{'RSS (MB)':>12}")
+    for title, code in [("import xuance", IMPORT_XUANCE),
+                        ("runner lookup", RUNNER_LOOKUP.format(**names)),
+                        ("env worker", ENV_WORKER.format(**names))]:
+        seconds, memory = measure(code, parser.repeat)
+        print(f"{title:<16}{seconds:>16.3f}{memory:>12.1f}")
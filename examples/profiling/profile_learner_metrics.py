@@ -0,0 +1,59 @@
+"""
+Benchmark the update throughput of the learners together with the logging of their metrics.
+
+Each benchmark fills the replay/rollout buffer of an agent with a short training run, and then times the agent's own
+train_epochs() followed by log_infos(), which is the path every training iteration takes. Set --device to a CUDA
+device to include the cost of the device synchronizations.
+
+Example:
+    python profile_learner_metrics.py --device cuda:0 --iterations 200
+"""
+import os
+import tempfile
+import time
+import argparse
+from argparse import Namespace
+from xuance import get_runner
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+BENCHMARKS = [("dqn", "classic_control", "CartPole-v1", dict(start_training=1000)),
+              ("ppo", "classic_control", "CartPole-v1", dict()),
+              ("qmix", "mpe", "simple_spread_v3", dict(start_training=1000, parallels=4))]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the learner updates together with the logging of their metrics.")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--iterations", type=int, default=200)
+    return parser.parse_args()
+
+
+def benchmark(method: str, env: str, env_id: str, device: str, iterations: int, **kwargs):
+    parser_args = Namespace(dl_toolbox='torch', device=device, test_mode=False, render=False, **kwargs, **OUTPUT_DIRS)
+    runner = get_runner(method=method, env=env, env_id=env_id, parser_args=parser_args)
+    agent = runner.agent if hasattr(runner, "agent") else runner.agents
+    agent.train(3000 // agent.n_envs)  # Fill the buffer.
+    if hasattr(agent, "n_minibatch"):
+        agent.memory.size = agent.memory.n_size  # The rollout buffer was cleared after training, reuse its data.
+    updates_per_iteration = agent.n_epochs * getattr(agent, "n_minibatch", 1)
+    start = time.perf_counter()
+    for i in range(iterations):
+        info = agent.train_epochs(n_epochs=agent.n_epochs)
+        agent.log_infos(info, agent.current_step + i)
+    elapsed = time.perf_counter() - start
+    agent.finish()
+    runner.envs.close()
+    return iterations * updates_per_iteration / elapsed
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    results = []
+    for method, env, env_id, kwargs in BENCHMARKS:
+        results.append((method, benchmark(method, env, env_id, parser.device, parser.iterations, **kwargs)))
+    print(f"{'method':<8}{'updates/s':>12}")
+    for method, updates_per_second in results:
+        print(f"{method:<8}{updates_per_second:>12.1f}")
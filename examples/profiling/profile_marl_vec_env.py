@@ -0,0 +1,95 @@
+"""
+Benchmark the array batches of the multi-agent vectorized environments against their lists of per-env dicts.
+
+With use_array_batches, the vectorized environments return {agent_key: ndarray[n_envs, ...]} batches and the
+information as a dict of arrays, which the agents and the replay buffers consume without rebuilding arrays from
+per-env dicts. The first table measures the environments alone, stepped with random actions. The second one measures
+the training loop of the agents with idle learners (no training updates are triggered), i.e., acting, stepping the
+environments and storing the transitions.
+
+Example:
+    python profile_marl_vec_env.py --parallels 64 --steps 200 --methods qmix mappo
+"""
+import os
+import tempfile
+import time
+import argparse
+import numpy as np
+from argparse import Namespace
+from xuance import get_runner
+from xuance.common import get_arguments
+from xuance.environment import make_envs
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the array batches of the multi-agent vectorized environments.")
+    parser.add_argument("--env", type=str, default="mpe")
+    parser.add_argument("--env-id", type=str, default="simple_spread_v3")
+    parser.add_argument("--methods", type=str, nargs="+", default=["qmix", "mappo"])
+    parser.add_argument("--vectorize", type=str, nargs="+", default=["DummyVecMultiAgentEnv",
+                                                                       "SubprocVecMultiAgentEnv"])
+    parser.add_argument("--parallels", type=int, default=64)
+    parser.add_argument("--in-series", type=str, default="auto")
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--device", type=str, default="cpu")
+    return parser.parse_args()
+
+
+def random_actions(envs, array_batches: bool):
+    actions = {k: np.array([space.sample() for _ in range(envs.num_envs)]) for k, space in envs.action_space.items()}
+    if array_batches:
+        return actions
+    return [{k: v[e] for k, v in actions.items()} for e in range(envs.num_envs)]
+
+
+def benchmark_envs(parser, vectorize: str, array_batches: bool):
+    config = get_arguments(method=parser.methods[0], env=parser.env, env_id=parser.env_id, is_test=False)
+    config.parallels, config.vectorize, config.distributed_training = parser.parallels, vectorize, False
+    config.in_series = parser.in_series if parser.in_series == "auto" else int(parser.in_series)
+    config.use_array_batches = array_batches
+    envs = make_envs(config)
+    envs.reset()
+    actions = [random_actions(envs, array_batches) for _ in range(16)]
+    start = time.perf_counter()
+    for step in range(parser.steps):
+        envs.step(actions[step % len(actions)])
+    elapsed = time.perf_counter() - start
+    envs.close()
+    return parser.steps * parser.parallels / elapsed
+
+
+def benchmark_agents(parser, method: str, vectorize: str, array_batches: bool):
+    in_series = parser.in_series if parser.in_series == "auto" else int(parser.in_series)
+    args = Namespace(dl_toolbox='torch', device=parser.device, parallels=parser.parallels, test_mode=False,
+                     vectorize=vectorize, in_series=in_series, use_array_batches=array_batches,
+                     start_training=int(1e12),  # keep off-policy learners idle.
+                     buffer_size=(parser.steps + 20) * parser.parallels,  # keep on-policy learners idle.
+                     **OUTPUT_DIRS)
+    runner = get_runner(method=method, env=parser.env, env_id=parser.env_id, parser_args=args)
+    agent = runner.agents
+    agent.train(10)  # warm up.
+    start = time.perf_counter()
+    agent.train(parser.steps)
+    elapsed = time.perf_counter() - start
+    agent.finish()
+    runner.envs.close()
+    return parser.steps * parser.parallels / elapsed
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    print(f"environments only, {parser.parallels} envs of {parser.env_id}")
+    print(f"{'vectorizer':<26}{'dict steps/s':>14}{'array steps/s':>15}{'speedup':>9}")
+    for vectorize in parser.vectorize:
+        fps_dict, fps_array = [benchmark_envs(parser, vectorize, array) for array in (False, True)]
+        print(f"{vectorize:<26}{fps_dict:>14.0f}{fps_array:>15.0f}{fps_array / fps_dict:>9.2f}")
+    print(f"\ntraining loop with idle learners, {parser.parallels} envs of {parser.env_id}")
+    print(f"{'method':<8}{'vectorizer':<26}{'dict steps/s':>14}{'array steps/s':>15}{'speedup':>9}")
+    for method in parser.methods:
+        for vectorize in parser.vectorize:
+            fps_dict, fps_array = [benchmark_agents(parser, method, vectorize, array) for array in (False, True)]
+            print(f"{method:<8}{vectorize:<26}{fps_dict:>14.0f}{fps_array:>15.0f}{fps_array / fps_dict:>9.2f}")
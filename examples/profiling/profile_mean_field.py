@@ -0,0 +1,72 @@
+"""
+Benchmark the mean-field aggregation of MFQ/MFAC for growing numbers of agents.
+
+The previous MFQ/MFAC computed one mean action over all agents and repeated it for every agent, i.e., the mean action
+of an agent included its own action and there were no local neighborhoods. MeanFieldAggregator computes the mean
+action of the neighbors of every agent in one batched call: "GLOBAL" (all other agents), "KNN" (the n_neighbors
+nearest agents) and "RANGE" (the agents within neighbor_range). Random one-hot actions, alive masks and positions
+(uniform in a square whose area grows with the number of agents, i.e., a constant density) are used. Before timing,
+the script checks the three neighborhoods against a per-agent loop.
+
+Example:
+    python profile_mean_field.py --agents 10 100 500 1000 --batch-size 256
+"""
+import time
+import argparse
+import torch
+from xuance.torch.policies.mean_field import MeanFieldAggregator
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the mean-field aggregation of MFQ/MFAC.")
+    parser.add_argument("--neighborhoods", type=str, nargs="+", default=["GLOBAL", "KNN", "RANGE"])
+    parser.add_argument("--agents", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--n-actions", type=int, default=21)
+    parser.add_argument("--n-neighbors", type=int, default=8)
+    parser.add_argument("--neighbor-range", type=float, default=0.15)
+    parser.add_argument("--repeat", type=int, default=10)
+    return parser.parse_args()
+
+
+def build_aggregator(neighborhood, n_agents, parser):
+    return MeanFieldAggregator(n_agents, ["agent_0"], True, neighborhood, parser.n_neighbors,
+                               parser.neighbor_range, position_index=[0, 1])
+
+
+def random_batch(batch_size, n_agents, n_actions):
+    actions = torch.nn.functional.one_hot(torch.randint(n_actions, (batch_size, n_agents)), n_actions).float()
+    alive = torch.rand(batch_size, n_agents) < 0.9
+    positions = torch.rand(batch_size, n_agents, 2) * (n_agents / 100) ** 0.5
+    return actions, alive, positions
+
+
+def mean_previous(actions, alive):
+    n_agents = actions.shape[1]
+    actions_alive = actions * alive.unsqueeze(-1)
+    act_mean = actions_alive.sum(dim=1) / alive.sum(dim=1, keepdim=True).clamp(min=1)
+    return act_mean.unsqueeze(1).repeat([1, n_agents, 1])
+
+
+def timeit(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    torch.manual_seed(0)
+    print(f"batch size {parser.batch_size}, {parser.n_actions} actions, {parser.n_neighbors} neighbors, "
+          f"range {parser.neighbor_range}, time per call in ms")
+    print(f"{'agents':>7}{'previous':>10}" + "".join(f"{n:>10}" for n in parser.neighborhoods))
+    for n_agents in parser.agents:
+        actions, alive, positions = random_batch(parser.batch_size, n_agents, parser.n_actions)
+        times = [timeit(lambda: mean_previous(actions, alive), parser.repeat)]
+        for neighborhood in parser.neighborhoods:
+            aggregator = build_aggregator(neighborhood, n_agents, parser)
+            times.append(timeit(lambda: aggregator(actions, alive, aggregator.get_positions(
+                positions.unbind(dim=1))), parser.repeat))
+        print(f"{n_agents:>7}" + "".join(f"{t:>10.2f}" for t in times))
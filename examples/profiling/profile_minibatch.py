@@ -0,0 +1,103 @@
+"""
+Benchmark the minibatch iteration of on-policy agents: per-minibatch sampling of the NumPy buffer against the
+RolloutMinibatches view over the rollout converted to tensors once.
+
+The agent collects one rollout, which is kept in its buffer. For both paths the time spent to produce and
+convert all the minibatches of n_epochs epochs (without updates), and the time of n_epochs epochs of updates, are
+reported per rollout.
+
+Example:
+    python profile_minibatch.py --methods ppo mappo --n-epochs 10 --n-minibatch 32 --device cpu
+"""
+import os
+import tempfile
+import time
+import argparse
+import numpy as np
+import torch
+from copy import deepcopy
+from argparse import Namespace
+from xuance import get_runner
+from xuance.torch.utils import RolloutMinibatches
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+BENCHMARKS = {"ppo": ("classic_control", "CartPole-v1", dict()),
+              "mappo": ("mpe", "simple_spread_v3", dict(parallels=4, buffer_size=3200))}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the minibatch iteration of on-policy agents.")
+    parser.add_argument("--methods", type=str, nargs="+", default=list(BENCHMARKS.keys()))
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--n-epochs", type=int, default=10)
+    parser.add_argument("--n-minibatch", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=20)
+    return parser.parse_args()
+
+
+def to_device(data, device):
+    if isinstance(data, dict):
+        return {k: to_device(v, device) for k, v in data.items()}
+    if isinstance(data, np.ndarray) and data.dtype != object:
+        return torch.as_tensor(data, device=device)
+    return data
+
+
+def sampled_minibatches(agent, indexes):
+    """The previous path: fancy-index the buffer for every minibatch, then convert each field."""
+    for start in range(0, agent.buffer_size, agent.batch_size):
+        yield to_device(agent.memory.sample(indexes[start:start + agent.batch_size]), agent.device)
+
+
+def tensor_minibatches(agent, indexes):
+    """The new path: one conversion of the rollout, then a view iterator."""
+    normalize = getattr(agent.memory, "use_advnorm", getattr(agent.memory, "use_advantage_norm", False))
+    rollout = RolloutMinibatches(agent.memory.rollout(), agent.device, ["advantages"] if normalize else [])
+    yield from rollout.minibatches(indexes, agent.batch_size)
+
+
+def run_epochs(agent, iterate, update):
+    indexes = np.arange(agent.buffer_size)
+    for _ in range(agent.n_epochs):
+        np.random.shuffle(indexes)
+        for samples in iterate(agent, indexes):
+            if update and hasattr(agent, "agent_keys"):  # MARL learners take the sample dict.
+                agent.learner.update(samples)
+            elif update:
+                agent.learner.update(**samples)
+
+
+def time_path(agent, iterate, update, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run_epochs(agent, iterate, update)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    print(f"{'method':<8}{'minibatches':>12}{'data numpy (ms)':>17}{'data tensor (ms)':>18}"
+          f"{'epochs numpy (ms)':>19}{'epochs tensor (ms)':>20}")
+    for method in parser.methods:
+        env, env_id, kwargs = BENCHMARKS[method]
+        parser_args = Namespace(dl_toolbox='torch', device=parser.device, test_mode=False, render=False,
+                                n_epochs=parser.n_epochs, n_minibatch=parser.n_minibatch, **kwargs, **OUTPUT_DIRS)
+        runner = get_runner(method=method, env=env, env_id=env_id, parser_args=parser_args)
+        agent = runner.agent if hasattr(runner, "agent") else runner.agents
+        agent.train_epochs, agent.memory.clear = lambda *args, **kwargs: {}, lambda: None  # Keep the rollout.
+        agent.train(agent.buffer_size // agent.n_envs)
+        del agent.train_epochs, agent.memory.clear
+        n_minibatches = agent.n_epochs * (agent.buffer_size // agent.batch_size)
+        data_numpy = time_path(agent, sampled_minibatches, False, parser.repeat)
+        data_tensor = time_path(agent, tensor_minibatches, False, parser.repeat)
+        # Training repeatedly on the same rollout diverges, so both paths start from the same parameters.
+        initial_state = deepcopy(agent.policy.state_dict())
+        epochs_numpy = time_path(agent, sampled_minibatches, True, 1)
+        agent.policy.load_state_dict(initial_state)
+        epochs_tensor = time_path(agent, tensor_minibatches, True, 1)
+        runner.envs.close()
+        print(f"{method:<8}{n_minibatches:>12}{data_numpy * 1e3:>17.2f}{data_tensor * 1e3:>18.2f}"
+              f"{epochs_numpy * 1e3:>19.1f}{epochs_tensor * 1e3:>20.1f}")
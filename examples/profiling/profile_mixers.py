@@ -0,0 +1,133 @@
+"""
+Benchmark the mixers of QMIX, WQMIX and QTRAN against the previous implementation.
+
+The previous mixers are reproduced below: every hypernetwork (or state layer) of QMIX_mixer and QMIX_FF_mixer reads the
+global states with its own matrix product, the target mixers record the autograd graph, and QTRAN_alt repeats the
+states and the agent encodings for every agent and evaluates the state layers again for the greedy actions. The new
+path is the one of MixingQnetwork.Q_tot_and_target, Weighted_MixingQnetwork.Q_tot_weighted and
+Qtran_MixingQnetwork.Q_tran_state_features. Each case times one forward and backward pass of the mixing part of the
+loss on a batch of batch_size episodes with episode_length steps (the update_rnn inputs), after checking that both
+paths give the same values.
+
+Example:
+    python profile_mixers.py --scenarios 3:48 10:322 27:1170 --batch-size 32 --episode-length 120
+"""
+import time
+import argparse
+import torch
+import torch.nn.functional as F
+from copy import deepcopy
+from gym.spaces import Discrete
+from xuance.torch.policies import QMIX_mixer, QMIX_FF_mixer, QTRAN_alt
+from xuance.torch.policies.core import encode_states
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the mixers of QMIX, WQMIX and QTRAN.")
+    parser.add_argument("--scenarios", type=str, nargs="+", default=["3:48", "10:322", "27:1170"],
+                        help="n_agents:dim_state, e.g., 3m, MMM2 and 27m_vs_30m of SMAC.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--episode-length", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=10)
+    return parser.parse_args()
+
+
+def qmix_previous(mixer, values_n, states):
+    agent_qs = values_n.reshape(-1, 1, mixer.n_agents)
+    w_1 = torch.abs(mixer.hyper_w_1(states)).view(-1, mixer.n_agents, mixer.dim_hidden)
+    b_1 = mixer.hyper_b_1(states).view(-1, 1, mixer.dim_hidden)
+    hidden = F.elu(torch.bmm(agent_qs, w_1) + b_1)
+    w_2 = torch.abs(mixer.hyper_w_2(states)).view(-1, mixer.dim_hidden, 1)
+    b_2 = mixer.hyper_b_2(states).view(-1, 1, 1)
+    return (torch.bmm(hidden, w_2) + b_2).view(-1, 1)
+
+
+def ff_previous(mixer, values_n, states):
+    inputs = torch.cat([values_n.view([-1, mixer.n_agents]), states], dim=-1)
+    return (mixer.ff_net(inputs) + mixer.ff_net_bias(states)).view([-1, 1])
+
+
+def qtran_alt_previous(qtran, states, hidden_state_inputs, actions_onehot):
+    h = qtran.action_encoding(torch.cat([hidden_state_inputs, actions_onehot], dim=-1))
+    h = h.reshape(-1, qtran.n_agents, qtran.dim_ae_input)
+    bs, dim_h = h.shape[0], h.shape[-1]
+    agent_ids = torch.eye(qtran.n_agents, dtype=torch.float32)
+    repeat_agent_ids = agent_ids.unsqueeze(0).repeat(bs, 1, 1)
+    repeated_agent_masks = (1 - agent_ids).unsqueeze(0).unsqueeze(-1).repeat(bs, 1, 1, dim_h)
+    h = (h.unsqueeze(2).repeat(1, 1, qtran.n_agents, 1) * repeated_agent_masks).sum(dim=2)
+    repeated_states = states.unsqueeze(1).repeat(1, qtran.n_agents, 1)
+    return qtran.Q_jt(torch.cat([repeated_states, h, repeat_agent_ids], dim=-1)), qtran.V_jt(states)
+
+
+def build_cases(n_agents, dim_state, rows):
+    qmix = QMIX_mixer(dim_state, 32, 64, n_agents)
+    target_qmix = deepcopy(qmix)
+    ff = QMIX_FF_mixer(dim_state, 256, n_agents)
+    target_ff = deepcopy(ff)
+    action_space = {f"agent_{i}": Discrete(10) for i in range(n_agents)}
+    qtran = QTRAN_alt(dim_state, action_space, 64, n_agents, 64)
+    values = torch.randn(rows, n_agents, 1, requires_grad=True)
+    values_next = torch.randn(rows, n_agents, 1)
+    states, states_next = torch.randn(rows, dim_state), torch.randn(rows, dim_state)
+    hidden = torch.randn(rows * n_agents, 64)
+    actions = F.one_hot(torch.randint(10, (2, rows * n_agents)), 10).float()
+
+    def qmix_prev():
+        return qmix_previous(qmix, values, states), qmix_previous(target_qmix, values_next, states_next)
+
+    def qmix_new():
+        q_tot = qmix(values, states)
+        with torch.no_grad():
+            q_tot_next = target_qmix(values_next, states_next)
+        return q_tot, q_tot_next
+
+    def wqmix_prev():
+        return (qmix_previous(qmix, values, states), ff_previous(ff, values, states),
+                ff_previous(target_ff, values_next, states_next))
+
+    def wqmix_new():
+        features, ff_features = encode_states([(states, qmix.state_layers), (states, ff.state_layers)])
+        with torch.no_grad():
+            q_tot_next = target_ff(values_next, states_next)
+        return qmix.mix(values, features), ff.mix(values, ff_features), q_tot_next
+
+    def qtran_prev():
+        return qtran_alt_previous(qtran, states, hidden, actions[0]) + qtran_alt_previous(qtran, states, hidden,
+                                                                                          actions[1])
+
+    def qtran_new():
+        state_features = encode_states([(states, qtran.state_layers)])[0]
+        return qtran(states, hidden, actions[0], state_features) + qtran(states, hidden, actions[1], state_features)
+
+    return {"QMIX": (qmix_prev, qmix_new), "WQMIX": (wqmix_prev, wqmix_new), "QTRAN_alt": (qtran_prev, qtran_new)}
+
+
+def train_step(fn):
+    outputs = fn()
+    loss = sum(out.mean() for out in outputs)
+    loss.backward()
+
+
+def timeit(fn, repeat):
+    train_step(fn)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        train_step(fn)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    torch.manual_seed(0)
+    rows = parser.batch_size * parser.episode_length
+    print(f"{rows} rows (batch size {parser.batch_size} x {parser.episode_length} steps), "
+          f"forward + backward time in ms")
+    print(f"{'agents':>7}{'dim_state':>10}{'mixer':>11}{'previous':>10}{'fused':>10}{'speedup':>9}")
+    for scenario in parser.scenarios:
+        n_agents, dim_state = [int(x) for x in scenario.split(":")]
+        for name, (previous, fused) in build_cases(n_agents, dim_state, rows).items():
+            for out_previous, out_fused in zip(previous(), fused()):
+                torch.testing.assert_close(out_previous, out_fused, rtol=1e-4, atol=1e-4)
+            t_previous, t_fused = timeit(previous, parser.repeat), timeit(fused, parser.repeat)
+            print(f"{n_agents:>7}{dim_state:>10}{name:>11}{t_previous:>10.2f}{t_fused:>10.2f}"
+                  f"{t_previous / t_fused:>8.2f}x")
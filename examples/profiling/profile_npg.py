@@ -0,0 +1,60 @@
+"""
+Benchmark the time and peak memory of one NPG_Learner.update() for different sizes of the actor network.
+
+Each size runs in a fresh interpreter, so that the peak resident memory (or the peak CUDA memory) of one size does
+not hide the others. A size that fails, e.g. runs out of memory, is reported as such.
+
+Example:
+    python profile_npg.py --sizes 64,64 256,256 --batch-size 320
+"""
+import sys
+import argparse
+import subprocess
+
+UPDATE = """
+import time, resource, torch, numpy as np
+from argparse import Namespace
+from xuance.common import get_arguments
+from xuance.environment import make_envs
+from xuance.torch.agents import NPG_Agent
+config = get_arguments(method="npg", env="classic_control", env_id="CartPole-v1", is_test=False)
+config.actor_hidden_size = config.critic_hidden_size = [{sizes}]
+config.device, config.parallels, config.distributed_training = "{device}", 1, False
+agent = NPG_Agent(config, make_envs(config))
+samples = dict(obs=np.random.randn({batch_size}, 4).astype(np.float32),
+               actions=np.random.randint(0, 2, {batch_size}),
+               returns=np.random.randn({batch_size}).astype(np.float32),
+               advantages=np.random.randn({batch_size}).astype(np.float32))
+agent.learner.update(**samples)
+start = time.perf_counter()
+for _ in range({repeat}):
+    agent.learner.update(**samples)
+if "{device}".startswith("cuda"):
+    torch.cuda.synchronize()
+    memory = torch.cuda.max_memory_allocated() / 2 ** 20
+else:
+    memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print((time.perf_counter() - start) / {repeat}, memory)
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark one NPG update for different sizes of the actor network.")
+    parser.add_argument("--sizes", type=str, nargs="+", default=["64,64", "256,256"])
+    parser.add_argument("--batch-size", type=int, default=320)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    print(f"{'actor hidden':<14}{'time/update (s)':>17}{'peak memory (MB)':>18}")
+    for sizes in parser.sizes:
+        code = UPDATE.format(sizes=sizes, device=parser.device, batch_size=parser.batch_size, repeat=parser.repeat)
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{sizes:<14}{'failed (exit code ' + str(result.returncode) + ')':>35}")
+            continue
+        seconds, memory = [float(v) for v in result.stdout.strip().splitlines()[-1].split()]
+        print(f"{sizes:<14}{seconds:>17.4f}{memory:>18.1f}")
@@ -0,0 +1,91 @@
+"""
+Benchmark the updates of the MARL learners with the packed (alive) agents against the masked updates of all agents.
+
+The agents (MPE simple_spread_v3, parameter sharing) collect one buffer of transitions, then a fraction of the agents of
+the sampled minibatch is marked as dead in the agent_mask, as in the battle scenarios where most agents die during the
+episode. The time of one update is measured with use_packed_agents False and True, on the same minibatch.
+
+Example:
+    python profile_packed_agents.py --methods iql qmix mappo --batch-size 4096 --dead 0.0 0.5 0.8
+"""
+import os
+import tempfile
+import time
+import argparse
+import numpy as np
+from argparse import Namespace
+from xuance import get_runner
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the updates with the packed agents.")
+    parser.add_argument("--methods", type=str, nargs="+", default=["iql", "qmix", "mappo"])
+    parser.add_argument("--batch-size", type=int, default=4096, help="The number of transitions of a minibatch.")
+    parser.add_argument("--dead", type=float, nargs="+", default=[0.0, 0.5, 0.8])
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--device", type=str, default="cpu")
+    return parser.parse_args()
+
+
+def make_agent(method, use_packed_agents, parser):
+    hidden = [parser.hidden_size, parser.hidden_size]
+    kwargs = dict(representation_hidden_size=hidden, q_hidden_size=hidden, actor_hidden_size=hidden,
+                  critic_hidden_size=hidden, use_value_norm=False)
+    if method == "mappo":
+        kwargs.update(buffer_size=parser.batch_size, n_minibatch=1)
+    else:
+        kwargs.update(batch_size=parser.batch_size, start_training=np.inf)
+    args = Namespace(dl_toolbox='torch', device=parser.device, test_mode=False, render=False, seed=1, parallels=8,
+                     use_parameter_sharing=True, use_packed_agents=use_packed_agents, **kwargs, **OUTPUT_DIRS)
+    return get_runner(method=method, env="mpe", env_id="simple_spread_v3", parser_args=args).agents
+
+
+def collect(agent, method):
+    if method == "mappo":
+        agent.train_epochs, agent.memory.clear = lambda *args, **kwargs: {}, lambda: None
+        agent.train(agent.buffer_size // agent.n_envs)
+        samples = agent.memory.sample(np.arange(agent.buffer_size))
+        samples['batch_size'] = agent.buffer_size
+    else:
+        agent.train(agent.batch_size // agent.n_envs)
+        samples = agent.memory.sample(agent.batch_size)
+    return samples
+
+
+def kill_agents(samples, agent_keys, dead, seed=0):
+    samples = dict(samples, agent_mask=dict(samples['agent_mask']))
+    rng = np.random.default_rng(seed)
+    for key in agent_keys:
+        samples['agent_mask'][key] = np.logical_and(samples['agent_mask'][key],
+                                                    rng.random(samples['agent_mask'][key].shape) >= dead)
+    return samples
+
+
+def timeit(agent, samples, repeat):
+    agent.learner.update(samples)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        agent.learner.update(samples)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    print(f"minibatch of {parser.batch_size} transitions x 3 agents, hidden size {parser.hidden_size}, "
+          f"time per update in ms")
+    print(f"{'method':>7}{'dead':>7}{'masked':>10}{'packed':>10}{'speedup':>9}")
+    for method in parser.methods:
+        agent, agent_packed = make_agent(method, False, parser), make_agent(method, True, parser)
+        samples = collect(agent, method)
+        for dead in parser.dead:
+            samples_dead = kill_agents(samples, agent.agent_keys, dead)
+            t_masked = timeit(agent, samples_dead, parser.repeat)
+            t_packed = timeit(agent_packed, samples_dead, parser.repeat)
+            print(f"{method:>7}{dead:>7.1f}{t_masked:>10.2f}{t_packed:>10.2f}{t_masked / t_packed:>8.2f}x")
+        agent.finish()
+        agent_packed.finish()
@@ -0,0 +1,87 @@
+"""
+Benchmark the learner precision ("fp32", "bf16" and "fp16") on the classic control tasks.
+
+Each (method, precision) pair runs in a fresh interpreter with the same seed. The agent is trained for a number of
+steps, then the latency of one update (train_epochs() divided by its number of minibatches) and the mean return of
+a few test episodes are reported, so that both the speed and the parity of the mixed precision updates can be read.
+
+Example:
+    python profile_precision.py --methods dqn ppo sac ddpg --steps 20000 --device cpu
+"""
+import os
+import tempfile
+import sys
+import argparse
+import subprocess
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+BENCHMARKS = {"dqn": ("classic_control", "CartPole-v1", dict(start_training=1000)),
+              "ppo": ("classic_control", "CartPole-v1", dict()),
+              "sac": ("classic_control", "Pendulum-v1", dict(start_training=1000)),
+              "ddpg": ("classic_control", "Pendulum-v1", dict(start_training=1000))}
+
+RUN = """
+import time
+import numpy as np
+from copy import deepcopy
+from argparse import Namespace
+from xuance import get_runner
+from xuance.environment import make_envs
+parser_args = Namespace(dl_toolbox='torch', device='{device}', test_mode=False, render=False, seed=1,
+                        precision='{precision}', **{kwargs})
+runner = get_runner(method='{method}', env='{env}', env_id='{env_id}', parser_args=parser_args)
+agent = runner.agent
+start = time.perf_counter()
+agent.train({steps} // agent.n_envs)
+training = time.perf_counter() - start
+if hasattr(agent, "n_minibatch"):
+    agent.memory.size = agent.memory.n_size  # The rollout buffer was cleared after training, reuse its data.
+updates = getattr(agent, "n_minibatch", 1)
+start = time.perf_counter()
+for _ in range({repeat}):
+    agent.train_epochs(n_epochs=1)
+update = (time.perf_counter() - start) / {repeat} / updates
+
+
+def env_fn():
+    config_test = deepcopy(agent.config)
+    config_test.parallels = 1
+    return make_envs(config_test)
+
+
+scores = agent.test(env_fn, {episodes})
+runner.envs.close()
+print(training, update, np.mean(scores))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the learner precision.")
+    parser.add_argument("--methods", type=str, nargs="+", default=list(BENCHMARKS.keys()))
+    parser.add_argument("--precisions", type=str, nargs="+", default=["fp32", "bf16", "fp16"])
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--episodes", type=int, default=5)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    print(f"{'method':<8}{'precision':>10}{'train (s)':>11}{'update (ms)':>13}{'return':>10}")
+    for method in parser.methods:
+        env, env_id, kwargs = BENCHMARKS[method]
+        for precision in parser.precisions:
+            code = RUN.format(method=method, env=env, env_id=env_id, kwargs=dict(kwargs, **OUTPUT_DIRS),
+                              device=parser.device,
+                              precision=precision, steps=parser.steps, repeat=parser.repeat,
+                              episodes=parser.episodes)
+            result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{method:<8}{precision:>10}{'failed: ' + result.stderr.strip().splitlines()[-1]:>34}")
+                continue
+            training, update, score = [float(v) for v in result.stdout.strip().splitlines()[-1].split()]
+            print(f"{method:<8}{precision:>10}{training:>11.1f}{update * 1e3:>13.3f}{score:>10.1f}")
@@ -0,0 +1,71 @@
+"""
+Profile the per-step Python bookkeeping of the agents' training loops.
+
+The learner is kept idle (no training updates are triggered) so that the measured time only covers acting,
+environment stepping, and the bookkeeping done by ``Agent.train`` between two environment steps.
+
+Example:
+    python profile_step_bookkeeping.py --method dqn --parallels 128 --steps 200
+"""
+import os
+import tempfile
+import argparse
+import cProfile
+import pstats
+import time
+from xuance import get_runner
+
+# The logs and models of the benchmark runs are written out of the working tree.
+OUTPUT_DIRS = dict(log_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "logs"),
+                   model_dir=os.path.join(tempfile.gettempdir(), "xuance_profiling", "models"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Profile the step bookkeeping of the training loops.")
+    parser.add_argument("--method", type=str, default="dqn")
+    parser.add_argument("--env", type=str, default="classic_control")
+    parser.add_argument("--env-id", type=str, default="CartPole-v1")
+    parser.add_argument("--parallels", type=int, default=128)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--device", type=str, default="cpu")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    args = argparse.Namespace(dl_toolbox='torch', device=parser.device, parallels=parser.parallels,
+                              running_steps=parser.steps * parser.parallels, test_mode=False,
+                              start_training=int(1e12),  # keep off-policy learners idle.
+                              horizon_size=parser.steps + 1,  # keep on-policy learners idle.
+                              buffer_size=(parser.steps + 1) * parser.parallels, **OUTPUT_DIRS)
+    runner = get_runner(method=parser.method, env=parser.env, env_id=parser.env_id, parser_args=args)
+    agent = runner.agent
+
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    agent.train(parser.steps)
+    profiler.disable()
+    total = time.perf_counter() - start
+
+    stats = pstats.Stats(profiler)
+    train_time, core_time, copy_time, log_time = 0.0, 0.0, 0.0, 0.0
+    for (filename, _, func_name), (_, _, _, cumtime, _) in stats.stats.items():
+        if func_name == "train" and "agents" in filename:
+            train_time = max(train_time, cumtime)
+        elif func_name == "step" and filename.endswith("vector_env.py"):
+            core_time += cumtime  # environment stepping.
+        elif func_name in ["action", "store"] and ("agents" in filename or "memory_tools" in filename):
+            core_time += cumtime  # policy forward and buffer writes.
+        elif func_name == "deepcopy" and filename.endswith("copy.py"):
+            copy_time = max(copy_time, cumtime)
+        elif func_name == "log_infos":
+            log_time += cumtime
+    print(f"method={parser.method}, envs={parser.parallels}, steps={parser.steps}")
+    print(f"total time per step:           {1e3 * total / parser.steps:.3f} ms")
+    print(f"bookkeeping time per step:     {1e3 * (train_time - core_time) / parser.steps:.3f} ms")
+    print(f"  of which deepcopy:           {1e3 * copy_time / parser.steps:.3f} ms")
+    print(f"  of which episode logging:    {1e3 * log_time / parser.steps:.3f} ms")
+    stats.sort_stats("tottime").print_stats(8)
+    agent.finish()
+    runner.envs.close()
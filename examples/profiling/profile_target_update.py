@@ -0,0 +1,80 @@
+"""
+Benchmark the soft update of the target networks of MADDPG with non-shared parameters, for different numbers of agents.
+
+The per-parameter Python loop (two in-place kernels per tensor) is compared with the fused foreach update of
+TargetNetworks, which the policies use in soft_update() and copy_target(). Both run on copies of the same policy,
+and the largest difference between the resulting target parameters is reported as a check.
+
+Example:
+    python profile_target_update.py --agents 1 8 32 --device cuda:0
+"""
+import time
+import argparse
+import torch
+from copy import deepcopy
+from gym.spaces import Box
+from xuance.torch import ModuleDict
+from xuance.torch.representations import Basic_MLP
+from xuance.torch.policies import REGISTRY_Policy
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the soft update of target networks.")
+    parser.add_argument("--agents", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--hidden-size", type=int, default=64)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--repeat", type=int, default=200)
+    return parser.parse_args()
+
+
+def build_policy(n_agents: int, hidden_size: int, device: str):
+    keys = [f"agent_{i}" for i in range(n_agents)]
+
+    def representation(dim_input):
+        return ModuleDict({k: Basic_MLP((dim_input,), [hidden_size], None, torch.nn.init.orthogonal_,
+                                        torch.nn.ReLU, device) for k in keys})
+
+    return REGISTRY_Policy["MADDPG_Policy"](
+        action_space={k: Box(-1, 1, (5,)) for k in keys}, n_agents=n_agents,
+        actor_representation=representation(18), critic_representation=representation(23 * n_agents),
+        actor_hidden_size=[hidden_size], critic_hidden_size=[hidden_size], normalize=None,
+        initialize=torch.nn.init.orthogonal_, activation=torch.nn.ReLU, activation_action=torch.nn.Tanh,
+        device=device, use_parameter_sharing=False, model_keys=keys, use_rnn=False, rnn=None)
+
+
+def loop_soft_update(policy, tau):
+    for online, target in ((policy.actor_representation, policy.target_actor_representation),
+                           (policy.critic_representation, policy.target_critic_representation),
+                           (policy.actor, policy.target_actor), (policy.critic, policy.target_critic)):
+        for ep, tp in zip(online.parameters(), target.parameters()):
+            tp.data.mul_(1 - tau)
+            tp.data.add_(tau * ep.data)
+
+
+def time_update(update, device, repeat):
+    update()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        update()
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    tau = 0.01
+    print(f"{'agents':<8}{'tensors':>9}{'loop (ms)':>11}{'foreach (ms)':>14}{'speedup':>9}{'max diff':>11}")
+    for n_agents in parser.agents:
+        policy = build_policy(n_agents, parser.hidden_size, parser.device)
+        for p in policy.parameters():
+            p.data.normal_()
+        other = deepcopy(policy)
+        loop_soft_update(policy, tau)
+        other.soft_update(tau)
+        diff = max((a - b).abs().max().item() for a, b in zip(policy.parameters(), other.parameters()))
+        loop_time = time_update(lambda: loop_soft_update(policy, tau), parser.device, parser.repeat)
+        foreach_time = time_update(lambda: policy.soft_update(tau), parser.device, parser.repeat)
+        n_tensors = len(policy.target_networks.target_params)
+        print(f"{n_agents:<8}{n_tensors:>9}{loop_time * 1e3:>11.3f}{foreach_time * 1e3:>14.3f}"
+              f"{loop_time / foreach_time:>9.2f}{diff:>11.2e}")
@@ -0,0 +1,58 @@
+"""
+Benchmark the throughput of the subprocess vectorized environments for different values of in_series.
+
+in_series is the number of environments run in series by one worker process: 1 is the one-env-per-process layout,
+and "auto" spreads the environments evenly over os.cpu_count() workers. The agents are replaced by random actions,
+so the numbers only measure the environments and the inter-process communication.
+
+Example:
+    python profile_vec_env.py --parallels 16 --steps 2000 --in-series 1 4 auto
+"""
+import time
+import argparse
+import numpy as np
+from xuance.common import get_arguments
+from xuance.environment import make_envs
+
+BENCHMARKS = [("ppo", "classic_control", "CartPole-v1", "SubprocVecEnv"),
+              ("mappo", "mpe", "simple_spread_v3", "SubprocVecMultiAgentEnv")]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the subprocess vectorized environments with different in_series.")
+    parser.add_argument("--parallels", type=int, default=16)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--in-series", type=str, nargs="+", default=["1", "4", "auto"])
+    return parser.parse_args()
+
+
+def random_actions(envs):
+    if isinstance(envs.action_space, dict):
+        return [{k: space.sample() for k, space in envs.action_space.items()} for _ in range(envs.num_envs)]
+    return np.array([envs.action_space.sample() for _ in range(envs.num_envs)])
+
+
+def benchmark(method: str, env: str, env_id: str, vectorize: str, parallels: int, in_series, steps: int):
+    config = get_arguments(method=method, env=env, env_id=env_id, is_test=False)
+    config.parallels, config.vectorize, config.in_series = parallels, vectorize, in_series
+    config.distributed_training = False
+    envs = make_envs(config)
+    envs.reset()
+    actions = [random_actions(envs) for _ in range(16)]
+    start = time.perf_counter()
+    for step in range(steps):
+        envs.step(actions[step % len(actions)])
+    elapsed = time.perf_counter() - start
+    n_remotes = envs.n_remotes
+    envs.close()
+    return n_remotes, steps * parallels / elapsed
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    print(f"{'vectorizer':<26}{'in_series':>10}{'workers':>9}{'env steps/s':>14}")
+    for method, env, env_id, vectorize in BENCHMARKS:
+        for in_series in parser.in_series:
+            in_series = in_series if in_series == "auto" else int(in_series)
+            n_remotes, fps = benchmark(method, env, env_id, vectorize, parser.parallels, in_series, parser.steps)
+            print(f"{vectorize:<26}{str(in_series):>10}{n_remotes:>9}{fps:>14.0f}")
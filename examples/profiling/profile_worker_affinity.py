@@ -0,0 +1,78 @@
+"""
+Benchmark the stability of the environment throughput when the learner runs on the same machine.
+
+The main process steps the subprocess vectorized environments with random actions, and after each step it runs a few
+forward/backward passes of an MLP as a stand-in for the learner. The env steps/sec are measured over windows of
+steps, and the mean, the coefficient of variation and the worst window are reported for each placement:
+    - "inherit": the workers keep the parent's thread settings and run on any core;
+    - "threads=1": the workers are limited to one OpenMP/MKL/torch thread;
+    - "pinned": one thread per worker, the workers pinned to their own cores and --learner-cores reserved for the learner.
+
+Each placement runs in a fresh interpreter, because pinning changes the affinity of the main process.
+
+Example:
+    python profile_worker_affinity.py --parallels 16 --in-series 2 --learner-cores 4
+"""
+import sys
+import time
+import argparse
+import subprocess
+import numpy as np
+
+PLACEMENTS = {"inherit": dict(worker_threads=None, worker_affinity=False),
+              "threads=1": dict(worker_threads=1, worker_affinity=False),
+              "pinned": dict(worker_threads=1, worker_affinity=True)}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser("Benchmark the env throughput next to a learner for different worker placements.")
+    parser.add_argument("--method", type=str, default="ppo")
+    parser.add_argument("--env", type=str, default="classic_control")
+    parser.add_argument("--env-id", type=str, default="CartPole-v1")
+    parser.add_argument("--vectorize", type=str, default="SubprocVecEnv")
+    parser.add_argument("--parallels", type=int, default=16)
+    parser.add_argument("--in-series", type=int, default=1)
+    parser.add_argument("--learner-cores", type=int, default=1)
+    parser.add_argument("--windows", type=int, default=20)
+    parser.add_argument("--window-steps", type=int, default=100)
+    parser.add_argument("--placement", type=str, default=None, help="Run a single placement (used internally).")
+    return parser.parse_args()
+
+
+def run_placement(parser):
+    import torch
+    from xuance.common import get_arguments
+    from xuance.environment import make_envs
+    config = get_arguments(method=parser.method, env=parser.env, env_id=parser.env_id, is_test=False)
+    config.parallels, config.vectorize, config.in_series = parser.parallels, parser.vectorize, parser.in_series
+    config.distributed_training, config.learner_cores = False, parser.learner_cores
+    for key, value in PLACEMENTS[parser.placement].items():
+        setattr(config, key, value)
+    envs = make_envs(config)
+    envs.reset()
+    learner = torch.nn.Sequential(torch.nn.Linear(256, 512), torch.nn.ReLU(), torch.nn.Linear(512, 256))
+    batch = torch.randn(512, 256)
+    actions = np.array([envs.action_space.sample() for _ in range(envs.num_envs)])
+    fps = []
+    for _ in range(parser.windows):
+        start = time.perf_counter()
+        for _ in range(parser.window_steps):
+            envs.step(actions)
+            learner(batch).square().mean().backward()
+        fps.append(parser.window_steps * envs.num_envs / (time.perf_counter() - start))
+    envs.close()
+    fps = np.array(fps[1:])  # The first window includes warm-up.
+    print(fps.mean(), fps.std() / fps.mean(), fps.min())
+
+
+if __name__ == '__main__':
+    parser = parse_args()
+    if parser.placement is not None:
+        run_placement(parser)
+        sys.exit(0)
+    print(f"{'placement':<12}{'env steps/s':>14}{'CV':>8}{'worst window':>14}")
+    for placement in PLACEMENTS.keys():
+        output = subprocess.run([sys.executable] + sys.argv + ["--placement", placement],
+                                capture_output=True, text=True, check=True).stdout
+        mean, cv, worst = [float(v) for v in output.strip().splitlines()[-1].split()]
+        print(f"{placement:<12}{mean:>14.0f}{cv:>8.3f}{worst:>14.0f}")
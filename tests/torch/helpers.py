@@ -0,0 +1,33 @@
+# The shared factories of the torch tests, whose runs write their logs and models into a temporary directory.
+
+from argparse import Namespace
+from xuance import get_runner
+import atexit
+import os
+import shutil
+import tempfile
+
+device = 'cpu'
+output_dir = tempfile.mkdtemp(prefix="xuance_tests_")
+atexit.register(shutil.rmtree, output_dir, ignore_errors=True)
+
+
+def parser_args(**kwargs):
+    """The arguments of a test run on the CPU, updated by kwargs."""
+    args = dict(dl_toolbox='torch', device=device, test_mode=False, render=False,
+                log_dir=os.path.join(output_dir, "logs"), model_dir=os.path.join(output_dir, "models"))
+    args.update(kwargs)
+    return Namespace(**args)
+
+
+def make_runner(method, env="mpe", env_id="simple_spread_v3", config_path=None, **kwargs):
+    """Builds the runner of a method, with the arguments of parser_args(**kwargs)."""
+    kwargs.setdefault("env_id", env_id)  # Also overrides the env_id of a config_path of another scenario.
+    return get_runner(method=method, env=env, env_id=env_id, config_path=config_path,
+                      parser_args=parser_args(**kwargs))
+
+
+def make_agents(method, env="mpe", env_id="simple_spread_v3", config_path=None, **kwargs):
+    """Builds the agent (single-agent methods) or the agents (MARL methods) of a runner."""
+    runner = make_runner(method, env, env_id, config_path, **kwargs)
+    return runner.agent if hasattr(runner, "agent") else runner.agents
@@ -0,0 +1,133 @@
+# Test the updates of the agents stacked into an ensemble against the updates of one network per agent.
+
+from copy import deepcopy
+from helpers import make_runner as make_mpe_runner
+from unittest import mock
+from xuance.torch.utils import ModuleEnsemble
+import numpy as np
+import torch
+import unittest
+
+n_updates = 5
+n_steps = 60
+
+
+def make_runner(method="iql", **kwargs):
+    torch.manual_seed(1)
+    return make_mpe_runner(method, parallels=4, use_parameter_sharing=False, batch_size=32, **kwargs)
+
+
+def random_sample(agents, rng):
+    bs = agents.batch_size
+    keys = agents.agent_keys
+    obs_shape = {k: agents.observation_space[k].shape for k in keys}
+    return dict(batch_size=bs,
+                obs={k: rng.standard_normal((bs,) + obs_shape[k]).astype(np.float32) for k in keys},
+                obs_next={k: rng.standard_normal((bs,) + obs_shape[k]).astype(np.float32) for k in keys},
+                actions={k: rng.integers(0, agents.action_space[k].n, bs) for k in keys},
+                rewards={k: rng.standard_normal(bs).astype(np.float32) for k in keys},
+                terminals={k: (rng.random(bs) < 0.1).astype(np.float32) for k in keys},
+                agent_mask={k: np.ones(bs, np.float32) for k in keys})
+
+
+def record_updates(agents, n_steps):
+    """Trains the agents and returns the sample and the state of the random generator of each update."""
+    updates, update = [], agents.learner.update
+
+    def record(*args, **kwargs):
+        updates.append((deepcopy(args), deepcopy(kwargs), torch.get_rng_state()))
+        return update(*args, **kwargs)
+
+    with mock.patch.object(agents.learner, "update", side_effect=record):
+        agents.train(n_steps)
+    return updates
+
+
+class TestAgentEnsemble(unittest.TestCase):
+    def assert_same_members(self, separate, ensemble, model_keys):
+        """The members of every ModuleEnsemble of the ensemble policy equal the modules of the separate policy."""
+        names = [name for name, module in ensemble.named_children() if isinstance(module, ModuleEnsemble)]
+        self.assertGreater(len(names), 0)
+        for name in names:
+            for i, key in enumerate(model_keys):
+                params = list(getattr(separate, name)[key].parameters())
+                self.assertEqual(len(params), len(getattr(ensemble, name).params), msg=name)
+                for param, param_ensemble in zip(params, getattr(ensemble, name).params):
+                    torch.testing.assert_close(param_ensemble[i], param, rtol=1e-5, atol=1e-6, msg=f"{name} {key}")
+
+    def test_same_updates_actor_critic(self):
+        # The ensemble replays the samples (and the random numbers) of the updates of a run with separate networks.
+        for method in ["maddpg", "matd3", "masac"]:
+            for use_grad_clip in [False, True]:
+                agents = [make_runner(method, use_agent_ensemble=use_agent_ensemble, use_grad_clip=use_grad_clip,
+                                      grad_clip_norm=0.1, start_training=32, training_frequency=1).agents
+                          for use_agent_ensemble in (False, True)]
+                updates = record_updates(agents[0], n_steps)
+                self.assertGreaterEqual(len(updates), n_updates, msg=method)
+                for args, kwargs, rng_state in updates:
+                    torch.set_rng_state(rng_state)
+                    agents[1].learner.update(*args, **kwargs)
+                self.assert_same_members(agents[0].learner.policy, agents[1].learner.policy, agents[0].model_keys)
+                for agent in agents:
+                    agent.finish()
+
+    def test_same_updates_on_policy(self):
+        # A smooth activation, as the rounding errors of the vectorized pass could flip a ReLU at zero, whose
+        # different gradient Adam then carries through all the later updates.
+        for policy, continuous_action in [("Gaussian_MAAC_Policy", True), ("Categorical_MAAC_Policy", False)]:
+            for use_grad_clip in [False, True]:
+                agents = [make_runner("ippo", use_agent_ensemble=use_agent_ensemble, use_grad_clip=use_grad_clip,
+                                      grad_clip_norm=0.1, policy=policy, continuous_action=continuous_action,
+                                      activation="tanh", buffer_size=64, n_epochs=2, n_minibatch=2).agents
+                          for use_agent_ensemble in (False, True)]
+                updates = record_updates(agents[0], n_steps)
+                self.assertGreaterEqual(len(updates), n_updates, msg=policy)
+                for args, kwargs, rng_state in updates:
+                    torch.set_rng_state(rng_state)
+                    agents[1].learner.update(*args, **kwargs)
+                self.assert_same_members(agents[0].learner.policy, agents[1].learner.policy, agents[0].model_keys)
+                for agent in agents:
+                    agent.finish()
+
+    def test_same_updates(self):
+        for use_grad_clip in [False, True]:
+            agents = [make_runner(use_agent_ensemble=use_agent_ensemble, use_grad_clip=use_grad_clip,
+                                  grad_clip_norm=0.1, sync_frequency=2).agents
+                      for use_agent_ensemble in (False, True)]
+            separate, ensemble = agents[0].learner.policy, agents[1].learner.policy
+            rng = np.random.default_rng(0)
+            for _ in range(n_updates):
+                sample = random_sample(agents[0], rng)
+                agents[0].learner.update(deepcopy(sample))
+                agents[1].learner.update(deepcopy(sample))
+            for i, key in enumerate(agents[0].model_keys):
+                for online, target in [(separate.representation, ensemble.representation),
+                                       (separate.eval_Qhead, ensemble.eval_Qhead),
+                                       (separate.target_representation, ensemble.target_representation),
+                                       (separate.target_Qhead, ensemble.target_Qhead)]:
+                    for param, param_ensemble in zip(online[key].parameters(), target.params):
+                        torch.testing.assert_close(param_ensemble[i], param, rtol=1e-5, atol=1e-6)
+            for agent in agents:
+                agent.finish()
+
+    def test_parameters_model(self):
+        agents = make_runner(use_agent_ensemble=True).agents
+        policy = agents.learner.policy
+        for key in agents.model_keys:
+            self.assertEqual([id(p) for p in policy.parameters_model[key]],
+                             [id(p) for p in policy.parameters_ensemble])
+        agents.finish()
+
+    def test_unsupported(self):
+        for method in ["vdn", "iddpg", "mappo"]:
+            with self.assertRaises(AttributeError):
+                make_runner(method, use_agent_ensemble=True)
+        with self.assertRaises(AttributeError):
+            make_runner("ippo", use_agent_ensemble=True, policy="Categorical_MAAC_Policy_Comm", continuous_action=False,
+                        communicator="AttentionComm")
+        with self.assertRaises(AttributeError):
+            make_runner(use_agent_ensemble=True, use_rnn=True, representation="Basic_RNN")
+
+
+if __name__ == "__main__":
+    unittest.main()
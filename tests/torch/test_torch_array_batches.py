@@ -0,0 +1,76 @@
+# Test that the array batches of the multi-agent vectorized environments give the same data as the lists of dicts.
+
+from helpers import make_agents as make_mpe_agents
+import numpy as np
+import unittest
+
+n_envs = 4
+
+
+def make_agents(method, array_batches, **kwargs):
+    return make_mpe_agents(method, seed=1, parallels=n_envs, use_array_batches=array_batches, **kwargs)
+
+
+def assert_same_data(test, data, data_array):
+    if isinstance(data, dict):
+        test.assertEqual(data.keys(), data_array.keys())
+        for key in data.keys():
+            assert_same_data(test, data[key], data_array[key])
+    else:
+        np.testing.assert_allclose(np.asarray(data_array, np.float64), np.asarray(data, np.float64), rtol=1e-6)
+
+
+class TestArrayBatches(unittest.TestCase):
+    def test_vec_env(self):
+        agents = [make_agents("mappo", array_batches) for array_batches in (False, True)]
+        envs, envs_array = agents[0].envs, agents[1].envs
+        keys = envs.agents
+        obs, info = envs.reset()
+        obs_array, info_array = envs_array.reset()
+        rng = np.random.RandomState(0)
+        for _ in range(60):  # More than two episodes of simple_spread.
+            actions = {k: rng.randint(0, 5, size=n_envs) for k in keys}
+            obs, rewards, terminated, truncated, info = envs.step([{k: actions[k][e] for k in keys}
+                                                                   for e in range(n_envs)])
+            obs_array, rewards_array, terminated_array, truncated_array, info_array = envs_array.step(actions)
+            for k in keys:
+                np.testing.assert_allclose(obs_array[k], np.array([o[k] for o in obs]))
+                np.testing.assert_allclose(rewards_array[k], np.array([r[k] for r in rewards]))
+                np.testing.assert_array_equal(terminated_array[k], np.array([t[k] for t in terminated]))
+                np.testing.assert_array_equal(info_array['agent_mask'][k], [i['agent_mask'][k] for i in info])
+            np.testing.assert_array_equal(truncated_array, truncated)
+            np.testing.assert_allclose(info_array['state'], np.array([i['state'] for i in info]))
+            for e in np.flatnonzero(truncated):
+                for k in keys:
+                    np.testing.assert_allclose(info_array['reset_obs'][k][e], info[e]['reset_obs'][k])
+        for agent in agents:
+            agent.finish()
+            agent.envs.close()
+
+    def test_mappo_rollout(self):
+        data = []
+        for array_batches in (False, True):
+            agent = make_agents("mappo", array_batches, use_global_state=True, buffer_size=400)
+            agent.train_epochs = lambda *args, **kwargs: {}
+            agent.train(60)
+            data.append(agent.memory.data)
+            agent.finish()
+            agent.envs.close()
+        for memory_data in data:  # The envs clip the actions of the lists of dicts in place.
+            memory_data['actions'] = {k: np.clip(v, 0, 1) for k, v in memory_data['actions'].items()}
+        assert_same_data(self, *data)
+
+    def test_qmix_replay(self):
+        data = []
+        for array_batches in (False, True):
+            agent = make_agents("qmix", array_batches, use_actions_mask=True, start_training=np.inf)
+            agent.e_greedy = None  # The random actions are sampled per env with the lists of dicts.
+            agent.train(60)
+            data.append(agent.memory.data)
+            agent.finish()
+            agent.envs.close()
+        assert_same_data(self, *data)
+
+
+if __name__ == "__main__":
+    unittest.main()
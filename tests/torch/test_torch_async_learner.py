@@ -0,0 +1,57 @@
+# Test the updates of the asynchronous learner, which run in a background thread while the agents act.
+
+from helpers import make_runner
+from unittest import mock
+import torch
+import unittest
+
+n_steps = 60
+kwargs = dict(parallels=2, start_training=32, batch_size=16, training_frequency=1, use_async_learner=True,
+              replay_ratio=0.5, actor_sync_interval=3)
+
+
+def make_agents(method):
+    if method == "dqn":
+        return make_runner(method, "classic_control", "CartPole-v1", **kwargs).agent
+    return make_runner(method, **kwargs).agents
+
+
+class TestAsyncLearner(unittest.TestCase):
+    def test_updates(self):
+        for method in ["dqn", "iql"]:
+            agents = make_agents(method)
+            for _ in range(2):
+                agents.train(n_steps)
+                async_learner = agents.async_learner
+                self.assertGreater(async_learner.n_transitions, 0, msg=method)
+                # After wait(), the learner has done exactly replay_ratio updates per transition.
+                self.assertEqual(async_learner.n_updates,
+                                 int(async_learner.n_transitions * async_learner.replay_ratio), msg=method)
+                # The actor copy acts with the latest parameters of the learner.
+                self.assertIsNot(agents.policy, agents.learner.policy)
+                for param, param_learner in zip(agents.policy.parameters(), agents.learner.policy.parameters()):
+                    torch.testing.assert_close(param, param_learner, rtol=0.0, atol=0.0)
+            agents.finish()
+            self.assertIs(agents.policy, agents.learner.policy)
+
+    def test_learner_error(self):
+        for method in ["dqn", "iql"]:
+            agents = make_agents(method)
+            agents.train(n_steps)
+            with mock.patch.object(agents.learner, "update", side_effect=ValueError("update failed")):
+                with self.assertRaises(RuntimeError) as context:
+                    agents.async_learner.step(agents.n_envs)
+            self.assertIsInstance(context.exception.__cause__, ValueError)
+            agents.finish()
+
+    def test_unsupported(self):
+        # These agents run their own train loops, which would silently ignore the asynchronous learner.
+        for method in ["drqn", "noisydqn", "perdqn", "ppo"]:
+            with self.assertRaises(AttributeError):
+                make_runner(method, "classic_control", "CartPole-v1", use_async_learner=True)
+        with self.assertRaises(AttributeError):
+            make_runner("ippo", use_async_learner=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
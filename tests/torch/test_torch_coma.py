@@ -0,0 +1,60 @@
+# Test the counterfactual critic of COMA against the critic inputs materialized for every agent.
+
+from helpers import make_runner as make_mpe_runner
+from torch.nn.functional import one_hot
+import torch
+import unittest
+
+batch_size = 8
+
+
+def make_runner(**kwargs):
+    return make_mpe_runner("coma", parallels=4, **kwargs)
+
+
+def materialized_values(policy, state, obs_rep, actions_onehot):
+    # The input of agent i: [state, obs_rep_i, the joint actions with the slot of agent i zeroed, the one-hot ID of i].
+    n_agents = obs_rep.shape[1]
+    slots = torch.block_diag(*[torch.ones(1, a.shape[-1]) for a in actions_onehot])
+    joint_actions = torch.concat(actions_onehot, dim=-1).unsqueeze(1).repeat(1, n_agents, 1)
+    agent_ids = torch.eye(n_agents).unsqueeze(0).repeat(len(state), 1, 1)
+    critic_input = torch.concat([state.unsqueeze(1).repeat(1, n_agents, 1), obs_rep, joint_actions * (1 - slots),
+                                 agent_ids], dim=-1)
+    return policy.critic(critic_input)
+
+
+class TestCOMA(unittest.TestCase):
+    def test_counterfactual_values(self):
+        for use_parameter_sharing in [True, False]:
+            agents = make_runner(use_parameter_sharing=use_parameter_sharing).agents
+            policy, n_agents = agents.policy, agents.n_agents
+            state = torch.randn(batch_size, agents.state_space.shape[0])
+            obs = {k: torch.randn(batch_size, agents.observation_space[k].shape[0]) for k in agents.agent_keys}
+            actions = {k: torch.randint(agents.action_space[k].n, (batch_size, )) for k in agents.agent_keys}
+            actions_onehot = [one_hot(actions[k], agents.action_space[k].n) for k in agents.agent_keys]
+            if use_parameter_sharing:
+                key = agents.model_keys[0]
+                obs_all = torch.stack([obs[k] for k in agents.agent_keys], dim=1)
+                obs_input = {key: obs_all.reshape(batch_size * n_agents, -1)}
+                actions_input = {key: torch.stack(actions_onehot, dim=1).reshape(batch_size * n_agents, -1)}
+                obs_rep = policy.critic_representation[key](obs_input[key])['state'].reshape(batch_size, n_agents, -1)
+            else:
+                obs_input = obs
+                actions_input = dict(zip(agents.agent_keys, actions_onehot))
+                obs_rep = torch.stack([policy.critic_representation[k](obs[k])['state'] for k in agents.agent_keys],
+                                      dim=1)
+            _, values = policy.get_values(state=state, observation=obs_input, actions=actions_input)
+            self.assertEqual(values.shape, (batch_size, n_agents, policy.n_actions_max))
+            torch.testing.assert_close(values, materialized_values(policy, state, obs_rep, actions_onehot))
+            agents.finish()
+
+    def test_coma_rnn(self):
+        for use_parameter_sharing in [True, False]:
+            runner = make_runner(use_parameter_sharing=use_parameter_sharing, use_rnn=True, representation="Basic_RNN",
+                                 running_steps=400)
+            runner.run()
+            runner.agents.finish()
+
+
+if __name__ == "__main__":
+    unittest.main()
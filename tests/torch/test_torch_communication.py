@@ -0,0 +1,66 @@
+# Test the communication modules and the policies with communication.
+
+from helpers import make_runner
+from xuance.torch.communications import REGISTRY_Communicator
+import torch
+import unittest
+
+device = 'cpu'
+n_agents = 5
+
+
+def make_communicators():
+    torch.manual_seed(0)
+    return {name: communicator(state_dim=8, n_agents=n_agents, hidden_sizes_comm=[16], msg_dim=12, comm_rounds=2,
+                               activation=torch.nn.ReLU, device=device)
+            for name, communicator in REGISTRY_Communicator.items()}
+
+
+class TestCommunication(unittest.TestCase):
+    def test_dead_agents(self):
+        features = torch.randn(4, 3, n_agents, 8)
+        agent_mask = torch.ones(4, 3, n_agents)
+        agent_mask[..., 1] = 0
+        features_changed = features.clone()
+        features_changed[..., 1, :] += 10.0
+        alive = [0, 2, 3, 4]
+        for name, communicator in make_communicators().items():
+            received = communicator(features, agent_mask)
+            received_changed = communicator(features_changed, agent_mask)
+            self.assertEqual(received.shape, (4, 3, n_agents, 12), name)
+            torch.testing.assert_close(received_changed[..., alive, :], received[..., alive, :], msg=name)
+
+    def test_sparse_graph(self):
+        senders = torch.arange(n_agents)
+        receivers = (senders + 1) % n_agents
+        edges = (torch.concat([senders, receivers]), torch.concat([receivers, senders]))
+        adjacency = torch.zeros(n_agents, n_agents)
+        adjacency[edges[1], edges[0]] = 1.0
+        features = torch.randn(6, n_agents, 8)
+        agent_mask = (torch.rand(6, n_agents) < 0.7).float()
+        for name, communicator in make_communicators().items():
+            torch.testing.assert_close(communicator(features, agent_mask, edges),
+                                       communicator(features, agent_mask, adjacency), msg=name)
+
+    def test_policy_layout(self):
+        communicator = make_communicators()["CommNet"]
+        features = torch.randn(4, 7, n_agents, 8)
+        received = communicator(features)
+        # Parameter sharing: the rows are (batch, agent), followed by the time steps of the RNN.
+        shared = communicator.communicate({"agent_0": features.movedim(2, 1).reshape(4 * n_agents, 7, 8)})
+        torch.testing.assert_close(shared["agent_0"], received.movedim(2, 1).reshape(4 * n_agents, 7, 12))
+        separate = communicator.communicate({f"agent_{i}": features[:, :, i] for i in range(n_agents)})
+        for i in range(n_agents):
+            torch.testing.assert_close(separate[f"agent_{i}"], received[:, :, i])
+
+    def test_ippo_comm(self):
+        for use_parameter_sharing in [True, False]:
+            runner = make_runner("ippo", running_steps=200, parallels=4, policy="Categorical_MAAC_Policy_Comm",
+                                 continuous_action=False, communicator="AttentionComm", comm_rounds=2,
+                                 use_parameter_sharing=use_parameter_sharing)
+            runner.run()
+            runner.agents.finish()
+
+
+if __name__ == "__main__":
+    unittest.main()
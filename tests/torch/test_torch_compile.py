@@ -0,0 +1,50 @@
+# Test the fallback of the compiled networks to eager mode.
+
+from unittest import mock
+from xuance.torch.utils import compile_module
+import torch
+import unittest
+import warnings
+
+torch_compile = torch.compile
+
+
+def failing_backend(graph_module, example_inputs):
+    raise RuntimeError("The backend cannot compile the graph.")
+
+
+def compile_with_backend(module, backend):
+    with mock.patch("torch.compile", lambda fn, **kwargs: torch_compile(fn, backend=backend, dynamic=True)):
+        compile_module(module)
+    return module
+
+
+@unittest.skipUnless(hasattr(torch, "compile"), "torch.compile requires PyTorch >= 2.0.")
+class TestCompile(unittest.TestCase):
+    def setUp(self):
+        torch._dynamo.reset()
+
+    def test_compiler_error(self):
+        network = torch.nn.Linear(3, 2)
+        eager_forward = network.forward
+        compile_with_backend(network, failing_backend)
+        x = torch.randn(4, 3)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            torch.testing.assert_close(network(x), eager_forward(x))
+        self.assertTrue(any("falling back to eager mode" in str(w.message) for w in caught))
+        self.assertEqual(network.forward, eager_forward)
+
+    def test_other_errors(self):
+        network = compile_with_backend(torch.nn.Linear(3, 2), "eager")
+        compiled_forward = network.forward
+        with self.assertRaises(RuntimeError) as context:
+            network(torch.randn(4, 5))
+        self.assertNotIsInstance(context.exception, torch._dynamo.exc.TorchDynamoException)
+        # The error of the inputs does not disable the compiled forward.
+        self.assertIs(network.forward, compiled_forward)
+        self.assertEqual(network(torch.randn(4, 3)).shape, (4, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+# Test the max-sum message passing of the deep coordination graphs against the brute-force joint argmax.
+
+from itertools import product
+from unittest import mock
+from xuance.torch.policies.coordination_graph import Coordination_Graph
+import torch
+import unittest
+
+batch_size, n_agents, n_actions = 8, 5, 3
+
+
+def joint_values(graph, utilities, payoffs):
+    """The value of every joint action, with shape [batch_size, n_actions ** n_agents], and the joint actions."""
+    joint_actions = torch.tensor(list(product(range(n_actions), repeat=n_agents)))
+    values = utilities[:, torch.arange(n_agents), joint_actions].sum(dim=-1)
+    for e, (i, j) in enumerate(graph.edges):
+        values = values + payoffs[:, e, joint_actions[:, i], joint_actions[:, j]]
+    return values, joint_actions
+
+
+def make_graph(graph_type):
+    torch.manual_seed(0)
+    graph = Coordination_Graph(n_agents, graph_type)
+    graph.set_coordination_graph()
+    utilities = torch.randn(batch_size, n_agents, n_actions)
+    payoffs = torch.randn(batch_size, graph.n_edges, n_actions, n_actions)
+    return graph, utilities, payoffs
+
+
+class TestCoordinationGraph(unittest.TestCase):
+    def test_max_sum_trees(self):
+        # Max-sum is exact on trees: the greedy actions of the beliefs are the brute-force joint argmax.
+        for graph_type in ["STAR", "LINE"]:
+            graph, utilities, payoffs = make_graph(graph_type)
+            values, joint_actions = joint_values(graph, utilities, payoffs)
+            best_actions = joint_actions[values.argmax(dim=-1)]
+            beliefs = graph.max_sum(utilities, payoffs, n_iterations=10)
+            torch.testing.assert_close(beliefs.argmax(dim=-1), best_actions)
+            # Without normalization, the largest belief of every agent is the largest joint value.
+            beliefs = graph.max_sum(utilities, payoffs, n_iterations=10, msg_normalized=False)
+            torch.testing.assert_close(beliefs.amax(dim=-1), values.amax(dim=-1, keepdim=True).expand(-1, n_agents))
+
+    def test_max_sum_tolerance(self):
+        # The dynamic edges are not capped by the diameter, so the iterations stop only when the messages converge.
+        graph, utilities, payoffs = make_graph("LINE")
+        utilities_folded = utilities[:1]
+        edges = (graph.edges_from, graph.edges_to)
+        beliefs = graph.max_sum(utilities_folded, payoffs[0], n_iterations=100, edges=edges)
+        index_add, calls = torch.Tensor.index_add, []
+
+        def counted_index_add(tensor, *args, **kwargs):
+            calls.append(1)
+            return index_add(tensor, *args, **kwargs)
+
+        with mock.patch.object(torch.Tensor, "index_add", counted_index_add):
+            beliefs_early = graph.max_sum(utilities_folded, payoffs[0], n_iterations=100, msg_tolerance=1e-6,
+                                          edges=edges)
+        n_iterations = len(calls) // 2  # The messages of both directions are added once per iteration.
+        self.assertLessEqual(n_iterations, graph.diameter + 1)
+        torch.testing.assert_close(beliefs_early.argmax(dim=-1), beliefs.argmax(dim=-1))
+        torch.testing.assert_close(beliefs_early, beliefs)
+
+    def test_dynamic_edges(self):
+        torch.manual_seed(0)
+        positions = torch.rand(batch_size, n_agents, 2)
+        distances = torch.cdist(positions, positions)
+        for graph_type in ["KNN", "RANGE"]:
+            graph = Coordination_Graph(n_agents, graph_type, n_neighbors=2, graph_range=0.4)
+            edges_from, edges_to, edges_sample = graph.dynamic_edges(positions)
+            self.assertGreater(len(edges_from), 0)
+            # The edges never cross the samples and have no self-loops or duplicates.
+            torch.testing.assert_close(edges_from // n_agents, edges_sample)
+            torch.testing.assert_close(edges_to // n_agents, edges_sample)
+            self.assertTrue((edges_from < edges_to).all())
+            self.assertEqual(len(set(zip(edges_from.tolist(), edges_to.tolist()))), len(edges_from))
+            vertex_from, vertex_to = edges_from % n_agents, edges_to % n_agents
+            if graph_type == "KNN":
+                # Each agent is connected to at least its n_neighbors nearest agents.
+                degrees = torch.bincount(torch.cat([edges_from, edges_to]), minlength=batch_size * n_agents)
+                self.assertTrue((degrees >= graph.n_neighbors).all())
+                nearest = distances.masked_fill(torch.eye(n_agents, dtype=torch.bool), float("inf")).topk(
+                    graph.n_neighbors, dim=-1, largest=False).indices
+                edges = set(zip(edges_sample.tolist(), vertex_from.tolist(), vertex_to.tolist()))
+                for b, i, j in product(range(batch_size), range(n_agents), range(graph.n_neighbors)):
+                    neighbor = nearest[b, i, j].item()
+                    self.assertIn((b, min(i, neighbor), max(i, neighbor)), edges)
+            else:
+                # The edges are exactly the pairs of agents within the range.
+                expected = (distances <= graph.graph_range).triu(diagonal=1).sum()
+                self.assertEqual(len(edges_from), expected.item())
+                self.assertTrue((distances[edges_sample, vertex_from, vertex_to] <= graph.graph_range).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
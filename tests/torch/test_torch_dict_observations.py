@@ -0,0 +1,95 @@
+# Test the train loops of the single-agent agents with Dict observation spaces.
+
+from gym.spaces import Box, Dict, Discrete
+from helpers import parser_args
+from xuance.common import get_arguments
+from xuance.environment import make_envs, RawEnvironment, REGISTRY_ENV
+from xuance.torch import Module
+from xuance.torch.agents import DQN_Agent, PPOCLIP_Agent
+import numpy as np
+import torch
+import unittest
+
+n_envs = 4
+
+
+class CounterEnv(RawEnvironment):
+    """Observes the step counter of the episode, so that consecutive observations are always different."""
+    def __init__(self, env_config):
+        super(CounterEnv, self).__init__()
+        self.env_id = env_config.env_id
+        self.observation_space = Dict({"step": Box(0, np.inf, shape=[1, ]), "double": Box(0, np.inf, shape=[2, ])})
+        self.action_space = Discrete(n=2)
+        self.max_episode_steps = 7
+        self._current_step = 0
+
+    def _observation(self):
+        return {"step": np.array([self._current_step], np.float32),
+                "double": np.full([2], 2 * self._current_step, np.float32)}
+
+    def reset(self, **kwargs):
+        self._current_step = 0
+        return self._observation(), {}
+
+    def step(self, action):
+        self._current_step += 1
+        truncated = self._current_step >= self.max_episode_steps
+        return self._observation(), 1.0, False, truncated, {}
+
+    def render(self, *args, **kwargs):
+        return np.ones([64, 64, 3])
+
+    def close(self):
+        return
+
+
+class DictRepresentation(Module):
+    """Concatenates the values of the Dict observations."""
+    def __init__(self, observation_space, device):
+        super(DictRepresentation, self).__init__()
+        self.keys, self.device = sorted(observation_space.keys()), device
+        self.output_shapes = {'state': (sum(observation_space[k].shape[0] for k in self.keys), )}
+
+    def forward(self, observations: dict):
+        return {'state': torch.concat([torch.as_tensor(observations[k], dtype=torch.float32, device=self.device)
+                                       for k in self.keys], dim=-1)}
+
+
+def make_agent(agent_class, method):
+    REGISTRY_ENV["counter_env"] = CounterEnv
+    args = parser_args(parallels=n_envs, env_name="counter_env", env_id="counter", vectorize="DummyVecEnv",
+                       start_training=int(1e9), buffer_size=1000, horizon_size=1000, use_obsnorm=False)
+    config = get_arguments(method=method, env="classic_control", env_id="CartPole-v1", parser_args=args)
+
+    class DictAgent(agent_class):
+        def _build_representation(self, representation_key, input_space, config):
+            return DictRepresentation(input_space, self.device)
+
+    return DictAgent(config, make_envs(config))
+
+
+class TestDictObservations(unittest.TestCase):
+    def test_off_policy(self):
+        agent = make_agent(DQN_Agent, "dqn")
+        agent.train(20)
+        memory = agent.memory
+        obs = {k: v[:, :memory.size] for k, v in memory.observations.items()}
+        next_obs = {k: v[:, :memory.size] for k, v in memory.next_observations.items()}
+        # The next observations are the ones before the reset of the finished episodes.
+        np.testing.assert_array_equal(next_obs["step"], obs["step"] + 1)
+        np.testing.assert_array_equal(obs["double"], np.repeat(2 * obs["step"], 2, axis=-1))
+        agent.finish()
+
+    def test_on_policy(self):
+        agent = make_agent(PPOCLIP_Agent, "ppo")
+        agent.train(20)
+        obs = {k: v[:, :agent.memory.ptr] for k, v in agent.memory.observations.items()}
+        # Consecutive observations follow each other, or start a new episode.
+        steps = obs["step"][..., 0]
+        self.assertTrue(((steps[:, 1:] == steps[:, :-1] + 1) | (steps[:, 1:] == 0)).all())
+        self.assertGreater(len(np.unique(steps)), 1)
+        np.testing.assert_array_equal(obs["double"], np.repeat(2 * obs["step"], 2, axis=-1))
+        agent.finish()
+
+if __name__ == "__main__":
+    unittest.main()
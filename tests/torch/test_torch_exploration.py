@@ -0,0 +1,68 @@
+# Test the batched exploration of the off-policy MARL agents.
+
+from helpers import make_agents as make_mpe_agents
+import numpy as np
+import torch
+import unittest
+
+batch_size = 64
+
+
+def make_agents(method, **kwargs):
+    return make_mpe_agents(method, parallels=4, **kwargs)
+
+
+class TestExploration(unittest.TestCase):
+    def test_epsilon_greedy(self):
+        agents = make_agents("iql")
+        n_actions = agents.action_space[agents.agent_keys[0]].n
+        pi_actions = torch.zeros(batch_size, agents.n_agents, dtype=torch.long)
+        agents.e_greedy = 0.0
+        torch.testing.assert_close(agents.exploration(pi_actions), pi_actions)
+        agents.e_greedy = 1.0
+        random_actions = agents.exploration(pi_actions)
+        self.assertEqual(random_actions.shape, pi_actions.shape)
+        self.assertTrue(((random_actions >= 0) & (random_actions < n_actions)).all())
+        self.assertGreater(len(random_actions.unique()), 1)
+        # The random actions are drawn from the available actions only.
+        avail_actions = torch.zeros(batch_size, agents.n_agents, n_actions)
+        avail_actions[..., 1], avail_actions[..., 3] = 1.0, 1.0
+        random_actions = agents.exploration(pi_actions, avail_actions)
+        self.assertTrue(((random_actions == 1) | (random_actions == 3)).all())
+        agents.finish()
+
+    def test_boltzmann(self):
+        agents = make_agents("iql", boltzmann_temperature=1.0)
+        n_actions = agents.action_space[agents.agent_keys[0]].n
+        pi_actions = torch.zeros(batch_size, agents.n_agents, dtype=torch.long)
+        q_values = torch.zeros(batch_size, agents.n_agents, n_actions)
+        q_values[..., 2] = 100.0
+        self.assertTrue((agents.exploration(pi_actions, q_values=q_values) == 2).all())
+        avail_actions = torch.ones(batch_size, agents.n_agents, n_actions)
+        avail_actions[..., 2] = 0.0
+        self.assertTrue((agents.exploration(pi_actions, avail_actions, q_values) != 2).all())
+        agents.finish()
+
+    def test_noise(self):
+        for noise_type in ["Gaussian", "OU"]:
+            agents = make_agents("iddpg", noise_type=noise_type)
+            agents.noise_scale = 10.0
+            pi_actions = torch.zeros(batch_size, agents.n_agents, agents.actions_low.shape[-1])
+            actions = agents.exploration(pi_actions)
+            self.assertTrue(((actions >= agents.actions_low) & (actions <= agents.actions_high)).all())
+            self.assertGreater(actions.std().item(), 0.0)
+            out = agents._unpack_actions(actions, batch_size)
+            self.assertEqual(len(out), batch_size)
+            self.assertEqual(np.shape(out[0][agents.agent_keys[0]]), agents.action_space[agents.agent_keys[0]].shape)
+            if noise_type == "OU":
+                agents._reset_noise(np.arange(batch_size // 2))
+                self.assertTrue((agents.ou_noise[:batch_size // 2] == 0).all())
+            agents.finish()
+
+    def test_unknown_noise(self):
+        with self.assertRaises(AttributeError):
+            make_agents("iddpg", noise_type="uniform")
+
+
+if __name__ == "__main__":
+    unittest.main()
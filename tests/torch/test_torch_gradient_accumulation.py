@@ -0,0 +1,87 @@
+# Test that gradient accumulation over micro-batches gives the same update as the whole minibatch.
+
+from copy import deepcopy
+from helpers import make_agents
+import numpy as np
+import torch
+import unittest
+
+n_micro_batches = 4
+
+
+def make_agent(method, env, env_id, accumulation_steps, **kwargs):
+    return make_agents(method, env, env_id, seed=1, gradient_accumulation_steps=accumulation_steps, **kwargs)
+
+
+def collect_on_policy(agent):
+    """Fills the buffer of an on-policy agent with one rollout, without training on it."""
+    agent.train_epochs, agent.memory.clear = lambda *args, **kwargs: {}, lambda: None
+    agent.train(agent.buffer_size // agent.n_envs)
+
+
+def collect_off_policy(agent, n_steps):
+    """Fills the buffer of an off-policy agent, without training on it."""
+    agent.start_training = np.inf
+    agent.train(n_steps // agent.n_envs)
+
+
+class TestGradientAccumulation(unittest.TestCase):
+    def assert_same_update(self, agent, agent_accumulated, samples, call):
+        agent_accumulated.learner.policy.load_state_dict(agent.learner.policy.state_dict())
+        info = call(agent.learner, deepcopy(samples))
+        info_accumulated = call(agent_accumulated.learner, deepcopy(samples))
+        self.assertEqual(agent.learner.iterations, agent_accumulated.learner.iterations)
+        for param, param_accumulated in zip(agent.learner.policy.parameters(),
+                                            agent_accumulated.learner.policy.parameters()):
+            torch.testing.assert_close(param_accumulated, param, rtol=1e-4, atol=1e-5)
+        # The learning rate schedulers are stepped once per minibatch.
+        schedulers, schedulers_accumulated = agent.learner.scheduler, agent_accumulated.learner.scheduler
+        if not isinstance(schedulers, dict):
+            schedulers, schedulers_accumulated = {"scheduler": schedulers}, {"scheduler": schedulers_accumulated}
+        for key, scheduler in schedulers.items():
+            if scheduler is not None:
+                self.assertEqual(schedulers_accumulated[key].last_epoch, scheduler.last_epoch)
+        for key, value in info.items():
+            if isinstance(value, (float, torch.Tensor)):
+                torch.testing.assert_close(torch.as_tensor(info_accumulated[key]).float(),
+                                           torch.as_tensor(value).float(), rtol=1e-4, atol=1e-5)
+
+    def test_ppo(self):
+        agents = [make_agent("ppo", "classic_control", "CartPole-v1", steps) for steps in (1, n_micro_batches)]
+        collect_on_policy(agents[0])
+        samples = agents[0].memory.sample(np.arange(agents[0].batch_size))
+        samples['batch_size'] = agents[0].batch_size
+        self.assert_same_update(agents[0], agents[1], samples, lambda learner, sample: learner.update(**sample))
+        self.assertEqual(agents[1].learner.scheduler.last_epoch, 1)
+
+    def test_mappo_agent_mask(self):
+        agents = [make_agent("mappo", "mpe", "simple_spread_v3", steps, parallels=4, buffer_size=400)
+                  for steps in (1, n_micro_batches)]
+        collect_on_policy(agents[0])
+        samples = agents[0].memory.sample(np.arange(agents[0].batch_size))
+        samples['batch_size'] = agents[0].batch_size
+        agent_key = agents[0].agent_keys[0]
+        samples['agent_mask'][agent_key][:samples['batch_size'] // 3] = False  # An unbalanced agent mask.
+        self.assert_same_update(agents[0], agents[1], samples, lambda learner, sample: learner.update(sample))
+
+    def test_qmix_rnn_filled(self):
+        agents = [make_agent("qmix", "mpe", "simple_spread_v3", steps, parallels=4, representation="Basic_RNN",
+                             use_rnn=True, rnn="GRU", N_recurrent_layers=1, fc_hidden_sizes=[64],
+                             recurrent_hidden_size=64, batch_size=16)
+                  for steps in (1, n_micro_batches)]
+        collect_off_policy(agents[0], 400)
+        samples = agents[0].memory.sample(agents[0].batch_size)
+        samples['filled'][:samples['batch_size'] // 2, -10:] = 0  # Episodes of different lengths.
+        self.assert_same_update(agents[0], agents[1], samples, lambda learner, sample: learner.update_rnn(sample))
+
+    def test_unsupported_learners(self):
+        # The off-policy actor-critic and the Q-learning learners step targets or optimizers within an update.
+        for method, env, env_id in [("ddpg", "classic_control", "Pendulum-v1"),
+                                    ("dqn", "classic_control", "CartPole-v1"),
+                                    ("maddpg", "mpe", "simple_spread_v3")]:
+            with self.assertRaises(AttributeError):
+                make_agent(method, env, env_id, n_micro_batches)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# Test the parameter sharing within the groups of agents of heterogeneous teams.
+
+from copy import deepcopy
+from helpers import make_runner as make_mpe_runner
+import os
+import xuance
+import numpy as np
+import torch
+import unittest
+
+# IPPO has no configurations of the MPE scenarios with groups, which load the ones of simple_spread instead.
+config_path = {"ippo": os.path.join(os.path.dirname(xuance.__file__), "configs/ippo/mpe/simple_spread_v3.yaml")}
+
+
+def make_runner(method, env_id, use_parameter_sharing=True, **kwargs):
+    return make_mpe_runner(method, "mpe", env_id, config_path.get(method), seed=1, parallels=4, runner="MARL",
+                           running_steps=400, use_parameter_sharing=use_parameter_sharing, **kwargs)
+
+
+class TestGroupSharing(unittest.TestCase):
+    def test_one_group(self):
+        # The agents of simple_spread have the same spaces: one model is shared by all agents, as without groups.
+        agents = [make_runner("mappo", "simple_spread_v3", use_group_sharing=use_group_sharing, buffer_size=400).agents
+                  for use_group_sharing in (False, True)]
+        self.assertEqual(agents[1].agent_groups, agents[0].agent_groups)
+        agents[0].train_epochs, agents[0].memory.clear = lambda *args, **kwargs: {}, lambda: None
+        agents[0].train(agents[0].buffer_size // agents[0].n_envs)
+        samples = agents[0].memory.sample(np.arange(agents[0].batch_size))
+        samples['batch_size'] = agents[0].batch_size
+        agents[1].learner.policy.load_state_dict(agents[0].learner.policy.state_dict())
+        agents[0].learner.update(deepcopy(samples))
+        agents[1].learner.update(deepcopy(samples))
+        for param, param_group in zip(agents[0].learner.policy.parameters(), agents[1].learner.policy.parameters()):
+            torch.testing.assert_close(param_group, param)
+
+    def test_groups(self):
+        for method in ["ippo", "mappo"]:
+            for use_rnn in [False, True]:
+                runner = make_runner(method, "simple_adversary_v3", use_group_sharing=True, use_rnn=use_rnn,
+                                     representation="Basic_RNN" if use_rnn else "Basic_MLP", continuous_action=False,
+                                     policy="Categorical_MAAC_Policy", use_value_norm=True, use_obsnorm=True)
+                agents = runner.agents
+                self.assertEqual(agents.agent_groups, {'adversary_0': ['adversary_0'],
+                                                       'agent_0': ['agent_0', 'agent_1']})
+                self.assertEqual(set(agents.policy.actor.keys()), {'adversary_0', 'agent_0'})
+                runner.run()
+                runner.agents.finish()
+
+    def test_unsupported(self):
+        with self.assertRaises(AttributeError):
+            make_runner("ippo", "simple_spread_v3", use_group_sharing=True, use_parameter_sharing=False)
+        with self.assertRaises(AttributeError):
+            make_runner("iql", "simple_spread_v3", use_group_sharing=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -35,10 +35,10 @@ class TestValueBaseAlgo(unittest.TestCase):
         runner = get_runner(method="qtran", env='mpe', env_id='simple_spread_v3', parser_args=args)
         runner.run()
 
-    # def test_dcg(self):
-    #     args = Namespace(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode)
-    #     runner = get_runner(method="dcg", env='mpe', env_id='simple_spread_v3', parser_args=args)
-    #     runner.run()
+    def test_dcg(self):
+        args = Namespace(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode)
+        runner = get_runner(method="dcg", env='mpe', env_id='simple_spread_v3', parser_args=args)
+        runner.run()
 
     def test_iac(self):
         args = Namespace(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode)
@@ -90,15 +90,15 @@ class TestValueBaseAlgo(unittest.TestCase):
         runner = get_runner(method="masac", env='mpe', env_id='simple_spread_v3', parser_args=args)
         runner.run()
 
-    # def test_mfq(self):
-    #     args = Namespace(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode)
-    #     runner = get_runner(method="mfq", env='mpe', env_id='simple_spread_v3', parser_args=args)
-    #     runner.run()
+    def test_mfq(self):
+        args = Namespace(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode)
+        runner = get_runner(method="mfq", env='mpe', env_id='simple_spread_v3', parser_args=args)
+        runner.run()
 
-    # def test_mfac(self):
-    #     args = Namespace(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode)
-    #     runner = get_runner(method="mfac", env='mpe', env_id='simple_spread_v3', parser_args=args)
-    #     runner.run()
+    def test_mfac(self):
+        args = Namespace(dl_toolbox='torch', device=device, running_steps=n_steps, test_mode=test_mode)
+        runner = get_runner(method="mfac", env='mpe', env_id='simple_spread_v3', parser_args=args)
+        runner.run()
 
 
 if __name__ == "__main__":
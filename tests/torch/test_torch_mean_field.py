@@ -0,0 +1,77 @@
+# Test the neighborhood mean actions of the mean-field MARL methods against a per-agent loop.
+
+from xuance.torch.policies.mean_field import MeanFieldAggregator
+import torch
+import unittest
+
+batch_size, n_agents, n_actions = 4, 12, 5
+
+
+def mean_loop(aggregator, actions, alive, positions):
+    """The mean action of the alive neighbors of every agent, computed agent by agent."""
+    means = torch.zeros_like(actions)
+    for b in range(actions.shape[0]):
+        for i in range(actions.shape[1]):
+            others = [j for j in range(actions.shape[1]) if j != i and alive[b, j]]
+            distances = {j: (positions[b, i] - positions[b, j]).norm().item() for j in others}
+            if aggregator.neighborhood == "KNN":
+                others = sorted(others, key=lambda j: distances[j])[:aggregator.n_neighbors]
+            elif aggregator.neighborhood == "RANGE":
+                others = [j for j in others if distances[j] <= aggregator.neighbor_range]
+            if others:
+                means[b, i] = actions[b, others].mean(dim=0)
+    return means
+
+
+def random_batch():
+    actions = torch.nn.functional.one_hot(torch.randint(n_actions, (batch_size, n_agents)), n_actions).float()
+    alive = torch.rand(batch_size, n_agents) < 0.7
+    positions = torch.rand(batch_size, n_agents, 2) * 3
+    return actions, alive, positions
+
+
+class TestMeanField(unittest.TestCase):
+    def test_neighborhoods(self):
+        torch.manual_seed(0)
+        actions, alive, positions = random_batch()
+        for neighborhood in ["GLOBAL", "KNN", "RANGE"]:
+            aggregator = MeanFieldAggregator(n_agents, ["agent_0"], True, neighborhood, n_neighbors=3,
+                                             neighbor_range=1.0, position_index=[0, 1])
+            torch.testing.assert_close(aggregator(actions, alive, positions),
+                                       mean_loop(aggregator, actions, alive, positions))
+
+    def test_dead_and_isolated_agents(self):
+        # Agents 0 and 1 are close, agent 2 is far away and agent 3 is dead.
+        actions = torch.eye(4).unsqueeze(0)
+        alive = torch.tensor([[True, True, True, False]])
+        positions = torch.tensor([[[0.0, 0.0], [0.5, 0.0], [10.0, 0.0], [0.2, 0.0]]])
+        aggregator = MeanFieldAggregator(4, ["agent_0"], True, "RANGE", neighbor_range=1.0, position_index=[0, 1])
+        means = aggregator(actions, alive, positions)
+        torch.testing.assert_close(means[0, 0], actions[0, 1])
+        torch.testing.assert_close(means[0, 1], actions[0, 0])
+        torch.testing.assert_close(means[0, 2], torch.zeros(4))  # No neighbor within the range.
+        aggregator = MeanFieldAggregator(4, ["agent_0"], True, "KNN", n_neighbors=2, position_index=[0, 1])
+        means = aggregator(actions, alive, positions)
+        torch.testing.assert_close(means[0, 0], (actions[0, 1] + actions[0, 2]) / 2)  # The dead agent is skipped.
+        aggregator = MeanFieldAggregator(4, ["agent_0"], True, "GLOBAL")
+        torch.testing.assert_close(aggregator(actions, alive)[0, 2], (actions[0, 0] + actions[0, 1]) / 2)
+
+    def test_stack_split(self):
+        actions, _, positions = random_batch()
+        keys = [f"agent_{i}" for i in range(n_agents)]
+        for use_parameter_sharing in [True, False]:
+            aggregator = MeanFieldAggregator(n_agents, keys[:1] if use_parameter_sharing else keys,
+                                             use_parameter_sharing, "KNN", position_index=[0, 1])
+            torch.testing.assert_close(aggregator.stack(aggregator.split(actions)), actions)
+            observations = [positions[:, i].numpy() for i in range(n_agents)]
+            torch.testing.assert_close(aggregator.get_positions(observations), positions)
+
+    def test_unknown_neighborhood(self):
+        with self.assertRaises(AttributeError):
+            MeanFieldAggregator(n_agents, ["agent_0"], True, "RADIUS")
+        with self.assertRaises(AttributeError):
+            MeanFieldAggregator(n_agents, ["agent_0"], True, "KNN")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# Test that the updates with the packed (alive) agents are the same as the updates with all agents masked.
+
+from copy import deepcopy
+from helpers import make_agents
+import numpy as np
+import torch
+import unittest
+
+
+def make_agent(method, use_packed_agents, **kwargs):
+    return make_agents(method, seed=1, parallels=4, use_parameter_sharing=True,
+                       use_packed_agents=use_packed_agents, **kwargs)
+
+
+def kill_agents(samples, agent_keys):
+    """Masks out a random half of the agents, as the dead agents of the battle scenarios."""
+    rng = np.random.default_rng(0)
+    for key in agent_keys:
+        samples['agent_mask'][key] = np.logical_and(samples['agent_mask'][key],
+                                                    rng.random(samples['agent_mask'][key].shape) < 0.5)
+
+
+class TestPackedAgents(unittest.TestCase):
+    def assert_same_update(self, agent, agent_packed, samples):
+        agent_packed.learner.policy.load_state_dict(agent.learner.policy.state_dict())
+        agent.learner.update(deepcopy(samples))
+        agent_packed.learner.update(deepcopy(samples))
+        for param, param_packed in zip(agent.learner.policy.parameters(), agent_packed.learner.policy.parameters()):
+            torch.testing.assert_close(param_packed, param, rtol=1e-4, atol=1e-5)
+
+    def off_policy(self, method):
+        agents = [make_agent(method, packed, start_training=np.inf) for packed in (False, True)]
+        agents[0].train(100)
+        samples = agents[0].memory.sample(agents[0].batch_size)
+        kill_agents(samples, agents[0].agent_keys)
+        self.assert_same_update(agents[0], agents[1], samples)
+
+    def on_policy(self, method):
+        # The value normalizer is updated with the returns of the alive agents only when packed.
+        agents = [make_agent(method, packed, buffer_size=400, use_value_norm=False) for packed in (False, True)]
+        agents[0].train_epochs, agents[0].memory.clear = lambda *args, **kwargs: {}, lambda: None
+        agents[0].train(agents[0].buffer_size // agents[0].n_envs)
+        samples = agents[0].memory.sample(np.arange(agents[0].batch_size))
+        samples['batch_size'] = agents[0].batch_size
+        kill_agents(samples, agents[0].agent_keys)
+        self.assert_same_update(agents[0], agents[1], samples)
+
+    def test_iql(self):
+        self.off_policy("iql")
+
+    def test_vdn(self):
+        self.off_policy("vdn")
+
+    def test_qmix(self):
+        self.off_policy("qmix")
+
+    def test_ippo(self):
+        self.on_policy("ippo")
+
+    def test_mappo(self):
+        self.on_policy("mappo")
+
+
+if __name__ == "__main__":
+    unittest.main()
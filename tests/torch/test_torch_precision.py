@@ -0,0 +1,112 @@
+# Test the mixed precision (bf16 and fp16) updates of the learners on the CPU.
+
+from copy import deepcopy
+from helpers import make_runner
+from unittest import mock
+from xuance.torch.utils.distributions import Distribution
+import torch
+import unittest
+
+configs = {
+    "dqn": dict(env_id="CartPole-v1", start_training=64, batch_size=32, training_frequency=1),
+    "ppo": dict(env_id="CartPole-v1", horizon_size=32, n_epochs=2, n_minibatch=2),
+    "ddpg": dict(env_id="Pendulum-v1", start_training=64, batch_size=32, training_frequency=1),
+    "td3": dict(env_id="Pendulum-v1", start_training=64, batch_size=32, training_frequency=1),
+    "sac": dict(env_id="Pendulum-v1", start_training=64, batch_size=32, training_frequency=1),
+    "iql": dict(start_training=64, batch_size=32, training_frequency=1),
+    "maddpg": dict(start_training=64, batch_size=32, training_frequency=1),
+    "matd3": dict(start_training=64, batch_size=32, training_frequency=1),
+    "masac": dict(start_training=64, batch_size=32, training_frequency=1),
+}
+n_steps = 50
+
+
+def make_agent(method, precision):
+    kwargs = dict(configs[method])
+    if "env_id" in kwargs:
+        runner = make_runner(method, "classic_control", precision=precision, parallels=2, **kwargs)
+        return runner.agent
+    return make_runner(method, precision=precision, parallels=2, **kwargs).agents
+
+
+def float_dtypes(output):
+    """The dtypes of the floating point tensors of a network output, including the parameters of the distributions."""
+    if isinstance(output, torch.Tensor):
+        return [output.dtype] if output.is_floating_point() else []
+    if isinstance(output, Distribution):
+        return float_dtypes(list(vars(output).values()))
+    if isinstance(output, dict):
+        return float_dtypes(list(output.values()))
+    if isinstance(output, (tuple, list)):
+        return [dtype for value in output for dtype in float_dtypes(value)]
+    return []
+
+
+class TestPrecision(unittest.TestCase):
+    def test_float_outputs(self):
+        for precision, dtype in [("bf16", torch.bfloat16), ("fp16", torch.float16)]:
+            for method in ["dqn", "ppo"]:
+                agent = make_agent(method, precision)
+                policy_dtypes, linear_dtypes = [], []
+                # Only the forward passes of the updates run under autocast, not the ones of acting.
+                agent.learner.policy.register_forward_hook(
+                    lambda m, i, o: policy_dtypes.extend(float_dtypes(o)) if torch.is_autocast_enabled("cpu") else None)
+                linear = next(m for m in agent.learner.policy.modules() if isinstance(m, torch.nn.Linear))
+                linear.register_forward_hook(
+                    lambda m, i, o: linear_dtypes.append(o.dtype) if torch.is_autocast_enabled("cpu") else None)
+                agent.train(n_steps)
+                self.assertGreater(len(policy_dtypes), 0, msg=method)
+                self.assertEqual(set(policy_dtypes), {torch.float32}, msg=f"{method} {precision}")
+                # The networks themselves run in low precision.
+                self.assertEqual(set(linear_dtypes), {dtype}, msg=f"{method} {precision}")
+                agent.finish()
+
+    def test_scaler_updates(self):
+        # GradScaler.update() runs once per learner update, after all the optimizers of the update have stepped.
+        for method in configs:
+            agents = make_agent(method, "fp16")
+            learner, scaler = agents.learner, agents.learner.scaler
+            with mock.patch.object(learner, "update", wraps=learner.update) as update, \
+                    mock.patch.object(scaler, "update", wraps=scaler.update) as scaler_update:
+                agents.train(n_steps)
+            self.assertGreater(update.call_count, 0, msg=method)
+            self.assertEqual(scaler_update.call_count, update.call_count, msg=method)
+            agents.finish()
+
+    def test_same_updates(self):
+        # The updates in bf16 and fp16 of the samples of a short fp32 run stay close to the fp32 updates.
+        for method, loss_key in [("dqn", "Qloss"), ("ppo", "critic_loss")]:
+            agent = make_agent(method, "fp32")
+            initial_state = deepcopy(agent.learner.policy.state_dict())
+            samples, infos = [], []
+
+            def record(**sample):
+                samples.append(deepcopy(sample))
+                info = update(**sample)
+                infos.append(info[loss_key].item())
+                return info
+
+            update = agent.learner.update
+            with mock.patch.object(agent.learner, "update", side_effect=record):
+                agent.train(n_steps)
+            self.assertGreater(len(samples), 0, msg=method)
+            for precision in ["bf16", "fp16"]:
+                agent_low = make_agent(method, precision)
+                agent_low.learner.policy.load_state_dict(initial_state)
+                if precision == "fp16":
+                    # The default scale of 2^16 overflows, so that the first steps are skipped while the scale decreases.
+                    # Starting from a scale that does not overflow, every step is applied as in fp32.
+                    agent_low.learner.scaler = torch.amp.GradScaler("cpu", init_scale=2.0 ** 8)
+                infos_low = [agent_low.learner.update(**deepcopy(sample))[loss_key].item() for sample in samples]
+                torch.testing.assert_close(torch.tensor(infos_low), torch.tensor(infos), rtol=0.01, atol=1e-3,
+                                           msg=f"{method} {precision}")
+                if precision == "fp16":
+                    self.assertEqual(agent_low.learner.scaler.get_scale(), 2.0 ** 8)  # No step was skipped.
+                for param_low, param in zip(agent_low.learner.policy.parameters(), agent.learner.policy.parameters()):
+                    torch.testing.assert_close(param_low, param, rtol=0.0, atol=1e-2, msg=f"{method} {precision}")
+                agent_low.finish()
+            agent.finish()
+
+
+if __name__ == "__main__":
+    unittest.main()
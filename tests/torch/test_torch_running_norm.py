@@ -0,0 +1,73 @@
+# Test the running statistics of the observations and rewards against numpy.
+
+from xuance.torch.utils import RunningNorm
+import numpy as np
+import os
+import tempfile
+import torch
+import unittest
+
+rng = np.random.default_rng(0)
+batches = [rng.normal(1.0, 2.0, [8, 3]), rng.normal(-3.0, 0.5, [2, 5, 3]), rng.normal(0.0, 1.0, [1, 3]),
+           rng.uniform(-10.0, 10.0, [64, 3])]
+dict_shape = {'position': (2,), 'image': (2, 3)}
+
+
+def dict_batches():
+    return [{k: rng.normal(i, i + 1, (n,) + dict_shape[k]) for k in dict_shape} for i, n in enumerate([4, 1, 32])]
+
+
+class TestRunningNorm(unittest.TestCase):
+    def test_update(self):
+        for dtype, rtol in [(torch.float64, 1e-7), (torch.float32, 1e-4)]:
+            rms = RunningNorm(shape=(3,), epsilon=0.0, dtype=dtype)
+            for batch in batches:
+                rms.update(batch if batch.ndim == 2 else torch.as_tensor(batch))
+            data = np.concatenate([batch.reshape(-1, 3) for batch in batches])
+            self.assertEqual(rms.count.item(), len(data))
+            np.testing.assert_allclose(rms.mean.cpu().numpy(), data.mean(axis=0), rtol=rtol, atol=rtol)
+            np.testing.assert_allclose(rms.var.cpu().numpy(), data.var(axis=0), rtol=rtol)
+
+    def test_update_dict(self):
+        rms = RunningNorm(shape=dict_shape, epsilon=0.0)
+        samples = dict_batches()
+        for batch in samples:
+            rms.update(batch)
+        statistics = rms.get_statistics()
+        for k in dict_shape:
+            data = np.concatenate([batch[k] for batch in samples])
+            np.testing.assert_allclose(statistics['mean'][k], data.mean(axis=0))
+            np.testing.assert_allclose(statistics['var'][k], data.var(axis=0))
+
+    def test_frozen(self):
+        rms = RunningNorm(shape=(3,))
+        rms.update(batches[0])
+        statistics = rms.get_statistics()
+        rms.freeze()
+        rms.update(batches[1])
+        np.testing.assert_array_equal(rms.get_statistics()['mean'], statistics['mean'])
+
+    def test_save_load(self):
+        for shape, samples in [((3,), batches), (dict_shape, dict_batches())]:
+            rms = RunningNorm(shape=shape)
+            for batch in samples:
+                rms.update(batch)
+            with tempfile.TemporaryDirectory() as model_dir:
+                path = os.path.join(model_dir, "obs_rms.npy")
+                np.save(path, rms.get_statistics())
+                loaded = RunningNorm(shape=shape)
+                loaded.set_statistics(**np.load(path, allow_pickle=True).item())
+            self.assertEqual(loaded.count.item(), rms.count.item())
+            torch.testing.assert_close(loaded.mean, rms.mean)
+            torch.testing.assert_close(loaded.var, rms.var)
+            normalized, normalized_loaded = rms.normalize(samples[0]), loaded.normalize(samples[0])
+            if isinstance(shape, dict):
+                for k in shape:
+                    torch.testing.assert_close(normalized_loaded[k], normalized[k])
+                    self.assertEqual(normalized[k].shape, samples[0][k].shape)
+            else:
+                torch.testing.assert_close(normalized_loaded, normalized)
+
+
+if __name__ == "__main__":
+    unittest.main()
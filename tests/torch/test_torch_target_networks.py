@@ -0,0 +1,74 @@
+# Test the fused updates of the target networks against the per-parameter loops of the policies.
+
+from copy import deepcopy
+from unittest import mock
+from xuance.torch.utils import TargetNetworks
+import torch
+import unittest
+
+tau = 0.05
+
+
+def make_networks():
+    torch.manual_seed(0)
+    online = [torch.nn.Sequential(torch.nn.Linear(4, 8), torch.nn.BatchNorm1d(8), torch.nn.ReLU()),
+              torch.nn.ModuleDict({f"agent_{i}": torch.nn.Linear(8, 2) for i in range(3)})]
+    target = deepcopy(online)
+    # The online networks move away from the targets, as after some training.
+    online[0].train()(torch.randn(16, 4))  # Updates the running statistics of BatchNorm.
+    for network in online:
+        for param in network.parameters():
+            param.data.add_(torch.randn_like(param))
+    return online, target
+
+
+def soft_update_loop(online, target):
+    for online_net, target_net in zip(online, target):
+        for ep, tp in zip(online_net.parameters(), target_net.parameters()):
+            tp.data.mul_(1 - tau)
+            tp.data.add_(tau * ep.data)
+
+
+def hard_update_loop(online, target):
+    for online_net, target_net in zip(online, target):
+        for ep, tp in zip(online_net.parameters(), target_net.parameters()):
+            tp.data.copy_(ep)
+
+
+class TestTargetNetworks(unittest.TestCase):
+    def assert_same_networks(self, target, target_loop):
+        for network, network_loop in zip(target, target_loop):
+            for (name, tensor), tensor_loop in zip(network.state_dict().items(), network_loop.state_dict().values()):
+                torch.testing.assert_close(tensor, tensor_loop, msg=name)
+
+    def check_updates(self):
+        online, target = make_networks()
+        target_loop = deepcopy(target)
+        target_networks = TargetNetworks(online, target)
+        for _ in range(3):
+            target_networks.soft_update(tau)
+            soft_update_loop(online, target_loop)
+        self.assert_same_networks(target, target_loop)
+        target_networks.hard_update()
+        hard_update_loop(online, target_loop)
+        self.assert_same_networks(target, target_loop)
+        # The buffers are not copied: the target keeps its own running statistics of BatchNorm.
+        self.assertFalse(torch.equal(target[0][1].running_mean, online[0][1].running_mean))
+        for param, param_online in zip(target[1].parameters(), online[1].parameters()):
+            torch.testing.assert_close(param, param_online)
+
+    def test_foreach(self):
+        self.check_updates()
+
+    def test_fallback(self):
+        # The older versions of PyTorch have neither _foreach_lerp_ nor _foreach_copy_.
+        with mock.patch("xuance.torch.utils.target_networks.hasattr", create=True, return_value=False):
+            self.check_updates()
+
+    def test_mismatch(self):
+        with self.assertRaises(ValueError):
+            TargetNetworks([torch.nn.Linear(4, 8)], [torch.nn.Linear(4, 8, bias=False)])
+
+
+if __name__ == "__main__":
+    unittest.main()
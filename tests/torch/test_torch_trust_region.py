@@ -0,0 +1,62 @@
+# Test the natural gradient steps of the trust region optimizer.
+
+from torch.distributions import Categorical
+from xuance.torch.utils import conjugate_gradient, TrustRegionOptimizer
+import torch
+import unittest
+
+n_samples, dim_state, n_actions = 256, 4, 3
+
+
+class TestTrustRegion(unittest.TestCase):
+    def test_conjugate_gradient(self):
+        torch.manual_seed(0)
+        for dtype in [torch.float32, torch.float64]:
+            m = torch.randn(6, 6, dtype=dtype)
+            a = m @ m.T + 0.5 * torch.eye(6, dtype=dtype)  # symmetric positive-definite
+            b = torch.randn(6, dtype=dtype)
+            x = conjugate_gradient(lambda v: a @ v, b, n_iterations=20)
+            torch.testing.assert_close(x, torch.linalg.solve(a, b), rtol=1e-3, atol=1e-4)
+
+    def make_problem(self):
+        torch.manual_seed(0)
+        actor = torch.nn.Linear(dim_state, n_actions)
+        states = torch.randn(n_samples, dim_state)
+        old_dist = Categorical(logits=actor(states).detach())
+        actions = old_dist.sample()
+        advantages = torch.randn(n_samples)
+        old_log_prob = old_dist.log_prob(actions)
+
+        def loss_fn():
+            ratio = (Categorical(logits=actor(states)).log_prob(actions) - old_log_prob).exp()
+            return -(advantages * ratio).mean()
+
+        def kl_fn():  # The KL divergence of every sample, which the optimizer averages.
+            return torch.distributions.kl_divergence(old_dist, Categorical(logits=actor(states)))
+
+        return actor, loss_fn, kl_fn
+
+    def test_step(self):
+        max_kl = 0.01
+        for line_search_steps in [0, 10]:
+            actor, loss_fn, kl_fn = self.make_problem()
+            old_loss = loss_fn().item()
+            optimizer = TrustRegionOptimizer(actor, max_kl=max_kl, cg_iterations=20, cg_damping=1e-3,
+                                             line_search_steps=line_search_steps)
+            info = optimizer.step(loss_fn, kl_fn)
+            self.assertEqual(info["kl"].dim(), 0)
+            self.assertEqual(info["step_fraction"].dim(), 0)
+            with torch.no_grad():
+                kl = kl_fn().mean()
+            torch.testing.assert_close(info["kl"], kl)
+            if line_search_steps == 0:
+                # The full step reaches the KL boundary of the quadratic approximation.
+                self.assertAlmostEqual(kl.item(), max_kl, delta=0.2 * max_kl)
+            else:
+                self.assertGreater(info["step_fraction"].item(), 0.0)
+                self.assertLessEqual(kl.item(), max_kl)
+                self.assertLess(loss_fn().item(), old_loss)
+
+
+if __name__ == "__main__":
+    unittest.main()
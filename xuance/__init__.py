@@ -1,5 +1,13 @@
-from xuance.common.common_tools import get_runner, get_arguments, get_configs
-from xuance.environment import make_envs
+import importlib
+
+# The entry points are imported on first access, so "import xuance" stays cheap and the backends, environments and
+# algorithms are only imported once a runner asks for them.
+_members = {
+    "make_envs": "xuance.environment",
+    "get_runner": "xuance.common.common_tools",
+    "get_arguments": "xuance.common.common_tools",
+    "get_configs": "xuance.common.common_tools",
+}
 
 __all__ = [
     "make_envs",
@@ -9,3 +17,11 @@ __all__ = [
 ]
 
 __version__ = 'v1.2.6'
+
+
+def __getattr__(name):
+    if name not in _members:
+        raise AttributeError(f"module 'xuance' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_members[name]), name)
+    globals()[name] = value
+    return value
@@ -2,10 +2,8 @@ import os
 import yaml
 import time
 import numpy as np
-import scipy.signal
 from copy import deepcopy
 from types import SimpleNamespace as SN
-from xuance.common import Dict
 from xuance.configs import method_list
 
 EPS = 1e-8
@@ -205,7 +203,7 @@ def get_runner(method,
 
     if distributed_training:
         if rank == 0:
-            print(f"Calculating device: Multi-GPU distributed training.")
+            print(f"Calculating device: {device}, distributed training with {os.environ['WORLD_SIZE']} processes.")
     else:
         print(f"Calculating device: {device}")
 
@@ -325,7 +323,7 @@ def space2shape(observation_space):
     Returns:
         The shape of the observation_space.
     """
-    if isinstance(observation_space, Dict) or isinstance(observation_space, dict):
+    if isinstance(observation_space, dict) or isinstance(getattr(observation_space, "spaces", None), dict):
         return {key: observation_space[key].shape for key in observation_space.keys()}
     elif isinstance(observation_space, tuple):
         return observation_space
@@ -394,6 +392,7 @@ def discount_cumsum(x, discount=0.99):
     >>> y = discount_cumsum(x, discount=0.99)
     [4.890798, 4.9402, 3.98, 2.0]
     """
+    import scipy.signal  # scipy.signal alone costs about one second to import, so load it on first use.
     return scipy.signal.lfilter([1], [1, float(-discount)], x[::-1], axis=0)[::-1]
 
 
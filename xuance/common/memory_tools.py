@@ -273,6 +273,29 @@ class DummyOnPolicyBuffer(Buffer):
 
         return samples_dict
 
+    def rollout(self):
+        """
+        Returns the whole rollout without copying it, with the transitions of all environments along the first
+        dimension, in the order of the indexes of sample(). The advantages are not normalized.
+        """
+        assert self.full, "Not enough transitions for on-policy buffer to return the rollout"
+
+        def flatten(memory):
+            if memory is None:
+                return None
+            elif isinstance(memory, dict):
+                return {key: flatten(value) for key, value in memory.items()}
+            return memory.reshape((self.buffer_size,) + memory.shape[2:])
+
+        return {
+            'obs': flatten(self.observations),
+            'actions': flatten(self.actions),
+            'returns': flatten(self.returns),
+            'values': flatten(self.values),
+            'aux_batch': flatten(self.auxiliary_infos),
+            'advantages': flatten(self.advantages),
+        }
+
 
 class DummyOnPolicyBuffer_Atari(DummyOnPolicyBuffer):
     """
@@ -236,6 +236,25 @@ class MARL_OnPolicyBuffer(BaseBuffer):
         samples_dict['batch_size'] = len(indexes)
         return samples_dict
 
+    def rollout(self):
+        """
+        Returns the whole rollout without copying it, with the transitions of all environments along the first
+        dimension, in the order of the indexes of sample(). The advantages are not normalized.
+
+        Returns:
+            rollout (dict): The data of the rollout.
+        """
+        assert self.full, "Not enough transitions for on-policy buffer to return the rollout."
+        rollout = {}
+        for data_key in self.data_keys:
+            if data_key == "state":
+                rollout[data_key] = self.data[data_key].reshape((self.buffer_size,) + self.data[data_key].shape[2:])
+            else:
+                rollout[data_key] = {k: self.data[data_key][k].reshape((self.buffer_size,) +
+                                                                        self.data[data_key][k].shape[2:])
+                                     for k in self.agent_keys}
+        return rollout
+
 
 class MARL_OnPolicyBuffer_RNN(MARL_OnPolicyBuffer):
     """
@@ -475,51 +494,42 @@ class MeanField_OnPolicyBuffer(MARL_OnPolicyBuffer):
     """
     Replay buffer for on-policy Mean-Field MARL algorithms (Mean-Field Actor-Critic).
 
+    Besides the data of MARL_OnPolicyBuffer, it stores the mean action of the neighbors of each agent, 'act_mean',
+    with shape (n_actions,) per agent.
+
     Args:
-        n_agents: number of agents.
-        state_space: global state space, type: Discrete, Box.
-        obs_space: observation space for one agent (suppose same obs space for group agents).
-        act_space: action space for one agent (suppose same actions space for group agents).
-        rew_space: reward space.
-        done_space: terminal variable space.
-        n_envs: number of parallel environments.
-        n_size: buffer size of trajectory data for one environment.
-        use_gae: whether to use GAE trick.
-        use_advnorm: whether to use Advantage normalization trick.
-        gamma: discount factor.
-        gae_lam: gae lambda.
-        kwargs: the other arguments.
+        agent_keys (List[str]): Keys that identify each agent.
+        state_space (Dict[str, Space]): Global state space, type: Discrete, Box.
+        obs_space (Dict[str, Dict[str, Space]]): Observation space for one agent (suppose same obs space for group agents).
+        act_space (Dict[str, Dict[str, Space]]): Action space for one agent, type: Discrete.
+        n_envs (int): Number of parallel environments.
+        buffer_size (int): Buffer size of total experience data.
+        use_gae (bool): Whether to use GAE trick.
+        use_advnorm (bool): Whether to use Advantage normalization trick.
+        gamma (float): Discount factor.
+        gae_lam (float): gae lambda.
+        **kwargs: Other arguments.
     """
 
-    def __init__(self, n_agents, state_space, obs_space, act_space, rew_space, done_space, n_envs,
-                 n_size, use_gae, use_advnorm, gamma, gae_lam, **kwargs):
-        self.prob_space = kwargs['prob_space']
-        super(MeanField_OnPolicyBuffer, self).__init__(n_agents, state_space, obs_space, act_space, rew_space,
-                                                       done_space, n_envs, n_size, use_gae, use_advnorm, gamma, gae_lam,
-                                                       **kwargs)
+    def __init__(self,
+                 agent_keys: List[str],
+                 state_space: Dict[str, Space] = None,
+                 obs_space: Dict[str, Dict[str, Space]] = None,
+                 act_space: Dict[str, Dict[str, Space]] = None,
+                 n_envs: int = 1,
+                 buffer_size: int = 1,
+                 use_gae: Optional[bool] = False,
+                 use_advnorm: Optional[bool] = False,
+                 gamma: Optional[float] = None,
+                 gae_lam: Optional[float] = None,
+                 **kwargs):
+        self.act_mean_shape = {key: (act_space[key].n,) for key in agent_keys}
+        super(MeanField_OnPolicyBuffer, self).__init__(agent_keys, state_space, obs_space, act_space, n_envs,
+                                                       buffer_size, use_gae, use_advnorm, gamma, gae_lam, **kwargs)
 
     def clear(self):
-        self.data.update({
-            'obs': np.zeros((self.n_envs, self.n_size, self.n_agents) + self.obs_space).astype(np.float32),
-            'actions': np.zeros((self.n_envs, self.n_size, self.n_agents) + self.act_space).astype(np.float32),
-            'act_mean': np.zeros((self.n_envs, self.n_size,) + self.prob_space).astype(np.float32),
-            'rewards': np.zeros((self.n_envs, self.n_size,) + self.rew_space).astype(np.float32),
-            'returns': np.zeros((self.n_envs, self.n_size,) + self.rew_space).astype(np.float32),
-            'values': np.zeros((self.n_envs, self.n_size, self.n_agents, 1)).astype(np.float32),
-            'advantages': np.zeros((self.n_envs, self.n_size,) + self.rew_space).astype(np.float32),
-            'terminals': np.zeros((self.n_envs, self.n_size,) + self.done_space).astype(np.bool_),
-            'agent_mask': np.ones((self.n_envs, self.n_size, self.n_agents)).astype(np.bool_),
-        })
-        if self.state_space is not None:
-            self.data.update({'state': np.zeros((self.n_envs, self.n_size,) + self.state_space).astype(np.float32)})
-        self.ptr = 0  # current pointer
-        self.size = 0  # current buffer size
-        self.start_ids = np.zeros(self.n_envs)
-
-    def finish_ac_path(self, value, i_env):  # when an episode is finished
-        if self.size == 0:
-            return
-        self.start_ids[i_env] = self.ptr
+        super(MeanField_OnPolicyBuffer, self).clear()
+        self.data.update({'act_mean': create_memory(self.act_mean_shape, self.n_envs, self.n_size)})
 
 
 class COMA_Buffer(MARL_OnPolicyBuffer):
@@ -1021,33 +1031,36 @@ class MeanField_OffPolicyBuffer(MARL_OffPolicyBuffer):
     """
     Replay buffer for off-policy Mean-Field MARL algorithms (Mean-Field Q-Learning).
 
+    Besides the data of MARL_OffPolicyBuffer, it stores the mean actions of the neighbors of each agent at the current
+    and the next steps, 'act_mean' and 'act_mean_next', with shape (n_actions,) per agent.
+
     Args:
-        n_agents: number of agents.
-        state_space: global state space, type: Discrete, Box.
-        obs_space: observation space for one agent (suppose same obs space for group agents).
-        act_space: action space for one agent (suppose same actions space for group agents).
-        prob_shape: the data shape of the action probabilities.
-        rew_space: reward space.
-        done_space: terminal variable space.
-        n_envs: number of parallel environments.
-        buffer_size: buffer size of total experience data.
-        batch_size: batch size of transition data for a sample.
+        agent_keys (List[str]): Keys that identify each agent.
+        state_space (Dict[str, Space]): Global state space, type: Discrete, Box.
+        obs_space (Dict[str, Dict[str, Space]]): Observation space for one agent (suppose same obs space for group agents).
+        act_space (Dict[str, Dict[str, Space]]): Action space for one agent, type: Discrete.
+        n_envs (int): Number of parallel environments.
+        buffer_size (int): Buffer size of total experience data.
+        batch_size (int): Batch size of transition data for a sample.
+        **kwargs: Other arguments.
     """
 
-    def __init__(self, n_agents, state_space, obs_space, act_space, prob_shape, rew_space, done_space,
-                 n_envs, buffer_size, batch_size):
-        self.prob_shape = prob_shape
-        super(MeanField_OffPolicyBuffer, self).__init__(n_agents, state_space, obs_space, act_space, rew_space,
-                                                        done_space, n_envs, buffer_size, batch_size)
+    def __init__(self,
+                 agent_keys: List[str],
+                 state_space: Dict[str, Space] = None,
+                 obs_space: Dict[str, Dict[str, Space]] = None,
+                 act_space: Dict[str, Dict[str, Space]] = None,
+                 n_envs: int = 1,
+                 buffer_size: int = 1,
+                 batch_size: int = 1,
+                 **kwargs):
+        self.act_mean_shape = {key: (act_space[key].n,) for key in agent_keys}
+        super(MeanField_OffPolicyBuffer, self).__init__(agent_keys, state_space, obs_space, act_space, n_envs,
+                                                        buffer_size, batch_size, **kwargs)
 
     def clear(self):
         super(MeanField_OffPolicyBuffer, self).clear()
-        self.data.update({"act_mean": np.zeros((self.n_envs, self.n_size,) + self.prob_shape).astype(np.float32)})
-
-    def sample(self):
-        env_choices = np.random.choice(self.n_envs, self.batch_size)
-        step_choices = np.random.choice(self.size, self.batch_size)
-        samples = {k: self.data[k][env_choices, step_choices] for k in self.keys}
-        next_index = (step_choices + 1) % self.n_size
-        samples.update({'act_mean_next': self.data['act_mean'][env_choices, next_index]})
-        return samples
+        self.data.update({
+            'act_mean': create_memory(self.act_mean_shape, self.n_envs, self.n_size),
+            'act_mean_next': create_memory(self.act_mean_shape, self.n_envs, self.n_size)
+        })
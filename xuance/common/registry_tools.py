@@ -0,0 +1,74 @@
+import sys
+import importlib
+from typing import Callable, Dict
+
+
+def _import_attribute(path: str):
+    """Imports an object from a path in the form of "package.module:attribute"."""
+    module_name, attribute = path.split(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class LazyRegistry(dict):
+    """
+    A registry that maps names to import paths and imports each entry the first time it is looked up.
+
+    Values can be import paths in the form of "package.module:attribute", or objects that are registered directly.
+    Only the requested entry is imported, so a process that only needs one environment, agent or learner never
+    pays for the imports of the others.
+
+    Parameters:
+        entries (dict): The names and the import paths (or objects) of the registered entries.
+        catch_errors (bool): If True, an entry that fails to import is replaced by the error message, which is
+            how the registries of optional environments report missing dependencies.
+    """
+
+    def __init__(self, entries: dict = None, catch_errors: bool = False):
+        super(LazyRegistry, self).__init__(entries or {})
+        self.catch_errors = catch_errors
+
+    def __getitem__(self, key):
+        value = super(LazyRegistry, self).__getitem__(key)
+        if isinstance(value, str) and ":" in value and " " not in value:
+            try:
+                value = _import_attribute(value)
+            except Exception as error:
+                if not self.catch_errors:
+                    raise
+                value = str(error)
+            self[key] = value
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __reduce__(self):
+        return self.__class__, (dict(super(LazyRegistry, self).items()), self.catch_errors)
+
+
+def lazy_attributes(package: str, members: Dict[str, str]) -> Callable:
+    """
+    Creates the module-level __getattr__ (PEP 562) of a package that imports its members on first access.
+
+    Parameters:
+        package (str): The name of the package, usually __name__.
+        members (Dict[str, str]): Maps each public name to the module, relative to the package, that defines it.
+
+    Returns:
+        The __getattr__ function for the package.
+    """
+
+    def __getattr__(name: str):
+        if name not in members:
+            raise AttributeError(f"module '{package}' has no attribute '{name}'")
+        value = getattr(importlib.import_module(members[name], package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    return __getattr__
@@ -1,4 +1,3 @@
-from mpi4py import MPI
 from xuance.common import Union, Sequence
 import numpy as np
 
@@ -20,6 +19,7 @@ def mpi_mean(x, axis=0, comm=None, keepdims=False):
     """
     x = np.asarray(x)
     assert x.ndim > 0
+    from mpi4py import MPI
     if comm is None: comm = MPI.COMM_WORLD
     xsum = x.sum(axis=axis, keepdims=keepdims)
     n = xsum.size
@@ -95,7 +95,7 @@ class RunningMeanStd(object):
             self.var = np.ones(shape, np.float32)
             self.count = epsilon
         self.use_mpi = use_mpi
-        if comm is None:
+        if comm is None and use_mpi:
             from mpi4py import MPI
             comm = MPI.COMM_WORLD
         self.comm = comm
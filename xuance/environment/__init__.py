@@ -1,3 +1,4 @@
+import os
 from argparse import Namespace
 from xuance.environment.utils import XuanCeEnvWrapper, XuanCeMultiAgentEnvWrapper
 from xuance.environment.utils import RawEnvironment, RawMultiAgentEnv
@@ -26,6 +27,12 @@ def make_envs(config: Namespace):
         - distributed_training (bool): Whether to use distributed training.
         - parallels (int): The number of parallel environments for vectorized setups.
         - vectorize (str): The type of vectorization to apply (e.g., 'DummyVecEnv', 'SubprocVecEnv', etc.).
+        - in_series (int or "auto", optional): The number of environments run in series by one subprocess worker.
+        - worker_threads (int, optional): The number of OpenMP/MKL/torch threads of each subprocess worker.
+        - worker_affinity (bool, optional): Whether to pin each subprocess worker to its own cores.
+        - learner_cores (int, optional): The number of cores reserved for the learner when worker_affinity is True.
+        - use_array_batches (bool, optional): Whether the multi-agent vectorized environments return the per-agent
+          values of all environments as arrays, instead of lists of per-environment dicts.
 
     Returns:
         List of environments based on the configuration settings.
@@ -60,13 +67,23 @@ def make_envs(config: Namespace):
         config.render_mode = "human"
 
     if distributed_training:
-        # rank = int(os.environ['RANK'])  # for torch.nn.parallel.DistributedDataParallel
-        rank = 1
+        rank = int(os.environ['RANK'])  # Each process steps its own environments with its own seeds.
         config.env_seed += rank * config.parallels
 
     if config.vectorize in REGISTRY_VEC_ENV.keys():
         env_fn = [_thunk for _ in range(config.parallels)]
-        return REGISTRY_VEC_ENV[config.vectorize](env_fn, config.env_seed)
+        vec_env = REGISTRY_VEC_ENV[config.vectorize]
+        kwargs = {}
+        if issubclass(vec_env, (DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv)):
+            if hasattr(config, "use_array_batches") and config.use_array_batches:
+                kwargs['array_batches'] = True
+        if issubclass(vec_env, (SubprocVecEnv, SubprocVecMultiAgentEnv)):
+            return vec_env(env_fn, config.env_seed,
+                           in_series=config.in_series if hasattr(config, "in_series") else 1,
+                           worker_threads=config.worker_threads if hasattr(config, "worker_threads") else 1,
+                           worker_affinity=config.worker_affinity if hasattr(config, "worker_affinity") else False,
+                           learner_cores=config.learner_cores if hasattr(config, "learner_cores") else 0, **kwargs)
+        return vec_env(env_fn, config.env_seed, **kwargs)
     elif config.vectorize == "NOREQUIRED":
         return _thunk()
     else:
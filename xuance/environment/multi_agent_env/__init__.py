@@ -1,34 +1,24 @@
 from xuance.environment.utils import EnvironmentDict
 from xuance.common import Optional
-from xuance.environment.multi_agent_env.mpe import MPE_Env
+from xuance.common.registry_tools import LazyRegistry, lazy_attributes
 
-REGISTRY_MULTI_AGENT_ENV: Optional[EnvironmentDict] = {
-    "mpe": MPE_Env,
-}
+# Each environment module is imported only when its env_name is looked up. If an optional dependency is missing,
+# the entry becomes the error message instead.
+REGISTRY_MULTI_AGENT_ENV: Optional[EnvironmentDict] = LazyRegistry({
+    "mpe": "xuance.environment.multi_agent_env.mpe:MPE_Env",
+    "Drones": "xuance.environment.multi_agent_env.drones:Drones_MultiAgentEnv",
+    "Football": "xuance.environment.multi_agent_env.football:GFootball_Env",
+    "RoboticWarehouse": "xuance.environment.multi_agent_env.robotic_warehouse:RoboticWarehouseEnv",
+    "StarCraft2": "xuance.environment.multi_agent_env.starcraft2:StarCraft2_Env",
+}, catch_errors=True)
 
-try:
-    from xuance.environment.multi_agent_env.drones import Drones_MultiAgentEnv
-    REGISTRY_MULTI_AGENT_ENV['Drones'] = Drones_MultiAgentEnv
-except Exception as error:
-    REGISTRY_MULTI_AGENT_ENV["Drones"] = str(error)
-
-try:
-    from xuance.environment.multi_agent_env.football import GFootball_Env
-    REGISTRY_MULTI_AGENT_ENV['Football'] = GFootball_Env
-except Exception as error:
-    REGISTRY_MULTI_AGENT_ENV["Football"] = str(error)
-
-try:
-    from xuance.environment.multi_agent_env.robotic_warehouse import RoboticWarehouseEnv
-    REGISTRY_MULTI_AGENT_ENV['RoboticWarehouse'] = RoboticWarehouseEnv
-except Exception as error:
-    REGISTRY_MULTI_AGENT_ENV["RoboticWarehouse"] = str(error)
-
-try:
-    from xuance.environment.multi_agent_env.starcraft2 import StarCraft2_Env
-    REGISTRY_MULTI_AGENT_ENV['StarCraft2'] = StarCraft2_Env
-except Exception as error:
-    REGISTRY_MULTI_AGENT_ENV["StarCraft2"] = str(error)
+__getattr__ = lazy_attributes(__name__, {
+    "MPE_Env": ".mpe",
+    "Drones_MultiAgentEnv": ".drones",
+    "GFootball_Env": ".football",
+    "RoboticWarehouseEnv": ".robotic_warehouse",
+    "StarCraft2_Env": ".starcraft2",
+})
 
 __all__ = [
     "REGISTRY_MULTI_AGENT_ENV",
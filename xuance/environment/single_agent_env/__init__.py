@@ -1,42 +1,28 @@
-from xuance.environment.single_agent_env.gym import Gym_Env
 from xuance.environment.utils import EnvironmentDict
 from xuance.common import Optional
+from xuance.common.registry_tools import LazyRegistry, lazy_attributes
 
-REGISTRY_ENV: Optional[EnvironmentDict] = {
-    "Classic Control": Gym_Env,
-    "Box2D": Gym_Env,
-    "MuJoCo": Gym_Env
-}
+# Each environment module is imported only when its env_name is looked up. If an optional dependency is missing,
+# the entry becomes the error message instead.
+REGISTRY_ENV: Optional[EnvironmentDict] = LazyRegistry({
+    "Classic Control": "xuance.environment.single_agent_env.gym:Gym_Env",
+    "Box2D": "xuance.environment.single_agent_env.gym:Gym_Env",
+    "MuJoCo": "xuance.environment.single_agent_env.gym:Gym_Env",
+    "Atari": "xuance.environment.single_agent_env.gym:Atari_Env",
+    "MiniGrid": "xuance.environment.single_agent_env.minigrid:MiniGridEnv",
+    "Drone": "xuance.environment.single_agent_env.drones:Drone_Env",
+    "MetaDrive": "xuance.environment.single_agent_env.metadrive:MetaDrive_Env",
+    "Platform": "xuance.environment.single_agent_env.platform:PlatformEnv",
+}, catch_errors=True)
 
-try:
-    from xuance.environment.single_agent_env.gym import Atari_Env
-    REGISTRY_ENV['Atari'] = Atari_Env
-except Exception as error:
-    REGISTRY_ENV["Atari"] = str(error)
-
-try:
-    from xuance.environment.single_agent_env.minigrid import MiniGridEnv
-    REGISTRY_ENV['MiniGrid'] = MiniGridEnv
-except Exception as error:
-    REGISTRY_ENV["MiniGrid"] = str(error)
-
-try:
-    from xuance.environment.single_agent_env.drones import Drone_Env
-    REGISTRY_ENV['Drone'] = Drone_Env
-except Exception as error:
-    REGISTRY_ENV["Drone"] = str(error)
-
-try:
-    from xuance.environment.single_agent_env.metadrive import MetaDrive_Env
-    REGISTRY_ENV['MetaDrive'] = MetaDrive_Env
-except Exception as error:
-    REGISTRY_ENV["MetaDrive"] = str(error)
-
-try:
-    from xuance.environment.single_agent_env.platform import PlatformEnv
-    REGISTRY_ENV['Platform'] = PlatformEnv
-except Exception as error:
-    REGISTRY_ENV["Platform"] = str(error)
+__getattr__ = lazy_attributes(__name__, {
+    "Gym_Env": ".gym",
+    "Atari_Env": ".gym",
+    "MiniGridEnv": ".minigrid",
+    "Drone_Env": ".drones",
+    "MetaDrive_Env": ".metadrive",
+    "PlatformEnv": ".platform",
+})
 
 __all__ = [
     "REGISTRY_ENV",
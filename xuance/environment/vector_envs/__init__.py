@@ -5,6 +5,16 @@ from .env_utils import (
     obs_space_info,
     obs_n_space_info,
     clear_mpi_env_vars,
+    available_cpus,
+    worker_placement,
+    reserve_learner_cpus,
+    set_worker_threads,
+    split_env_fns,
+    stack_dicts,
+    unstack_dicts,
+    stack_infos,
+    stack_step_results,
+    concatenate_dicts,
     flatten_list,
     flatten_obs,
     combine_actions,
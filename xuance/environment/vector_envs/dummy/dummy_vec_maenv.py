@@ -1,6 +1,8 @@
+import copy
 import numpy as np
 from xuance.common import space2shape
 from xuance.environment.vector_envs.vector_env import VecEnv, AlreadySteppingError, NotSteppingError
+from xuance.environment.vector_envs.env_utils import stack_dicts, stack_infos, stack_step_results, unstack_dicts
 
 
 class DummyVecMultiAgentEnv(VecEnv):
@@ -11,10 +13,14 @@ class DummyVecMultiAgentEnv(VecEnv):
     avoids communication overhead)
     Parameters:
         env_fns – environment function.
+        env_seed – the seed of the first environment.
+        array_batches – whether to return the per-agent values of all envs as {agent_key: ndarray[n_envs, ...]}
+            and the information as a dict of arrays, instead of lists of per-env dicts.
     """
 
-    def __init__(self, env_fns, env_seed):
+    def __init__(self, env_fns, env_seed, array_batches=False):
         self.waiting = False
+        self.array_batches = array_batches
         self.closed = False
         self.envs = [fn(env_seed=env_seed + inx_env) for inx_env, fn in enumerate(env_fns)]
         env = self.envs[0]
@@ -35,6 +41,11 @@ class DummyVecMultiAgentEnv(VecEnv):
 
     def reset(self):
         """Reset the vectorized environments."""
+        if self.array_batches:
+            obs, info = zip(*[env.reset() for env in self.envs])
+            obs, self.buf_info = stack_dicts(obs), stack_infos(info)
+            self._set_array_buffers(obs, self.buf_info)
+            return obs, self.buf_info
         for e in range(self.num_envs):
             self.buf_obs[e], self.buf_info[e] = self.envs[e].reset()
             self.buf_state[e] = self.buf_info[e]['state']
@@ -45,6 +56,10 @@ class DummyVecMultiAgentEnv(VecEnv):
         """Sends asynchronous step commands to each subprocess with the specified actions."""
         if self.waiting:
             raise AlreadySteppingError
+        if self.array_batches:
+            self.actions = unstack_dicts(actions, self.num_envs)
+            self.waiting = True
+            return
         listify = True
         try:
             if len(actions) == self.num_envs:
@@ -65,6 +80,8 @@ class DummyVecMultiAgentEnv(VecEnv):
         """
         if not self.waiting:
             raise NotSteppingError
+        if self.array_batches:
+            return self._step_wait_arrays()
 
         rew_dict = [{} for _ in self.envs]
         terminated_dict = [{} for _ in self.envs]
@@ -82,6 +99,27 @@ class DummyVecMultiAgentEnv(VecEnv):
         self.waiting = False
         return self.buf_obs.copy(), rew_dict, terminated_dict, truncated, self.buf_info.copy()
 
+    def _set_array_buffers(self, obs, info):
+        """Keeps copies of the arrays, so that the returned ones are not changed when the buffers are written."""
+        self.buf_obs, self.buf_state = copy.deepcopy(obs), info['state'].copy()
+        self.buf_avail_actions = copy.deepcopy(info['avail_actions'])
+
+    def _step_wait_arrays(self):
+        """Steps the environments and stacks their results into arrays, see stack_step_results()."""
+        results = []
+        for env, action_n in zip(self.envs, self.actions):
+            obs, rewards, terminated, truncated, info = env.step(action_n)
+            if all(terminated.values()) or truncated:
+                obs_reset_dict, info_reset = env.reset()
+                info["reset_obs"] = obs_reset_dict
+                info["reset_avail_actions"] = info_reset['avail_actions']
+                info["reset_state"] = info_reset['state']
+            results.append((obs, rewards, terminated, truncated, info))
+        obs, rewards, terminated, truncated, self.buf_info = stack_step_results(results)
+        self._set_array_buffers(obs, self.buf_info)
+        self.waiting = False
+        return obs, rewards, terminated, truncated, self.buf_info
+
     def close_extras(self):
         """Closes the communication with subprocesses and joins the subprocesses."""
         self.closed = True
@@ -96,8 +134,10 @@ class DummyVecMultiAgentEnv(VecEnv):
 
 
 class DummyVecEnv_StarCraft2(DummyVecMultiAgentEnv):
-    def __init__(self, env_fns, env_seed):
-        super(DummyVecEnv_StarCraft2, self).__init__(env_fns, env_seed)
+    def __init__(self, env_fns, env_seed, **kwargs):
+        if kwargs.get("array_batches", False):
+            raise AttributeError("The StarCraft2 environments do not support array batches.")
+        super(DummyVecEnv_StarCraft2, self).__init__(env_fns, env_seed, **kwargs)
         self.num_enemies = self.env_info['num_enemies']
         self.battles_game = np.zeros(self.num_envs, np.int32)
         self.battles_won = np.zeros(self.num_envs, np.int32)
@@ -137,8 +177,10 @@ class DummyVecEnv_StarCraft2(DummyVecMultiAgentEnv):
 
 
 class DummyVecEnv_Football(DummyVecMultiAgentEnv):
-    def __init__(self, env_fns, env_seed):
-        super(DummyVecEnv_Football, self).__init__(env_fns, env_seed)
+    def __init__(self, env_fns, env_seed, **kwargs):
+        if kwargs.get("array_batches", False):
+            raise AttributeError("The Football environments do not support array batches.")
+        super(DummyVecEnv_Football, self).__init__(env_fns, env_seed, **kwargs)
         self.num_adversaries = self.env_info['num_adversaries']
         self.battles_game = np.zeros(self.num_envs, np.int32)
         self.battles_won = np.zeros(self.num_envs, np.int32)
@@ -1,6 +1,9 @@
 import contextlib
+import functools
 import os
+import sys
 from collections import OrderedDict
+from typing import Optional, Sequence
 
 import gym
 import numpy as np
@@ -81,14 +84,21 @@ def obs_n_space_info(obs_n_space):
     return keys, shapes, dtypes
 
 
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+
 @contextlib.contextmanager
-def clear_mpi_env_vars():
+def clear_mpi_env_vars(num_threads: Optional[int] = None, cpus: Optional[Sequence[int]] = None):
     """
     from mpi4py import MPI will call MPI_Init by default.  If the child process has MPI
     environment variables, MPI will think that the child process is an MPI process just
     like the parent and do bad things such as hang.
     This context manager is a hacky way to clear those environment variables temporarily
     such as when we are starting multiprocessing Processes.
+
+    It also sets up the resources inherited by the started processes, and restores the parent's on exit:
+        num_threads: if given, OMP_NUM_THREADS, MKL_NUM_THREADS, etc. are set to this value;
+        cpus: if given, the CPU affinity is set to these cores (only on platforms with os.sched_setaffinity).
     """
     removed_environment = {}
     for k, v in list(os.environ.items()):
@@ -96,10 +106,157 @@ def clear_mpi_env_vars():
             if k.startswith(prefix):
                 removed_environment[k] = v
                 del os.environ[k]
+    if num_threads is not None:
+        for k in THREAD_ENV_VARS:
+            removed_environment[k] = os.environ.get(k)
+            os.environ[k] = str(num_threads)
+    parent_cpus = None
+    if cpus is not None and hasattr(os, "sched_setaffinity"):
+        parent_cpus = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, cpus)
     try:
         yield
     finally:
-        os.environ.update(removed_environment)
+        for k, v in removed_environment.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        if parent_cpus is not None:
+            os.sched_setaffinity(0, parent_cpus)
+
+
+@functools.lru_cache(maxsize=None)
+def available_cpus() -> tuple:
+    """The cores this process may run on, read once so that pinning the learner later does not shrink it."""
+    if hasattr(os, "sched_getaffinity"):
+        return tuple(sorted(os.sched_getaffinity(0)))
+    return tuple(range(os.cpu_count() or 1))
+
+
+def worker_placement(n_workers: int, learner_cores: int = 0):
+    """
+    Assigns the available cores to the learner and to the environment workers.
+
+    Parameters:
+        n_workers (int): The number of worker processes.
+        learner_cores (int): The number of cores reserved for the learner (the main process). If no core would be
+            left for the workers, nothing is reserved.
+
+    Returns:
+        learner_cpus (list): The cores of the learner, empty if none are reserved.
+        worker_cpus (list): The cores of each worker. Workers get disjoint cores while there are enough of them,
+            otherwise they are assigned one core each in a round-robin manner.
+    """
+    cpus = available_cpus()
+    if learner_cores <= 0 or learner_cores >= len(cpus):
+        learner_cpus, cpus = [], list(cpus)
+    else:
+        learner_cpus, cpus = list(cpus[:learner_cores]), list(cpus[learner_cores:])
+    if n_workers <= len(cpus):
+        worker_cpus = [group.tolist() for group in np.array_split(np.array(cpus), n_workers)]
+    else:
+        worker_cpus = [[cpus[i % len(cpus)]] for i in range(n_workers)]
+    return learner_cpus, worker_cpus
+
+
+def reserve_learner_cpus(learner_cpus: Sequence[int]):
+    """Pins the current (learner) process to its reserved cores and matches the torch threads to them."""
+    if len(learner_cpus) == 0 or not hasattr(os, "sched_setaffinity"):
+        return
+    os.sched_setaffinity(0, learner_cpus)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(len(learner_cpus))
+
+
+def set_worker_threads():
+    """
+    Applies the thread limit set by clear_mpi_env_vars() to torch inside a worker process.
+
+    A spawned worker reads OMP_NUM_THREADS when it imports torch, but a forked worker inherits the thread pool of a
+    parent that has already imported it, so the limit has to be set again.
+    """
+    num_threads = os.environ.get('OMP_NUM_THREADS')
+    torch = sys.modules.get("torch")
+    if num_threads is not None and torch is not None:
+        torch.set_num_threads(int(num_threads))
+
+
+def split_env_fns(env_fns, in_series="auto"):
+    """
+    Splits the environment functions into the groups that each worker process runs in series.
+
+    Parameters:
+        env_fns: The functions that create the environments.
+        in_series: The number of environments run in series by one worker. If "auto" (or None), the environments
+            are spread evenly over os.cpu_count() workers.
+
+    Returns:
+        groups (list): The environment functions of each worker.
+        offsets (list): The index of the first environment of each worker, used to seed its environments.
+    """
+    num_envs = len(env_fns)
+    if in_series in ["auto", None]:
+        in_series = -(-num_envs // (os.cpu_count() or 1))
+    n_remotes = -(-num_envs // max(int(in_series), 1))
+    indexes = np.array_split(np.arange(num_envs), n_remotes)
+    return [[env_fns[i] for i in group] for group in indexes], [int(group[0]) for group in indexes]
+
+
+def stack_dicts(dicts):
+    """Stacks a list of dicts with the same keys into one dict of arrays, e.g. the per-agent values of envs."""
+    return {k: np.stack([d[k] for d in dicts]) for k in dicts[0].keys()}
+
+
+def unstack_dicts(batch: dict, n: int):
+    """Splits a dict of stacked arrays back into a list of n dicts."""
+    items = list(batch.items())
+    return [{k: v[i] for k, v in items} for i in range(n)]
+
+
+def stack_infos(infos):
+    """Stacks the information dicts of envs into one dict of arrays, recursing into the nested dicts (e.g., the
+    per-agent values). Only the keys returned by all envs are kept."""
+    batch = {}
+    for key in infos[0].keys():
+        if not all(key in info for info in infos):
+            continue
+        values = [info[key] for info in infos]
+        if isinstance(values[0], dict):
+            batch[key] = stack_infos(values)
+            continue
+        try:
+            batch[key] = np.array(values)
+        except ValueError:  # Values of different shapes.
+            batch[key] = np.empty(len(values), dtype=object)
+            for i, value in enumerate(values):
+                batch[key][i] = value
+    return batch
+
+
+def stack_step_results(results):
+    """
+    Stacks the results of stepping multi-agent envs into arrays, for the array batches of the vectorized envs.
+
+    The reset observations, actions masks and states are given for all envs: those of the envs that have not been
+    reset are their current ones.
+    """
+    obs, rewards, terminated, truncated, infos = zip(*results)
+    for o, info in zip(obs, infos):
+        if "reset_obs" not in info:
+            info["reset_obs"] = o
+            info["reset_avail_actions"] = info["avail_actions"]
+            info["reset_state"] = info["state"]
+    return stack_dicts(obs), stack_dicts(rewards), stack_dicts(terminated), np.array(truncated), stack_infos(infos)
+
+
+def concatenate_dicts(batches):
+    """Concatenates the (nested) dicts of arrays of several workers along the env dimension."""
+    if isinstance(batches[0], dict):
+        return {k: concatenate_dicts([batch[k] for batch in batches]) for k in batches[0].keys()
+                if all(k in batch for batch in batches)}
+    return np.concatenate(batches)
 
 
 def flatten_list(l):
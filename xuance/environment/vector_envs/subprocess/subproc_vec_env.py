@@ -2,7 +2,9 @@ import numpy as np
 from multiprocessing import Process, Pipe
 from xuance.common import space2shape, combined_shape
 from xuance.environment.vector_envs.vector_env import VecEnv
-from xuance.environment.vector_envs import clear_mpi_env_vars, flatten_list, CloudpickleWrapper
+from xuance.environment.vector_envs import clear_mpi_env_vars, worker_placement, reserve_learner_cpus, \
+    set_worker_threads, split_env_fns, flatten_list, flatten_obs, \
+    CloudpickleWrapper
 
 
 def worker(remote, parent_remote, env_fn_wrappers, env_seed: int = None):
@@ -14,6 +16,7 @@ def worker(remote, parent_remote, env_fn_wrappers, env_seed: int = None):
         return obs, reward_n, terminated, truncated, info
 
     parent_remote.close()
+    set_worker_threads()
     if env_seed is None:
         envs = [env_fn_wrapper() for env_fn_wrapper in env_fn_wrappers.x]
     else:
@@ -23,9 +26,12 @@ def worker(remote, parent_remote, env_fn_wrappers, env_seed: int = None):
         while True:
             cmd, data = remote.recv()
             if cmd == 'step':
-                remote.send([step_env(env, action) for env, action in zip(envs, data)])
+                # Stack the results of all envs in this worker, so that one message carries a few arrays.
+                obs, rewards, terminated, truncated, info = zip(*[step_env(env, a) for env, a in zip(envs, data)])
+                remote.send((flatten_obs(obs), np.array(rewards), np.array(terminated), np.array(truncated), info))
             elif cmd == 'reset':
-                remote.send([env.reset() for env in envs])
+                obs, info = zip(*[env.reset() for env in envs])
+                remote.send((flatten_obs(obs), info))
             elif cmd == 'render':
                 remote.send([env.render(data) for env in envs])
             elif cmd == 'close':
@@ -50,31 +56,39 @@ class SubprocVecEnv(VecEnv):
     Recommended to use when num_envs > 1 and step() can be a bottleneck.
     """
 
-    def __init__(self, env_fns, env_seed, in_series=1):
+    def __init__(self, env_fns, env_seed, in_series=1,
+                 worker_threads=1, worker_affinity=False, learner_cores=0):
         """
         Arguments:
         env_fns: iterable of callables -  functions that create environments to run in subprocesses. Need to be cloud-pickleable
-        in_series: number of environments to run in series in a single process
+        in_series: number of environments to run in series in a single process, or "auto" to use os.cpu_count() processes
         (e.g. when len(env_fns) == 12 and in_series == 3, it will run 4 processes, each running 3 envs in series)
+        worker_threads: number of OpenMP/MKL/torch threads of each worker process, None keeps the parent's settings
+        worker_affinity: whether to pin each worker process to its own cores
+        learner_cores: number of cores reserved for the learner (this process) when worker_affinity is True
         """
         self.waiting = False
         self.closed = False
         num_envs = len(env_fns)
-        self.n_remotes = num_envs // in_series
-        env_fns = np.array_split(env_fns, self.n_remotes)
+        env_fns, env_offsets = split_env_fns(env_fns, in_series)
+        self.n_remotes = len(env_fns)
         self.remotes, self.work_remotes = zip(*[Pipe() for _ in range(self.n_remotes)])
         if env_seed is None:
             self.ps = [Process(target=worker, args=(work_remote, remote, CloudpickleWrapper(env_fn)))
                        for (work_remote, remote, env_fn) in zip(self.work_remotes, self.remotes, env_fns)]
         else:
             self.ps = [Process(target=worker, args=(work_remote, remote, CloudpickleWrapper(env_fn),
-                                                    env_seed + ith_remote * in_series))
-                       for (ith_remote, work_remote, remote, env_fn) in zip(
-                    range(self.n_remotes), self.work_remotes, self.remotes, env_fns)]
-        for p in self.ps:
+                                                    env_seed + offset))
+                       for (offset, work_remote, remote, env_fn) in zip(
+                    env_offsets, self.work_remotes, self.remotes, env_fns)]
+        self.env_splits = np.cumsum([len(env_fn) for env_fn in env_fns])[:-1]
+        learner_cpus, worker_cpus = worker_placement(self.n_remotes, learner_cores)
+        for p, cpus in zip(self.ps, worker_cpus):
             p.daemon = True  # if the main process crashes, we should not cause things to hang
-            with clear_mpi_env_vars():
+            with clear_mpi_env_vars(num_threads=worker_threads, cpus=cpus if worker_affinity else None):
                 p.start()
+        if worker_affinity:
+            reserve_learner_cpus(learner_cpus)
         for remote in self.work_remotes:
             remote.close()
 
@@ -98,15 +112,18 @@ class SubprocVecEnv(VecEnv):
         self._assert_not_closed()
         for remote in self.remotes:
             remote.send(('reset', None))
-        result = [remote.recv() for remote in self.remotes]
-        result = flatten_list(result)
-        obs, info = zip(*result)
-        self.buf_obs = np.array(obs)
-        return np.array(obs), list(info)
+        obs, info = zip(*[remote.recv() for remote in self.remotes])
+        self.buf_obs = self._concat_obs(obs)
+        return self.buf_obs, flatten_list(info)
+
+    def _concat_obs(self, obs):
+        if isinstance(obs[0], dict):
+            return {k: np.concatenate([o[k] for o in obs]) for k in obs[0].keys()}
+        return np.concatenate(obs)
 
     def step_async(self, actions):
         self._assert_not_closed()
-        actions = np.array_split(actions, self.n_remotes)
+        actions = np.split(actions, self.env_splits)
         for remote, action in zip(self.remotes, actions):
             remote.send(('step', action))
         self.waiting = True
@@ -114,11 +131,11 @@ class SubprocVecEnv(VecEnv):
     def step_wait(self):
         self._assert_not_closed()
         results = [remote.recv() for remote in self.remotes]
-        results = flatten_list(results)
         self.waiting = False
         obs, rewards, terminated, truncated, info = zip(*results)
-        self.buf_obs = np.array(obs)
-        return np.array(obs), np.array(rewards), np.array(terminated), np.array(truncated), list(info)
+        self.buf_obs = self._concat_obs(obs)
+        return (self.buf_obs, np.concatenate(rewards), np.concatenate(terminated), np.concatenate(truncated),
+                flatten_list(info))
 
     def close_extras(self):
         self.closed = True
@@ -147,6 +164,6 @@ class SubprocVecEnv(VecEnv):
 
 
 class SubprocVecEnv_Atari(SubprocVecEnv):
-    def __init__(self, env_fns, env_seed):
-        super(SubprocVecEnv_Atari, self).__init__(env_fns, env_seed)
+    def __init__(self, env_fns, env_seed, in_series=1, **kwargs):
+        super(SubprocVecEnv_Atari, self).__init__(env_fns, env_seed, in_series, **kwargs)
         self.buf_obs = np.zeros(combined_shape(self.num_envs, self.obs_shape), dtype=np.uint8)
@@ -1,11 +1,14 @@
+import copy
 import numpy as np
 import multiprocessing as mp
 from xuance.common import space2shape
 from xuance.environment.vector_envs.vector_env import VecEnv
-from xuance.environment.vector_envs import clear_mpi_env_vars, flatten_list, CloudpickleWrapper
+from xuance.environment.vector_envs import clear_mpi_env_vars, worker_placement, reserve_learner_cpus, \
+    set_worker_threads, split_env_fns, stack_dicts, unstack_dicts, stack_infos, stack_step_results, \
+    concatenate_dicts, flatten_list, CloudpickleWrapper
 
 
-def worker(remote, parent_remote, env_fn_wrappers, env_seed: int = None):
+def worker(remote, parent_remote, env_fn_wrappers, env_seed: int = None, array_batches: bool = False):
     def step_env(env, action):
         obs, reward_n, terminated, truncated, info = env.step(action)
         if all(terminated.values()) or truncated:
@@ -16,6 +19,7 @@ def worker(remote, parent_remote, env_fn_wrappers, env_seed: int = None):
         return obs, reward_n, terminated, truncated, info
 
     parent_remote.close()
+    set_worker_threads()
     if env_seed is None:
         envs = [env_fn_wrapper() for env_fn_wrapper in env_fn_wrappers.x]
     else:
@@ -25,9 +29,17 @@ def worker(remote, parent_remote, env_fn_wrappers, env_seed: int = None):
         while True:
             cmd, data = remote.recv()
             if cmd == 'step':
-                remote.send([step_env(env, action) for env, action in zip(envs, data)])
+                if array_batches:  # The actions are {agent_key: ndarray[n_envs, ...]}, the info is stacked too.
+                    data = unstack_dicts(data, len(envs))
+                    remote.send(stack_step_results([step_env(env, a) for env, a in zip(envs, data)]))
+                    continue
+                # Stack the per-agent results of all envs in this worker, so that one message carries a few arrays.
+                obs, rewards, terminated, truncated, info = zip(*[step_env(env, a) for env, a in zip(envs, data)])
+                remote.send((stack_dicts(obs), stack_dicts(rewards), stack_dicts(terminated), np.array(truncated),
+                             info))
             elif cmd == 'reset':
-                remote.send([env.reset() for env in envs])
+                obs, info = zip(*[env.reset() for env in envs])
+                remote.send((stack_dicts(obs), stack_infos(info) if array_batches else info))
             elif cmd == 'render':
                 remote.send([env.render(data) for env in envs])
             elif cmd == 'close':
@@ -55,36 +67,45 @@ class SubprocVecMultiAgentEnv(VecEnv):
     Recommended to use when num_envs > 1 and step() can be a bottleneck.
     """
 
-    def __init__(self, env_fns, env_seed, context='spawn', in_series=1):
+    def __init__(self, env_fns, env_seed, context='spawn', in_series=1,
+                 worker_threads=1, worker_affinity=False, learner_cores=0, array_batches=False):
         """
         Arguments:
         env_fns: iterable of callables -  functions that create environments to run in subprocesses. Need to be cloud-pickleable
-        in_series: number of environments to run in series in a single process
+        in_series: number of environments to run in series in a single process, or "auto" to use os.cpu_count() processes
         (e.g. when len(env_fns) == 12 and in_series == 3, it will run 4 processes, each running 3 envs in series)
+        worker_threads: number of OpenMP/MKL/torch threads of each worker process, None keeps the parent's settings
+        worker_affinity: whether to pin each worker process to its own cores
+        learner_cores: number of cores reserved for the learner (this process) when worker_affinity is True
+        array_batches: whether to return the per-agent values of all envs as {agent_key: ndarray[n_envs, ...]} and the
+        information as a dict of arrays, instead of lists of per-env dicts
         """
         self.waiting = False
+        self.array_batches = array_batches
         self.closed = False
         self.in_series = in_series
         num_envs = len(env_fns)
-        assert num_envs % in_series == 0, "Number of envs must be divisible by number of envs to run in series"
-        self.n_remotes = num_envs // in_series
-        env_fns = np.array_split(env_fns, self.n_remotes)
+        env_fns, env_offsets = split_env_fns(env_fns, in_series)
+        self.n_remotes = len(env_fns)
+        self.env_splits = np.cumsum([len(env_fn) for env_fn in env_fns])[:-1]
         ctx = mp.get_context(context)
         self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(self.n_remotes)])
-        self.ps = [ctx.Process(target=worker, args=(work_remote, remote, CloudpickleWrapper(env_fn)))
-                   for (work_remote, remote, env_fn) in zip(self.work_remotes, self.remotes, env_fns)]
         if env_seed is None:
-            self.ps = [ctx.Process(target=worker, args=(work_remote, remote, CloudpickleWrapper(env_fn)))
+            self.ps = [ctx.Process(target=worker, args=(work_remote, remote, CloudpickleWrapper(env_fn), None,
+                                                        array_batches))
                        for (work_remote, remote, env_fn) in zip(self.work_remotes, self.remotes, env_fns)]
         else:
             self.ps = [ctx.Process(target=worker, args=(work_remote, remote, CloudpickleWrapper(env_fn),
-                                                        env_seed + ith_remote * in_series))
-                       for (ith_remote, work_remote, remote, env_fn) in zip(
-                    range(self.n_remotes), self.work_remotes, self.remotes, env_fns)]
-        for p in self.ps:
+                                                        env_seed + offset, array_batches))
+                       for (offset, work_remote, remote, env_fn) in zip(
+                    env_offsets, self.work_remotes, self.remotes, env_fns)]
+        learner_cpus, worker_cpus = worker_placement(self.n_remotes, learner_cores)
+        for p, cpus in zip(self.ps, worker_cpus):
             p.daemon = True  # if the main process crashes, we should not cause things to hang
-            with clear_mpi_env_vars():
+            with clear_mpi_env_vars(num_threads=worker_threads, cpus=cpus if worker_affinity else None):
                 p.start()
+        if worker_affinity:
+            reserve_learner_cpus(learner_cpus)
         for remote in self.work_remotes:
             remote.close()
 
@@ -109,27 +130,52 @@ class SubprocVecMultiAgentEnv(VecEnv):
         self._assert_not_closed()
         for remote in self.remotes:
             remote.send(('reset', None))
-        result = [remote.recv() for remote in self.remotes]
-        result = flatten_list(result)
-        obs, info = zip(*result)
+        obs, info = zip(*[remote.recv() for remote in self.remotes])
+        if self.array_batches:
+            obs, info = concatenate_dicts(obs), concatenate_dicts(info)
+            self._set_array_buffers(obs, info)
+            return obs, info
+        obs, info = self._unstack(obs), flatten_list(info)
         self.buf_obs = list(obs)
         self.buf_state = [info[e]['state'] for e in range(self.num_envs)]
         self.buf_avail_actions = [info[e]['avail_actions'] for e in range(self.num_envs)]
         return list(obs), list(info)
 
+    def _set_array_buffers(self, obs, info):
+        """Keeps copies of the arrays, so that the returned ones are not changed when the buffers are written."""
+        self.buf_obs, self.buf_state = copy.deepcopy(obs), info['state'].copy()
+        self.buf_avail_actions = copy.deepcopy(info['avail_actions'])
+
+    def _unstack(self, batches):
+        """Splits the stacked results of the workers into a list of per-env dicts."""
+        return [item for batch in batches for item in unstack_dicts(batch, len(next(iter(batch.values()))))]
+
+    def _recv_step(self):
+        results = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        obs, rewards, terminated, truncated, info = zip(*results)
+        if self.array_batches:
+            return tuple(concatenate_dicts(batches) for batches in (obs, rewards, terminated, truncated, info))
+        return (self._unstack(obs), self._unstack(rewards), self._unstack(terminated), np.concatenate(truncated),
+                flatten_list(info))
+
     def step_async(self, actions):
         self._assert_not_closed()
-        actions = np.array_split(actions, self.n_remotes)
+        if self.array_batches:
+            actions = [{k: v[start:end] for k, v in actions.items()}
+                       for start, end in zip([0, *self.env_splits], [*self.env_splits, self.num_envs])]
+        else:
+            actions = np.split(np.array(actions, dtype=object), self.env_splits)
         for remote, action in zip(self.remotes, actions):
             remote.send(('step', action))
         self.waiting = True
 
     def step_wait(self):
         self._assert_not_closed()
-        results = [remote.recv() for remote in self.remotes]
-        results = flatten_list(results)
-        self.waiting = False
-        obs, rewards, terminated, truncated, info = zip(*results)
+        obs, rewards, terminated, truncated, info = self._recv_step()
+        if self.array_batches:
+            self._set_array_buffers(obs, info)
+            return obs, rewards, terminated, truncated, info
         self.buf_obs = list(obs)
         self.buf_state = [info[e]['state'] for e in range(self.num_envs)]
         self.buf_avail_actions = [info[e]['avail_actions'] for e in range(self.num_envs)]
@@ -162,8 +208,10 @@ class SubprocVecMultiAgentEnv(VecEnv):
 
 
 class SubprocVecEnv_StarCraft2(SubprocVecMultiAgentEnv):
-    def __init__(self, env_fns, env_seed, context='spawn', in_series=1):
-        super(SubprocVecEnv_StarCraft2, self).__init__(env_fns, env_seed, context, in_series)
+    def __init__(self, env_fns, env_seed, context='spawn', in_series=1, **kwargs):
+        if kwargs.get("array_batches", False):
+            raise AttributeError("The StarCraft2 environments do not support array batches.")
+        super(SubprocVecEnv_StarCraft2, self).__init__(env_fns, env_seed, context, in_series, **kwargs)
         self.num_enemies = self.env_info['num_enemies']
         self.battles_game = np.zeros(self.num_envs, np.int32)
         self.battles_won = np.zeros(self.num_envs, np.int32)
@@ -172,10 +220,7 @@ class SubprocVecEnv_StarCraft2(SubprocVecMultiAgentEnv):
 
     def step_wait(self):
         self._assert_not_closed()
-        results = [remote.recv() for remote in self.remotes]
-        results = flatten_list(results)
-        self.waiting = False
-        obs, rewards, terminated, truncated, info = zip(*results)
+        obs, rewards, terminated, truncated, info = self._recv_step()
         self.buf_obs = list(obs)
         self.buf_state = [info[e]['state'] for e in range(self.num_envs)]
         self.buf_avail_actions = [info[e]['avail_actions'] for e in range(self.num_envs)]
@@ -191,18 +236,17 @@ class SubprocVecEnv_StarCraft2(SubprocVecMultiAgentEnv):
 
 
 class SubprocVecEnv_Football(SubprocVecMultiAgentEnv):
-    def __init__(self, env_fns, env_seed, context='spawn', in_series=1):
-        super(SubprocVecEnv_Football, self).__init__(env_fns, env_seed, context, in_series)
+    def __init__(self, env_fns, env_seed, context='spawn', in_series=1, **kwargs):
+        if kwargs.get("array_batches", False):
+            raise AttributeError("The Football environments do not support array batches.")
+        super(SubprocVecEnv_Football, self).__init__(env_fns, env_seed, context, in_series, **kwargs)
         self.num_adversaries = self.env_info['num_adversaries']
         self.battles_game = np.zeros(self.num_envs, np.int32)
         self.battles_won = np.zeros(self.num_envs, np.int32)
 
     def step_wait(self):
         self._assert_not_closed()
-        results = [remote.recv() for remote in self.remotes]
-        results = flatten_list(results)
-        self.waiting = False
-        obs, rewards, terminated, truncated, info = zip(*results)
+        obs, rewards, terminated, truncated, info = self._recv_step()
         self.buf_obs = list(obs)
         self.buf_state = [info[e]['state'] for e in range(self.num_envs)]
         self.buf_avail_actions = [info[e]['avail_actions'] for e in range(self.num_envs)]
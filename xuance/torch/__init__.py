@@ -1,15 +1,22 @@
 from torch import Tensor
 from torch.nn import Module, ModuleDict
 from torch.nn.parallel import DistributedDataParallel
-from xuance.torch.representations import REGISTRY_Representation
-from xuance.torch.policies import REGISTRY_Policy
-from xuance.torch.learners import REGISTRY_Learners
-from xuance.torch.agents import REGISTRY_Agents
+from xuance.common.registry_tools import lazy_attributes
+
+# The registries are imported on first access, so that only the requested algorithm modules are loaded.
+__getattr__ = lazy_attributes(__name__, {
+    "REGISTRY_Representation": ".representations",
+    "REGISTRY_Policy": ".policies",
+    "REGISTRY_Learners": ".learners",
+    "REGISTRY_Agents": ".agents",
+    "REGISTRY_Communicator": ".communications",
+})
 
 __all__ = [
     "Tensor",
     "Module",
     "ModuleDict",
     "DistributedDataParallel",
-    "REGISTRY_Representation", "REGISTRY_Policy", "REGISTRY_Learners", "REGISTRY_Agents"
+    "REGISTRY_Representation", "REGISTRY_Policy", "REGISTRY_Learners", "REGISTRY_Agents",
+    "REGISTRY_Communicator",
 ]
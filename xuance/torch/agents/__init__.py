@@ -1,95 +1,104 @@
-from .base import Agent, MARLAgents, RandomAgents
-from .core import OnPolicyAgent, OffPolicyAgent, OffPolicyMARLAgents, OnPolicyMARLAgents
+from xuance.common.registry_tools import LazyRegistry, lazy_attributes
 
-'''Single-Agent Reinforcement Learning algorithms'''
-from .policy_gradient import PG_Agent
-from .policy_gradient import A2C_Agent
-from .policy_gradient import PPOCLIP_Agent
-from .policy_gradient import PPOKL_Agent
-from .policy_gradient import PPG_Agent
-from .policy_gradient import DDPG_Agent
-from .policy_gradient import TD3_Agent
-from .policy_gradient import PDQN_Agent
-from .policy_gradient import MPDQN_Agent
-from .policy_gradient import SPDQN_Agent
-from .policy_gradient import SAC_Agent
-from .policy_gradient import NPG_Agent
-from .qlearning_family import DQN_Agent
-from .qlearning_family import DuelDQN_Agent
-from .qlearning_family import DDQN_Agent
-from .qlearning_family import NoisyDQN_Agent
-from .qlearning_family import C51_Agent
-from .qlearning_family import QRDQN_Agent
-from .qlearning_family import PerDQN_Agent
-from .qlearning_family import DRQN_Agent
-
-'''Multi-Agent Reinforcement Learning Algorithms'''
-from .multi_agent_rl import IQL_Agents
-from .multi_agent_rl import VDN_Agents
-from .multi_agent_rl import QMIX_Agents
-from .multi_agent_rl import WQMIX_Agents
-from .multi_agent_rl import QTRAN_Agents
-from .multi_agent_rl import DCG_Agents
-from .multi_agent_rl import IAC_Agents
-from .multi_agent_rl import VDAC_Agents
-from .multi_agent_rl import COMA_Agents
-from .multi_agent_rl import IC3Net_Agents
-from .multi_agent_rl import IDDPG_Agents
-from .multi_agent_rl import MADDPG_Agents
-from .multi_agent_rl import MFQ_Agents
-from .multi_agent_rl import MFAC_Agents
-from .multi_agent_rl import IPPO_Agents
-from .multi_agent_rl import MAPPO_Agents
-from .multi_agent_rl import ISAC_Agents
-from .multi_agent_rl import MASAC_Agents
-from .multi_agent_rl import MATD3_Agents
+# Maps each member to the module that defines it, the module is imported on first access.
+_members = {
+    "Agent": ".base",
+    "MARLAgents": ".base",
+    "RandomAgents": ".base",
+    "OnPolicyAgent": ".core",
+    "OffPolicyAgent": ".core",
+    "OffPolicyMARLAgents": ".core",
+    "OnPolicyMARLAgents": ".core",
+    # Single-Agent Reinforcement Learning algorithms
+    "PG_Agent": ".policy_gradient",
+    "A2C_Agent": ".policy_gradient",
+    "PPOCLIP_Agent": ".policy_gradient",
+    "PPOKL_Agent": ".policy_gradient",
+    "PPG_Agent": ".policy_gradient",
+    "DDPG_Agent": ".policy_gradient",
+    "TD3_Agent": ".policy_gradient",
+    "PDQN_Agent": ".policy_gradient",
+    "MPDQN_Agent": ".policy_gradient",
+    "SPDQN_Agent": ".policy_gradient",
+    "SAC_Agent": ".policy_gradient",
+    "NPG_Agent": ".policy_gradient",
+    "DQN_Agent": ".qlearning_family",
+    "DuelDQN_Agent": ".qlearning_family",
+    "DDQN_Agent": ".qlearning_family",
+    "NoisyDQN_Agent": ".qlearning_family",
+    "C51_Agent": ".qlearning_family",
+    "QRDQN_Agent": ".qlearning_family",
+    "PerDQN_Agent": ".qlearning_family",
+    "DRQN_Agent": ".qlearning_family",
+    # Multi-Agent Reinforcement Learning Algorithms
+    "IQL_Agents": ".multi_agent_rl",
+    "VDN_Agents": ".multi_agent_rl",
+    "QMIX_Agents": ".multi_agent_rl",
+    "WQMIX_Agents": ".multi_agent_rl",
+    "QTRAN_Agents": ".multi_agent_rl",
+    "DCG_Agents": ".multi_agent_rl",
+    "IAC_Agents": ".multi_agent_rl",
+    "VDAC_Agents": ".multi_agent_rl",
+    "COMA_Agents": ".multi_agent_rl",
+    "IC3Net_Agents": ".multi_agent_rl",
+    "IDDPG_Agents": ".multi_agent_rl",
+    "MADDPG_Agents": ".multi_agent_rl",
+    "MFQ_Agents": ".multi_agent_rl",
+    "MFAC_Agents": ".multi_agent_rl",
+    "IPPO_Agents": ".multi_agent_rl",
+    "MAPPO_Agents": ".multi_agent_rl",
+    "ISAC_Agents": ".multi_agent_rl",
+    "MASAC_Agents": ".multi_agent_rl",
+    "MATD3_Agents": ".multi_agent_rl",
+}
 
-REGISTRY_Agents = {
-    "PG": PG_Agent,
-    "A2C": A2C_Agent,
-    "PPO_Clip": PPOCLIP_Agent,
-    "PPO_KL": PPOKL_Agent,
-    "PPG": PPG_Agent,
-    "DDPG": DDPG_Agent,
-    "SAC": SAC_Agent,
-    "TD3": TD3_Agent,
-    "DQN": DQN_Agent,
-    "Duel_DQN": DuelDQN_Agent,
-    "DDQN": DDQN_Agent,
-    "NoisyDQN": NoisyDQN_Agent,
-    "PerDQN": PerDQN_Agent,
-    "C51DQN": C51_Agent,
-    "QRDQN": QRDQN_Agent,
-    "PDQN": PDQN_Agent,
-    "MPDQN": MPDQN_Agent,
-    "SPDQN": SPDQN_Agent,
-    "DRQN": DRQN_Agent,
-    "NPG": NPG_Agent,
+__getattr__ = lazy_attributes(__name__, _members)
 
-    "RANDOM": RandomAgents,
-    "IQL": IQL_Agents,
-    "VDN": VDN_Agents,
-    "QMIX": QMIX_Agents,
-    "CWQMIX": WQMIX_Agents,
-    "OWQMIX": WQMIX_Agents,
-    "QTRAN_base": QTRAN_Agents,
-    "QTRAN_alt": QTRAN_Agents,
-    "DCG": DCG_Agents,
-    "DCG_S": DCG_Agents,
-    "IAC": IAC_Agents,
-    "VDAC": VDAC_Agents,
-    "COMA": COMA_Agents,
-    "IC3Net": IC3Net_Agents,
-    "IDDPG": IDDPG_Agents,
-    "MADDPG": MADDPG_Agents,
-    "MFQ": MFQ_Agents,
-    "MFAC": MFAC_Agents,
-    "IPPO": IPPO_Agents,
-    "MAPPO": MAPPO_Agents,
-    "ISAC": ISAC_Agents,
-    "MASAC": MASAC_Agents,
-    "MATD3": MATD3_Agents,
-}
+REGISTRY_Agents = LazyRegistry({
+    "PG": "xuance.torch.agents.policy_gradient:PG_Agent",
+    "A2C": "xuance.torch.agents.policy_gradient:A2C_Agent",
+    "PPO_Clip": "xuance.torch.agents.policy_gradient:PPOCLIP_Agent",
+    "PPO_KL": "xuance.torch.agents.policy_gradient:PPOKL_Agent",
+    "PPG": "xuance.torch.agents.policy_gradient:PPG_Agent",
+    "DDPG": "xuance.torch.agents.policy_gradient:DDPG_Agent",
+    "SAC": "xuance.torch.agents.policy_gradient:SAC_Agent",
+    "TD3": "xuance.torch.agents.policy_gradient:TD3_Agent",
+    "DQN": "xuance.torch.agents.qlearning_family:DQN_Agent",
+    "Duel_DQN": "xuance.torch.agents.qlearning_family:DuelDQN_Agent",
+    "DDQN": "xuance.torch.agents.qlearning_family:DDQN_Agent",
+    "NoisyDQN": "xuance.torch.agents.qlearning_family:NoisyDQN_Agent",
+    "PerDQN": "xuance.torch.agents.qlearning_family:PerDQN_Agent",
+    "C51DQN": "xuance.torch.agents.qlearning_family:C51_Agent",
+    "QRDQN": "xuance.torch.agents.qlearning_family:QRDQN_Agent",
+    "PDQN": "xuance.torch.agents.policy_gradient:PDQN_Agent",
+    "MPDQN": "xuance.torch.agents.policy_gradient:MPDQN_Agent",
+    "SPDQN": "xuance.torch.agents.policy_gradient:SPDQN_Agent",
+    "DRQN": "xuance.torch.agents.qlearning_family:DRQN_Agent",
+    "NPG": "xuance.torch.agents.policy_gradient:NPG_Agent",
+    "RANDOM": "xuance.torch.agents.base:RandomAgents",
+    "IQL": "xuance.torch.agents.multi_agent_rl:IQL_Agents",
+    "VDN": "xuance.torch.agents.multi_agent_rl:VDN_Agents",
+    "QMIX": "xuance.torch.agents.multi_agent_rl:QMIX_Agents",
+    "CWQMIX": "xuance.torch.agents.multi_agent_rl:WQMIX_Agents",
+    "OWQMIX": "xuance.torch.agents.multi_agent_rl:WQMIX_Agents",
+    "QTRAN_base": "xuance.torch.agents.multi_agent_rl:QTRAN_Agents",
+    "QTRAN_alt": "xuance.torch.agents.multi_agent_rl:QTRAN_Agents",
+    "DCG": "xuance.torch.agents.multi_agent_rl:DCG_Agents",
+    "DCG_S": "xuance.torch.agents.multi_agent_rl:DCG_Agents",
+    "IAC": "xuance.torch.agents.multi_agent_rl:IAC_Agents",
+    "VDAC": "xuance.torch.agents.multi_agent_rl:VDAC_Agents",
+    "COMA": "xuance.torch.agents.multi_agent_rl:COMA_Agents",
+    "IC3Net": "xuance.torch.agents.multi_agent_rl:IC3Net_Agents",
+    "IDDPG": "xuance.torch.agents.multi_agent_rl:IDDPG_Agents",
+    "MADDPG": "xuance.torch.agents.multi_agent_rl:MADDPG_Agents",
+    "MFQ": "xuance.torch.agents.multi_agent_rl:MFQ_Agents",
+    "MFAC": "xuance.torch.agents.multi_agent_rl:MFAC_Agents",
+    "IPPO": "xuance.torch.agents.multi_agent_rl:IPPO_Agents",
+    "MAPPO": "xuance.torch.agents.multi_agent_rl:MAPPO_Agents",
+    "ISAC": "xuance.torch.agents.multi_agent_rl:ISAC_Agents",
+    "MASAC": "xuance.torch.agents.multi_agent_rl:MASAC_Agents",
+    "MATD3": "xuance.torch.agents.multi_agent_rl:MATD3_Agents",
+})
 
 __all__ = [
     "Agent", "MARLAgents", "RandomAgents",
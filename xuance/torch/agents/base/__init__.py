@@ -1,4 +1,12 @@
-from .agent import Agent
-from .agents_marl import MARLAgents, RandomAgents
+from xuance.common.registry_tools import lazy_attributes
+
+# Maps each member to the module that defines it, the module is imported on first access.
+_members = {
+    "Agent": ".agent",
+    "MARLAgents": ".agents_marl",
+    "RandomAgents": ".agents_marl",
+}
+
+__getattr__ = lazy_attributes(__name__, _members)
 
 __all__ = ["Agent", "MARLAgents", "RandomAgents"]
@@ -1,20 +1,19 @@
 import os
 import torch
-import wandb
 import socket
 import numpy as np
 import torch.distributed as dist
 from abc import ABC
 from pathlib import Path
 from argparse import Namespace
-from mpi4py import MPI
-from gym.spaces import Dict, Space
+from gym.spaces import Space
 from torch.utils.tensorboard import SummaryWriter
 from torch.distributed import destroy_process_group
-from xuance.common import get_time_string, create_directory, RunningMeanStd, space2shape, EPS, Optional, Union
+from xuance.common import get_time_string, create_directory, space2shape, EPS, Optional, Union
 from xuance.environment import DummyVecEnv, SubprocVecEnv
 from xuance.torch import REGISTRY_Representation, REGISTRY_Learners, Module
-from xuance.torch.utils import nn, NormalizeFunctions, ActivationFunctions, init_distributed_mode
+from xuance.torch.utils import nn, NormalizeFunctions, ActivationFunctions, RunningNorm, MetricsAccumulator, \
+    init_distributed_mode
 
 
 class Agent(ABC):
@@ -24,6 +23,8 @@ class Agent(ABC):
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
     """
+    # Whether the train loop of the agents runs the asynchronous learner (use_async_learner), see OffPolicyAgent.
+    supports_async_learner = False
 
     def __init__(self,
                  config: Namespace,
@@ -32,12 +33,19 @@ class Agent(ABC):
         self.config = config
         self.use_rnn = config.use_rnn if hasattr(config, "use_rnn") else False
         self.use_actions_mask = config.use_actions_mask if hasattr(config, "use_actions_mask") else False
+        use_async_learner = config.use_async_learner if hasattr(config, "use_async_learner") else False
+        if use_async_learner and not self.supports_async_learner:
+            raise AttributeError(f"{type(self).__name__} does not support the asynchronous learner "
+                                 f"(use_async_learner).")
         self.distributed_training = config.distributed_training
         if self.distributed_training:
             self.world_size = int(os.environ['WORLD_SIZE'])
             self.rank = int(os.environ['RANK'])
+            if torch.device(config.device).type == "cuda":
+                config.device = f"cuda:{os.environ['LOCAL_RANK']}"  # One GPU per process.
             master_port = config.master_port if hasattr(config, "master_port") else None
-            init_distributed_mode(master_port=master_port)
+            backend = config.distributed_backend if hasattr(config, "distributed_backend") else None
+            init_distributed_mode(master_port=master_port, backend=backend, device=config.device)
         else:
             self.world_size = 1
             self.rank = 0
@@ -61,25 +69,27 @@ class Agent(ABC):
         self.current_episode = np.zeros((self.n_envs,), np.int32)
 
         # Set normalizations for observations and rewards.
-        self.comm = MPI.COMM_WORLD
-        self.obs_rms = RunningMeanStd(shape=space2shape(self.observation_space), comm=self.comm, use_mpi=False)
-        self.ret_rms = RunningMeanStd(shape=(), comm=self.comm, use_mpi=False)
+        norm_dtype = getattr(torch, config.norm_dtype) if hasattr(config, "norm_dtype") else torch.float64
         self.use_obsnorm = config.use_obsnorm
         self.use_rewnorm = config.use_rewnorm
+        self.obs_rms = RunningNorm(shape=space2shape(self.observation_space), dtype=norm_dtype, device=self.device,
+                                   distributed=self.distributed_training and self.use_obsnorm)
+        self.ret_rms = RunningNorm(shape=(), dtype=norm_dtype, device=self.device,
+                                   distributed=self.distributed_training and self.use_rewnorm)
         self.obsnorm_range = config.obsnorm_range
         self.rewnorm_range = config.rewnorm_range
         self.returns = np.zeros((self.envs.num_envs,), np.float32)
 
+        # Learner metrics are kept on the device and written once per logging interval.
+        self.metrics = MetricsAccumulator(config.metrics_reduce if hasattr(config, "metrics_reduce") else ["mean"])
+        self.log_interval = config.log_interval if hasattr(config, "log_interval") else 1
+        self.next_log_step, self.last_log_step = 0, 0
+
         # Prepare directories.
         if self.distributed_training and self.world_size > 1:
-            if self.rank == 0:
-                time_string = get_time_string()
-                time_string_tensor = torch.tensor(list(time_string.encode('utf-8')), dtype=torch.uint8).to(self.rank)
-            else:
-                time_string_tensor = torch.zeros(16, dtype=torch.uint8).to(self.rank)
-
-            dist.broadcast(time_string_tensor, src=0)
-            time_string = bytes(time_string_tensor.cpu().tolist()).decode('utf-8').rstrip('\x00')
+            time_string = [get_time_string() if self.rank == 0 else None]
+            dist.broadcast_object_list(time_string, src=0)
+            time_string = time_string[0]
         else:
             time_string = get_time_string()
         seed = f"seed_{self.config.seed}_"
@@ -97,6 +107,7 @@ class Agent(ABC):
             self.writer = SummaryWriter(log_dir)
             self.use_wandb = False
         elif config.logger == "wandb":
+            import wandb
             config_dict = vars(config)
             log_dir = config.log_dir
             wandb_dir = Path(os.path.join(os.getcwd(), config.log_dir))
@@ -140,10 +151,7 @@ class Agent(ABC):
         # save the observation status
         if self.use_obsnorm:
             obs_norm_path = os.path.join(self.model_dir_save, "obs_rms.npy")
-            observation_stat = {'count': self.obs_rms.count,
-                                'mean': self.obs_rms.mean,
-                                'var': self.obs_rms.var}
-            np.save(obs_norm_path, observation_stat)
+            np.save(obs_norm_path, self.obs_rms.get_statistics())
 
     def load_model(self, path, model=None):
         # load neural networks
@@ -153,18 +161,25 @@ class Agent(ABC):
             obs_norm_path = os.path.join(path_loaded, "obs_rms.npy")
             if os.path.exists(obs_norm_path):
                 observation_stat = np.load(obs_norm_path, allow_pickle=True).item()
-                self.obs_rms.count = observation_stat['count']
-                self.obs_rms.mean = observation_stat['mean']
-                self.obs_rms.var = observation_stat['var']
+                self.obs_rms.set_statistics(**observation_stat)
             else:
                 raise RuntimeError(f"Failed to load observation status file 'obs_rms.npy' from {obs_norm_path}!")
 
     def log_infos(self, info: dict, x_index: int):
         """
-        info: (dict) information to be visualized
+        info: (dict) information to be visualized, tensor values are accumulated and written every log_interval
         n_steps: current step
         """
+        info = self.metrics.record(info)
+        if len(self.metrics) and x_index >= self.next_log_step:
+            info.update(self.metrics.reduce())
+            self.next_log_step = x_index + self.log_interval
+        self.last_log_step = x_index
+        self._write_infos(info, x_index)
+
+    def _write_infos(self, info: dict, x_index: int):
         if self.use_wandb:
+            import wandb
             for k, v in info.items():
                 if v is None:
                     continue
@@ -180,6 +195,7 @@ class Agent(ABC):
 
     def log_videos(self, info: dict, fps: int, x_index: int = 0):
         if self.use_wandb:
+            import wandb
             for k, v in info.items():
                 if v is None:
                     continue
@@ -190,27 +206,94 @@ class Agent(ABC):
                     continue
                 self.writer.add_video(k, v, fps=fps, global_step=x_index)
 
-    def _process_observation(self, observations):
+    def _normalize_observation(self, observations):
+        """Normalizes the observations with use_obsnorm, and keeps them on the device for the policy.
+
+        Parameters:
+            observations: The batch of observations returned by the vectorized environments.
+
+        Returns:
+            observations: The normalized observations as tensors on the device, or the observations as they are without
+                use_obsnorm. Only the observations stored in the memory are copied back with _observations_to_numpy.
+        """
         if self.use_obsnorm:
-            if isinstance(self.observation_space, Dict):
-                for key in self.observation_space.spaces.keys():
-                    observations[key] = np.clip(
-                        (observations[key] - self.obs_rms.mean[key]) / (self.obs_rms.std[key] + EPS),
-                        -self.obsnorm_range, self.obsnorm_range)
-            else:
-                observations = np.clip((observations - self.obs_rms.mean) / (self.obs_rms.std + EPS),
-                                       -self.obsnorm_range, self.obsnorm_range)
-            return observations
+            return self.obs_rms.normalize(observations, self.obsnorm_range, EPS)
         else:
             return observations
 
+    def _observations_to_numpy(self, observations):
+        if isinstance(observations, dict):
+            return {key: self._observations_to_numpy(value) for key, value in observations.items()}
+        return observations.cpu().numpy() if isinstance(observations, torch.Tensor) else observations
+
+    def _process_observation(self, observations):
+        return self._observations_to_numpy(self._normalize_observation(observations))
+
     def _process_reward(self, rewards):
         if self.use_rewnorm:
-            std = np.clip(self.ret_rms.std, 0.1, 100)
-            return np.clip(rewards / std, -self.rewnorm_range, self.rewnorm_range)
+            return self.ret_rms.scale(rewards, self.rewnorm_range).cpu().numpy()
         else:
             return rewards
 
+    def _copy_observations(self, observations, copy_arrays: bool = False):
+        """Copies the observations that share their memory with the buffers of the vectorized environments.
+
+        DummyVecEnv returns a shallow copy of its buffer, so the arrays of Dict observations are written in place by the
+        next step. The Box observations returned by step() are fresh arrays and are only copied with copy_arrays, e.g.,
+        when the observations are the buffer itself.
+
+        Parameters:
+            observations: The batch of observations returned by the vectorized environments, or their buffer.
+            copy_arrays (bool): Whether to copy the Box observations as well.
+
+        Returns:
+            observations: The observations that are not changed by the next step of the environments.
+        """
+        if isinstance(observations, dict):
+            return {key: value.copy() for key, value in observations.items()}
+        return observations.copy() if copy_arrays else observations
+
+    def _reset_observations(self, observations, env_ids: np.ndarray, infos: list):
+        """Writes the reset observations of the finished environments into the observations and the envs' buffer.
+
+        Parameters:
+            observations: The batch of next observations returned by the vectorized environments.
+            env_ids (np.ndarray): The indexes of environments that have been reset.
+            infos (list): The information returned by the vectorized environments.
+
+        Returns:
+            observations: The observations for the next step.
+        """
+        if len(env_ids) == 0:
+            return observations
+        if isinstance(observations, dict):
+            for key in observations.keys():
+                observations[key][env_ids] = np.stack([infos[i]["reset_obs"][key] for i in env_ids])
+                self.envs.buf_obs[key][env_ids] = observations[key][env_ids]
+        else:
+            observations[env_ids] = np.stack([infos[i]["reset_obs"] for i in env_ids])
+            self.envs.buf_obs[env_ids] = observations[env_ids]
+        return observations
+
+    def _episode_info(self, env_ids: np.ndarray, infos: list) -> dict:
+        """Collects the episode steps and scores of all finished environments into one logging dict.
+
+        Parameters:
+            env_ids (np.ndarray): The indexes of environments that have finished an episode.
+            infos (list): The information returned by the vectorized environments.
+
+        Returns:
+            episode_info (dict): The information to be logged.
+        """
+        if self.use_wandb:
+            episode_info = {}
+            for i in env_ids:
+                episode_info[f"Episode-Steps/rank_{self.rank}/env-{i}"] = infos[i]["episode_step"]
+                episode_info[f"Train-Episode-Rewards/rank_{self.rank}/env-{i}"] = infos[i]["episode_score"]
+            return episode_info
+        return {f"Episode-Steps/rank_{self.rank}": {f"env-{i}": infos[i]["episode_step"] for i in env_ids},
+                f"Train-Episode-Rewards/rank_{self.rank}": {f"env-{i}": infos[i]["episode_score"] for i in env_ids}}
+
     def _build_representation(self, representation_key: str,
                               input_space: Optional[Space],
                               config: Namespace) -> Module:
@@ -257,7 +340,9 @@ class Agent(ABC):
         raise NotImplementedError
 
     def finish(self):
+        self._write_infos(self.metrics.reduce(), self.last_log_step)
         if self.use_wandb:
+            import wandb
             wandb.finish()
         else:
             self.writer.close()
@@ -1,5 +1,4 @@
 import os.path
-import wandb
 import socket
 import torch
 import numpy as np
@@ -12,11 +11,12 @@ from gym.spaces import Space
 from torch import nn
 from torch.utils.tensorboard import SummaryWriter
 from torch.distributed import destroy_process_group
-from xuance.common import get_time_string, create_directory, space2shape, Optional, List, Dict, Union
+from xuance.common import get_time_string, create_directory, space2shape, EPS, Optional, List, Dict, Union
 from xuance.environment import DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv
-from xuance.torch import ModuleDict, REGISTRY_Representation, REGISTRY_Learners, Module
+from xuance.torch import ModuleDict, REGISTRY_Representation, REGISTRY_Learners, REGISTRY_Communicator, Module
 from xuance.torch.learners import learner
-from xuance.torch.utils import NormalizeFunctions, ActivationFunctions, init_distributed_mode
+from xuance.torch.utils import NormalizeFunctions, ActivationFunctions, RunningNorm, MetricsAccumulator, \
+    init_distributed_mode
 
 
 class MARLAgents(ABC):
@@ -26,6 +26,11 @@ class MARLAgents(ABC):
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
     """
+    # Whether the train loop of the agents runs the asynchronous learner (use_async_learner), see OffPolicyMARLAgents.
+    supports_async_learner = False
+    # Whether the policy and the learner stack the networks of the agents (use_agent_ensemble), see ModuleEnsemble.
+    supports_agent_ensemble = False
+
     def __init__(self,
                  config: Namespace,
                  envs: Union[DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv]):
@@ -33,14 +38,26 @@ class MARLAgents(ABC):
         self.config = config
         self.use_rnn = config.use_rnn if hasattr(config, "use_rnn") else False
         self.use_parameter_sharing = config.use_parameter_sharing
+        self.use_group_sharing = config.use_group_sharing if hasattr(config, "use_group_sharing") else False
+        self.use_agent_ensemble = config.use_agent_ensemble if hasattr(config, "use_agent_ensemble") else False
+        if self.use_agent_ensemble and not self.supports_agent_ensemble:
+            raise AttributeError(f"{type(self).__name__} does not support the agent ensemble (use_agent_ensemble).")
         self.use_actions_mask = config.use_actions_mask if hasattr(config, "use_actions_mask") else False
+        use_async_learner = config.use_async_learner if hasattr(config, "use_async_learner") else False
+        if use_async_learner and not self.supports_async_learner:
+            raise AttributeError(f"{type(self).__name__} does not support the asynchronous learner "
+                                 f"(use_async_learner).")
         self.use_global_state = config.use_global_state if hasattr(config, "use_global_state") else False
+        self.use_array_batches = config.use_array_batches if hasattr(config, "use_array_batches") else False
         self.distributed_training = config.distributed_training
         if self.distributed_training:
             self.world_size = int(os.environ['WORLD_SIZE'])
             self.rank = int(os.environ['RANK'])
+            if torch.device(config.device).type == "cuda":
+                config.device = f"cuda:{os.environ['LOCAL_RANK']}"  # One GPU per process.
             master_port = config.master_port if hasattr(config, "master_port") else None
-            init_distributed_mode(master_port=master_port)
+            backend = config.distributed_backend if hasattr(config, "distributed_backend") else None
+            init_distributed_mode(master_port=master_port, backend=backend, device=config.device)
         else:
             self.world_size = 1
             self.rank = 0
@@ -70,16 +87,33 @@ class MARLAgents(ABC):
         self.current_step = 0
         self.current_episode = np.zeros((self.n_envs,), np.int32)
 
+        # The agents of each model key, which share the parameters of the model.
+        self.agent_groups = self.config.agent_groups = self._build_agent_groups(envs)
+        self.model_keys = list(self.agent_groups.keys())
+        self.group_ids = {key: torch.eye(self.n_agents, device=self.device)[[self.agent_keys.index(k) for k in group]]
+                          for key, group in self.agent_groups.items()}
+
+        # Set normalization for observations, shared by all agents if the parameters are shared by all agents.
+        self.use_obsnorm = config.use_obsnorm if hasattr(config, "use_obsnorm") else False
+        self.obsnorm_range = config.obsnorm_range if hasattr(config, "obsnorm_range") else 5
+        norm_dtype = getattr(torch, config.norm_dtype) if hasattr(config, "norm_dtype") else torch.float64
+        if self.use_parameter_sharing and not self.use_group_sharing:
+            obs_shape = space2shape(self.observation_space[self.agent_keys[0]])
+        else:
+            obs_shape = {k: space2shape(self.observation_space[k]) for k in self.agent_keys}
+        self.obs_rms = RunningNorm(shape=obs_shape, dtype=norm_dtype, device=self.device,
+                                   distributed=self.distributed_training and self.use_obsnorm)
+
+        # Learner metrics are kept on the device and written once per logging interval.
+        self.metrics = MetricsAccumulator(config.metrics_reduce if hasattr(config, "metrics_reduce") else ["mean"])
+        self.log_interval = config.log_interval if hasattr(config, "log_interval") else 1
+        self.next_log_step, self.last_log_step = 0, 0
+
         # Prepare directories.
         if self.distributed_training and self.world_size > 1:
-            if self.rank == 0:
-                time_string = get_time_string()
-                time_string_tensor = torch.tensor(list(time_string.encode('utf-8')), dtype=torch.uint8).to(self.rank)
-            else:
-                time_string_tensor = torch.zeros(16, dtype=torch.uint8).to(self.rank)
-
-            dist.broadcast(time_string_tensor, src=0)
-            time_string = bytes(time_string_tensor.cpu().tolist()).decode('utf-8').rstrip('\x00')
+            time_string = [get_time_string() if self.rank == 0 else None]
+            dist.broadcast_object_list(time_string, src=0)
+            time_string = time_string[0]
         else:
             time_string = get_time_string()
         seed = f"seed_{config.seed}_"
@@ -97,6 +131,7 @@ class MARLAgents(ABC):
             self.writer = SummaryWriter(log_dir)
             self.use_wandb = False
         elif config.logger == "wandb":
+            import wandb
             config_dict = vars(config)
             log_dir = config.log_dir
             wandb_dir = Path(os.path.join(os.getcwd(), config.log_dir))
@@ -123,7 +158,6 @@ class MARLAgents(ABC):
         self.log_dir = log_dir
 
         # predefine necessary components
-        self.model_keys = [self.agent_keys[0]] if self.use_parameter_sharing else self.agent_keys
         self.policy: Optional[nn.Module] = None
         self.learner: Optional[learner] = None
         self.memory: Optional[object] = None
@@ -141,17 +175,38 @@ class MARLAgents(ABC):
             os.makedirs(self.model_dir_save)
         model_path = os.path.join(self.model_dir_save, model_name)
         self.learner.save_model(model_path)
+        # save the observation status
+        if self.use_obsnorm:
+            obs_norm_path = os.path.join(self.model_dir_save, "obs_rms.npy")
+            np.save(obs_norm_path, self.obs_rms.get_statistics())
 
     def load_model(self, path, model=None):
         # load neural networks
-        self.learner.load_model(path, model)
+        path_loaded = self.learner.load_model(path, model)
+        # recover observation status
+        if self.use_obsnorm:
+            obs_norm_path = os.path.join(path_loaded, "obs_rms.npy")
+            if os.path.exists(obs_norm_path):
+                observation_stat = np.load(obs_norm_path, allow_pickle=True).item()
+                self.obs_rms.set_statistics(**observation_stat)
+            else:
+                raise RuntimeError(f"Failed to load observation status file 'obs_rms.npy' from {obs_norm_path}!")
 
     def log_infos(self, info: dict, x_index: int):
         """
-        info: (dict) information to be visualized
+        info: (dict) information to be visualized, tensor values are accumulated and written every log_interval
         n_steps: current step
         """
+        info = self.metrics.record(info)
+        if len(self.metrics) and x_index >= self.next_log_step:
+            info.update(self.metrics.reduce())
+            self.next_log_step = x_index + self.log_interval
+        self.last_log_step = x_index
+        self._write_infos(info, x_index)
+
+    def _write_infos(self, info: dict, x_index: int):
         if self.use_wandb:
+            import wandb
             for k, v in info.items():
                 if v is None:
                     continue
@@ -167,6 +222,7 @@ class MARLAgents(ABC):
 
     def log_videos(self, info: dict, fps: int, x_index: int = 0):
         if self.use_wandb:
+            import wandb
             for k, v in info.items():
                 if v is None:
                     continue
@@ -177,6 +233,52 @@ class MARLAgents(ABC):
                     continue
                 self.writer.add_video(k, v, fps=fps, global_step=x_index)
                 
+    def _build_agent_groups(self, envs: Union[DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv]) -> Dict[str, List[str]]:
+        """
+        Build the groups of agents that share the parameters of one model, keyed by their model key (the first agent).
+
+        Without parameter sharing, each agent has its own model. With parameter sharing, all agents share one model,
+        unless use_group_sharing is True: then the agents of each group of envs.groups_info share one model, or the
+        agents with the same observation and action spaces if the environment defines no groups.
+
+        Parameters:
+            envs: The vectorized environments.
+
+        Returns:
+            agent_groups (Dict[str, List[str]]): The agent keys of each model key.
+        """
+        if not self.use_group_sharing:
+            if self.use_parameter_sharing:
+                return {self.agent_keys[0]: list(self.agent_keys)}
+            return {k: [k] for k in self.agent_keys}
+        if not self.use_parameter_sharing:
+            raise AttributeError("The group sharing (use_group_sharing) requires use_parameter_sharing=True.")
+        if not REGISTRY_Learners[self.config.learner].supports_group_sharing:
+            raise AttributeError(f"{self.config.learner} does not support the group sharing (use_group_sharing).")
+        if self.config.use_packed_agents if hasattr(self.config, "use_packed_agents") else False:
+            raise AttributeError("The packed agents (use_packed_agents) do not support the group sharing.")
+
+        groups_info = envs.groups_info if hasattr(envs, "groups_info") else None
+        if groups_info is not None and groups_info['num_groups'] > 0:
+            groups = [list(group) for group in groups_info['agent_groups']]
+        else:
+            groups, spaces = [], []
+            for k in self.agent_keys:
+                space = (self.observation_space[k], self.action_space[k])
+                if space in spaces:
+                    groups[spaces.index(space)].append(k)
+                else:
+                    groups.append([k])
+                    spaces.append(space)
+        if sorted(k for group in groups for k in group) != sorted(self.agent_keys):
+            raise AttributeError("Each agent must belong to exactly one of the agent groups.")
+        for group in groups:
+            if any((self.observation_space[k], self.action_space[k]) !=
+                   (self.observation_space[group[0]], self.action_space[group[0]]) for k in group):
+                raise AttributeError(f"The agents of the group {group} share one model, which requires the same "
+                                     f"observation and action spaces.")
+        return {group[0]: group for group in groups}
+
     def _build_representation(self, representation_key: str,
                               input_space: Union[Dict[str, Space], tuple],
                               config: Namespace) -> Module:
@@ -219,59 +321,284 @@ class MARLAgents(ABC):
                 raise AttributeError(f"{representation_key} is not registered in REGISTRY_Representation.")
         return representation
 
+    def _build_communicator(self, representation: ModuleDict) -> Optional[Module]:
+        """
+        Build the communicator of the actors for the policies with communication, e.g., Categorical_MAAC_Policy_Comm.
+
+        Parameters:
+            representation (ModuleDict): The actor representations, whose outputs are sent to the communicator.
+
+        Returns:
+            communicator (Optional[Module]): The communication module, None if config.communicator is not given.
+        """
+        config = self.config
+        if not hasattr(config, "communicator"):
+            return None
+        if config.communicator not in REGISTRY_Communicator:
+            raise AttributeError(f"{config.communicator} is not registered in REGISTRY_Communicator.")
+        if config.use_packed_agents if hasattr(config, "use_packed_agents") else False:
+            raise AttributeError("The communication needs all agents of each sample, which is not supported by the "
+                                 "packed agents.")
+        if self.use_group_sharing:
+            raise AttributeError("The communication does not support the group sharing (use_group_sharing).")
+        dim_states = {representation[key].output_shapes['state'][0] for key in self.model_keys}
+        if len(dim_states) > 1:
+            raise AttributeError("The communication requires the same representation output shape for all agents.")
+        dim_input = dim_states.pop() + (self.n_agents if self.use_parameter_sharing else 0)
+        return REGISTRY_Communicator[config.communicator](
+            state_dim=dim_input, n_agents=self.n_agents,
+            hidden_sizes_comm=config.comm_hidden_size if hasattr(config, "comm_hidden_size") else [64, ],
+            msg_dim=config.msg_dim if hasattr(config, "msg_dim") else 64,
+            comm_rounds=config.comm_rounds if hasattr(config, "comm_rounds") else 1,
+            key_dim=config.comm_key_dim if hasattr(config, "comm_key_dim") else 16,
+            vocab_size=config.comm_vocab_size if hasattr(config, "comm_vocab_size") else 16,
+            temperature=config.comm_temperature if hasattr(config, "comm_temperature") else 1.0,
+            normalize=NormalizeFunctions[config.normalize] if hasattr(config, "normalize") else None,
+            initialize=nn.init.orthogonal_,
+            activation=ActivationFunctions[config.activation],
+            device=self.device)
+
     def _build_policy(self) -> Module:
         raise NotImplementedError
 
     def _build_learner(self, *args):
         return REGISTRY_Learners[self.config.learner](*args)
 
+    def _batch_size(self, batch: Union[List[dict], dict]) -> int:
+        """Returns the number of environments of a batch, given as a list of per-env dicts or a dict of arrays."""
+        if isinstance(batch, dict):
+            return len(batch[self.agent_keys[0]])
+        return len(batch)
+
+    def _agent_arrays(self, batch: Union[List[dict], dict]) -> dict:
+        """
+        Returns the values of a batch as {agent_key: ndarray[n_envs, ...]}.
+
+        Parameters:
+            batch (Union[List[dict], dict]): Per-env dicts of the values of each agent, or the arrays themselves.
+
+        Returns:
+            arrays (dict): The values of each agent in self.agent_keys, stacked over the environments.
+        """
+        if isinstance(batch, dict):
+            return batch
+        return {k: np.array([data[k] for data in batch]) for k in self.agent_keys}
+
+    def _packed_array(self, batch: Union[List[dict], dict]) -> np.ndarray:
+        """Returns the values of a batch packed as one array with shape (n_envs, n_agents, ...)."""
+        if isinstance(batch, dict):
+            return np.stack(itemgetter(*self.agent_keys)(batch), axis=1)
+        return np.array([itemgetter(*self.agent_keys)(data) for data in batch])
+
+    def _group_arrays(self, batch: Union[List[dict], dict]) -> Dict[str, np.ndarray]:
+        """Returns the values of a batch as {model_key: ndarray[n_envs, n_agents_of_the_group, ...]}."""
+        if self.use_parameter_sharing and len(self.model_keys) == 1:
+            return {self.model_keys[0]: self._packed_array(batch)}
+        arrays = self._agent_arrays(batch)
+        return {key: np.stack([arrays[k] for k in group], axis=1) if len(group) > 1 else arrays[group[0]][:, None]
+                for key, group in self.agent_groups.items()}
+
+    def _agent_ids(self, batch_size: int) -> Optional[Union[torch.Tensor, Dict[str, torch.Tensor]]]:
+        """
+        Returns the one-hot IDs of the agents, the inputs of the parameter-sharing models besides the observations.
+
+        Parameters:
+            batch_size (int): The number of environments.
+
+        Returns:
+            The IDs with shape (batch_size * n_agents_of_the_group, (1, ) n_agents) of each model key, one tensor if
+            the parameters are shared by all agents, or None without parameter sharing.
+        """
+        if not self.use_parameter_sharing:
+            return None
+        agents_id = {}
+        for key, ids in self.group_ids.items():
+            ids = ids.unsqueeze(0).expand(batch_size, -1, -1)
+            agents_id[key] = ids.reshape(-1, 1, self.n_agents) if self.use_rnn else ids.reshape(-1, self.n_agents)
+        return agents_id[self.model_keys[0]] if len(self.model_keys) == 1 else agents_id
+
+    def _info_array(self, info: Union[List[dict], dict], key: str):
+        """
+        Returns one item of the information of all environments as arrays.
+
+        Parameters:
+            info (Union[List[dict], dict]): The information returned by the vectorized environments.
+            key (str): The item, e.g., "agent_mask" (one value per agent) or "episode_step" (one value per env).
+
+        Returns:
+            The array of the item over the environments, or {agent_key: array} for the items of each agent.
+        """
+        if isinstance(info, dict):
+            return info[key]
+        if isinstance(info[0][key], dict):
+            return {k: np.array([data[key][k] for data in info]) for k in self.agent_keys}
+        return np.array([data[key] for data in info])
+
+    def _env_item(self, batch, i_env: int):
+        """Returns the values of the i_env-th environment of a batch, given as a list, an array or a dict of them."""
+        if isinstance(batch, dict):
+            return {k: self._env_item(v, i_env) for k, v in batch.items()}
+        return batch[i_env]
+
+    def _env_batch(self, values: dict, batch_size: int) -> Union[List[dict], dict]:
+        """
+        Converts {agent_key: ndarray[n_envs, ...]} values, e.g., the actions, to the format of the environments.
+
+        Parameters:
+            values (dict): The values of each agent in self.agent_keys.
+            batch_size (int): The number of environments.
+
+        Returns:
+            The values as they are with self.use_array_batches, otherwise a list of per-env dicts.
+        """
+        if self.use_array_batches:
+            return values
+        return [{k: values[k][e] for k in self.agent_keys} for e in range(batch_size)]
+
+    @staticmethod
+    def _copy_batch(batch):
+        """Returns a copy of a batch, whose values can be overwritten without changing the batch."""
+        if isinstance(batch, dict):
+            return {k: np.array(v) for k, v in batch.items()}
+        if isinstance(batch, np.ndarray):
+            return batch.copy()
+        return list(batch)
+
     def _build_inputs(self,
-                      obs_dict: List[dict],
-                      avail_actions_dict: Optional[List[dict]] = None):
+                      obs_dict: Union[List[dict], dict],
+                      avail_actions_dict: Optional[Union[List[dict], dict]] = None):
         """
         Build inputs for representations before calculating actions.
 
         Parameters:
-            obs_dict (List[dict]): Observations for each agent in self.agent_keys.
-            avail_actions_dict (Optional[List[dict]]): Actions mask values, default is None.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
 
         Returns:
             obs_input: The represented observations.
             agents_id: The agent id (One-Hot variables).
+            avail_actions_input: The actions mask values, None if use_actions_mask is False or avail_actions_dict is None.
         """
-        batch_size = len(obs_dict)
-        bs = batch_size * self.n_agents if self.use_parameter_sharing else batch_size
-        avail_actions_input = None
-
-        if self.use_parameter_sharing:
-            key = self.agent_keys[0]
-            obs_array = np.array([itemgetter(*self.agent_keys)(data) for data in obs_dict])
-            agents_id = torch.eye(self.n_agents).unsqueeze(0).expand(batch_size, -1, -1).to(self.device)
-            avail_actions_array = np.array([itemgetter(*self.agent_keys)(data)
-                                            for data in avail_actions_dict]) if self.use_actions_mask else None
-            if self.use_rnn:
-                obs_input = {key: obs_array.reshape([bs, 1, -1])}
-                agents_id = agents_id.reshape(bs, 1, -1)
-                if self.use_actions_mask:
-                    avail_actions_input = {key: avail_actions_array.reshape([bs, 1, -1])}
-            else:
-                obs_input = {key: obs_array.reshape([bs, -1])}
-                agents_id = agents_id.reshape(bs, -1)
-                if self.use_actions_mask:
-                    avail_actions_input = {key: avail_actions_array.reshape([bs, -1])}
+        batch_size = self._batch_size(obs_dict)
+        use_actions_mask = self.use_actions_mask and avail_actions_dict is not None
+        obs_array = self._group_arrays(obs_dict)
+        avail_actions_array = self._group_arrays(avail_actions_dict) if use_actions_mask else None
+        obs_input, avail_actions_input = {}, {} if use_actions_mask else None
+        for key, group in self.agent_groups.items():
+            bs = batch_size * len(group)
+            input_shape = [bs, 1, -1] if self.use_rnn else [bs, -1]
+            obs_input[key] = obs_array[key].reshape(input_shape)
+            if use_actions_mask:
+                avail_actions_input[key] = avail_actions_array[key].reshape(input_shape)
+        return obs_input, self._agent_ids(batch_size), avail_actions_input
+
+    def _process_observation(self, obs_dict: Union[List[dict], dict],
+                             update_rms: bool = False) -> Union[List[dict], dict]:
+        """
+        Normalizes the observations of all agents in one batch with the running statistics.
+
+        Parameters:
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            update_rms (bool): Whether to update the running statistics with the observations first.
+
+        Returns:
+            obs_dict (Union[List[dict], dict]): The normalized observations, in the format of the given ones, new
+                ones if the normalization is used.
+        """
+        if not self.use_obsnorm:
+            return obs_dict
+        shared_rms = self.use_parameter_sharing and not self.use_group_sharing
+        if shared_rms:
+            obs_batch = self._packed_array(obs_dict)
         else:
-            agents_id = None
-            if self.use_rnn:
-                obs_input = {k: np.stack([data[k] for data in obs_dict]).reshape([bs, 1, -1]) for k in self.agent_keys}
-                if self.use_actions_mask:
-                    avail_actions_input = {k: np.stack([data[k] for data in avail_actions_dict]).reshape([bs, 1, -1])
-                                           for k in self.agent_keys}
-            else:
-                obs_input = {k: np.stack([data[k] for data in obs_dict]).reshape(bs, -1) for k in self.agent_keys}
+            obs_batch = self._agent_arrays(obs_dict)
+        if update_rms:
+            self.obs_rms.update(obs_batch)
+        obs_norm = self.obs_rms.normalize(obs_batch, self.obsnorm_range, EPS)
+        batch_size = self._batch_size(obs_dict)
+        if shared_rms:
+            obs_norm = obs_norm.cpu().numpy()
+            if isinstance(obs_dict, dict):
+                return {k: obs_norm[:, i] for i, k in enumerate(self.agent_keys)}
+            return [dict(zip(self.agent_keys, obs_norm[e])) for e in range(batch_size)]
+        obs_norm = {k: v.cpu().numpy() for k, v in obs_norm.items()}
+        if isinstance(obs_dict, dict):
+            return obs_norm
+        return [{k: obs_norm[k][e] for k in self.agent_keys} for e in range(batch_size)]
+
+    def _terminated_mask(self, terminated_dict: Union[List[dict], dict]) -> np.ndarray:
+        """
+        Returns a boolean mask of the environments where all agents are terminated.
+
+        Parameters:
+            terminated_dict (Union[List[dict], dict]): Terminated values for each agent in self.agent_keys.
+
+        Returns:
+            terminated (np.ndarray): The terminated flags of all environments, with shape (n_envs, ).
+        """
+        if isinstance(terminated_dict, dict):
+            return np.all(np.stack(list(terminated_dict.values())), axis=0)
+        return np.array([all(data.values()) for data in terminated_dict], dtype=np.bool_)
+
+    def _reset_observations(self, env_ids: np.ndarray, info: Union[List[dict], dict],
+                            obs_dict: Union[List[dict], dict],
+                            avail_actions: Optional[Union[List[dict], dict]] = None,
+                            state: Optional[Union[list, np.ndarray]] = None, envs=None):
+        """
+        Writes the reset observations, actions masks and states of the finished environments in place.
+
+        Parameters:
+            env_ids (np.ndarray): The indexes of environments that have been reset.
+            info (Union[List[dict], dict]): The information returned by the vectorized environments.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions (Optional[Union[List[dict], dict]]): Actions mask values for each agent in self.agent_keys.
+            state (Optional[Union[list, np.ndarray]]): The global states.
+            envs: The vectorized environments, default is self.envs.
+        """
+        envs = self.envs if envs is None else envs
+        if isinstance(info, dict):
+            for k in self.agent_keys:
+                obs_dict[k][env_ids] = envs.buf_obs[k][env_ids] = info["reset_obs"][k][env_ids]
                 if self.use_actions_mask:
-                    avail_actions_input = {k: np.array([data[k] for data in avail_actions_dict]).reshape([bs, -1])
-                                           for k in self.agent_keys}
-        return obs_input, agents_id, avail_actions_input
+                    avail_actions[k][env_ids] = info["reset_avail_actions"][k][env_ids]
+                    envs.buf_avail_actions[k][env_ids] = info["reset_avail_actions"][k][env_ids]
+            if self.use_global_state:
+                state[env_ids] = envs.buf_state[env_ids] = info["reset_state"][env_ids]
+            return
+        for i in env_ids:
+            obs_dict[i] = info[i]["reset_obs"]
+            envs.buf_obs[i] = info[i]["reset_obs"]
+            if self.use_actions_mask:
+                avail_actions[i] = info[i]["reset_avail_actions"]
+                envs.buf_avail_actions[i] = info[i]["reset_avail_actions"]
+            if self.use_global_state:
+                state[i] = info[i]["reset_state"]
+                envs.buf_state[i] = info[i]["reset_state"]
+
+    def _episode_info(self, env_ids: np.ndarray, info: Union[List[dict], dict]) -> dict:
+        """
+        Collects the episode steps and scores of all finished environments into one logging dict.
+
+        Parameters:
+            env_ids (np.ndarray): The indexes of environments that have finished an episode.
+            info (Union[List[dict], dict]): The information returned by the vectorized environments.
+
+        Returns:
+            episode_info (dict): The information to be logged.
+        """
+        if isinstance(info, dict):
+            info = {i: self._env_item(info, i) for i in env_ids}
+        if self.use_wandb:
+            episode_info = {}
+            for i in env_ids:
+                episode_info[f"Train-Results/Episode-Steps/rank_{self.rank}/env-%d" % i] = info[i]["episode_step"]
+                episode_info[f"Train-Results/Episode-Rewards/rank_{self.rank}/env-%d" % i] = info[i]["episode_score"]
+            return episode_info
+        return {
+            f"Train-Results/Episode-Steps/rank_{self.rank}": {"env-%d" % i: info[i]["episode_step"] for i in env_ids},
+            f"Train-Results/Episode-Rewards/rank_{self.rank}": {
+                "env-%d" % i: np.mean(itemgetter(*self.agent_keys)(info[i]["episode_score"])) for i in env_ids}
+        }
 
     def action(self, **kwargs):
         raise NotImplementedError
@@ -286,7 +613,9 @@ class MARLAgents(ABC):
         raise NotImplementedError
 
     def finish(self):
+        self._write_infos(self.metrics.reduce(), self.last_log_step)
         if self.use_wandb:
+            import wandb
             wandb.finish()
         else:
             self.writer.close()
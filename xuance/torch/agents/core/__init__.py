@@ -1,6 +1,13 @@
-from .on_policy import OnPolicyAgent
-from .off_policy import OffPolicyAgent
-from .off_policy_marl import OffPolicyMARLAgents
-from .on_policy_marl import OnPolicyMARLAgents
+from xuance.common.registry_tools import lazy_attributes
+
+# Maps each member to the module that defines it, the module is imported on first access.
+_members = {
+    "OnPolicyAgent": ".on_policy",
+    "OffPolicyAgent": ".off_policy",
+    "OffPolicyMARLAgents": ".off_policy_marl",
+    "OnPolicyMARLAgents": ".on_policy_marl",
+}
+
+__getattr__ = lazy_attributes(__name__, _members)
 
 __all__ = ["OnPolicyAgent", "OffPolicyAgent", "OffPolicyMARLAgents", "OnPolicyMARLAgents"]
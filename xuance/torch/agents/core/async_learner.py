@@ -0,0 +1,143 @@
+import math
+import threading
+from copy import copy, deepcopy
+from typing import Callable, List
+from xuance.torch.utils import TargetNetworks, Distribution
+
+
+class AsyncLearner:
+    """Runs the updates of an off-policy agent in a background thread, so that acting and learning overlap.
+
+    The agent keeps stepping its vectorized environments with an actor copy of the policy, and stores the
+    transitions in the replay buffer. The learner thread samples the buffer and updates the policy of the learner
+    as long as it has done fewer than replay_ratio updates per transition collected, and copies the new parameters
+    to the actor copy every sync_interval updates. The actor waits only when the learner falls more than max_lag
+    updates behind the replay ratio, so with a fast learner the environments never wait for the updates.
+
+    The environment steps run in the worker processes of the vectorized environments and the updates run in torch
+    kernels, both of which release the GIL, so the two threads overlap even though they share the interpreter.
+
+    Parameters:
+        agent: The off-policy agent, its policy is replaced by the actor copy when the learner starts.
+        update (Callable[[dict], dict]): Runs one update of the learner on a batch sampled from agent.memory.
+        replay_ratio (float): The number of updates per transition stored after the start of training.
+        sync_interval (int): The number of updates between two copies of the parameters to the actor.
+        max_lag (int): The number of updates the learner can fall behind the replay ratio before the actor waits.
+    """
+
+    def __init__(self, agent, update: Callable[[dict], dict], replay_ratio: float,
+                 sync_interval: int = 1, max_lag: int = 0):
+        if replay_ratio <= 0:
+            raise ValueError(f"The replay ratio must be positive, got {replay_ratio}.")
+        self.agent = agent
+        self.update = update
+        self.replay_ratio = replay_ratio
+        self.sync_interval = max(1, sync_interval)
+        self.max_lag = max(0, max_lag)
+        self.memory_lock = threading.Lock()  # Guards the replay buffer between storing and sampling.
+        self.policy_lock = threading.Lock()  # Guards the actor parameters between acting and syncing.
+        self.condition = threading.Condition()
+        self.n_transitions, self.n_updates = 0, 0
+        self.infos: List[dict] = []
+        self.error, self.stopped = None, False
+        self.thread, self.actor_sync = None, None
+
+    @staticmethod
+    def default_replay_ratio(n_envs: int, training_frequency: int, n_epochs: int) -> float:
+        """The replay ratio of the synchronous loop, which runs n_epochs updates whenever the step counter, that
+        grows by n_envs per step, is a multiple of training_frequency."""
+        return n_epochs / (n_envs * training_frequency // math.gcd(n_envs, training_frequency))
+
+    def _target_updates(self) -> int:
+        return int(self.n_transitions * self.replay_ratio)
+
+    def start(self):
+        """Replaces the policy of the agent by an actor copy, and starts the learner thread."""
+        learner_policy = self.agent.learner.policy
+        # The heads keep the distribution of their last forward, whose tensors are part of a graph and can not be
+        # deep-copied. The copies share them until their next forward, as set_param() rebinds new tensors.
+        memo = {id(value): copy(value) for module in learner_policy.modules()
+                for value in vars(module).values() if isinstance(value, Distribution)}
+        actor_policy = deepcopy(learner_policy, memo)
+        for module in actor_policy.modules():
+            module.__dict__.pop("forward", None)  # A compiled forward would still run the learner networks.
+        self.actor_sync = TargetNetworks([learner_policy], [actor_policy])
+        self.agent.policy = actor_policy
+        self.thread = threading.Thread(target=self._run, name="AsyncLearner", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.stopped or self.n_updates < self._target_updates())
+                    if self.stopped:
+                        return
+                with self.memory_lock:
+                    samples = self.agent.memory.sample()
+                info = self.update(samples)
+                with self.condition:
+                    self.n_updates += 1
+                    if self.n_updates % self.sync_interval == 0:
+                        self.sync()
+                    self.infos.append(info)
+                    self.condition.notify_all()
+        except BaseException as error:
+            with self.condition:
+                self.error = error
+                self.condition.notify_all()
+
+    def sync(self):
+        """Copies the parameters of the learner policy to the actor policy."""
+        with self.policy_lock:
+            self.actor_sync.hard_update()
+
+    def step(self, n_transitions: int) -> List[dict]:
+        """Counts the transitions stored by the actor, waits if the learner lags behind, and returns the
+        information of the updates done since the last call.
+
+        Parameters:
+            n_transitions (int): The number of transitions stored since the last call.
+
+        Returns:
+            infos (List[dict]): The information returned by the learner updates.
+        """
+        if self.thread is None:
+            self.start()
+        with self.condition:
+            self.n_transitions += n_transitions
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: self.error is not None or
+                                    self.n_updates >= self._target_updates() - self.max_lag)
+            if self.error is not None:
+                raise RuntimeError("The asynchronous learner failed.") from self.error
+            infos, self.infos = self.infos, []
+        return infos
+
+    def wait(self) -> List[dict]:
+        """Waits for the learner to reach the replay ratio, then syncs the actor. Called at the end of a training
+        call, so that evaluating and saving the model see the latest parameters.
+
+        Returns:
+            infos (List[dict]): The information returned by the learner updates since the last call.
+        """
+        if self.thread is None:
+            return []
+        with self.condition:
+            self.condition.wait_for(lambda: self.error is not None or self.n_updates >= self._target_updates())
+            if self.error is not None:
+                raise RuntimeError("The asynchronous learner failed.") from self.error
+            self.sync()
+            infos, self.infos = self.infos, []
+        return infos
+
+    def stop(self):
+        """Stops the learner thread, and gives the learner policy back to the agent."""
+        if self.thread is None:
+            return
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.agent.policy = self.agent.learner.policy
+        self.thread = None
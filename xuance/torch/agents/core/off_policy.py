@@ -1,11 +1,12 @@
 import numpy as np
 from tqdm import tqdm
-from copy import deepcopy
+from contextlib import nullcontext
 from argparse import Namespace
 from xuance.common import Optional, Union, DummyOffPolicyBuffer, DummyOffPolicyBuffer_Atari
 from xuance.environment import DummyVecEnv, SubprocVecEnv
 from xuance.torch import Module
 from xuance.torch.agents.base import Agent
+from xuance.torch.agents.core.async_learner import AsyncLearner
 
 
 class OffPolicyAgent(Agent):
@@ -15,6 +16,8 @@ class OffPolicyAgent(Agent):
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
     """
+    supports_async_learner = True
+
     def __init__(self,
                  config: Namespace,
                  envs: Union[DummyVecEnv, SubprocVecEnv]):
@@ -43,6 +46,20 @@ class OffPolicyAgent(Agent):
         self.buffer_size = self.config.buffer_size
         self.batch_size = self.config.batch_size
 
+        self.use_async_learner = config.use_async_learner if hasattr(config, "use_async_learner") else False
+        self.async_learner: Optional[AsyncLearner] = None
+        if self.use_async_learner:
+            if self.distributed_training:
+                raise AttributeError("The asynchronous learner does not support distributed training, whose "
+                                     "collective calls must be made in the same order by all processes.")
+            replay_ratio = config.replay_ratio if hasattr(config, "replay_ratio") else None
+            if replay_ratio is None:
+                replay_ratio = AsyncLearner.default_replay_ratio(self.n_envs, self.training_frequency, self.n_epochs)
+            sync_interval = config.actor_sync_interval if hasattr(config, "actor_sync_interval") else 1
+            max_lag = config.max_update_lag if hasattr(config, "max_update_lag") else 0
+            self.async_learner = AsyncLearner(self, lambda samples: self.learner.update(**samples),
+                                              replay_ratio, sync_interval, max_lag)
+
     def _build_memory(self, auxiliary_info_shape=None):
         self.atari = True if self.config.env_name == "Atari" else False
         Buffer = DummyOffPolicyBuffer_Atari if self.atari else DummyOffPolicyBuffer
@@ -110,60 +127,96 @@ class OffPolicyAgent(Agent):
             actions = self.exploration(actions_output)
         return {"actions": actions}
 
+    def _end_episodes(self, next_obs, rewards: np.ndarray, terminals: np.ndarray, trunctions: np.ndarray,
+                      infos: list):
+        """Updates the returns and resets the observations of all environments that ended an episode at this step.
+
+        Parameters:
+            next_obs: The next observations returned by the vectorized environments.
+            rewards (np.ndarray): The rewards of current step.
+            terminals (np.ndarray): The terminated flags of current step.
+            trunctions (np.ndarray): The truncated flags of current step.
+            infos (list): The information returned by the vectorized environments.
+
+        Returns:
+            obs: The observations for the next step, with reset observations for the finished environments.
+            step_info (dict): The episode information of the finished environments.
+        """
+        next_obs = self._copy_observations(next_obs)
+        self.returns = self.gamma * self.returns + rewards
+        reset_ids = np.flatnonzero(trunctions if self.atari else np.logical_or(terminals, trunctions))
+        self.ret_rms.update(self.returns[reset_ids])  # Every step: it is collective in distributed training.
+        if len(reset_ids) == 0:
+            return next_obs, {}
+        obs = self._reset_observations(next_obs, reset_ids, infos)
+        self.returns[reset_ids] = 0.0
+        self.current_episode[reset_ids] += 1
+        return obs, self._episode_info(reset_ids, infos)
+
     def train_epochs(self, n_epochs=1):
         train_info = {}
         for _ in range(n_epochs):
             samples = self.memory.sample()
-            train_info = self.learner.update(**samples)
+            train_info = self.metrics.record(self.learner.update(**samples))
+        train_info["epsilon-greedy"] = self.e_greedy
+        train_info["noise_scale"] = self.noise_scale
+        return train_info
+
+    def _async_train_info(self, infos: list) -> dict:
+        """Records the information of the updates done by the asynchronous learner, as train_epochs() does."""
+        train_info = {}
+        for info in infos:
+            train_info = self.metrics.record(info)
         train_info["epsilon-greedy"] = self.e_greedy
         train_info["noise_scale"] = self.noise_scale
         return train_info
 
     def train(self, train_steps):
         return_info = {}
-        obs = self.envs.buf_obs
+        obs = self._copy_observations(self.envs.buf_obs, copy_arrays=True)
+        acting_lock = nullcontext() if self.async_learner is None else self.async_learner.policy_lock
+        memory_lock = nullcontext() if self.async_learner is None else self.async_learner.memory_lock
         for _ in tqdm(range(train_steps)):
-            step_info = {}
             self.obs_rms.update(obs)
-            obs = self._process_observation(obs)
-            policy_out = self.action(obs, test_mode=False)
+            obs = self._normalize_observation(obs)
+            with acting_lock:
+                policy_out = self.action(obs, test_mode=False)
             acts = policy_out['actions']
             next_obs, rewards, terminals, trunctions, infos = self.envs.step(acts)
 
-            self.memory.store(obs, acts, self._process_reward(rewards), terminals, self._process_observation(next_obs))
-            if self.current_step > self.start_training and self.current_step % self.training_frequency == 0:
+            with memory_lock:
+                self.memory.store(self._observations_to_numpy(obs), acts, self._process_reward(rewards), terminals,
+                                  self._process_observation(next_obs))
+            if self.async_learner is not None:
+                if self.current_step > self.start_training:
+                    updates = self.async_learner.step(self.n_envs)
+                    if updates:
+                        train_info = self._async_train_info(updates)
+                        self.log_infos(train_info, self.current_step)
+                        return_info.update(train_info)
+            elif self.current_step > self.start_training and self.current_step % self.training_frequency == 0:
                 train_info = self.train_epochs(n_epochs=self.n_epochs)
                 self.log_infos(train_info, self.current_step)
                 return_info.update(train_info)
 
-            self.returns = self.gamma * self.returns + rewards
-            obs = deepcopy(next_obs)
-            for i in range(self.n_envs):
-                if terminals[i] or trunctions[i]:
-                    if self.atari and (~trunctions[i]):
-                        pass
-                    else:
-                        obs[i] = infos[i]["reset_obs"]
-                        self.envs.buf_obs[i] = obs[i]
-                        self.ret_rms.update(self.returns[i:i + 1])
-                        self.returns[i] = 0.0
-                        self.current_episode[i] += 1
-                        if self.use_wandb:
-                            step_info[f"Episode-Steps/rank_{self.rank}/env-{i}"] = infos[i]["episode_step"]
-                            step_info[f"Train-Episode-Rewards/rank_{self.rank}/env-{i}"] = infos[i]["episode_score"]
-                        else:
-                            step_info[f"Episode-Steps/rank_{self.rank}"] = {f"env-{i}": infos[i]["episode_step"]}
-                            step_info[f"Train-Episode-Rewards/rank_{self.rank}"] = {
-                                f"env-{i}": infos[i]["episode_score"]}
-                        self.log_infos(step_info, self.current_step)
-                        return_info.update(step_info)
+            obs, step_info = self._end_episodes(next_obs, rewards, terminals, trunctions, infos)
+            if step_info:
+                self.log_infos(step_info, self.current_step)
+                return_info.update(step_info)
 
             self.current_step += self.n_envs
             self._update_explore_factor()
+        if self.async_learner is not None:
+            updates = self.async_learner.wait()
+            if updates:
+                train_info = self._async_train_info(updates)
+                self.log_infos(train_info, self.current_step)
+                return_info.update(train_info)
         return return_info
 
     def test(self, env_fn, test_episodes: int) -> list:
         test_envs = env_fn()
+        self.obs_rms.freeze()  # evaluation must not shift the statistics used in training.
         num_envs = test_envs.num_envs
         videos, episode_videos = [[] for _ in range(num_envs)], []
         current_episode, scores, best_score = 0, [], -np.inf
@@ -175,7 +228,7 @@ class OffPolicyAgent(Agent):
 
         while current_episode < test_episodes:
             self.obs_rms.update(obs)
-            obs = self._process_observation(obs)
+            obs = self._normalize_observation(obs)
             policy_out = self.action(obs, test_mode=True)
             next_obs, rewards, terminals, trunctions, infos = test_envs.step(policy_out['actions'])
             if self.config.render_mode == "rgb_array" and self.render:
@@ -183,7 +236,7 @@ class OffPolicyAgent(Agent):
                 for idx, img in enumerate(images):
                     videos[idx].append(img)
 
-            obs = deepcopy(next_obs)
+            obs = self._copy_observations(next_obs)
             for i in range(num_envs):
                 if terminals[i] or trunctions[i]:
                     if self.atari and (~trunctions[i]):
@@ -213,6 +266,11 @@ class OffPolicyAgent(Agent):
         self.log_infos(test_info, self.current_step)
 
         test_envs.close()
+        self.obs_rms.unfreeze()
 
         return scores
 
+    def finish(self):
+        if self.async_learner is not None:
+            self.async_learner.stop()
+        super(OffPolicyAgent, self).finish()
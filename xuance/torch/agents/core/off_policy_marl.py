@@ -1,13 +1,16 @@
-from tqdm import tqdm
+import torch
 import numpy as np
-from copy import deepcopy
+from tqdm import tqdm
+from torch.nn.functional import pad
+from contextlib import nullcontext
 from argparse import Namespace
 from operator import itemgetter
-from xuance.common import Optional, List, Union, MARL_OffPolicyBuffer, MARL_OffPolicyBuffer_RNN
+from xuance.common import Optional, List, Dict, Union, MARL_OffPolicyBuffer, MARL_OffPolicyBuffer_RNN
 from xuance.environment import DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv
 from xuance.torch import Tensor, Module
 from xuance.torch.utils.distributions import Categorical
 from xuance.torch.agents.base import MARLAgents
+from xuance.torch.agents.core.async_learner import AsyncLearner
 
 
 class OffPolicyMARLAgents(MARLAgents):
@@ -17,6 +20,7 @@ class OffPolicyMARLAgents(MARLAgents):
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
     """
+    supports_async_learner = True
 
     def __init__(self,
                  config: Namespace,
@@ -32,8 +36,28 @@ class OffPolicyMARLAgents(MARLAgents):
         self.end_noise = config.end_noise if hasattr(config, "end_noise") else None
         self.delta_noise: Optional[float] = None
         self.noise_scale: Optional[float] = None
-        self.actions_low = self.action_space.low if hasattr(self.action_space, "low") else None
-        self.actions_high = self.action_space.high if hasattr(self.action_space, "high") else None
+        self.noise_type = config.noise_type if hasattr(config, "noise_type") else "Gaussian"
+        if self.noise_type not in ["Gaussian", "OU"]:
+            raise AttributeError(f"The noise_type should be 'Gaussian' or 'OU', but got {self.noise_type}.")
+        self.ou_theta = config.ou_theta if hasattr(config, "ou_theta") else 0.15
+        self.ou_noise: Optional[Tensor] = None
+        self.boltzmann_temperature = config.boltzmann_temperature if hasattr(config, "boltzmann_temperature") else None
+
+        # The action spaces of all agents as tensors, the dimensions of the agents being padded to the largest one.
+        spaces = [self.action_space[k] for k in self.agent_keys]
+        self.continuous_actions = all(hasattr(space, "low") for space in spaces)
+        if self.continuous_actions:
+            dim_act = max(space.shape[-1] for space in spaces)
+            actions_low, actions_high = np.zeros([self.n_agents, dim_act]), np.zeros([self.n_agents, dim_act])
+            for i, space in enumerate(spaces):
+                actions_low[i, :space.shape[-1]], actions_high[i, :space.shape[-1]] = space.low, space.high
+            self.actions_low = torch.as_tensor(actions_low, dtype=torch.float32, device=self.device)
+            self.actions_high = torch.as_tensor(actions_high, dtype=torch.float32, device=self.device)
+            self.n_actions = None
+        else:
+            self.actions_low, self.actions_high = None, None
+            self.n_actions = torch.as_tensor([space.n if hasattr(space, "n") else 0 for space in spaces],
+                                             device=self.device)
 
         self.auxiliary_info_shape = None
         self.memory: Optional[MARL_OffPolicyBuffer, MARL_OffPolicyBuffer_RNN] = None
@@ -41,6 +65,22 @@ class OffPolicyMARLAgents(MARLAgents):
         self.buffer_size = self.config.buffer_size
         self.batch_size = self.config.batch_size
 
+        self.use_async_learner = config.use_async_learner if hasattr(config, "use_async_learner") else False
+        self.async_learner: Optional[AsyncLearner] = None
+        if self.use_async_learner:
+            if self.use_rnn:
+                raise AttributeError("The asynchronous learner does not support RNN, which trains on whole episodes.")
+            if self.distributed_training:
+                raise AttributeError("The asynchronous learner does not support distributed training, whose "
+                                     "collective calls must be made in the same order by all processes.")
+            replay_ratio = config.replay_ratio if hasattr(config, "replay_ratio") else None
+            if replay_ratio is None:
+                replay_ratio = AsyncLearner.default_replay_ratio(self.n_envs, self.training_frequency, self.n_epochs)
+            sync_interval = config.actor_sync_interval if hasattr(config, "actor_sync_interval") else 1
+            max_lag = config.max_update_lag if hasattr(config, "max_update_lag") else 0
+            self.async_learner = AsyncLearner(self, lambda sample: self.learner.update(sample),
+                                              replay_ratio, sync_interval, max_lag)
+
     def _build_memory(self):
         """Build replay buffer for models training
         """
@@ -70,33 +110,31 @@ class OffPolicyMARLAgents(MARLAgents):
         Store experience data into replay buffer.
 
         Parameters:
-            obs_dict (List[dict]): Observations for each agent in self.agent_keys.
-            avail_actions (List[dict]): Actions mask values for each agent in self.agent_keys.
-            actions_dict (List[dict]): Actions for each agent in self.agent_keys.
-            obs_next_dict (List[dict]): Next observations for each agent in self.agent_keys.
-            avail_actions_next (List[dict]): The next actions mask values for each agent in self.agent_keys.
-            rewards_dict (List[dict]): Rewards for each agent in self.agent_keys.
-            terminals_dict (List[dict]): Terminated values for each agent in self.agent_keys.
-            info (List[dict]): Other information for the environment at current step.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions (Union[List[dict], dict]): Actions mask values for each agent in self.agent_keys.
+            actions_dict (Union[List[dict], dict]): Actions for each agent in self.agent_keys.
+            obs_next_dict (Union[List[dict], dict]): Next observations for each agent in self.agent_keys.
+            avail_actions_next (Union[List[dict], dict]): The next actions mask values for each agent.
+            rewards_dict (Union[List[dict], dict]): Rewards for each agent in self.agent_keys.
+            terminals_dict (Union[List[dict], dict]): Terminated values for each agent in self.agent_keys.
+            info (Union[List[dict], dict]): Other information for the environment at current step.
         """
         experience_data = {
-            'obs': {k: np.array([data[k] for data in obs_dict]) for k in self.agent_keys},
-            'actions': {k: np.array([data[k] for data in actions_dict]) for k in self.agent_keys},
-            'obs_next': {k: np.array([data[k] for data in obs_next_dict]) for k in self.agent_keys},
-            'rewards': {k: np.array([data[k] for data in rewards_dict]) for k in self.agent_keys},
-            'terminals': {k: np.array([data[k] for data in terminals_dict]) for k in self.agent_keys},
-            'agent_mask': {k: np.array([data['agent_mask'][k] for data in info]) for k in self.agent_keys},
+            'obs': self._agent_arrays(obs_dict),
+            'actions': self._agent_arrays(actions_dict),
+            'obs_next': self._agent_arrays(obs_next_dict),
+            'rewards': self._agent_arrays(rewards_dict),
+            'terminals': self._agent_arrays(terminals_dict),
+            'agent_mask': self._info_array(info, 'agent_mask'),
         }
         if self.use_rnn:
-            experience_data['episode_steps'] = np.array([data['episode_step'] - 1 for data in info])
+            experience_data['episode_steps'] = self._info_array(info, 'episode_step') - 1
         if self.use_global_state:
             experience_data['state'] = np.array(kwargs['state'])
             experience_data['state_next'] = np.array(kwargs['next_state'])
         if self.use_actions_mask:
-            experience_data['avail_actions'] = {k: np.array([data[k] for data in avail_actions])
-                                                for k in self.agent_keys}
-            experience_data['avail_actions_next'] = {k: np.array([data[k] for data in avail_actions_next])
-                                                     for k in self.agent_keys}
+            experience_data['avail_actions'] = self._agent_arrays(avail_actions)
+            experience_data['avail_actions_next'] = self._agent_arrays(avail_actions_next)
         self.memory.store(**experience_data)
 
     def init_rnn_hidden(self, n_envs):
@@ -147,44 +185,117 @@ class OffPolicyMARLAgents(MARLAgents):
         else:
             return
 
-    def exploration(self, batch_size: int,
-                    pi_actions_dict: Union[List[dict], dict],
-                    avail_actions_dict: Optional[List[dict]] = None):
-        """Returns the actions for exploration.
+    def _pack_outputs(self, outputs: Dict[str, Tensor], batch_size: int,
+                      vector: bool = False, padding: float = 0.0) -> Tensor:
+        """
+        Returns the outputs of the policy for all agents as one tensor, e.g., the actions or the Q-values.
+
+        Parameters:
+            outputs (Dict[str, Tensor]): The outputs of each model key, with batch_size (* n_agents) rows.
+            batch_size (int): The number of environments.
+            vector (bool): Whether the outputs of an agent are vectors, e.g., the continuous actions or the Q-values.
+            padding (float): The value of the padded dimensions of the agents with smaller vectors.
+
+        Returns:
+            The outputs with shape (batch_size, n_agents), or (batch_size, n_agents, dim) for the vectors.
+        """
+        if self.use_parameter_sharing:
+            shape = [batch_size, self.n_agents, -1] if vector else [batch_size, self.n_agents]
+            return outputs[self.model_keys[0]].reshape(shape)
+        values = [outputs[k].reshape([batch_size, -1] if vector else [batch_size]) for k in self.agent_keys]
+        if vector:
+            dim = max(v.shape[-1] for v in values)
+            values = [v if v.shape[-1] == dim else pad(v, (0, dim - v.shape[-1]), value=padding) for v in values]
+        return torch.stack(values, dim=1)
+
+    def _packed_avail_actions(self, avail_actions_dict: Optional[Union[List[dict], dict]],
+                              batch_size: int) -> Optional[Tensor]:
+        """
+        Returns the actions masks of all agents as one tensor on the device.
+
+        Parameters:
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
+            batch_size (int): The number of environments.
+
+        Returns:
+            The actions masks with shape (batch_size, n_agents, n_actions), the actions beyond the action space of an
+            agent being unavailable, or None if use_actions_mask is False or avail_actions_dict is None.
+        """
+        if not self.use_actions_mask or avail_actions_dict is None:
+            return None
+        arrays = self._agent_arrays(avail_actions_dict)
+        avail_actions = {k: torch.as_tensor(arrays[k], dtype=torch.float32, device=self.device)
+                         for k in self.agent_keys}
+        if self.use_parameter_sharing:
+            return torch.stack([avail_actions[k] for k in self.agent_keys], dim=1)
+        return self._pack_outputs(avail_actions, batch_size, vector=True)
+
+    def _unpack_actions(self, actions: Tensor, batch_size: int) -> Union[List[dict], dict]:
+        """
+        Returns the packed actions of all agents as NumPy arrays in the format of the environments.
 
         Parameters:
-            batch_size (int): The batch size.
-            pi_actions_dict (Optional[List[dict], dict]): The original output actions.
-            avail_actions_dict (Optional[List[dict]]): Actions mask values, default is None.
+            actions (Tensor): The actions with shape (batch_size, n_agents(, dim_act)).
+            batch_size (int): The number of environments.
+
+        Returns:
+            actions_dict: The actions of each agent in self.agent_keys.
+        """
+        actions = actions.detach().cpu().numpy()
+        if self.continuous_actions:
+            actions_out = {k: actions[:, i, :self.action_space[k].shape[-1]] for i, k in enumerate(self.agent_keys)}
+        else:
+            actions_out = {k: actions[:, i] for i, k in enumerate(self.agent_keys)}
+        return self._env_batch(actions_out, batch_size)
+
+    def _reset_noise(self, env_ids: np.ndarray):
+        """Resets the Ornstein-Uhlenbeck noise of the environments that ended an episode."""
+        if self.ou_noise is not None:
+            self.ou_noise[env_ids] = 0.0
+
+    @torch.no_grad()
+    def exploration(self, pi_actions: Tensor,
+                    avail_actions: Optional[Tensor] = None,
+                    q_values: Optional[Tensor] = None):
+        """Returns the actions for exploration, drawn for all agents and environments at once on the device.
+
+        Parameters:
+            pi_actions (Tensor): The greedy discrete actions with shape (batch_size, n_agents), or the continuous
+                actions with shape (batch_size, n_agents, dim_act).
+            avail_actions (Optional[Tensor]): Actions mask values with shape (batch_size, n_agents, n_actions).
+            q_values (Optional[Tensor]): The Q-values with shape (batch_size, n_agents, n_actions) for the Boltzmann
+                exploration, default is None.
 
         Returns:
             explore_actions: The actions with noisy values.
         """
+        if self.boltzmann_temperature is not None and q_values is not None:
+            logits = q_values / self.boltzmann_temperature
+            if avail_actions is not None:
+                logits = logits.masked_fill(avail_actions == 0, -1e10)
+            return Categorical(logits=logits).sample()
         if self.e_greedy is not None:
-            if np.random.rand() < self.e_greedy:
-                if self.use_actions_mask:
-                    explore_actions = [{k: Categorical(Tensor(avail_actions_dict[e][k])).sample().numpy()
-                                        for k in self.agent_keys} for e in range(batch_size)]
-                else:
-                    explore_actions = [{k: self.action_space[k].sample() for k in self.agent_keys} for _ in
-                                       range(batch_size)]
+            if avail_actions is not None:
+                n_actions = avail_actions.shape[-1]
+                random_actions = torch.multinomial(avail_actions.reshape(-1, n_actions), 1).reshape(pi_actions.shape)
             else:
-                explore_actions = pi_actions_dict
-        elif self.noise_scale is not None:
-            if self.use_parameter_sharing:
-                key = self.agent_keys[0]
-                pi_actions_dict[key] += np.random.normal(0, self.noise_scale, size=pi_actions_dict[key].shape)
+                random_actions = (torch.rand(pi_actions.shape, device=self.device) * self.n_actions).long()
+            explore = torch.rand(pi_actions.shape, device=self.device) < self.e_greedy
+            return torch.where(explore, random_actions, pi_actions)
+        if self.noise_scale is not None:
+            if self.noise_type == "OU":
+                if self.ou_noise is None or self.ou_noise.shape != pi_actions.shape:
+                    self.ou_noise = torch.zeros_like(pi_actions)
+                self.ou_noise += self.noise_scale * torch.randn_like(pi_actions) - self.ou_theta * self.ou_noise
+                noise = self.ou_noise
             else:
-                for key in self.agent_keys:
-                    pi_actions_dict[key] += np.random.normal(0, self.noise_scale, size=pi_actions_dict[key].shape)
-            explore_actions = pi_actions_dict
-        else:
-            explore_actions = pi_actions_dict
-        return explore_actions
+                noise = self.noise_scale * torch.randn_like(pi_actions)
+            return torch.clamp(pi_actions + noise, self.actions_low, self.actions_high)
+        return pi_actions
 
     def action(self,
-               obs_dict: List[dict],
-               avail_actions_dict: Optional[List[dict]] = None,
+               obs_dict: Union[List[dict], dict],
+               avail_actions_dict: Optional[Union[List[dict], dict]] = None,
                rnn_hidden: Optional[dict] = None,
                test_mode: Optional[bool] = False,
                **kwargs):
@@ -192,8 +303,8 @@ class OffPolicyMARLAgents(MARLAgents):
         Returns actions for agents.
 
         Parameters:
-            obs_dict (List[dict]): Observations for each agent in self.agent_keys.
-            avail_actions_dict (Optional[List[dict]]): Actions mask values, default is None.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
             rnn_hidden (Optional[dict]): The hidden variables of the RNN.
             test_mode (Optional[bool]): True for testing without noises.
 
@@ -201,24 +312,38 @@ class OffPolicyMARLAgents(MARLAgents):
             rnn_hidden_state (dict): The new hidden states for RNN (if self.use_rnn=True).
             actions_dict (dict): The output actions.
         """
-        batch_size = len(obs_dict)
+        batch_size = self._batch_size(obs_dict)
         obs_input, agents_id, avail_actions_input = self._build_inputs(obs_dict, avail_actions_dict)
-        hidden_state, actions, _ = self.policy(observation=obs_input,
-                                               agent_ids=agents_id,
-                                               avail_actions=avail_actions_input,
-                                               rnn_hidden=rnn_hidden)
-
-        if self.use_parameter_sharing:
-            key = self.agent_keys[0]
-            actions_out = actions[key].reshape([batch_size, self.n_agents]).cpu().detach().numpy()
-            actions_dict = [{k: actions_out[e, i] for i, k in enumerate(self.agent_keys)} for e in range(batch_size)]
-        else:
-            actions_out = {k: actions[k].reshape(batch_size).cpu().detach().numpy() for k in self.agent_keys}
-            actions_dict = [{k: actions_out[k][i] for k in self.agent_keys} for i in range(batch_size)]
+        hidden_state, actions, evalQ = self.policy(observation=obs_input,
+                                                   agent_ids=agents_id,
+                                                   avail_actions=avail_actions_input,
+                                                   rnn_hidden=rnn_hidden)
 
+        actions_out = self._pack_outputs(actions, batch_size)
         if not test_mode:  # get random actions
-            actions_dict = self.exploration(batch_size, actions_dict, avail_actions_dict)
-        return {"hidden_state": hidden_state, "actions": actions_dict}
+            q_values = None
+            if self.boltzmann_temperature is not None:
+                q_values = self._pack_outputs(evalQ, batch_size, vector=True, padding=-1e10)
+            actions_out = self.exploration(actions_out, self._packed_avail_actions(avail_actions_dict, batch_size),
+                                           q_values)
+        return {"hidden_state": hidden_state, "actions": self._unpack_actions(actions_out, batch_size)}
+
+    def _async_train_info(self, infos: list) -> dict:
+        """
+        Record the information of the updates done by the asynchronous learner, as train_epochs() does.
+
+        Parameters:
+            infos (list): The information returned by the learner updates.
+
+        Returns:
+            info_train (dict): The information of training.
+        """
+        info_train = {}
+        for info in infos:
+            info_train = self.metrics.record(info)
+        info_train["epsilon-greedy"] = self.e_greedy
+        info_train["noise_scale"] = self.noise_scale
+        return info_train
 
     def train(self, n_steps):
         """
@@ -230,7 +355,7 @@ class OffPolicyMARLAgents(MARLAgents):
         return_info = {}
         if self.use_rnn:
             with tqdm(total=n_steps) as process_bar:
-                step_start, step_last = deepcopy(self.current_step), deepcopy(self.current_step)
+                step_start, step_last = self.current_step, self.current_step
                 n_steps_all = n_steps * self.n_envs
                 while step_last - step_start < n_steps_all:
                     self.run_episodes(None, n_episodes=self.n_envs, test_mode=False)
@@ -239,56 +364,57 @@ class OffPolicyMARLAgents(MARLAgents):
                         self.log_infos(train_info, self.current_step)
                         return_info.update(train_info)
                     process_bar.update((self.current_step - step_last) // self.n_envs)
-                    step_last = deepcopy(self.current_step)
+                    step_last = self.current_step
                 process_bar.update(n_steps - process_bar.last_print_n)
             return return_info
 
-        obs_dict = self.envs.buf_obs
-        avail_actions = self.envs.buf_avail_actions if self.use_actions_mask else None
+        obs_dict = self._copy_batch(self.envs.buf_obs)
+        avail_actions = self._copy_batch(self.envs.buf_avail_actions) if self.use_actions_mask else None
         state = self.envs.buf_state.copy() if self.use_global_state else None
+        acting_lock = nullcontext() if self.async_learner is None else self.async_learner.policy_lock
+        memory_lock = nullcontext() if self.async_learner is None else self.async_learner.memory_lock
         for _ in tqdm(range(n_steps)):
-            step_info = {}
-            policy_out = self.action(obs_dict=obs_dict, avail_actions_dict=avail_actions, test_mode=False)
+            obs_dict = self._process_observation(obs_dict, update_rms=True)
+            with acting_lock:
+                policy_out = self.action(obs_dict=obs_dict, avail_actions_dict=avail_actions, test_mode=False)
             actions_dict = policy_out['actions']
             next_obs_dict, rewards_dict, terminated_dict, truncated, info = self.envs.step(actions_dict)
             next_state = self.envs.buf_state.copy() if self.use_global_state else None
             next_avail_actions = self.envs.buf_avail_actions if self.use_actions_mask else None
-            self.store_experience(obs_dict, avail_actions, actions_dict, next_obs_dict, next_avail_actions,
-                                  rewards_dict, terminated_dict, info,
-                                  **{'state': state, 'next_state': next_state})
-            if self.current_step >= self.start_training and self.current_step % self.training_frequency == 0:
+            with memory_lock:
+                self.store_experience(obs_dict, avail_actions, actions_dict, self._process_observation(next_obs_dict),
+                                      next_avail_actions, rewards_dict, terminated_dict, info,
+                                      **{'state': state, 'next_state': next_state})
+            if self.async_learner is not None:
+                if self.current_step >= self.start_training:
+                    updates = self.async_learner.step(self.n_envs)
+                    if updates:
+                        train_info = self._async_train_info(updates)
+                        self.log_infos(train_info, self.current_step)
+                        return_info.update(train_info)
+            elif self.current_step >= self.start_training and self.current_step % self.training_frequency == 0:
                 train_info = self.train_epochs(n_epochs=self.n_epochs)
                 self.log_infos(train_info, self.current_step)
                 return_info.update(train_info)
-            obs_dict = deepcopy(next_obs_dict)
-            if self.use_global_state:
-                state = deepcopy(next_state)
-            if self.use_actions_mask:
-                avail_actions = deepcopy(next_avail_actions)
-
-            for i in range(self.n_envs):
-                if all(terminated_dict[i].values()) or truncated[i]:
-                    obs_dict[i] = info[i]["reset_obs"]
-                    self.envs.buf_obs[i] = info[i]["reset_obs"]
-                    if self.use_global_state:
-                        state = info[i]["reset_state"]
-                        self.envs.buf_state[i] = info[i]["reset_state"]
-                    if self.use_actions_mask:
-                        avail_actions[i] = info[i]["reset_avail_actions"]
-                        self.envs.buf_avail_actions[i] = info[i]["reset_avail_actions"]
-                    if self.use_wandb:
-                        step_info[f"Train-Results/Episode-Steps/rank_{self.rank}/env-%d" % i] = info[i]["episode_step"]
-                        step_info[f"Train-Results/Episode-Rewards/rank_{self.rank}/env-%d" % i] = info[i]["episode_score"]
-                    else:
-                        step_info[f"Train-Results/Episode-Steps/rank_{self.rank}"] = {
-                            "env-%d" % i: info[i]["episode_step"]}
-                        step_info[f"Train-Results/Episode-Rewards/rank_{self.rank}"] = {
-                            "env-%d" % i: np.mean(itemgetter(*self.agent_keys)(info[i]["episode_score"]))}
-                    self.log_infos(step_info, self.current_step)
-                    return_info.update(step_info)
+            obs_dict, state = next_obs_dict, next_state
+            avail_actions = self._copy_batch(next_avail_actions) if self.use_actions_mask else None
+
+            done_ids = np.flatnonzero(np.logical_or(self._terminated_mask(terminated_dict), truncated))
+            if len(done_ids) > 0:
+                self._reset_noise(done_ids)
+                self._reset_observations(done_ids, info, obs_dict, avail_actions, state)
+                step_info = self._episode_info(done_ids, info)
+                self.log_infos(step_info, self.current_step)
+                return_info.update(step_info)
 
             self.current_step += self.n_envs
             self._update_explore_factor()
+        if self.async_learner is not None:
+            updates = self.async_learner.wait()
+            if updates:
+                train_info = self._async_train_info(updates)
+                self.log_infos(train_info, self.current_step)
+                return_info.update(train_info)
         return return_info
 
     def run_episodes(self, env_fn=None, n_episodes: int = 1, test_mode: bool = False):
@@ -309,7 +435,7 @@ class OffPolicyMARLAgents(MARLAgents):
         episode_count, scores, best_score = 0, [0.0 for _ in range(num_envs)], -np.inf
         obs_dict, info = envs.reset()
         state = envs.buf_state.copy() if self.use_global_state else None
-        avail_actions = envs.buf_avail_actions if self.use_actions_mask else None
+        avail_actions = self._copy_batch(envs.buf_avail_actions) if self.use_actions_mask else None
         if test_mode:
             if self.config.render_mode == "rgb_array" and self.render:
                 images = envs.render(self.config.render_mode)
@@ -322,6 +448,7 @@ class OffPolicyMARLAgents(MARLAgents):
 
         while episode_count < n_episodes:
             step_info = {}
+            obs_dict = self._process_observation(obs_dict, update_rms=not test_mode)
             policy_out = self.action(obs_dict=obs_dict,
                                      avail_actions_dict=avail_actions,
                                      rnn_hidden=rnn_hidden,
@@ -336,55 +463,50 @@ class OffPolicyMARLAgents(MARLAgents):
                     for idx, img in enumerate(images):
                         videos[idx].append(img)
             else:
-                self.store_experience(obs_dict, avail_actions, actions_dict, next_obs_dict, next_avail_actions,
-                                      rewards_dict, terminated_dict, info,
+                self.store_experience(obs_dict, avail_actions, actions_dict, self._process_observation(next_obs_dict),
+                                      next_avail_actions, rewards_dict, terminated_dict, info,
                                       **{'state': state, 'next_state': next_state})
-            obs_dict = deepcopy(next_obs_dict)
-            if self.use_global_state:
-                state = deepcopy(next_state)
-            if self.use_actions_mask:
-                avail_actions = deepcopy(next_avail_actions)
-
-            for i in range(num_envs):
-                if all(terminated_dict[i].values()) or truncated[i]:
-                    episode_count += 1
-                    obs_dict[i] = info[i]["reset_obs"]
-                    envs.buf_obs[i] = info[i]["reset_obs"]
-                    if self.use_global_state:
-                        state = info[i]["reset_state"]
-                        self.envs.buf_state[i] = info[i]["reset_state"]
-                    if self.use_actions_mask:
-                        avail_actions[i] = info[i]["reset_avail_actions"]
-                        envs.buf_avail_actions[i] = info[i]["reset_avail_actions"]
-                    if self.use_rnn:
-                        rnn_hidden = self.init_hidden_item(i_env=i, rnn_hidden=rnn_hidden)
-                        if not test_mode:
-                            terminal_data = {'obs': next_obs_dict[i],
-                                             'episode_step': info[i]['episode_step']}
-                            if self.use_global_state:
-                                terminal_data['state'] = next_state[i]
-                            if self.use_actions_mask:
-                                terminal_data['avail_actions'] = next_avail_actions[i]
-                            self.memory.finish_path(i, **terminal_data)
-                    episode_score = float(np.mean(itemgetter(*self.agent_keys)(info[i]["episode_score"])))
-                    scores.append(episode_score)
-                    if test_mode:
-                        if best_score < episode_score:
-                            best_score = episode_score
-                            episode_videos = videos[i].copy()
-                        if self.config.test_mode:
-                            print("Episode: %d, Score: %.2f" % (episode_count, episode_score))
+            obs_dict = self._copy_batch(next_obs_dict)
+            state = next_state.copy() if self.use_global_state else None
+            avail_actions = self._copy_batch(next_avail_actions) if self.use_actions_mask else None
+
+            done_ids = np.flatnonzero(np.logical_or(self._terminated_mask(terminated_dict), truncated))
+            for i in done_ids:
+                episode_count += 1
+                info_i = self._env_item(info, i)
+                if self.use_rnn:
+                    rnn_hidden = self.init_hidden_item(i_env=i, rnn_hidden=rnn_hidden)
+                    if not test_mode:
+                        terminal_data = {'obs': self._process_observation([self._env_item(next_obs_dict, i)])[0],
+                                         'episode_step': info_i['episode_step']}
+                        if self.use_global_state:
+                            terminal_data['state'] = next_state[i]
+                        if self.use_actions_mask:
+                            terminal_data['avail_actions'] = self._env_item(next_avail_actions, i)
+                        self.memory.finish_path(i, **terminal_data)
+                episode_score = float(np.mean(itemgetter(*self.agent_keys)(info_i["episode_score"])))
+                scores.append(episode_score)
+                if test_mode:
+                    if best_score < episode_score:
+                        best_score = episode_score
+                        episode_videos = videos[i].copy()
+                    if self.config.test_mode:
+                        print("Episode: %d, Score: %.2f" % (episode_count, episode_score))
+                else:
+                    if self.use_wandb:
+                        step_info["Train-Results/Episode-Steps/env-%d" % i] = info_i["episode_step"]
+                        step_info["Train-Results/Episode-Rewards/env-%d" % i] = info_i["episode_score"]
                     else:
-                        if self.use_wandb:
-                            step_info["Train-Results/Episode-Steps/env-%d" % i] = info[i]["episode_step"]
-                            step_info["Train-Results/Episode-Rewards/env-%d" % i] = info[i]["episode_score"]
-                        else:
-                            step_info["Train-Results/Episode-Steps"] = {"env-%d" % i: info[i]["episode_step"]}
-                            step_info["Train-Results/Episode-Rewards"] = {
-                                "env-%d" % i: np.mean(itemgetter(*self.agent_keys)(info[i]["episode_score"]))}
-                        self.current_step += info[i]["episode_step"]
-                        self.log_infos(step_info, self.current_step)
-                        self._update_explore_factor()
+                        step_info["Train-Results/Episode-Steps"] = {"env-%d" % i: info_i["episode_step"]}
+                        step_info["Train-Results/Episode-Rewards"] = {
+                            "env-%d" % i: np.mean(itemgetter(*self.agent_keys)(info_i["episode_score"]))}
+                    self.current_step += int(info_i["episode_step"])
+                    self.log_infos(step_info, self.current_step)
+                    self._update_explore_factor()
+            if len(done_ids) > 0:
+                if not test_mode:
+                    self._reset_noise(done_ids)
+                self._reset_observations(done_ids, info, obs_dict, avail_actions, state, envs=envs)
 
         if test_mode:
             if self.config.render_mode == "rgb_array" and self.render:
@@ -422,6 +544,7 @@ class OffPolicyMARLAgents(MARLAgents):
                 info_train = self.learner.update_rnn(sample)
             else:
                 info_train = self.learner.update(sample)
+            info_train = self.metrics.record(info_train)
         info_train["epsilon-greedy"] = self.e_greedy
         info_train["noise_scale"] = self.noise_scale
         return info_train
@@ -439,3 +562,8 @@ class OffPolicyMARLAgents(MARLAgents):
         """
         scores = self.run_episodes(env_fn=env_fn, n_episodes=n_episodes, test_mode=True)
         return scores
+
+    def finish(self):
+        if self.async_learner is not None:
+            self.async_learner.stop()
+        super(OffPolicyMARLAgents, self).finish()
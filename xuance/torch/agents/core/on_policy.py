@@ -1,11 +1,10 @@
 import numpy as np
 from tqdm import tqdm
-from copy import deepcopy
 from argparse import Namespace
 from xuance.common import Optional, Union, DummyOnPolicyBuffer, DummyOnPolicyBuffer_Atari
 from xuance.environment import DummyVecEnv, SubprocVecEnv
 from xuance.torch import Module
-from xuance.torch.utils import split_distributions
+from xuance.torch.utils import split_distributions, RolloutMinibatches
 from xuance.torch.agents.base import Agent
 
 
@@ -56,7 +55,7 @@ class OnPolicyAgent(Agent):
         Returns:
             values_next: The values for terminal states.
         """
-        policy_out = self.action(self._process_observation(observations_next))
+        policy_out = self.action(self._normalize_observation(observations_next))
         values_next = policy_out['values']
         return values_next
 
@@ -97,73 +96,85 @@ class OnPolicyAgent(Agent):
         """
         return {}
 
+    def _end_episodes(self, next_obs, rewards: np.ndarray, terminals: np.ndarray, trunctions: np.ndarray,
+                      infos: list):
+        """Updates the returns and finishes the paths of all environments that ended an episode at this step.
+
+        Parameters:
+            next_obs: The next observations returned by the vectorized environments.
+            rewards (np.ndarray): The rewards of current step.
+            terminals (np.ndarray): The terminated flags of current step.
+            trunctions (np.ndarray): The truncated flags of current step.
+            infos (list): The information returned by the vectorized environments.
+
+        Returns:
+            obs: The observations for the next step, with reset observations for the finished environments.
+            step_info (dict): The episode information of the finished environments.
+        """
+        next_obs = self._copy_observations(next_obs)
+        self.returns = self.gamma * self.returns + rewards
+        dones = np.logical_or(terminals, trunctions)
+        done_ids = np.flatnonzero(dones)
+        self.ret_rms.update(self.returns[done_ids])  # Every step: it is collective in distributed training.
+        if len(done_ids) == 0:
+            return next_obs, {}
+        self.returns[done_ids] = 0.0
+        reset_ids = np.flatnonzero(trunctions) if self.atari else done_ids
+        if len(reset_ids) == 0:
+            return next_obs, {}
+        if terminals[reset_ids].all():
+            vals = np.zeros(self.n_envs, np.float32)
+        else:
+            vals = np.where(terminals, 0.0, self.get_terminated_values(next_obs, rewards))
+        for i in reset_ids:
+            self.memory.finish_path(vals[i], i)
+        obs = self._reset_observations(next_obs, reset_ids, infos)
+        self.current_episode[reset_ids] += 1
+        return obs, self._episode_info(reset_ids, infos)
+
     def train_epochs(self, n_epochs: int = 1) -> dict:
         indexes = np.arange(self.buffer_size)
+        # The rollout is converted to tensors once, and each minibatch is gathered from them.
+        rollout = RolloutMinibatches(self.memory.rollout(), self.device,
+                                     normalize=["advantages"] if self.memory.use_advnorm else [])
         train_info = {}
         for _ in range(n_epochs):
             np.random.shuffle(indexes)
-            for start in range(0, self.buffer_size, self.batch_size):
-                end = start + self.batch_size
-                sample_idx = indexes[start:end]
-                samples = self.memory.sample(sample_idx)
-                train_info = self.learner.update(**samples)
+            for samples in rollout.minibatches(indexes, self.batch_size):
+                train_info = self.metrics.record(self.learner.update(**samples))
         return train_info
 
     def train(self, train_steps: int) -> dict:
         return_info = {}
-        obs = self.envs.buf_obs
+        obs = self._copy_observations(self.envs.buf_obs, copy_arrays=True)
         for _ in tqdm(range(train_steps)):
-            step_info = {}
             self.obs_rms.update(obs)
-            obs = self._process_observation(obs)
+            obs = self._normalize_observation(obs)
             policy_out = self.action(obs, return_dists=False, return_logpi=False)
             acts, vals = policy_out['actions'], policy_out['values']
             next_obs, rewards, terminals, trunctions, infos = self.envs.step(acts)
             aux_info = self.get_aux_info()
-            self.memory.store(obs, acts, self._process_reward(rewards), vals, terminals, aux_info)
+            self.memory.store(self._observations_to_numpy(obs), acts, self._process_reward(rewards), vals, terminals, aux_info)
             if self.memory.full:
                 vals = self.get_terminated_values(next_obs, rewards)
+                vals = np.where(terminals, 0.0, vals)
                 for i in range(self.n_envs):
-                    if terminals[i]:
-                        self.memory.finish_path(0.0, i)
-                    else:
-                        self.memory.finish_path(vals[i], i)
+                    self.memory.finish_path(vals[i], i)
                 train_info = self.train_epochs(self.n_epochs)
                 self.log_infos(train_info, self.current_step)
                 return_info.update(train_info)
                 self.memory.clear()
 
-            self.returns = self.gamma * self.returns + rewards
-            obs = deepcopy(next_obs)
-            for i in range(self.n_envs):
-                if terminals[i] or trunctions[i]:
-                    self.ret_rms.update(self.returns[i:i + 1])
-                    self.returns[i] = 0.0
-                    if self.atari and (~trunctions[i]):
-                        pass
-                    else:
-                        if terminals[i]:
-                            self.memory.finish_path(0, i)
-                        else:
-                            vals = self.get_terminated_values(next_obs, rewards)
-                            self.memory.finish_path(vals[i], i)
-                        obs[i] = infos[i]["reset_obs"]
-                        self.envs.buf_obs[i] = obs[i]
-                        self.current_episode[i] += 1
-                        if self.use_wandb:
-                            step_info[f"Episode-Steps/rank_{self.rank}/env-{i}"] = infos[i]["episode_step"]
-                            step_info[f"Train-Episode-Rewards/rank_{self.rank}/env-{i}"] = infos[i]["episode_score"]
-                        else:
-                            step_info[f"Episode-Steps/rank_{self.rank}"] = {f"env-{i}": infos[i]["episode_step"]}
-                            step_info[f"Train-Episode-Rewards/rank_{self.rank}"] = {
-                                f"env-{i}": infos[i]["episode_score"]}
-                        self.log_infos(step_info, self.current_step)
-                        return_info.update(step_info)
+            obs, step_info = self._end_episodes(next_obs, rewards, terminals, trunctions, infos)
+            if step_info:
+                self.log_infos(step_info, self.current_step)
+                return_info.update(step_info)
             self.current_step += self.n_envs
         return return_info
 
     def test(self, env_fn, test_episodes: int) -> list:
         test_envs = env_fn()
+        self.obs_rms.freeze()  # evaluation must not shift the statistics used in training.
         num_envs = test_envs.num_envs
         videos, episode_videos = [[] for _ in range(num_envs)], []
         current_episode, scores, best_score = 0, [], -np.inf
@@ -175,7 +186,7 @@ class OnPolicyAgent(Agent):
 
         while current_episode < test_episodes:
             self.obs_rms.update(obs)
-            obs = self._process_observation(obs)
+            obs = self._normalize_observation(obs)
             policy_out = self.action(obs)
             next_obs, rewards, terminals, trunctions, infos = test_envs.step(policy_out['actions'])
             if self.config.render_mode == "rgb_array" and self.render:
@@ -183,7 +194,7 @@ class OnPolicyAgent(Agent):
                 for idx, img in enumerate(images):
                     videos[idx].append(img)
 
-            obs = deepcopy(next_obs)
+            obs = self._copy_observations(next_obs)
             for i in range(num_envs):
                 if terminals[i] or trunctions[i]:
                     if self.atari and (~trunctions[i]):
@@ -213,6 +224,7 @@ class OnPolicyAgent(Agent):
         self.log_infos(test_info, self.current_step)
 
         test_envs.close()
+        self.obs_rms.unfreeze()
 
         return scores
 
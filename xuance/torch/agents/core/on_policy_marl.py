@@ -1,12 +1,11 @@
 from tqdm import tqdm
-import torch
 import numpy as np
-from copy import deepcopy
 from argparse import Namespace
 from operator import itemgetter
 from xuance.common import MARL_OnPolicyBuffer, MARL_OnPolicyBuffer_RNN, Optional, List, Union
 from xuance.environment import DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv
 from xuance.torch import Module
+from xuance.torch.utils import RolloutMinibatches
 from xuance.torch.agents.base import MARLAgents
 
 
@@ -62,32 +61,31 @@ class OnPolicyMARLAgents(MARLAgents):
         Store experience data into replay buffer.
 
         Parameters:
-            obs_dict (List[dict]): Observations for each agent in self.agent_keys.
-            avail_actions (List[dict]): Actions mask values for each agent in self.agent_keys.
-            actions_dict (List[dict]): Actions for each agent in self.agent_keys.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions (Union[List[dict], dict]): Actions mask values for each agent in self.agent_keys.
+            actions_dict (Union[List[dict], dict]): Actions for each agent in self.agent_keys.
             log_pi_a (dict): The log of pi.
-            rewards_dict (List[dict]): Rewards for each agent in self.agent_keys.
+            rewards_dict (Union[List[dict], dict]): Rewards for each agent in self.agent_keys.
             values_dict (dict): Critic values for each agent in self.agent_keys.
-            terminals_dict (List[dict]): Terminated values for each agent in self.agent_keys.
-            info (List[dict]): Other information for the environment at current step.
+            terminals_dict (Union[List[dict], dict]): Terminated values for each agent in self.agent_keys.
+            info (Union[List[dict], dict]): Other information for the environment at current step.
             **kwargs: Other inputs.
         """
         experience_data = {
-            'obs': {k: np.array([data[k] for data in obs_dict]) for k in self.agent_keys},
-            'actions': {k: np.array([data[k] for data in actions_dict]) for k in self.agent_keys},
+            'obs': self._agent_arrays(obs_dict),
+            'actions': self._agent_arrays(actions_dict),
             'log_pi_old': log_pi_a,
-            'rewards': {k: np.array([data[k] for data in rewards_dict]) for k in self.agent_keys},
+            'rewards': self._agent_arrays(rewards_dict),
             'values': values_dict,
-            'terminals': {k: np.array([data[k] for data in terminals_dict]) for k in self.agent_keys},
-            'agent_mask': {k: np.array([data['agent_mask'][k] for data in info]) for k in self.agent_keys},
+            'terminals': self._agent_arrays(terminals_dict),
+            'agent_mask': self._info_array(info, 'agent_mask'),
         }
         if self.use_rnn:
-            experience_data['episode_steps'] = np.array([data['episode_step'] - 1 for data in info])
+            experience_data['episode_steps'] = self._info_array(info, 'episode_step') - 1
         if self.use_global_state:
             experience_data['state'] = np.array(kwargs['state'])
         if self.use_actions_mask:
-            experience_data['avail_actions'] = {k: np.array([data[k] for data in avail_actions])
-                                                for k in self.agent_keys}
+            experience_data['avail_actions'] = self._agent_arrays(avail_actions)
         self.memory.store(**experience_data)
 
     def init_rnn_hidden(self, n_envs):
@@ -99,9 +97,10 @@ class OnPolicyMARLAgents(MARLAgents):
         """
         rnn_hidden_actor, rnn_hidden_critic = None, None
         if self.use_rnn:
-            batch = n_envs * self.n_agents if self.use_parameter_sharing else n_envs
-            rnn_hidden_actor = {k: self.policy.actor_representation[k].init_hidden(batch) for k in self.model_keys}
-            rnn_hidden_critic = {k: self.policy.critic_representation[k].init_hidden(batch) for k in self.model_keys}
+            rnn_hidden_actor = {k: self.policy.actor_representation[k].init_hidden(n_envs * len(group))
+                                for k, group in self.agent_groups.items()}
+            rnn_hidden_critic = {k: self.policy.critic_representation[k].init_hidden(n_envs * len(group))
+                                 for k, group in self.agent_groups.items()}
         return rnn_hidden_actor, rnn_hidden_critic
 
     def init_hidden_item(self,
@@ -117,22 +116,65 @@ class OnPolicyMARLAgents(MARLAgents):
             rnn_hidden_critic (Optional[dict]): The RNN hidden states of critic representation.
         """
         assert self.use_rnn is True, "This method cannot be called when self.use_rnn is False."
-        if self.use_parameter_sharing:
-            b_index = np.arange(i_env * self.n_agents, (i_env + 1) * self.n_agents)
-        else:
-            b_index = [i_env, ]
         for k in self.model_keys:
-            rnn_hidden_actor[k] = self.policy.actor_representation[k].init_hidden_item(b_index, *rnn_hidden_actor[k])
+            rnn_hidden_actor[k] = self.policy.actor_representation[k].init_hidden_item(self._hidden_index(k, i_env),
+                                                                                       *rnn_hidden_actor[k])
         if rnn_hidden_critic is None:
             return rnn_hidden_actor, None
         for k in self.model_keys:
-            rnn_hidden_critic[k] = self.policy.critic_representation[k].init_hidden_item(b_index, *rnn_hidden_critic[k])
+            rnn_hidden_critic[k] = self.policy.critic_representation[k].init_hidden_item(self._hidden_index(k, i_env),
+                                                                                         *rnn_hidden_critic[k])
         return rnn_hidden_actor, rnn_hidden_critic
 
+    def _hidden_index(self, key: str, i_env: int) -> np.ndarray:
+        """Returns the rows of the i-th environment in the RNN hidden states of a model key, one per agent."""
+        n_group = len(self.agent_groups[key])
+        return np.arange(i_env * n_group, (i_env + 1) * n_group)
+
+    def _policy_outputs(self, pi_dists: dict, values_out: dict, n_env: int, test_mode: Optional[bool] = False):
+        """
+        Samples the actions from the policy distributions of the model keys, and splits the actions, the log
+        probabilities and the critic values of each model key into the values of its agents.
+
+        Parameters:
+            pi_dists (dict): The policy distributions of each model key.
+            values_out (dict): The critic values of each model key (when test_mode is False).
+            n_env (int): The number of environments.
+            test_mode (Optional[bool]): True for testing without the log probabilities and the values.
+
+        Returns:
+            actions_dict: The actions, in the format of the environments.
+            log_pi_a_dict (dict): The log of pi of each agent.
+            values_dict (dict): The critic values of each agent.
+        """
+        actions_out, log_pi_a_dict, values_dict = {}, {}, {}
+        for key, group in self.agent_groups.items():
+            n_group = len(group)
+            actions_sample = pi_dists[key].stochastic_sample()
+            if self.continuous_control:
+                actions_group = actions_sample.reshape(n_env, n_group, -1).cpu().detach().numpy()
+            else:
+                actions_group = actions_sample.reshape(n_env, n_group).cpu().detach().numpy()
+            actions_out.update({k: actions_group[:, i] for i, k in enumerate(group)})
+            if not test_mode:
+                log_pi_a = pi_dists[key].log_prob(actions_sample).cpu().detach().numpy().reshape(n_env, n_group)
+                log_pi_a_dict.update({k: log_pi_a[:, i] for i, k in enumerate(group)})
+        if not test_mode:
+            values_dict = self._agent_values(values_out, n_env)
+        return self._env_batch(actions_out, n_env), log_pi_a_dict, values_dict
+
+    def _agent_values(self, values_out: dict, n_env: int) -> dict:
+        """Splits the critic values of each model key into the values of its agents, with shape (n_env, )."""
+        values_dict = {}
+        for key, group in self.agent_groups.items():
+            values_group = values_out[key].cpu().detach().numpy().reshape(n_env, len(group))
+            values_dict.update({k: values_group[:, i] for i, k in enumerate(group)})
+        return values_dict
+
     def action(self,
-               obs_dict: List[dict],
+               obs_dict: Union[List[dict], dict],
                state: Optional[np.ndarray] = None,
-               avail_actions_dict: Optional[List[dict]] = None,
+               avail_actions_dict: Optional[Union[List[dict], dict]] = None,
                rnn_hidden_actor: Optional[dict] = None,
                rnn_hidden_critic: Optional[dict] = None,
                test_mode: Optional[bool] = False,
@@ -141,9 +183,9 @@ class OnPolicyMARLAgents(MARLAgents):
         Returns actions for agents.
 
         Parameters:
-            obs_dict (dict): Observations for each agent in self.agent_keys.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
             state (Optional[np.ndarray]): The global state.
-            avail_actions_dict (Optional[List[dict]]): Actions mask values, default is None.
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
             rnn_hidden_actor (Optional[dict]): The RNN hidden states of actor representation.
             rnn_hidden_critic (Optional[dict]): The RNN hidden states of critic representation.
             test_mode (Optional[bool]): True for testing without noises.
@@ -155,8 +197,8 @@ class OnPolicyMARLAgents(MARLAgents):
             log_pi_a (dict): The log of pi.
             values_dict (dict): The evaluated critic values (when test_mode is False).
         """
-        n_env = len(obs_dict)
-        rnn_hidden_critic_new, values_out, log_pi_a_dict, values_dict = {}, {}, {}, {}
+        n_env = self._batch_size(obs_dict)
+        rnn_hidden_critic_new, values_out = {}, {}
 
         obs_input, agents_id, avail_actions_input = self._build_inputs(obs_dict, avail_actions_dict)
         rnn_hidden_actor_new, pi_dists = self.policy(observation=obs_input,
@@ -168,32 +210,7 @@ class OnPolicyMARLAgents(MARLAgents):
                                                                        agent_ids=agents_id,
                                                                        rnn_hidden=rnn_hidden_critic)
 
-        if self.use_parameter_sharing:
-            key = self.agent_keys[0]
-            actions_sample = pi_dists[key].stochastic_sample()
-            if self.continuous_control:
-                actions_out = actions_sample.reshape(n_env, self.n_agents, -1)
-            else:
-                actions_out = actions_sample.reshape(n_env, self.n_agents)
-            actions_dict = [{k: actions_out[e, i].cpu().detach().numpy() for i, k in enumerate(self.agent_keys)}
-                            for e in range(n_env)]
-            if not test_mode:
-                log_pi_a = pi_dists[key].log_prob(actions_sample).cpu().detach().numpy().reshape(n_env, self.n_agents)
-                log_pi_a_dict = {k: log_pi_a[:, i] for i, k in enumerate(self.agent_keys)}
-                values_out[key] = values_out[key].reshape(n_env, self.n_agents)
-                values_dict = {k: values_out[key][:, i].cpu().detach().numpy() for i, k in enumerate(self.agent_keys)}
-        else:
-            actions_sample = {k: pi_dists[k].stochastic_sample() for k in self.agent_keys}
-            if self.continuous_control:
-                actions_dict = [{k: actions_sample[k].cpu().detach().numpy()[e].reshape([-1]) for k in self.agent_keys}
-                                for e in range(n_env)]
-            else:
-                actions_dict = [{k: actions_sample[k].cpu().detach().numpy()[e].reshape([]) for k in self.agent_keys}
-                                for e in range(n_env)]
-            if not test_mode:
-                log_pi_a = {k: pi_dists[k].log_prob(actions_sample[k]).cpu().detach().numpy() for k in self.agent_keys}
-                log_pi_a_dict = {k: log_pi_a[k].reshape([n_env]) for i, k in enumerate(self.agent_keys)}
-                values_dict = {k: values_out[k].cpu().detach().numpy().reshape([n_env]) for k in self.agent_keys}
+        actions_dict, log_pi_a_dict, values_dict = self._policy_outputs(pi_dists, values_out, n_env, test_mode)
 
         return {"rnn_hidden_actor": rnn_hidden_actor_new, "rnn_hidden_critic": rnn_hidden_critic_new,
                 "actions": actions_dict, "log_pi": log_pi_a_dict, "values": values_dict}
@@ -216,39 +233,15 @@ class OnPolicyMARLAgents(MARLAgents):
             rnn_hidden_critic_new (dict): The new RNN hidden states of critic representation (if self.use_rnn=True).
             values_dict: The critic values.
         """
-        n_env = 1
         rnn_hidden_critic_i = None
-        if self.use_parameter_sharing:
-            key = self.agent_keys[0]
-            if self.use_rnn:
-                hidden_item_index = np.arange(i_env * self.n_agents, (i_env + 1) * self.n_agents)
-                rnn_hidden_critic_i = {key: self.policy.critic_representation[key].get_hidden_item(
-                    hidden_item_index, *rnn_hidden_critic[key])}
-                batch_size = n_env * self.n_agents
-                obs_array = np.array(itemgetter(*self.agent_keys)(obs_dict))
-                obs_input = {key: obs_array.reshape([batch_size, 1, -1])}
-                agents_id = torch.eye(self.n_agents).unsqueeze(0).expand(n_env, -1, -1).reshape(batch_size, 1, -1).to(
-                    self.device)
-            else:
-                obs_input = {key: np.array([itemgetter(*self.agent_keys)(obs_dict)])}
-                agents_id = torch.eye(self.n_agents).unsqueeze(0).expand(n_env, -1, -1).to(self.device)
-
-            rnn_hidden_critic_new, values_out = self.policy.get_values(observation=obs_input,
-                                                                       agent_ids=agents_id,
-                                                                       rnn_hidden=rnn_hidden_critic_i)
-            values_out = values_out[key].reshape(self.n_agents)
-            values_dict = {k: values_out[i].cpu().detach().numpy() for i, k in enumerate(self.agent_keys)}
-
-        else:
-            if self.use_rnn:
-                rnn_hidden_critic_i = {k: self.policy.critic_representation[k].get_hidden_item(
-                    [i_env, ], *rnn_hidden_critic[k]) for k in self.agent_keys}
-            obs_input = {k: obs_dict[k][None, :] for k in self.agent_keys} if self.use_rnn else obs_dict
-
-            rnn_hidden_critic_new, values_out = self.policy.get_values(observation=obs_input,
-                                                                       rnn_hidden=rnn_hidden_critic_i)
-            values_dict = {k: values_out[k].cpu().detach().numpy().reshape([]) for k in self.agent_keys}
-
+        if self.use_rnn:
+            rnn_hidden_critic_i = {k: self.policy.critic_representation[k].get_hidden_item(
+                self._hidden_index(k, i_env), *rnn_hidden_critic[k]) for k in self.model_keys}
+        obs_input, agents_id, _ = self._build_inputs([obs_dict])
+        rnn_hidden_critic_new, values_out = self.policy.get_values(observation=obs_input,
+                                                                   agent_ids=agents_id,
+                                                                   rnn_hidden=rnn_hidden_critic_i)
+        values_dict = {k: v[0] for k, v in self._agent_values(values_out, n_env=1).items()}
         return rnn_hidden_critic_new, values_dict
 
     def train_epochs(self, n_epochs=1):
@@ -261,13 +254,22 @@ class OnPolicyMARLAgents(MARLAgents):
         info_train = {}
         if self.memory.full:
             indexes = np.arange(self.buffer_size)
-            for _ in range(n_epochs):
-                np.random.shuffle(indexes)
-                for start in range(0, self.buffer_size, self.batch_size):
-                    end = start + self.batch_size
-                    sample_idx = indexes[start:end]
-                    sample = self.memory.sample(sample_idx)
-                    info_train = self.learner.update_rnn(sample) if self.use_rnn else self.learner.update(sample)
+            if self.use_rnn:
+                for _ in range(n_epochs):
+                    np.random.shuffle(indexes)
+                    for start in range(0, self.buffer_size, self.batch_size):
+                        end = start + self.batch_size
+                        sample_idx = indexes[start:end]
+                        sample = self.memory.sample(sample_idx)
+                        info_train = self.metrics.record(self.learner.update_rnn(sample))
+            else:
+                # The rollout is converted to tensors once, and each minibatch is gathered from them.
+                rollout = RolloutMinibatches(self.memory.rollout(), self.device,
+                                             normalize=["advantages"] if self.memory.use_advantage_norm else [])
+                for _ in range(n_epochs):
+                    np.random.shuffle(indexes)
+                    for sample in rollout.minibatches(indexes, self.batch_size):
+                        info_train = self.metrics.record(self.learner.update(sample))
             self.memory.clear()
         return info_train
 
@@ -281,7 +283,7 @@ class OnPolicyMARLAgents(MARLAgents):
         return_info = {}
         if self.use_rnn:
             with tqdm(total=n_steps) as process_bar:
-                step_start, step_last = deepcopy(self.current_step), deepcopy(self.current_step)
+                step_start, step_last = self.current_step, self.current_step
                 n_steps_all = n_steps * self.n_envs
                 while step_last - step_start < n_steps_all:
                     self.run_episodes(None, n_episodes=self.n_envs, test_mode=False)
@@ -289,63 +291,56 @@ class OnPolicyMARLAgents(MARLAgents):
                     self.log_infos(train_info, self.current_step)
                     return_info.update(train_info)
                     process_bar.update((self.current_step - step_last) // self.n_envs)
-                    step_last = deepcopy(self.current_step)
+                    step_last = self.current_step
                 process_bar.update(n_steps - process_bar.last_print_n)
             return return_info
 
-        obs_dict = self.envs.buf_obs
-        avail_actions = self.envs.buf_avail_actions if self.use_actions_mask else None
-        state = self.envs.buf_state if self.use_global_state else None
+        obs_dict = self._copy_batch(self.envs.buf_obs)
+        avail_actions = self._copy_batch(self.envs.buf_avail_actions) if self.use_actions_mask else None
+        state = self._copy_batch(self.envs.buf_state) if self.use_global_state else None
         for _ in tqdm(range(n_steps)):
-            step_info = {}
+            obs_dict = self._process_observation(obs_dict, update_rms=True)
             policy_out = self.action(obs_dict=obs_dict, state=state, avail_actions_dict=avail_actions, test_mode=False)
             actions_dict, log_pi_a_dict = policy_out['actions'], policy_out['log_pi']
             values_dict = policy_out['values']
             next_obs_dict, rewards_dict, terminated_dict, truncated, info = self.envs.step(actions_dict)
-            next_avail_actions = self.envs.buf_avail_actions if self.use_actions_mask else None
+            next_avail_actions = self._copy_batch(self.envs.buf_avail_actions) if self.use_actions_mask else None
             self.store_experience(obs_dict, avail_actions, actions_dict, log_pi_a_dict, rewards_dict, values_dict,
                                   terminated_dict, info, **{'state': state})
+            terminated = self._terminated_mask(terminated_dict)
             if self.memory.full:
+                next_obs_norm = self._process_observation(next_obs_dict)
                 for i in range(self.n_envs):
-                    if all(terminated_dict[i].values()):
+                    if terminated[i]:
                         value_next = {key: 0.0 for key in self.agent_keys}
                     else:
                         state_i = state[i] if self.use_global_state else None
-                        _, value_next = self.values_next(i_env=i, obs_dict=next_obs_dict[i], state=state_i)
+                        _, value_next = self.values_next(i_env=i, obs_dict=self._env_item(next_obs_norm, i),
+                                                         state=state_i)
                     self.memory.finish_path(i_env=i, value_next=value_next,
                                             value_normalizer=self.learner.value_normalizer)
             train_info = self.train_epochs(n_epochs=self.n_epochs)
             self.log_infos(train_info, self.current_step)
             return_info.update(train_info)
-            obs_dict, avail_actions = deepcopy(next_obs_dict), deepcopy(next_avail_actions)
-            state = self.envs.buf_state if self.use_global_state else None
-
-            for i in range(self.n_envs):
-                if all(terminated_dict[i].values()) or truncated[i]:
-                    if all(terminated_dict[i].values()):
+            obs_dict, avail_actions = next_obs_dict, next_avail_actions
+            state = self._copy_batch(self.envs.buf_state) if self.use_global_state else None
+
+            done_ids = np.flatnonzero(np.logical_or(terminated, truncated))
+            if len(done_ids) > 0:
+                next_obs_norm = self._process_observation(obs_dict)
+                for i in done_ids:
+                    if terminated[i]:
                         value_next = {key: 0.0 for key in self.agent_keys}
                     else:
                         state_i = state[i] if self.use_global_state else None
-                        _, value_next = self.values_next(i_env=i, obs_dict=obs_dict[i], state=state_i)
+                        _, value_next = self.values_next(i_env=i, obs_dict=self._env_item(next_obs_norm, i),
+                                                         state=state_i)
                     self.memory.finish_path(i_env=i, value_next=value_next,
                                             value_normalizer=self.learner.value_normalizer)
-                    obs_dict[i] = info[i]["reset_obs"]
-                    self.envs.buf_obs[i] = info[i]["reset_obs"]
-                    if self.use_actions_mask:
-                        avail_actions[i] = info[i]["reset_avail_actions"]
-                        self.envs.buf_avail_actions[i] = info[i]["reset_avail_actions"]
-                    if self.use_global_state:
-                        state[i] = info[i]["reset_state"]
-                        self.envs.buf_state[i] = info[i]["reset_state"]
-                    if self.use_wandb:
-                        step_info[f"Train-Results/Episode-Steps/rank_{self.rank}/env-%d" % i] = info[i]["episode_step"]
-                        step_info[f"Train-Results/Episode-Rewards/rank_{self.rank}/env-%d" % i] = info[i]["episode_score"]
-                    else:
-                        step_info[f"Train-Results/Episode-Steps/rank_{self.rank}"] = {"env-%d" % i: info[i]["episode_step"]}
-                        step_info[f"Train-Results/Episode-Rewards/rank_{self.rank}"] = {
-                            "env-%d" % i: np.mean(itemgetter(*self.agent_keys)(info[i]["episode_score"]))}
-                    self.log_infos(step_info, self.current_step)
-                    return_info.update(step_info)
+                self._reset_observations(done_ids, info, obs_dict, avail_actions, state)
+                step_info = self._episode_info(done_ids, info)
+                self.log_infos(step_info, self.current_step)
+                return_info.update(step_info)
 
             self.current_step += self.n_envs
         return return_info
@@ -367,8 +362,8 @@ class OnPolicyMARLAgents(MARLAgents):
         videos, episode_videos = [[] for _ in range(num_envs)], []
         episode_count, scores, best_score = 0, [0.0 for _ in range(num_envs)], -np.inf
         obs_dict, info = envs.reset()
-        avail_actions = envs.buf_avail_actions if self.use_actions_mask else None
-        state = envs.buf_state if self.use_global_state else None
+        avail_actions = self._copy_batch(envs.buf_avail_actions) if self.use_actions_mask else None
+        state = self._copy_batch(envs.buf_state) if self.use_global_state else None
         if test_mode:
             if self.config.render_mode == "rgb_array" and self.render:
                 images = envs.render(self.config.render_mode)
@@ -381,6 +376,7 @@ class OnPolicyMARLAgents(MARLAgents):
 
         while episode_count < n_episodes:
             step_info = {}
+            obs_dict = self._process_observation(obs_dict, update_rms=not test_mode)
             policy_out = self.action(obs_dict=obs_dict, state=state, avail_actions_dict=avail_actions,
                                      rnn_hidden_actor=rnn_hidden_actor, rnn_hidden_critic=rnn_hidden_critic,
                                      test_mode=test_mode)
@@ -397,47 +393,49 @@ class OnPolicyMARLAgents(MARLAgents):
             else:
                 self.store_experience(obs_dict, avail_actions, actions_dict, log_pi_a_dict, rewards_dict, values_dict,
                                       terminated_dict, info, **{'state': state})
-            obs_dict, avail_actions = deepcopy(next_obs_dict), deepcopy(next_avail_actions)
-            state = envs.buf_state if self.use_global_state else None
-
-            for i in range(num_envs):
-                if all(terminated_dict[i].values()) or truncated[i]:
-                    episode_count += 1
-                    episode_score = float(np.mean(itemgetter(*self.agent_keys)(info[i]["episode_score"])))
-                    scores.append(episode_score)
-                    if test_mode:
-                        if self.use_rnn:
-                            rnn_hidden_actor, _ = self.init_hidden_item(i, rnn_hidden_actor)
-                        if best_score < episode_score:
-                            best_score = episode_score
-                            episode_videos = videos[i].copy()
-                        if self.config.test_mode:
-                            print("Episode: %d, Score: %.2f" % (episode_count, episode_score))
+            obs_dict = next_obs_dict
+            avail_actions = self._copy_batch(next_avail_actions) if self.use_actions_mask else None
+            state = self._copy_batch(envs.buf_state) if self.use_global_state else None
+
+            terminated = self._terminated_mask(terminated_dict)
+            done_ids = np.flatnonzero(np.logical_or(terminated, truncated))
+            for i in done_ids:
+                episode_count += 1
+                info_i = self._env_item(info, i)
+                episode_score = float(np.mean(itemgetter(*self.agent_keys)(info_i["episode_score"])))
+                scores.append(episode_score)
+                if test_mode:
+                    if self.use_rnn:
+                        rnn_hidden_actor, _ = self.init_hidden_item(i, rnn_hidden_actor)
+                    if best_score < episode_score:
+                        best_score = episode_score
+                        episode_videos = videos[i].copy()
+                    if self.config.test_mode:
+                        print("Episode: %d, Score: %.2f" % (episode_count, episode_score))
+                else:
+                    if terminated[i]:
+                        value_next = {key: 0.0 for key in self.agent_keys}
+                    else:
+                        obs_norm_i = self._process_observation([self._env_item(obs_dict, i)])[0]
+                        state_i = state[i] if self.use_global_state else None
+                        _, value_next = self.values_next(i_env=i, obs_dict=obs_norm_i, state=state_i,
+                                                         rnn_hidden_critic=rnn_hidden_critic)
+                    self.memory.finish_path(i_env=i, i_step=info_i['episode_step'], value_next=value_next,
+                                            value_normalizer=self.learner.value_normalizer)
+                    if self.use_rnn:
+                        rnn_hidden_actor, rnn_hidden_critic = self.init_hidden_item(i, rnn_hidden_actor,
+                                                                                    rnn_hidden_critic)
+                    if self.use_wandb:
+                        step_info["Train-Results/Episode-Steps/env-%d" % i] = info_i["episode_step"]
+                        step_info["Train-Results/Episode-Rewards/env-%d" % i] = info_i["episode_score"]
                     else:
-                        if all(terminated_dict[i].values()):
-                            value_next = {key: 0.0 for key in self.agent_keys}
-                        else:
-                            _, value_next = self.values_next(i_env=i, obs_dict=obs_dict[i], state=state[i],
-                                                             rnn_hidden_critic=rnn_hidden_critic)
-                        self.memory.finish_path(i_env=i, i_step=info[i]['episode_step'], value_next=value_next,
-                                                value_normalizer=self.learner.value_normalizer)
-                        if self.use_rnn:
-                            rnn_hidden_actor, rnn_hidden_critic = self.init_hidden_item(i, rnn_hidden_actor,
-                                                                                        rnn_hidden_critic)
-                        if self.use_wandb:
-                            step_info["Train-Results/Episode-Steps/env-%d" % i] = info[i]["episode_step"]
-                            step_info["Train-Results/Episode-Rewards/env-%d" % i] = info[i]["episode_score"]
-                        else:
-                            step_info["Train-Results/Episode-Steps"] = {"env-%d" % i: info[i]["episode_step"]}
-                            step_info["Train-Results/Episode-Rewards"] = {
-                                "env-%d" % i: np.mean(itemgetter(*self.agent_keys)(info[i]["episode_score"]))}
-                        self.current_step += info[i]["episode_step"]
-                        self.log_infos(step_info, self.current_step)
-                    obs_dict[i] = info[i]["reset_obs"]
-                    envs.buf_obs[i] = info[i]["reset_obs"]
-                    if self.use_actions_mask:
-                        avail_actions[i] = info[i]["reset_avail_actions"]
-                        envs.buf_avail_actions[i] = info[i]["reset_avail_actions"]
+                        step_info["Train-Results/Episode-Steps"] = {"env-%d" % i: info_i["episode_step"]}
+                        step_info["Train-Results/Episode-Rewards"] = {
+                            "env-%d" % i: np.mean(itemgetter(*self.agent_keys)(info_i["episode_score"]))}
+                    self.current_step += int(info_i["episode_step"])
+                    self.log_infos(step_info, self.current_step)
+            if len(done_ids) > 0:
+                self._reset_observations(done_ids, info, obs_dict, avail_actions, state, envs=envs)
 
         if test_mode:
             if self.config.render_mode == "rgb_array" and self.render:
@@ -1,20 +1,26 @@
-from .iql_agents import IQL_Agents
-from .vdn_agents import VDN_Agents
-from .qmix_agents import QMIX_Agents
-from .wqmix_agents import WQMIX_Agents
-from .qtran_agents import QTRAN_Agents
-from .dcg_agents import DCG_Agents
-from .mfq_agents import MFQ_Agents
+from xuance.common.registry_tools import lazy_attributes
 
-from .iac_agents import IAC_Agents
-from .coma_agents import COMA_Agents
-from .vdac_agents import VDAC_Agents
-from .ic3net_agents import IC3Net_Agents
-from .iddpg_agents import IDDPG_Agents
-from .isac_agents import ISAC_Agents
-from .maddpg_agents import MADDPG_Agents
-from .masac_agents import MASAC_Agents
-from .ippo_agents import IPPO_Agents
-from .mappo_agents import MAPPO_Agents
-from .matd3_agents import MATD3_Agents
-from .mfac_agents import MFAC_Agents
+# Maps each member to the module that defines it, the module is imported on first access.
+_members = {
+    "IQL_Agents": ".iql_agents",
+    "VDN_Agents": ".vdn_agents",
+    "QMIX_Agents": ".qmix_agents",
+    "WQMIX_Agents": ".wqmix_agents",
+    "QTRAN_Agents": ".qtran_agents",
+    "DCG_Agents": ".dcg_agents",
+    "MFQ_Agents": ".mfq_agents",
+    "IAC_Agents": ".iac_agents",
+    "COMA_Agents": ".coma_agents",
+    "VDAC_Agents": ".vdac_agents",
+    "IC3Net_Agents": ".ic3net_agents",
+    "IDDPG_Agents": ".iddpg_agents",
+    "ISAC_Agents": ".isac_agents",
+    "MADDPG_Agents": ".maddpg_agents",
+    "MASAC_Agents": ".masac_agents",
+    "IPPO_Agents": ".ippo_agents",
+    "MAPPO_Agents": ".mappo_agents",
+    "MATD3_Agents": ".matd3_agents",
+    "MFAC_Agents": ".mfac_agents",
+}
+
+__getattr__ = lazy_attributes(__name__, _members)
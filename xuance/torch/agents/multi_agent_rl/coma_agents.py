@@ -1,7 +1,6 @@
 import torch
 import numpy as np
 from tqdm import tqdm
-from copy import deepcopy
 from argparse import Namespace
 from operator import itemgetter
 from torch.nn.functional import one_hot
@@ -26,6 +25,8 @@ class COMA_Agents(OnPolicyMARLAgents):
                  config: Namespace,
                  envs: Union[DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv]):
         super(COMA_Agents, self).__init__(config, envs)
+        if self.use_array_batches:
+            raise AttributeError("COMA does not support the array batches of the vectorized environments.")
         self.start_greedy, self.end_greedy = config.start_greedy, config.end_greedy
         self.egreedy = self.start_greedy
         self.delta_egreedy = (self.start_greedy - self.end_greedy) / config.decay_step_greedy
@@ -145,7 +146,8 @@ class COMA_Agents(OnPolicyMARLAgents):
 
         if self.use_parameter_sharing:
             key = self.agent_keys[0]
-            pi_probs[key][Tensor(avail_actions_input[key]) == 0] = 0.0
+            if self.use_actions_mask:
+                pi_probs[key][Tensor(avail_actions_input[key]) == 0] = 0.0
             if test_mode:
                 actions_sample = pi_probs[key].max(dim=-1)[1]
             else:
@@ -154,13 +156,11 @@ class COMA_Agents(OnPolicyMARLAgents):
             actions_out = actions_sample.reshape(n_env, self.n_agents)
             actions_dict = [{k: actions_out[e, i].cpu().detach().numpy() for i, k in enumerate(self.agent_keys)}
                             for e in range(n_env)]
-            actions_onehot = {key: one_hot(actions_out, self.action_space[key].n)}
+            actions_onehot = {key: one_hot(actions_sample, self.action_space[key].n)}
         else:
-            agents_id = torch.eye(self.n_agents).unsqueeze(0).expand(n_env, -1, -1).to(self.device)
-            bs = n_env * self.n_agents
-            agents_id = agents_id.reshape(bs, 1, -1) if self.use_rnn else agents_id.reshape(bs, -1)
-            for k in self.agent_keys:
-                pi_probs[k][Tensor(avail_actions_input[k]) == 0] = 0.0
+            if self.use_actions_mask:
+                for k in self.agent_keys:
+                    pi_probs[k][Tensor(avail_actions_input[k]) == 0] = 0.0
             if test_mode:
                 actions_sample = {k: pi_probs[k].max(dim=-1)[1] for k in self.agent_keys}
             else:
@@ -174,17 +174,12 @@ class COMA_Agents(OnPolicyMARLAgents):
         if not test_mode:  # calculate target values
             if self.use_rnn:
                 state = Tensor(np.array(state)).reshape(n_env, 1, -1)
-                if self.use_parameter_sharing:
-                    actions_onehot = {k: actions_onehot[k].unsqueeze(1) for k in self.model_keys}
-                else:
-                    actions_onehot = {k: actions_onehot[k] for k in self.model_keys}
             else:
                 state = Tensor(np.array(state)).reshape(n_env, -1)
 
             rnn_hidden_critic_new, values_out = self.policy.get_values(state=Tensor(state).to(self.device),
                                                                        observation=obs_input,
                                                                        actions=actions_onehot,
-                                                                       agent_ids=agents_id,
                                                                        rnn_hidden=rnn_hidden_critic,
                                                                        target=True)
             if self.use_rnn:
@@ -219,51 +214,41 @@ class COMA_Agents(OnPolicyMARLAgents):
         n_env = 1
         bs = n_env * self.n_agents
         rnn_hidden_critic_i = None
-
-        agents_id = torch.eye(self.n_agents).unsqueeze(0).repeat(n_env, 1, 1).to(self.device)
-        if self.use_rnn:
-            state = state.reshape(n_env, 1, -1)
-            agents_id = agents_id.reshape(bs, 1, -1)
-        else:
-            state = state.reshape(n_env, -1)
-            agents_id.reshape(bs, -1)
+        state = state.reshape(n_env, 1, -1) if self.use_rnn else state.reshape(n_env, -1)
+        actions_tensor = torch.as_tensor(np.stack(itemgetter(*self.agent_keys)(actions_n)), device=self.device).long()
+        actions_tensor = actions_tensor.reshape(n_env, self.n_agents)
 
         if self.use_parameter_sharing:
             key = self.agent_keys[0]
-            actions_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(actions_n)))
+            obs_array = np.array(itemgetter(*self.agent_keys)(obs_dict))
             if self.use_rnn:
                 hidden_item_index = np.arange(i_env * self.n_agents, (i_env + 1) * self.n_agents)
                 rnn_hidden_critic_i = {key: self.policy.critic_representation[key].get_hidden_item(
                     hidden_item_index, *rnn_hidden_critic[key])}
-                obs_array = np.array(itemgetter(*self.agent_keys)(obs_dict))
                 obs_input = {key: obs_array.reshape([bs, 1, -1])}
-                actions_tensor = actions_tensor.reshape(n_env, 1, self.n_agents).to(self.device)
+                actions_onehot = {key: one_hot(actions_tensor.reshape(bs, 1), self.action_space[key].n)}
             else:
-                obs_input = {key: np.array([itemgetter(*self.agent_keys)(obs_dict)])}
-                actions_tensor = actions_tensor.reshape(n_env, self.n_agents).to(self.device)
-            actions_onehot = {key: one_hot(actions_tensor.long(), self.action_space[key].n)}
+                obs_input = {key: obs_array.reshape([bs, -1])}
+                actions_onehot = {key: one_hot(actions_tensor.reshape(bs), self.action_space[key].n)}
         else:
             if self.use_rnn:
                 rnn_hidden_critic_i = {k: self.policy.critic_representation[k].get_hidden_item(
                     [i_env, ], *rnn_hidden_critic[k]) for k in self.agent_keys}
                 obs_input = {k: obs_dict[k][None, None, :] for k in self.agent_keys}
+                actions_onehot = {k: one_hot(actions_tensor[:, i:i + 1], self.action_space[k].n)
+                                  for i, k in enumerate(self.agent_keys)}
             else:
                 obs_input = {k: obs_dict[k][None, :] for k in self.agent_keys}
-            actions_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(actions_n))).reshape(n_env, self.n_agents)
-            actions_tensor = actions_tensor.to(self.device)
-            actions_onehot = {k: one_hot(actions_tensor[:, i].long(), self.action_space[k].n)
-                              for i, k in enumerate(self.agent_keys)}
+                actions_onehot = {k: one_hot(actions_tensor[:, i], self.action_space[k].n)
+                                  for i, k in enumerate(self.agent_keys)}
 
         rnn_hidden_critic_new, values_out = self.policy.get_values(state=Tensor(state).to(self.device),
                                                                    observation=obs_input,
                                                                    actions=actions_onehot,
-                                                                   agent_ids=agents_id,
                                                                    rnn_hidden=rnn_hidden_critic_i,
                                                                    target=True)
-        if self.use_rnn:
-            values_out = values_out.reshape(n_env, self.n_agents, -1)
-            actions_tensor = actions_tensor.reshape(n_env, self.n_agents)
-        values_out = values_out.gather(-1, actions_tensor.unsqueeze(-1).long())
+        values_out = values_out.reshape(n_env, self.n_agents, -1)
+        values_out = values_out.gather(-1, actions_tensor.unsqueeze(-1))
         values_out = values_out.cpu().detach().numpy().reshape(self.n_agents)
         values_dict = {k: values_out[i] for i, k in enumerate(self.agent_keys)}
         return rnn_hidden_critic_new, values_dict
@@ -290,6 +275,7 @@ class COMA_Agents(OnPolicyMARLAgents):
                         info_train = self.learner.update_rnn(sample, self.egreedy)
                     else:
                         info_train = self.learner.update(sample, self.egreedy)
+                    info_train = self.metrics.record(info_train)
             self.memory.clear()
         info_train["epsilon-greedy"] = self.egreedy
         return info_train
@@ -303,70 +289,60 @@ class COMA_Agents(OnPolicyMARLAgents):
         """
         if self.use_rnn:
             with tqdm(total=n_steps) as process_bar:
-                step_start, step_last = deepcopy(self.current_step), deepcopy(self.current_step)
+                step_start, step_last = self.current_step, self.current_step
                 n_steps_all = n_steps * self.n_envs
                 while step_last - step_start < n_steps_all:
                     self.run_episodes(None, n_episodes=self.n_envs, test_mode=False)
                     train_info = self.train_epochs(n_epochs=self.n_epochs)
                     self.log_infos(train_info, self.current_step)
                     process_bar.update((self.current_step - step_last) // self.n_envs)
-                    step_last = deepcopy(self.current_step)
+                    step_last = self.current_step
                 process_bar.update(n_steps - process_bar.last_print_n)
             return
 
         obs_dict = self.envs.buf_obs
-        avail_actions = self.envs.buf_avail_actions if self.use_actions_mask else None
-        state = self.envs.buf_state if self.use_global_state else None
+        avail_actions = list(self.envs.buf_avail_actions) if self.use_actions_mask else None
+        state = list(self.envs.buf_state) if self.use_global_state else None
         for _ in tqdm(range(n_steps)):
-            step_info = {}
+            obs_dict = self._process_observation(obs_dict, update_rms=True)
             policy_out = self.action(obs_dict=obs_dict, state=state, avail_actions_dict=avail_actions, test_mode=False)
             actions_dict, log_pi_a_dict = policy_out['actions'], policy_out['log_pi']
             values_dict = policy_out['values']
             next_obs_dict, rewards_dict, terminated_dict, truncated, info = self.envs.step(actions_dict)
-            next_avail_actions = self.envs.buf_avail_actions if self.use_actions_mask else None
+            next_avail_actions = list(self.envs.buf_avail_actions) if self.use_actions_mask else None
             self.store_experience(obs_dict, avail_actions, actions_dict, log_pi_a_dict, rewards_dict, values_dict,
                                   terminated_dict, info, **{'state': state})
+            terminated = self._terminated_mask(terminated_dict)
             if self.memory.full:
+                next_obs_norm = self._process_observation(next_obs_dict)
                 for i in range(self.n_envs):
-                    if all(terminated_dict[i].values()):
+                    if terminated[i]:
                         value_next = {key: 0.0 for key in self.agent_keys}
                     else:
                         state_i = state[i] if self.use_global_state else None
-                        _, value_next = self.values_next(i_env=i, obs_dict=next_obs_dict[i],
+                        _, value_next = self.values_next(i_env=i, obs_dict=next_obs_norm[i],
                                                          state=state_i, actions_n=actions_dict[i])
                     self.memory.finish_path(i_env=i, value_next=value_next,
                                             value_normalizer=self.learner.value_normalizer)
             train_info = self.train_epochs(n_epochs=self.n_epochs)
             self.log_infos(train_info, self.current_step)
-            obs_dict, avail_actions = deepcopy(next_obs_dict), deepcopy(next_avail_actions)
-            state = self.envs.buf_state if self.use_global_state else None
-
-            for i in range(self.n_envs):
-                if all(terminated_dict[i].values()) or truncated[i]:
-                    if all(terminated_dict[i].values()):
+            obs_dict, avail_actions = next_obs_dict, next_avail_actions
+            state = list(self.envs.buf_state) if self.use_global_state else None
+
+            done_ids = np.flatnonzero(np.logical_or(terminated, truncated))
+            if len(done_ids) > 0:
+                next_obs_norm = self._process_observation(obs_dict)
+                for i in done_ids:
+                    if terminated[i]:
                         value_next = {key: 0.0 for key in self.agent_keys}
                     else:
                         state_i = state[i] if self.use_global_state else None
-                        _, value_next = self.values_next(i_env=i, obs_dict=obs_dict[i],
+                        _, value_next = self.values_next(i_env=i, obs_dict=next_obs_norm[i],
                                                          state=state_i, actions_n=actions_dict[i])
                     self.memory.finish_path(i_env=i, value_next=value_next,
                                             value_normalizer=self.learner.value_normalizer)
-                    obs_dict[i] = info[i]["reset_obs"]
-                    self.envs.buf_obs[i] = info[i]["reset_obs"]
-                    if self.use_actions_mask:
-                        avail_actions[i] = info[i]["reset_avail_actions"]
-                        self.envs.buf_avail_actions[i] = info[i]["reset_avail_actions"]
-                    if self.use_global_state:
-                        state[i] = info[i]["reset_state"]
-                        self.envs.buf_state[i] = info[i]["reset_state"]
-                    if self.use_wandb:
-                        step_info[f"Train-Results/Episode-Steps/rank_{self.rank}/env-%d" % i] = info[i]["episode_step"]
-                        step_info[f"Train-Results/Episode-Rewards/rank_{self.rank}/env-%d" % i] = info[i]["episode_score"]
-                    else:
-                        step_info[f"Train-Results/Episode-Steps/rank_{self.rank}"] = {"env-%d" % i: info[i]["episode_step"]}
-                        step_info[f"Train-Results/Episode-Rewards/rank_{self.rank}"] = {
-                            "env-%d" % i: np.mean(itemgetter(*self.agent_keys)(info[i]["episode_score"]))}
-                    self.log_infos(step_info, self.current_step)
+                self._reset_observations(done_ids, info, obs_dict, avail_actions, state)
+                self.log_infos(self._episode_info(done_ids, info), self.current_step)
 
             self.current_step += self.n_envs
 
@@ -387,8 +363,8 @@ class COMA_Agents(OnPolicyMARLAgents):
         videos, episode_videos = [[] for _ in range(num_envs)], []
         episode_count, scores, best_score = 0, [0.0 for _ in range(num_envs)], -np.inf
         obs_dict, info = envs.reset()
-        avail_actions = envs.buf_avail_actions if self.use_actions_mask else None
-        state = envs.buf_state if self.use_global_state else None
+        avail_actions = list(envs.buf_avail_actions) if self.use_actions_mask else None
+        state = list(envs.buf_state) if self.use_global_state else None
         if test_mode:
             if self.config.render_mode == "rgb_array" and self.render:
                 images = envs.render(self.config.render_mode)
@@ -401,6 +377,7 @@ class COMA_Agents(OnPolicyMARLAgents):
 
         while episode_count < n_episodes:
             step_info = {}
+            obs_dict = self._process_observation(obs_dict, update_rms=not test_mode)
             policy_out = self.action(obs_dict=obs_dict, state=state, avail_actions_dict=avail_actions,
                                      rnn_hidden_actor=rnn_hidden_actor, rnn_hidden_critic=rnn_hidden_critic,
                                      test_mode=test_mode)
@@ -417,8 +394,9 @@ class COMA_Agents(OnPolicyMARLAgents):
             else:
                 self.store_experience(obs_dict, avail_actions, actions_dict, log_pi_a_dict, rewards_dict, values_dict,
                                       terminated_dict, info, **{'state': state})
-            obs_dict, avail_actions = deepcopy(next_obs_dict), deepcopy(next_avail_actions)
-            state = envs.buf_state if self.use_global_state else None
+            obs_dict = next_obs_dict
+            avail_actions = list(next_avail_actions) if self.use_actions_mask else None
+            state = list(envs.buf_state) if self.use_global_state else None
 
             for i in range(num_envs):
                 if all(terminated_dict[i].values()) or truncated[i]:
@@ -437,7 +415,8 @@ class COMA_Agents(OnPolicyMARLAgents):
                         if all(terminated_dict[i].values()):
                             value_next = {key: 0.0 for key in self.agent_keys}
                         else:
-                            _, value_next = self.values_next(i_env=i, obs_dict=obs_dict[i],
+                            obs_norm_i = self._process_observation([obs_dict[i]])[0]
+                            _, value_next = self.values_next(i_env=i, obs_dict=obs_norm_i,
                                                              state=state[i], actions_n=actions_dict[i],
                                                              rnn_hidden_critic=rnn_hidden_critic)
                         self.memory.finish_path(i_env=i, i_step=info[i]['episode_step'], value_next=value_next,
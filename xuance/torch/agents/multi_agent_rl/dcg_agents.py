@@ -1,8 +1,6 @@
 import torch
-import numpy as np
 from torch.nn import Module
 from argparse import Namespace
-from operator import itemgetter
 from xuance.common import List, Optional, Union
 from xuance.environment import DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv
 from xuance.torch.utils import NormalizeFunctions, ActivationFunctions
@@ -56,7 +54,9 @@ class DCG_Agents(OffPolicyMARLAgents):
         utility = DCG_utility(repre_state_dim, self.config.hidden_utility_dim, max_action_dim, self.device)
         payoffs = DCG_payoff(repre_state_dim * 2, self.config.hidden_payoff_dim, max_action_dim,
                              self.config.low_rank_payoff, self.config.payoff_rank, self.device)
-        dcgraph = Coordination_Graph(self.n_agents, self.config.graph_type, self.device)
+        dcgraph = Coordination_Graph(self.n_agents, self.config.graph_type, self.device,
+                                     n_neighbors=self.config.n_neighbors if hasattr(self.config, "n_neighbors") else 3,
+                                     graph_range=self.config.graph_range if hasattr(self.config, "graph_range") else 1.0)
         dcgraph.set_coordination_graph()
 
         if self.config.policy == "DCG_Policy":
@@ -73,8 +73,8 @@ class DCG_Agents(OffPolicyMARLAgents):
         return policy
 
     def action(self,
-               obs_dict: List[dict],
-               avail_actions_dict: Optional[List[dict]] = None,
+               obs_dict: Union[List[dict], dict],
+               avail_actions_dict: Optional[Union[List[dict], dict]] = None,
                rnn_hidden: Optional[dict] = None,
                test_mode: Optional[bool] = False,
                **kwargs):
@@ -82,8 +82,8 @@ class DCG_Agents(OffPolicyMARLAgents):
         Returns actions for agents.
 
         Parameters:
-            obs_dict (List[dict]): Observations for each agent in self.agent_keys.
-            avail_actions_dict (Optional[List[dict]]): Actions mask values, default is None.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
             rnn_hidden (Optional[dict]): The hidden variables of the RNN.
             test_mode (Optional[bool]): True for testing without noises.
 
@@ -91,23 +91,20 @@ class DCG_Agents(OffPolicyMARLAgents):
             rnn_hidden_state (dict): The new hidden states for RNN (if self.use_rnn=True).
             actions_dict (dict): The output actions.
         """
-        batch_size = len(obs_dict)
-        obs_input, agents_id, avail_actions_input = self._build_inputs(obs_dict, avail_actions_dict)
+        batch_size = self._batch_size(obs_dict)
+        obs_input, agents_id, _ = self._build_inputs(obs_dict)
+        avail_actions = self._packed_avail_actions(avail_actions_dict, batch_size)
         with torch.no_grad():
             rnn_hidden_next, hidden_states = self.policy.get_hidden_states(batch_size, obs_input, rnn_hidden,
                                                                            use_target_net=False)
-            if self.use_actions_mask:
-                if self.use_parameter_sharing:
-                    avail_actions_input = avail_actions_input[self.model_keys[0]].reshape(batch_size, self.n_agents, -1)
-                else:
-                    avail_actions_input = np.stack(itemgetter(*self.agent_keys)(avail_actions_input),
-                                                   axis=-2).reshape(batch_size, self.n_agents, -1)
             hidden_states = hidden_states.reshape([batch_size, self.n_agents, -1])
-            actions = self.learner.act(hidden_states, avail_actions=avail_actions_input)
-
-        actions_out = actions.reshape([batch_size, self.n_agents]).cpu().detach().numpy()
-        actions_dict = [{k: actions_out[e, i] for i, k in enumerate(self.agent_keys)} for e in range(batch_size)]
+            edges = None
+            if self.policy.graph.dynamic:
+                positions = self.learner.get_positions(batch_size, obs_input)
+                edges = self.policy.graph.dynamic_edges(positions.reshape([batch_size, self.n_agents, -1]))
+            utility = self.learner.utility(hidden_states, avail_actions=avail_actions, edges=edges)
 
+        actions_out = utility.argmax(dim=-1).reshape([batch_size, self.n_agents])
         if not test_mode:  # get random actions
-            actions_dict = self.exploration(batch_size, actions_dict, avail_actions_dict)
-        return {"hidden_state": rnn_hidden_next, "actions": actions_dict}
+            actions_out = self.exploration(actions_out, avail_actions, utility)
+        return {"hidden_state": rnn_hidden_next, "actions": self._unpack_actions(actions_out, batch_size)}
@@ -98,8 +98,8 @@ class IDDPG_Agents(OffPolicyMARLAgents):
         return rnn_hidden
 
     def action(self,
-               obs_dict: List[dict],
-               avail_actions_dict: Optional[List[dict]] = None,
+               obs_dict: Union[List[dict], dict],
+               avail_actions_dict: Optional[Union[List[dict], dict]] = None,
                rnn_hidden: Optional[dict] = None,
                test_mode: Optional[bool] = False,
                **kwargs):
@@ -107,8 +107,8 @@ class IDDPG_Agents(OffPolicyMARLAgents):
         Returns actions for agents.
 
         Parameters:
-            obs_dict (List[dict]): Observations for each agent in self.agent_keys.
-            avail_actions_dict (Optional[List[dict]]): Actions mask values, default is None.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
             rnn_hidden (Optional[dict]): The hidden variables of the RNN.
             test_mode (Optional[bool]): True for testing without noises.
 
@@ -116,22 +116,12 @@ class IDDPG_Agents(OffPolicyMARLAgents):
             rnn_hidden_state (dict): The new hidden states for RNN (if self.use_rnn=True).
             actions_dict (dict): The output actions.
         """
-        batch_size = len(obs_dict)
+        batch_size = self._batch_size(obs_dict)
 
         obs_input, agents_id, _ = self._build_inputs(obs_dict)
         hidden_state, actions = self.policy(observation=obs_input, agent_ids=agents_id, rnn_hidden=rnn_hidden)
 
-        if self.use_parameter_sharing:
-            key = self.agent_keys[0]
-            actions[key] = actions[key].reshape(batch_size, self.n_agents, -1).cpu().detach().numpy()
-            if not test_mode:
-                actions = self.exploration(batch_size, actions)
-            actions_dict = [{k: actions[key][e, i] for i, k in enumerate(self.agent_keys)} for e in range(batch_size)]
-        else:
-            for key in self.agent_keys:
-                actions[key] = actions[key].reshape(batch_size, -1).cpu().detach().numpy()
-            if not test_mode:
-                actions = self.exploration(batch_size, actions)
-            actions_dict = [{k: actions[k][i] for k in self.agent_keys} for i in range(batch_size)]
-
-        return {"hidden_state": hidden_state, "actions": actions_dict}
+        actions_out = self._pack_outputs(actions, batch_size, vector=True)
+        if not test_mode:
+            actions_out = self.exploration(actions_out)
+        return {"hidden_state": hidden_state, "actions": self._unpack_actions(actions_out, batch_size)}
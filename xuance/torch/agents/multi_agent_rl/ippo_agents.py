@@ -15,6 +15,7 @@ class IPPO_Agents(OnPolicyMARLAgents):
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
     """
+    supports_agent_ensemble = True
 
     def __init__(self,
                  config: Namespace,
@@ -41,26 +42,30 @@ class IPPO_Agents(OnPolicyMARLAgents):
         A_representation = self._build_representation(self.config.representation, self.observation_space, self.config)
         C_representation = self._build_representation(self.config.representation, self.observation_space, self.config)
         # build policies
-        if self.config.policy == "Categorical_MAAC_Policy":
-            policy = REGISTRY_Policy["Categorical_MAAC_Policy"](
+        if self.config.policy in ["Categorical_MAAC_Policy", "Categorical_MAAC_Policy_Comm"]:
+            policy = REGISTRY_Policy[self.config.policy](
                 action_space=self.action_space, n_agents=self.n_agents,
                 representation_actor=A_representation, representation_critic=C_representation,
+                communicator=self._build_communicator(A_representation),
                 actor_hidden_size=self.config.actor_hidden_size, critic_hidden_size=self.config.critic_hidden_size,
                 normalize=normalize_fn, initialize=initializer, activation=activation,
                 device=device, use_distributed_training=self.distributed_training,
                 use_parameter_sharing=self.use_parameter_sharing, model_keys=self.model_keys,
-                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None)
+                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None,
+                use_agent_ensemble=self.use_agent_ensemble)
             self.continuous_control = False
-        elif self.config.policy == "Gaussian_MAAC_Policy":
-            policy = REGISTRY_Policy["Gaussian_MAAC_Policy"](
+        elif self.config.policy in ["Gaussian_MAAC_Policy", "Gaussian_MAAC_Policy_Comm"]:
+            policy = REGISTRY_Policy[self.config.policy](
                 action_space=self.action_space, n_agents=self.n_agents,
                 representation_actor=A_representation, representation_critic=C_representation,
+                communicator=self._build_communicator(A_representation),
                 actor_hidden_size=self.config.actor_hidden_size, critic_hidden_size=self.config.critic_hidden_size,
                 normalize=normalize_fn, initialize=initializer, activation=activation,
                 activation_action=ActivationFunctions[self.config.activation_action],
                 device=device, use_distributed_training=self.distributed_training,
                 use_parameter_sharing=self.use_parameter_sharing, model_keys=self.model_keys,
-                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None)
+                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None,
+                use_agent_ensemble=self.use_agent_ensemble)
             self.continuous_control = True
         else:
             raise AttributeError(f"{agent} currently does not support the policy named {self.config.policy}.")
@@ -15,6 +15,7 @@ class IQL_Agents(OffPolicyMARLAgents):
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
     """
+    supports_agent_ensemble = True
 
     def __init__(self,
                  config: Namespace,
@@ -53,7 +54,8 @@ class IQL_Agents(OffPolicyMARLAgents):
                 normalize=normalize_fn, initialize=initializer, activation=activation, device=device,
                 use_distributed_training=self.distributed_training,
                 use_parameter_sharing=self.use_parameter_sharing, model_keys=self.model_keys,
-                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None)
+                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None,
+                use_agent_ensemble=self.use_agent_ensemble)
         else:
             raise AttributeError(f"IQL currently does not support the policy named {self.config.policy}.")
 
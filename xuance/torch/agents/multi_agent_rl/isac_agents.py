@@ -72,8 +72,8 @@ class ISAC_Agents(OffPolicyMARLAgents):
         return policy
 
     def action(self,
-               obs_dict: List[dict],
-               avail_actions_dict: Optional[List[dict]] = None,
+               obs_dict: Union[List[dict], dict],
+               avail_actions_dict: Optional[Union[List[dict], dict]] = None,
                rnn_hidden: Optional[dict] = None,
                test_mode: Optional[bool] = False,
                **kwargs):
@@ -81,8 +81,8 @@ class ISAC_Agents(OffPolicyMARLAgents):
         Returns actions for agents.
 
         Parameters:
-            obs_dict (List[dict]): Observations for each agent in self.agent_keys.
-            avail_actions_dict (Optional[List[dict]]): Actions mask values, default is None.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
             rnn_hidden (Optional[dict]): The hidden variables of the RNN.
             test_mode (Optional[bool]): True for testing without noises.
 
@@ -90,7 +90,7 @@ class ISAC_Agents(OffPolicyMARLAgents):
             rnn_hidden_state (dict): The new hidden states for RNN (if self.use_rnn=True).
             actions_dict (dict): The output actions.
         """
-        batch_size = len(obs_dict)
+        batch_size = self._batch_size(obs_dict)
 
         obs_input, agents_id, avail_actions_input = self._build_inputs(obs_dict)
         hidden_state, actions, _ = self.policy(observation=obs_input, agent_ids=agents_id,
@@ -102,13 +102,13 @@ class ISAC_Agents(OffPolicyMARLAgents):
                 actions[key] = actions[key].reshape(batch_size, self.n_agents, -1).cpu().detach().numpy()
             else:
                 actions[key] = actions[key].reshape(batch_size, self.n_agents).cpu().detach().numpy()
-            actions_dict = [{k: actions[key][e, i] for i, k in enumerate(self.agent_keys)} for e in range(batch_size)]
+            actions_dict = self._env_batch({k: actions[key][:, i] for i, k in enumerate(self.agent_keys)}, batch_size)
         else:
             for key in self.agent_keys:
                 if self.continuous_control:
                     actions[key] = actions[key].reshape(batch_size, -1).cpu().detach().numpy()
                 else:
                     actions[key] = actions[key].reshape(batch_size).cpu().detach().numpy()
-            actions_dict = [{k: actions[k][i] for k in self.agent_keys} for i in range(batch_size)]
+            actions_dict = self._env_batch(actions, batch_size)
 
         return {"hidden_state": hidden_state, "actions": actions_dict}
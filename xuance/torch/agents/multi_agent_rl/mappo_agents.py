@@ -1,7 +1,6 @@
 import torch
 import numpy as np
 from argparse import Namespace
-from operator import itemgetter
 from xuance.common import List, Optional, Union
 from xuance.environment import DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv
 from xuance.torch import Module
@@ -17,6 +16,7 @@ class MAPPO_Agents(IPPO_Agents):
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
     """
+    supports_agent_ensemble = False  # The policies are built without use_agent_ensemble.
 
     def __init__(self,
                  config: Namespace,
@@ -43,20 +43,22 @@ class MAPPO_Agents(IPPO_Agents):
         space_critic_in = {k: (dim_obs_all, ) for k in self.agent_keys}
         C_representation = self._build_representation(self.config.representation, space_critic_in, self.config)
         # build policies
-        if self.config.policy == "Categorical_MAAC_Policy":
-            policy = REGISTRY_Policy["Categorical_MAAC_Policy"](
+        if self.config.policy in ["Categorical_MAAC_Policy", "Categorical_MAAC_Policy_Comm"]:
+            policy = REGISTRY_Policy[self.config.policy](
                 action_space=self.action_space, n_agents=self.n_agents,
                 representation_actor=A_representation, representation_critic=C_representation,
+                communicator=self._build_communicator(A_representation),
                 actor_hidden_size=self.config.actor_hidden_size, critic_hidden_size=self.config.critic_hidden_size,
                 normalize=normalize_fn, initialize=initializer, activation=activation,
                 device=device, use_distributed_training=self.distributed_training,
                 use_parameter_sharing=self.use_parameter_sharing, model_keys=self.model_keys,
                 use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None)
             self.continuous_control = False
-        elif self.config.policy == "Gaussian_MAAC_Policy":
-            policy = REGISTRY_Policy["Gaussian_MAAC_Policy"](
+        elif self.config.policy in ["Gaussian_MAAC_Policy", "Gaussian_MAAC_Policy_Comm"]:
+            policy = REGISTRY_Policy[self.config.policy](
                 action_space=self.action_space, n_agents=self.n_agents,
                 representation_actor=A_representation, representation_critic=C_representation,
+                communicator=self._build_communicator(A_representation),
                 actor_hidden_size=self.config.actor_hidden_size, critic_hidden_size=self.config.critic_hidden_size,
                 normalize=normalize_fn, initialize=initializer, activation=activation,
                 activation_action=ActivationFunctions[self.config.activation_action],
@@ -75,37 +77,31 @@ class MAPPO_Agents(IPPO_Agents):
 
         Parameters:
             batch_size (int): The size of the obs batch.
-            obs_batch (dict): Observations for each agent in self.agent_keys.
+            obs_batch (dict): The observation inputs of each model key, see _build_inputs.
             state (Optional[np.ndarray]): The global state.
 
         Returns:
-            critic_input: The represented observations.
+            critic_input: The joint observations (or the global states) of each model key, one row per agent.
         """
         if self.use_global_state:
-            if self.use_parameter_sharing:
-                key = self.model_keys[0]
-                bs = batch_size * self.n_agents
-                state_n = np.stack([state for _ in range(self.n_agents)], axis=1).reshape([bs, -1])
-                critic_input = {key: state_n}
-            else:
-                critic_input = {k: state for k in self.model_keys}
+            joint_input = np.asarray(state).reshape([batch_size, 1, -1])
         else:
-            if self.use_parameter_sharing:
-                key = self.model_keys[0]
-                bs = batch_size * self.n_agents
-                joint_obs = obs_batch[key].reshape([batch_size, self.n_agents, -1]).reshape([batch_size, 1, -1])
-                joint_obs = np.repeat(joint_obs, repeats=self.n_agents, axis=1)
-            else:
-                bs = batch_size
-                joint_obs = np.stack(itemgetter(*self.agent_keys)(obs_batch), axis=1)
-            joint_obs = joint_obs.reshape([bs, 1, -1]) if self.use_rnn else joint_obs.reshape([bs, -1])
-            critic_input = {k: joint_obs for k in self.model_keys}
+            obs_agents = {}
+            for key, group in self.agent_groups.items():
+                obs_group = obs_batch[key].reshape([batch_size, len(group), -1])
+                obs_agents.update({k: obs_group[:, i] for i, k in enumerate(group)})
+            joint_input = np.concatenate([obs_agents[k] for k in self.agent_keys], axis=-1).reshape([batch_size, 1, -1])
+        critic_input = {}
+        for key, group in self.agent_groups.items():
+            bs = batch_size * len(group)
+            joint_input_group = np.repeat(joint_input, len(group), axis=1)
+            critic_input[key] = joint_input_group.reshape([bs, 1, -1] if self.use_rnn else [bs, -1])
         return critic_input
 
     def action(self,
-               obs_dict: List[dict],
+               obs_dict: Union[List[dict], dict],
                state: Optional[np.ndarray] = None,
-               avail_actions_dict: Optional[List[dict]] = None,
+               avail_actions_dict: Optional[Union[List[dict], dict]] = None,
                rnn_hidden_actor: Optional[dict] = None,
                rnn_hidden_critic: Optional[dict] = None,
                test_mode: Optional[bool] = False,
@@ -114,9 +110,9 @@ class MAPPO_Agents(IPPO_Agents):
         Returns actions for agents.
 
         Parameters:
-            obs_dict (dict): Observations for each agent in self.agent_keys.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
             state (Optional[np.ndarray]): The global state.
-            avail_actions_dict (Optional[List[dict]]): Actions mask values, default is None.
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
             rnn_hidden_actor (Optional[dict]): The RNN hidden states of actor representation.
             rnn_hidden_critic (Optional[dict]): The RNN hidden states of critic representation.
             test_mode (Optional[bool]): True for testing without noises.
@@ -128,8 +124,8 @@ class MAPPO_Agents(IPPO_Agents):
             log_pi_a (dict): The log of pi.
             values_dict (dict): The evaluated critic values (when test_mode is False).
         """
-        n_env = len(obs_dict)
-        rnn_hidden_critic_new, values_out, log_pi_a_dict, values_dict = {}, {}, {}, {}
+        n_env = self._batch_size(obs_dict)
+        rnn_hidden_critic_new, values_out = {}, {}
 
         obs_input, agents_id, avail_actions_input = self._build_inputs(obs_dict, avail_actions_dict)
         rnn_hidden_actor_new, pi_dists = self.policy(observation=obs_input,
@@ -142,33 +138,7 @@ class MAPPO_Agents(IPPO_Agents):
                                                                        agent_ids=agents_id,
                                                                        rnn_hidden=rnn_hidden_critic)
 
-        if self.use_parameter_sharing:
-            key = self.agent_keys[0]
-            actions_sample = pi_dists[key].stochastic_sample()
-            if self.continuous_control:
-                actions_out = actions_sample.reshape(n_env, self.n_agents, -1)
-            else:
-                actions_out = actions_sample.reshape(n_env, self.n_agents)
-            actions_dict = [{k: actions_out[e, i].cpu().detach().numpy() for i, k in enumerate(self.agent_keys)}
-                            for e in range(n_env)]
-            if not test_mode:
-                log_pi_a = pi_dists[key].log_prob(actions_sample).cpu().detach().numpy()
-                log_pi_a = log_pi_a.reshape(n_env, self.n_agents)
-                log_pi_a_dict = {k: log_pi_a[:, i] for i, k in enumerate(self.agent_keys)}
-                values_out[key] = values_out[key].reshape(n_env, self.n_agents)
-                values_dict = {k: values_out[key][:, i].cpu().detach().numpy() for i, k in enumerate(self.agent_keys)}
-        else:
-            actions_sample = {k: pi_dists[k].stochastic_sample() for k in self.agent_keys}
-            if self.continuous_control:
-                actions_dict = [{k: actions_sample[k].cpu().detach().numpy()[e].reshape([-1]) for k in self.agent_keys}
-                                for e in range(n_env)]
-            else:
-                actions_dict = [{k: actions_sample[k].cpu().detach().numpy()[e].reshape([]) for k in self.agent_keys}
-                                for e in range(n_env)]
-            if not test_mode:
-                log_pi_a = {k: pi_dists[k].log_prob(actions_sample[k]).cpu().detach().numpy() for k in self.agent_keys}
-                log_pi_a_dict = {k: log_pi_a[k].reshape([n_env]) for i, k in enumerate(self.agent_keys)}
-                values_dict = {k: values_out[k].cpu().detach().numpy().reshape([n_env]) for k in self.agent_keys}
+        actions_dict, log_pi_a_dict, values_dict = self._policy_outputs(pi_dists, values_out, n_env, test_mode)
 
         return {"rnn_hidden_actor": rnn_hidden_actor_new, "rnn_hidden_critic": rnn_hidden_critic_new,
                 "actions": actions_dict, "log_pi": log_pi_a_dict, "values": values_dict}
@@ -191,53 +161,14 @@ class MAPPO_Agents(IPPO_Agents):
             rnn_hidden_critic_new (dict): The new RNN hidden states of critic representation (if self.use_rnn=True).
             values_dict: The critic values.
         """
-        n_env = 1
         rnn_hidden_critic_i = None
-        if self.use_parameter_sharing:
-            key = self.agent_keys[0]
-            if self.use_rnn:
-                hidden_item_index = np.arange(i_env * self.n_agents, (i_env + 1) * self.n_agents)
-                rnn_hidden_critic_i = {key: self.policy.critic_representation[key].get_hidden_item(
-                    hidden_item_index, *rnn_hidden_critic[key])}
-                batch_size = n_env * self.n_agents
-                if self.use_global_state:
-                    critic_input = np.repeat(state.reshape([n_env, 1, -1]),
-                                             self.n_agents, axis=1).reshape([batch_size, 1, -1])
-                else:
-                    obs_array = np.array(itemgetter(*self.agent_keys)(obs_dict))
-                    critic_input = np.repeat(obs_array.reshape([n_env, 1, -1]),
-                                             self.n_agents, axis=1).reshape([batch_size, 1, -1])
-                agents_id = torch.eye(self.n_agents).unsqueeze(0).expand(n_env, -1, -1).reshape(batch_size, 1, -1).to(
-                    self.device)
-            else:
-                if self.use_global_state:
-                    critic_input = np.repeat(state.reshape([n_env, 1, -1]), self.n_agents, axis=1)
-                else:
-                    obs_array = np.array([itemgetter(*self.agent_keys)(obs_dict)]).reshape([n_env, 1, -1])
-                    critic_input = np.repeat(obs_array, self.n_agents, axis=1)
-                agents_id = torch.eye(self.n_agents).unsqueeze(0).expand(n_env, -1, -1).to(self.device)
-
-            rnn_hidden_critic_new, values_out = self.policy.get_values(observation={key: critic_input},
-                                                                       agent_ids=agents_id,
-                                                                       rnn_hidden=rnn_hidden_critic_i)
-            values_out = values_out[key].reshape(self.n_agents)
-            values_dict = {k: values_out[i].cpu().detach().numpy() for i, k in enumerate(self.agent_keys)}
-
-        else:
-            if self.use_rnn:
-                rnn_hidden_critic_i = {k: self.policy.critic_representation[k].get_hidden_item(
-                    [i_env, ], *rnn_hidden_critic[k]) for k in self.agent_keys}
-                joint_obs = np.stack(itemgetter(*self.agent_keys)(obs_dict), axis=0).reshape([n_env, 1, -1])
-                critic_input = {k: joint_obs for k in self.agent_keys}
-            else:
-                critic_input_array = np.concatenate([obs_dict[k].reshape(n_env, 1, -1) for k in self.agent_keys],
-                                                    axis=1).reshape(n_env, -1)
-                if self.use_global_state:
-                    critic_input_array = state.reshape([n_env, -1])
-                critic_input = {k: critic_input_array for k in self.agent_keys}
-
-            rnn_hidden_critic_new, values_out = self.policy.get_values(observation=critic_input,
-                                                                       rnn_hidden=rnn_hidden_critic_i)
-            values_dict = {k: values_out[k].cpu().detach().numpy().reshape([]) for k in self.agent_keys}
-
+        if self.use_rnn:
+            rnn_hidden_critic_i = {k: self.policy.critic_representation[k].get_hidden_item(
+                self._hidden_index(k, i_env), *rnn_hidden_critic[k]) for k in self.model_keys}
+        obs_input, agents_id, _ = self._build_inputs([obs_dict])
+        critic_input = self._build_critic_inputs(batch_size=1, obs_batch=obs_input, state=state)
+        rnn_hidden_critic_new, values_out = self.policy.get_values(observation=critic_input,
+                                                                   agent_ids=agents_id,
+                                                                   rnn_hidden=rnn_hidden_critic_i)
+        values_dict = {k: v[0] for k, v in self._agent_values(values_out, n_env=1).items()}
         return rnn_hidden_critic_new, values_dict
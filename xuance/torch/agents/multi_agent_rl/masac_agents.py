@@ -15,6 +15,8 @@ class MASAC_Agents(ISAC_Agents):
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
     """
+    supports_agent_ensemble = True
+
     def __init__(self,
                  config: Namespace,
                  envs: Union[DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv]):
@@ -50,7 +52,8 @@ class MASAC_Agents(ISAC_Agents):
                 activation_action=ActivationFunctions[self.config.activation_action],
                 device=device, use_distributed_training=self.distributed_training,
                 use_parameter_sharing=self.use_parameter_sharing, model_keys=self.model_keys,
-                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None)
+                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None,
+                use_agent_ensemble=self.use_agent_ensemble)
             self.continuous_control = True
         else:
             raise AttributeError(f"{agent} currently does not support the policy named {self.config.policy}.")
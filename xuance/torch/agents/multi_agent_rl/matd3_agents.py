@@ -15,6 +15,7 @@ class MATD3_Agents(IDDPG_Agents):
         config: The Namespace variable that provides hyper-parameters and other settings.
         envs: The vectorized environments.
     """
+    supports_agent_ensemble = True
 
     def __init__(self,
                  config: Namespace,
@@ -50,7 +51,8 @@ class MATD3_Agents(IDDPG_Agents):
                 use_distributed_training=self.distributed_training,
                 activation_action=ActivationFunctions[self.config.activation_action],
                 use_parameter_sharing=self.use_parameter_sharing, model_keys=self.model_keys,
-                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None)
+                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None,
+                use_agent_ensemble=self.use_agent_ensemble)
         else:
             raise AttributeError(f"MATD3 currently does not support the policy named {self.config.policy}.")
 
@@ -1,114 +1,257 @@
 import torch
 import numpy as np
-from tqdm import tqdm
-from copy import deepcopy
-from operator import itemgetter
 from argparse import Namespace
-from xuance.common import List, Union
+from xuance.common import List, Optional, Union, MeanField_OnPolicyBuffer
 from xuance.environment import DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv
+from xuance.torch import Module
 from xuance.torch.utils import NormalizeFunctions, ActivationFunctions
-from xuance.torch.representations import REGISTRY_Representation
-from xuance.torch.policies import REGISTRY_Policy, QMIX_mixer
-from xuance.torch.learners import QMIX_Learner
-from xuance.torch.agents import MARLAgents
-from xuance.torch.agents.multi_agent_rl.iql_agents import IQL_Agents
-from xuance.common import MARL_OffPolicyBuffer, MARL_OffPolicyBuffer_RNN
+from xuance.torch.policies import REGISTRY_Policy
+from xuance.torch.policies.mean_field import MeanFieldAggregator
+from xuance.torch.agents import OnPolicyMARLAgents
 
 
-class MFAC_Agents(MARLAgents):
+class MFAC_Agents(OnPolicyMARLAgents):
     """The implementation of Mean-Field AC agents.
 
+    The critic of each agent is conditioned on the mean action of its neighbors, which are all the other agents,
+    or the nearest ones ("KNN") or the ones within a range ("RANGE") of its position, see MeanFieldAggregator.
+
     Args:
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
-        device: the calculating device of the model, such as CPU or GPU.
     """
+
     def __init__(self,
                  config: Namespace,
                  envs: Union[DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv]):
-        self.gamma = config.gamma
-        self.n_envs = envs.num_envs
-        self.n_size = config.buffer_size
-        self.n_epochs = config.n_epochs
-        self.n_minibatch = config.n_minibatch
-        if config.state_space is not None:
-            config.dim_state, state_shape = config.state_space.shape, config.state_space.shape
+        super(MFAC_Agents, self).__init__(config, envs)
+        if self.use_rnn:
+            raise AttributeError("MFAC currently does not support recurrent representations.")
+        self.policy = self._build_policy()  # build policy
+        self.memory = self._build_memory()  # build memory
+        self.learner = self._build_learner(self.config, self.model_keys, self.agent_keys, self.policy)
+
+    def _build_memory(self):
+        """Build replay buffer for models training
+        """
+        if self.use_actions_mask:
+            avail_actions_shape = {key: (self.action_space[key].n,) for key in self.agent_keys}
         else:
-            config.dim_state, state_shape = None, None
-
-        input_representation = get_repre_in(config)
-        representation = REGISTRY_Representation[config.representation](*input_representation)
-        input_policy = get_policy_in_marl(config, representation)
-        policy = REGISTRY_Policy[config.policy](*input_policy, gain=config.gain)
-        optimizer = torch.optim.Adam(policy.parameters(), config.learning_rate, eps=1e-5)
-        scheduler = torch.optim.lr_scheduler.LinearLR(optimizer, start_factor=1.0, end_factor=self.end_factor_lr_decay,
-                                                      total_iters=get_total_iters(config.agent_name, config))
-        self.observation_space = envs.observation_space
-        self.action_space = envs.action_space
-        self.representation_info_shape = policy.representation.output_shapes
-        self.auxiliary_info_shape = {}
-
-        if config.state_space is not None:
-            config.dim_state, state_shape = config.state_space.shape, config.state_space.shape
+            avail_actions_shape = None
+        input_buffer = dict(agent_keys=self.agent_keys,
+                            state_space=self.state_space if self.use_global_state else None,
+                            obs_space=self.observation_space,
+                            act_space=self.action_space,
+                            n_envs=self.n_envs,
+                            buffer_size=self.config.buffer_size,
+                            use_gae=self.config.use_gae,
+                            use_advnorm=self.config.use_advnorm,
+                            gamma=self.config.gamma,
+                            gae_lam=self.config.gae_lambda,
+                            avail_actions_shape=avail_actions_shape,
+                            use_actions_mask=self.use_actions_mask,
+                            max_episode_steps=self.episode_length)
+        return MeanField_OnPolicyBuffer(**input_buffer)
+
+    def _build_policy(self) -> Module:
+        """
+        Build representation(s) and policy(ies) for agent(s)
+
+        Returns:
+            policy (torch.nn.Module): A dict of policies.
+        """
+        normalize_fn = NormalizeFunctions[self.config.normalize] if hasattr(self.config, "normalize") else None
+        initializer = torch.nn.init.orthogonal_
+        activation = ActivationFunctions[self.config.activation]
+        device = self.device
+
+        # build representations
+        A_representation = self._build_representation(self.config.representation, self.observation_space, self.config)
+        C_representation = self._build_representation(self.config.representation, self.observation_space, self.config)
+
+        # build the aggregator of the mean actions
+        mean_field = MeanFieldAggregator(
+            n_agents=self.n_agents, model_keys=self.model_keys, use_parameter_sharing=self.use_parameter_sharing,
+            neighborhood=self.config.neighborhood if hasattr(self.config, "neighborhood") else "GLOBAL",
+            n_neighbors=self.config.n_neighbors if hasattr(self.config, "n_neighbors") else 8,
+            neighbor_range=self.config.neighbor_range if hasattr(self.config, "neighbor_range") else 1.0,
+            position_index=self.config.position_index if hasattr(self.config, "position_index") else None,
+            device=device)
+
+        # build policies
+        if self.config.policy == "Categorical_MFAC_Policy":
+            policy = REGISTRY_Policy["Categorical_MFAC_Policy"](
+                action_space=self.action_space, n_agents=self.n_agents,
+                representation_actor=A_representation, representation_critic=C_representation,
+                mean_field=mean_field,
+                actor_hidden_size=self.config.actor_hidden_size, critic_hidden_size=self.config.critic_hidden_size,
+                normalize=normalize_fn, initialize=initializer, activation=activation,
+                device=device, use_distributed_training=self.distributed_training,
+                use_parameter_sharing=self.use_parameter_sharing, model_keys=self.model_keys,
+                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None)
         else:
-            config.dim_state, state_shape = None, None
-        memory = MeanField_OnPolicyBuffer(config.n_agents,
-                                          state_shape,
-                                          config.obs_shape,
-                                          config.act_shape,
-                                          config.rew_shape,
-                                          config.done_shape,
-                                          envs.num_envs,
-                                          config.buffer_size,
-                                          config.use_gae, config.use_advnorm, config.gamma, config.gae_lambda,
-                                          prob_space=config.act_prob_shape)
-        self.buffer_size = memory.buffer_size
-        self.batch_size = self.buffer_size // self.n_minibatch
-        learner = MFAC_Learner(config, policy, optimizer, scheduler,
-                               config.device, config.model_dir, config.gamma)
-        super(MFAC_Agents, self).__init__(config, envs, policy, memory, learner, device,
-                                          config.log_dir, config.model_dir)
-        self.on_policy = True
-
-    def act(self, obs_n, test_mode, act_mean=None, agent_mask=None):
-        batch_size = len(obs_n)
-        agents_id = torch.eye(self.n_agents).unsqueeze(0).expand(batch_size, -1, -1).to(self.device)
-        obs_n = torch.Tensor(obs_n).to(self.device)
-
-        _, dists = self.policy(obs_n, agents_id)
-        acts = dists.stochastic_sample()
-
-        n_alive = torch.Tensor(agent_mask).sum(dim=-1).unsqueeze(-1).repeat(1, self.dim_act).to(self.device)
-        action_n_mask = torch.Tensor(agent_mask).unsqueeze(-1).repeat(1, 1, self.dim_act).to(self.device)
-        act_neighbor_onehot = self.learner.onehot_action(acts, self.dim_act) * action_n_mask
-        act_mean_current = act_neighbor_onehot.float().sum(dim=1) / n_alive
-        act_mean_current = act_mean_current.cpu().detach().numpy()
-
-        return acts.detach().cpu().numpy(), act_mean_current
-
-    def values(self, obs, actions_mean):
-        batch_size = len(obs)
-        obs = torch.Tensor(obs).to(self.device)
-        actions_mean = torch.Tensor(actions_mean).to(self.device)
-        actions_mean = actions_mean.unsqueeze(1).expand(-1, self.n_agents, -1)
-        agents_id = torch.eye(self.n_agents).unsqueeze(0).expand(batch_size, -1, -1).to(self.device)
-        values_n = self.policy.critic(obs, actions_mean, agents_id)
-        hidden_states = None
-        return hidden_states, values_n.detach().cpu().numpy()
-
-    def train(self, i_step, **kwargs):
-        if self.memory.full:
-            info_train = {}
-            indexes = np.arange(self.buffer_size)
-            for _ in range(self.n_epochs):
-                np.random.shuffle(indexes)
-                for start in range(0, self.buffer_size, self.batch_size):
-                    end = start + self.batch_size
-                    sample_idx = indexes[start:end]
-                    sample = self.memory.sample(sample_idx)
-                    info_train = self.learner.update(sample)
-            self.learner.lr_decay(i_step)
-            self.memory.clear()
-            return info_train
+            raise AttributeError(f"MFAC currently does not support the policy named {self.config.policy}.")
+        return policy
+
+    def _actions_mean(self, obs_dict: Union[List[dict], dict], actions_dict: Union[List[dict], dict],
+                      agent_mask: dict):
+        """
+        Returns the mean actions of the neighbors of the agents, computed from the actions they took.
+
+        Parameters:
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            actions_dict (Union[List[dict], dict]): Actions for each agent in self.agent_keys.
+            agent_mask (dict): The alive agents, {agent_key: ndarray[n_envs]}.
+
+        Returns:
+            actions_mean (dict): The mean actions, {agent_key: ndarray[n_envs, n_actions]}.
+        """
+        mean_field = self.policy.mean_field
+        actions = torch.as_tensor(self._packed_array(actions_dict), device=self.device).long()
+        actions_onehot = torch.nn.functional.one_hot(actions, self.action_space[self.agent_keys[0]].n).float()
+        alive = torch.as_tensor(np.stack([agent_mask[k] for k in self.agent_keys], axis=1), device=self.device)
+        obs_arrays = self._agent_arrays(obs_dict)
+        positions = mean_field.get_positions([obs_arrays[k] for k in self.agent_keys])
+        actions_mean = mean_field(actions_onehot, alive, positions).cpu().numpy()
+        return {k: actions_mean[:, i] for i, k in enumerate(self.agent_keys)}
+
+    def store_experience(self, obs_dict, avail_actions, actions_dict, log_pi_a, rewards_dict, values_dict,
+                         terminals_dict, info, **kwargs):
+        """
+        Store experience data into replay buffer, with the mean actions of the neighbors of the agents.
+
+        Parameters:
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions (Union[List[dict], dict]): Actions mask values for each agent in self.agent_keys.
+            actions_dict (Union[List[dict], dict]): Actions for each agent in self.agent_keys.
+            log_pi_a (dict): The log of pi.
+            rewards_dict (Union[List[dict], dict]): Rewards for each agent in self.agent_keys.
+            values_dict (dict): Critic values for each agent in self.agent_keys.
+            terminals_dict (Union[List[dict], dict]): Terminated values for each agent in self.agent_keys.
+            info (Union[List[dict], dict]): Other information for the environment at current step.
+            **kwargs: Other inputs.
+        """
+        agent_mask = self._info_array(info, 'agent_mask')
+        experience_data = {
+            'obs': self._agent_arrays(obs_dict),
+            'actions': self._agent_arrays(actions_dict),
+            'act_mean': self._actions_mean(obs_dict, actions_dict, agent_mask),
+            'log_pi_old': log_pi_a,
+            'rewards': self._agent_arrays(rewards_dict),
+            'values': values_dict,
+            'terminals': self._agent_arrays(terminals_dict),
+            'agent_mask': agent_mask,
+        }
+        if self.use_global_state:
+            experience_data['state'] = np.array(kwargs['state'])
+        if self.use_actions_mask:
+            experience_data['avail_actions'] = self._agent_arrays(avail_actions)
+        self.memory.store(**experience_data)
+
+    def _values(self, obs_dict: Union[List[dict], dict], obs_input: dict, agents_id, pi_dists: dict):
+        """
+        Returns the critic values given the mean actions of the neighbors, sampled from the policies.
+
+        Parameters:
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            obs_input (dict): The inputs of the representations.
+            agents_id: The agent id (One-Hot variables).
+            pi_dists (dict): The stochastic policy distributions.
+
+        Returns:
+            actions_sample (dict): The sampled actions of the policies.
+            values_out (dict): The evaluated critic values.
+        """
+        actions_sample = {k: pi_dists[k].stochastic_sample() for k in self.model_keys}
+        obs_arrays = self._agent_arrays(obs_dict)
+        positions = self.policy.mean_field.get_positions([obs_arrays[k] for k in self.agent_keys])
+        actions_mean = self.policy.mean_actions(actions_sample, positions=positions)
+        _, values_out = self.policy.get_values(observation=obs_input, actions_mean=actions_mean, agent_ids=agents_id)
+        return actions_sample, values_out
+
+    def action(self,
+               obs_dict: Union[List[dict], dict],
+               state: Optional[np.ndarray] = None,
+               avail_actions_dict: Optional[Union[List[dict], dict]] = None,
+               rnn_hidden_actor: Optional[dict] = None,
+               rnn_hidden_critic: Optional[dict] = None,
+               test_mode: Optional[bool] = False,
+               **kwargs):
+        """
+        Returns actions for agents.
+
+        Parameters:
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            state (Optional[np.ndarray]): The global state.
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
+            rnn_hidden_actor (Optional[dict]): The RNN hidden states of actor representation.
+            rnn_hidden_critic (Optional[dict]): The RNN hidden states of critic representation.
+            test_mode (Optional[bool]): True for testing without noises.
+
+        Returns:
+            rnn_hidden_actor_new (dict): The new RNN hidden states of actor representation (if self.use_rnn=True).
+            rnn_hidden_critic_new (dict): The new RNN hidden states of critic representation (if self.use_rnn=True).
+            actions_dict (dict): The output actions.
+            log_pi_a (dict): The log of pi.
+            values_dict (dict): The evaluated critic values (when test_mode is False).
+        """
+        n_env = self._batch_size(obs_dict)
+        log_pi_a_dict, values_dict = {}, {}
+
+        obs_input, agents_id, avail_actions_input = self._build_inputs(obs_dict, avail_actions_dict)
+        rnn_hidden_actor_new, pi_dists = self.policy(observation=obs_input,
+                                                     agent_ids=agents_id,
+                                                     avail_actions=avail_actions_input)
+        if test_mode:
+            actions_sample = {k: pi_dists[k].stochastic_sample() for k in self.model_keys}
+        else:
+            actions_sample, values_out = self._values(obs_dict, obs_input, agents_id, pi_dists)
+
+        if self.use_parameter_sharing:
+            key = self.agent_keys[0]
+            actions_out = actions_sample[key].reshape(n_env, self.n_agents).cpu().detach().numpy()
+            actions_dict = self._env_batch({k: actions_out[:, i] for i, k in enumerate(self.agent_keys)}, n_env)
+            if not test_mode:
+                log_pi_a = pi_dists[key].log_prob(actions_sample[key]).cpu().detach().numpy().reshape(n_env,
+                                                                                                     self.n_agents)
+                log_pi_a_dict = {k: log_pi_a[:, i] for i, k in enumerate(self.agent_keys)}
+                values_out = values_out[key].cpu().detach().numpy().reshape(n_env, self.n_agents)
+                values_dict = {k: values_out[:, i] for i, k in enumerate(self.agent_keys)}
+        else:
+            actions_out = {k: actions_sample[k].cpu().detach().numpy().reshape([n_env]) for k in self.agent_keys}
+            actions_dict = self._env_batch(actions_out, n_env)
+            if not test_mode:
+                log_pi_a_dict = {k: pi_dists[k].log_prob(actions_sample[k]).cpu().detach().numpy().reshape([n_env])
+                                 for k in self.agent_keys}
+                values_dict = {k: values_out[k].cpu().detach().numpy().reshape([n_env]) for k in self.agent_keys}
+
+        return {"rnn_hidden_actor": rnn_hidden_actor_new, "rnn_hidden_critic": {},
+                "actions": actions_dict, "log_pi": log_pi_a_dict, "values": values_dict}
+
+    def values_next(self,
+                    i_env: int,
+                    obs_dict: dict,
+                    state: Optional[np.ndarray] = None,
+                    rnn_hidden_critic: Optional[dict] = None):
+        """
+        Returns critic values of one environment that finished an episode.
+
+        Parameters:
+            i_env (int): The index of environment.
+            obs_dict (dict): Observations for each agent in self.agent_keys.
+            state (Optional[np.ndarray]): The global state.
+            rnn_hidden_critic (Optional[dict]): The RNN hidden states of critic representation.
+
+        Returns:
+            rnn_hidden_critic_new (dict): The new RNN hidden states of critic representation (if self.use_rnn=True).
+            values_dict: The critic values.
+        """
+        obs_input, agents_id, _ = self._build_inputs([obs_dict])
+        _, pi_dists = self.policy(observation=obs_input, agent_ids=agents_id)
+        _, values_out = self._values([obs_dict], obs_input, agents_id, pi_dists)
+        if self.use_parameter_sharing:
+            values_out = values_out[self.model_keys[0]].cpu().detach().numpy().reshape(self.n_agents)
+            values_dict = {k: values_out[i] for i, k in enumerate(self.agent_keys)}
         else:
-            return {}
+            values_dict = {k: values_out[k].cpu().detach().numpy().reshape([]) for k in self.agent_keys}
+        return {}, values_dict
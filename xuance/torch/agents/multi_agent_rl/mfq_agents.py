@@ -1,110 +1,223 @@
 import torch
 import numpy as np
-from tqdm import tqdm
-from copy import deepcopy
-from operator import itemgetter
 from argparse import Namespace
-from xuance.common import List, Union
+from xuance.common import List, Optional, Union, MeanField_OffPolicyBuffer
 from xuance.environment import DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv
+from xuance.torch import Module
 from xuance.torch.utils import NormalizeFunctions, ActivationFunctions
-from xuance.torch.representations import REGISTRY_Representation
-from xuance.torch.policies import REGISTRY_Policy, QMIX_mixer
-from xuance.torch.learners import QMIX_Learner
-from xuance.torch.agents import MARLAgents
-from xuance.torch.agents.multi_agent_rl.iql_agents import IQL_Agents
-from xuance.common import MARL_OffPolicyBuffer, MARL_OffPolicyBuffer_RNN
+from xuance.torch.policies import REGISTRY_Policy
+from xuance.torch.policies.mean_field import MeanFieldAggregator
+from xuance.torch.agents import OffPolicyMARLAgents
 
 
-class MFQ_Agents(MARLAgents):
+class MFQ_Agents(OffPolicyMARLAgents):
     """The implementation of Mean-Field Q agents.
 
+    The Q-values of each agent are conditioned on the mean action of its neighbors, which are all the other agents,
+    or the nearest ones ("KNN") or the ones within a range ("RANGE") of its position, see MeanFieldAggregator.
+
     Args:
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
-        device: the calculating device of the model, such as CPU or GPU.
     """
+
     def __init__(self,
                  config: Namespace,
                  envs: Union[DummyVecMultiAgentEnv, SubprocVecMultiAgentEnv]):
-        self.gamma = config.gamma
+        super(MFQ_Agents, self).__init__(config, envs)
+        if self.use_rnn:
+            raise AttributeError("MFQ currently does not support recurrent representations.")
 
         self.start_greedy, self.end_greedy = config.start_greedy, config.end_greedy
-        self.egreedy = self.start_greedy
         self.delta_egreedy = (self.start_greedy - self.end_greedy) / config.decay_step_greedy
-        self.use_rnn, self.rnn = config.use_rnn, config.rnn
-        self.rnn_hidden = None
-
-        input_representation = get_repre_in(config)
-        representation = REGISTRY_Representation[config.representation](*input_representation)
-        input_policy = get_policy_in_marl(config, representation)
-        policy = REGISTRY_Policy[config.policy](*input_policy)
-        optimizer = torch.optim.Adam(policy.parameters(), config.learning_rate, eps=1e-5)
-        scheduler = torch.optim.lr_scheduler.LinearLR(optimizer, start_factor=1.0, end_factor=self.end_factor_lr_decay,
-                                                      total_iters=get_total_iters(config.agent_name, config))
-        self.observation_space = envs.observation_space
-        self.action_space = envs.action_space
-        self.representation_info_shape = policy.representation.output_shapes
-        self.auxiliary_info_shape = {}
-
-        if config.state_space is not None:
-            config.dim_state, state_shape = config.state_space.shape, config.state_space.shape
-        else:
-            config.dim_state, state_shape = None, None
-        memory = MeanField_OffPolicyBuffer(config.n_agents,
-                                           state_shape,
-                                           config.obs_shape,
-                                           config.act_shape,
-                                           config.act_prob_shape,
-                                           config.rew_shape,
-                                           config.done_shape,
-                                           envs.num_envs,
-                                           config.buffer_size,
-                                           config.batch_size)
-        learner = MFQ_Learner(config, policy, optimizer, scheduler,
-                              config.device, config.model_dir, config.gamma,
-                              config.sync_frequency)
-        super(MFQ_Agents, self).__init__(config, envs, policy, memory, learner, device,
-                                         config.log_dir, config.model_dir)
-        self.on_policy = False
-
-    def act(self, obs_n, *rnn_hidden, test_mode=False, act_mean=None, agent_mask=None, avail_actions=None):
-        batch_size = obs_n.shape[0]
-        agents_id = torch.eye(self.n_agents).unsqueeze(0).expand(batch_size, -1, -1).to(self.device)
-        obs_in = torch.Tensor(obs_n).to(self.device)
-        act_mean = torch.Tensor(act_mean).unsqueeze(dim=-2).repeat(1, self.n_agents, 1).to(self.device)
-
-        if self.use_rnn:  # awaiting to be tested
-            batch_agents = batch_size * self.n_agents
-            hidden_state, greedy_actions, q_output = self.policy(obs_in.view(batch_agents, 1, -1),
-                                                                 act_mean.view(batch_agents, 1, -1),
-                                                                 agents_id.view(batch_agents, 1, -1),
-                                                                 *rnn_hidden,
-                                                                 avail_actions=avail_actions)
+        self.e_greedy = self.start_greedy
+        self.temperature = config.temperature
+
+        self.policy = self._build_policy()  # build policy
+        self.memory = self._build_memory()  # build memory
+        self.learner = self._build_learner(self.config, self.model_keys, self.agent_keys, self.policy)
+
+    def _build_memory(self):
+        """Build replay buffer for models training
+        """
+        if self.use_actions_mask:
+            avail_actions_shape = {key: (self.action_space[key].n,) for key in self.agent_keys}
         else:
-            hidden_state, greedy_actions, q_output = self.policy(obs_in, act_mean, agents_id)
-        n_alive = torch.Tensor(agent_mask).sum(dim=-1).unsqueeze(-1).repeat(1, self.dim_act).to(self.device)
-        action_n_mask = torch.Tensor(agent_mask).unsqueeze(-1).repeat(1, 1, self.dim_act).to(self.device)
-        act_neighbor_sample = self.policy.sample_actions(logits=q_output).to(self.device)
-        act_neighbor_onehot = self.learner.onehot_action(act_neighbor_sample, self.dim_act) * action_n_mask
-        act_mean_current = act_neighbor_onehot.float().sum(dim=1) / n_alive
-        act_mean_current = act_mean_current.cpu().detach().numpy()
-        greedy_actions = greedy_actions.cpu().detach().numpy()
-        if test_mode:
-            return hidden_state, greedy_actions, act_mean_current
+            avail_actions_shape = None
+        input_buffer = dict(agent_keys=self.agent_keys,
+                            state_space=self.state_space if self.use_global_state else None,
+                            obs_space=self.observation_space,
+                            act_space=self.action_space,
+                            n_envs=self.n_envs,
+                            buffer_size=self.buffer_size,
+                            batch_size=self.batch_size,
+                            avail_actions_shape=avail_actions_shape,
+                            use_actions_mask=self.use_actions_mask,
+                            max_episode_steps=self.episode_length)
+        return MeanField_OffPolicyBuffer(**input_buffer)
+
+    def _build_policy(self) -> Module:
+        """
+        Build representation(s) and policy(ies) for agent(s)
+
+        Returns:
+            policy (torch.nn.Module): A dict of policies.
+        """
+        normalize_fn = NormalizeFunctions[self.config.normalize] if hasattr(self.config, "normalize") else None
+        initializer = torch.nn.init.orthogonal_
+        activation = ActivationFunctions[self.config.activation]
+        device = self.device
+
+        # build representations
+        representation = self._build_representation(self.config.representation, self.observation_space, self.config)
+
+        # build the aggregator of the mean actions
+        mean_field = MeanFieldAggregator(
+            n_agents=self.n_agents, model_keys=self.model_keys, use_parameter_sharing=self.use_parameter_sharing,
+            neighborhood=self.config.neighborhood if hasattr(self.config, "neighborhood") else "GLOBAL",
+            n_neighbors=self.config.n_neighbors if hasattr(self.config, "n_neighbors") else 8,
+            neighbor_range=self.config.neighbor_range if hasattr(self.config, "neighbor_range") else 1.0,
+            position_index=self.config.position_index if hasattr(self.config, "position_index") else None,
+            device=device)
+
+        # build policies
+        if self.config.policy == "MF_Q_network":
+            policy = REGISTRY_Policy["MF_Q_network"](
+                action_space=self.action_space, n_agents=self.n_agents,
+                representation=representation, mean_field=mean_field,
+                hidden_size=self.config.q_hidden_size,
+                normalize=normalize_fn, initialize=initializer, activation=activation, device=device,
+                use_distributed_training=self.distributed_training,
+                use_parameter_sharing=self.use_parameter_sharing, model_keys=self.model_keys,
+                use_rnn=self.use_rnn, rnn=self.config.rnn if self.use_rnn else None)
         else:
-            random_actions = np.random.choice(self.dim_act, [self.nenvs, self.n_agents])
-            if np.random.rand() < self.egreedy:
-                return hidden_state, random_actions, act_mean_current
-            else:
-                return hidden_state, greedy_actions, act_mean_current
-
-    def train(self, i_step, n_epochs=1):
-        if self.egreedy >= self.end_greedy:
-            self.egreedy = self.start_greedy - self.delta_egreedy * i_step
-        info_train = {}
-        if i_step > self.start_training:
-            for i_epoch in range(n_epochs):
-                sample = self.memory.sample()
-                info_train = self.learner.update(sample)
-        info_train["epsilon-greedy"] = self.egreedy
-        return info_train
+            raise AttributeError(f"MFQ currently does not support the policy named {self.config.policy}.")
+
+        return policy
+
+    def _actions_mean(self, obs_dict: Union[List[dict], dict], actions_dict: Union[List[dict], dict],
+                      agent_mask: dict):
+        """
+        Returns the mean actions of the neighbors of the agents, computed from the actions they took.
+
+        Parameters:
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            actions_dict (Union[List[dict], dict]): Actions for each agent in self.agent_keys.
+            agent_mask (dict): The alive agents, {agent_key: ndarray[n_envs]}.
+
+        Returns:
+            actions_mean (dict): The mean actions, {agent_key: ndarray[n_envs, n_actions]}.
+        """
+        mean_field = self.policy.mean_field
+        actions = torch.as_tensor(self._packed_array(actions_dict), device=self.device).long()
+        actions_onehot = torch.nn.functional.one_hot(actions, self.action_space[self.agent_keys[0]].n).float()
+        alive = torch.as_tensor(np.stack([agent_mask[k] for k in self.agent_keys], axis=1), device=self.device)
+        obs_arrays = self._agent_arrays(obs_dict)
+        positions = mean_field.get_positions([obs_arrays[k] for k in self.agent_keys])
+        actions_mean = mean_field(actions_onehot, alive, positions).cpu().numpy()
+        return {k: actions_mean[:, i] for i, k in enumerate(self.agent_keys)}
+
+    def _actions_mean_next(self, obs_next_dict: Union[List[dict], dict],
+                           avail_actions_next: Optional[Union[List[dict], dict]], agent_mask: dict):
+        """
+        Returns the mean actions of the neighbors of the agents at the next step, estimated with the Boltzmann
+        policies of the agents, so that the learner does not aggregate the mean actions of every sampled batch.
+
+        Parameters:
+            obs_next_dict (Union[List[dict], dict]): Next observations for each agent in self.agent_keys.
+            avail_actions_next (Optional[Union[List[dict], dict]]): The next actions mask values for each agent.
+            agent_mask (dict): The agents alive at the next step, {agent_key: ndarray[n_envs]}.
+
+        Returns:
+            actions_mean (dict): The mean actions, {agent_key: ndarray[n_envs, n_actions]}.
+        """
+        mean_field = self.policy.mean_field
+        obs_input, agents_id, avail_actions_input = self._build_inputs(obs_next_dict, avail_actions_next)
+        obs_arrays = self._agent_arrays(obs_next_dict)
+        positions = mean_field.get_positions([obs_arrays[k] for k in self.agent_keys])
+        alive = torch.as_tensor(np.stack([agent_mask[k] for k in self.agent_keys], axis=1), device=self.device)
+        actions_mean = self.policy.mean_actions(observation=obs_input, agent_ids=agents_id,
+                                                avail_actions=avail_actions_input, agent_mask=alive,
+                                                positions=positions, temperature=self.temperature)
+        actions_mean = mean_field.stack(actions_mean).cpu().numpy()
+        return {k: actions_mean[:, i] for i, k in enumerate(self.agent_keys)}
+
+    def store_experience(self, obs_dict, avail_actions, actions_dict, obs_next_dict, avail_actions_next,
+                         rewards_dict, terminals_dict, info, **kwargs):
+        """
+        Store experience data into replay buffer, with the mean actions of the neighbors of the agents at the current
+        and the next steps.
+
+        Parameters:
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions (Union[List[dict], dict]): Actions mask values for each agent in self.agent_keys.
+            actions_dict (Union[List[dict], dict]): Actions for each agent in self.agent_keys.
+            obs_next_dict (Union[List[dict], dict]): Next observations for each agent in self.agent_keys.
+            avail_actions_next (Union[List[dict], dict]): The next actions mask values for each agent.
+            rewards_dict (Union[List[dict], dict]): Rewards for each agent in self.agent_keys.
+            terminals_dict (Union[List[dict], dict]): Terminated values for each agent in self.agent_keys.
+            info (Union[List[dict], dict]): Other information for the environment at current step.
+        """
+        agent_mask = self._info_array(info, 'agent_mask')
+        terminals = self._agent_arrays(terminals_dict)
+        agent_mask_next = {k: np.logical_and(agent_mask[k], np.logical_not(terminals[k])) for k in self.agent_keys}
+        experience_data = {
+            'obs': self._agent_arrays(obs_dict),
+            'actions': self._agent_arrays(actions_dict),
+            'act_mean': self._actions_mean(obs_dict, actions_dict, agent_mask),
+            'act_mean_next': self._actions_mean_next(obs_next_dict, avail_actions_next, agent_mask_next),
+            'obs_next': self._agent_arrays(obs_next_dict),
+            'rewards': self._agent_arrays(rewards_dict),
+            'terminals': terminals,
+            'agent_mask': agent_mask,
+        }
+        if self.use_global_state:
+            experience_data['state'] = np.array(kwargs['state'])
+            experience_data['state_next'] = np.array(kwargs['next_state'])
+        if self.use_actions_mask:
+            experience_data['avail_actions'] = self._agent_arrays(avail_actions)
+            experience_data['avail_actions_next'] = self._agent_arrays(avail_actions_next)
+        self.memory.store(**experience_data)
+
+    def action(self,
+               obs_dict: Union[List[dict], dict],
+               avail_actions_dict: Optional[Union[List[dict], dict]] = None,
+               rnn_hidden: Optional[dict] = None,
+               test_mode: Optional[bool] = False,
+               **kwargs):
+        """
+        Returns actions for agents.
+
+        The mean actions of the neighbors are estimated with the Boltzmann policies of the agents first, then every
+        agent takes the greedy action of its Q-values given the mean action of its neighbors.
+
+        Parameters:
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
+            rnn_hidden (Optional[dict]): The hidden variables of the RNN.
+            test_mode (Optional[bool]): True for testing without noises.
+
+        Returns:
+            rnn_hidden_state (dict): The new hidden states for RNN (if self.use_rnn=True).
+            actions_dict (dict): The output actions.
+        """
+        batch_size = self._batch_size(obs_dict)
+        obs_input, agents_id, avail_actions_input = self._build_inputs(obs_dict, avail_actions_dict)
+        obs_arrays = self._agent_arrays(obs_dict)
+        positions = self.policy.mean_field.get_positions([obs_arrays[k] for k in self.agent_keys])
+        actions_mean = self.policy.mean_actions(observation=obs_input, agent_ids=agents_id,
+                                                avail_actions=avail_actions_input, positions=positions,
+                                                temperature=self.temperature)
+        hidden_state, actions, evalQ = self.policy(observation=obs_input,
+                                                   actions_mean=actions_mean,
+                                                   agent_ids=agents_id,
+                                                   avail_actions=avail_actions_input)
+
+        actions_out = self._pack_outputs(actions, batch_size)
+        if not test_mode:  # get random actions
+            q_values = None
+            if self.boltzmann_temperature is not None:
+                q_values = self._pack_outputs(evalQ, batch_size, vector=True, padding=-1e10)
+            actions_out = self.exploration(actions_out, self._packed_avail_actions(avail_actions_dict, batch_size),
+                                           q_values)
+        return {"hidden_state": hidden_state, "actions": self._unpack_actions(actions_out, batch_size)}
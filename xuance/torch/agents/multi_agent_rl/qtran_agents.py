@@ -71,8 +71,8 @@ class QTRAN_Agents(OffPolicyMARLAgents):
         return policy
 
     def action(self,
-               obs_dict: List[dict],
-               avail_actions_dict: Optional[List[dict]] = None,
+               obs_dict: Union[List[dict], dict],
+               avail_actions_dict: Optional[Union[List[dict], dict]] = None,
                rnn_hidden: Optional[dict] = None,
                test_mode: Optional[bool] = False,
                **kwargs):
@@ -80,8 +80,8 @@ class QTRAN_Agents(OffPolicyMARLAgents):
         Returns actions for agents.
 
         Parameters:
-            obs_dict (List[dict]): Observations for each agent in self.agent_keys.
-            avail_actions_dict (Optional[List[dict]]): Actions mask values, default is None.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
             rnn_hidden (Optional[dict]): The hidden variables of the RNN.
             test_mode (Optional[bool]): True for testing without noises.
 
@@ -89,21 +89,18 @@ class QTRAN_Agents(OffPolicyMARLAgents):
             rnn_hidden_state (dict): The new hidden states for RNN (if self.use_rnn=True).
             actions_dict (dict): The output actions.
         """
-        batch_size = len(obs_dict)
+        batch_size = self._batch_size(obs_dict)
         obs_input, agents_id, avail_actions_input = self._build_inputs(obs_dict, avail_actions_dict)
-        hidden_state, _, actions, _ = self.policy(observation=obs_input,
-                                                  agent_ids=agents_id,
-                                                  avail_actions=avail_actions_input,
-                                                  rnn_hidden=rnn_hidden)
-
-        if self.use_parameter_sharing:
-            key = self.agent_keys[0]
-            actions_out = actions[key].reshape([batch_size, self.n_agents]).cpu().detach().numpy()
-            actions_dict = [{k: actions_out[e, i] for i, k in enumerate(self.agent_keys)} for e in range(batch_size)]
-        else:
-            actions_out = {k: actions[k].reshape(batch_size).cpu().detach().numpy() for k in self.agent_keys}
-            actions_dict = [{k: actions_out[k][i] for k in self.agent_keys} for i in range(batch_size)]
+        hidden_state, _, actions, evalQ = self.policy(observation=obs_input,
+                                                      agent_ids=agents_id,
+                                                      avail_actions=avail_actions_input,
+                                                      rnn_hidden=rnn_hidden)
 
+        actions_out = self._pack_outputs(actions, batch_size)
         if not test_mode:  # get random actions
-            actions_dict = self.exploration(batch_size, actions_dict, avail_actions_dict)
-        return {"hidden_state": hidden_state, "actions": actions_dict}
+            q_values = None
+            if self.boltzmann_temperature is not None:
+                q_values = self._pack_outputs(evalQ, batch_size, vector=True, padding=-1e10)
+            actions_out = self.exploration(actions_out, self._packed_avail_actions(avail_actions_dict, batch_size),
+                                           q_values)
+        return {"hidden_state": hidden_state, "actions": self._unpack_actions(actions_out, batch_size)}
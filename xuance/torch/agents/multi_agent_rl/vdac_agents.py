@@ -92,39 +92,38 @@ class VDAC_Agents(OnPolicyMARLAgents):
         Store experience data into replay buffer.
 
         Parameters:
-            obs_dict (List[dict]): Observations for each agent in self.agent_keys.
-            avail_actions (List[dict]): Actions mask values for each agent in self.agent_keys.
-            actions_dict (List[dict]): Actions for each agent in self.agent_keys.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
+            avail_actions (Union[List[dict], dict]): Actions mask values for each agent in self.agent_keys.
+            actions_dict (Union[List[dict], dict]): Actions for each agent in self.agent_keys.
             log_pi_a (dict): The log of pi.
-            rewards_dict (List[dict]): Rewards for each agent in self.agent_keys.
+            rewards_dict (Union[List[dict], dict]): Rewards for each agent in self.agent_keys.
             values_dict (dict): Critic values for each agent in self.agent_keys.
-            terminals_dict (List[dict]): Terminated values for each agent in self.agent_keys.
-            info (List[dict]): Other information for the environment at current step.
+            terminals_dict (Union[List[dict], dict]): Terminated values for each agent in self.agent_keys.
+            info (Union[List[dict], dict]): Other information for the environment at current step.
             **kwargs: Other inputs.
         """
+        rewards_mean = self._packed_array(rewards_dict).mean(axis=1)
         experience_data = {
-            'obs': {k: np.array([data[k] for data in obs_dict]) for k in self.agent_keys},
-            'actions': {k: np.array([data[k] for data in actions_dict]) for k in self.agent_keys},
+            'obs': self._agent_arrays(obs_dict),
+            'actions': self._agent_arrays(actions_dict),
             # 'log_pi_old': log_pi_a,
-            'rewards': {k: np.array([np.array(list(data.values())).mean() for data in rewards_dict])
-                        for k in self.agent_keys},
+            'rewards': {k: rewards_mean for k in self.agent_keys},
             'values': values_dict,
-            'terminals': {k: np.array([data[k] for data in terminals_dict]) for k in self.agent_keys},
-            'agent_mask': {k: np.array([data['agent_mask'][k] for data in info]) for k in self.agent_keys},
+            'terminals': self._agent_arrays(terminals_dict),
+            'agent_mask': self._info_array(info, 'agent_mask'),
         }
         if self.use_rnn:
-            experience_data['episode_steps'] = np.array([data['episode_step'] - 1 for data in info])
+            experience_data['episode_steps'] = self._info_array(info, 'episode_step') - 1
         if self.use_global_state:
             experience_data['state'] = np.array(kwargs['state'])
         if self.use_actions_mask:
-            experience_data['avail_actions'] = {k: np.array([data[k] for data in avail_actions])
-                                                for k in self.agent_keys}
+            experience_data['avail_actions'] = self._agent_arrays(avail_actions)
         self.memory.store(**experience_data)
 
     def action(self,
-               obs_dict: List[dict],
+               obs_dict: Union[List[dict], dict],
                state: Optional[np.ndarray] = None,
-               avail_actions_dict: Optional[List[dict]] = None,
+               avail_actions_dict: Optional[Union[List[dict], dict]] = None,
                rnn_hidden_actor: Optional[dict] = None,
                rnn_hidden_critic: Optional[dict] = None,
                test_mode: Optional[bool] = False,
@@ -133,9 +132,9 @@ class VDAC_Agents(OnPolicyMARLAgents):
         Returns actions for agents.
 
         Parameters:
-            obs_dict (dict): Observations for each agent in self.agent_keys.
+            obs_dict (Union[List[dict], dict]): Observations for each agent in self.agent_keys.
             state (Optional[np.ndarray]): The global state.
-            avail_actions_dict (Optional[List[dict]]): Actions mask values, default is None.
+            avail_actions_dict (Optional[Union[List[dict], dict]]): Actions mask values, default is None.
             rnn_hidden_actor (Optional[dict]): The RNN hidden states of actor representation.
             rnn_hidden_critic (Optional[dict]): The RNN hidden states of critic representation.
             test_mode (Optional[bool]): True for testing without noises.
@@ -147,7 +146,7 @@ class VDAC_Agents(OnPolicyMARLAgents):
             log_pi_a (dict): The log of pi.
             values_dict (dict): The evaluated critic values (when test_mode is False).
         """
-        n_env = len(obs_dict)
+        n_env = self._batch_size(obs_dict)
         rnn_hidden_critic_new, log_pi_a_dict, values_dict = {}, {}, {}
 
         obs_input, agents_id, avail_actions_input = self._build_inputs(obs_dict, avail_actions_dict)
@@ -178,16 +177,16 @@ class VDAC_Agents(OnPolicyMARLAgents):
                 actions_out = actions_sample.reshape(n_env, self.n_agents, -1)
             else:
                 actions_out = actions_sample.reshape(n_env, self.n_agents)
-            actions_dict = [{k: actions_out[e, i].cpu().detach().numpy() for i, k in enumerate(self.agent_keys)}
-                            for e in range(n_env)]
+            actions_out = actions_out.cpu().detach().numpy()
+            actions_dict = self._env_batch({k: actions_out[:, i] for i, k in enumerate(self.agent_keys)}, n_env)
         else:
             actions_sample = {k: pi_dists[k].stochastic_sample() for k in self.agent_keys}
             if self.continuous_control:
-                actions_dict = [{k: actions_sample[k].cpu().detach().numpy()[e].reshape([-1]) for k in self.agent_keys}
-                                for e in range(n_env)]
+                actions_out = {k: actions_sample[k].cpu().detach().numpy().reshape([n_env, -1])
+                               for k in self.agent_keys}
             else:
-                actions_dict = [{k: actions_sample[k].cpu().detach().numpy()[e].reshape([]) for k in self.agent_keys}
-                                for e in range(n_env)]
+                actions_out = {k: actions_sample[k].cpu().detach().numpy().reshape([n_env]) for k in self.agent_keys}
+            actions_dict = self._env_batch(actions_out, n_env)
 
         return {"rnn_hidden_actor": rnn_hidden_actor_new, "rnn_hidden_critic": rnn_hidden_critic_new,
                 "actions": actions_dict, "log_pi": None, "values": values_dict}
@@ -1,12 +1,19 @@
-from .pg_agent import PG_Agent
-from .ppg_agent import PPG_Agent
-from .a2c_agent import A2C_Agent
-from .ppokl_agent import PPOKL_Agent
-from .ppoclip_agent import PPOCLIP_Agent
-from .pdqn_agent import PDQN_Agent
-from .spdqn_agent import SPDQN_Agent
-from .mpdqn_agent import MPDQN_Agent
-from .ddpg_agent import DDPG_Agent
-from .sac_agent import SAC_Agent
-from .td3_agent import TD3_Agent
-from .npg_agent import NPG_Agent
+from xuance.common.registry_tools import lazy_attributes
+
+# Maps each member to the module that defines it, the module is imported on first access.
+_members = {
+    "PG_Agent": ".pg_agent",
+    "PPG_Agent": ".ppg_agent",
+    "A2C_Agent": ".a2c_agent",
+    "PPOKL_Agent": ".ppokl_agent",
+    "PPOCLIP_Agent": ".ppoclip_agent",
+    "PDQN_Agent": ".pdqn_agent",
+    "SPDQN_Agent": ".spdqn_agent",
+    "MPDQN_Agent": ".mpdqn_agent",
+    "DDPG_Agent": ".ddpg_agent",
+    "SAC_Agent": ".sac_agent",
+    "TD3_Agent": ".td3_agent",
+    "NPG_Agent": ".npg_agent",
+}
+
+__getattr__ = lazy_attributes(__name__, _members)
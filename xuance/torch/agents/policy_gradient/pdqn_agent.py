@@ -2,7 +2,6 @@ import gym
 import torch
 import numpy as np
 from tqdm import tqdm
-from copy import deepcopy
 from argparse import Namespace
 from gym import spaces
 from xuance.environment.single_agent_env import Gym_Env
@@ -122,7 +121,7 @@ class PDQN_Agent(Agent):
         train_info = {}
         for _ in range(n_epochs):
             samples = self.memory.sample()
-            train_info = self.learner.update(**samples)
+            train_info = self.metrics.record(self.learner.update(**samples))
         return train_info
 
     def train(self, train_steps=10000):
@@ -144,7 +143,7 @@ class PDQN_Agent(Agent):
                 self.log_infos(train_info, self.current_step)
 
             scores += rewards
-            obs = deepcopy(next_obs)
+            obs = next_obs
 
             if terminal:
                 step_info["returns-step"] = scores
@@ -177,7 +176,7 @@ class PDQN_Agent(Agent):
             (next_obs, steps), rewards, terminal, _ = self.envs.step(action)
             self.envs.render("human")
             episode_score += rewards
-            obs = deepcopy(next_obs)
+            obs = next_obs
             if terminal:
                 scores.append(episode_score)
                 obs, _ = self.envs.reset()
@@ -1,7 +1,6 @@
 import torch
 import numpy as np
 from tqdm import tqdm
-from copy import deepcopy
 from argparse import Namespace
 from xuance.common import Union
 from xuance.environment import DummyVecEnv, SubprocVecEnv
@@ -96,16 +95,16 @@ class PPG_Agent(OnPolicyAgent):
         return aux_info
 
     def train(self, train_steps):
-        obs = self.envs.buf_obs
+        obs = self._copy_observations(self.envs.buf_obs, copy_arrays=True)
         for _ in tqdm(range(train_steps)):
             step_info = {}
             self.obs_rms.update(obs)
-            obs = self._process_observation(obs)
+            obs = self._normalize_observation(obs)
             policy_out = self.action(obs, return_dists=True, return_logpi=False)
             acts, rets = policy_out['actions'], policy_out['values']
             next_obs, rewards, terminals, trunctions, infos = self.envs.step(acts)
             aux_info = self.get_aux_info(policy_out)
-            self.memory.store(obs, acts, self._process_reward(rewards), rets, terminals, aux_info)
+            self.memory.store(self._observations_to_numpy(obs), acts, self._process_reward(rewards), rets, terminals, aux_info)
             if self.memory.full:
                 vals = self.get_terminated_values(next_obs, rewards)
                 for i in range(self.n_envs):
@@ -121,7 +120,7 @@ class PPG_Agent(OnPolicyAgent):
                         end = start + self.batch_size
                         sample_idx = indexes[start:end]
                         samples = self.memory.sample(sample_idx)
-                        step_info.update(self.learner.update_policy(**samples))
+                        step_info.update(self.metrics.record(self.learner.update_policy(**samples)))
                 # critic update
                 for _ in range(self.value_nepoch):
                     np.random.shuffle(indexes)
@@ -129,7 +128,7 @@ class PPG_Agent(OnPolicyAgent):
                         end = start + self.batch_size
                         sample_idx = indexes[start:end]
                         samples = self.memory.sample(sample_idx)
-                        step_info.update(self.learner.update_critic(**samples))
+                        step_info.update(self.metrics.record(self.learner.update_critic(**samples)))
                     
                 # update old_prob
                 buffer_obs = self.memory.observations
@@ -143,32 +142,11 @@ class PPG_Agent(OnPolicyAgent):
                         end = start + self.batch_size
                         sample_idx = indexes[start:end]
                         samples = self.memory.sample(sample_idx)
-                        step_info.update(self.learner.update_auxiliary(**samples))
+                        step_info.update(self.metrics.record(self.learner.update_auxiliary(**samples)))
                 self.log_infos(step_info, self.current_step)
                 self.memory.clear()
 
-            self.returns = self.gamma * self.returns + rewards
-            obs = deepcopy(next_obs)
-            for i in range(self.n_envs):
-                if terminals[i] or trunctions[i]:
-                    self.ret_rms.update(self.returns[i:i + 1])
-                    self.returns[i] = 0.0
-                    if self.atari and (~trunctions[i]):
-                        pass
-                    else:
-                        if terminals[i]:
-                            self.memory.finish_path(0, i)
-                        else:
-                            vals = self.get_terminated_values(next_obs, rewards)
-                            self.memory.finish_path(vals[i], i)
-                        obs[i] = infos[i]["reset_obs"]
-                        self.envs.buf_obs[i] = obs[i]
-                        self.current_episode[i] += 1
-                        if self.use_wandb:
-                            step_info["Episode-Steps/env-%d" % i] = infos[i]["episode_step"]
-                            step_info["Train-Episode-Rewards/env-%d" % i] = infos[i]["episode_score"]
-                        else:
-                            step_info["Episode-Steps"] = {"env-%d" % i: infos[i]["episode_step"]}
-                            step_info["Train-Episode-Rewards"] = {"env-%d" % i: infos[i]["episode_score"]}
-                        self.log_infos(step_info, self.current_step)
+            obs, episode_info = self._end_episodes(next_obs, rewards, terminals, trunctions, infos)
+            if episode_info:
+                self.log_infos(episode_info, self.current_step)
             self.current_step += self.n_envs
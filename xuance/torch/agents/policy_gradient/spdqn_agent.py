@@ -2,7 +2,6 @@ import gym
 import torch
 import numpy as np
 from tqdm import tqdm
-from copy import deepcopy
 from argparse import Namespace
 from gym import spaces
 from xuance.environment.single_agent_env import Gym_Env
@@ -108,7 +107,7 @@ class SPDQN_Agent(PDQN_Agent, Agent):
                 self.log_infos(train_info, self.current_step)
 
             scores += rewards
-            obs = deepcopy(next_obs)
+            obs = next_obs
 
             if terminal:
                 step_info["returns-step"] = scores
@@ -1,8 +1,15 @@
-from .dqn_agent import DQN_Agent
-from .ddqn_agent import DDQN_Agent
-from .dueldqn_agent import DuelDQN_Agent
-from .c51_agent import C51_Agent
-from .noisydqn_agent import NoisyDQN_Agent
-from .perdqn_agent import PerDQN_Agent
-from .qrdqn_agent import QRDQN_Agent
-from .drqn_agent import DRQN_Agent
+from xuance.common.registry_tools import lazy_attributes
+
+# Maps each member to the module that defines it, the module is imported on first access.
+_members = {
+    "DQN_Agent": ".dqn_agent",
+    "DDQN_Agent": ".ddqn_agent",
+    "DuelDQN_Agent": ".dueldqn_agent",
+    "C51_Agent": ".c51_agent",
+    "NoisyDQN_Agent": ".noisydqn_agent",
+    "PerDQN_Agent": ".perdqn_agent",
+    "QRDQN_Agent": ".qrdqn_agent",
+    "DRQN_Agent": ".drqn_agent",
+}
+
+__getattr__ = lazy_attributes(__name__, _members)
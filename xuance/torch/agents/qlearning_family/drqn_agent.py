@@ -1,7 +1,6 @@
 import torch
 import numpy as np
 from tqdm import tqdm
-from copy import deepcopy
 from argparse import Namespace
 from xuance.common import Union
 from xuance.environment import DummyVecEnv, SubprocVecEnv
@@ -19,6 +18,7 @@ class DRQN_Agent(OffPolicyAgent):
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
     """
+    supports_async_learner = False  # Runs its own train loop.
 
     def __init__(self,
                  config: Namespace,
@@ -80,14 +80,13 @@ class DRQN_Agent(OffPolicyAgent):
         return {"actions": actions, "rnn_hidden_next": rnn_hidden_next}
 
     def train(self, train_steps):
-        obs = self.envs.buf_obs
+        obs = self._copy_observations(self.envs.buf_obs, copy_arrays=True)
         episode_data = [EpisodeBuffer() for _ in range(self.n_envs)]
         for i_env in range(self.n_envs):
             episode_data[i_env].obs.append(self._process_observation(obs[i_env]))
         self.rnn_hidden = self.policy.init_hidden(self.n_envs)
         dones = [False for _ in range(self.n_envs)]
         for _ in tqdm(range(train_steps)):
-            step_info = {}
             self.obs_rms.update(obs)
             obs = self._process_observation(obs)
             policy_out = self.action(obs, self.egreedy, self.rnn_hidden)
@@ -99,31 +98,23 @@ class DRQN_Agent(OffPolicyAgent):
                 train_infos = self.train_epochs(n_epochs=1)
                 self.log_infos(train_infos, self.current_step)
 
-            obs = deepcopy(next_obs)
+            obs = self._copy_observations(next_obs)
             for i in range(self.n_envs):
                 episode_data[i].put(
                     [self._process_observation(obs[i]), acts[i], self._process_reward(rewards[i]), terminals[i]])
-                if terminals[i] or trunctions[i]:
-                    if self.atari and (~trunctions[i]):
-                        pass
-                    else:
-                        self.rnn_hidden = self.policy.init_hidden_item(self.rnn_hidden, i)
-                        dones[i] = True
-                        self.current_episode[i] += 1
-                        if self.rank == 0:
-                            if self.use_wandb:
-                                step_info[f"Episode-Steps/rank_{self.rank}/env-{i}"] = infos[i]["episode_step"]
-                                step_info[f"Train-Episode-Rewards/rank_{self.rank}/env-{i}"] = infos[i]["episode_score"]
-                            else:
-                                step_info[f"Episode-Steps/rank_{self.rank}"] = {f"env-{i}": infos[i]["episode_step"]}
-                                step_info[f"Train-Episode-Rewards/rank_{self.rank}"] = {
-                                    f"env-{i}": infos[i]["episode_score"]}
-                            self.log_infos(step_info, self.current_step)
-                        self.memory.store(episode_data[i])
-                        episode_data[i] = EpisodeBuffer()
-                        obs[i] = infos[i]["reset_obs"]
-                        self.envs.buf_obs[i] = obs[i]
-                        episode_data[i].obs.append(self._process_observation(obs[i]))
+            reset_ids = np.flatnonzero(trunctions if self.atari else np.logical_or(terminals, trunctions))
+            if len(reset_ids) > 0:
+                for i in reset_ids:
+                    self.rnn_hidden = self.policy.init_hidden_item(self.rnn_hidden, i)
+                    dones[i] = True
+                    self.memory.store(episode_data[i])
+                    episode_data[i] = EpisodeBuffer()
+                obs = self._reset_observations(obs, reset_ids, infos)
+                for i in reset_ids:
+                    episode_data[i].obs.append(self._process_observation(obs[i]))
+                self.current_episode[reset_ids] += 1
+                if self.rank == 0:
+                    self.log_infos(self._episode_info(reset_ids, infos), self.current_step)
 
             self.current_step += self.n_envs
             if self.egreedy > self.end_greedy:
@@ -131,6 +122,7 @@ class DRQN_Agent(OffPolicyAgent):
 
     def test(self, env_fn, test_episodes):
         test_envs = env_fn()
+        self.obs_rms.freeze()  # evaluation must not shift the statistics used in training.
         num_envs = test_envs.num_envs
         videos, episode_videos = [[] for _ in range(num_envs)], []
         current_episode, scores, best_score = 0, [], -np.inf
@@ -152,7 +144,7 @@ class DRQN_Agent(OffPolicyAgent):
                 for idx, img in enumerate(images):
                     videos[idx].append(img)
 
-            obs = deepcopy(next_obs)
+            obs = self._copy_observations(next_obs)
             for i in range(num_envs):
                 if terminals[i] or trunctions[i]:
                     if self.atari and (~trunctions[i]):
@@ -183,5 +175,6 @@ class DRQN_Agent(OffPolicyAgent):
         self.log_infos(test_info, self.current_step)
 
         test_envs.close()
+        self.obs_rms.unfreeze()
 
         return scores
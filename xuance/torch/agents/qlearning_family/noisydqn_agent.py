@@ -1,7 +1,6 @@
 import torch
 import numpy as np
 from tqdm import tqdm
-from copy import deepcopy
 from argparse import Namespace
 from xuance.common import Union
 from xuance.environment import DummyVecEnv, SubprocVecEnv
@@ -75,13 +74,12 @@ class NoisyDQN_Agent(Agent):
         for _ in range(n_epochs):
             samples = self.memory.sample()
             self.policy.noise_scale = self.noise_scale
-            train_info = self.learner.update(**samples)
+            train_info = self.metrics.record(self.learner.update(**samples))
         return train_info
 
     def train(self, train_steps):
-        obs = self.envs.buf_obs
+        obs = self._copy_observations(self.envs.buf_obs, copy_arrays=True)
         for _ in tqdm(range(train_steps)):
-            step_info = {}
             self.obs_rms.update(obs)
             obs = self._process_observation(obs)
             acts = self.action(obs)
@@ -92,24 +90,13 @@ class NoisyDQN_Agent(Agent):
                 train_info = self.train_epochs(n_epochs=self.n_epochs)
                 self.log_infos(train_info, self.current_step)
 
-            obs = deepcopy(next_obs)
-            for i in range(self.n_envs):
-                if terminals[i] or trunctions[i]:
-                    if self.atari and (~trunctions[i]):
-                        pass
-                    else:
-                        obs[i] = infos[i]["reset_obs"]
-                        self.envs.buf_obs[i] = obs[i]
-                        self.current_episode[i] += 1
-                        if self.rank == 0:
-                            if self.use_wandb:
-                                step_info[f"Episode-Steps/rank_{self.rank}/env-{i}"] = infos[i]["episode_step"]
-                                step_info[f"Train-Episode-Rewards/rank_{self.rank}/env-{i}"] = infos[i]["episode_score"]
-                            else:
-                                step_info[f"Episode-Steps/rank_{self.rank}"] = {f"env-{i}": infos[i]["episode_step"]}
-                                step_info[f"Train-Episode-Rewards/rank_{self.rank}"] = {
-                                    f"env-{i}": infos[i]["episode_score"]}
-                            self.log_infos(step_info, self.current_step)
+            obs = self._copy_observations(next_obs)
+            reset_ids = np.flatnonzero(trunctions if self.atari else np.logical_or(terminals, trunctions))
+            if len(reset_ids) > 0:
+                obs = self._reset_observations(obs, reset_ids, infos)
+                self.current_episode[reset_ids] += 1
+                if self.rank == 0:
+                    self.log_infos(self._episode_info(reset_ids, infos), self.current_step)
 
             self.current_step += self.n_envs
             if self.noise_scale > self.end_noise:
@@ -119,6 +106,7 @@ class NoisyDQN_Agent(Agent):
 
     def test(self, env_fn, test_episodes):
         test_envs = env_fn()
+        self.obs_rms.freeze()  # evaluation must not shift the statistics used in training.
         num_envs = test_envs.num_envs
         videos, episode_videos = [[] for _ in range(num_envs)], []
         current_episode, scores, best_score = 0, [], -np.inf
@@ -139,7 +127,7 @@ class NoisyDQN_Agent(Agent):
                 for idx, img in enumerate(images):
                     videos[idx].append(img)
 
-            obs = deepcopy(next_obs)
+            obs = self._copy_observations(next_obs)
             for i in range(num_envs):
                 if terminals[i] or trunctions[i]:
                     if self.atari and (~trunctions[i]):
@@ -169,5 +157,6 @@ class NoisyDQN_Agent(Agent):
         self.log_infos(test_info, self.current_step)
 
         test_envs.close()
+        self.obs_rms.unfreeze()
 
         return scores
@@ -1,5 +1,4 @@
 from tqdm import tqdm
-from copy import deepcopy
 from argparse import Namespace
 from xuance.common import Union
 from xuance.environment import DummyVecEnv, SubprocVecEnv
@@ -14,6 +13,7 @@ class PerDQN_Agent(DQN_Agent):
         config: the Namespace variable that provides hyper-parameters and other settings.
         envs: the vectorized environments.
     """
+    supports_async_learner = False  # Runs its own train loop.
 
     def __init__(self,
                  config: Namespace,
@@ -40,13 +40,13 @@ class PerDQN_Agent(DQN_Agent):
             samples = self.memory.sample(self.PER_beta)
             td_error, step_info = self.learner.update(**samples)
             self.memory.update_priorities(samples['step_choices'], td_error)
+            train_info.update(self.metrics.record(step_info))
         train_info["epsilon-greedy"] = self.e_greedy
         return train_info
 
     def train(self, train_steps):
-        obs = self.envs.buf_obs
+        obs = self._copy_observations(self.envs.buf_obs, copy_arrays=True)
         for _ in tqdm(range(train_steps)):
-            step_info = {}
             self.obs_rms.update(obs)
             obs = self._process_observation(obs)
             policy_out = self.action(obs, test_mode=False)
@@ -59,24 +59,9 @@ class PerDQN_Agent(DQN_Agent):
                 self.log_infos(train_info, self.current_step)
                 self.PER_beta += (1 - self.PER_beta0) / train_steps
 
-            obs = deepcopy(next_obs)
-            for i in range(self.n_envs):
-                if terminals[i] or trunctions[i]:
-                    if self.atari and (~trunctions[i]):
-                        pass
-                    else:
-                        obs[i] = infos[i]["reset_obs"]
-                        self.envs.buf_obs[i] = obs[i]
-                        self.current_episode[i] += 1
-                        if self.rank == 0:
-                            if self.use_wandb:
-                                step_info[f"Episode-Steps/rank_{self.rank}/env-{i}"] = infos[i]["episode_step"]
-                                step_info[f"Train-Episode-Rewards/rank_{self.rank}/env-{i}"] = infos[i]["episode_score"]
-                            else:
-                                step_info[f"Episode-Steps/rank_{self.rank}"] = {f"env-{i}": infos[i]["episode_step"]}
-                                step_info[f"Train-Episode-Rewards/rank_{self.rank}"] = {
-                                    f"env-{i}": infos[i]["episode_score"]}
-                            self.log_infos(step_info, self.current_step)
+            obs, step_info = self._end_episodes(next_obs, rewards, terminals, trunctions, infos)
+            if step_info and self.rank == 0:
+                self.log_infos(step_info, self.current_step)
 
             self.current_step += self.n_envs
             if self.e_greedy > self.end_greedy:
@@ -0,0 +1,19 @@
+from .base_comm import BaseComm, NoneComm
+from .comm_net import CommNet
+from .attention_comm import AttentionComm
+from .gnn_comm import GNNComm
+from .emergent_comm import EmergentComm
+
+REGISTRY_Communicator = {
+    "BaseComm": BaseComm,
+    "CommNet": CommNet,
+    "AttentionComm": AttentionComm,
+    "GNNComm": GNNComm,
+    "EmergentComm": EmergentComm
+}
+
+__all__ = [
+    "REGISTRY_Communicator",
+    "BaseComm", "NoneComm",
+    "CommNet", "AttentionComm", "GNNComm", "EmergentComm",
+]
@@ -0,0 +1,66 @@
+"""
+TarMAC: Targeted Multi-Agent Communication
+Paper link: https://arxiv.org/abs/1810.11187
+Implementation: Pytorch
+"""
+import torch
+import torch.nn as nn
+from xuance.common import Optional, Callable, Union, Sequence
+from xuance.torch import Tensor
+from xuance.torch.utils import mlp_block, ModuleType
+from xuance.torch.communications.base_comm import BaseComm, CommGraph
+
+
+class AttentionComm(BaseComm):
+    """
+    The targeted communication of TarMAC: in each round, every agent sends a key and a value, and receives the values of
+    its neighbors weighted by the softmax of the products between its query and their keys. The queries, keys and values
+    of all agents come from one linear layer, and the attention of all agents is one batched matmul.
+
+    Args:
+        state_dim (int): The dimension of the features of each agent.
+        n_agents (int): The number of agents.
+        hidden_sizes_comm (Sequence[int]): A list of hidden layer sizes for the message encoder.
+        msg_dim (int): The dimension of the messages (the hidden states of the communication rounds).
+        comm_rounds (int): The number of communication rounds.
+        key_dim (int): The dimension of the queries and the keys.
+        normalize (Optional[ModuleType]): The layer normalization over a minibatch of inputs.
+        initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
+        activation (Optional[ModuleType]): The activation function for each layer.
+        device (Optional[Union[str, int, torch.device]]): The calculating device.
+        **kwargs: The other args.
+    """
+
+    def __init__(self,
+                 state_dim: int,
+                 n_agents: int,
+                 hidden_sizes_comm: Sequence[int],
+                 msg_dim: int,
+                 comm_rounds: int = 1,
+                 key_dim: int = 16,
+                 normalize: Optional[ModuleType] = None,
+                 initialize: Optional[Callable[..., Tensor]] = None,
+                 activation: Optional[ModuleType] = None,
+                 device: Optional[Union[str, int, torch.device]] = None,
+                 **kwargs):
+        super(AttentionComm, self).__init__(state_dim, n_agents, hidden_sizes_comm, msg_dim, normalize, initialize,
+                                            activation, device, **kwargs)
+        self.comm_rounds = comm_rounds
+        self.key_dim = key_dim
+        self.attention_layers = nn.ModuleList([nn.Sequential(*mlp_block(msg_dim, 2 * key_dim + msg_dim, None, None,
+                                                                        initialize, device)[0])
+                                               for _ in range(comm_rounds)])
+        self.comm_layers = nn.ModuleList([nn.Sequential(*mlp_block(2 * msg_dim, msg_dim, None, activation,
+                                                                   initialize, device)[0])
+                                          for _ in range(comm_rounds)])
+
+    def forward(self, features: Tensor, agent_mask: Optional[Tensor] = None, adjacency: CommGraph = None):
+        hidden = self.msg_encoder(features)
+        graph = self.comm_graph(hidden, agent_mask, adjacency)
+        for attention_layer, comm_layer in zip(self.attention_layers, self.comm_layers):
+            query, key, value = attention_layer(hidden).split([self.key_dim, self.key_dim, self.msg_dim], dim=-1)
+            scores = (query @ key.transpose(-1, -2)) / self.key_dim ** 0.5
+            # The agents without neighbors get uniform weights from the softmax, which are zeroed by the graph.
+            attention = scores.masked_fill(graph == 0, torch.finfo(scores.dtype).min).softmax(dim=-1) * graph
+            hidden = comm_layer(torch.concat([hidden, attention @ value], dim=-1))
+        return hidden
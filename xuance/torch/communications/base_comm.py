@@ -1,11 +1,36 @@
 import torch
 import torch.nn as nn
-from xuance.common import Optional, Callable, Union, Sequence
+from xuance.common import Optional, Callable, Union, Sequence, Dict, Tuple
 from xuance.torch import Module, Tensor
 from xuance.torch.utils import mlp_block, ModuleType
 
+# The agent graph of the communication: None for a fully connected graph, a dense adjacency Tensor of shape
+# [..., n_agents, n_agents] (adjacency[..., i, j] != 0 if agent i receives the messages of agent j), or a sparse graph
+# given as the edge list (senders, receivers) of two 1-D index Tensors, shared by all samples.
+CommGraph = Optional[Union[Tensor, Tuple[Tensor, Tensor]]]
+
 
 class BaseComm(Module):
+    """
+    The base of the communication modules.
+
+    A communicator encodes the features of the agents, which are arranged as [..., n_agents, state_dim] with any leading
+    dimensions (e.g., the environments and the time steps), into messages and exchanges them over the agent graph. It
+    returns the received messages [..., n_agents, msg_dim]. The dead agents (agent_mask is 0) neither send nor receive
+    messages. The base communicator runs one round of mean aggregation of the encoded messages.
+
+    Args:
+        state_dim (int): The dimension of the features of each agent.
+        n_agents (int): The number of agents.
+        hidden_sizes_comm (Sequence[int]): A list of hidden layer sizes for the message encoder.
+        msg_dim (int): The dimension of the messages.
+        normalize (Optional[ModuleType]): The layer normalization over a minibatch of inputs.
+        initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
+        activation (Optional[ModuleType]): The activation function for each layer.
+        device (Optional[Union[str, int, torch.device]]): The calculating device.
+        **kwargs: The other args.
+    """
+
     def __init__(self,
                  state_dim: int,
                  n_agents: int,
@@ -28,9 +53,119 @@ class BaseComm(Module):
         layers_.extend(mlp_block(input_shape[0], msg_dim, None, None, initialize, device)[0])
         self.msg_encoder = nn.Sequential(*layers_)
 
-    def forward(self, hidden_features: Tensor):
-        encoded_msg = self.msg_encoder(hidden_features)
-        return encoded_msg
+    def comm_graph(self, features: Tensor, agent_mask: Optional[Tensor] = None, adjacency: CommGraph = None):
+        """
+        Returns the dense weights of the agent graph without self-loops.
+
+        Parameters:
+            features (Tensor): The features of the agents, [..., n_agents, dim], which give the dtype and the device.
+            agent_mask (Optional[Tensor]): The alive agents, [..., n_agents], default is all alive.
+            adjacency (CommGraph): The agent graph, default is the fully connected graph.
+
+        Returns:
+            graph (Tensor): The weights [..., n_agents (receivers), n_agents (senders)], 1 for the edges between alive
+                agents and 0 otherwise.
+        """
+        no_self_loops = 1 - torch.eye(self.n_agents, dtype=features.dtype, device=features.device)
+        if adjacency is None:
+            graph = no_self_loops
+        elif isinstance(adjacency, tuple):
+            senders, receivers = adjacency
+            graph = features.new_zeros(self.n_agents, self.n_agents).index_put(
+                (receivers, senders), features.new_ones(())) * no_self_loops
+        else:
+            graph = adjacency.to(features.dtype) * no_self_loops
+        if agent_mask is not None:
+            alive = agent_mask.to(features.dtype)
+            graph = graph * alive.unsqueeze(-1) * alive.unsqueeze(-2)
+        return graph
+
+    def aggregate(self, messages: Tensor, agent_mask: Optional[Tensor] = None, adjacency: CommGraph = None,
+                  normalization: str = "mean"):
+        """
+        Aggregates the messages of the neighbors of each agent, with one batched matmul on the dense graphs or one
+        index_add on the edge lists of the sparse graphs.
+
+        Parameters:
+            messages (Tensor): The messages sent by the agents, [..., n_agents, msg_dim].
+            agent_mask (Optional[Tensor]): The alive agents, [..., n_agents], default is all alive.
+            adjacency (CommGraph): The agent graph, default is the fully connected graph.
+            normalization (str): "mean" for the mean of the messages of the neighbors (zeros without neighbors), or
+                "symmetric" for the symmetric normalized graph with self-loops, D^-1/2 (A + I) D^-1/2, of GCN.
+
+        Returns:
+            received (Tensor): The aggregated messages, [..., n_agents, msg_dim].
+        """
+        if isinstance(adjacency, tuple):
+            senders, receivers = adjacency
+            if agent_mask is None:
+                weights = messages.new_ones(messages.shape[:-2] + senders.shape)
+            else:
+                alive = agent_mask.to(messages.dtype)
+                weights = alive[..., senders] * alive[..., receivers]
+            degree = messages.new_zeros(messages.shape[:-1]).index_add(-1, receivers, weights)
+            if normalization == "symmetric":
+                norm = (degree + 1).rsqrt()
+                weights = weights * norm[..., senders] * norm[..., receivers]
+                received = messages * norm.square().unsqueeze(-1)
+            else:
+                weights = weights / degree.clamp(min=1)[..., receivers]
+                received = messages.new_zeros(messages.shape)
+            return received.index_add(-2, receivers, messages[..., senders, :] * weights.unsqueeze(-1))
+
+        graph = self.comm_graph(messages, agent_mask, adjacency)
+        if normalization == "symmetric":
+            graph = graph + torch.eye(self.n_agents, dtype=messages.dtype, device=messages.device)
+            norm = graph.sum(dim=-1).rsqrt()
+            return (norm.unsqueeze(-1) * graph * norm.unsqueeze(-2)) @ messages
+        return (graph @ messages) / graph.sum(dim=-1, keepdim=True).clamp(min=1)
+
+    def forward(self, features: Tensor, agent_mask: Optional[Tensor] = None, adjacency: CommGraph = None):
+        """
+        Returns the received messages of the agents.
+
+        Parameters:
+            features (Tensor): The features of the agents, [..., n_agents, state_dim].
+            agent_mask (Optional[Tensor]): The alive agents, [..., n_agents], default is all alive.
+            adjacency (CommGraph): The agent graph, default is the fully connected graph.
+
+        Returns:
+            received (Tensor): The received messages, [..., n_agents, msg_dim].
+        """
+        return self.aggregate(self.msg_encoder(features), agent_mask, adjacency)
+
+    def communicate(self, features: Dict[str, Tensor], agent_mask: Optional[Dict[str, Tensor]] = None,
+                    adjacency: CommGraph = None):
+        """
+        Exchanges the messages between the agents in the layout of the MARL policies.
+
+        With parameter sharing, the only model key holds the rows of all agents ordered as (batch, agent), with an
+        optional time dimension after the rows for the RNN-based representations. Otherwise, each agent has its own
+        key. The agents are gathered to [..., n_agents, dim] for one exchange of all environments, agents and time
+        steps, and the received messages are returned in the layout of the features.
+
+        Parameters:
+            features (Dict[str, Tensor]): The features of the agents for each model key.
+            agent_mask (Optional[Dict[str, Tensor]]): The alive agents for each model key, in the layout of the
+                features without the last dimension, default is all alive.
+            adjacency (CommGraph): The agent graph, default is the fully connected graph.
+
+        Returns:
+            received (Dict[str, Tensor]): The received messages for each model key.
+        """
+        keys = list(features.keys())
+        if len(keys) == 1:
+            key = keys[0]
+            inputs = features[key].reshape(-1, self.n_agents, *features[key].shape[1:]).movedim(1, -2)
+            mask = None
+            if agent_mask is not None:
+                mask = agent_mask[key].reshape(-1, self.n_agents, *agent_mask[key].shape[1:]).movedim(1, -1)
+            received = self(inputs, mask, adjacency).movedim(-2, 1)
+            return {key: received.reshape(*features[key].shape[:-1], self.msg_dim)}
+        inputs = torch.stack([features[k] for k in keys], dim=-2)
+        mask = None if agent_mask is None else torch.stack([agent_mask[k] for k in keys], dim=-1)
+        received = self(inputs, mask, adjacency)
+        return {k: received[..., i, :] for i, k in enumerate(keys)}
 
 
 class NoneComm(Module):
@@ -39,5 +174,3 @@ class NoneComm(Module):
 
     def forward(self, msg: Tensor, **kwargs):
         return msg
-
-
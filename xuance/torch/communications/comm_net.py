@@ -0,0 +1,54 @@
+"""
+CommNet: Learning Multiagent Communication with Backpropagation
+Paper link: https://arxiv.org/abs/1605.07736
+Implementation: Pytorch
+"""
+import torch
+import torch.nn as nn
+from xuance.common import Optional, Callable, Union, Sequence
+from xuance.torch import Tensor
+from xuance.torch.utils import mlp_block, ModuleType
+from xuance.torch.communications.base_comm import BaseComm, CommGraph
+
+
+class CommNet(BaseComm):
+    """
+    The communication of CommNet: each round adds the mean of the hidden states of the neighbors to the hidden state of
+    each agent, h_i <- f(H h_i + C mean_j h_j), where H and C are fused in one linear layer.
+
+    Args:
+        state_dim (int): The dimension of the features of each agent.
+        n_agents (int): The number of agents.
+        hidden_sizes_comm (Sequence[int]): A list of hidden layer sizes for the message encoder.
+        msg_dim (int): The dimension of the messages (the hidden states of the communication rounds).
+        comm_rounds (int): The number of communication rounds.
+        normalize (Optional[ModuleType]): The layer normalization over a minibatch of inputs.
+        initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
+        activation (Optional[ModuleType]): The activation function for each layer.
+        device (Optional[Union[str, int, torch.device]]): The calculating device.
+        **kwargs: The other args.
+    """
+
+    def __init__(self,
+                 state_dim: int,
+                 n_agents: int,
+                 hidden_sizes_comm: Sequence[int],
+                 msg_dim: int,
+                 comm_rounds: int = 1,
+                 normalize: Optional[ModuleType] = None,
+                 initialize: Optional[Callable[..., Tensor]] = None,
+                 activation: Optional[ModuleType] = None,
+                 device: Optional[Union[str, int, torch.device]] = None,
+                 **kwargs):
+        super(CommNet, self).__init__(state_dim, n_agents, hidden_sizes_comm, msg_dim, normalize, initialize,
+                                      activation, device, **kwargs)
+        self.comm_rounds = comm_rounds
+        self.comm_layers = nn.ModuleList([nn.Sequential(*mlp_block(2 * msg_dim, msg_dim, None, activation,
+                                                                   initialize, device)[0])
+                                          for _ in range(comm_rounds)])
+
+    def forward(self, features: Tensor, agent_mask: Optional[Tensor] = None, adjacency: CommGraph = None):
+        hidden = self.msg_encoder(features)
+        for comm_layer in self.comm_layers:
+            hidden = comm_layer(torch.concat([hidden, self.aggregate(hidden, agent_mask, adjacency)], dim=-1))
+        return hidden
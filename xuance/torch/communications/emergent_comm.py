@@ -0,0 +1,73 @@
+"""
+Emergent communication with discrete symbols, trained end-to-end with the straight-through estimator (DIAL-style)
+Paper link: https://arxiv.org/abs/1605.06676
+Implementation: Pytorch
+"""
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from xuance.common import Optional, Callable, Union, Sequence
+from xuance.torch import Tensor
+from xuance.torch.utils import mlp_block, ModuleType
+from xuance.torch.communications.base_comm import BaseComm, CommGraph
+
+
+class EmergentComm(BaseComm):
+    """
+    The emergent communication with a discrete vocabulary: in each round, every agent speaks one symbol of the
+    vocabulary, and receives the frequencies of the symbols of its neighbors. The symbols are one-hot in the forward
+    pass and get the gradients of the softmax of the logits (straight-through), so that the messages are the same
+    when acting and when training, and the communication channel stays differentiable.
+
+    Args:
+        state_dim (int): The dimension of the features of each agent.
+        n_agents (int): The number of agents.
+        hidden_sizes_comm (Sequence[int]): A list of hidden layer sizes for the message encoder.
+        msg_dim (int): The dimension of the received messages (the hidden states of the communication rounds).
+        comm_rounds (int): The number of communication rounds.
+        vocab_size (int): The number of symbols of the vocabulary.
+        temperature (float): The temperature of the softmax of the straight-through gradients.
+        normalize (Optional[ModuleType]): The layer normalization over a minibatch of inputs.
+        initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
+        activation (Optional[ModuleType]): The activation function for each layer.
+        device (Optional[Union[str, int, torch.device]]): The calculating device.
+        **kwargs: The other args.
+    """
+
+    def __init__(self,
+                 state_dim: int,
+                 n_agents: int,
+                 hidden_sizes_comm: Sequence[int],
+                 msg_dim: int,
+                 comm_rounds: int = 1,
+                 vocab_size: int = 16,
+                 temperature: float = 1.0,
+                 normalize: Optional[ModuleType] = None,
+                 initialize: Optional[Callable[..., Tensor]] = None,
+                 activation: Optional[ModuleType] = None,
+                 device: Optional[Union[str, int, torch.device]] = None,
+                 **kwargs):
+        super(EmergentComm, self).__init__(state_dim, n_agents, hidden_sizes_comm, msg_dim, normalize, initialize,
+                                           activation, device, **kwargs)
+        self.comm_rounds = comm_rounds
+        self.vocab_size = vocab_size
+        self.temperature = temperature
+        self.speakers = nn.ModuleList([nn.Sequential(*mlp_block(msg_dim, vocab_size, None, None,
+                                                                initialize, device)[0])
+                                       for _ in range(comm_rounds)])
+        self.comm_layers = nn.ModuleList([nn.Sequential(*mlp_block(msg_dim + vocab_size, msg_dim, None, activation,
+                                                                   initialize, device)[0])
+                                          for _ in range(comm_rounds)])
+
+    def symbols(self, logits: Tensor):
+        """Returns the one-hot symbols of the logits, with the gradients of the softmax (straight-through)."""
+        probs = F.softmax(logits / self.temperature, dim=-1)
+        one_hot = F.one_hot(logits.argmax(dim=-1), self.vocab_size).to(probs.dtype)
+        return one_hot + probs - probs.detach()
+
+    def forward(self, features: Tensor, agent_mask: Optional[Tensor] = None, adjacency: CommGraph = None):
+        hidden = self.msg_encoder(features)
+        for speaker, comm_layer in zip(self.speakers, self.comm_layers):
+            heard = self.aggregate(self.symbols(speaker(hidden)), agent_mask, adjacency)
+            hidden = comm_layer(torch.concat([hidden, heard], dim=-1))
+        return hidden
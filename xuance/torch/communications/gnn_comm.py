@@ -0,0 +1,55 @@
+"""
+GNN communication: graph convolutional message passing between agents (GCN)
+Paper link: https://arxiv.org/abs/1609.02907
+Implementation: Pytorch
+"""
+import torch
+import torch.nn as nn
+from xuance.common import Optional, Callable, Union, Sequence
+from xuance.torch import Tensor
+from xuance.torch.utils import mlp_block, ModuleType
+from xuance.torch.communications.base_comm import BaseComm, CommGraph
+
+
+class GNNComm(BaseComm):
+    """
+    The communication with graph convolutions: each round propagates the hidden states over the symmetric normalized
+    agent graph with self-loops, h <- f(D^-1/2 (A + I) D^-1/2 h W), where the dead agents are removed from the graph.
+    The sparse graphs (edge lists) are propagated with index_add, so that the cost grows with the number of edges.
+
+    Args:
+        state_dim (int): The dimension of the features of each agent.
+        n_agents (int): The number of agents.
+        hidden_sizes_comm (Sequence[int]): A list of hidden layer sizes for the message encoder.
+        msg_dim (int): The dimension of the messages (the hidden states of the communication rounds).
+        comm_rounds (int): The number of communication rounds (graph convolution layers).
+        normalize (Optional[ModuleType]): The layer normalization over a minibatch of inputs.
+        initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
+        activation (Optional[ModuleType]): The activation function for each layer.
+        device (Optional[Union[str, int, torch.device]]): The calculating device.
+        **kwargs: The other args.
+    """
+
+    def __init__(self,
+                 state_dim: int,
+                 n_agents: int,
+                 hidden_sizes_comm: Sequence[int],
+                 msg_dim: int,
+                 comm_rounds: int = 1,
+                 normalize: Optional[ModuleType] = None,
+                 initialize: Optional[Callable[..., Tensor]] = None,
+                 activation: Optional[ModuleType] = None,
+                 device: Optional[Union[str, int, torch.device]] = None,
+                 **kwargs):
+        super(GNNComm, self).__init__(state_dim, n_agents, hidden_sizes_comm, msg_dim, normalize, initialize,
+                                      activation, device, **kwargs)
+        self.comm_rounds = comm_rounds
+        self.comm_layers = nn.ModuleList([nn.Sequential(*mlp_block(msg_dim, msg_dim, None, activation,
+                                                                   initialize, device)[0])
+                                          for _ in range(comm_rounds)])
+
+    def forward(self, features: Tensor, agent_mask: Optional[Tensor] = None, adjacency: CommGraph = None):
+        hidden = self.msg_encoder(features)
+        for comm_layer in self.comm_layers:
+            hidden = comm_layer(self.aggregate(hidden, agent_mask, adjacency, normalization="symmetric"))
+        return hidden
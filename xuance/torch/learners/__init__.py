@@ -1,60 +1,97 @@
-from .learner import Learner, LearnerMAS
-from .policy_gradient import PG_Learner, A2C_Learner, PPOCLIP_Learner, PPOKL_Learner, PPG_Learner, DDPG_Learner, \
-    TD3_Learner, SAC_Learner, SACDIS_Learner, PDQN_Learner, MPDQN_Learner, SPDQN_Learner,NPG_Learner
+from xuance.common.registry_tools import LazyRegistry, lazy_attributes
 
-from .qlearning_family import DQN_Learner, DuelDQN_Learner, DDQN_Learner, PerDQN_Learner, C51_Learner, QRDQN_Learner, \
-    DRQN_Learner
-
-from .multi_agent_rl import (IQL_Learner, VDN_Learner, QMIX_Learner, WQMIX_Learner, QTRAN_Learner, \
-    IAC_Learner, VDAC_Learner, COMA_Learner, IC3Net_Learner, MFQ_Learner, MFAC_Learner, IPPO_Learner, MAPPO_Clip_Learner, \
-    IDDPG_Learner, MADDPG_Learner, MATD3_Learner, ISAC_Learner, ISACDIS_Learner, MASAC_Learner, MASACDIS_Learner)
-
-REGISTRY_Learners = {
-    "BasicLearner": Learner,
-    "BasicLearnerMAS": LearnerMAS,
-    "PG_Learner": PG_Learner,
-    "A2C_Learner": A2C_Learner,
-    "PPOCLIP_Learner": PPOCLIP_Learner,
-    "PPOKL_Learner": PPOKL_Learner,
-    "PPG_Learner": PPG_Learner,
-    "DDPG_Learner": DDPG_Learner,
-    "TD3_Learner": TD3_Learner,
-    "SAC_Learner": SAC_Learner,
-    "SACDIS_Learner": SACDIS_Learner,
-    "PDQN_Learner": PDQN_Learner,
-    "MPDQN_Learner": MPDQN_Learner,
-    "SPDQN_Learner": SPDQN_Learner,
-    "NPG_Learner": NPG_Learner,
+# Maps each member to the module that defines it, the module is imported on first access.
+_members = {
+    "Learner": ".learner",
+    "LearnerMAS": ".learner",
+    "PG_Learner": ".policy_gradient",
+    "A2C_Learner": ".policy_gradient",
+    "PPOCLIP_Learner": ".policy_gradient",
+    "PPOKL_Learner": ".policy_gradient",
+    "PPG_Learner": ".policy_gradient",
+    "DDPG_Learner": ".policy_gradient",
+    "TD3_Learner": ".policy_gradient",
+    "SAC_Learner": ".policy_gradient",
+    "SACDIS_Learner": ".policy_gradient",
+    "PDQN_Learner": ".policy_gradient",
+    "MPDQN_Learner": ".policy_gradient",
+    "SPDQN_Learner": ".policy_gradient",
+    "NPG_Learner": ".policy_gradient",
+    "DQN_Learner": ".qlearning_family",
+    "DuelDQN_Learner": ".qlearning_family",
+    "DDQN_Learner": ".qlearning_family",
+    "PerDQN_Learner": ".qlearning_family",
+    "C51_Learner": ".qlearning_family",
+    "QRDQN_Learner": ".qlearning_family",
+    "DRQN_Learner": ".qlearning_family",
+    "IQL_Learner": ".multi_agent_rl",
+    "VDN_Learner": ".multi_agent_rl",
+    "QMIX_Learner": ".multi_agent_rl",
+    "WQMIX_Learner": ".multi_agent_rl",
+    "QTRAN_Learner": ".multi_agent_rl",
+    "IAC_Learner": ".multi_agent_rl",
+    "VDAC_Learner": ".multi_agent_rl",
+    "COMA_Learner": ".multi_agent_rl",
+    "IC3Net_Learner": ".multi_agent_rl",
+    "MFQ_Learner": ".multi_agent_rl",
+    "MFAC_Learner": ".multi_agent_rl",
+    "IPPO_Learner": ".multi_agent_rl",
+    "MAPPO_Clip_Learner": ".multi_agent_rl",
+    "IDDPG_Learner": ".multi_agent_rl",
+    "MADDPG_Learner": ".multi_agent_rl",
+    "MATD3_Learner": ".multi_agent_rl",
+    "ISAC_Learner": ".multi_agent_rl",
+    "ISACDIS_Learner": ".multi_agent_rl",
+    "MASAC_Learner": ".multi_agent_rl",
+    "MASACDIS_Learner": ".multi_agent_rl",
+}
 
-    "DQN_Learner": DQN_Learner,
-    "DuelDQN_Learner": DuelDQN_Learner,
-    "DDQN_Learner": DDQN_Learner,
-    "PerDQN_Learner": PerDQN_Learner,
-    "C51_Learner": C51_Learner,
-    "QRDQN_Learner": QRDQN_Learner,
-    "DRQN_Learner": DRQN_Learner,
+__getattr__ = lazy_attributes(__name__, _members)
 
-    "IQL_Learner": IQL_Learner,
-    "VDN_Learner": VDN_Learner,
-    "QMIX_Learner": QMIX_Learner,
-    "WQMIX_Learner": WQMIX_Learner,
-    "QTRAN_Learner": QTRAN_Learner,
-    "IAC_Learner": IAC_Learner,
-    "VDAC_Learner": VDAC_Learner,
-    "COMA_Learner": COMA_Learner,
-    "IC3Net_Learner": IC3Net_Learner,
-    "IDDPG_Learner": IDDPG_Learner,
-    "MADDPG_Learner": MADDPG_Learner,
-    "MFQ_Learner": MFQ_Learner,
-    "MFAC_Learner": MFAC_Learner,
-    "IPPO_Learner": IPPO_Learner,
-    "MAPPO_Clip_Learner": MAPPO_Clip_Learner,
-    "ISAC_Learner": ISAC_Learner,
-    "ISACDIS_Learner": ISACDIS_Learner,
-    "MASAC_Learner": MASAC_Learner,
-    "MASACDIS_Learner": MASACDIS_Learner,
-    "MATD3_Learner": MATD3_Learner,
-}
+REGISTRY_Learners = LazyRegistry({
+    "BasicLearner": "xuance.torch.learners.learner:Learner",
+    "BasicLearnerMAS": "xuance.torch.learners.learner:LearnerMAS",
+    "PG_Learner": "xuance.torch.learners.policy_gradient:PG_Learner",
+    "A2C_Learner": "xuance.torch.learners.policy_gradient:A2C_Learner",
+    "PPOCLIP_Learner": "xuance.torch.learners.policy_gradient:PPOCLIP_Learner",
+    "PPOKL_Learner": "xuance.torch.learners.policy_gradient:PPOKL_Learner",
+    "PPG_Learner": "xuance.torch.learners.policy_gradient:PPG_Learner",
+    "DDPG_Learner": "xuance.torch.learners.policy_gradient:DDPG_Learner",
+    "TD3_Learner": "xuance.torch.learners.policy_gradient:TD3_Learner",
+    "SAC_Learner": "xuance.torch.learners.policy_gradient:SAC_Learner",
+    "SACDIS_Learner": "xuance.torch.learners.policy_gradient:SACDIS_Learner",
+    "PDQN_Learner": "xuance.torch.learners.policy_gradient:PDQN_Learner",
+    "MPDQN_Learner": "xuance.torch.learners.policy_gradient:MPDQN_Learner",
+    "SPDQN_Learner": "xuance.torch.learners.policy_gradient:SPDQN_Learner",
+    "NPG_Learner": "xuance.torch.learners.policy_gradient:NPG_Learner",
+    "DQN_Learner": "xuance.torch.learners.qlearning_family:DQN_Learner",
+    "DuelDQN_Learner": "xuance.torch.learners.qlearning_family:DuelDQN_Learner",
+    "DDQN_Learner": "xuance.torch.learners.qlearning_family:DDQN_Learner",
+    "PerDQN_Learner": "xuance.torch.learners.qlearning_family:PerDQN_Learner",
+    "C51_Learner": "xuance.torch.learners.qlearning_family:C51_Learner",
+    "QRDQN_Learner": "xuance.torch.learners.qlearning_family:QRDQN_Learner",
+    "DRQN_Learner": "xuance.torch.learners.qlearning_family:DRQN_Learner",
+    "IQL_Learner": "xuance.torch.learners.multi_agent_rl:IQL_Learner",
+    "VDN_Learner": "xuance.torch.learners.multi_agent_rl:VDN_Learner",
+    "QMIX_Learner": "xuance.torch.learners.multi_agent_rl:QMIX_Learner",
+    "WQMIX_Learner": "xuance.torch.learners.multi_agent_rl:WQMIX_Learner",
+    "QTRAN_Learner": "xuance.torch.learners.multi_agent_rl:QTRAN_Learner",
+    "IAC_Learner": "xuance.torch.learners.multi_agent_rl:IAC_Learner",
+    "VDAC_Learner": "xuance.torch.learners.multi_agent_rl:VDAC_Learner",
+    "COMA_Learner": "xuance.torch.learners.multi_agent_rl:COMA_Learner",
+    "IC3Net_Learner": "xuance.torch.learners.multi_agent_rl:IC3Net_Learner",
+    "IDDPG_Learner": "xuance.torch.learners.multi_agent_rl:IDDPG_Learner",
+    "MADDPG_Learner": "xuance.torch.learners.multi_agent_rl:MADDPG_Learner",
+    "MFQ_Learner": "xuance.torch.learners.multi_agent_rl:MFQ_Learner",
+    "MFAC_Learner": "xuance.torch.learners.multi_agent_rl:MFAC_Learner",
+    "IPPO_Learner": "xuance.torch.learners.multi_agent_rl:IPPO_Learner",
+    "MAPPO_Clip_Learner": "xuance.torch.learners.multi_agent_rl:MAPPO_Clip_Learner",
+    "ISAC_Learner": "xuance.torch.learners.multi_agent_rl:ISAC_Learner",
+    "ISACDIS_Learner": "xuance.torch.learners.multi_agent_rl:ISACDIS_Learner",
+    "MASAC_Learner": "xuance.torch.learners.multi_agent_rl:MASAC_Learner",
+    "MASACDIS_Learner": "xuance.torch.learners.multi_agent_rl:MASACDIS_Learner",
+    "MATD3_Learner": "xuance.torch.learners.multi_agent_rl:MATD3_Learner",
+})
 
 __all__ = [
     "REGISTRY_Learners", "Learner", "LearnerMAS",
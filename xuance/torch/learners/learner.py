@@ -1,16 +1,48 @@
 import os
 import torch
-import numpy as np
 from abc import ABC, abstractmethod
-from xuance.common import Optional, List, Union
+from xuance.common import Optional, List, Union, Dict
 from argparse import Namespace
 from operator import itemgetter
 from xuance.torch import Tensor
+from xuance.torch.utils import (compile_policy, PrecisionPolicy, GradientAllReduce, GradientAccumulation,
+                               broadcast_module, clip_grad_norm_ensemble_)
 
 MAX_GPUs = 100
 
 
-class Learner(ABC):
+class GradientAccumulationMixin:
+    """Sets up the gradient accumulation (gradient_accumulation_steps > 1) of a learner, see GradientAccumulation.
+
+    Only the optimizer steps are deferred to the last micro-batch, so the update with gradient accumulation is the same
+    as with the whole minibatch only for the learners whose losses depend neither on an optimizer step nor on a target
+    network update made within the same update, i.e., the on-policy and the value-decomposition learners, which set
+    supports_gradient_accumulation to True.
+    """
+    supports_gradient_accumulation = False
+
+    def _setup_accumulation(self, config: Namespace):
+        """Splits every minibatch into gradient_accumulation_steps micro-batches, whose gradients are summed into one
+        optimizer step."""
+        steps = config.gradient_accumulation_steps if hasattr(config, 'gradient_accumulation_steps') else 1
+        self.accumulation = None
+        if steps > 1:
+            if not self.supports_gradient_accumulation:
+                raise AttributeError(f"{type(self).__name__} does not support the gradient accumulation "
+                                     f"(gradient_accumulation_steps > 1), which is only supported by the on-policy and "
+                                     f"the value-decomposition learners.")
+            self.accumulation = GradientAccumulation(self.scaler, steps)
+            self.scaler = self.accumulation
+            self.accumulation.apply(self)
+
+    @property
+    def is_last_micro_batch(self) -> bool:
+        """Whether the optimizers step in the current update, i.e., always without gradient accumulation, and in the
+        last micro-batch of every minibatch with it. The learning rate schedulers are only stepped in this case."""
+        return self.accumulation is None or self.accumulation.is_last
+
+
+class Learner(GradientAccumulationMixin, ABC):
     def __init__(self,
                  config: Namespace,
                  policy: torch.nn.Module):
@@ -26,30 +58,42 @@ class Learner(ABC):
         self.use_rnn = config.use_rnn if hasattr(config, 'use_rnn') else False
         self.use_actions_mask = config.use_actions_mask if hasattr(config, 'use_actions_mask') else False
         self.policy = policy
+        self.use_compile = config.use_compile if hasattr(config, 'use_compile') else False
+        if self.use_compile:
+            compile_policy(self.policy, config.compile_mode if hasattr(config, 'compile_mode') else "default")
         self.optimizer: Union[dict, list, Optional[torch.optim.Optimizer]] = None
         self.scheduler: Union[dict, list, Optional[torch.optim.lr_scheduler.LinearLR]] = None
 
-        if self.distributed_training:
-            self.world_size = int(os.environ['WORLD_SIZE'])
-            self.rank = self.device = int(os.environ['RANK'])
-            self.snapshot_path = os.path.join(os.getcwd(), config.model_dir, "DDP_Snapshot")
-            if os.path.exists(self.snapshot_path):
-                if os.path.exists(os.path.join(self.snapshot_path, "snapshot.pt")):
-                    print("Loading Snapshot...")
-                    self.load_snapshot(self.snapshot_path)
-            else:
-                if self.device == 0:
-                    os.makedirs(self.snapshot_path)
-        else:
-            self.world_size = 1
-            self.rank = 0
-            self.device = config.device
         self.use_grad_clip = config.use_grad_clip
         self.grad_clip_norm = config.grad_clip_norm
         self.device = config.device
         self.model_dir = config.model_dir
         self.running_steps = config.running_steps
         self.iterations = 0
+        self.precision = PrecisionPolicy(config.precision if hasattr(config, 'precision') else "fp32", self.device)
+        self.scaler = self.precision.scaler  # Scales the losses for "fp16", a pass-through otherwise.
+        self.precision.apply(self, self.policy)
+        self._setup_distributed(config)
+        self._setup_accumulation(config)
+
+    def _setup_distributed(self, config: Namespace):
+        """Resumes from the snapshot if any, starts all processes from the parameters of rank 0, and averages the
+        gradients of every optimizer step over the processes."""
+        if not self.distributed_training:
+            self.world_size = 1
+            self.rank = 0
+            return
+        self.world_size = int(os.environ['WORLD_SIZE'])
+        self.rank = int(os.environ['RANK'])
+        self.snapshot_path = os.path.join(os.getcwd(), config.model_dir, "DDP_Snapshot")
+        if os.path.exists(os.path.join(self.snapshot_path, "snapshot.pt")):
+            print("Loading Snapshot...")
+            self.load_snapshot(self.snapshot_path)
+        elif self.rank == 0:
+            os.makedirs(self.snapshot_path, exist_ok=True)
+        broadcast_module(self.policy)
+        bucket_cap_mb = config.bucket_cap_mb if hasattr(config, 'bucket_cap_mb') else 25
+        self.scaler = GradientAllReduce(self.scaler, bucket_cap_mb)
 
     def save_model(self, model_path):
         torch.save(self.policy.state_dict(), model_path)
@@ -82,8 +126,7 @@ class Learner(ABC):
         return path
 
     def load_snapshot(self, snapshot_path):
-        loc = f"cuda: {self.device}"
-        snapshot = torch.load(snapshot_path, map_location=loc)
+        snapshot = torch.load(os.path.join(snapshot_path, "snapshot.pt"), map_location=self.device)
         self.policy.load_state_dict(snapshot["MODEL_STATE"])
         print("Resuming training from snapshot.")
 
@@ -99,7 +142,10 @@ class Learner(ABC):
         raise NotImplementedError
 
 
-class LearnerMAS(ABC):
+class LearnerMAS(GradientAccumulationMixin, ABC):
+    # Whether the learner supports one model per group of agents (use_group_sharing), see MARLAgents._build_agent_groups.
+    supports_group_sharing = False
+
     def __init__(self,
                  config: Namespace,
                  model_keys: List[str],
@@ -107,12 +153,20 @@ class LearnerMAS(ABC):
                  policy: torch.nn.Module):
         self.value_normalizer = None
         self.config = config
+        self.distributed_training = config.distributed_training if hasattr(config, 'distributed_training') else False
         self.n_agents = config.n_agents
         self.dim_id = self.n_agents
 
         self.use_parameter_sharing = config.use_parameter_sharing
         self.model_keys = model_keys
         self.agent_keys = agent_keys
+        # The agents of each model key, which share the parameters of the model, see MARLAgents._build_agent_groups.
+        if hasattr(config, 'agent_groups'):
+            self.agent_groups = config.agent_groups
+        elif self.use_parameter_sharing:
+            self.agent_groups = {model_keys[0]: list(agent_keys)}
+        else:
+            self.agent_groups = {k: [k] for k in agent_keys}
         self.episode_length = config.episode_length
         self.learning_rate = config.learning_rate if hasattr(config, 'learning_rate') else None
         self.use_linear_lr_decay = config.use_linear_lr_decay if hasattr(config, 'use_linear_lr_decay') else False
@@ -120,7 +174,15 @@ class LearnerMAS(ABC):
         self.gamma = config.gamma if hasattr(config, 'gamma') else 0.99
         self.use_rnn = config.use_rnn if hasattr(config, 'use_rnn') else False
         self.use_actions_mask = config.use_actions_mask if hasattr(config, 'use_actions_mask') else False
+        self.use_packed_agents = config.use_packed_agents if hasattr(config, 'use_packed_agents') else False
+        if self.use_packed_agents and (self.use_rnn or not self.use_parameter_sharing):
+            raise AttributeError("The packed agents (use_packed_agents) require use_parameter_sharing=True and "
+                                 "use_rnn=False.")
         self.policy = policy
+        self.use_agent_ensemble = policy.use_agent_ensemble if hasattr(policy, 'use_agent_ensemble') else False
+        self.use_compile = config.use_compile if hasattr(config, 'use_compile') else False
+        if self.use_compile:
+            compile_policy(self.policy, config.compile_mode if hasattr(config, 'compile_mode') else "default")
         self.optimizer: Union[dict, list, Optional[torch.optim.Optimizer]] = None
         self.scheduler: Union[dict, list, Optional[torch.optim.lr_scheduler.LinearLR]] = None
         self.use_grad_clip = config.use_grad_clip
@@ -129,6 +191,168 @@ class LearnerMAS(ABC):
         self.model_dir = config.model_dir
         self.running_steps = config.running_steps
         self.iterations = 0
+        self.precision = PrecisionPolicy(config.precision if hasattr(config, 'precision') else "fp32", self.device)
+        self.scaler = self.precision.scaler  # Scales the losses for "fp16", a pass-through otherwise.
+        self.precision.apply(self, self.policy)
+        self._setup_distributed(config)
+        self._setup_accumulation(config)
+
+    def _setup_distributed(self, config: Namespace):
+        """Resumes from the snapshot if any, starts all processes from the parameters of rank 0, and averages the
+        gradients of every optimizer step over the processes."""
+        if not self.distributed_training:
+            self.world_size = 1
+            self.rank = 0
+            return
+        self.world_size = int(os.environ['WORLD_SIZE'])
+        self.rank = int(os.environ['RANK'])
+        self.snapshot_path = os.path.join(os.getcwd(), config.model_dir, "DDP_Snapshot")
+        if os.path.exists(os.path.join(self.snapshot_path, "snapshot.pt")):
+            print("Loading Snapshot...")
+            self.load_snapshot(self.snapshot_path)
+        elif self.rank == 0:
+            os.makedirs(self.snapshot_path, exist_ok=True)
+        broadcast_module(self.policy)
+        bucket_cap_mb = config.bucket_cap_mb if hasattr(config, 'bucket_cap_mb') else 25
+        self.scaler = GradientAllReduce(self.scaler, bucket_cap_mb)
+
+    def _float_tensor(self, data) -> Tensor:
+        """
+        Convert the sampled data to a float tensor on the device of the learner.
+
+        Parameters:
+            data: An array or a tensor, or a tuple of them (one per agent) which are stacked along dimension 1.
+
+        Returns:
+            The float tensor.
+        """
+        if isinstance(data, (tuple, list)):
+            return torch.stack([torch.as_tensor(x, device=self.device) for x in data], dim=1).float()
+        return torch.as_tensor(data, device=self.device).float()
+
+    def mask_sum(self, mask: Tensor, key: Optional[str] = None) -> Tensor:
+        """
+        The denominator of a masked mean, i.e., (x * mask).sum() / self.mask_sum(mask, key).
+
+        Without gradient accumulation, this is mask.sum(). With gradient accumulation, the masked means of the
+        micro-batches must add up to the masked mean of the minibatch, so the sum of the mask over the minibatch is
+        returned instead, divided by the weight that the scaler applies to the loss of the micro-batch.
+
+        Parameters:
+            mask (Tensor): The mask of the micro-batch, proportional to the agent mask of the model key (multiplied by
+                the filled mask for RNNs), or to the filled mask if key is None.
+            key (Optional[str]): The model key of the agent mask, None for the filled mask.
+
+        Returns:
+            The denominator.
+        """
+        if self.accumulation is None or not self.accumulation.active:
+            return mask.sum()
+        share = self.accumulation.share(str(key), lambda sample: self._raw_mask_sum(sample, key))
+        if share == 0:  # The masked values of the micro-batch are all zeros.
+            return torch.ones((), device=mask.device)
+        return mask.sum() / share * self.accumulation.weight
+
+    def _raw_mask_sum(self, sample: dict, key: Optional[str] = None) -> float:
+        """The sum of the agent mask of a model key (or of the filled mask if key is None) over the raw samples."""
+        filled = self._float_tensor(sample['filled']) if self.use_rnn else None
+        if key is None:
+            return filled.sum().item() if self.use_rnn else float(sample['batch_size'])
+        total = 0.0
+        for k in self.agent_groups[key]:
+            agent_mask = self._float_tensor(sample['agent_mask'][k])
+            total += (agent_mask * filled).sum().item() if self.use_rnn else agent_mask.sum().item()
+        return total
+
+    def alive_index(self, agent_mask: Tensor) -> Tensor:
+        """
+        The index map of the packed agents, i.e., the rows of the alive agents in the tensors with batch_size * n_agents
+        rows of the parameter-sharing models, see pack_agents.
+
+        Parameters:
+            agent_mask (Tensor): The agent mask of the shared model, with shape [batch_size * n_agents].
+
+        Returns:
+            The indexes of the alive agents, with shape [n_alive].
+        """
+        return agent_mask.nonzero(as_tuple=True)[0]
+
+    def pack_agents(self, alive_index: Tensor, *data):
+        """
+        Keeps the rows of the alive agents, so that the policies are only evaluated (and the losses only calculated)
+        for the alive agents, which saves the compute of the dead agents in the battle scenarios.
+
+        Parameters:
+            alive_index (Tensor): The index map of the packed agents, see alive_index.
+            *data: Tensors with batch_size * n_agents rows, dicts of them, or None.
+
+        Returns:
+            The packed data, in the order of data.
+        """
+        packed = []
+        for x in data:
+            if x is None:
+                packed.append(None)
+            elif isinstance(x, dict):
+                packed.append({k: v.index_select(0, alive_index) for k, v in x.items()})
+            else:
+                packed.append(x.index_select(0, alive_index))
+        return packed
+
+    def unpack_agents(self, data: Tensor, alive_index: Tensor, n_rows: int):
+        """
+        Scatters the rows of the packed agents back to the rows of all agents, with zeros for the dead agents.
+
+        Parameters:
+            data (Tensor): The packed tensor, with shape [n_alive, ...].
+            alive_index (Tensor): The index map of the packed agents, see alive_index.
+            n_rows (int): The number of rows of all agents, i.e., batch_size * n_agents.
+
+        Returns:
+            The tensor with shape [n_rows, ...].
+        """
+        return data.new_zeros((n_rows,) + tuple(data.shape[1:])).index_copy(0, alive_index, data)
+
+    def update_value_normalizer(self, key: str, value_target: Tensor):
+        """
+        Updates the value normalizer of a model key with the returns of the minibatch.
+
+        With gradient accumulation, the normalizer is updated once with the returns of the whole minibatch, in the
+        first micro-batch, so that every micro-batch normalizes its value targets as the minibatch does.
+
+        Parameters:
+            key (str): The model key.
+            value_target (Tensor): The returns of the model in the (micro-)batch.
+        """
+        if self.accumulation is None or not self.accumulation.active:
+            self.value_normalizer[key].update(value_target)
+        elif self.accumulation.is_first:
+            sample = self.accumulation.samples
+            returns = self._float_tensor([sample['returns'][k] for k in self.agent_groups[key]])
+            self.value_normalizer[key].update(returns.reshape((-1,) + tuple(value_target.shape[1:])))
+
+    def ensemble_step(self, losses: List[Tensor], optimizer: torch.optim.Optimizer,
+                      scheduler: Optional[torch.optim.lr_scheduler.LinearLR], parameters: List[Tensor]):
+        """
+        Updates the stacked parameters of an agent ensemble (use_agent_ensemble) with the losses of all agents.
+
+        The loss of each agent only depends on its own member, so one step on the sum of the losses updates every
+        member as the separate optimizer of its agent would, with the gradients clipped per member.
+
+        Parameters:
+            losses (List[Tensor]): The loss of each agent.
+            optimizer (torch.optim.Optimizer): The optimizer of the stacked parameters.
+            scheduler (Optional[torch.optim.lr_scheduler.LinearLR]): The learning rate scheduler of the optimizer.
+            parameters (List[Tensor]): The stacked parameters, e.g., policy.parameters_ensemble.
+        """
+        optimizer.zero_grad()
+        self.scaler.scale(torch.stack(losses).sum()).backward()
+        if self.use_grad_clip:
+            self.scaler.unscale_(optimizer)
+            clip_grad_norm_ensemble_(parameters, self.grad_clip_norm, self.n_agents)
+        self.scaler.step(optimizer)
+        if scheduler is not None:
+            scheduler.step()
 
     def build_training_data(self, sample: Optional[dict],
                             use_parameter_sharing: Optional[bool] = False,
@@ -155,22 +379,17 @@ class LearnerMAS(ABC):
             k = self.model_keys[0]
             bs = batch_size * self.n_agents
             if self.n_agents == 1:
-                obs_tensor = Tensor(sample['obs'][k]).to(self.device).unsqueeze(1)
-                actions_tensor = Tensor(sample['actions'][k]).to(self.device).unsqueeze(1)
-                rewards_tensor = Tensor(sample['rewards'][k]).to(self.device).unsqueeze(1)
-                ter_tensor = Tensor(sample['terminals'][k]).float().to(self.device).unsqueeze(1)
-                msk_tensor = Tensor(sample['agent_mask'][k]).float().to(self.device).unsqueeze(1)
+                obs_tensor = self._float_tensor(sample['obs'][k]).unsqueeze(1)
+                actions_tensor = self._float_tensor(sample['actions'][k]).unsqueeze(1)
+                rewards_tensor = self._float_tensor(sample['rewards'][k]).unsqueeze(1)
+                ter_tensor = self._float_tensor(sample['terminals'][k]).unsqueeze(1)
+                msk_tensor = self._float_tensor(sample['agent_mask'][k]).unsqueeze(1)
             else:
-                obs_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['obs']),
-                                             axis=1)).to(self.device)
-                actions_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['actions']),
-                                                 axis=1)).to(self.device)
-                rewards_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['rewards']),
-                                                 axis=1)).to(self.device)
-                ter_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['terminals']),
-                                             axis=1)).float().to(self.device)
-                msk_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['agent_mask']),
-                                             axis=1)).float().to(self.device)
+                obs_tensor = self._float_tensor(itemgetter(*self.agent_keys)(sample['obs']))
+                actions_tensor = self._float_tensor(itemgetter(*self.agent_keys)(sample['actions']))
+                rewards_tensor = self._float_tensor(itemgetter(*self.agent_keys)(sample['rewards']))
+                ter_tensor = self._float_tensor(itemgetter(*self.agent_keys)(sample['terminals']))
+                msk_tensor = self._float_tensor(itemgetter(*self.agent_keys)(sample['agent_mask']))
             if self.use_rnn:
                 obs = {k: obs_tensor.reshape(bs, seq_length + 1, -1)}
                 if len(actions_tensor.shape) == 3:
@@ -195,39 +414,38 @@ class LearnerMAS(ABC):
                 rewards = {k: rewards_tensor.reshape(batch_size, self.n_agents)}
                 terminals = {k: ter_tensor.reshape(batch_size, self.n_agents)}
                 agent_mask = {k: msk_tensor.reshape(bs)}
-                obs_next = {k: Tensor(np.stack(itemgetter(*self.agent_keys)(sample['obs_next']),
-                                               axis=1)).to(self.device).reshape(bs, -1)}
+                obs_next = {k: self._float_tensor(itemgetter(*self.agent_keys)(sample['obs_next'])).reshape(bs, -1)}
                 IDs = torch.eye(self.n_agents).unsqueeze(0).expand(
                     batch_size, -1, -1).reshape(bs, self.n_agents).to(self.device)
 
             if use_actions_mask:
-                avail_a = np.stack(itemgetter(*self.agent_keys)(sample['avail_actions']), axis=1)
+                avail_a = self._float_tensor(itemgetter(*self.agent_keys)(sample['avail_actions']))
                 if self.use_rnn:
-                    avail_actions = {k: Tensor(avail_a.reshape([bs, seq_length + 1, -1])).float().to(self.device)}
+                    avail_actions = {k: avail_a.reshape([bs, seq_length + 1, -1])}
                 else:
-                    avail_actions = {k: Tensor(avail_a.reshape([bs, -1])).float().to(self.device)}
-                    avail_a_next = np.stack(itemgetter(*self.agent_keys)(sample['avail_actions_next']), axis=1)
-                    avail_actions_next = {k: Tensor(avail_a_next.reshape([bs, -1])).float().to(self.device)}
+                    avail_actions = {k: avail_a.reshape([bs, -1])}
+                    avail_a_next = self._float_tensor(itemgetter(*self.agent_keys)(sample['avail_actions_next']))
+                    avail_actions_next = {k: avail_a_next.reshape([bs, -1])}
         else:
-            obs = {k: Tensor(sample['obs'][k]).to(self.device) for k in self.agent_keys}
-            actions = {k: Tensor(sample['actions'][k]).to(self.device) for k in self.agent_keys}
-            rewards = {k: Tensor(sample['rewards'][k]).to(self.device) for k in self.agent_keys}
-            terminals = {k: Tensor(sample['terminals'][k]).float().to(self.device) for k in self.agent_keys}
-            agent_mask = {k: Tensor(sample['agent_mask'][k]).float().to(self.device) for k in self.agent_keys}
+            obs = {k: self._float_tensor(sample['obs'][k]) for k in self.agent_keys}
+            actions = {k: self._float_tensor(sample['actions'][k]) for k in self.agent_keys}
+            rewards = {k: self._float_tensor(sample['rewards'][k]) for k in self.agent_keys}
+            terminals = {k: self._float_tensor(sample['terminals'][k]) for k in self.agent_keys}
+            agent_mask = {k: self._float_tensor(sample['agent_mask'][k]) for k in self.agent_keys}
             if not self.use_rnn:
-                obs_next = {k: Tensor(sample['obs_next'][k]).to(self.device) for k in self.agent_keys}
+                obs_next = {k: self._float_tensor(sample['obs_next'][k]) for k in self.agent_keys}
             if use_actions_mask:
-                avail_actions = {k: Tensor(sample['avail_actions'][k]).float().to(self.device) for k in self.agent_keys}
+                avail_actions = {k: self._float_tensor(sample['avail_actions'][k]) for k in self.agent_keys}
                 if not self.use_rnn:
-                    avail_actions_next = {k: Tensor(sample['avail_actions_next'][k]).float().to(self.device) for k in self.model_keys}
+                    avail_actions_next = {k: self._float_tensor(sample['avail_actions_next'][k]) for k in self.model_keys}
 
         if use_global_state:
-            state = Tensor(sample['state']).to(self.device)
+            state = self._float_tensor(sample['state'])
             if not self.use_rnn:
-                state_next = Tensor(sample['state_next']).to(self.device)
+                state_next = self._float_tensor(sample['state_next'])
 
         if self.use_rnn:
-            filled = Tensor(sample['filled']).float().to(self.device)
+            filled = self._float_tensor(sample['filled'])
 
         sample_Tensor = {
             'batch_size': batch_size,
@@ -247,6 +465,43 @@ class LearnerMAS(ABC):
         }
         return sample_Tensor
 
+    def group_agent_ids(self, key: str, batch_size: int, seq_length: Optional[int] = None) -> Tensor:
+        """
+        The one-hot IDs of the agents of a model key, the inputs of the parameter-sharing models besides the
+        observations.
+
+        Parameters:
+            key (str): The model key.
+            batch_size (int): The batch size.
+            seq_length (Optional[int]): The length of the sequences for RNNs, None otherwise.
+
+        Returns:
+            The IDs with shape [batch_size * n_agents_of_the_group, (seq_length, ) n_agents].
+        """
+        ids = torch.eye(self.n_agents, device=self.device)[[self.agent_keys.index(k) for k in self.agent_groups[key]]]
+        ids = ids.unsqueeze(0).expand(batch_size, -1, -1)
+        if seq_length is None:
+            return ids.reshape(-1, self.n_agents)
+        return ids.unsqueeze(2).expand(-1, -1, seq_length, -1).reshape(-1, seq_length, self.n_agents)
+
+    def get_group_joint_input(self, input_tensor: Dict[str, Tensor], batch_size: int) -> Tensor:
+        """
+        The joint input of all agents, e.g., the joint observations, from the inputs of the model keys.
+
+        Parameters:
+            input_tensor (Dict[str, Tensor]): The inputs of each model key, with rows of (batch, agent of the group),
+                i.e., with shape [batch_size * n_agents_of_the_group, (seq_length, ) dim].
+            batch_size (int): The batch size.
+
+        Returns:
+            The inputs of self.agent_keys concatenated, with shape [batch_size, (seq_length, ) sum of the dims].
+        """
+        inputs = {}
+        for key, group in self.agent_groups.items():
+            x = input_tensor[key].reshape((batch_size, len(group)) + tuple(input_tensor[key].shape[1:]))
+            inputs.update({k: x[:, i] for i, k in enumerate(group)})
+        return torch.concat([inputs[k] for k in self.agent_keys], dim=-1)
+
     def get_joint_input(self, input_tensor, output_shape=None):
         if self.n_agents == 1:
             joint_tensor = itemgetter(*self.agent_keys)(input_tensor)
@@ -265,6 +520,8 @@ class LearnerMAS(ABC):
 
     def save_model(self, model_path):
         torch.save(self.policy.state_dict(), model_path)
+        if self.distributed_training:
+            self.save_snapshot()
 
     def load_model(self, path, model=None):
         file_names = os.listdir(path)
@@ -289,3 +546,16 @@ class LearnerMAS(ABC):
         self.policy.load_state_dict(torch.load(str(model_path), map_location={
             f"cuda:{i}": self.device for i in range(MAX_GPUs)}))
         print(f"Successfully load model from '{path}'.")
+        return path
+
+    def load_snapshot(self, snapshot_path):
+        snapshot = torch.load(os.path.join(snapshot_path, "snapshot.pt"), map_location=self.device)
+        self.policy.load_state_dict(snapshot["MODEL_STATE"])
+        print("Resuming training from snapshot.")
+
+    def save_snapshot(self):
+        snapshot = {
+            "MODEL_STATE": self.policy.state_dict(),
+        }
+        snapshot_pt = os.path.join(self.snapshot_path, "snapshot.pt")
+        torch.save(snapshot, snapshot_pt)
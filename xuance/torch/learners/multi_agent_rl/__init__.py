@@ -1,21 +1,27 @@
-from .iql_learner import IQL_Learner
-from .vdn_learner import VDN_Learner
-from .qmix_learner import QMIX_Learner
-from .wqmix_learner import WQMIX_Learner
-from .qtran_learner import QTRAN_Learner
-from .mfq_learner import MFQ_Learner
+from xuance.common.registry_tools import lazy_attributes
 
-from .iac_learner import IAC_Learner
-from .coma_learner import COMA_Learner
-from .vdac_learner import VDAC_Learner
-from .ic3net_learner import IC3Net_Learner
-from .iddpg_learner import IDDPG_Learner
-from .isac_learner import ISAC_Learner
-from .isacdis_learner import ISACDIS_Learner
-from .maddpg_learner import MADDPG_Learner
-from .masac_learner import MASAC_Learner
-from .masacdis_learner import MASACDIS_Learner
-from .ippo_learner import IPPO_Learner
-from .mappo_learner import MAPPO_Clip_Learner
-from .matd3_learner import MATD3_Learner
-from .mfac_learner import MFAC_Learner
+# Maps each member to the module that defines it, the module is imported on first access.
+_members = {
+    "IQL_Learner": ".iql_learner",
+    "VDN_Learner": ".vdn_learner",
+    "QMIX_Learner": ".qmix_learner",
+    "WQMIX_Learner": ".wqmix_learner",
+    "QTRAN_Learner": ".qtran_learner",
+    "MFQ_Learner": ".mfq_learner",
+    "IAC_Learner": ".iac_learner",
+    "COMA_Learner": ".coma_learner",
+    "VDAC_Learner": ".vdac_learner",
+    "IC3Net_Learner": ".ic3net_learner",
+    "IDDPG_Learner": ".iddpg_learner",
+    "ISAC_Learner": ".isac_learner",
+    "ISACDIS_Learner": ".isacdis_learner",
+    "MADDPG_Learner": ".maddpg_learner",
+    "MASAC_Learner": ".masac_learner",
+    "MASACDIS_Learner": ".masacdis_learner",
+    "IPPO_Learner": ".ippo_learner",
+    "MAPPO_Clip_Learner": ".mappo_learner",
+    "MATD3_Learner": ".matd3_learner",
+    "MFAC_Learner": ".mfac_learner",
+}
+
+__getattr__ = lazy_attributes(__name__, _members)
@@ -18,7 +18,7 @@ class COMA_Learner(IAC_Learner):
                  agent_keys: List[str],
                  policy: nn.Module):
         config.use_value_clip, config.value_clip_range = False, None
-        config.use_huber_loss, config.huber_delta = False, None
+        config.use_huber_loss, config.huber_delta = False, 1.0  # The Huber loss is not used.
         config.use_value_norm = False
         config.vf_coef, config.ent_coef = None, None
         super(COMA_Learner, self).__init__(config, model_keys, agent_keys, policy)
@@ -65,20 +65,13 @@ class COMA_Learner(IAC_Learner):
         # feedforward
         _, pi_probs = self.policy(observation=obs, agent_ids=IDs, avail_actions=avail_actions, epsilon=epsilon)
 
-        if self.use_parameter_sharing:
-            key = self.model_keys[0]
-            actions_onehot = {key: one_hot(actions[key].long(), self.n_actions[key])}
-        else:
-            IDs = torch.eye(self.n_agents).unsqueeze(0).repeat(batch_size, 1, 1).reshape(bs, -1).to(self.device)
-            actions_onehot = {k: one_hot(actions[k].long(), self.n_actions[k]) for k in self.agent_keys}
-
-        _, values_pred = self.policy.get_values(state=state, observation=obs, actions=actions_onehot,
-                                                agent_ids=IDs, target=False)
+        actions_onehot = {k: one_hot(actions[k].long(), self.n_actions[k]) for k in self.model_keys}
+        _, values_pred = self.policy.get_values(state=state, observation=obs, actions=actions_onehot, target=False)
 
         if self.use_parameter_sharing:
             values_pred_dict = {k: values_pred.reshape(bs, -1) for k in self.model_keys}
         else:
-            values_pred_dict = {k: values_pred[:, i] for i, k in enumerate(self.model_keys)}
+            values_pred_dict = {k: values_pred[:, i, :self.n_actions[k]] for i, k in enumerate(self.model_keys)}
 
         # calculate loss
         loss_a, loss_c = [], []
@@ -94,20 +87,21 @@ class COMA_Learner(IAC_Learner):
             q_taken = values_pred_dict[key].gather(-1, actions[key].unsqueeze(-1).long()).reshape(bs)
             log_pi_taken = torch.log(pi_taken).reshape(bs)
             advantages = (q_taken - baseline).detach()
-            loss_a.append(-(advantages * log_pi_taken * mask_values).sum() / mask_values.sum())
+            loss_a.append(-(advantages * log_pi_taken * mask_values).sum() / self.mask_sum(mask_values, key))
 
             td_error = (q_taken - returns[key].detach()) * mask_values
-            loss_c.append((td_error ** 2).sum() / mask_values.sum())
+            loss_c.append((td_error ** 2).sum() / self.mask_sum(mask_values, key))
 
         # update critic
         loss_critic = sum(loss_c)
         self.optimizer['critic'].zero_grad()
-        loss_critic.backward()
+        self.scaler.scale(loss_critic).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer['critic'])
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic, self.grad_clip_norm)
-            info["gradient_norm_actor"] = grad_norm.item()
-        self.optimizer['critic'].step()
-        if self.scheduler['critic'] is not None:
+            info["gradient_norm_actor"] = grad_norm.detach()
+        self.scaler.step(self.optimizer['critic'])
+        if self.scheduler['critic'] is not None and self.is_last_micro_batch:
             self.scheduler['critic'].step()
         if self.iterations % self.sync_frequency == 0:
             self.policy.copy_target()
@@ -115,26 +109,28 @@ class COMA_Learner(IAC_Learner):
         # update actor(s)
         loss_coma = sum(loss_a)
         self.optimizer['actor'].zero_grad()
-        loss_coma.backward()
+        self.scaler.scale(loss_coma).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer['actor'])
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor, self.grad_clip_norm)
-            info["gradient_norm_actor"] = grad_norm.item()
-        self.optimizer['actor'].step()
-        if self.scheduler['actor'] is not None:
+            info["gradient_norm_actor"] = grad_norm.detach()
+        self.scaler.step(self.optimizer['actor'])
+        if self.scheduler['actor'] is not None and self.is_last_micro_batch:
             self.scheduler['actor'].step()
 
         # Logger
-        learning_rate_actor = self.optimizer['actor'].state_dict()['param_groups'][0]['lr']
-        learning_rate_critic = self.optimizer['critic'].state_dict()['param_groups'][0]['lr']
+        learning_rate_actor = self.optimizer['actor'].param_groups[0]['lr']
+        learning_rate_critic = self.optimizer['critic'].param_groups[0]['lr']
 
         info = {
             "learning_rate_actor": learning_rate_actor,
             "learning_rate_critic": learning_rate_critic,
-            "actor_loss": loss_coma.item(),
-            "critic_loss": loss_critic.item(),
-            "advantage": advantages.mean().item(),
+            "actor_loss": loss_coma.detach(),
+            "critic_loss": loss_critic.detach(),
+            "advantage": advantages.mean().detach(),
         }
 
+        self.scaler.update()
         return info
 
     def update_rnn(self, sample, epsilon=0.0):
@@ -159,8 +155,6 @@ class COMA_Learner(IAC_Learner):
 
         if self.use_parameter_sharing:
             filled = filled.unsqueeze(1).expand(batch_size, self.n_agents, seq_len).reshape(bs_rnn, seq_len)
-        else:
-            IDs = torch.eye(self.n_agents).unsqueeze(0).unsqueeze(0).repeat(batch_size, seq_len, 1, 1).to(self.device)
 
         rnn_hidden_actor = {k: self.policy.actor_representation[k].init_hidden(bs_rnn) for k in self.model_keys}
         rnn_hidden_critic = {k: self.policy.critic_representation[k].init_hidden(bs_rnn) for k in self.model_keys}
@@ -170,12 +164,12 @@ class COMA_Learner(IAC_Learner):
                                   rnn_hidden=rnn_hidden_actor, epsilon=epsilon)
         actions_onehot = {k: one_hot(actions[k].long(), self.n_actions[k]) for k in self.model_keys}
         _, values_pred = self.policy.get_values(state=state, observation=obs, actions=actions_onehot,
-                                                agent_ids=IDs, rnn_hidden=rnn_hidden_critic, target=False)
+                                                rnn_hidden=rnn_hidden_critic, target=False)
 
         if self.use_parameter_sharing:
             values_pred_dict = {self.model_keys[0]: values_pred.transpose(1, 2).reshape(bs_rnn, seq_len, -1)}
         else:
-            values_pred_dict = {k: values_pred[:, :, i] for i, k in enumerate(self.model_keys)}
+            values_pred_dict = {k: values_pred[:, :, i, :self.n_actions[k]] for i, k in enumerate(self.model_keys)}
 
         # calculate loss
         loss_a, loss_c = [], []
@@ -191,20 +185,21 @@ class COMA_Learner(IAC_Learner):
             q_taken = values_pred_dict[key].gather(-1, actions[key].unsqueeze(-1).long()).reshape(bs_rnn, seq_len)
             log_pi_taken = torch.log(pi_taken).reshape(bs_rnn, seq_len)
             advantages = (q_taken - baseline).detach()
-            loss_a.append(-(advantages * log_pi_taken * mask_values).sum() / mask_values.sum())
+            loss_a.append(-(advantages * log_pi_taken * mask_values).sum() / self.mask_sum(mask_values, key))
 
             td_error = (q_taken - returns[key].detach()) * mask_values
-            loss_c.append((td_error ** 2).sum() / mask_values.sum())
+            loss_c.append((td_error ** 2).sum() / self.mask_sum(mask_values, key))
 
         # update critic
         loss_critic = sum(loss_c)
         self.optimizer['critic'].zero_grad()
-        loss_critic.backward()
+        self.scaler.scale(loss_critic).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer['critic'])
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic, self.grad_clip_norm)
-            info["gradient_norm_actor"] = grad_norm.item()
-        self.optimizer['critic'].step()
-        if self.scheduler['critic'] is not None:
+            info["gradient_norm_actor"] = grad_norm.detach()
+        self.scaler.step(self.optimizer['critic'])
+        if self.scheduler['critic'] is not None and self.is_last_micro_batch:
             self.scheduler['critic'].step()
         if self.iterations % self.sync_frequency == 0:
             self.policy.copy_target()
@@ -212,24 +207,26 @@ class COMA_Learner(IAC_Learner):
         # update actor(s)
         loss_coma = sum(loss_a)
         self.optimizer['actor'].zero_grad()
-        loss_coma.backward()
+        self.scaler.scale(loss_coma).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer['actor'])
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor, self.grad_clip_norm)
-            info["gradient_norm_actor"] = grad_norm.item()
-        self.optimizer['actor'].step()
-        if self.scheduler['actor'] is not None:
+            info["gradient_norm_actor"] = grad_norm.detach()
+        self.scaler.step(self.optimizer['actor'])
+        if self.scheduler['actor'] is not None and self.is_last_micro_batch:
             self.scheduler['actor'].step()
 
         # Logger
-        learning_rate_actor = self.optimizer['actor'].state_dict()['param_groups'][0]['lr']
-        learning_rate_critic = self.optimizer['critic'].state_dict()['param_groups'][0]['lr']
+        learning_rate_actor = self.optimizer['actor'].param_groups[0]['lr']
+        learning_rate_critic = self.optimizer['critic'].param_groups[0]['lr']
 
         info = {
             "learning_rate_actor": learning_rate_actor,
             "learning_rate_critic": learning_rate_critic,
-            "actor_loss": loss_coma.item(),
-            "critic_loss": loss_critic.item(),
-            "advantage": advantages.mean().item(),
+            "actor_loss": loss_coma.detach(),
+            "critic_loss": loss_critic.detach(),
+            "advantage": advantages.mean().detach(),
         }
 
+        self.scaler.update()
         return info
@@ -9,10 +9,6 @@ from operator import itemgetter
 from xuance.torch.learners import LearnerMAS
 from xuance.common import List
 from argparse import Namespace
-try:
-    import torch_scatter
-except ImportError:
-    print("The module torch_scatter is not installed.")
 
 
 class DCG_Learner(LearnerMAS):
@@ -30,78 +26,102 @@ class DCG_Learner(LearnerMAS):
         self.dim_hidden_state = policy.representation[self.model_keys[0]].output_shapes['state'][0]
         self.dim_act = max([self.policy.action_space[key].n for key in agent_keys])
         self.sync_frequency = config.sync_frequency
+        self.msg_tolerance = float(config.msg_tolerance) if hasattr(config, "msg_tolerance") else 0.0
+        msg_dtype = config.msg_dtype if hasattr(config, "msg_dtype") else "float32"
+        if msg_dtype not in ["float32", "float64"]:
+            raise AttributeError(f"The msg_dtype should be float32 or float64, got {msg_dtype}.")
+        self.msg_dtype = torch.float64 if msg_dtype == "float64" else torch.float32
         self.mse_loss = nn.MSELoss()
+        self.position_index = config.position_index if hasattr(config, "position_index") else None
+        if self.policy.graph.dynamic and self.position_index is None:
+            raise AttributeError(f"The {self.policy.graph.graph_type} graph needs the position_index of the agents' "
+                                 f"positions in their observations.")
 
-    def get_graph_values(self, hidden_states, use_target_net=False):
-        if use_target_net:
-            utilities = self.policy.target_utility(hidden_states)
-            payoff = self.policy.target_payoffs(hidden_states, self.policy.graph.edges_from, self.policy.graph.edges_to)
-        else:
-            utilities = self.policy.utility(hidden_states)
-            payoff = self.policy.payoffs(hidden_states, self.policy.graph.edges_from, self.policy.graph.edges_to)
-        return utilities, payoff
+    def get_positions(self, batch_size, observation, seq_len=1):
+        """
+        Gets the positions of the agents from their observations, for the dynamic coordination graphs.
+
+        Args:
+            batch_size (int): The batch size.
+            observation (dict): The observations in the layout of the inputs of the representations.
+            seq_len (int): The length of the sequences if self.use_rnn.
+
+        Returns: The positions in the layout of the hidden states given by self.policy.get_hidden_states().
+        """
+        positions = {k: torch.as_tensor(observation[k][..., self.position_index], dtype=torch.float32,
+                                        device=self.device) for k in self.model_keys}
+        return self.policy.stack_agents(batch_size, positions, seq_len)
+
+    def get_graph_values(self, hidden_states, use_target_net=False, edges=None):
+        graph = self.policy.graph
+        utility = self.policy.target_utility if use_target_net else self.policy.utility
+        payoffs = self.policy.target_payoffs if use_target_net else self.policy.payoffs
+        if edges is None:
+            return utility(hidden_states), payoffs(hidden_states, graph.edges_from, graph.edges_to)
+        hidden_states_flat = hidden_states.reshape(1, -1, hidden_states.shape[-1])  # Samples folded into one graph.
+        return utility(hidden_states), payoffs(hidden_states_flat, edges[0], edges[1])[0]
+
+    def get_graph_means(self, f_i, f_ij, edges=None, dtype=torch.float64):
+        """Divides the utilities by the number of vertexes and the payoffs by the number of edges of their sample."""
+        f_i_mean = f_i.to(dtype) / self.policy.graph.n_vertexes
+        if edges is None:
+            return f_i_mean, f_ij.to(dtype) / max(self.policy.graph.n_edges, 1)
+        n_edges = torch.bincount(edges[2], minlength=f_i.shape[0]).clamp(min=1)
+        return f_i_mean, f_ij.to(dtype) / n_edges[edges[2]].reshape(-1, 1, 1)
 
-    def act(self, hidden_states, avail_actions=None):
+    def act(self, hidden_states, avail_actions=None, edges=None):
         """
         Calculate the actions via belief propagation.
 
         Args:
             hidden_states (torch.Tensor): The hidden states for the representation of all agents.
             avail_actions (torch.Tensor): The avail actions for the agents, default is None.
+            edges (Optional[tuple]): The edges of a dynamic graph given by Coordination_Graph.dynamic_edges(),
+                default is None for a static graph.
 
         Returns: The actions.
         """
+        return self.utility(hidden_states, avail_actions=avail_actions, edges=edges).argmax(dim=-1)
+
+    def utility(self, hidden_states, avail_actions=None, edges=None):
+        """
+        Calculate the utilities of the actions of every agent via belief propagation.
+
+        Args:
+            hidden_states (torch.Tensor): The hidden states for the representation of all agents.
+            avail_actions (torch.Tensor): The avail actions for the agents, default is None.
+            edges (Optional[tuple]): The edges of a dynamic graph given by Coordination_Graph.dynamic_edges(),
+                default is None for a static graph.
+
+        Returns: The utilities, with -1e10 for the unavailable actions.
+        """
         with torch.no_grad():
-            f_i, f_ij = self.get_graph_values(hidden_states)
-        n_edges = self.policy.graph.n_edges
-        n_vertexes = self.policy.graph.n_vertexes
-        f_i_mean = f_i.double() / n_vertexes
-        f_ij_mean = f_ij.double() / n_edges
-        f_ji_mean = f_ij_mean.transpose(dim0=-1, dim1=-2).clone()
-        batch_size = f_i.shape[0]
-
-        msg_ij = torch.zeros(batch_size, n_edges, self.dim_act).to(self.device)  # i -> j (send)
-        msg_ji = torch.zeros(batch_size, n_edges, self.dim_act).to(self.device)  # j -> i (receive)
-        #
-        msg_forward = torch_scatter.scatter_add(src=msg_ij, index=self.policy.graph.edges_to, dim=1,
-                                                dim_size=n_vertexes)
-        msg_backward = torch_scatter.scatter_add(src=msg_ji, index=self.policy.graph.edges_from, dim=1,
-                                                 dim_size=n_vertexes)
-        utility = f_i_mean + msg_forward + msg_backward
-        if len(self.policy.graph.edges) != 0:
-            for i in range(self.config.n_msg_iterations):
-                joint_forward = (utility[:, self.policy.graph.edges_from, :] - msg_ji).unsqueeze(dim=-1) + f_ij_mean
-                joint_backward = (utility[:, self.policy.graph.edges_to, :] - msg_ij).unsqueeze(dim=-1) + f_ji_mean
-                msg_ij = joint_forward.max(dim=-2).values
-                msg_ji = joint_backward.max(dim=-2).values
-                if self.config.msg_normalized:
-                    msg_ij -= msg_ij.mean(dim=-1, keepdim=True)
-                    msg_ji -= msg_ji.mean(dim=-1, keepdim=True)
-
-                msg_forward = torch_scatter.scatter_add(src=msg_ij, index=self.policy.graph.edges_to, dim=1,
-                                                        dim_size=n_vertexes)
-                msg_backward = torch_scatter.scatter_add(src=msg_ji, index=self.policy.graph.edges_from, dim=1,
-                                                         dim_size=n_vertexes)
-                utility = f_i_mean + msg_forward + msg_backward
+            f_i, f_ij = self.get_graph_values(hidden_states, edges=edges)
+            f_i_mean, f_ij_mean = self.get_graph_means(f_i, f_ij, edges, self.msg_dtype)
+            utility = self.policy.graph.max_sum(f_i_mean, f_ij_mean, self.config.n_msg_iterations,
+                                                msg_normalized=self.config.msg_normalized,
+                                                msg_tolerance=self.msg_tolerance,
+                                                edges=None if edges is None else edges[:2])
         if avail_actions is not None:
-            avail_actions = torch.Tensor(avail_actions)
-            utility_detach = utility.clone().detach()
-            utility_detach[avail_actions == 0] = -1e10
-            actions_greedy = utility_detach.argmax(dim=-1)
-        else:
-            actions_greedy = utility.argmax(dim=-1)
-        return actions_greedy
+            avail_actions = torch.as_tensor(avail_actions, device=utility.device)
+            utility = utility.masked_fill(avail_actions == 0, -1e10)
+        return utility
 
-    def q_dcg(self, hidden_states, actions, states=None, use_target_net=False):
-        f_i, f_ij = self.get_graph_values(hidden_states, use_target_net=use_target_net)
-        f_i_mean = f_i.double() / self.policy.graph.n_vertexes
-        f_ij_mean = f_ij.double() / self.policy.graph.n_edges
+    def q_dcg(self, hidden_states, actions, states=None, use_target_net=False, edges=None):
+        f_i, f_ij = self.get_graph_values(hidden_states, use_target_net=use_target_net, edges=edges)
+        f_i_mean, f_ij_mean = self.get_graph_means(f_i, f_ij, edges)
         utilities = f_i_mean.gather(-1, actions.unsqueeze(dim=-1).long()).sum(dim=1)
-        if len(self.policy.graph.edges) == 0 or self.config.n_msg_iterations == 0:
+        if self.config.n_msg_iterations == 0 or (edges is None and len(self.policy.graph.edges) == 0):
             return utilities
-        actions_ij = (actions[:, self.policy.graph.edges_from] * self.dim_act + \
-                      actions[:, self.policy.graph.edges_to]).unsqueeze(-1)
-        payoffs = f_ij_mean.reshape(list(f_ij_mean.shape[0:-2]) + [-1]).gather(-1, actions_ij.long()).sum(dim=1)
+        if edges is None:
+            actions_ij = (actions[:, self.policy.graph.edges_from] * self.dim_act + \
+                          actions[:, self.policy.graph.edges_to]).unsqueeze(-1)
+            payoffs = f_ij_mean.reshape(list(f_ij_mean.shape[0:-2]) + [-1]).gather(-1, actions_ij.long()).sum(dim=1)
+        else:
+            actions_flat = actions.reshape(-1).long()
+            actions_ij = (actions_flat[edges[0]] * self.dim_act + actions_flat[edges[1]]).unsqueeze(-1)
+            payoffs_ij = f_ij_mean.reshape(len(actions_ij), -1).gather(-1, actions_ij).squeeze(-1)
+            payoffs = utilities.new_zeros(len(utilities)).index_add(0, edges[2], payoffs_ij).unsqueeze(-1)
         if self.config.agent == "DCG_S":
             state_value = self.policy.bias(states)
             return utilities + payoffs + state_value
@@ -142,32 +162,40 @@ class DCG_Learner(LearnerMAS):
             if self.use_actions_mask:
                 avail_actions_next = torch.stack(itemgetter(*self.agent_keys)(avail_actions_next), dim=-2)
 
+        edges, edges_next = None, None
+        if self.policy.graph.dynamic:
+            edges = self.policy.graph.dynamic_edges(self.get_positions(batch_size, obs))
+            edges_next = self.policy.graph.dynamic_edges(self.get_positions(batch_size, obs_next))
+
         _, hidden_states = self.policy.get_hidden_states(batch_size, obs, use_target_net=False)
-        q_tot_eval = self.q_dcg(hidden_states, actions, states=state, use_target_net=False)
+        q_tot_eval = self.q_dcg(hidden_states, actions, states=state, use_target_net=False, edges=edges)
 
         _, hidden_states_next = self.policy.get_hidden_states(batch_size, obs_next, use_target_net=False)
-        action_next_greedy = torch.Tensor(self.act(hidden_states_next, avail_actions_next)).to(self.device)
+        action_next_greedy = self.act(hidden_states_next, avail_actions_next, edges=edges_next)
         _, hidden_states_target = self.policy.get_hidden_states(batch_size, obs_next, use_target_net=True)
-        q_tot_next = self.q_dcg(hidden_states_target, action_next_greedy, states=state_next, use_target_net=True)
+        q_tot_next = self.q_dcg(hidden_states_target, action_next_greedy, states=state_next, use_target_net=True,
+                                edges=edges_next)
 
         q_tot_target = rewards_tot + (1 - terminals_tot) * self.gamma * q_tot_next
 
         # calculate the loss function
         loss = self.mse_loss(q_tot_eval, q_tot_target.detach())
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-        self.optimizer.step()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
         if self.scheduler is not None:
             self.scheduler.step()
 
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info = {
             "learning_rate": lr,
-            "loss_Q": loss.item(),
-            "predictQ": q_tot_eval.mean().item()
+            "loss_Q": loss.detach(),
+            "predictQ": q_tot_eval.mean().detach()
         }
 
         if self.iterations % self.sync_frequency == 0:
@@ -209,44 +237,53 @@ class DCG_Learner(LearnerMAS):
             if self.use_actions_mask:
                 avail_actions = torch.stack(itemgetter(*self.agent_keys)(avail_actions), dim=-2)
 
+        edges, edges_next = None, None
+        if self.policy.graph.dynamic:
+            positions = self.get_positions(batch_size, obs, seq_len + 1)
+            edges = self.policy.graph.dynamic_edges(positions[:, :-1].reshape(batch_size * seq_len, self.n_agents, -1))
+            edges_next = self.policy.graph.dynamic_edges(positions[:, 1:].reshape(batch_size * seq_len,
+                                                                                  self.n_agents, -1))
+
         rnn_hidden = {k: self.policy.representation[k].init_hidden(bs_rnn) for k in self.model_keys}
         _, hidden_states = self.policy.get_hidden_states(batch_size, obs, rnn_hidden, use_target_net=False)
         state_current = state[:, :-1] if self.config.agent == "DCG_S" else None
         state_next = state[:, 1:] if self.config.agent == "DCG_S" else None
         q_tot_eval = self.q_dcg(hidden_states[:, :-1].reshape(batch_size * seq_len, self.n_agents, -1),
                                 actions.reshape(batch_size * seq_len, self.n_agents),
-                                states=state_current, use_target_net=False)
+                                states=state_current, use_target_net=False, edges=edges)
 
         if self.use_actions_mask:
             avail_a_next = avail_actions[:, 1:].reshape(batch_size * seq_len, self.n_agents, -1)
         else:
             avail_a_next = None
         hidden_states_next = hidden_states[:, 1:].reshape(batch_size * seq_len, self.n_agents, -1)
-        action_next_greedy = torch.Tensor(self.act(hidden_states_next, avail_actions=avail_a_next)).to(self.device)
+        action_next_greedy = self.act(hidden_states_next, avail_actions=avail_a_next, edges=edges_next)
         rnn_hidden_target = {k: self.policy.target_representation[k].init_hidden(bs_rnn) for k in self.model_keys}
         _, hidden_states_tar = self.policy.get_hidden_states(batch_size, obs, rnn_hidden_target, use_target_net=True)
         q_tot_next = self.q_dcg(hidden_states_tar[:, 1:].reshape(batch_size * seq_len, self.n_agents, -1),
-                                action_next_greedy, states=state_next, use_target_net=True)
+                                action_next_greedy, states=state_next, use_target_net=True, edges=edges_next)
 
         q_tot_target = rewards_tot + (1 - terminals_tot) * self.gamma * q_tot_next
         td_error = (q_tot_eval - q_tot_target.detach()) * filled
 
         # calculate the loss function
-        loss = (td_error ** 2).sum() / filled.sum()
+        loss = (td_error ** 2).sum() / self.mask_sum(filled)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-        self.optimizer.step()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
         if self.scheduler is not None:
             self.scheduler.step()
 
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info = {
             "learning_rate": lr,
-            "loss_Q": loss.item(),
-            "predictQ": q_tot_eval.mean().item()
+            "loss_Q": loss.detach(),
+            "predictQ": q_tot_eval.mean().detach()
         }
 
         if self.iterations % self.sync_frequency == 0:
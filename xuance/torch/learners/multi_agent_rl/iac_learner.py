@@ -3,18 +3,17 @@ Independent Advantage Actor Critic (IAC)
 Paper link: https://ojs.aaai.org/index.php/AAAI/article/view/11794
 Implementation: Pytorch
 """
-import numpy as np
 import torch
 from torch import nn
 from argparse import Namespace
-from operator import itemgetter
 from xuance.common import Optional, List
-from xuance.torch import Tensor
 from xuance.torch.utils import ValueNorm
 from xuance.torch.learners import LearnerMAS
 
 
 class IAC_Learner(LearnerMAS):
+    supports_gradient_accumulation = True
+
     def __init__(self,
                  config: Namespace,
                  model_keys: List[str],
@@ -61,73 +60,49 @@ class IAC_Learner(LearnerMAS):
         seq_length = sample['sequence_length'] if self.use_rnn else 1
         state, avail_actions, filled, IDs = None, None, None, None
         if use_parameter_sharing:
-            k = self.model_keys[0]
-            bs = batch_size * self.n_agents
-            obs_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['obs']), axis=1)).to(self.device)
-            actions_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['actions']), axis=1)).to(self.device)
-            values_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['values']), axis=1)).to(self.device)
-            returns_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['returns']), axis=1)).to(self.device)
-            advantages_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['advantages']), 1)).to(self.device)
-            log_pi_old_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['log_pi_old']), 1)).to(self.device)
-            ter_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['terminals']), 1)).float().to(self.device)
-            msk_tensor = Tensor(np.stack(itemgetter(*self.agent_keys)(sample['agent_mask']), 1)).float().to(self.device)
-            if self.use_rnn:
-                obs = {k: obs_tensor.reshape(bs, seq_length, -1)}
-                if len(actions_tensor.shape) == 3:
-                    actions = {k: actions_tensor.reshape(bs, seq_length)}
-                elif len(actions_tensor.shape) == 4:
-                    actions = {k: actions_tensor.reshape(bs, seq_length, -1)}
-                else:
-                    raise AttributeError("Wrong actions shape.")
-                values = {k: values_tensor.reshape(bs, seq_length)}
-                returns = {k: returns_tensor.reshape(bs, seq_length)}
-                advantages = {k: advantages_tensor.reshape(bs, seq_length)}
-                log_pi_old = {k: log_pi_old_tensor.reshape(bs, seq_length)}
-                terminals = {k: ter_tensor.reshape(bs, seq_length)}
-                agent_mask = {k: msk_tensor.reshape(bs, seq_length)}
-                IDs = torch.eye(self.n_agents).unsqueeze(1).unsqueeze(0).expand(
-                    batch_size, -1, seq_length, -1).reshape(bs, seq_length, self.n_agents).to(self.device)
-            else:
-                obs = {k: obs_tensor.reshape(bs, -1)}
-                if len(actions_tensor.shape) == 2:
-                    actions = {k: actions_tensor.reshape(bs)}
-                elif len(actions_tensor.shape) == 3:
-                    actions = {k: actions_tensor.reshape(bs, -1)}
+            obs, actions, values, returns, advantages, log_pi_old, terminals, agent_mask, IDs = ({} for _ in range(9))
+            avail_actions = {} if use_actions_mask else None
+            for k, group in self.agent_groups.items():
+                bs = batch_size * len(group)
+                shape = (bs, seq_length) if self.use_rnn else (bs, )
+                obs[k] = self._float_tensor([sample['obs'][key] for key in group]).reshape(shape + (-1, ))
+                actions_tensor = self._float_tensor([sample['actions'][key] for key in group])
+                if actions_tensor.dim() == len(shape) + 1:
+                    actions[k] = actions_tensor.reshape(shape)
+                elif actions_tensor.dim() == len(shape) + 2:
+                    actions[k] = actions_tensor.reshape(shape + (-1, ))
                 else:
                     raise AttributeError("Wrong actions shape.")
-                values = {k: values_tensor.reshape(bs)}
-                returns = {k: returns_tensor.reshape(bs)}
-                advantages = {k: advantages_tensor.reshape(bs)}
-                log_pi_old = {k: log_pi_old_tensor.reshape(bs)}
-                terminals = {k: ter_tensor.reshape(bs)}
-                agent_mask = {k: msk_tensor.reshape(bs)}
-                IDs = torch.eye(self.n_agents).unsqueeze(0).expand(
-                    batch_size, -1, -1).reshape(bs, self.n_agents).to(self.device)
-
-            if use_actions_mask:
-                avail_a = np.stack(itemgetter(*self.agent_keys)(sample['avail_actions']), axis=1)
-                if self.use_rnn:
-                    avail_actions = {k: Tensor(avail_a.reshape([bs, seq_length, -1])).float().to(self.device)}
-                else:
-                    avail_actions = {k: Tensor(avail_a.reshape([bs, -1])).float().to(self.device)}
+                values[k] = self._float_tensor([sample['values'][key] for key in group]).reshape(shape)
+                returns[k] = self._float_tensor([sample['returns'][key] for key in group]).reshape(shape)
+                advantages[k] = self._float_tensor([sample['advantages'][key] for key in group]).reshape(shape)
+                log_pi_old[k] = self._float_tensor([sample['log_pi_old'][key] for key in group]).reshape(shape)
+                terminals[k] = self._float_tensor([sample['terminals'][key] for key in group]).reshape(shape)
+                agent_mask[k] = self._float_tensor([sample['agent_mask'][key] for key in group]).reshape(shape)
+                IDs[k] = self.group_agent_ids(k, batch_size, seq_length if self.use_rnn else None)
+                if use_actions_mask:
+                    avail_a = self._float_tensor([sample['avail_actions'][key] for key in group])
+                    avail_actions[k] = avail_a.reshape(shape + (-1, ))
+            if len(self.model_keys) == 1:
+                IDs = IDs[self.model_keys[0]]  # One tensor if the parameters are shared by all agents.
 
         else:
-            obs = {k: Tensor(sample['obs'][k]).to(self.device) for k in self.agent_keys}
-            actions = {k: Tensor(sample['actions'][k]).to(self.device) for k in self.agent_keys}
-            values = {k: Tensor(sample['values'][k]).to(self.device) for k in self.agent_keys}
-            returns = {k: Tensor(sample['returns'][k]).to(self.device) for k in self.agent_keys}
-            advantages = {k: Tensor(sample['advantages'][k]).to(self.device) for k in self.agent_keys}
-            log_pi_old = {k: Tensor(sample['log_pi_old'][k]).to(self.device) for k in self.agent_keys}
-            terminals = {k: Tensor(sample['terminals'][k]).float().to(self.device) for k in self.agent_keys}
-            agent_mask = {k: Tensor(sample['agent_mask'][k]).float().to(self.device) for k in self.agent_keys}
+            obs = {k: self._float_tensor(sample['obs'][k]) for k in self.agent_keys}
+            actions = {k: self._float_tensor(sample['actions'][k]) for k in self.agent_keys}
+            values = {k: self._float_tensor(sample['values'][k]) for k in self.agent_keys}
+            returns = {k: self._float_tensor(sample['returns'][k]) for k in self.agent_keys}
+            advantages = {k: self._float_tensor(sample['advantages'][k]) for k in self.agent_keys}
+            log_pi_old = {k: self._float_tensor(sample['log_pi_old'][k]) for k in self.agent_keys}
+            terminals = {k: self._float_tensor(sample['terminals'][k]) for k in self.agent_keys}
+            agent_mask = {k: self._float_tensor(sample['agent_mask'][k]) for k in self.agent_keys}
             if use_actions_mask:
-                avail_actions = {k: Tensor(sample['avail_actions'][k]).float().to(self.device) for k in self.agent_keys}
+                avail_actions = {k: self._float_tensor(sample['avail_actions'][k]) for k in self.agent_keys}
 
         if use_global_state:
-            state = Tensor(sample['state']).to(self.device)
+            state = self._float_tensor(sample['state'])
 
         if self.use_rnn:
-            filled = Tensor(sample['filled']).float().to(self.device)
+            filled = self._float_tensor(sample['filled'])
 
         sample_Tensor = {
             'batch_size': batch_size,
@@ -176,12 +151,12 @@ class IAC_Learner(LearnerMAS):
             mask_values = agent_mask[key]
             # policy gradient loss
             log_pi = pi_dist_dict[key].log_prob(actions[key])
-            pg_loss = -((advantages[key].detach() * log_pi) * mask_values).sum() / mask_values.sum()
+            pg_loss = -((advantages[key].detach() * log_pi) * mask_values).sum() / self.mask_sum(mask_values, key)
             loss_a.append(pg_loss)
 
             # entropy loss
             entropy = pi_dist_dict[key].entropy()
-            entropy_loss = (entropy * mask_values).sum() / mask_values.sum()
+            entropy_loss = (entropy * mask_values).sum() / self.mask_sum(mask_values, key)
             loss_e.append(entropy_loss)
 
             # value loss
@@ -192,7 +167,7 @@ class IAC_Learner(LearnerMAS):
                 value_clipped = values_i + (value_pred_i - values_i).clamp(-self.value_clip_range,
                                                                            self.value_clip_range)
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target.reshape(bs, 1))
+                    self.update_value_normalizer(key, value_target.reshape(bs, 1))
                     value_target = self.value_normalizer[key].normalize(value_target.reshape(bs, 1)).reshape(bs)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target)
@@ -201,41 +176,43 @@ class IAC_Learner(LearnerMAS):
                     loss_v = (value_pred_i - value_target) ** 2
                     loss_v_clipped = (value_clipped - value_target) ** 2
                 loss_c_ = torch.max(loss_v, loss_v_clipped) * mask_values
-                loss_c.append(loss_c_.sum() / mask_values.sum())
+                loss_c.append(loss_c_.sum() / self.mask_sum(mask_values, key))
             else:
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target)
+                    self.update_value_normalizer(key, value_target)
                     value_target = self.value_normalizer[key].normalize(value_target)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target) * mask_values
                 else:
                     loss_v = ((value_pred_i - value_target) ** 2) * mask_values
-                loss_c.append(loss_v.sum() / mask_values.sum())
+                loss_c.append(loss_v.sum() / self.mask_sum(mask_values, key))
 
             info.update({
-                f"predict_value/{key}": value_pred_i.mean().item()
+                f"predict_value/{key}": value_pred_i.mean().detach()
             })
 
         # Total loss
         loss = sum(loss_a) + self.vf_coef * sum(loss_c) - self.ent_coef * sum(loss_e)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-            info["gradient_norm"] = grad_norm.item()
-        self.optimizer.step()
-        if self.scheduler is not None:
+            info["gradient_norm"] = grad_norm.detach()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "pg_loss": sum(loss_a).item(),
-            "vf_loss": sum(loss_c).item(),
-            "entropy_loss": sum(loss_e).item(),
-            "loss": loss.item(),
+            "pg_loss": sum(loss_a).detach(),
+            "vf_loss": sum(loss_c).detach(),
+            "entropy_loss": sum(loss_e).detach(),
+            "loss": loss.detach(),
         })
 
         return info
@@ -276,12 +253,12 @@ class IAC_Learner(LearnerMAS):
             mask_values = agent_mask[key] * filled
             # policy gradient loss
             log_pi = pi_dist_dict[key].log_prob(actions[key]).reshape(bs_rnn, seq_len)
-            pg_loss = -((advantages[key].detach() * log_pi) * mask_values).sum() / mask_values.sum()
+            pg_loss = -((advantages[key].detach() * log_pi) * mask_values).sum() / self.mask_sum(mask_values, key)
             loss_a.append(pg_loss)
 
             # entropy loss
             entropy = pi_dist_dict[key].entropy()
-            entropy_loss = (entropy * mask_values).sum() / mask_values.sum()
+            entropy_loss = (entropy * mask_values).sum() / self.mask_sum(mask_values, key)
             loss_e.append(entropy_loss)
 
             # value loss
@@ -292,7 +269,7 @@ class IAC_Learner(LearnerMAS):
                 value_clipped = values_i + (value_pred_i - values_i).clamp(-self.value_clip_range,
                                                                            self.value_clip_range)
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target.reshape(-1, 1))
+                    self.update_value_normalizer(key, value_target.reshape(-1, 1))
                     value_target = self.value_normalizer[key].normalize(value_target.reshape(-1, 1))
                     value_target = value_target.reshape(bs_rnn, seq_len)
                 if self.use_huber_loss:
@@ -302,40 +279,42 @@ class IAC_Learner(LearnerMAS):
                     loss_v = (value_pred_i - value_target) ** 2
                     loss_v_clipped = (value_clipped - value_target) ** 2
                 loss_c_ = torch.max(loss_v, loss_v_clipped) * mask_values
-                loss_c.append(loss_c_.sum() / mask_values.sum())
+                loss_c.append(loss_c_.sum() / self.mask_sum(mask_values, key))
             else:
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target)
+                    self.update_value_normalizer(key, value_target)
                     value_target = self.value_normalizer[key].normalize(value_target)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target)
                 else:
                     loss_v = (value_pred_i - value_target) ** 2
-                loss_c.append((loss_v * mask_values).sum() / mask_values.sum())
+                loss_c.append((loss_v * mask_values).sum() / self.mask_sum(mask_values, key))
 
             info.update({
-                f"predict_value/{key}": value_pred_i.mean().item()
+                f"predict_value/{key}": value_pred_i.mean().detach()
             })
 
         loss = sum(loss_a) + self.vf_coef * sum(loss_c) - self.ent_coef * sum(loss_e)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-            info["gradient_norm"] = grad_norm.item()
-        self.optimizer.step()
-        if self.scheduler is not None:
+            info["gradient_norm"] = grad_norm.detach()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "pg_loss": sum(loss_a).item(),
-            "vf_loss": sum(loss_c).item(),
-            "entropy_loss": sum(loss_e).item(),
-            "loss": loss.item(),
+            "pg_loss": sum(loss_a).detach(),
+            "vf_loss": sum(loss_c).detach(),
+            "entropy_loss": sum(loss_e).detach(),
+            "loss": loss.detach(),
         })
 
         return info
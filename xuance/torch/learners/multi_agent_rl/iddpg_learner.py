@@ -71,10 +71,11 @@ class IDDPG_Learner(LearnerMAS):
             q_policy_i = q_policy[key].reshape(bs)
             loss_a = -(q_policy_i * mask_values).sum() / mask_values.sum()
             self.optimizer[key]['actor'].zero_grad()
-            loss_a.backward()
+            self.scaler.scale(loss_a).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['actor'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor[key], self.grad_clip_norm)
-            self.optimizer[key]['actor'].step()
+            self.scaler.step(self.optimizer[key]['actor'])
             if self.scheduler[key]['actor'] is not None:
                 self.scheduler[key]['actor'].step()
 
@@ -85,25 +86,27 @@ class IDDPG_Learner(LearnerMAS):
             td_error = (q_eval_a - q_target.detach()) * mask_values
             loss_c = (td_error ** 2).sum() / mask_values.sum()
             self.optimizer[key]['critic'].zero_grad()
-            loss_c.backward()
+            self.scaler.scale(loss_c).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['critic'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic[key], self.grad_clip_norm)
-            self.optimizer[key]['critic'].step()
+            self.scaler.step(self.optimizer[key]['critic'])
             if self.scheduler[key]['critic'] is not None:
                 self.scheduler[key]['critic'].step()
 
-            learning_rate_actor = self.optimizer[key]['actor'].state_dict()['param_groups'][0]['lr']
-            learning_rate_critic = self.optimizer[key]['critic'].state_dict()['param_groups'][0]['lr']
+            learning_rate_actor = self.optimizer[key]['actor'].param_groups[0]['lr']
+            learning_rate_critic = self.optimizer[key]['critic'].param_groups[0]['lr']
 
             info.update({
                 f"{key}/learning_rate_actor": learning_rate_actor,
                 f"{key}/learning_rate_critic": learning_rate_critic,
-                f"{key}/loss_actor": loss_a.item(),
-                f"{key}/loss_critic": loss_c.item(),
-                f"{key}/predictQ": q_eval[key].mean().item()
+                f"{key}/loss_actor": loss_a.detach(),
+                f"{key}/loss_critic": loss_c.detach(),
+                f"{key}/predictQ": q_eval[key].mean().detach()
             })
 
         self.policy.soft_update(self.tau)
+        self.scaler.update()
         return info
 
     def update_rnn(self, sample):
@@ -154,10 +157,11 @@ class IDDPG_Learner(LearnerMAS):
             q_policy_i = q_policy[key][:, :-1].reshape(bs_rnn, seq_len)
             loss_a = -(q_policy_i * mask_values).sum() / mask_values.sum()
             self.optimizer[key]['actor'].zero_grad()
-            loss_a.backward()
+            self.scaler.scale(loss_a).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['actor'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor[key], self.grad_clip_norm)
-            self.optimizer[key]['actor'].step()
+            self.scaler.step(self.optimizer[key]['actor'])
             if self.scheduler[key]['actor'] is not None:
                 self.scheduler[key]['actor'].step()
 
@@ -168,23 +172,25 @@ class IDDPG_Learner(LearnerMAS):
             td_error = (q_eval_a - q_target.detach()) * mask_values
             loss_c = (td_error ** 2).sum() / mask_values.sum()
             self.optimizer[key]['critic'].zero_grad()
-            loss_c.backward()
+            self.scaler.scale(loss_c).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['critic'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic[key], self.grad_clip_norm)
-            self.optimizer[key]['critic'].step()
+            self.scaler.step(self.optimizer[key]['critic'])
             if self.scheduler[key]['critic'] is not None:
                 self.scheduler[key]['critic'].step()
 
-            learning_rate_actor = self.optimizer[key]['actor'].state_dict()['param_groups'][0]['lr']
-            learning_rate_critic = self.optimizer[key]['critic'].state_dict()['param_groups'][0]['lr']
+            learning_rate_actor = self.optimizer[key]['actor'].param_groups[0]['lr']
+            learning_rate_critic = self.optimizer[key]['critic'].param_groups[0]['lr']
 
             info.update({
                 f"{key}/learning_rate_actor": learning_rate_actor,
                 f"{key}/learning_rate_critic": learning_rate_critic,
-                f"{key}/loss_actor": loss_a.item(),
-                f"{key}/loss_critic": loss_c.item(),
-                f"{key}/predictQ": q_eval[key].mean().item()
+                f"{key}/loss_actor": loss_a.detach(),
+                f"{key}/loss_critic": loss_c.detach(),
+                f"{key}/predictQ": q_eval[key].mean().detach()
             })
 
         self.policy.soft_update(self.tau)
+        self.scaler.update()
         return info
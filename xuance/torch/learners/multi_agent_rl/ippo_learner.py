@@ -12,6 +12,8 @@ from xuance.torch.learners.multi_agent_rl.iac_learner import IAC_Learner
 
 
 class IPPO_Learner(IAC_Learner):
+    supports_group_sharing = True
+
     def __init__(self,
                  config: Namespace,
                  model_keys: List[str],
@@ -31,7 +33,9 @@ class IPPO_Learner(IAC_Learner):
         self.mse_loss = nn.MSELoss()
         self.huber_loss = nn.HuberLoss(reduction="none", delta=self.huber_delta)
         if self.use_value_norm:
-            self.value_normalizer = {key: ValueNorm(1).to(self.device) for key in self.model_keys}
+            # The agents of a model key share its normalizer, e.g., in the finish_path of the buffers.
+            value_normalizer = {key: ValueNorm(1).to(self.device) for key in self.model_keys}
+            self.value_normalizer = {k: value_normalizer[key] for key, group in self.agent_groups.items() for k in group}
         else:
             self.value_normalizer = None
 
@@ -54,7 +58,13 @@ class IPPO_Learner(IAC_Learner):
         log_pi_old = sample_Tensor['log_pi_old']
         IDs = sample_Tensor['agent_ids']
 
-        bs = batch_size * self.n_agents if self.use_parameter_sharing else batch_size
+        n_rows = {key: batch_size * len(group) for key, group in self.agent_groups.items()}
+        n_samples = dict(n_rows)  # the dead agents add zeros to the sums of the actor and entropy losses.
+        if self.use_packed_agents:
+            alive_index = self.alive_index(agent_mask[self.model_keys[0]])
+            obs, actions, agent_mask, avail_actions, values, returns, advantages, log_pi_old, IDs = self.pack_agents(
+                alive_index, obs, actions, agent_mask, avail_actions, values, returns, advantages, log_pi_old, IDs)
+            n_rows = {self.model_keys[0]: len(alive_index)}
 
         # feedforward
         _, pi_dists_dict = self.policy(observation=obs, agent_ids=IDs, avail_actions=avail_actions)
@@ -63,6 +73,7 @@ class IPPO_Learner(IAC_Learner):
         # calculate losses for each agent
         loss_a, loss_e, loss_c = [], [], []
         for key in self.model_keys:
+            bs = n_rows[key]
             mask_values = agent_mask[key]
             # actor loss
             log_pi = pi_dists_dict[key].log_prob(actions[key]).reshape(bs)
@@ -70,11 +81,11 @@ class IPPO_Learner(IAC_Learner):
             advantages_mask = advantages[key].detach() * mask_values
             surrogate1 = ratio * advantages_mask
             surrogate2 = torch.clip(ratio, 1 - self.clip_range, 1 + self.clip_range) * advantages_mask
-            loss_a.append(-torch.min(surrogate1, surrogate2).mean())
+            loss_a.append(-torch.min(surrogate1, surrogate2).sum() / n_samples[key])
 
             # entropy loss
             entropy = pi_dists_dict[key].entropy().reshape(bs) * mask_values
-            loss_e.append(entropy.mean())
+            loss_e.append(entropy.sum() / n_samples[key])
 
             # critic loss
             value_pred_i = value_pred_dict[key].reshape(bs)
@@ -84,7 +95,7 @@ class IPPO_Learner(IAC_Learner):
                 value_clipped = values_i + (value_pred_i - values_i).clamp(-self.value_clip_range,
                                                                            self.value_clip_range)
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target.reshape(bs, 1))
+                    self.update_value_normalizer(key, value_target.reshape(bs, 1))
                     value_target = self.value_normalizer[key].normalize(value_target.reshape(bs, 1)).reshape(bs)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target)
@@ -93,40 +104,42 @@ class IPPO_Learner(IAC_Learner):
                     loss_v = (value_pred_i - value_target) ** 2
                     loss_v_clipped = (value_clipped - value_target) ** 2
                 loss_c_ = torch.max(loss_v, loss_v_clipped) * mask_values
-                loss_c.append(loss_c_.sum() / mask_values.sum())
+                loss_c.append(loss_c_.sum() / self.mask_sum(mask_values, key))
             else:
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target)
+                    self.update_value_normalizer(key, value_target)
                     value_target = self.value_normalizer[key].normalize(value_target)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target) * mask_values
                 else:
                     loss_v = ((value_pred_i - value_target) ** 2) * mask_values
-                loss_c.append(loss_v.sum() / mask_values.sum())
+                loss_c.append(loss_v.sum() / self.mask_sum(mask_values, key))
 
             info.update({
-                f"{key}/actor_loss": loss_a[-1].item(),
-                f"{key}/critic_loss": loss_c[-1].item(),
-                f"{key}/entropy": loss_e[-1].item(),
-                f"{key}/predict_value": value_pred_i.mean().item()
+                f"{key}/actor_loss": loss_a[-1].detach(),
+                f"{key}/critic_loss": loss_c[-1].detach(),
+                f"{key}/entropy": loss_e[-1].detach(),
+                f"{key}/predict_value": value_pred_i.mean().detach()
             })
 
         loss = sum(loss_a) + self.vf_coef * sum(loss_c) - self.ent_coef * sum(loss_e)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-            info["gradient_norm"] = grad_norm.item()
-        self.optimizer.step()
-        if self.scheduler is not None and self.use_linear_lr_decay:
+            info["gradient_norm"] = grad_norm.detach()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.use_linear_lr_decay and self.is_last_micro_batch:
             self.scheduler.step()
 
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "loss": loss.item(),
+            "loss": loss.detach(),
         })
 
         return info
@@ -139,7 +152,6 @@ class IPPO_Learner(IAC_Learner):
                                                  use_parameter_sharing=self.use_parameter_sharing,
                                                  use_actions_mask=self.use_actions_mask)
         batch_size = sample_Tensor['batch_size']
-        bs_rnn = batch_size * self.n_agents if self.use_parameter_sharing else batch_size
         obs = sample_Tensor['obs']
         actions = sample_Tensor['actions']
         values = sample_Tensor['values']
@@ -152,12 +164,13 @@ class IPPO_Learner(IAC_Learner):
         seq_len = filled.shape[1]
         IDs = sample_Tensor['agent_ids']
 
-        if self.use_parameter_sharing:
-            filled = filled.unsqueeze(1).expand(-1, self.n_agents, -1).reshape(bs_rnn, seq_len)
+        n_rows = {key: batch_size * len(group) for key, group in self.agent_groups.items()}
+        filled = {key: filled.unsqueeze(1).expand(-1, len(group), -1).reshape(n_rows[key], seq_len)
+                  for key, group in self.agent_groups.items()}
 
         # feedfowrd
-        rnn_hidden_actor = {k: self.policy.actor_representation[k].init_hidden(bs_rnn) for k in self.model_keys}
-        rnn_hidden_critic = {k: self.policy.critic_representation[k].init_hidden(bs_rnn) for k in self.model_keys}
+        rnn_hidden_actor = {k: self.policy.actor_representation[k].init_hidden(n_rows[k]) for k in self.model_keys}
+        rnn_hidden_critic = {k: self.policy.critic_representation[k].init_hidden(n_rows[k]) for k in self.model_keys}
 
         # feedforward
         _, pi_dist_dict = self.policy(obs, agent_ids=IDs, avail_actions=avail_actions, rnn_hidden=rnn_hidden_actor)
@@ -171,17 +184,18 @@ class IPPO_Learner(IAC_Learner):
         # calculate losses for each agent
         loss_a, loss_e, loss_c = [], [], []
         for key in self.model_keys:
-            mask_values = agent_mask[key] * filled
+            bs_rnn = n_rows[key]
+            mask_values = agent_mask[key] * filled[key]
             log_pi = pi_dist_dict[key].log_prob(actions[key]).reshape(bs_rnn, seq_len)
             ratio = torch.exp(log_pi - log_pi_old[key])
             surrogate1 = ratio * advantages[key]
             surrogate2 = torch.clip(ratio, 1 - self.clip_range, 1 + self.clip_range) * advantages[key]
-            loss_a.append(-(torch.min(surrogate1, surrogate2) * mask_values).sum() / mask_values.sum())
+            loss_a.append(-(torch.min(surrogate1, surrogate2) * mask_values).sum() / self.mask_sum(mask_values, key))
 
             # entropy loss
             entropy = pi_dist_dict[key].entropy().reshape(bs_rnn, seq_len)
             entropy = entropy * mask_values
-            loss_e.append(entropy.sum() / mask_values.sum())
+            loss_e.append(entropy.sum() / self.mask_sum(mask_values, key))
 
             # critic loss
             value_pred_i = value_pred_dict[key].reshape(bs_rnn, seq_len)
@@ -191,7 +205,7 @@ class IPPO_Learner(IAC_Learner):
                 value_clipped = values_i + (value_pred_i - values_i).clamp(-self.value_clip_range,
                                                                            self.value_clip_range)
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target.reshape(-1, 1))
+                    self.update_value_normalizer(key, value_target.reshape(-1, 1))
                     value_target = self.value_normalizer[key].normalize(value_target.reshape(-1, 1))
                     value_target = value_target.reshape(bs_rnn, seq_len)
                 if self.use_huber_loss:
@@ -201,40 +215,42 @@ class IPPO_Learner(IAC_Learner):
                     loss_v = (value_pred_i - value_target) ** 2
                     loss_v_clipped = (value_clipped - value_target) ** 2
                 loss_c_ = torch.max(loss_v, loss_v_clipped) * mask_values
-                loss_c.append(loss_c_.sum() / mask_values.sum())
+                loss_c.append(loss_c_.sum() / self.mask_sum(mask_values, key))
             else:
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target)
+                    self.update_value_normalizer(key, value_target)
                     value_target = self.value_normalizer[key].normalize(value_target)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target)
                 else:
                     loss_v = (value_pred_i - value_target) ** 2
-                loss_c.append((loss_v * mask_values).sum() / mask_values.sum())
+                loss_c.append((loss_v * mask_values).sum() / self.mask_sum(mask_values, key))
 
             info.update({
-                f"{key}/actor_loss": loss_a[-1].item(),
-                f"{key}/critic_loss": loss_c[-1].item(),
-                f"{key}/entropy": loss_e[-1].item(),
-                f"{key}/predict_value": value_pred_i.mean().item()
+                f"{key}/actor_loss": loss_a[-1].detach(),
+                f"{key}/critic_loss": loss_c[-1].detach(),
+                f"{key}/entropy": loss_e[-1].detach(),
+                f"{key}/predict_value": value_pred_i.mean().detach()
             })
 
         loss = sum(loss_a) + self.vf_coef * sum(loss_c) - self.ent_coef * sum(loss_e)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-            info["gradient_norm"] = grad_norm.item()
-        self.optimizer.step()
-        if self.scheduler is not None:
+            info["gradient_norm"] = grad_norm.detach()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "loss": loss.item(),
+            "loss": loss.detach(),
         })
 
         return info
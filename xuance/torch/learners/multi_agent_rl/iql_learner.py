@@ -16,13 +16,22 @@ class IQL_Learner(LearnerMAS):
                  agent_keys: List[str],
                  policy: nn.Module):
         super(IQL_Learner, self).__init__(config, model_keys, agent_keys, policy)
-        self.optimizer = {key: torch.optim.Adam(self.policy.parameters_model[key], config.learning_rate, eps=1e-5)
-                          for key in self.model_keys}
-        self.scheduler = {key: torch.optim.lr_scheduler.LinearLR(self.optimizer[key],
-                                                                 start_factor=1.0,
-                                                                 end_factor=self.end_factor_lr_decay,
-                                                                 total_iters=self.config.running_steps)
-                          for key in self.model_keys}
+        if self.use_agent_ensemble:
+            # The parameters of all agents are stacked, so one optimizer updates them together.
+            self.optimizer = torch.optim.Adam(self.policy.parameters_ensemble, config.learning_rate, eps=1e-5)
+            self.scheduler = torch.optim.lr_scheduler.LinearLR(self.optimizer,
+                                                               start_factor=1.0,
+                                                               end_factor=self.end_factor_lr_decay,
+                                                               total_iters=self.config.running_steps)
+        else:
+            self.optimizer = {key: torch.optim.Adam(self.policy.parameters_model[key], config.learning_rate,
+                                                    eps=1e-5)
+                              for key in self.model_keys}
+            self.scheduler = {key: torch.optim.lr_scheduler.LinearLR(self.optimizer[key],
+                                                                     start_factor=1.0,
+                                                                     end_factor=self.end_factor_lr_decay,
+                                                                     total_iters=self.config.running_steps)
+                              for key in self.model_keys}
         self.gamma = config.gamma
         self.sync_frequency = config.sync_frequency
         self.n_actions = {k: self.policy.action_space[k].n for k in self.model_keys}
@@ -50,12 +59,21 @@ class IQL_Learner(LearnerMAS):
             bs = batch_size * self.n_agents
             rewards[key] = rewards[key].reshape(batch_size * self.n_agents)
             terminals[key] = terminals[key].reshape(batch_size * self.n_agents)
+            if self.use_packed_agents:
+                alive_index = self.alive_index(agent_mask[key])
+                obs, actions, obs_next, rewards, terminals, agent_mask, avail_actions, avail_actions_next, IDs = \
+                    self.pack_agents(alive_index, obs, actions, obs_next, rewards, terminals, agent_mask,
+                                     avail_actions, avail_actions_next, IDs)
+                bs = len(alive_index)
         else:
             bs = batch_size
 
         _, _, q_eval = self.policy(observation=obs, agent_ids=IDs, avail_actions=avail_actions)
         _, q_next = self.policy.Qtarget(observation=obs_next, agent_ids=IDs)
+        if self.config.double_q:
+            _, actions_next_greedy, _ = self.policy(obs_next, IDs, avail_actions=avail_actions)
 
+        losses = []
         for key in self.model_keys:
             q_eval_a = q_eval[key].gather(-1, actions[key].long().unsqueeze(-1)).reshape(bs)
 
@@ -63,7 +81,6 @@ class IQL_Learner(LearnerMAS):
                 q_next[key][avail_actions_next[key] == 0] = -1e10
 
             if self.config.double_q:
-                _, actions_next_greedy, _ = self.policy(obs_next, IDs, agent_key=key, avail_actions=avail_actions)
                 q_next_a = q_next[key].gather(-1, actions_next_greedy[key].unsqueeze(-1).long()).reshape(bs)
             else:
                 q_next_a = q_next[key].max(dim=-1, keepdim=True).values.reshape(bs)
@@ -73,24 +90,32 @@ class IQL_Learner(LearnerMAS):
             # calculate the loss function
             td_error = (q_eval_a - q_target.detach()) * agent_mask[key]
             loss = (td_error ** 2).sum() / agent_mask[key].sum()
-            self.optimizer[key].zero_grad()
-            loss.backward()
-            if self.use_grad_clip:
-                torch.nn.utils.clip_grad_norm_(self.policy.parameters_model[key], self.grad_clip_norm)
-            self.optimizer[key].step()
-            if self.scheduler[key] is not None:
-                self.scheduler[key].step()
-
-            lr = self.optimizer[key].state_dict()['param_groups'][0]['lr']
+            if self.use_agent_ensemble:
+                losses.append(loss)
+            else:
+                self.optimizer[key].zero_grad()
+                self.scaler.scale(loss).backward()
+                if self.use_grad_clip:
+                    self.scaler.unscale_(self.optimizer[key])
+                    torch.nn.utils.clip_grad_norm_(self.policy.parameters_model[key], self.grad_clip_norm)
+                self.scaler.step(self.optimizer[key])
+                if self.scheduler[key] is not None:
+                    self.scheduler[key].step()
 
             info.update({
-                f"{key}/learning_rate": lr,
-                f"{key}/loss_Q": loss.item(),
-                f"{key}/predictQ": q_eval_a.mean().item()
+                f"{key}/loss_Q": loss.detach(),
+                f"{key}/predictQ": q_eval_a.mean().detach()
             })
 
+        if self.use_agent_ensemble:
+            self.ensemble_step(losses, self.optimizer, self.scheduler, self.policy.parameters_ensemble)
+            info.update({f"{key}/learning_rate": self.optimizer.param_groups[0]['lr'] for key in self.model_keys})
+        else:
+            info.update({f"{key}/learning_rate": self.optimizer[key].param_groups[0]['lr'] for key in self.model_keys})
+
         if self.iterations % self.sync_frequency == 0:
             self.policy.copy_target()
+        self.scaler.update()
         return info
 
     def update_rnn(self, sample):
@@ -146,21 +171,23 @@ class IQL_Learner(LearnerMAS):
             td_errors = (q_eval_a - q_target.detach()) * mask_values
             loss = (td_errors ** 2).sum() / mask_values.sum()
             self.optimizer[key].zero_grad()
-            loss.backward()
+            self.scaler.scale(loss).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_model[key], self.grad_clip_norm)
-            self.optimizer[key].step()
+            self.scaler.step(self.optimizer[key])
             if self.scheduler is not None:
                 self.scheduler[key].step()
 
-            lr = self.optimizer[key].state_dict()['param_groups'][0]['lr']
+            lr = self.optimizer[key].param_groups[0]['lr']
 
             info.update({
                 f"{key}/learning_rate": lr,
-                f"{key}/loss_Q": loss.item(),
-                f"{key}/predictQ": q_eval_a.mean().item()
+                f"{key}/loss_Q": loss.detach(),
+                f"{key}/predictQ": q_eval_a.mean().detach()
             })
 
         if self.iterations % self.sync_frequency == 0:
             self.policy.copy_target()
+        self.scaler.update()
         return info
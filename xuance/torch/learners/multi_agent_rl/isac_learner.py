@@ -16,20 +16,39 @@ class ISAC_Learner(LearnerMAS):
                  agent_keys: List[str],
                  policy: nn.Module):
         super(ISAC_Learner, self).__init__(config, model_keys, agent_keys, policy)
-        self.optimizer = {
-            key: {'actor': torch.optim.Adam(self.policy.parameters_actor[key], self.config.learning_rate_actor, eps=1e-5),
-                  'critic': torch.optim.Adam(self.policy.parameters_critic[key], self.config.learning_rate_critic, eps=1e-5)}
-            for key in self.model_keys}
-        self.scheduler = {
-            key: {'actor': torch.optim.lr_scheduler.LinearLR(self.optimizer[key]['actor'],
-                                                             start_factor=1.0,
-                                                             end_factor=self.end_factor_lr_decay,
-                                                             total_iters=self.config.running_steps),
-                  'critic': torch.optim.lr_scheduler.LinearLR(self.optimizer[key]['critic'],
-                                                              start_factor=1.0,
-                                                              end_factor=self.end_factor_lr_decay,
-                                                              total_iters=self.config.running_steps)}
-            for key in self.model_keys}
+        if self.use_agent_ensemble:
+            # The parameters of all agents are stacked, so one optimizer per network updates them together.
+            self.optimizer = {
+                'actor': torch.optim.Adam(self.policy.parameters_actor_ensemble, self.config.learning_rate_actor,
+                                          eps=1e-5),
+                'critic': torch.optim.Adam(self.policy.parameters_critic_ensemble, self.config.learning_rate_critic,
+                                           eps=1e-5)}
+            self.scheduler = {
+                'actor': torch.optim.lr_scheduler.LinearLR(self.optimizer['actor'],
+                                                           start_factor=1.0,
+                                                           end_factor=self.end_factor_lr_decay,
+                                                           total_iters=self.config.running_steps),
+                'critic': torch.optim.lr_scheduler.LinearLR(self.optimizer['critic'],
+                                                            start_factor=1.0,
+                                                            end_factor=self.end_factor_lr_decay,
+                                                            total_iters=self.config.running_steps)}
+        else:
+            self.optimizer = {
+                key: {'actor': torch.optim.Adam(self.policy.parameters_actor[key], self.config.learning_rate_actor,
+                                                eps=1e-5),
+                      'critic': torch.optim.Adam(self.policy.parameters_critic[key], self.config.learning_rate_critic,
+                                                 eps=1e-5)}
+                for key in self.model_keys}
+            self.scheduler = {
+                key: {'actor': torch.optim.lr_scheduler.LinearLR(self.optimizer[key]['actor'],
+                                                                 start_factor=1.0,
+                                                                 end_factor=self.end_factor_lr_decay,
+                                                                 total_iters=self.config.running_steps),
+                      'critic': torch.optim.lr_scheduler.LinearLR(self.optimizer[key]['critic'],
+                                                                  start_factor=1.0,
+                                                                  end_factor=self.end_factor_lr_decay,
+                                                                  total_iters=self.config.running_steps)}
+                for key in self.model_keys}
         self.gamma = config.gamma
         self.tau = config.tau
         self.alpha = {key: config.alpha for key in self.model_keys}
@@ -86,10 +105,11 @@ class ISAC_Learner(LearnerMAS):
             td_error_2 *= mask_values
             loss_c = ((td_error_1 ** 2).sum() + (td_error_2 ** 2).sum()) / mask_values.sum()
             self.optimizer[key]['critic'].zero_grad()
-            loss_c.backward()
+            self.scaler.scale(loss_c).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['critic'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic[key], self.grad_clip_norm)
-            self.optimizer[key]['critic'].step()
+            self.scaler.step(self.optimizer[key]['critic'])
             if self.scheduler[key]['critic'] is not None:
                 self.scheduler[key]['critic'].step()
 
@@ -100,10 +120,11 @@ class ISAC_Learner(LearnerMAS):
             policy_q = torch.min(policy_q_1[key], policy_q_2[key]).reshape(bs)
             loss_a = ((self.alpha[key] * log_pi_eval_i - policy_q) * mask_values).sum() / mask_values.sum()
             self.optimizer[key]['actor'].zero_grad()
-            loss_a.backward()
+            self.scaler.scale(loss_a).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['actor'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor[key], self.grad_clip_norm)
-            self.optimizer[key]['actor'].step()
+            self.scaler.step(self.optimizer[key]['actor'])
             if self.scheduler[key]['actor'] is not None:
                 self.scheduler[key]['actor'].step()
 
@@ -111,27 +132,28 @@ class ISAC_Learner(LearnerMAS):
             if self.use_automatic_entropy_tuning:
                 alpha_loss = -(self.log_alpha[key] * (log_pi_eval_i + self.target_entropy[key]).detach()).mean()
                 self.alpha_optimizer[key].zero_grad()
-                alpha_loss.backward()
-                self.alpha_optimizer[key].step()
+                self.scaler.scale(alpha_loss).backward()
+                self.scaler.step(self.alpha_optimizer[key])
                 self.alpha[key] = self.log_alpha[key].exp()
             else:
                 alpha_loss = 0
 
-            learning_rate_actor = self.optimizer[key]['actor'].state_dict()['param_groups'][0]['lr']
-            learning_rate_critic = self.optimizer[key]['critic'].state_dict()['param_groups'][0]['lr']
+            learning_rate_actor = self.optimizer[key]['actor'].param_groups[0]['lr']
+            learning_rate_critic = self.optimizer[key]['critic'].param_groups[0]['lr']
 
             info.update({
                 f"{key}/learning_rate_actor": learning_rate_actor,
                 f"{key}/learning_rate_critic": learning_rate_critic,
-                f"{key}/loss_actor": loss_a.item(),
-                f"{key}/loss_critic": loss_c.item(),
-                f"{key}/predictQ": policy_q.mean().item(),
+                f"{key}/loss_actor": loss_a.detach(),
+                f"{key}/loss_critic": loss_c.detach(),
+                f"{key}/predictQ": policy_q.mean().detach(),
             })
             if self.use_automatic_entropy_tuning:
-                info.update({f"{key}/alpha_loss": alpha_loss.item(),
-                             f"{key}/alpha": self.alpha[key].item()})
+                info.update({f"{key}/alpha_loss": alpha_loss.detach(),
+                             f"{key}/alpha": self.alpha[key].detach()})
 
         self.policy.soft_update(self.tau)
+        self.scaler.update()
         return info
 
     def update_rnn(self, sample):
@@ -188,10 +210,11 @@ class ISAC_Learner(LearnerMAS):
             td_error_2 *= mask_values
             loss_c = ((td_error_1 ** 2).sum() + (td_error_2 ** 2).sum()) / mask_values.sum()
             self.optimizer[key]['critic'].zero_grad()
-            loss_c.backward()
+            self.scaler.scale(loss_c).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['critic'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic[key], self.grad_clip_norm)
-            self.optimizer[key]['critic'].step()
+            self.scaler.step(self.optimizer[key]['critic'])
             if self.scheduler[key]['critic'] is not None:
                 self.scheduler[key]['critic'].step()
 
@@ -204,10 +227,11 @@ class ISAC_Learner(LearnerMAS):
             policy_q = torch.min(policy_q_1[key][:, :-1], policy_q_2[key][:, :-1]).reshape(bs_rnn, seq_len)
             loss_a = ((self.alpha[key] * log_pi_eval_i - policy_q) * mask_values).sum() / mask_values.sum()
             self.optimizer[key]['actor'].zero_grad()
-            loss_a.backward()
+            self.scaler.scale(loss_a).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['actor'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor[key], self.grad_clip_norm)
-            self.optimizer[key]['actor'].step()
+            self.scaler.step(self.optimizer[key]['actor'])
             if self.scheduler[key]['actor'] is not None:
                 self.scheduler[key]['actor'].step()
 
@@ -215,25 +239,26 @@ class ISAC_Learner(LearnerMAS):
             if self.use_automatic_entropy_tuning:
                 alpha_loss = -(self.log_alpha[key] * (log_pi_eval_i + self.target_entropy[key]).detach()).mean()
                 self.alpha_optimizer[key].zero_grad()
-                alpha_loss.backward()
-                self.alpha_optimizer[key].step()
+                self.scaler.scale(alpha_loss).backward()
+                self.scaler.step(self.alpha_optimizer[key])
                 self.alpha = self.log_alpha[key].exp()
             else:
                 alpha_loss = 0
 
-            learning_rate_actor = self.optimizer[key]['actor'].state_dict()['param_groups'][0]['lr']
-            learning_rate_critic = self.optimizer[key]['critic'].state_dict()['param_groups'][0]['lr']
+            learning_rate_actor = self.optimizer[key]['actor'].param_groups[0]['lr']
+            learning_rate_critic = self.optimizer[key]['critic'].param_groups[0]['lr']
 
             info.update({
                 f"{key}/learning_rate_actor": learning_rate_actor,
                 f"{key}/learning_rate_critic": learning_rate_critic,
-                f"{key}/loss_actor": loss_a.item(),
-                f"{key}/loss_critic": loss_c.item(),
-                f"{key}/predictQ": policy_q.mean().item(),
+                f"{key}/loss_actor": loss_a.detach(),
+                f"{key}/loss_critic": loss_c.detach(),
+                f"{key}/predictQ": policy_q.mean().detach(),
             })
             if self.use_automatic_entropy_tuning:
-                info.update({f"{key}/alpha_loss": alpha_loss.item(),
-                             f"{key}/alpha": self.alpha[key].item()})
+                info.update({f"{key}/alpha_loss": alpha_loss.detach(),
+                             f"{key}/alpha": self.alpha[key].detach()})
 
         self.policy.soft_update(self.tau)
+        self.scaler.update()
         return info
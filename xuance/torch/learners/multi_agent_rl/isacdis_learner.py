@@ -84,10 +84,11 @@ class ISACDIS_Learner(LearnerMAS):
             td_error_2 *= mask_values
             loss_c = ((td_error_1 ** 2).sum() + (td_error_2 ** 2).sum()) / mask_values.sum()
             self.optimizer[key]['critic'].zero_grad()
-            loss_c.backward()
+            self.scaler.scale(loss_c).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['critic'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic[key], self.grad_clip_norm)
-            self.optimizer[key]['critic'].step()
+            self.scaler.step(self.optimizer[key]['critic'])
             if self.scheduler[key]['critic'] is not None:
                 self.scheduler[key]['critic'].step()
 
@@ -98,10 +99,11 @@ class ISACDIS_Learner(LearnerMAS):
             loss_a = (action_prob[key] * (self.alpha[key] * log_pi[key] - policy_q)).sum(dim=1)
             loss_a = (loss_a * mask_values).sum() / mask_values.sum()
             self.optimizer[key]['actor'].zero_grad()
-            loss_a.backward()
+            self.scaler.scale(loss_a).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['actor'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor[key], self.grad_clip_norm)
-            self.optimizer[key]['actor'].step()
+            self.scaler.step(self.optimizer[key]['actor'])
             if self.scheduler[key]['actor'] is not None:
                 self.scheduler[key]['actor'].step()
 
@@ -109,27 +111,28 @@ class ISACDIS_Learner(LearnerMAS):
             if self.use_automatic_entropy_tuning:
                 alpha_loss = -(self.log_alpha[key] * (log_pi[key] + self.target_entropy[key]).detach()).mean()
                 self.alpha_optimizer[key].zero_grad()
-                alpha_loss.backward()
-                self.alpha_optimizer[key].step()
+                self.scaler.scale(alpha_loss).backward()
+                self.scaler.step(self.alpha_optimizer[key])
                 self.alpha[key] = self.log_alpha[key].exp()
             else:
                 alpha_loss = 0
 
-            learning_rate_actor = self.optimizer[key]['actor'].state_dict()['param_groups'][0]['lr']
-            learning_rate_critic = self.optimizer[key]['critic'].state_dict()['param_groups'][0]['lr']
+            learning_rate_actor = self.optimizer[key]['actor'].param_groups[0]['lr']
+            learning_rate_critic = self.optimizer[key]['critic'].param_groups[0]['lr']
 
             info.update({
                 f"{key}/learning_rate_actor": learning_rate_actor,
                 f"{key}/learning_rate_critic": learning_rate_critic,
-                f"{key}/loss_actor": loss_a.item(),
-                f"{key}/loss_critic": loss_c.item(),
-                f"{key}/predictQ": policy_q.mean().item(),
+                f"{key}/loss_actor": loss_a.detach(),
+                f"{key}/loss_critic": loss_c.detach(),
+                f"{key}/predictQ": policy_q.mean().detach(),
             })
             if self.use_automatic_entropy_tuning:
-                info.update({f"{key}/alpha_loss": alpha_loss.item(),
-                             f"{key}/alpha": self.alpha[key].item()})
+                info.update({f"{key}/alpha_loss": alpha_loss.detach(),
+                             f"{key}/alpha": self.alpha[key].detach()})
 
         self.policy.soft_update(self.tau)
+        self.scaler.update()
         return info
 
     def update_rnn(self, sample):
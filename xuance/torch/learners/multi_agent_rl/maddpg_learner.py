@@ -19,20 +19,39 @@ class MADDPG_Learner(LearnerMAS):
                  agent_keys: List[str],
                  policy: nn.Module):
         super(MADDPG_Learner, self).__init__(config, model_keys, agent_keys, policy)
-        self.optimizer = {
-            key: {'actor': torch.optim.Adam(self.policy.parameters_actor[key], self.config.learning_rate_actor, eps=1e-5),
-                  'critic': torch.optim.Adam(self.policy.parameters_critic[key], self.config.learning_rate_critic, eps=1e-5)}
-            for key in self.model_keys}
-        self.scheduler = {
-            key: {'actor': torch.optim.lr_scheduler.LinearLR(self.optimizer[key]['actor'],
-                                                             start_factor=1.0,
-                                                             end_factor=self.end_factor_lr_decay,
-                                                             total_iters=self.config.running_steps),
-                  'critic': torch.optim.lr_scheduler.LinearLR(self.optimizer[key]['critic'],
-                                                              start_factor=1.0,
-                                                              end_factor=self.end_factor_lr_decay,
-                                                              total_iters=self.config.running_steps)}
-            for key in self.model_keys}
+        if self.use_agent_ensemble:
+            # The parameters of all agents are stacked, so one optimizer per network updates them together.
+            self.optimizer = {
+                'actor': torch.optim.Adam(self.policy.parameters_actor_ensemble, self.config.learning_rate_actor,
+                                          eps=1e-5),
+                'critic': torch.optim.Adam(self.policy.parameters_critic_ensemble, self.config.learning_rate_critic,
+                                           eps=1e-5)}
+            self.scheduler = {
+                'actor': torch.optim.lr_scheduler.LinearLR(self.optimizer['actor'],
+                                                           start_factor=1.0,
+                                                           end_factor=self.end_factor_lr_decay,
+                                                           total_iters=self.config.running_steps),
+                'critic': torch.optim.lr_scheduler.LinearLR(self.optimizer['critic'],
+                                                            start_factor=1.0,
+                                                            end_factor=self.end_factor_lr_decay,
+                                                            total_iters=self.config.running_steps)}
+        else:
+            self.optimizer = {
+                key: {'actor': torch.optim.Adam(self.policy.parameters_actor[key], self.config.learning_rate_actor,
+                                                eps=1e-5),
+                      'critic': torch.optim.Adam(self.policy.parameters_critic[key], self.config.learning_rate_critic,
+                                                 eps=1e-5)}
+                for key in self.model_keys}
+            self.scheduler = {
+                key: {'actor': torch.optim.lr_scheduler.LinearLR(self.optimizer[key]['actor'],
+                                                                 start_factor=1.0,
+                                                                 end_factor=self.end_factor_lr_decay,
+                                                                 total_iters=self.config.running_steps),
+                      'critic': torch.optim.lr_scheduler.LinearLR(self.optimizer[key]['critic'],
+                                                                  start_factor=1.0,
+                                                                  end_factor=self.end_factor_lr_decay,
+                                                                  total_iters=self.config.running_steps)}
+                for key in self.model_keys}
         self.gamma = config.gamma
         self.tau = config.tau
         self.mse_loss = nn.MSELoss()
@@ -80,52 +99,81 @@ class MADDPG_Learner(LearnerMAS):
         _, q_next = self.policy.Qtarget(joint_observation=next_obs_joint, joint_actions=actions_next_joint,
                                         agent_ids=IDs)
 
+        # update critic(s), the critic of an agent does not depend on the actors updated below.
+        losses_c = []
         for key in self.model_keys:
             mask_values = agent_mask[key]
-            # update critic
             q_eval_a = q_eval[key].reshape(bs)
             q_next_i = q_next[key].reshape(bs)
             q_target = rewards[key] + (1 - terminals[key]) * self.gamma * q_next_i
             td_error = (q_eval_a - q_target.detach()) * mask_values
             loss_c = (td_error ** 2).sum() / mask_values.sum()
-            self.optimizer[key]['critic'].zero_grad()
-            loss_c.backward()
-            if self.use_grad_clip:
-                torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic[key], self.grad_clip_norm)
-            self.optimizer[key]['critic'].step()
-            if self.scheduler[key]['critic'] is not None:
-                self.scheduler[key]['critic'].step()
-
-            # update actor
-            if self.use_parameter_sharing:
-                act_eval = actions_eval[key].reshape(batch_size, self.n_agents, -1).reshape(batch_size, -1)
+            if self.use_agent_ensemble:
+                losses_c.append(loss_c)
             else:
-                a_joint = {k: actions_eval[k] if k == key else actions[k] for k in self.agent_keys}
-                act_eval = self.get_joint_input(a_joint, (batch_size, -1))
-            _, q_policy = self.policy.Qpolicy(joint_observation=obs_joint, joint_actions=act_eval,
-                                              agent_ids=IDs, agent_key=key)
+                self.optimizer[key]['critic'].zero_grad()
+                self.scaler.scale(loss_c).backward()
+                if self.use_grad_clip:
+                    self.scaler.unscale_(self.optimizer[key]['critic'])
+                    torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic[key], self.grad_clip_norm)
+                self.scaler.step(self.optimizer[key]['critic'])
+                if self.scheduler[key]['critic'] is not None:
+                    self.scheduler[key]['critic'].step()
+
+            info.update({
+                f"{key}/loss_critic": loss_c.detach(),
+                f"{key}/predictQ": q_eval[key].mean().detach()
+            })
+        if self.use_agent_ensemble:
+            self.ensemble_step(losses_c, self.optimizer['critic'], self.scheduler['critic'],
+                               self.policy.parameters_critic_ensemble)
+
+        # update actor(s)
+        if self.use_agent_ensemble:
+            # The critic of each agent evaluates the joint actions with the actions of its own actor.
+            act_eval = {key: self.get_joint_input({k: actions_eval[k] if k == key else actions[k]
+                                                   for k in self.agent_keys}, (batch_size, -1))
+                        for key in self.model_keys}
+            _, q_policy = self.policy.Qpolicy(joint_observation=obs_joint, joint_actions=act_eval, agent_ids=IDs)
+        losses_a = []
+        for key in self.model_keys:
+            mask_values = agent_mask[key]
+            if not self.use_agent_ensemble:
+                if self.use_parameter_sharing:
+                    act_eval = actions_eval[key].reshape(batch_size, self.n_agents, -1).reshape(batch_size, -1)
+                else:
+                    a_joint = {k: actions_eval[k] if k == key else actions[k] for k in self.agent_keys}
+                    act_eval = self.get_joint_input(a_joint, (batch_size, -1))
+                _, q_policy = self.policy.Qpolicy(joint_observation=obs_joint, joint_actions=act_eval,
+                                                  agent_ids=IDs, agent_key=key)
             q_policy_i = q_policy[key].reshape(bs)
             loss_a = -(q_policy_i * mask_values).sum() / mask_values.sum()
-            self.optimizer[key]['actor'].zero_grad()
-            loss_a.backward()
-            if self.use_grad_clip:
-                torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor[key], self.grad_clip_norm)
-            self.optimizer[key]['actor'].step()
-            if self.scheduler[key]['actor'] is not None:
-                self.scheduler[key]['actor'].step()
+            if self.use_agent_ensemble:
+                losses_a.append(loss_a)
+            else:
+                self.optimizer[key]['actor'].zero_grad()
+                self.scaler.scale(loss_a).backward()
+                if self.use_grad_clip:
+                    self.scaler.unscale_(self.optimizer[key]['actor'])
+                    torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor[key], self.grad_clip_norm)
+                self.scaler.step(self.optimizer[key]['actor'])
+                if self.scheduler[key]['actor'] is not None:
+                    self.scheduler[key]['actor'].step()
 
-            learning_rate_actor = self.optimizer[key]['actor'].state_dict()['param_groups'][0]['lr']
-            learning_rate_critic = self.optimizer[key]['critic'].state_dict()['param_groups'][0]['lr']
+            info[f"{key}/loss_actor"] = loss_a.detach()
+        if self.use_agent_ensemble:
+            self.ensemble_step(losses_a, self.optimizer['actor'], self.scheduler['actor'],
+                               self.policy.parameters_actor_ensemble)
 
+        for key in self.model_keys:
+            optimizer = self.optimizer if self.use_agent_ensemble else self.optimizer[key]
             info.update({
-                f"{key}/learning_rate_actor": learning_rate_actor,
-                f"{key}/learning_rate_critic": learning_rate_critic,
-                f"{key}/loss_actor": loss_a.item(),
-                f"{key}/loss_critic": loss_c.item(),
-                f"{key}/predictQ": q_eval[key].mean().item()
+                f"{key}/learning_rate_actor": optimizer['actor'].param_groups[0]['lr'],
+                f"{key}/learning_rate_critic": optimizer['critic'].param_groups[0]['lr'],
             })
 
         self.policy.soft_update(self.tau)
+        self.scaler.update()
         return info
 
     def update_rnn(self, sample):
@@ -191,10 +239,11 @@ class MADDPG_Learner(LearnerMAS):
             td_error = (q_eval_a - q_target.detach()) * mask_values
             loss_c = (td_error ** 2).sum() / mask_values.sum()
             self.optimizer[key]['critic'].zero_grad()
-            loss_c.backward()
+            self.scaler.scale(loss_c).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['critic'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic[key], self.grad_clip_norm)
-            self.optimizer[key]['critic'].step()
+            self.scaler.step(self.optimizer[key]['critic'])
             if self.scheduler[key]['critic'] is not None:
                 self.scheduler[key]['critic'].step()
 
@@ -210,23 +259,25 @@ class MADDPG_Learner(LearnerMAS):
             q_policy_i = q_policy[key].reshape(bs_rnn, seq_len)
             loss_a = -(q_policy_i * mask_values).sum() / mask_values.sum()
             self.optimizer[key]['actor'].zero_grad()
-            loss_a.backward()
+            self.scaler.scale(loss_a).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['actor'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor[key], self.grad_clip_norm)
-            self.optimizer[key]['actor'].step()
+            self.scaler.step(self.optimizer[key]['actor'])
             if self.scheduler[key]['actor'] is not None:
                 self.scheduler[key]['actor'].step()
 
-            learning_rate_actor = self.optimizer[key]['actor'].state_dict()['param_groups'][0]['lr']
-            learning_rate_critic = self.optimizer[key]['critic'].state_dict()['param_groups'][0]['lr']
+            learning_rate_actor = self.optimizer[key]['actor'].param_groups[0]['lr']
+            learning_rate_critic = self.optimizer[key]['critic'].param_groups[0]['lr']
 
             info.update({
                 f"{key}/learning_rate_actor": learning_rate_actor,
                 f"{key}/learning_rate_critic": learning_rate_critic,
-                f"{key}/loss_actor": loss_a.item(),
-                f"{key}/loss_critic": loss_c.item(),
-                f"{key}/predictQ": q_eval[key].mean().item()
+                f"{key}/loss_actor": loss_a.detach(),
+                f"{key}/loss_critic": loss_c.detach(),
+                f"{key}/predictQ": q_eval[key].mean().detach()
             })
 
         self.policy.soft_update(self.tau)
+        self.scaler.update()
         return info
@@ -41,22 +41,21 @@ class MAPPO_Clip_Learner(IPPO_Learner):
         IDs = sample_Tensor['agent_ids']
 
         # prepare critic inputs
-        if self.use_parameter_sharing:
-            key = self.model_keys[0]
-            bs = batch_size * self.n_agents
-            if self.use_global_state:
-                critic_input = {key: state.reshape(batch_size, 1, -1).expand(
-                    batch_size, self.n_agents, -1).reshape(bs, -1)}
-            else:
-                critic_input = {key: obs[key].reshape(batch_size, 1, -1).expand(
-                    batch_size, self.n_agents, -1).reshape(bs, -1)}
+        n_rows = {key: batch_size * len(group) for key, group in self.agent_groups.items()}
+        if self.use_global_state:
+            joint_input = state.reshape(batch_size, -1)
         else:
-            bs = batch_size
-            if self.use_global_state:
-                critic_input = {k: state.reshape(batch_size, -1) for k in self.agent_keys}
-            else:
-                joint_obs = self.get_joint_input(obs)
-                critic_input = {k: joint_obs for k in self.agent_keys}
+            joint_input = self.get_group_joint_input(obs, batch_size)
+        critic_input = {key: joint_input.unsqueeze(1).expand(-1, len(group), -1).reshape(n_rows[key], -1)
+                        for key, group in self.agent_groups.items()}
+
+        n_samples = dict(n_rows)  # the dead agents add zeros to the sums of the actor and entropy losses.
+        if self.use_packed_agents:
+            alive_index = self.alive_index(agent_mask[self.model_keys[0]])
+            obs, critic_input, actions, agent_mask, avail_actions, values, returns, advantages, log_pi_old, IDs = \
+                self.pack_agents(alive_index, obs, critic_input, actions, agent_mask, avail_actions, values, returns,
+                                 advantages, log_pi_old, IDs)
+            n_rows = {self.model_keys[0]: len(alive_index)}
 
         # feedforward
         _, pi_dists_dict = self.policy(observation=obs, agent_ids=IDs, avail_actions=avail_actions)
@@ -65,6 +64,7 @@ class MAPPO_Clip_Learner(IPPO_Learner):
         # calculate losses for each agent
         loss_a, loss_e, loss_c = [], [], []
         for key in self.model_keys:
+            bs = n_rows[key]
             mask_values = agent_mask[key]
             # actor loss
             log_pi = pi_dists_dict[key].log_prob(actions[key]).reshape(bs)
@@ -72,11 +72,11 @@ class MAPPO_Clip_Learner(IPPO_Learner):
             advantages_mask = advantages[key].detach() * mask_values
             surrogate1 = ratio * advantages_mask
             surrogate2 = torch.clip(ratio, 1 - self.clip_range, 1 + self.clip_range) * advantages_mask
-            loss_a.append(-torch.min(surrogate1, surrogate2).mean())
+            loss_a.append(-torch.min(surrogate1, surrogate2).sum() / n_samples[key])
 
             # entropy loss
             entropy = pi_dists_dict[key].entropy().reshape(bs) * mask_values
-            loss_e.append(entropy.mean())
+            loss_e.append(entropy.sum() / n_samples[key])
 
             # critic loss
             value_pred_i = value_pred_dict[key].reshape(bs)
@@ -86,7 +86,7 @@ class MAPPO_Clip_Learner(IPPO_Learner):
                 value_clipped = values_i + (value_pred_i - values_i).clamp(-self.value_clip_range,
                                                                            self.value_clip_range)
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target.reshape(bs, 1))
+                    self.update_value_normalizer(key, value_target.reshape(bs, 1))
                     value_target = self.value_normalizer[key].normalize(value_target.reshape(bs, 1)).reshape(bs)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target)
@@ -95,40 +95,42 @@ class MAPPO_Clip_Learner(IPPO_Learner):
                     loss_v = (value_pred_i - value_target) ** 2
                     loss_v_clipped = (value_clipped - value_target) ** 2
                 loss_c_ = torch.max(loss_v, loss_v_clipped) * mask_values
-                loss_c.append(loss_c_.sum() / mask_values.sum())
+                loss_c.append(loss_c_.sum() / self.mask_sum(mask_values, key))
             else:
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target)
+                    self.update_value_normalizer(key, value_target)
                     value_target = self.value_normalizer[key].normalize(value_target)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target) * mask_values
                 else:
                     loss_v = ((value_pred_i - value_target) ** 2) * mask_values
-                loss_c.append(loss_v.sum() / mask_values.sum())
+                loss_c.append(loss_v.sum() / self.mask_sum(mask_values, key))
 
             info.update({
-                f"{key}/actor_loss": loss_a[-1].item(),
-                f"{key}/critic_loss": loss_c[-1].item(),
-                f"{key}/entropy": loss_e[-1].item(),
-                f"{key}/predict_value": value_pred_i.mean().item()
+                f"{key}/actor_loss": loss_a[-1].detach(),
+                f"{key}/critic_loss": loss_c[-1].detach(),
+                f"{key}/entropy": loss_e[-1].detach(),
+                f"{key}/predict_value": value_pred_i.mean().detach()
             })
 
         loss = sum(loss_a) + self.vf_coef * sum(loss_c) - self.ent_coef * sum(loss_e)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-            info["gradient_norm"] = grad_norm.item()
-        self.optimizer.step()
-        if self.scheduler is not None and self.use_linear_lr_decay:
+            info["gradient_norm"] = grad_norm.detach()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.use_linear_lr_decay and self.is_last_micro_batch:
             self.scheduler.step()
 
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "loss": loss.item(),
+            "loss": loss.detach(),
         })
 
         return info
@@ -139,10 +141,10 @@ class MAPPO_Clip_Learner(IPPO_Learner):
 
         sample_Tensor = self.build_training_data(sample=sample,
                                                  use_parameter_sharing=self.use_parameter_sharing,
-                                                 use_actions_mask=self.use_actions_mask)
+                                                 use_actions_mask=self.use_actions_mask,
+                                                 use_global_state=self.use_global_state)
         batch_size = sample_Tensor['batch_size']
         state = sample_Tensor['state']
-        bs_rnn = batch_size * self.n_agents if self.use_parameter_sharing else batch_size
         obs = sample_Tensor['obs']
         actions = sample_Tensor['actions']
         values = sample_Tensor['values']
@@ -155,26 +157,18 @@ class MAPPO_Clip_Learner(IPPO_Learner):
         seq_len = filled.shape[1]
         IDs = sample_Tensor['agent_ids']
 
-        if self.use_parameter_sharing:
-            key = self.model_keys[0]
-            filled = filled.unsqueeze(1).expand(batch_size, self.n_agents, seq_len).reshape(bs_rnn, seq_len)
-            if self.use_global_state:
-                critic_input = {key: state.reshape(batch_size, 1, seq_len, -1).expand(
-                    -1, self.n_agents, -1, -1).reshape(bs_rnn, seq_len, -1)}
-            else:
-                joint_obs = obs[key].reshape(batch_size, self.n_agents, seq_len, -1).transpose(
-                    1, 2).reshape(batch_size, seq_len, -1)
-                joint_obs = joint_obs.unsqueeze(1).expand(-1, self.n_agents, -1, -1).reshape(bs_rnn, seq_len, -1)
-                critic_input = {key: joint_obs}
+        n_rows = {key: batch_size * len(group) for key, group in self.agent_groups.items()}
+        filled = {key: filled.unsqueeze(1).expand(-1, len(group), -1).reshape(n_rows[key], seq_len)
+                  for key, group in self.agent_groups.items()}
+        if self.use_global_state:
+            joint_input = state.reshape(batch_size, seq_len, -1)
         else:
-            if self.use_global_state:
-                critic_input = {k: state.reshape(batch_size, seq_len, -1) for k in self.agent_keys}
-            else:
-                joint_obs = self.get_joint_input(obs, (batch_size, seq_len, -1))
-                critic_input = {k: joint_obs for k in self.agent_keys}
+            joint_input = self.get_group_joint_input(obs, batch_size)
+        critic_input = {key: joint_input.unsqueeze(1).expand(-1, len(group), -1, -1).reshape(n_rows[key], seq_len, -1)
+                        for key, group in self.agent_groups.items()}
 
-        rnn_hidden_actor = {k: self.policy.actor_representation[k].init_hidden(bs_rnn) for k in self.model_keys}
-        rnn_hidden_critic = {k: self.policy.critic_representation[k].init_hidden(bs_rnn) for k in self.model_keys}
+        rnn_hidden_actor = {k: self.policy.actor_representation[k].init_hidden(n_rows[k]) for k in self.model_keys}
+        rnn_hidden_critic = {k: self.policy.critic_representation[k].init_hidden(n_rows[k]) for k in self.model_keys}
 
         # feedforward
         _, pi_dist_dict = self.policy(obs, agent_ids=IDs, avail_actions=avail_actions, rnn_hidden=rnn_hidden_actor)
@@ -183,17 +177,18 @@ class MAPPO_Clip_Learner(IPPO_Learner):
         # calculate losses for each agent
         loss_a, loss_e, loss_c = [], [], []
         for key in self.model_keys:
-            mask_values = agent_mask[key] * filled
+            bs_rnn = n_rows[key]
+            mask_values = agent_mask[key] * filled[key]
             log_pi = pi_dist_dict[key].log_prob(actions[key]).reshape(bs_rnn, seq_len)
             ratio = torch.exp(log_pi - log_pi_old[key])
             surrogate1 = ratio * advantages[key]
             surrogate2 = torch.clip(ratio, 1 - self.clip_range, 1 + self.clip_range) * advantages[key]
-            loss_a.append(-(torch.min(surrogate1, surrogate2) * mask_values).sum() / mask_values.sum())
+            loss_a.append(-(torch.min(surrogate1, surrogate2) * mask_values).sum() / self.mask_sum(mask_values, key))
 
             # entropy loss
             entropy = pi_dist_dict[key].entropy().reshape(bs_rnn, seq_len)
             entropy = entropy * mask_values
-            loss_e.append(entropy.sum() / mask_values.sum())
+            loss_e.append(entropy.sum() / self.mask_sum(mask_values, key))
 
             # critic loss
             value_pred_i = value_pred_dict[key].reshape(bs_rnn, seq_len)
@@ -203,7 +198,7 @@ class MAPPO_Clip_Learner(IPPO_Learner):
                 value_clipped = values_i + (value_pred_i - values_i).clamp(-self.value_clip_range,
                                                                            self.value_clip_range)
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target.reshape(-1, 1))
+                    self.update_value_normalizer(key, value_target.reshape(-1, 1))
                     value_target = self.value_normalizer[key].normalize(value_target.reshape(-1, 1))
                     value_target = value_target.reshape(bs_rnn, seq_len)
                 if self.use_huber_loss:
@@ -213,40 +208,42 @@ class MAPPO_Clip_Learner(IPPO_Learner):
                     loss_v = (value_pred_i - value_target) ** 2
                     loss_v_clipped = (value_clipped - value_target) ** 2
                 loss_c_ = torch.max(loss_v, loss_v_clipped) * mask_values
-                loss_c.append(loss_c_.sum() / mask_values.sum())
+                loss_c.append(loss_c_.sum() / self.mask_sum(mask_values, key))
             else:
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target)
+                    self.update_value_normalizer(key, value_target)
                     value_target = self.value_normalizer[key].normalize(value_target)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target)
                 else:
                     loss_v = (value_pred_i - value_target) ** 2
-                loss_c.append((loss_v * mask_values).sum() / mask_values.sum())
+                loss_c.append((loss_v * mask_values).sum() / self.mask_sum(mask_values, key))
 
             info.update({
-                f"{key}/actor_loss": loss_a[-1].item(),
-                f"{key}/critic_loss": loss_c[-1].item(),
-                f"{key}/entropy": loss_e[-1].item(),
-                f"{key}/predict_value": value_pred_i.mean().item()
+                f"{key}/actor_loss": loss_a[-1].detach(),
+                f"{key}/critic_loss": loss_c[-1].detach(),
+                f"{key}/entropy": loss_e[-1].detach(),
+                f"{key}/predict_value": value_pred_i.mean().detach()
             })
 
         loss = sum(loss_a) + self.vf_coef * sum(loss_c) - self.ent_coef * sum(loss_e)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-            info["gradient_norm"] = grad_norm.item()
-        self.optimizer.step()
-        if self.scheduler is not None:
+            info["gradient_norm"] = grad_norm.detach()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "loss": loss.item(),
+            "loss": loss.detach(),
         })
 
         return info
@@ -59,9 +59,10 @@ class MASAC_Learner(ISAC_Learner):
                                                            agent_ids=IDs)
         _, _, target_q = self.policy.Qtarget(joint_observation=next_obs_joint, joint_actions=actions_next_joint,
                                              agent_ids=IDs)
+        # critic update, the critic of an agent does not depend on the actors updated below.
+        losses_c = []
         for key in self.model_keys:
             mask_values = agent_mask[key]
-            # critic update
             action_q_1_i = action_q_1[key].reshape(bs)
             action_q_2_i = action_q_2[key].reshape(bs)
             log_pi_next_eval = log_pi_next[key].reshape(bs)
@@ -71,60 +72,85 @@ class MASAC_Learner(ISAC_Learner):
             td_error_1 *= mask_values
             td_error_2 *= mask_values
             loss_c = ((td_error_1 ** 2).sum() + (td_error_2 ** 2).sum()) / mask_values.sum()
-            self.optimizer[key]['critic'].zero_grad()
-            loss_c.backward()
-            if self.use_grad_clip:
-                torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic[key], self.grad_clip_norm)
-            self.optimizer[key]['critic'].step()
-            if self.scheduler[key]['critic'] is not None:
-                self.scheduler[key]['critic'].step()
-
-            # actor update
-            if self.use_parameter_sharing:
-                actions_eval_joint = actions_eval[key].reshape(batch_size, self.n_agents, -1).reshape(batch_size, -1)
+            if self.use_agent_ensemble:
+                losses_c.append(loss_c)
             else:
+                self.optimizer[key]['critic'].zero_grad()
+                self.scaler.scale(loss_c).backward()
+                if self.use_grad_clip:
+                    self.scaler.unscale_(self.optimizer[key]['critic'])
+                    torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic[key], self.grad_clip_norm)
+                self.scaler.step(self.optimizer[key]['critic'])
+                if self.scheduler[key]['critic'] is not None:
+                    self.scheduler[key]['critic'].step()
+            info[f"{key}/loss_critic"] = loss_c.detach()
+        if self.use_agent_ensemble:
+            self.ensemble_step(losses_c, self.optimizer['critic'], self.scheduler['critic'],
+                               self.policy.parameters_critic_ensemble)
+
+        # actor update
+        if self.use_agent_ensemble:
+            # The critic of each agent evaluates the joint actions with the gradients of its own actor only.
+            actions_eval_joint = {}
+            for key in self.model_keys:
                 actions_eval_detach_others = {k: actions_eval[k] if k == key else actions_eval[k].detach()
                                               for k in self.model_keys}
-                actions_eval_joint = self.get_joint_input(actions_eval_detach_others, (batch_size, -1))
+                actions_eval_joint[key] = self.get_joint_input(actions_eval_detach_others, (batch_size, -1))
             _, _, policy_q_1, policy_q_2 = self.policy.Qpolicy(joint_observation=obs_joint,
-                                                               joint_actions=actions_eval_joint,
-                                                               agent_ids=IDs, agent_key=key)
-            log_pi_eval_i = log_pi_eval[key].reshape(bs)
+                                                               joint_actions=actions_eval_joint, agent_ids=IDs)
+        losses_a, log_pi_eval_i = [], {}
+        for key in self.model_keys:
+            mask_values = agent_mask[key]
+            if not self.use_agent_ensemble:
+                if self.use_parameter_sharing:
+                    actions_eval_joint = actions_eval[key].reshape(batch_size, self.n_agents, -1).reshape(
+                        batch_size, -1)
+                else:
+                    actions_eval_detach_others = {k: actions_eval[k] if k == key else actions_eval[k].detach()
+                                                  for k in self.model_keys}
+                    actions_eval_joint = self.get_joint_input(actions_eval_detach_others, (batch_size, -1))
+                _, _, policy_q_1, policy_q_2 = self.policy.Qpolicy(joint_observation=obs_joint,
+                                                                   joint_actions=actions_eval_joint,
+                                                                   agent_ids=IDs, agent_key=key)
+            log_pi_eval_i[key] = log_pi_eval[key].reshape(bs)
             policy_q = torch.min(policy_q_1[key], policy_q_2[key]).reshape(bs)
-            loss_a = ((self.alpha[key] * log_pi_eval_i - policy_q) * mask_values).sum() / mask_values.sum()
-            self.optimizer[key]['actor'].zero_grad()
-            loss_a.backward()
-            if self.use_grad_clip:
-                torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor[key], self.grad_clip_norm)
-            self.optimizer[key]['actor'].step()
-            if self.scheduler[key]['actor'] is not None:
-                self.scheduler[key]['actor'].step()
+            loss_a = ((self.alpha[key] * log_pi_eval_i[key] - policy_q) * mask_values).sum() / mask_values.sum()
+            if self.use_agent_ensemble:
+                losses_a.append(loss_a)
+            else:
+                self.optimizer[key]['actor'].zero_grad()
+                self.scaler.scale(loss_a).backward()
+                if self.use_grad_clip:
+                    self.scaler.unscale_(self.optimizer[key]['actor'])
+                    torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor[key], self.grad_clip_norm)
+                self.scaler.step(self.optimizer[key]['actor'])
+                if self.scheduler[key]['actor'] is not None:
+                    self.scheduler[key]['actor'].step()
+            info.update({f"{key}/loss_actor": loss_a.detach(),
+                         f"{key}/predictQ": policy_q.mean().detach()})
+        if self.use_agent_ensemble:
+            self.ensemble_step(losses_a, self.optimizer['actor'], self.scheduler['actor'],
+                               self.policy.parameters_actor_ensemble)
 
+        for key in self.model_keys:
             # automatic entropy tuning
             if self.use_automatic_entropy_tuning:
-                alpha_loss = -(self.log_alpha[key] * (log_pi_eval_i + self.target_entropy[key]).detach()).mean()
+                alpha_loss = -(self.log_alpha[key] * (log_pi_eval_i[key] + self.target_entropy[key]).detach()).mean()
                 self.alpha_optimizer[key].zero_grad()
-                alpha_loss.backward()
-                self.alpha_optimizer[key].step()
+                self.scaler.scale(alpha_loss).backward()
+                self.scaler.step(self.alpha_optimizer[key])
                 self.alpha[key] = self.log_alpha[key].exp()
-            else:
-                alpha_loss = 0
-
-            learning_rate_actor = self.optimizer[key]['actor'].state_dict()['param_groups'][0]['lr']
-            learning_rate_critic = self.optimizer[key]['critic'].state_dict()['param_groups'][0]['lr']
+                info.update({f"{key}/alpha_loss": alpha_loss.detach(),
+                             f"{key}/alpha": self.alpha[key].detach()})
 
+            optimizer = self.optimizer if self.use_agent_ensemble else self.optimizer[key]
             info.update({
-                f"{key}/learning_rate_actor": learning_rate_actor,
-                f"{key}/learning_rate_critic": learning_rate_critic,
-                f"{key}/loss_actor": loss_a.item(),
-                f"{key}/loss_critic": loss_c.item(),
-                f"{key}/predictQ": policy_q.mean().item(),
+                f"{key}/learning_rate_actor": optimizer['actor'].param_groups[0]['lr'],
+                f"{key}/learning_rate_critic": optimizer['critic'].param_groups[0]['lr'],
             })
-            if self.use_automatic_entropy_tuning:
-                info.update({f"{key}/alpha_loss": alpha_loss.item(),
-                             f"{key}/alpha": self.alpha[key].item()})
 
         self.policy.soft_update(self.tau)
+        self.scaler.update()
         return info
 
     def update_rnn(self, sample):
@@ -194,10 +220,11 @@ class MASAC_Learner(ISAC_Learner):
             td_error_2 *= mask_values
             loss_c = ((td_error_1 ** 2).sum() + (td_error_2 ** 2).sum()) / mask_values.sum()
             self.optimizer[key]['critic'].zero_grad()
-            loss_c.backward()
+            self.scaler.scale(loss_c).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['critic'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_critic[key], self.grad_clip_norm)
-            self.optimizer[key]['critic'].step()
+            self.scaler.step(self.optimizer[key]['critic'])
             if self.scheduler[key]['critic'] is not None:
                 self.scheduler[key]['critic'].step()
 
@@ -218,10 +245,11 @@ class MASAC_Learner(ISAC_Learner):
             policy_q = torch.min(policy_q_1[key], policy_q_2[key]).reshape(bs_rnn, seq_len)
             loss_a = ((self.alpha[key] * log_pi_eval_i - policy_q) * mask_values).sum() / mask_values.sum()
             self.optimizer[key]['actor'].zero_grad()
-            loss_a.backward()
+            self.scaler.scale(loss_a).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key]['actor'])
                 torch.nn.utils.clip_grad_norm_(self.policy.parameters_actor[key], self.grad_clip_norm)
-            self.optimizer[key]['actor'].step()
+            self.scaler.step(self.optimizer[key]['actor'])
             if self.scheduler[key]['actor'] is not None:
                 self.scheduler[key]['actor'].step()
 
@@ -229,25 +257,26 @@ class MASAC_Learner(ISAC_Learner):
             if self.use_automatic_entropy_tuning:
                 alpha_loss = -(self.log_alpha[key] * (log_pi_eval_i + self.target_entropy[key]).detach()).mean()
                 self.alpha_optimizer[key].zero_grad()
-                alpha_loss.backward()
-                self.alpha_optimizer[key].step()
+                self.scaler.scale(alpha_loss).backward()
+                self.scaler.step(self.alpha_optimizer[key])
                 self.alpha[key] = self.log_alpha[key].exp()
             else:
                 alpha_loss = 0
 
-            learning_rate_actor = self.optimizer[key]['actor'].state_dict()['param_groups'][0]['lr']
-            learning_rate_critic = self.optimizer[key]['critic'].state_dict()['param_groups'][0]['lr']
+            learning_rate_actor = self.optimizer[key]['actor'].param_groups[0]['lr']
+            learning_rate_critic = self.optimizer[key]['critic'].param_groups[0]['lr']
 
             info.update({
                 f"{key}/learning_rate_actor": learning_rate_actor,
                 f"{key}/learning_rate_critic": learning_rate_critic,
-                f"{key}/loss_actor": loss_a.item(),
-                f"{key}/loss_critic": loss_c.item(),
-                f"{key}/predictQ": policy_q.mean().item(),
+                f"{key}/loss_actor": loss_a.detach(),
+                f"{key}/loss_critic": loss_c.detach(),
+                f"{key}/predictQ": policy_q.mean().detach(),
             })
             if self.use_automatic_entropy_tuning:
-                info.update({f"{key}/alpha_loss": alpha_loss.item(),
-                             f"{key}/alpha": self.alpha[key].item()})
+                info.update({f"{key}/alpha_loss": alpha_loss.detach(),
+                             f"{key}/alpha": self.alpha[key].detach()})
 
         self.policy.soft_update(self.tau)
+        self.scaler.update()
         return info
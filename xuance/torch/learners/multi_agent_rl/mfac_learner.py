@@ -5,82 +5,125 @@ http://proceedings.mlr.press/v80/yang18d/yang18d.pdf
 Implementation: Pytorch
 """
 import torch
-from torch import nn
-from xuance.torch.learners import LearnerMAS
-from xuance.common import Optional, Union
-from argparse import Namespace
-
-
-class MFAC_Learner(LearnerMAS):
-    def __init__(self,
-                 config: Namespace,
-                 policy: nn.Module,
-                 optimizer: torch.optim.Optimizer,
-                 scheduler: Optional[torch.optim.lr_scheduler._LRScheduler] = None,
-                 device: Optional[Union[int, str, torch.device]] = None,
-                 model_dir: str = "./",
-                 gamma: float = 0.99,
-                 ):
-        self.gamma = gamma
-        self.clip_range = config.clip_range
-        self.use_linear_lr_decay = config.use_linear_lr_decay
-        self.use_grad_clip, self.grad_clip_norm = config.use_grad_clip, config.grad_clip_norm
-        self.use_value_norm = config.use_value_norm
-        self.vf_coef, self.ent_coef = config.vf_coef, config.ent_coef
-        self.tau = config.tau
-        self.mse_loss = nn.MSELoss()
-        super(MFAC_Learner, self).__init__(config, policy, optimizer, scheduler, device, model_dir)
-        self.optimizer = optimizer
-        self.scheduler = scheduler
+from xuance.common import Optional
+from xuance.torch.learners.multi_agent_rl.iac_learner import IAC_Learner
+
+
+class MFAC_Learner(IAC_Learner):
+    def build_training_data(self, sample: Optional[dict],
+                            use_parameter_sharing: Optional[bool] = False,
+                            use_actions_mask: Optional[bool] = False,
+                            use_global_state: Optional[bool] = False):
+        """
+        Prepare the training data, with the mean actions of the neighbors of the agents.
+
+        Parameters:
+            sample (dict): The raw sampled data.
+            use_parameter_sharing (bool): Whether to use parameter sharing for individual agent models.
+            use_actions_mask (bool): Whether to use actions mask for unavailable actions.
+            use_global_state (bool): Whether to use global state.
+
+        Returns:
+            sample_Tensor (dict): The formatted sampled data.
+        """
+        sample_Tensor = super(MFAC_Learner, self).build_training_data(sample, use_parameter_sharing,
+                                                                      use_actions_mask, use_global_state)
+        act_mean = torch.stack([self._float_tensor(sample['act_mean'][k]) for k in self.agent_keys], dim=1)
+        sample_Tensor['act_mean'] = self.policy.mean_field.split(act_mean)
+        return sample_Tensor
 
     def update(self, sample):
-        info = {}
         self.iterations += 1
-        state = torch.Tensor(sample['state']).to(self.device)
-        obs = torch.Tensor(sample['obs']).to(self.device)
-        actions = torch.Tensor(sample['actions']).to(self.device)
-        act_mean = torch.Tensor(sample['act_mean']).to(self.device)
-        returns = torch.Tensor(sample['returns']).to(self.device)
-        agent_mask = torch.Tensor(sample['agent_mask']).float().reshape(-1, self.n_agents, 1).to(self.device)
-        batch_size = obs.shape[0]
-        IDs = torch.eye(self.n_agents).unsqueeze(0).expand(batch_size, -1, -1).to(self.device)
-
-        act_mean_n = act_mean.unsqueeze(1).repeat([1, self.n_agents, 1])
-
-        # actor loss
-        _, pi_dist = self.policy(obs, IDs)
-        log_pi = pi_dist.log_prob(actions).unsqueeze(-1)
-        entropy = pi_dist.entropy().unsqueeze(-1)
-
-        targets = returns
-        value_pred = self.policy.critic(obs, act_mean_n, IDs)
-        advantages = targets - value_pred
-        td_error = value_pred - targets.detach()
-
-        pg_loss = -((advantages.detach() * log_pi) * agent_mask).sum() / agent_mask.sum()
-        vf_loss = ((td_error ** 2) * agent_mask).sum() / agent_mask.sum()
-        entropy_loss = (entropy * agent_mask).sum() / agent_mask.sum()
-        loss = pg_loss + self.vf_coef * vf_loss - self.ent_coef * entropy_loss
+        info = {}
+
+        # prepare training data
+        sample_Tensor = self.build_training_data(sample=sample,
+                                                 use_parameter_sharing=self.use_parameter_sharing,
+                                                 use_actions_mask=self.use_actions_mask)
+        batch_size = sample_Tensor['batch_size']
+        obs = sample_Tensor['obs']
+        actions = sample_Tensor['actions']
+        agent_mask = sample_Tensor['agent_mask']
+        avail_actions = sample_Tensor['avail_actions']
+        values = sample_Tensor['values']
+        returns = sample_Tensor['returns']
+        advantages = sample_Tensor['advantages']
+        IDs = sample_Tensor['agent_ids']
+        act_mean = sample_Tensor['act_mean']
+
+        bs = batch_size * self.n_agents if self.use_parameter_sharing else batch_size
+
+        # feedforward
+        _, pi_dist_dict = self.policy(observation=obs, agent_ids=IDs, avail_actions=avail_actions)
+        _, values_pred_dict = self.policy.get_values(observation=obs, actions_mean=act_mean, agent_ids=IDs)
+
+        loss_a, loss_e, loss_c = [], [], []
+        for key in self.model_keys:
+            mask_values = agent_mask[key]
+            # policy gradient loss
+            log_pi = pi_dist_dict[key].log_prob(actions[key])
+            pg_loss = -((advantages[key].detach() * log_pi) * mask_values).sum() / self.mask_sum(mask_values, key)
+            loss_a.append(pg_loss)
+
+            # entropy loss
+            entropy = pi_dist_dict[key].entropy()
+            entropy_loss = (entropy * mask_values).sum() / self.mask_sum(mask_values, key)
+            loss_e.append(entropy_loss)
+
+            # value loss
+            value_pred_i = values_pred_dict[key].reshape(bs)
+            value_target = returns[key].reshape(bs)
+            values_i = values[key].reshape(bs)
+            if self.use_value_clip:
+                value_clipped = values_i + (value_pred_i - values_i).clamp(-self.value_clip_range,
+                                                                           self.value_clip_range)
+                if self.use_value_norm:
+                    self.update_value_normalizer(key, value_target.reshape(bs, 1))
+                    value_target = self.value_normalizer[key].normalize(value_target.reshape(bs, 1)).reshape(bs)
+                if self.use_huber_loss:
+                    loss_v = self.huber_loss(value_pred_i, value_target)
+                    loss_v_clipped = self.huber_loss(value_clipped, value_target)
+                else:
+                    loss_v = (value_pred_i - value_target) ** 2
+                    loss_v_clipped = (value_clipped - value_target) ** 2
+                loss_c_ = torch.max(loss_v, loss_v_clipped) * mask_values
+                loss_c.append(loss_c_.sum() / self.mask_sum(mask_values, key))
+            else:
+                if self.use_value_norm:
+                    self.update_value_normalizer(key, value_target)
+                    value_target = self.value_normalizer[key].normalize(value_target)
+                if self.use_huber_loss:
+                    loss_v = self.huber_loss(value_pred_i, value_target) * mask_values
+                else:
+                    loss_v = ((value_pred_i - value_target) ** 2) * mask_values
+                loss_c.append(loss_v.sum() / self.mask_sum(mask_values, key))
+
+            info.update({
+                f"predict_value/{key}": value_pred_i.mean().detach()
+            })
 
+        # Total loss
+        loss = sum(loss_a) + self.vf_coef * sum(loss_c) - self.ent_coef * sum(loss_e)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
-            grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-            info["gradient_norm"] = grad_norm.item()
-        self.optimizer.step()
-        if self.scheduler is not None:
+            self.scaler.unscale_(self.optimizer)
+            grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
+            info["gradient_norm"] = grad_norm.detach()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
-        info = {
+        info.update({
             "learning_rate": lr,
-            "pg_loss": pg_loss.item(),
-            "vf_loss": vf_loss.item(),
-            "entropy_loss": entropy_loss.item(),
-            "loss": loss.item(),
-            "predicted_value": value_pred.mean().item()
-        }
+            "pg_loss": sum(loss_a).detach(),
+            "vf_loss": sum(loss_c).detach(),
+            "entropy_loss": sum(loss_e).detach(),
+            "loss": loss.detach(),
+        })
 
         return info
@@ -6,73 +6,83 @@ Implementation: Pytorch
 """
 import torch
 from torch import nn
-from xuance.torch.learners import LearnerMAS
-from xuance.common import Optional, Union
+from xuance.torch.learners.multi_agent_rl.iql_learner import IQL_Learner
+from xuance.common import List
 from argparse import Namespace
 
 
-class MFQ_Learner(LearnerMAS):
+class MFQ_Learner(IQL_Learner):
     def __init__(self,
                  config: Namespace,
-                 policy: nn.Module,
-                 optimizer: torch.optim.Optimizer,
-                 scheduler: Optional[torch.optim.lr_scheduler._LRScheduler] = None,
-                 device: Optional[Union[int, str, torch.device]] = None,
-                 model_dir: str = "./",
-                 gamma: float = 0.99,
-                 sync_frequency: int = 100
-                 ):
-        self.gamma = gamma
+                 model_keys: List[str],
+                 agent_keys: List[str],
+                 policy: nn.Module):
+        super(MFQ_Learner, self).__init__(config, model_keys, agent_keys, policy)
         self.temperature = config.temperature
-        self.sync_frequency = sync_frequency
-        self.mse_loss = nn.MSELoss()
-        self.softmax = torch.nn.Softmax(dim=-1)
-        super(MFQ_Learner, self).__init__(config, policy, optimizer, scheduler, device, model_dir)
-
-    def get_boltzmann_policy(self, q):
-        return self.softmax(q / self.temperature)
 
     def update(self, sample):
         self.iterations += 1
-        obs = torch.Tensor(sample['obs']).to(self.device)
-        actions = torch.Tensor(sample['actions']).to(self.device)
-        obs_next = torch.Tensor(sample['obs_next']).to(self.device)
-        act_mean = torch.Tensor(sample['act_mean']).to(self.device)
-        act_mean_next = torch.Tensor(sample['act_mean_next']).to(self.device)
-        rewards = torch.Tensor(sample['rewards']).to(self.device)
-        terminals = torch.Tensor(sample['terminals']).float().reshape(-1, self.n_agents, 1).to(self.device)
-        agent_mask = torch.Tensor(sample['agent_mask']).float().reshape(-1, self.n_agents, 1).to(self.device)
-        IDs = torch.eye(self.n_agents).unsqueeze(0).expand(self.args.batch_size, -1, -1).to(self.device)
+        info = {}
 
-        act_mean = act_mean.unsqueeze(1).repeat([1, self.n_agents, 1])
-        act_mean_next = act_mean_next.unsqueeze(1).repeat([1, self.n_agents, 1])
-        _, _, q_eval = self.policy(obs, act_mean, IDs)
-        q_eval_a = q_eval.gather(-1, actions.long().reshape([self.args.batch_size, self.n_agents, 1]))
-        q_next = self.policy.target_Q(obs_next, act_mean_next, IDs)
-        shape = q_next.shape
-        pi = self.get_boltzmann_policy(q_next)
-        v_mf = torch.bmm(q_next.reshape(-1, 1, shape[-1]), pi.unsqueeze(-1).reshape(-1, shape[-1], 1))
-        v_mf = v_mf.reshape(*(list(shape[0:-1]) + [1]))
-        q_target = rewards + (1 - terminals) * self.args.gamma * v_mf
+        # prepare training data
+        sample_Tensor = self.build_training_data(sample=sample,
+                                                 use_parameter_sharing=self.use_parameter_sharing,
+                                                 use_actions_mask=self.use_actions_mask)
+        batch_size = sample_Tensor['batch_size']
+        obs = sample_Tensor['obs']
+        actions = sample_Tensor['actions']
+        obs_next = sample_Tensor['obs_next']
+        rewards = sample_Tensor['rewards']
+        terminals = sample_Tensor['terminals']
+        agent_mask = sample_Tensor['agent_mask']
+        avail_actions = sample_Tensor['avail_actions']
+        avail_actions_next = sample_Tensor['avail_actions_next']
+        IDs = sample_Tensor['agent_ids']
+        if self.use_parameter_sharing:
+            key = self.model_keys[0]
+            bs = batch_size * self.n_agents
+            rewards[key] = rewards[key].reshape(batch_size * self.n_agents)
+            terminals[key] = terminals[key].reshape(batch_size * self.n_agents)
+        else:
+            bs = batch_size
 
-        # calculate the loss function
-        td_error = (q_eval_a - q_target.detach()) * agent_mask
-        loss = (td_error ** 2).sum() / agent_mask.sum()
-        self.optimizer.zero_grad()
-        loss.backward()
-        self.optimizer.step()
-        if self.scheduler is not None:
-            self.scheduler.step()
+        act_mean = self.policy.mean_field.split(torch.stack([self._float_tensor(sample['act_mean'][k])
+                                                             for k in self.agent_keys], dim=1))
+        act_mean_next = self.policy.mean_field.split(torch.stack([self._float_tensor(sample['act_mean_next'][k])
+                                                                  for k in self.agent_keys], dim=1))
 
-        if self.iterations % self.sync_frequency == 0:
-            self.policy.copy_target()
+        _, _, q_eval = self.policy(observation=obs, actions_mean=act_mean, agent_ids=IDs,
+                                   avail_actions=avail_actions)
+        _, q_next = self.policy.Qtarget(observation=obs_next, actions_mean=act_mean_next, agent_ids=IDs)
+
+        for key in self.model_keys:
+            q_eval_a = q_eval[key].gather(-1, actions[key].long().unsqueeze(-1)).reshape(bs)
 
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+            avail_next = avail_actions_next[key] if self.use_actions_mask else None
+            pi_next = self.policy.boltzmann_policy(q_next[key], self.temperature, avail_next)
+            v_mf = (pi_next * q_next[key]).sum(dim=-1).reshape(bs)
 
-        info = {
-            "learning_rate": lr,
-            "loss_Q": loss.item(),
-            "predictQ": q_eval_a.mean().item()
-        }
+            q_target = rewards[key] + (1 - terminals[key]) * self.gamma * v_mf
 
+            # calculate the loss function
+            td_error = (q_eval_a - q_target.detach()) * agent_mask[key]
+            loss = (td_error ** 2).sum() / agent_mask[key].sum()
+            self.optimizer[key].zero_grad()
+            self.scaler.scale(loss).backward()
+            if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer[key])
+                torch.nn.utils.clip_grad_norm_(self.policy.parameters_model[key], self.grad_clip_norm)
+            self.scaler.step(self.optimizer[key])
+            if self.scheduler[key] is not None:
+                self.scheduler[key].step()
+
+            info.update({
+                f"{key}/learning_rate": self.optimizer[key].param_groups[0]['lr'],
+                f"{key}/loss_Q": loss.detach(),
+                f"{key}/predictQ": q_eval_a.mean().detach()
+            })
+
+        if self.iterations % self.sync_frequency == 0:
+            self.policy.copy_target()
+        self.scaler.update()
         return info
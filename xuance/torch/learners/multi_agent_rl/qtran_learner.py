@@ -13,6 +13,8 @@ from operator import itemgetter
 
 
 class QTRAN_Learner(LearnerMAS):
+    supports_gradient_accumulation = True
+
     def __init__(self,
                  config: Namespace,
                  model_keys: List[str],
@@ -85,9 +87,12 @@ class QTRAN_Learner(LearnerMAS):
             q_eval_greedy_a[key] *= agent_mask[key]
             q_next_a[key] *= agent_mask[key]
 
+        # the state layers of the QTRAN network are shared between the TD loss and the Opt loss.
+        state_features = self.policy.Q_tran_state_features(state)
         if self.config.agent == "QTRAN_base":
             # -- TD Loss --
-            q_joint, v_joint = self.policy.Q_tran(state, hidden_state, actions, agent_mask)
+            q_joint, v_joint = self.policy.Q_tran(state, hidden_state, actions, agent_mask,
+                                              state_features=state_features)
             q_joint_next, _ = self.policy.Q_tran_target(state_next, hidden_state_next, actions_next_greedy, agent_mask)
 
             y_dqn = rewards_tot + (1 - terminals_tot) * self.gamma * q_joint_next
@@ -96,7 +101,8 @@ class QTRAN_Learner(LearnerMAS):
             # -- Opt Loss --
             # Argmax across the current agents' actions
             q_tot_greedy = self.policy.Q_tot(q_eval_greedy_a)
-            q_joint_greedy_hat, _ = self.policy.Q_tran(state, hidden_state, actions_greedy, agent_mask)
+            q_joint_greedy_hat, _ = self.policy.Q_tran(state, hidden_state, actions_greedy, agent_mask,
+                                                   state_features=state_features)
             error_opt = q_tot_greedy - q_joint_greedy_hat.detach() + v_joint
             loss_opt = torch.mean(error_opt ** 2)  # Opt loss
 
@@ -107,11 +113,12 @@ class QTRAN_Learner(LearnerMAS):
             error_nopt = error_nopt.clamp(max=0)
             loss_nopt = torch.mean(error_nopt ** 2)  # NOPT loss
 
-            info["Q_joint"] = q_joint.mean().item()
+            info["Q_joint"] = q_joint.mean().detach()
 
         elif self.config.agent == "QTRAN_alt":
             # -- TD Loss -- (Computed for all agents)
-            q_count, v_joint = self.policy.Q_tran(state, hidden_state, actions, agent_mask)
+            q_count, v_joint = self.policy.Q_tran(state, hidden_state, actions, agent_mask,
+                                              state_features=state_features)
             actions_choosen = itemgetter(*self.model_keys)(actions)
             actions_choosen = actions_choosen.reshape(-1, self.n_agents, 1)
             q_joint_choosen = q_count.gather(-1, actions_choosen.long()).reshape(-1, self.n_agents)
@@ -125,7 +132,8 @@ class QTRAN_Learner(LearnerMAS):
 
             # -- Opt Loss -- (Computed for all agents)
             q_tot_greedy = self.policy.Q_tot(q_eval_greedy_a)
-            q_joint_greedy_hat, _ = self.policy.Q_tran(state, hidden_state, actions_greedy, agent_mask)
+            q_joint_greedy_hat, _ = self.policy.Q_tran(state, hidden_state, actions_greedy, agent_mask,
+                                                   state_features=state_features)
             actions_greedy_current = itemgetter(*self.model_keys)(actions_greedy)
             actions_greedy_current = actions_greedy_current.reshape(-1, self.n_agents, 1)
             q_joint_greedy_hat_all = q_joint_greedy_hat.gather(
@@ -146,7 +154,7 @@ class QTRAN_Learner(LearnerMAS):
             error_nopt_min = torch.min(error_nopt, dim=-1).values
             loss_nopt = torch.mean(error_nopt_min ** 2)  # NOPT loss
 
-            info["Q_joint"] = q_joint_choosen.mean().item()
+            info["Q_joint"] = q_joint_choosen.mean().detach()
 
         else:
             raise ValueError("Mixer {} not recognised.".format(self.config.agent))
@@ -154,21 +162,22 @@ class QTRAN_Learner(LearnerMAS):
         # calculate the loss function
         loss = loss_td + self.config.lambda_opt * loss_opt + self.config.lambda_nopt * loss_nopt
         self.optimizer.zero_grad()
-        loss.backward()
-        self.optimizer.step()
-        if self.scheduler is not None:
+        self.scaler.scale(loss).backward()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         if self.iterations % self.sync_frequency == 0:
             self.policy.copy_target()
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "loss_td": loss_td.item(),
-            "loss_opt": loss_opt.item(),
-            "loss_nopt": loss_nopt.item(),
-            "loss": loss.item()
+            "loss_td": loss_td.detach(),
+            "loss_opt": loss_opt.detach(),
+            "loss_nopt": loss_nopt.detach(),
+            "loss": loss.detach()
         })
 
         return info
@@ -237,34 +246,39 @@ class QTRAN_Learner(LearnerMAS):
             q_eval_greedy_a[key] *= agent_mask[key]
             q_next_a[key] *= agent_mask[key]
 
+        # the state layers of the QTRAN network are shared between the TD loss and the Opt loss.
+        state_features = self.policy.Q_tran_state_features(state[:, :-1])
         if self.config.agent == "QTRAN_base":
             # -- TD Loss --
-            q_joint, v_joint = self.policy.Q_tran(state[:, :-1], hidden_state, actions, agent_mask)
+            q_joint, v_joint = self.policy.Q_tran(state[:, :-1], hidden_state, actions, agent_mask,
+                                              state_features=state_features)
             q_joint_next, _ = self.policy.Q_tran_target(state[:, 1:], hidden_state_next,
                                                         actions_next_greedy, agent_mask)
             y_dqn = rewards_tot + (1 - terminals_tot) * self.gamma * q_joint_next
             td_error = (q_joint - y_dqn.detach()) * filled
-            loss_td = (td_error ** 2).sum() / filled.sum()  # TD loss
+            loss_td = (td_error ** 2).sum() / self.mask_sum(filled)  # TD loss
 
             # -- Opt Loss --
             # Argmax across the current agents' actions
             q_tot_greedy = self.policy.Q_tot(q_eval_greedy_a)
-            q_joint_greedy_hat, _ = self.policy.Q_tran(state[:, :-1], hidden_state, actions_greedy_eval, agent_mask)
+            q_joint_greedy_hat, _ = self.policy.Q_tran(state[:, :-1], hidden_state, actions_greedy_eval, agent_mask,
+                                                   state_features=state_features)
             error_opt = (q_tot_greedy - q_joint_greedy_hat.detach() + v_joint) * filled
-            loss_opt = (error_opt ** 2).sum() / filled.sum()  # Opt loss
+            loss_opt = (error_opt ** 2).sum() / self.mask_sum(filled)  # Opt loss
 
             # -- Nopt Loss --
             q_tot = self.policy.Q_tot(q_eval_a)
             q_joint_hat = q_joint
             error_nopt = q_tot - q_joint_hat.detach() + v_joint
             error_nopt = error_nopt.clamp(max=0) * filled
-            loss_nopt = (error_nopt ** 2).sum() / filled.sum()  # NOPT loss
+            loss_nopt = (error_nopt ** 2).sum() / self.mask_sum(filled)  # NOPT loss
 
-            info["Q_joint"] = q_joint.mean().item()
+            info["Q_joint"] = q_joint.mean().detach()
 
         elif self.config.agent == "QTRAN_alt":
             # -- TD Loss -- (Computed for all agents)
-            q_count, v_joint = self.policy.Q_tran(state[:, :-1], hidden_state, actions, agent_mask)
+            q_count, v_joint = self.policy.Q_tran(state[:, :-1], hidden_state, actions, agent_mask,
+                                              state_features=state_features)
             actions_choosen = itemgetter(*self.model_keys)(actions)
             actions_choosen = actions_choosen.reshape(-1, self.n_agents, 1)
             q_joint_choosen = q_count.gather(-1, actions_choosen.long()).reshape(-1, self.n_agents)
@@ -275,17 +289,18 @@ class QTRAN_Learner(LearnerMAS):
 
             y_dqn = rewards_tot + (1 - terminals_tot) * self.gamma * q_joint_next_choosen
             td_errors = (q_joint_choosen - y_dqn.detach()) * filled_n
-            loss_td = (td_errors ** 2).sum() / filled_n.sum()  # TD loss
+            loss_td = (td_errors ** 2).sum() / self.mask_sum(filled_n)  # TD loss
 
             # -- Opt Loss -- (Computed for all agents)
             q_tot_greedy = self.policy.Q_tot(q_eval_greedy_a)
-            q_joint_greedy_hat, _ = self.policy.Q_tran(state[:, :-1], hidden_state, actions_greedy_eval, agent_mask)
+            q_joint_greedy_hat, _ = self.policy.Q_tran(state[:, :-1], hidden_state, actions_greedy_eval, agent_mask,
+                                                   state_features=state_features)
             actions_greedy_current = itemgetter(*self.model_keys)(actions_greedy_eval)
             actions_greedy_current = actions_greedy_current.reshape(-1, self.n_agents, 1)
             q_joint_greedy_hat_all = q_joint_greedy_hat.gather(
                 -1, actions_greedy_current.long()).reshape(-1, self.n_agents)
             error_opt = (q_tot_greedy - q_joint_greedy_hat_all.detach() + v_joint) * filled_n
-            loss_opt = (error_opt ** 2).sum() / filled_n.sum()  # Opt loss
+            loss_opt = (error_opt ** 2).sum() / self.mask_sum(filled_n)  # Opt loss
 
             # -- Nopt Loss --
             q_eval_count = itemgetter(*self.model_keys)(q_eval)[:, :-1].reshape(batch_size, self.n_agents, seq_len, -1)
@@ -300,9 +315,9 @@ class QTRAN_Learner(LearnerMAS):
             v_joint_repeated = v_joint.repeat(1, self.n_agents).view(-1, 1)
             error_nopt = q_eval_count + q_sum_mask.view(-1, 1) - q_count_for_nopt.detach() + v_joint_repeated
             error_nopt_min = torch.min(error_nopt, dim=-1).values * filled_n.reshape(-1)
-            loss_nopt = (error_nopt_min ** 2).sum() / filled_n.sum()  # NOPT loss
+            loss_nopt = (error_nopt_min ** 2).sum() / self.mask_sum(filled_n)  # NOPT loss
 
-            info["Q_joint"] = q_joint_choosen.mean().item()
+            info["Q_joint"] = q_joint_choosen.mean().detach()
 
         else:
             raise ValueError("Mixer {} not recognised.".format(self.config.agent))
@@ -310,21 +325,22 @@ class QTRAN_Learner(LearnerMAS):
         # calculate the loss function
         loss = loss_td + self.config.lambda_opt * loss_opt + self.config.lambda_nopt * loss_nopt
         self.optimizer.zero_grad()
-        loss.backward()
-        self.optimizer.step()
-        if self.scheduler is not None:
+        self.scaler.scale(loss).backward()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         if self.iterations % self.sync_frequency == 0:
             self.policy.copy_target()
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "loss_td": loss_td.item(),
-            "loss_opt": loss_opt.item(),
-            "loss_nopt": loss_nopt.item(),
-            "loss": loss.item()
+            "loss_td": loss_td.detach(),
+            "loss_opt": loss_opt.detach(),
+            "loss_nopt": loss_nopt.detach(),
+            "loss": loss.detach()
         })
 
         return info
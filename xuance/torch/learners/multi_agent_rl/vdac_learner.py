@@ -65,12 +65,12 @@ class VDAC_Learner(IAC_Learner):
             mask_values = agent_mask[key]
             # policy gradient loss
             log_pi = pi_dist_dict[key].log_prob(actions[key])
-            pg_loss = -((advantages[key].detach() * log_pi) * mask_values).sum() / mask_values.sum()
+            pg_loss = -((advantages[key].detach() * log_pi) * mask_values).sum() / self.mask_sum(mask_values, key)
             loss_a.append(pg_loss)
 
             # entropy loss
             entropy = pi_dist_dict[key].entropy()
-            entropy_loss = (entropy * mask_values).sum() / mask_values.sum()
+            entropy_loss = (entropy * mask_values).sum() / self.mask_sum(mask_values, key)
             loss_e.append(entropy_loss)
 
             # value loss
@@ -81,7 +81,7 @@ class VDAC_Learner(IAC_Learner):
                 value_clipped = values_i + (value_pred_i - values_i).clamp(-self.value_clip_range,
                                                                            self.value_clip_range)
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target.reshape(bs, 1))
+                    self.update_value_normalizer(key, value_target.reshape(bs, 1))
                     value_target = self.value_normalizer[key].normalize(value_target.reshape(bs, 1)).reshape(bs)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target)
@@ -90,38 +90,40 @@ class VDAC_Learner(IAC_Learner):
                     loss_v = (value_pred_i - value_target) ** 2
                     loss_v_clipped = (value_clipped - value_target) ** 2
                 loss_c_ = torch.max(loss_v, loss_v_clipped) * mask_values
-                loss_c.append(loss_c_.sum() / mask_values.sum())
+                loss_c.append(loss_c_.sum() / self.mask_sum(mask_values, key))
             else:
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target)
+                    self.update_value_normalizer(key, value_target)
                     value_target = self.value_normalizer[key].normalize(value_target)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target) * mask_values
                 else:
                     loss_v = ((value_pred_i - value_target) ** 2) * mask_values
-                loss_c.append(loss_v.sum() / mask_values.sum())
+                loss_c.append(loss_v.sum() / self.mask_sum(mask_values, key))
 
         # Total loss
         loss = sum(loss_a) + self.vf_coef * sum(loss_c) - self.ent_coef * sum(loss_e)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-            info["gradient_norm"] = grad_norm.item()
-        self.optimizer.step()
-        if self.scheduler is not None:
+            info["gradient_norm"] = grad_norm.detach()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "pg_loss": sum(loss_a).item(),
-            "vf_loss": sum(loss_c).item(),
-            "entropy_loss": sum(loss_e).item(),
-            "loss": loss.item(),
-            "predict_value": values_tot.mean().item()
+            "pg_loss": sum(loss_a).detach(),
+            "vf_loss": sum(loss_c).detach(),
+            "entropy_loss": sum(loss_e).detach(),
+            "loss": loss.detach(),
+            "predict_value": values_tot.mean().detach()
         })
 
         return info
@@ -184,12 +186,12 @@ class VDAC_Learner(IAC_Learner):
             mask_values = agent_mask[key] * filled
             # policy gradient loss
             log_pi = pi_dist_dict[key].log_prob(actions[key]).reshape(bs_rnn, seq_len)
-            pg_loss = -((advantages[key].detach() * log_pi) * mask_values).sum() / mask_values.sum()
+            pg_loss = -((advantages[key].detach() * log_pi) * mask_values).sum() / self.mask_sum(mask_values, key)
             loss_a.append(pg_loss)
 
             # entropy loss
             entropy = pi_dist_dict[key].entropy()
-            entropy_loss = (entropy * mask_values).sum() / mask_values.sum()
+            entropy_loss = (entropy * mask_values).sum() / self.mask_sum(mask_values, key)
             loss_e.append(entropy_loss)
 
             # value loss
@@ -200,7 +202,7 @@ class VDAC_Learner(IAC_Learner):
                 value_clipped = values_i + (value_pred_i - values_i).clamp(-self.value_clip_range,
                                                                            self.value_clip_range)
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target.reshape(-1, 1))
+                    self.update_value_normalizer(key, value_target.reshape(-1, 1))
                     value_target = self.value_normalizer[key].normalize(value_target.reshape(-1, 1))
                     value_target = value_target.reshape(bs_rnn, seq_len)
                 if self.use_huber_loss:
@@ -210,37 +212,39 @@ class VDAC_Learner(IAC_Learner):
                     loss_v = (value_pred_i - value_target) ** 2
                     loss_v_clipped = (value_clipped - value_target) ** 2
                 loss_c_ = torch.max(loss_v, loss_v_clipped) * mask_values
-                loss_c.append(loss_c_.sum() / mask_values.sum())
+                loss_c.append(loss_c_.sum() / self.mask_sum(mask_values, key))
             else:
                 if self.use_value_norm:
-                    self.value_normalizer[key].update(value_target)
+                    self.update_value_normalizer(key, value_target)
                     value_target = self.value_normalizer[key].normalize(value_target)
                 if self.use_huber_loss:
                     loss_v = self.huber_loss(value_pred_i, value_target)
                 else:
                     loss_v = (value_pred_i - value_target) ** 2
-                loss_c.append((loss_v * mask_values).sum() / mask_values.sum())
+                loss_c.append((loss_v * mask_values).sum() / self.mask_sum(mask_values, key))
 
         loss = sum(loss_a) + self.vf_coef * sum(loss_c) - self.ent_coef * sum(loss_e)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             grad_norm = torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-            info["gradient_norm"] = grad_norm.item()
-        self.optimizer.step()
-        if self.scheduler is not None:
+            info["gradient_norm"] = grad_norm.detach()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "pg_loss": sum(loss_a).item(),
-            "vf_loss": sum(loss_c).item(),
-            "entropy_loss": sum(loss_e).item(),
-            "loss": loss.item(),
-            "predict_value": values_tot.mean().item()
+            "pg_loss": sum(loss_a).detach(),
+            "vf_loss": sum(loss_c).detach(),
+            "entropy_loss": sum(loss_e).detach(),
+            "loss": loss.detach(),
+            "predict_value": values_tot.mean().detach()
         })
 
         return info
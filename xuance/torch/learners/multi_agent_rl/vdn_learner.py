@@ -12,6 +12,8 @@ from operator import itemgetter
 
 
 class VDN_Learner(LearnerMAS):
+    supports_gradient_accumulation = True
+
     def __init__(self,
                  config: Namespace,
                  model_keys: List[str],
@@ -51,6 +53,11 @@ class VDN_Learner(LearnerMAS):
             bs = batch_size * self.n_agents
             rewards_tot = rewards[key].mean(dim=1).reshape(batch_size, 1)
             terminals_tot = terminals[key].all(dim=1, keepdim=False).float().reshape(batch_size, 1)
+            if self.use_packed_agents:
+                alive_index = self.alive_index(agent_mask[key])
+                obs, actions, obs_next, agent_mask, avail_actions, avail_actions_next, IDs = self.pack_agents(
+                    alive_index, obs, actions, obs_next, agent_mask, avail_actions, avail_actions_next, IDs)
+                bs = len(alive_index)
         else:
             bs = batch_size
             rewards_tot = torch.stack(itemgetter(*self.agent_keys)(rewards), dim=1).mean(dim=-1, keepdim=True)
@@ -76,6 +83,10 @@ class VDN_Learner(LearnerMAS):
             q_eval_a[key] *= agent_mask[key]
             q_next_a[key] *= agent_mask[key]
 
+            if self.use_packed_agents:  # the dead agents have zero values in the mixer, as the masked values above.
+                q_eval_a[key] = self.unpack_agents(q_eval_a[key], alive_index, batch_size * self.n_agents)
+                q_next_a[key] = self.unpack_agents(q_next_a[key], alive_index, batch_size * self.n_agents)
+
         q_tot_eval = self.policy.Q_tot(q_eval_a)
         q_tot_next = self.policy.Qtarget_tot(q_next_a)
         q_tot_target = rewards_tot + (1 - terminals_tot) * self.gamma * q_tot_next
@@ -83,19 +94,21 @@ class VDN_Learner(LearnerMAS):
         # calculate the loss function
         loss = self.mse_loss(q_tot_eval, q_tot_target.detach())
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-        self.optimizer.step()
-        if self.scheduler is not None:
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "loss_Q": loss.item(),
-            "predictQ": q_tot_eval.mean().item()
+            "loss_Q": loss.detach(),
+            "predictQ": q_tot_eval.mean().detach()
         })
 
         if self.iterations % self.sync_frequency == 0:
@@ -169,21 +182,23 @@ class VDN_Learner(LearnerMAS):
 
         # calculate the loss function
         td_errors = (q_tot_eval - q_tot_target.detach()) * filled
-        loss = (td_errors ** 2).sum() / filled.sum()
+        loss = (td_errors ** 2).sum() / self.mask_sum(filled)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters_model, self.grad_clip_norm)
-        self.optimizer.step()
-        if self.scheduler is not None:
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "loss_Q": loss.item(),
-            "predictQ": q_tot_eval.mean().item()
+            "loss_Q": loss.detach(),
+            "predictQ": q_tot_eval.mean().detach()
         })
 
         if self.iterations % self.sync_frequency == 0:
@@ -12,6 +12,8 @@ from operator import itemgetter
 
 
 class WQMIX_Learner(LearnerMAS):
+    supports_gradient_accumulation = True
+
     def __init__(self,
                  config: Namespace,
                  model_keys: List[str],
@@ -86,9 +88,9 @@ class WQMIX_Learner(LearnerMAS):
             q_eval_centralized_a[key] *= agent_mask[key]
             q_eval_next_centralized_a[key] *= agent_mask[key]
 
-        q_tot_eval = self.policy.Q_tot(q_eval_a, state)  # calculate Q_tot
-        q_tot_centralized = self.policy.q_feedforward(q_eval_centralized_a, state)  # calculate centralized Q
-        q_tot_next_centralized = self.policy.target_q_feedforward(q_eval_next_centralized_a, state_next)  # y_i
+        # calculate Q_tot, the centralized Q and y_i
+        q_tot_eval, q_tot_centralized, q_tot_next_centralized = self.policy.Q_tot_weighted(
+            q_eval_a, q_eval_centralized_a, q_eval_next_centralized_a, state, state_next)
 
         target_value = rewards_tot + (1 - terminals_tot) * self.gamma * q_tot_next_centralized
         td_error = q_tot_eval - target_value.detach()
@@ -112,23 +114,25 @@ class WQMIX_Learner(LearnerMAS):
         loss_qmix = (w.detach() * (td_error ** 2)).mean()
         loss = loss_qmix + loss_central
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-        self.optimizer.step()
-        if self.scheduler is not None:
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         if self.iterations % self.sync_frequency == 0:
             self.policy.copy_target()
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "loss_Qmix": loss_qmix.item(),
-            "loss_central": loss_central.item(),
-            "loss": loss.item(),
-            "predictQ": q_tot_eval.mean().item()
+            "loss_Qmix": loss_qmix.detach(),
+            "loss_central": loss_central.detach(),
+            "loss": loss.detach(),
+            "predictQ": q_tot_eval.mean().detach()
         })
 
         return info
@@ -207,9 +211,9 @@ class WQMIX_Learner(LearnerMAS):
 
         state_input = state[:, :-1].reshape([batch_size * seq_len, -1])
         state_input_next = state[:, 1:].reshape([batch_size * seq_len, -1])
-        q_tot_eval = self.policy.Q_tot(q_eval_a, state_input)  # calculate Q_tot
-        q_tot_centralized = self.policy.q_feedforward(q_eval_centralized_a, state_input)  # calculate centralized Q
-        q_tot_next_centralized = self.policy.target_q_feedforward(q_eval_next_centralized_a, state_input_next)  # y_i
+        # calculate Q_tot, the centralized Q and y_i
+        q_tot_eval, q_tot_centralized, q_tot_next_centralized = self.policy.Q_tot_weighted(
+            q_eval_a, q_eval_centralized_a, q_eval_next_centralized_a, state_input, state_input_next)
 
         target_value = rewards_tot + (1 - terminals_tot) * self.gamma * q_tot_next_centralized
         td_error = q_tot_eval - target_value.detach()
@@ -229,27 +233,29 @@ class WQMIX_Learner(LearnerMAS):
             raise AttributeError(f"The agent named is {self.config.agent} is currently not supported.")
 
         # calculate losses and train
-        loss_central = (((q_tot_centralized - target_value.detach()) ** 2) * filled).sum() / filled.sum()
-        loss_qmix = (w.detach() * (td_error ** 2) * filled).sum() / filled.sum()
+        loss_central = (((q_tot_centralized - target_value.detach()) ** 2) * filled).sum() / self.mask_sum(filled)
+        loss_qmix = (w.detach() * (td_error ** 2) * filled).sum() / self.mask_sum(filled)
         loss = loss_qmix + loss_central
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-        self.optimizer.step()
-        if self.scheduler is not None:
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         if self.iterations % self.sync_frequency == 0:
             self.policy.copy_target()
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         info.update({
             "learning_rate": lr,
-            "loss_Qmix": loss_qmix.item(),
-            "loss_central": loss_central.item(),
-            "loss": loss.item(),
-            "predictQ": q_tot_eval.mean().item()
+            "loss_Qmix": loss_qmix.detach(),
+            "loss_central": loss_central.detach(),
+            "loss": loss.detach(),
+            "predictQ": q_tot_eval.mean().detach()
         })
 
         return info
@@ -1,13 +1,20 @@
-from .pg_learner import PG_Learner
-from .ppg_learner import PPG_Learner
-from .a2c_learner import A2C_Learner
-from .ppokl_learner import PPOKL_Learner
-from .ppoclip_learner import PPOCLIP_Learner
-from .pdqn_learner import PDQN_Learner
-from .spdqn_learner import SPDQN_Learner
-from .mpdqn_learner import MPDQN_Learner
-from .ddpg_learner import DDPG_Learner
-from .sac_learner import SAC_Learner
-from .sacdis_learner import SACDIS_Learner
-from .td3_learner import TD3_Learner
-from .npg_learner import NPG_Learner
+from xuance.common.registry_tools import lazy_attributes
+
+# Maps each member to the module that defines it, the module is imported on first access.
+_members = {
+    "PG_Learner": ".pg_learner",
+    "PPG_Learner": ".ppg_learner",
+    "A2C_Learner": ".a2c_learner",
+    "PPOKL_Learner": ".ppokl_learner",
+    "PPOCLIP_Learner": ".ppoclip_learner",
+    "PDQN_Learner": ".pdqn_learner",
+    "SPDQN_Learner": ".spdqn_learner",
+    "MPDQN_Learner": ".mpdqn_learner",
+    "DDPG_Learner": ".ddpg_learner",
+    "SAC_Learner": ".sac_learner",
+    "SACDIS_Learner": ".sacdis_learner",
+    "TD3_Learner": ".td3_learner",
+    "NPG_Learner": ".npg_learner",
+}
+
+__getattr__ = lazy_attributes(__name__, _members)
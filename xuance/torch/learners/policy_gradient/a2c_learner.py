@@ -9,6 +9,8 @@ from xuance.torch.learners import Learner
 
 
 class A2C_Learner(Learner):
+    supports_gradient_accumulation = True
+
     def __init__(self,
                  config: Namespace,
                  policy: nn.Module):
@@ -38,31 +40,33 @@ class A2C_Learner(Learner):
 
         loss = a_loss - self.ent_coef * e_loss + self.vf_coef * c_loss
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-        self.optimizer.step()
-        if self.scheduler is not None:
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         if self.distributed_training:
             info = {
-                f"actor-loss/rank_{self.rank}": a_loss.item(),
-                f"critic-loss/rank_{self.rank}": c_loss.item(),
-                f"entropy/rank_{self.rank}": e_loss.item(),
+                f"actor-loss/rank_{self.rank}": a_loss.detach(),
+                f"critic-loss/rank_{self.rank}": c_loss.detach(),
+                f"entropy/rank_{self.rank}": e_loss.detach(),
                 f"learning_rate/rank_{self.rank}": lr,
-                f"predict_value/rank_{self.rank}": v_pred.mean().item()
+                f"predict_value/rank_{self.rank}": v_pred.mean().detach()
             }
         else:
             info = {
-                "actor-loss": a_loss.item(),
-                "critic-loss": c_loss.item(),
-                "entropy": e_loss.item(),
+                "actor-loss": a_loss.detach(),
+                "critic-loss": c_loss.detach(),
+                "entropy": e_loss.detach(),
                 "learning_rate": lr,
-                "predict_value": v_pred.mean().item()
+                "predict_value": v_pred.mean().detach()
             }
 
         return info
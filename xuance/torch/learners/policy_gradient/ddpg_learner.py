@@ -44,19 +44,21 @@ class DDPG_Learner(Learner):
         target_q = rew_batch + (1 - ter_batch) * self.gamma * next_q
         q_loss = self.mse_loss(action_q, target_q.detach())
         self.optimizer['critic'].zero_grad()
-        q_loss.backward()
+        self.scaler.scale(q_loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer['critic'])
             torch.nn.utils.clip_grad_norm_(self.policy.critic_parameters, self.grad_clip_norm)
-        self.optimizer['critic'].step()
+        self.scaler.step(self.optimizer['critic'])
 
         # actor update
         policy_q = self.policy.Qpolicy(obs_batch)
         p_loss = -policy_q.mean()
         self.optimizer['actor'].zero_grad()
-        p_loss.backward()
+        self.scaler.scale(p_loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer['actor'])
             torch.nn.utils.clip_grad_norm_(self.policy.actor_parameters, self.grad_clip_norm)
-        self.optimizer['actor'].step()
+        self.scaler.step(self.optimizer['actor'])
 
         if self.scheduler is not None:
             self.scheduler['actor'].step()
@@ -64,24 +66,25 @@ class DDPG_Learner(Learner):
 
         self.policy.soft_update(self.tau)
 
-        actor_lr = self.optimizer['actor'].state_dict()['param_groups'][0]['lr']
-        critic_lr = self.optimizer['critic'].state_dict()['param_groups'][0]['lr']
+        actor_lr = self.optimizer['actor'].param_groups[0]['lr']
+        critic_lr = self.optimizer['critic'].param_groups[0]['lr']
 
         if self.distributed_training:
             info = {
-                f"Qloss/rank_{self.rank}": q_loss.item(),
-                f"Ploss/rank_{self.rank}": p_loss.item(),
-                f"Qvalue/rank_{self.rank}": action_q.mean().item(),
+                f"Qloss/rank_{self.rank}": q_loss.detach(),
+                f"Ploss/rank_{self.rank}": p_loss.detach(),
+                f"Qvalue/rank_{self.rank}": action_q.mean().detach(),
                 f"actor_lr/rank_{self.rank}": actor_lr,
                 f"critic_lr/rank_{self.rank}": critic_lr
             }
         else:
             info = {
-                "Qloss": q_loss.item(),
-                "Ploss": p_loss.item(),
-                "Qvalue": action_q.mean().item(),
+                "Qloss": q_loss.detach(),
+                "Ploss": p_loss.detach(),
+                "Qvalue": action_q.mean().detach(),
                 "actor_lr": actor_lr,
                 "critic_lr": critic_lr
             }
 
+        self.scaler.update()
         return info
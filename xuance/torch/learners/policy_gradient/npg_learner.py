@@ -1,6 +1,8 @@
+import copy
 import torch
 from torch import nn
 from xuance.torch.learners import Learner
+from xuance.torch.utils import CategoricalDistribution, TrustRegionOptimizer
 from argparse import Namespace
 
 
@@ -10,12 +12,15 @@ class NPG_Learner(Learner):
                  policy: nn.Module
                  ):
         super(NPG_Learner, self).__init__(config, policy)
-        self.actor_optimizer = torch.optim.Adam(self.policy.actor.parameters(), config.learning_rate, eps=1e-5)
-        self.critic_optimizer = torch.optim.Adam(self.policy.critic.parameters(), config.learning_rate, eps=1e-5)
-        self.actor_scheduler = torch.optim.lr_scheduler.LinearLR(self.actor_optimizer,
-                                                                 start_factor=1.0,
-                                                                 end_factor=self.end_factor_lr_decay,
-                                                                 total_iters=config.running_steps)
+        self.actor_optimizer = TrustRegionOptimizer(
+            self.policy.actor,
+            max_kl=config.max_kl if hasattr(config, "max_kl") else 0.01,
+            cg_iterations=config.cg_iterations if hasattr(config, "cg_iterations") else 10,
+            cg_damping=config.cg_damping if hasattr(config, "cg_damping") else 0.1,
+            line_search_steps=config.line_search_steps if hasattr(config, "line_search_steps") else 10,
+            line_search_decay=config.line_search_decay if hasattr(config, "line_search_decay") else 0.5)
+        self.critic_optimizer = torch.optim.Adam(list(self.policy.representation.parameters()) +
+                                                 list(self.policy.critic.parameters()), config.learning_rate, eps=1e-5)
         self.critic_scheduler = torch.optim.lr_scheduler.LinearLR(self.critic_optimizer,
                                                                   start_factor=1.0,
                                                                   end_factor=self.end_factor_lr_decay,
@@ -24,6 +29,16 @@ class NPG_Learner(Learner):
         self.gamma = config.gamma
         self.mse_loss = nn.MSELoss()
 
+    @staticmethod
+    def detached_distribution(a_dist):
+        """Returns a copy of the action distribution that is fixed during the natural gradient step."""
+        old_dist = copy.copy(a_dist)
+        if isinstance(a_dist, CategoricalDistribution):
+            old_dist.set_param(logits=a_dist.logits.detach())
+        else:
+            old_dist.set_param(*[param.detach() for param in a_dist.get_param()])
+        return old_dist
+
     def update(self, **samples):
         self.iterations += 1
         obs_batch = torch.as_tensor(samples['obs'], device=self.device)
@@ -32,70 +47,53 @@ class NPG_Learner(Learner):
         adv_batch = torch.as_tensor(samples['advantages'], device=self.device)
 
         outputs, a_dist, v_pred = self.policy(obs_batch)
-        log_prob = a_dist.log_prob(act_batch)
-
-        a_loss = -(adv_batch * log_prob).mean()  # actor_loss
         c_loss = self.mse_loss(v_pred, ret_batch)  # critic_loss
 
         # train critic
         self.critic_optimizer.zero_grad()
-        c_loss.backward(retain_graph=True)
+        self.scaler.scale(c_loss).backward()
         if self.use_grad_clip:
-            torch.nn.utils.clip_grad_norm_(self.policy.critic.parameters(), self.grad_clip_norm)
-        self.critic_optimizer.step()
+            self.scaler.unscale_(self.critic_optimizer)
+            torch.nn.utils.clip_grad_norm_(self.critic_optimizer.param_groups[0]['params'], self.grad_clip_norm)
+        self.scaler.step(self.critic_optimizer)
+        self.scaler.update()
+        if self.critic_scheduler is not None:
+            self.critic_scheduler.step()
 
-        #train actor
-        self.actor_optimizer.zero_grad()
-        a_loss.backward()
-        for param in self.policy.actor.parameters():
-            if param.requires_grad:
-                fisher_info = self.compute_fisher_information(param, obs_batch, act_batch)
-                grads = param.grad.view(-1)
-                natural_grads = torch.matmul(fisher_info, grads)
-                natural_grads = natural_grads.view(param.size())
-                param.grad = natural_grads.clone()
+        # train actor with the natural gradient, the Fisher matrix is only used through Fisher-vector products.
+        state = outputs['state'].detach()
+        old_dist = self.detached_distribution(a_dist)
+        old_log_prob = old_dist.log_prob(act_batch)
 
-        if self.use_grad_clip:
-            torch.nn.utils.clip_grad_norm_(self.policy.actor.parameters(), self.grad_clip_norm)
+        def actor_loss():
+            ratio = (self.policy.actor(state).log_prob(act_batch) - old_log_prob).exp()
+            return -(adv_batch * ratio).mean()
 
-        self.actor_optimizer.step()
-        if self.critic_scheduler is not None:
-            self.critic_scheduler.step()
+        def actor_kl():
+            return old_dist.kl_divergence(self.policy.actor(state)).mean()
 
-        if self.actor_scheduler is not None:
-            self.actor_scheduler.step()
+        a_loss = actor_loss().detach()
+        step_info = self.actor_optimizer.step(actor_loss, actor_kl)
 
-            # Logger
-        lr = self.actor_optimizer.state_dict()['param_groups'][0]['lr']
+        # Logger
+        lr = self.critic_optimizer.param_groups[0]['lr']
 
         if self.distributed_training:
             info = {
-                f"actor-loss/rank_{self.rank}": a_loss.item(),
-                f"critic-loss/rank_{self.rank}": c_loss.item(),
+                f"actor-loss/rank_{self.rank}": a_loss,
+                f"critic-loss/rank_{self.rank}": c_loss.detach(),
                 f"learning_rate/rank_{self.rank}": lr,
-                f"predict_value/rank_{self.rank}": v_pred.mean().item()
+                f"predict_value/rank_{self.rank}": v_pred.mean().detach(),
+                f"kl/rank_{self.rank}": step_info["kl"],
+                f"step_fraction/rank_{self.rank}": step_info["step_fraction"]
             }
         else:
             info = {
-                "actor-loss": a_loss.item(),
-                "critic-loss": c_loss.item(),
+                "actor-loss": a_loss,
+                "critic-loss": c_loss.detach(),
                 "learning_rate": lr,
-                "predict_value": v_pred.mean().item()
+                "predict_value": v_pred.mean().detach(),
+                "kl": step_info["kl"],
+                "step_fraction": step_info["step_fraction"]
             }
         return info
-
-    def compute_fisher_information(self, params, obs, act):
-        param_num = 0
-        for param in params:
-            param_num += param.numel()
-        fisher_information = torch.zeros((param_num, param_num)).to(self.device)
-        _, prob, _ = self.policy(obs)
-        log_probs = prob.log_prob(act)
-        score = torch.autograd.grad(log_probs.sum(), params, retain_graph=True)[0]
-        score = score.view(-1).to(self.device)
-        fisher_information += torch.outer(score, score) * log_probs.sum().item()
-        fisher_information /= self.config.horizon_size
-        fisher_information = fisher_information + 1e-3 * torch.eye(fisher_information.shape[0]).to(self.device)
-        fisher_inv = torch.linalg.inv(fisher_information)
-        return fisher_inv
-
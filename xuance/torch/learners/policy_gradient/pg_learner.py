@@ -10,6 +10,8 @@ from argparse import Namespace
 
 
 class PG_Learner(Learner):
+    supports_gradient_accumulation = True
+
     def __init__(self,
                  config: Namespace,
                  policy: nn.Module):
@@ -35,26 +37,28 @@ class PG_Learner(Learner):
 
         loss = a_loss - self.ent_coef * e_loss
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-        self.optimizer.step()
-        if self.scheduler is not None:
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
 
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         if self.distributed_training:
             info = {
-                f"actor-loss/rank_{self.rank}": a_loss.item(),
-                f"entropy/rank_{self.rank}": e_loss.item(),
+                f"actor-loss/rank_{self.rank}": a_loss.detach(),
+                f"entropy/rank_{self.rank}": e_loss.detach(),
                 f"learning_rate/rank_{self.rank}": lr
             }
         else:
             info = {
-                "actor-loss": a_loss.item(),
-                "entropy": e_loss.item(),
+                "actor-loss": a_loss.detach(),
+                "entropy": e_loss.detach(),
                 "learning_rate": lr
             }
 
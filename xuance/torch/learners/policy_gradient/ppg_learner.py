@@ -11,6 +11,8 @@ from xuance.torch.utils.operations import merge_distributions
 
 
 class PPG_Learner(Learner):
+    supports_gradient_accumulation = True
+
     def __init__(self,
                  config: Namespace,
                  policy: nn.Module):
@@ -45,27 +47,29 @@ class PPG_Learner(Learner):
         e_loss = a_dist.entropy().mean()
         loss = a_loss - self.ent_coef * e_loss
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-        self.optimizer.step()
-        if self.scheduler is not None:
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
         cr = ((ratio < 1 - self.clip_range).sum() + (ratio > 1 + self.clip_range).sum()) / ratio.shape[0]
 
         if self.distributed_training:
             info = {
-                f"actor-loss/rank_{self.rank}": a_loss.item(),
-                f"entropy/rank_{self.rank}": e_loss.item(),
+                f"actor-loss/rank_{self.rank}": a_loss.detach(),
+                f"entropy/rank_{self.rank}": e_loss.detach(),
                 f"learning_rate/rank_{self.rank}": lr,
                 f"clip_ratio/rank_{self.rank}": cr,
             }
         else:
             info = {
-                "actor-loss": a_loss.item(),
-                "entropy": e_loss.item(),
+                "actor-loss": a_loss.detach(),
+                "entropy": e_loss.detach(),
                 "learning_rate": lr,
                 "clip_ratio": cr,
             }
@@ -80,15 +84,17 @@ class PPG_Learner(Learner):
         _, _, v_pred, _ = self.policy(obs_batch)
         loss = self.mse_loss(v_pred, ret_batch)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-        self.optimizer.step()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
 
         if self.distributed_training:
-            info = {f"critic-loss/rank_{self.rank}": loss.item()}
+            info = {f"critic-loss/rank_{self.rank}": loss.detach()}
         else:
-            info = {"critic-loss": loss.item()}
+            info = {"critic-loss": loss.detach()}
         return info
 
     def update_auxiliary(self, **samples):
@@ -102,15 +108,17 @@ class PPG_Learner(Learner):
         value_loss = self.mse_loss(v, ret_batch)
         loss = aux_loss + self.kl_beta * kl_loss + value_loss
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-        self.optimizer.step()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
 
         if self.distributed_training:
-            info = {f"kl-loss/rank_{self.rank}": loss.item()}
+            info = {f"kl-loss/rank_{self.rank}": loss.detach()}
         else:
-            info = {"kl-loss": loss.item()}
+            info = {"kl-loss": loss.detach()}
         return info
 
     def update(self, *args):
@@ -10,6 +10,8 @@ from argparse import Namespace
 
 
 class PPOCLIP_Learner(Learner):
+    supports_gradient_accumulation = True
+
     def __init__(self,
                  config: Namespace,
                  policy: nn.Module):
@@ -46,32 +48,34 @@ class PPOCLIP_Learner(Learner):
         e_loss = a_dist.entropy().mean()
         loss = a_loss - self.ent_coef * e_loss + self.vf_coef * c_loss
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-        self.optimizer.step()
-        if self.scheduler is not None:
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        if self.scheduler is not None and self.is_last_micro_batch:
             self.scheduler.step()
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
         cr = ((ratio < 1 - self.clip_range).sum() + (ratio > 1 + self.clip_range).sum()) / ratio.shape[0]
         
         if self.distributed_training:
             info = {
-                f"actor_loss/rank_{self.rank}": a_loss.item(),
-                f"critic_loss/rank_{self.rank}": c_loss.item(),
-                f"entropy/rank_{self.rank}": e_loss.item(),
+                f"actor_loss/rank_{self.rank}": a_loss.detach(),
+                f"critic_loss/rank_{self.rank}": c_loss.detach(),
+                f"entropy/rank_{self.rank}": e_loss.detach(),
                 f"learning_rate/rank_{self.rank}": lr,
-                f"predict_value/rank_{self.rank}": v_pred.mean().item(),
+                f"predict_value/rank_{self.rank}": v_pred.mean().detach(),
                 f"clip_ratio/rank_{self.rank}": cr
             }
         else:
             info = {
-                "actor_loss": a_loss.item(),
-                "critic_loss": c_loss.item(),
-                "entropy": e_loss.item(),
+                "actor_loss": a_loss.detach(),
+                "critic_loss": c_loss.detach(),
+                "entropy": e_loss.detach(),
                 "learning_rate": lr,
-                "predict_value": v_pred.mean().item(),
+                "predict_value": v_pred.mean().detach(),
                 "clip_ratio": cr
             }
 
@@ -53,32 +53,34 @@ class PPOKL_Learner(Learner):
             self.kl_coef = self.kl_coef / 2.
         self.kl_coef = np.clip(self.kl_coef, 0.1, 20)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-        self.optimizer.step()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
         if self.scheduler is not None:
             self.scheduler.step()
         # Logger
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         if self.distributed_training:
             info = {
-                f"actor-loss/rank_{self.rank}": a_loss.item(),
-                f"critic-loss/rank_{self.rank}": c_loss.item(),
-                f"entropy/rank_{self.rank}": e_loss.item(),
+                f"actor-loss/rank_{self.rank}": a_loss.detach(),
+                f"critic-loss/rank_{self.rank}": c_loss.detach(),
+                f"entropy/rank_{self.rank}": e_loss.detach(),
                 f"learning_rate/rank_{self.rank}": lr,
-                f"kl/rank_{self.rank}": kl.item(),
-                f"predict_value/rank_{self.rank}": v_pred.mean().item()
+                f"kl/rank_{self.rank}": kl.detach(),
+                f"predict_value/rank_{self.rank}": v_pred.mean().detach()
             }
         else:
             info = {
-                "actor-loss": a_loss.item(),
-                "critic-loss": c_loss.item(),
-                "entropy": e_loss.item(),
+                "actor-loss": a_loss.detach(),
+                "critic-loss": c_loss.detach(),
+                "entropy": e_loss.detach(),
                 "learning_rate": lr,
-                "kl": kl.item(),
-                "predict_value": v_pred.mean().item()
+                "kl": kl.detach(),
+                "predict_value": v_pred.mean().detach()
             }
 
         return info
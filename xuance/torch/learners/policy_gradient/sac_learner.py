@@ -52,10 +52,11 @@ class SAC_Learner(Learner):
         policy_q = torch.min(policy_q_1, policy_q_2).reshape([-1])
         p_loss = (self.alpha * log_pi.reshape([-1]) - policy_q).mean()
         self.optimizer['actor'].zero_grad()
-        p_loss.backward()
+        self.scaler.scale(p_loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer['actor'])
             torch.nn.utils.clip_grad_norm_(self.policy.actor_parameters, self.grad_clip_norm)
-        self.optimizer['actor'].step()
+        self.scaler.step(self.optimizer['actor'])
 
         # critic update
         action_q_1, action_q_2 = self.policy.Qaction(obs_batch, act_batch)
@@ -64,17 +65,18 @@ class SAC_Learner(Learner):
         backup = rew_batch + (1 - ter_batch) * self.gamma * target_value
         q_loss = self.mse_loss(action_q_1, backup.detach()) + self.mse_loss(action_q_2, backup.detach())
         self.optimizer['critic'].zero_grad()
-        q_loss.backward()
+        self.scaler.scale(q_loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer['critic'])
             torch.nn.utils.clip_grad_norm_(self.policy.critic_parameters, self.grad_clip_norm)
-        self.optimizer['critic'].step()
+        self.scaler.step(self.optimizer['critic'])
 
         # automatic entropy tuning
         if self.use_automatic_entropy_tuning:
             alpha_loss = -(self.log_alpha * (log_pi + self.target_entropy).detach()).mean()
             self.alpha_optimizer.zero_grad()
-            alpha_loss.backward()
-            self.alpha_optimizer.step()
+            self.scaler.scale(alpha_loss).backward()
+            self.scaler.step(self.alpha_optimizer)
             self.alpha = self.log_alpha.exp()
         else:
             alpha_loss = torch.zeros([])
@@ -85,31 +87,32 @@ class SAC_Learner(Learner):
 
         self.policy.soft_update(self.tau)
 
-        actor_lr = self.optimizer['actor'].state_dict()['param_groups'][0]['lr']
-        critic_lr = self.optimizer['critic'].state_dict()['param_groups'][0]['lr']
+        actor_lr = self.optimizer['actor'].param_groups[0]['lr']
+        critic_lr = self.optimizer['critic'].param_groups[0]['lr']
 
         if self.distributed_training:
             info = {
-                f"Qloss/rank_{self.rank}": q_loss.item(),
-                f"Ploss/rank_{self.rank}": p_loss.item(),
-                f"Qvalue/rank_{self.rank}": policy_q.mean().item(),
+                f"Qloss/rank_{self.rank}": q_loss.detach(),
+                f"Ploss/rank_{self.rank}": p_loss.detach(),
+                f"Qvalue/rank_{self.rank}": policy_q.mean().detach(),
                 f"actor_lr/rank_{self.rank}": actor_lr,
                 f"critic_lr/rank_{self.rank}": critic_lr,
             }
         else:
             info = {
-                "Qloss": q_loss.item(),
-                "Ploss": p_loss.item(),
-                "Qvalue": policy_q.mean().item(),
+                "Qloss": q_loss.detach(),
+                "Ploss": p_loss.detach(),
+                "Qvalue": policy_q.mean().detach(),
                 "actor_lr": actor_lr,
                 "critic_lr": critic_lr,
             }
         if self.use_automatic_entropy_tuning:
             if self.distributed_training:
-                info.update({f"alpha_loss/rank_{self.rank}": alpha_loss.item(),
-                             f"alpha/rank_{self.rank}": self.alpha.item()})
+                info.update({f"alpha_loss/rank_{self.rank}": alpha_loss.detach(),
+                             f"alpha/rank_{self.rank}": self.alpha.detach()})
             else:
-                info.update({"alpha_loss": alpha_loss.item(),
-                             "alpha": self.alpha.item()})
+                info.update({"alpha_loss": alpha_loss.detach(),
+                             "alpha": self.alpha.detach()})
 
+        self.scaler.update()
         return info
@@ -53,15 +53,15 @@ class SPDQN_Learner(Learner):
         q_loss = self.mse_loss(eval_q, target_q)
 
         self.optimizer[1].zero_grad()
-        q_loss.backward()
-        self.optimizer[1].step()
+        self.scaler.scale(q_loss).backward()
+        self.scaler.step(self.optimizer[1])
 
         # optimize actor network
         policy_q = self.policy.Qpolicy(obs_batch)
         p_loss = - policy_q.mean()
         self.optimizer[0].zero_grad()
-        p_loss.backward()
-        self.optimizer[0].step()
+        self.scaler.scale(p_loss).backward()
+        self.scaler.step(self.optimizer[0])
 
         if self.scheduler is not None:
             self.scheduler[0].step()
@@ -71,15 +71,16 @@ class SPDQN_Learner(Learner):
 
         if self.distributed_training:
             info = {
-                f"Q_loss/rank_{self.rank}": q_loss.item(),
-                f"P_loss/rank_{self.rank}": q_loss.item(),
-                f"Qvalue/rank_{self.rank}": eval_q.mean().item()
+                f"Q_loss/rank_{self.rank}": q_loss.detach(),
+                f"P_loss/rank_{self.rank}": q_loss.detach(),
+                f"Qvalue/rank_{self.rank}": eval_q.mean().detach()
             }
         else:
             info = {
-                "Q_loss": q_loss.item(),
-                "P_loss": q_loss.item(),
-                'Qvalue': eval_q.mean().item()
+                "Q_loss": q_loss.detach(),
+                "P_loss": q_loss.detach(),
+                'Qvalue': eval_q.mean().detach()
             }
 
+        self.scaler.update()
         return info
@@ -48,10 +48,11 @@ class TD3_Learner(Learner):
         target_q = rew_batch + self.gamma * (1 - ter_batch) * next_q
         q_loss = self.mse_loss(action_q_A, target_q.detach()) + self.mse_loss(action_q_B, target_q.detach())
         self.optimizer['critic'].zero_grad()
-        q_loss.backward()
+        self.scaler.scale(q_loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer['critic'])
             torch.nn.utils.clip_grad_norm_(self.policy.critic_parameters, self.grad_clip_norm)
-        self.optimizer['critic'].step()
+        self.scaler.step(self.optimizer['critic'])
         if self.scheduler is not None:
             self.scheduler['critic'].step()
 
@@ -60,33 +61,35 @@ class TD3_Learner(Learner):
             policy_q = self.policy.Qpolicy(obs_batch)
             p_loss = -policy_q.mean()
             self.optimizer['actor'].zero_grad()
-            p_loss.backward()
+            self.scaler.scale(p_loss).backward()
             if self.use_grad_clip:
+                self.scaler.unscale_(self.optimizer['actor'])
                 torch.nn.utils.clip_grad_norm_(self.policy.actor_parameters, self.grad_clip_norm)
-            self.optimizer['actor'].step()
+            self.scaler.step(self.optimizer['actor'])
             if self.scheduler is not None:
                 self.scheduler['actor'].step()
             self.policy.soft_update(self.tau)
-            info.update({"Ploss": p_loss.item()})
+            info.update({"Ploss": p_loss.detach()})
 
-        actor_lr = self.optimizer['actor'].state_dict()['param_groups'][0]['lr']
-        critic_lr = self.optimizer['critic'].state_dict()['param_groups'][0]['lr']
+        actor_lr = self.optimizer['actor'].param_groups[0]['lr']
+        critic_lr = self.optimizer['critic'].param_groups[0]['lr']
 
         if self.distributed_training:
             info.update({
-                f"Qloss/rank_{self.rank}": q_loss.item(),
-                f"QvalueA/rank_{self.rank}": action_q_A.mean().item(),
-                f"QvalueB/rank_{self.rank}": action_q_B.mean().item(),
+                f"Qloss/rank_{self.rank}": q_loss.detach(),
+                f"QvalueA/rank_{self.rank}": action_q_A.mean().detach(),
+                f"QvalueB/rank_{self.rank}": action_q_B.mean().detach(),
                 f"actor_lr/rank_{self.rank}": actor_lr,
                 f"critic_lr/rank_{self.rank}": critic_lr
             })
         else:
             info.update({
-                "Qloss": q_loss.item(),
-                "QvalueA": action_q_A.mean().item(),
-                "QvalueB": action_q_B.mean().item(),
+                "Qloss": q_loss.detach(),
+                "QvalueA": action_q_A.mean().detach(),
+                "QvalueB": action_q_B.mean().detach(),
                 "actor_lr": actor_lr,
                 "critic_lr": critic_lr
             })
 
+        self.scaler.update()
         return info
@@ -1,7 +1,14 @@
-from .dqn_learner import DQN_Learner
-from .ddqn_learner import DDQN_Learner
-from .dueldqn_learner import DuelDQN_Learner
-from .c51_learner import C51_Learner
-from .perdqn_learner import PerDQN_Learner
-from .qrdqn_learner import QRDQN_Learner
-from .drqn_learner import DRQN_Learner
+from xuance.common.registry_tools import lazy_attributes
+
+# Maps each member to the module that defines it, the module is imported on first access.
+_members = {
+    "DQN_Learner": ".dqn_learner",
+    "DDQN_Learner": ".ddqn_learner",
+    "DuelDQN_Learner": ".dueldqn_learner",
+    "C51_Learner": ".c51_learner",
+    "PerDQN_Learner": ".perdqn_learner",
+    "QRDQN_Learner": ".qrdqn_learner",
+    "DRQN_Learner": ".drqn_learner",
+}
+
+__getattr__ = lazy_attributes(__name__, _members)
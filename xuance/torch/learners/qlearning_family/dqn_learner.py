@@ -41,28 +41,30 @@ class DQN_Learner(Learner):
 
         loss = self.mse_loss(predictQ, targetQ)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-        self.optimizer.step()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
         if self.scheduler is not None:
             self.scheduler.step()
 
         # hard update for target network
         if self.iterations % self.sync_frequency == 0:
             self.policy.copy_target()
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         if self.distributed_training:
             info = {
-                f"Qloss/rank_{self.rank}": loss.item(),
-                f"predictQ/rank_{self.rank}": predictQ.mean().item(),
+                f"Qloss/rank_{self.rank}": loss.detach(),
+                f"predictQ/rank_{self.rank}": predictQ.mean().detach(),
                 f"learning_rate/rank_{self.rank}": lr,
             }
         else:
             info = {
-                "Qloss": loss.item(),
-                "predictQ": predictQ.mean().item(),
+                "Qloss": loss.detach(),
+                "predictQ": predictQ.mean().detach(),
                 "learning_rate": lr,
             }
 
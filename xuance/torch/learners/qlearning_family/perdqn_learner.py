@@ -45,29 +45,31 @@ class PerDQN_Learner(Learner):
         td_error = targetQ - predictQ
         loss = self.mse_loss(predictQ, targetQ)
         self.optimizer.zero_grad()
-        loss.backward()
+        self.scaler.scale(loss).backward()
         if self.use_grad_clip:
+            self.scaler.unscale_(self.optimizer)
             torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.grad_clip_norm)
-        self.optimizer.step()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
         if self.scheduler is not None:
             self.scheduler.step()
 
         # hard update for target network
         if self.iterations % self.sync_frequency == 0:
             self.policy.copy_target()
-        lr = self.optimizer.state_dict()['param_groups'][0]['lr']
+        lr = self.optimizer.param_groups[0]['lr']
 
         if self.distributed_training:
             info = {
-                f"Qloss/rank_{self.rank}": loss.item(),
+                f"Qloss/rank_{self.rank}": loss.detach(),
                 f"learning_rate/rank_{self.rank}": lr,
-                f"predictQ/rank_{self.rank}": predictQ.mean().item()
+                f"predictQ/rank_{self.rank}": predictQ.mean().detach()
             }
         else:
             info = {
-                "Qloss": loss.item(),
+                "Qloss": loss.detach(),
                 "learning_rate": lr,
-                "predictQ": predictQ.mean().item()
+                "predictQ": predictQ.mean().detach()
             }
         
         return np.abs(td_error.cpu().detach().numpy()), info
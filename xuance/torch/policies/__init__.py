@@ -38,12 +38,14 @@ from .deterministic_marl import MFQnetwork, MixingQnetwork, Weighted_MixingQnetw
     Independent_DDPG_Policy, MADDPG_Policy, MATD3_Policy
 from .categorical_marl import MeanFieldActorCriticPolicy, COMA_Policy
 from .categorical_marl import MAAC_Policy as Categorical_MAAC_Policy
+from .categorical_marl import MAAC_Policy_With_Communication as Categorical_MAAC_Policy_Comm
 from .categorical_marl import MAAC_Policy_Share as Categorical_MAAC_Policy_Share
 from .categorical_marl import Basic_ISAC_Policy as Categorical_ISAC
 from .categorical_marl import MASAC_Policy as Categorical_MASAC
 from .gaussian_marl import Basic_ISAC_Policy as Gaussian_ISAC
 from .gaussian_marl import MASAC_Policy as Gaussian_MASAC
 from .gaussian_marl import MAAC_Policy as Gaussain_MAAC
+from .gaussian_marl import MAAC_Policy_With_Communication as Gaussian_MAAC_Policy_Comm
 
 Mixer = {
     "VDN": VDN_mixer,
@@ -81,6 +83,7 @@ REGISTRY_Policy = {
     "Qtran_Mixing_Q_network": Qtran_MixingQnetwork,
     "DCG_Policy": DCG_policy,
     "Categorical_MAAC_Policy": Categorical_MAAC_Policy,
+    "Categorical_MAAC_Policy_Comm": Categorical_MAAC_Policy_Comm,
     "Categorical_MAAC_Policy_Share": Categorical_MAAC_Policy_Share,
     "Categorical_COMA_Policy": COMA_Policy,
     "Categorical_ISAC_Policy": Categorical_ISAC,
@@ -90,6 +93,7 @@ REGISTRY_Policy = {
     "MF_Q_network": MFQnetwork,
     "Categorical_MFAC_Policy": MeanFieldActorCriticPolicy,
     "Gaussian_MAAC_Policy": Gaussain_MAAC,
+    "Gaussian_MAAC_Policy_Comm": Gaussian_MAAC_Policy_Comm,
     "Gaussian_ISAC_Policy": Gaussian_ISAC,
     "Gaussian_MASAC_Policy": Gaussian_MASAC,
     "MATD3_Policy": MATD3_Policy
@@ -107,6 +111,7 @@ __all__ = [
     "BasicQnetwork_marl", "MFQnetwork", "MixingQnetwork", "Weighted_MixingQnetwork", "Qtran_MixingQnetwork",
     "DCG_policy", "Independent_DDPG_Policy", "MADDPG_Policy", "MATD3_Policy",
     "MeanFieldActorCriticPolicy", "COMA_Policy", "Categorical_MAAC_Policy", "Categorical_MAAC_Policy_Share",
+    "Categorical_MAAC_Policy_Comm", "Gaussian_MAAC_Policy_Comm",
     "Categorical_ISAC", "Categorical_MASAC",
     "Gaussian_ISAC", "Gaussian_MASAC", "Gaussain_MAAC",
 ]
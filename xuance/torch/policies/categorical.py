@@ -1,12 +1,11 @@
-import os
 import torch
 import torch.nn as nn
 import numpy as np
 from copy import deepcopy
 from gym.spaces import Discrete
 from xuance.common import Sequence, Optional, Callable, Union
-from xuance.torch import Module, Tensor, DistributedDataParallel
-from xuance.torch.utils import ModuleType
+from xuance.torch import Module, Tensor
+from xuance.torch.utils import ModuleType, TargetNetworks
 from .core import CategoricalActorNet as ActorNet
 from .core import CategoricalActorNet_SAC as Actor_SAC
 from .core import BasicQhead, CriticNet
@@ -30,7 +29,7 @@ class ActorPolicy(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -49,13 +48,7 @@ class ActorPolicy(Module):
         self.actor = ActorNet(representation.output_shapes['state'][0], self.action_dim, actor_hidden_size,
                               normalize, initialize, activation, device)
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.actor = DistributedDataParallel(module=self.actor, device_ids=[self.rank])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -86,7 +79,7 @@ class ActorCriticPolicy(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -108,14 +101,7 @@ class ActorCriticPolicy(Module):
         self.critic = CriticNet(representation.output_shapes['state'][0], critic_hidden_size,
                                 normalize, initialize, activation, device)
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.actor = DistributedDataParallel(module=self.actor, device_ids=[self.rank])
-            self.critic = DistributedDataParallel(module=self.critic, device_ids=[self.rank])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -148,7 +134,7 @@ class PPGActorCritic(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -175,19 +161,7 @@ class PPGActorCritic(Module):
         self.aux_critic = CriticNet(representation.output_shapes['state'][0], critic_hidden_size,
                                     normalize, initialize, activation, device)
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.actor_representation._get_name() != "Basic_Identical":
-                self.actor_representation = DistributedDataParallel(self.representation, device_ids=[self.rank])
-            if self.critic_representation._get_name() != "Basic_Identical":
-                self.critic_representation = DistributedDataParallel(self.representation, device_ids=[self.rank])
-            if self.aux_critic_representation._get_name() != "Basic_Identical":
-                self.aux_critic_representation = DistributedDataParallel(self.representation, device_ids=[self.rank])
-            self.actor = DistributedDataParallel(self.actor, device_ids=[self.rank])
-            self.critic = DistributedDataParallel(self.critic, device_ids=[self.rank])
-            self.aux_critic = DistributedDataParallel(self.aux_critic, device_ids=[self.rank])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -224,7 +198,7 @@ class SACDISPolicy(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -261,21 +235,13 @@ class SACDISPolicy(Module):
             self.critic_1.parameters()) + list(self.critic_2_representation.parameters()) + list(
             self.critic_2.parameters())
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.actor_representation._get_name() != "Basic_Identical":
-                self.actor_representation = DistributedDataParallel(self.actor_representation, device_ids=[self.rank])
-            if self.critic_1_representation._get_name() != "Basic_Identical":
-                self.critic_1_representation = DistributedDataParallel(self.critic_1_representation,
-                                                                       device_ids=[self.rank])
-            if self.critic_2_representation._get_name() != "Basic_Identical":
-                self.critic_2_representation = DistributedDataParallel(self.critic_2_representation,
-                                                                       device_ids=[self.rank])
-            self.actor = DistributedDataParallel(module=self.actor, device_ids=[self.rank])
-            self.critic_1 = DistributedDataParallel(module=self.critic_1, device_ids=[self.rank])
-            self.critic_2 = DistributedDataParallel(module=self.critic_2, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.critic_1_representation, self.critic_2_representation,
+                                                      self.critic_1, self.critic_2],
+                                              target=[self.target_critic_1_representation,
+                                                      self.target_critic_2_representation, self.target_critic_1,
+                                                      self.target_critic_2])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -365,15 +331,4 @@ class SACDISPolicy(Module):
         return q_1, q_2
 
     def soft_update(self, tau=0.005):
-        for ep, tp in zip(self.critic_1_representation.parameters(), self.target_critic_1_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_2_representation.parameters(), self.target_critic_2_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_1.parameters(), self.target_critic_1.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_2.parameters(), self.target_critic_2.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
+        self.target_networks.soft_update(tau)
@@ -1,15 +1,15 @@
-import os
 import torch
 import torch.nn as nn
 import numpy as np
 from copy import deepcopy
-from operator import itemgetter
 from gym.spaces import Discrete
 from xuance.common import Sequence, Optional, Callable, Union, Dict, List
 from xuance.torch.policies import CategoricalActorNet, ActorNet
 from xuance.torch.policies.core import CriticNet, BasicQhead
-from xuance.torch.utils import ModuleType, CategoricalDistribution
-from xuance.torch import Tensor, Module, ModuleDict, DistributedDataParallel
+from xuance.torch.utils import ModuleType, ModuleEnsemble, CategoricalDistribution, TargetNetworks
+from xuance.torch import Tensor, Module, ModuleDict
+from xuance.torch.policies.mean_field import MeanFieldAggregator
+from xuance.torch.communications.base_comm import CommGraph
 from .core import CategoricalActorNet_SAC as Actor_SAC
 
 
@@ -29,8 +29,9 @@ class MAAC_Policy(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
-        **kwargs: The other args.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: The other args, use_agent_ensemble stacks the networks of all agents into one ModuleEnsemble
+            when the parameters are not shared.
     """
 
     def __init__(self,
@@ -72,23 +73,20 @@ class MAAC_Policy(Module):
                                                   normalize, initialize, activation, device)
             self.critic[key] = CriticNet(dim_critic_in, critic_hidden_size, normalize, initialize, activation, device)
 
+        self.use_agent_ensemble = kwargs.get("use_agent_ensemble", False) and not self.use_parameter_sharing
+        if self.use_agent_ensemble:
+            if self.use_rnn:
+                raise AttributeError("The agent ensemble does not support recurrent representations.")
+            # The actors of the ensemble return the parameters of the distributions of the agents.
+            self.actor_dists = {key: self.actor[key].dist for key in self.model_keys}
+            self.actor_representation = ModuleEnsemble(self.actor_representation)
+            self.critic_representation = ModuleEnsemble(self.critic_representation)
+            self.actor = ModuleEnsemble(self.actor, method="dist_param")
+            self.critic = ModuleEnsemble(self.critic)
+
         self.mixer = mixer
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            for key in self.model_keys:
-                if self.actor_representation[key]._get_name() != "Basic_Identical":
-                    self.actor_representation[key] = DistributedDataParallel(self.actor_representation[key],
-                                                                             device_ids=[self.rank])
-                if self.critic_representation[key]._get_name() != "Basic_Identical":
-                    self.critic_representation[key] = DistributedDataParallel(self.critic_representation[key],
-                                                                              device_ids=[self.rank])
-                self.actor[key] = DistributedDataParallel(module=self.actor[key], device_ids=[self.rank])
-                self.critic[key] = DistributedDataParallel(module=self.critic[key], device_ids=[self.rank])
-            if self.mixer is not None:
-                self.mixer = DistributedDataParallel(module=self.mixer, device_ids=[self.rank])
 
     @property
     def parameters_model(self):
@@ -144,6 +142,19 @@ class MAAC_Policy(Module):
         if avail_actions is not None:
             avail_actions = {key: Tensor(avail_actions[key]) for key in agent_list}
 
+        if self.use_agent_ensemble:
+            # One vectorized pass evaluates the stacked networks of all agents.
+            outputs = self.actor_representation(observation)
+            dist_params = self.actor({key: outputs[key]['state'] for key in self.model_keys})
+            for key in agent_list:
+                logits = dist_params[key]['logits']
+                if avail_actions is not None:
+                    logits = logits.masked_fill(avail_actions[key] == 0, -1e10)
+                self.actor_dists[key].set_param(logits=logits)
+                pi_dists[key] = self.actor_dists[key]
+                rnn_hidden_new[key] = [None, None]
+            return rnn_hidden_new, pi_dists
+
         for key in agent_list:
             if self.use_rnn:
                 outputs = self.actor_representation[key](observation[key], *rnn_hidden[key])
@@ -153,7 +164,8 @@ class MAAC_Policy(Module):
                 rnn_hidden_new[key] = [None, None]
 
             if self.use_parameter_sharing:
-                actor_input = torch.concat([outputs['state'], agent_ids], dim=-1)
+                ids = agent_ids[key] if isinstance(agent_ids, dict) else agent_ids  # A dict with use_group_sharing.
+                actor_input = torch.concat([outputs['state'], ids], dim=-1)
             else:
                 actor_input = outputs['state']
 
@@ -178,6 +190,10 @@ class MAAC_Policy(Module):
         """
         rnn_hidden_new, values = {}, {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            outputs = self.critic_representation(observation)
+            values_ensemble = self.critic({key: outputs[key]['state'] for key in self.model_keys})
+            return {key: [None, None] for key in agent_list}, {key: values_ensemble[key] for key in agent_list}
 
         for key in agent_list:
             if self.use_rnn:
@@ -188,7 +204,8 @@ class MAAC_Policy(Module):
                 rnn_hidden_new[key] = [None, None]
 
             if self.use_parameter_sharing:
-                critic_input = torch.concat([outputs['state'], agent_ids], dim=-1)
+                ids = agent_ids[key] if isinstance(agent_ids, dict) else agent_ids  # A dict with use_group_sharing.
+                critic_input = torch.concat([outputs['state'], ids], dim=-1)
             else:
                 critic_input = outputs['state']
 
@@ -277,13 +294,37 @@ class MAAC_Policy_Share(MAAC_Policy):
 
 
 class MAAC_Policy_With_Communication(MAAC_Policy):
+    """
+    MAAC_Policy_With_Communication: Multi-Agent Actor-Critic Policy with categorical policies and communication.
+
+    The actor representations of all agents are calculated first, then the communicator exchanges the messages of all
+    environments, agents and time steps at once, and each actor reads its representation with the received messages.
+    The critics are the ones of MAAC_Policy.
+
+    Args:
+        action_space (Optional[Dict[str, Discrete]]): The discrete action space.
+        n_agents (int): The number of agents.
+        representation_actor (ModuleDict): A dict of representation modules for each agent's actor.
+        representation_critic (ModuleDict): A dict of representation modules for each agent's critic.
+        mixer (Module): The mixer module that mix together the individual values to the total value.
+        communicator (Module): The communication module of the actors, see xuance.torch.communications.
+        actor_hidden_size (Sequence[int]): A list of hidden layer sizes for actor network.
+        critic_hidden_size (Sequence[int]): A list of hidden layer sizes for critic network.
+        normalize (Optional[ModuleType]): The layer normalization over a minibatch of inputs.
+        initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
+        activation (Optional[ModuleType]): The activation function for each layer.
+        device (Optional[Union[str, int, torch.device]]): The calculating device.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: The other args.
+    """
+
     def __init__(self,
                  action_space: Optional[Dict[str, Discrete]],
                  n_agents: int,
                  representation_actor: ModuleDict,
                  representation_critic: ModuleDict,
                  mixer: Optional[Module] = None,
-                 communicators: Optional[Module] = None,
+                 communicator: Optional[Module] = None,
                  actor_hidden_size: Sequence[int] = None,
                  critic_hidden_size: Sequence[int] = None,
                  normalize: Optional[ModuleType] = None,
@@ -292,22 +333,20 @@ class MAAC_Policy_With_Communication(MAAC_Policy):
                  device: Optional[Union[str, int, torch.device]] = None,
                  use_distributed_training: bool = False,
                  **kwargs):
-        self.communicators = communicators
-        self.msg_dim = self.communicators.msg_dim
-        super().__init__(action_space, n_agents, representation_actor, representation_critic, mixer,
-                         actor_hidden_size, critic_hidden_size, normalize, initialize,
-                         activation, device, use_distributed_training, **kwargs)
-        if self.distributed_training:
-            self.communicators = DistributedDataParallel(module=self.communicators, device_ids=[self.rank])
+        if communicator is None:
+            raise AttributeError("The policy with communication requires a communicator.")
+        if kwargs.get("use_agent_ensemble", False):
+            raise AttributeError("The policy with communication does not support the agent ensemble.")
+        self.msg_dim = communicator.msg_dim
+        super(MAAC_Policy_With_Communication, self).__init__(action_space, n_agents, representation_actor,
+                                                             representation_critic, mixer, actor_hidden_size,
+                                                             critic_hidden_size, normalize, initialize, activation,
+                                                             device, use_distributed_training, **kwargs)
+        self.communicator = communicator
 
     @property
     def parameters_model(self):
-        parameters = list(self.actor_representation.parameters()) + list(self.actor.parameters()) + list(
-            self.critic_representation.parameters()) + list(self.critic.parameters())
-        if self.mixer is not None:
-            parameters += list(self.mixer.parameters())
-        parameters += list(self.communicators.parameters())
-        return parameters
+        return super(MAAC_Policy_With_Communication, self).parameters_model + list(self.communicator.parameters())
 
     def _get_actor_critic_input(self, dim_action, dim_actor_rep, dim_critic_rep, n_agents):
         """
@@ -320,21 +359,20 @@ class MAAC_Policy_With_Communication(MAAC_Policy):
             n_agents: The number of agents.
 
         Returns:
-            dim_actor_in: The dimension of input of the actor networks.
+            dim_actor_in: The dimension of input of the actor networks, with the received messages.
             dim_actor_out: The dimension of output of the actor networks.
             dim_critic_in: The dimension of the input of critic networks.
             dim_critic_out: The dimension of the output of critic networks.
         """
-        dim_actor_in, dim_actor_out = dim_actor_rep + self.msg_dim, dim_action
-        dim_critic_in, dim_critic_out = dim_critic_rep + self.msg_dim, dim_action
-        if self.use_parameter_sharing:
-            dim_actor_in += n_agents
-            dim_critic_in += n_agents
-        return dim_actor_in, dim_actor_out, dim_critic_in, dim_critic_out
+        dim_actor_in, dim_actor_out, dim_critic_in, dim_critic_out = super(
+            MAAC_Policy_With_Communication, self)._get_actor_critic_input(dim_action, dim_actor_rep, dim_critic_rep,
+                                                                          n_agents)
+        return dim_actor_in + self.msg_dim, dim_actor_out, dim_critic_in, dim_critic_out
 
     def forward(self, observation: Dict[str, Tensor], agent_ids: Optional[Tensor] = None,
                 avail_actions: Dict[str, Tensor] = None, agent_key: str = None,
-                rnn_hidden: Optional[Dict[str, List[Tensor]]] = None):
+                rnn_hidden: Optional[Dict[str, List[Tensor]]] = None,
+                agent_mask: Optional[Dict[str, Tensor]] = None, adjacency: CommGraph = None):
         """
         Returns actions of the policy.
 
@@ -342,20 +380,22 @@ class MAAC_Policy_With_Communication(MAAC_Policy):
             observation (Dict[str, Tensor]): The input observations for the policies.
             agent_ids (Tensor): The agents' ids (for parameter sharing).
             avail_actions (Dict[str, Tensor]): Actions mask values, default is None.
-            agent_key (str): Calculate actions for specified agent.
+            agent_key (str): Calculate actions for specified agent (the messages come from all agents).
             rnn_hidden (Optional[Dict[str, List[Tensor]]]): The RNN hidden states of actor representation.
+            agent_mask (Optional[Dict[str, Tensor]]): The alive agents that send and receive messages, default is None.
+            adjacency (CommGraph): The agent graph of the communication, default is the fully connected graph.
 
         Returns:
             rnn_hidden_new (Optional[Dict[str, List[Tensor]]]): The new RNN hidden states of actor representation.
             pi_dists (dict): The stochastic policy distributions.
         """
-        rnn_hidden_new, pi_dists = {}, {}
+        rnn_hidden_new, pi_dists, features = {}, {}, {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
 
         if avail_actions is not None:
             avail_actions = {key: Tensor(avail_actions[key]) for key in agent_list}
 
-        for key in agent_list:
+        for key in self.model_keys:
             if self.use_rnn:
                 outputs = self.actor_representation[key](observation[key], *rnn_hidden[key])
                 rnn_hidden_new[key] = (outputs['rnn_hidden'], outputs['rnn_cell'])
@@ -364,65 +404,18 @@ class MAAC_Policy_With_Communication(MAAC_Policy):
                 rnn_hidden_new[key] = [None, None]
 
             if self.use_parameter_sharing:
-                communicator_input = torch.concat([outputs['state'], agent_ids], dim=-1)
+                features[key] = torch.concat([outputs['state'], agent_ids], dim=-1)
             else:
-                communicator_input = outputs['state']
+                features[key] = outputs['state']
 
-            msg_to_send = self.communicators(communicator_input)
-            msg_receive = self.communicators.receive(msg_to_send, key)
-
-            if self.use_parameter_sharing:
-                actor_input = torch.concat([outputs['state'], msg_receive, agent_ids], dim=-1)
-            else:
-                actor_input = torch.concat([outputs['state'], msg_receive], dim=-1)
+        msg_received = self.communicator.communicate(features, agent_mask, adjacency)
 
+        for key in agent_list:
+            actor_input = torch.concat([features[key], msg_received[key]], dim=-1)
             avail_actions_input = None if avail_actions is None else avail_actions[key]
             pi_dists[key] = self.actor[key](actor_input, avail_actions_input)
         return rnn_hidden_new, pi_dists
 
-    def get_values(self, observation: Dict[str, Tensor], agent_ids: Tensor = None, agent_key: str = None,
-                   rnn_hidden: Optional[Dict[str, List[Tensor]]] = None):
-        """
-        Get critic values via critic networks.
-
-        Parameters:
-            observation (Dict[str, Tensor]): The input observations for the policies.
-            agent_ids (Tensor): The agents' ids (for parameter sharing).
-            agent_key (str): Calculate actions for specified agent.
-            rnn_hidden (Optional[Dict[str, List[Tensor]]]): The RNN hidden states of critic representation.
-
-        Returns:
-            rnn_hidden_new (Optional[Dict[str, List[Tensor]]]): The new RNN hidden states of critic representation.
-            values (dict): The evaluated critic values.
-        """
-        rnn_hidden_new, values = {}, {}
-        agent_list = self.model_keys if agent_key is None else [agent_key]
-
-        for key in agent_list:
-            if self.use_rnn:
-                outputs = self.critic_representation[key](observation[key], *rnn_hidden[key])
-                rnn_hidden_new[key] = (outputs['rnn_hidden'], outputs['rnn_cell'])
-            else:
-                outputs = self.critic_representation[key](observation[key])
-                rnn_hidden_new[key] = [None, None]
-
-            if self.use_parameter_sharing:
-                communicator_input = torch.concat([outputs['state'], agent_ids], dim=-1)
-            else:
-                communicator_input = outputs['state']
-
-            msg_to_send = self.communicators(communicator_input)
-            msg_receive = self.communicators.receive(msg_to_send, key)
-
-            if self.use_parameter_sharing:
-                critic_input = torch.concat([outputs['state'], msg_receive, agent_ids], dim=-1)
-            else:
-                critic_input = torch.concat([outputs['state'], msg_receive], dim=-1)
-
-            values[key] = self.critic[key](critic_input)
-
-        return rnn_hidden_new, values
-
 
 class IC3Net(MAAC_Policy):
     def __init__(self):
@@ -448,7 +441,7 @@ class COMA_Policy(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
         **kwargs: The other args.
     """
     def __init__(self,
@@ -496,19 +489,20 @@ class COMA_Policy(Module):
                                  critic_hidden_size, normalize, initialize, activation, device)
         self.target_critic = deepcopy(self.critic)
 
-        # Prepare DDP module.
+        # The blocks of the inputs of the first critic layer, and its columns for the action slot of each agent.
+        self.dim_critic_blocks = [kwargs['dim_global_state'],
+                                  self.critic_representation[self.model_keys[0]].output_shapes['state'][0],
+                                  sum(self.n_actions.values()), self.n_agents]
+        offsets = np.cumsum([0] + list(self.n_actions.values()))
+        self.action_slots = torch.as_tensor([[offsets[i] + min(a, n - 1) for a in range(self.n_actions_max)]
+                                             for i, n in enumerate(self.n_actions.values())], device=device)
+        self.action_slots_valid = torch.as_tensor([[float(a < n) for a in range(self.n_actions_max)]
+                                                   for n in self.n_actions.values()], device=device)
+
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ['RANK'])
-            for key in self.model_keys:
-                if self.actor_representation[key]._get_name() != "Basic_Identical":
-                    self.actor_representation[key] = DistributedDataParallel(self.actor_representation[key],
-                                                                             device_ids=[self.rank])
-                if self.critic_representation[key]._get_name() != "Basic_Identical":
-                    self.critic_representation[key] =DistributedDataParallel(self.critic_representation[key],
-                                                                             device_ids=[self.rank])
-                self.actor[key] = DistributedDataParallel(module=self.actor[key], device_ids=[self.rank])
-            self.critic = DistributedDataParallel(module=self.critic, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.critic_representation, self.critic],
+                                              target=[self.target_critic_representation, self.target_critic])
 
     @property
     def parameters_actor(self):
@@ -564,33 +558,29 @@ class COMA_Policy(Module):
         return rnn_hidden_new, act_probs
 
     def get_values(self, state: Tensor, observation: Dict[str, Tensor], actions: Dict[str, Tensor],
-                   agent_ids: Tensor = None, rnn_hidden: Optional[Dict[str, List[Tensor]]] = None, target=False):
+                   rnn_hidden: Optional[Dict[str, List[Tensor]]] = None, target=False):
         """
         Get evaluated critic values.
 
+        The critic of agent i takes the global state, the representation of its observation, the one-hot actions of
+        all agents with the slot of agent i masked out, and the one-hot ID of agent i, and returns the values of all
+        the actions of agent i for the counterfactual baseline. These inputs are not materialized for every agent:
+        the first critic layer is split into the blocks of the inputs, which are evaluated once per sample (the state
+        and the joint actions) or once per agent (the observation, the own action slot and the ID), and summed.
+
         Parameters:
-            state: Tensor: The global state.
+            state: Tensor: The global state, with shape [batch_size, (seq_len, ) dim_state].
             observation (Dict[str, Tensor]): The input observations for the policies.
-            actions (Dict[str, Tensor]): The input actions.
-            agent_ids (Tensor): The agents' ids (for parameter sharing).
+            actions (Dict[str, Tensor]): The one-hot actions, with the same rows as the observations.
             rnn_hidden (Optional[Dict[str, List[Tensor]]]): The RNN hidden states of critic representation.
             target: If to use target critic network to calculate the critic values.
 
         Returns:
             rnn_hidden_new (Optional[Dict[str, List[Tensor]]]): The new RNN hidden states of critic representation.
-            values (dict): The evaluated critic values.
+            values (Tensor): The evaluated critic values, with shape [batch_size, (seq_len, ) n_agents, n_actions].
         """
-        rnn_hidden_new, critic_input = {}, {}
+        rnn_hidden_new, obs_rep = {}, {}
         batch_size = state.shape[0]
-        seq_len = state.shape[1] if self.use_rnn else 1
-        critic_inputs = []
-
-        if self.use_rnn:
-            critic_inputs.append(state.unsqueeze(-2).repeat(1, 1, self.n_agents, 1))  # batch * T * N * dim_S
-        else:
-            critic_inputs.append(state.unsqueeze(-2).repeat(1, self.n_agents, 1))  # batch * N * dim_S
-
-        obs_rep = {}
         for key in self.model_keys:
             if self.use_rnn:
                 outputs = self.critic_representation[key](observation[key], *rnn_hidden[key])
@@ -600,85 +590,137 @@ class COMA_Policy(Module):
                 rnn_hidden_new[key] = [None, None]
             obs_rep[key] = outputs['state']
 
-        agent_mask = (1 - torch.eye(self.n_agents, dtype=torch.float32, device=self.device)).unsqueeze(-1)
         if self.use_parameter_sharing:
             key = self.model_keys[0]
-            agent_mask = agent_mask.repeat(1, 1, self.n_actions[key]).reshape(self.n_agents, -1).unsqueeze(0)
-            if self.use_rnn:
-                actions_input = actions[key].reshape(batch_size, seq_len, 1, -1).repeat(1, 1, self.n_agents, 1)
-                critic_inputs.append(obs_rep[key].reshape(batch_size, self.n_agents, seq_len, -1).transpose(1, 2))
-                critic_inputs.append(actions_input * agent_mask.unsqueeze(0))
-                critic_inputs.append(agent_ids.reshape(batch_size, self.n_agents, seq_len, -1).transpose(1, 2))
-            else:
-                actions_input = actions[key].reshape(batch_size, 1, -1).repeat(1, self.n_agents, 1)
-                critic_inputs.append(obs_rep[key].reshape(batch_size, self.n_agents, -1))
-                critic_inputs.append(actions_input * agent_mask)
-                critic_inputs.append(agent_ids.reshape(batch_size, self.n_agents, -1))
-            critic_inputs = torch.cat(critic_inputs, dim=-1)
+            obs_input = self._agents_dim(obs_rep[key], batch_size)
+            actions_input = self._agents_dim(actions[key], batch_size).float()
         else:
-            agent_mask = torch.cat([agent_mask[i].repeat(1, self.n_actions[k])
-                                    for i, k in enumerate(self.model_keys)], dim=-1).unsqueeze(0)
-            if self.use_rnn:
-                agent_mask = agent_mask.unsqueeze(1)
-                actions_input = torch.cat(itemgetter(*self.model_keys)(actions),
-                                          dim=-1).unsqueeze(-2).repeat(1, 1, self.n_agents, 1)  # batch * T * N * A
-                agent_ids = agent_ids.reshape(batch_size, self.n_agents, seq_len, -1).transpose(1, 2)
-            else:
-                actions_input = torch.cat(itemgetter(*self.model_keys)(actions),
-                                          dim=-1).unsqueeze(1).repeat(1, self.n_agents, 1)  # batch_size * N * A
-                agent_ids = agent_ids.reshape(batch_size, self.n_agents, -1)  # batch_size * N * N
-            critic_inputs.append(torch.stack(itemgetter(*self.model_keys)(obs_rep), dim=-2))
-            critic_inputs.append(actions_input * agent_mask)
-            critic_inputs.append(agent_ids)
-            critic_inputs = torch.cat(critic_inputs, dim=-1)
-
-        values = self.target_critic(critic_inputs) if target else self.critic(critic_inputs)
+            obs_input = torch.stack([obs_rep[k] for k in self.model_keys], dim=-2)
+            actions_input = [actions[k].float() for k in self.model_keys]
+            actions_input = torch.stack([nn.functional.pad(a, (0, self.n_actions_max - a.shape[-1]))
+                                         for a in actions_input], dim=-2)
+
+        critic = self.target_critic if target else self.critic
+        linear = critic.model[0]
+        w_state, w_obs, w_actions, w_ids = linear.weight.split(self.dim_critic_blocks, dim=-1)
+        w_actions = w_actions[:, self.action_slots] * self.action_slots_valid  # hidden * N * A
+        hidden_actions = torch.einsum('...na,hna->...nh', actions_input, w_actions)  # batch * (T) * N * hidden
+        hidden = nn.functional.linear(state, w_state, linear.bias).unsqueeze(-2) + \
+            nn.functional.linear(obs_input, w_obs) + hidden_actions.sum(dim=-2, keepdim=True) - hidden_actions + w_ids.T
+        values = critic.model[1:](hidden)
         return rnn_hidden_new, values
 
+    def _agents_dim(self, x: Tensor, batch_size: int):
+        """Reshapes the rows (batch_size * n_agents, (seq_len, ) dim) to (batch_size, (seq_len, ) n_agents, dim)."""
+        x = x.reshape([batch_size, self.n_agents] + list(x.shape[1:]))
+        return x.transpose(1, 2) if self.use_rnn else x
+
     def copy_target(self):
-        for ep, tp in zip(self.critic_representation.parameters(), self.target_critic_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.critic.parameters(), self.target_critic.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
+
 
+class MeanFieldActorCriticPolicy(MAAC_Policy):
+    """
+    The policy of Mean-Field Actor-Critic, whose critics are conditioned on the mean action of the neighbors.
+
+    Args:
+        action_space (Optional[Dict[str, Discrete]]): The discrete action space.
+        n_agents (int): The number of agents.
+        representation_actor (ModuleDict): A dict of representation modules for each agent's actor.
+        representation_critic (ModuleDict): A dict of representation modules for each agent's critic.
+        mean_field (MeanFieldAggregator): The aggregator that computes the mean actions of the neighbors.
+        actor_hidden_size (Sequence[int]): A list of hidden layer sizes for actor network.
+        critic_hidden_size (Sequence[int]): A list of hidden layer sizes for critic network.
+        normalize (Optional[ModuleType]): The layer normalization over a minibatch of inputs.
+        initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
+        activation (Optional[ModuleType]): The activation function for each layer.
+        device (Optional[Union[str, int, torch.device]]): The calculating device.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: The other args.
+    """
 
-class MeanFieldActorCriticPolicy(Module):
     def __init__(self,
-                 action_space: Discrete,
+                 action_space: Optional[Dict[str, Discrete]],
                  n_agents: int,
-                 representation: Module,
+                 representation_actor: ModuleDict,
+                 representation_critic: ModuleDict,
+                 mean_field: MeanFieldAggregator = None,
                  actor_hidden_size: Sequence[int] = None,
                  critic_hidden_size: Sequence[int] = None,
                  normalize: Optional[ModuleType] = None,
                  initialize: Optional[Callable[..., Tensor]] = None,
                  activation: Optional[ModuleType] = None,
                  device: Optional[Union[str, int, torch.device]] = None,
-                 **kwargs
-                 ):
-        super(MeanFieldActorCriticPolicy, self).__init__()
-        self.action_dim = action_space.n
-        self.representation = representation
-        self.representation_info_shape = self.representation.output_shapes
-        self.actor_net = CategoricalActorNet(representation.output_shapes['state'][0], self.action_dim, n_agents,
-                                             actor_hidden_size, normalize, initialize, kwargs['gain'], activation,
-                                             device)
-        self.critic_net = CriticNet(representation.output_shapes['state'][0] + self.action_dim, n_agents,
-                                    critic_hidden_size, normalize, initialize, activation, device)
-        self.parameters_actor = list(self.actor_net.parameters()) + list(self.representation.parameters())
-        self.parameters_critic = self.critic_net.parameters()
-        self.pi_dist = CategoricalDistribution(self.action_dim)
+                 use_distributed_training: bool = False,
+                 **kwargs):
+        super(MeanFieldActorCriticPolicy, self).__init__(action_space, n_agents, representation_actor,
+                                                         representation_critic, None, actor_hidden_size,
+                                                         critic_hidden_size, normalize, initialize, activation,
+                                                         device, use_distributed_training, **kwargs)
+        self.mean_field = mean_field
 
-    def forward(self, observation: Tensor, agent_ids: Tensor):
-        outputs = self.representation(observation)
-        input_actor = torch.concat([outputs['state'], agent_ids], dim=-1)
-        act_logits = self.actor_net(input_actor)
-        self.pi_dist.set_param(logits=act_logits)
-        return outputs, self.pi_dist
+    def _get_actor_critic_input(self, dim_action, dim_actor_rep, dim_critic_rep, n_agents):
+        """
+        Returns the input dimensions of actor netwrok and critic networks, the critics take the mean actions.
+        """
+        dim_actor_in, dim_actor_out, dim_critic_in, dim_critic_out = super(
+            MeanFieldActorCriticPolicy, self)._get_actor_critic_input(dim_action, dim_actor_rep, dim_critic_rep,
+                                                                      n_agents)
+        return dim_actor_in, dim_actor_out, dim_critic_in + dim_action, dim_critic_out
+
+    def get_values(self, observation: Dict[str, Tensor], actions_mean: Dict[str, Tensor] = None,
+                   agent_ids: Tensor = None, agent_key: str = None,
+                   rnn_hidden: Optional[Dict[str, List[Tensor]]] = None):
+        """
+        Get critic values via critic networks.
+
+        Parameters:
+            observation (Dict[str, Tensor]): The input observations for the policies.
+            actions_mean (Dict[str, Tensor]): The mean actions of the neighbors of the agents.
+            agent_ids (Tensor): The agents' ids (for parameter sharing).
+            agent_key (str): Calculate actions for specified agent.
+            rnn_hidden (Optional[Dict[str, List[Tensor]]]): The RNN hidden states of critic representation.
+
+        Returns:
+            rnn_hidden_new (Optional[Dict[str, List[Tensor]]]): The new RNN hidden states of critic representation.
+            values (dict): The evaluated critic values.
+        """
+        rnn_hidden_new, values = {}, {}
+        agent_list = self.model_keys if agent_key is None else [agent_key]
+
+        for key in agent_list:
+            if self.use_rnn:
+                outputs = self.critic_representation[key](observation[key], *rnn_hidden[key])
+                rnn_hidden_new[key] = (outputs['rnn_hidden'], outputs['rnn_cell'])
+            else:
+                outputs = self.critic_representation[key](observation[key])
+                rnn_hidden_new[key] = [None, None]
+
+            if self.use_parameter_sharing:
+                critic_input = torch.concat([outputs['state'], actions_mean[key], agent_ids], dim=-1)
+            else:
+                critic_input = torch.concat([outputs['state'], actions_mean[key]], dim=-1)
+
+            values[key] = self.critic[key](critic_input)
+
+        return rnn_hidden_new, values
+
+    def mean_actions(self, actions: Dict[str, Tensor], agent_mask: Optional[Tensor] = None,
+                     positions: Optional[Tensor] = None):
+        """
+        Returns the mean actions of the neighbors, computed from the sampled actions of all agents.
 
-    def critic(self, observation: Tensor, actions_mean: Tensor, agent_ids: Tensor):
-        outputs = self.representation(observation)
-        critic_in = torch.concat([outputs['state'], actions_mean, agent_ids], dim=-1)
-        return self.critic_net(critic_in)
+        Parameters:
+            actions (Dict[str, Tensor]): The sampled actions of the policies.
+            agent_mask (Optional[Tensor]): The alive agents, (batch_size, n_agents), default is None.
+            positions (Optional[Tensor]): The positions of the agents, (batch_size, n_agents, dim_position).
+
+        Returns:
+            actions_mean (Dict[str, Tensor]): The mean actions of the neighbors of the agents.
+        """
+        actions_onehot = {key: nn.functional.one_hot(actions[key].long(), self.n_actions[key]).float()
+                          for key in self.model_keys}
+        return self.mean_field.split(self.mean_field(self.mean_field.stack(actions_onehot), agent_mask, positions))
 
 
 class Basic_ISAC_Policy(Module):
@@ -697,7 +739,7 @@ class Basic_ISAC_Policy(Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
         **kwargs: Other arguments.
     """
 
@@ -745,23 +787,12 @@ class Basic_ISAC_Policy(Module):
         self.target_critic_1 = deepcopy(self.critic_1)
         self.target_critic_2 = deepcopy(self.critic_2)
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            for key in self.model_keys:
-                if self.actor_representation[key]._get_name() != "Basic_Identical":
-                    self.actor_representation[key] = DistributedDataParallel(self.actor_representation[key],
-                                                                             device_ids=[self.rank])
-                if self.critic_1_representation[key]._get_name() != "Basic_Identical":
-                    self.critic_1_representation[key] = DistributedDataParallel(self.critic_1_representation[key],
-                                                                                device_ids=[self.rank])
-                if self.critic_2_representation[key]._get_name() != "Basic_Identical":
-                    self.critic_2_representation[key] = DistributedDataParallel(self.critic_2_representation[key],
-                                                                                device_ids=[self.rank])
-                self.actor[key] = DistributedDataParallel(module=self.actor[key], device_ids=[self.rank])
-                self.critic_1[key] = DistributedDataParallel(module=self.critic_1[key], device_ids=[self.rank])
-                self.critic_2[key] = DistributedDataParallel(module=self.critic_2[key], device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.critic_1_representation, self.critic_1,
+                                                      self.critic_2_representation, self.critic_2],
+                                              target=[self.target_critic_1_representation, self.target_critic_1,
+                                                      self.target_critic_2_representation, self.target_critic_2])
 
     @property
     def parameters_actor(self):
@@ -1021,18 +1052,7 @@ class Basic_ISAC_Policy(Module):
         return rnn_hidden_critic_new_1, rnn_hidden_critic_new_2, q_1, q_2
 
     def soft_update(self, tau=0.005):
-        for ep, tp in zip(self.critic_1_representation.parameters(), self.target_critic_1_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_1.parameters(), self.target_critic_1.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_2_representation.parameters(), self.target_critic_2_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_2.parameters(), self.target_critic_2.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
+        self.target_networks.soft_update(tau)
 
 
 class MASAC_Policy(Basic_ISAC_Policy):
@@ -1051,7 +1071,7 @@ class MASAC_Policy(Basic_ISAC_Policy):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
         **kwargs: Other arguments.
     """
 
@@ -1,12 +1,8 @@
 import torch
 import torch.nn as nn
 import numpy as np
-from xuance.common import Optional, Union
+from xuance.common import Optional, Union, Tuple
 from xuance.torch import Tensor
-try:
-    import torch_scatter
-except ImportError:
-    print("The module torch_scatter is not installed.")
 
 
 class DCG_utility(nn.Module):
@@ -105,16 +101,29 @@ class Coordination_Graph(object):
     """
     Construct a deep coordination graph.
 
+    The "KNN" and "RANGE" graphs are dynamic: their edges are built for every sample from the positions of the
+    agents with dynamic_edges(), connecting each agent to its n_neighbors nearest agents, or to the agents within
+    graph_range. The other graphs are static.
+
     Args:
         n_vertexes (int): The number of vertexes in the graph.
         graph_type (str): The type of graph, default is "FULL".
+        device (Optional[Union[str, int, torch.device]]): The device for the edge tensors, default is None.
+        n_neighbors (int): The number of nearest neighbors of each agent for the "KNN" graph.
+        graph_range (float): The distance within which agents are connected for the "RANGE" graph.
     """
     def __init__(self,
                  n_vertexes: int,
                  graph_type: str = "FULL",
-                 device: Optional[Union[str, int, torch.device]] = None):
+                 device: Optional[Union[str, int, torch.device]] = None,
+                 n_neighbors: int = 3,
+                 graph_range: float = 1.0):
         self.n_vertexes = n_vertexes
+        self.graph_type = graph_type
         self.device = device
+        self.n_neighbors = min(n_neighbors, n_vertexes - 1)
+        self.graph_range = graph_range
+        self.dynamic = graph_type in ["KNN", "RANGE"]
         self.edges = []
         if graph_type == "CYCLE":
             self.edges = [(i, i + 1) for i in range(self.n_vertexes - 1)] + [(self.n_vertexes - 1, 0)]
@@ -122,7 +131,7 @@ class Coordination_Graph(object):
             self.edges = [(i, i + 1) for i in range(self.n_vertexes - 1)]
         elif graph_type == "STAR":
             self.edges = [(0, i + 1) for i in range(self.n_vertexes - 1)]
-        elif graph_type == "VDN":
+        elif graph_type in ["VDN", "KNN", "RANGE"]:
             pass
         elif graph_type == "FULL":
             self.edges = [[(j, i + j + 1) for i in range(self.n_vertexes - j - 1)] for j in range(self.n_vertexes - 1)]
@@ -135,14 +144,121 @@ class Coordination_Graph(object):
 
     def set_coordination_graph(self):
         """ Reset the coordination graph. """
-        self.edges_from = torch.zeros(self.n_edges).long().to(self.device)
-        self.edges_to = torch.zeros(self.n_edges).long().to(self.device)
-        for i, edge in enumerate(self.edges):
-            self.edges_from[i] = edge[0]
-            self.edges_to[i] = edge[1]
-        self.edges_n_in = torch_scatter.scatter_add(src=self.edges_to.new_ones(len(self.edges_to)),
-                                                    index=self.edges_to, dim=0, dim_size=self.n_vertexes) \
-                          + torch_scatter.scatter_add(src=self.edges_to.new_ones(len(self.edges_to)),
-                                                      index=self.edges_from, dim=0, dim_size=self.n_vertexes)
-        self.edges_n_in = self.edges_n_in.float()
+        edges = torch.tensor(self.edges, dtype=torch.long).reshape(-1, 2)
+        self.edges_from = edges[:, 0].to(self.device)
+        self.edges_to = edges[:, 1].to(self.device)
+        self.edges_n_in = torch.bincount(edges.reshape(-1), minlength=self.n_vertexes).float().to(self.device)
+        self.diameter = None if self.dynamic else self._tree_diameter()
         return
+
+    def dynamic_edges(self, positions: Tensor):
+        """
+        Builds the edges of a dynamic graph for a batch of samples.
+
+        The samples are folded into one graph of batch_size * n_vertexes vertexes, whose edges never cross samples,
+        so that the payoffs and the messages of all the edges of the batch are computed at once.
+
+        Args:
+            positions (Tensor): The positions of the agents, with shape [batch_size, n_vertexes, dim_position].
+
+        Returns:
+            edges_from (Tensor): The first vertex of each edge, indexing the batch_size * n_vertexes vertexes.
+            edges_to (Tensor): The second vertex of each edge.
+            edges_sample (Tensor): The sample of each edge.
+        """
+        distances = torch.cdist(positions, positions)
+        self_loops = torch.eye(self.n_vertexes, dtype=torch.bool, device=positions.device)
+        if self.graph_type == "KNN":
+            neighbors = distances.masked_fill(self_loops, float("inf")).topk(self.n_neighbors, dim=-1,
+                                                                                largest=False).indices
+            adjacency = torch.zeros_like(distances, dtype=torch.bool).scatter_(-1, neighbors, True)
+            adjacency = adjacency | adjacency.transpose(-1, -2)
+        else:
+            adjacency = (distances <= self.graph_range) & ~self_loops
+        edges_sample, edges_from, edges_to = adjacency.triu(diagonal=1).nonzero(as_tuple=True)
+        offsets = edges_sample * self.n_vertexes
+        return edges_from + offsets, edges_to + offsets, edges_sample
+
+    def _tree_diameter(self):
+        """Returns the diameter of the graph if it is a tree, i.e., the number of message passing iterations after
+        which max-sum is exact, otherwise None."""
+        if self.n_edges != self.n_vertexes - 1:
+            return None
+        neighbors = [[] for _ in range(self.n_vertexes)]
+        for i, j in self.edges:
+            neighbors[i].append(j)
+            neighbors[j].append(i)
+
+        def farthest(source):
+            distances = {source: 0}
+            queue = [source]
+            for vertex in queue:
+                for neighbor in neighbors[vertex]:
+                    if neighbor not in distances:
+                        distances[neighbor] = distances[vertex] + 1
+                        queue.append(neighbor)
+            vertex = max(distances, key=distances.get)
+            return vertex, distances[vertex], len(distances)
+
+        vertex, _, n_reached = farthest(0)
+        if n_reached != self.n_vertexes:  # Not connected, hence not a tree.
+            return None
+        return farthest(vertex)[1]
+
+    def max_sum(self,
+                utilities: Tensor,
+                payoffs: Tensor,
+                n_iterations: int,
+                msg_normalized: bool = True,
+                msg_tolerance: float = 0.0,
+                edges: Optional[Tuple[Tensor, Tensor]] = None):
+        """
+        Max-sum message passing (belief propagation) over the coordination graph.
+
+        The messages of all edges are updated at once, and the messages received by every vertex are summed with
+        index_add. On a tree, max-sum is exact after as many iterations as the diameter of the tree, so the
+        iterations are capped by it.
+
+        Args:
+            utilities (Tensor): The utilities of the vertexes, with shape [batch_size, n_vertexes, n_actions].
+            payoffs (Tensor): The payoffs f_ij(a_i, a_j) of the edges, with shape [batch_size, n_edges, n_actions,
+                n_actions], or [n_edges, n_actions, n_actions] for the edges of a dynamic graph.
+            n_iterations (int): The maximum number of message passing iterations.
+            msg_normalized (bool): Whether to subtract the mean of each message (Kok and Vlassis, 2006).
+            msg_tolerance (float): Stops early when no message changes by more than this value, 0 to disable.
+            edges (Optional[Tuple[Tensor, Tensor]]): The edges_from and edges_to of a dynamic graph given by
+                dynamic_edges(), default is None for the static edges.
+
+        Returns: The beliefs of the vertexes, i.e., the utilities plus the received messages, whose argmax gives the
+            greedy actions.
+        """
+        if edges is not None:  # The samples are folded into one graph.
+            beliefs = self._max_sum(utilities.reshape(1, -1, utilities.shape[-1]), payoffs.unsqueeze(0), *edges,
+                                    n_iterations, msg_normalized, msg_tolerance)
+            return beliefs.reshape(utilities.shape)
+        if self.diameter is not None:
+            n_iterations = min(n_iterations, self.diameter)
+        return self._max_sum(utilities, payoffs, self.edges_from, self.edges_to, n_iterations, msg_normalized,
+                             msg_tolerance)
+
+    @staticmethod
+    def _max_sum(utilities, payoffs, edges_from, edges_to, n_iterations, msg_normalized, msg_tolerance):
+        if len(edges_from) == 0 or n_iterations == 0:
+            return utilities
+        payoffs_ji = payoffs.transpose(dim0=-1, dim1=-2)
+        msg_ij = utilities.new_zeros(utilities.shape[0], len(edges_from), utilities.shape[-1])  # i -> j (send)
+        msg_ji = torch.zeros_like(msg_ij)  # j -> i (receive)
+        beliefs = utilities
+        for _ in range(n_iterations):
+            msg_ij_new = ((beliefs[:, edges_from] - msg_ji).unsqueeze(dim=-1) + payoffs).amax(dim=-2)
+            msg_ji_new = ((beliefs[:, edges_to] - msg_ij).unsqueeze(dim=-1) + payoffs_ji).amax(dim=-2)
+            if msg_normalized:
+                msg_ij_new -= msg_ij_new.mean(dim=-1, keepdim=True)
+                msg_ji_new -= msg_ji_new.mean(dim=-1, keepdim=True)
+            converged = msg_tolerance > 0 and max((msg_ij_new - msg_ij).abs().max(),
+                                                  (msg_ji_new - msg_ji).abs().max()) <= msg_tolerance
+            msg_ij, msg_ji = msg_ij_new, msg_ji_new
+            beliefs = utilities.index_add(1, edges_to, msg_ij).index_add(1, edges_from, msg_ji)
+            if converged:
+                break
+        return beliefs
@@ -2,7 +2,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from gym.spaces import Discrete
-from xuance.common import Sequence, Optional, Callable, Union, Dict
+from xuance.common import Sequence, Optional, Callable, Union, Dict, List
 from xuance.torch import Tensor, Module
 from xuance.torch.utils import ModuleType, mlp_block, gru_block, lstm_block
 from xuance.torch.utils import CategoricalDistribution, DiagGaussianDistribution, ActivatedDiagGaussianDistribution
@@ -308,6 +308,14 @@ class CategoricalActorNet(Module):
         self.model = nn.Sequential(*layers)
         self.dist = CategoricalDistribution(action_dim)
 
+    def dist_param(self, x: Tensor):
+        """
+        Returns the parameters of the distribution, i.e., the keyword arguments of self.dist.set_param.
+        Parameters:
+            x (Tensor): The input tensor.
+        """
+        return {'logits': self.model(x)}
+
     def forward(self, x: Tensor, avail_actions: Optional[Tensor] = None):
         """
         Returns the stochastic distribution over all discrete actions.
@@ -318,7 +326,7 @@ class CategoricalActorNet(Module):
         Returns:
             self.dist: CategoricalDistribution(action_dim), a distribution over all discrete actions.
         """
-        logits = self.model(x)
+        logits = self.dist_param(x)['logits']
         if avail_actions is not None:
             logits[avail_actions == 0] = -1e10
         self.dist.set_param(logits=logits)
@@ -404,6 +412,14 @@ class GaussianActorNet(Module):
         self.logstd = nn.Parameter(-torch.ones((action_dim,), device=device))
         self.dist = DiagGaussianDistribution(action_dim)
 
+    def dist_param(self, x: Tensor):
+        """
+        Returns the parameters of the distribution, i.e., the keyword arguments of self.dist.set_param.
+        Parameters:
+            x (Tensor): The input tensor.
+        """
+        return {'mu': self.mu(x), 'std': self.logstd.exp()}
+
     def forward(self, x: Tensor):
         """
         Returns the stochastic distribution over the continuous action space.
@@ -413,7 +429,7 @@ class GaussianActorNet(Module):
         Returns:
             self.dist: A distribution over the continuous action space.
         """
-        self.dist.set_param(self.mu(x), self.logstd.exp())
+        self.dist.set_param(**self.dist_param(x))
         return self.dist
 
 
@@ -490,6 +506,17 @@ class GaussianActorNet_SAC(Module):
         self.out_log_std = nn.Linear(hidden_sizes[-1], action_dim, device=device)
         self.dist = ActivatedDiagGaussianDistribution(action_dim, activation_action, device)
 
+    def dist_param(self, x: Tensor):
+        """
+        Returns the parameters of the distribution, i.e., the keyword arguments of self.dist.set_param.
+        Parameters:
+            x (Tensor): The input tensor.
+        """
+        output = self.output(x)
+        mu = self.out_mu(output)
+        log_std = torch.clamp(self.out_log_std(output), -20, 2)
+        return {'mu': mu, 'std': log_std.exp()}
+
     def forward(self, x: Tensor):
         """
         Returns the stochastic distribution over the continuous action space.
@@ -499,14 +526,43 @@ class GaussianActorNet_SAC(Module):
         Returns:
             self.dist: A distribution over the continuous action space.
         """
-        output = self.output(x)
-        mu = self.out_mu(output)
-        log_std = torch.clamp(self.out_log_std(output), -20, 2)
-        std = log_std.exp()
-        self.dist.set_param(mu, std)
+        self.dist.set_param(**self.dist_param(x))
         return self.dist
 
 
+def encode_states(inputs: Sequence[tuple]):
+    """
+    Evaluates the linear layers that read the global states for one or more mixers: the layers that read the same
+    states (the same tensor) are concatenated into one layer, so that the states are read with one matrix product.
+
+    Parameters:
+        inputs (Sequence[tuple]): A list of (states, layers), where the states is a tensor with shape [batch, dim_state]
+            and the layers is a list of (weight, bias) of the layers that read the states, see QMIX_mixer.state_layers.
+
+    Returns:
+        outputs (List[List[Tensor]]): The outputs of the layers for each item of the inputs.
+    """
+    groups = []  # [states, weights, biases, [(index of inputs, number of layers)]]
+    for i, (states, layers) in enumerate(inputs):
+        for group in groups:
+            if group[0] is states:
+                break
+        else:
+            group = [states, [], [], []]
+            groups.append(group)
+        group[1].extend([weight for weight, _ in layers])
+        group[2].extend([bias for _, bias in layers])
+        group[3].append((i, len(layers)))
+
+    outputs = [None] * len(inputs)
+    for states, weights, biases, items in groups:
+        group_output = F.linear(states, torch.cat(weights, dim=0), torch.cat(biases, dim=0))
+        features = list(group_output.split([weight.shape[0] for weight in weights], dim=-1))
+        for i, n_layers in items:
+            outputs[i], features = features[:n_layers], features[n_layers:]
+    return outputs
+
+
 class VDN_mixer(nn.Module):
     """
     The value decomposition networks mixer. (Additivity)
@@ -557,37 +613,58 @@ class QMIX_mixer(nn.Module):
                                        nn.ReLU(),
                                        nn.Linear(self.dim_hypernet_hidden, 1)).to(device)
 
-    def forward(self, values_n, states):
+    @property
+    def state_layers(self):
+        """The (weight, bias) of the layers that read the global states, see encode_states."""
+        return [(self.hyper_w_1[0].weight, self.hyper_w_1[0].bias),
+                (self.hyper_w_2[0].weight, self.hyper_w_2[0].bias),
+                (self.hyper_b_1.weight, self.hyper_b_1.bias),
+                (self.hyper_b_2[0].weight, self.hyper_b_2[0].bias)]
+
+    def mix(self, values_n, state_features):
         """
-        Returns the total Q-values for multi-agent team.
+        Returns the total Q-values for multi-agent team from the outputs of the state layers.
 
         Parameters:
             values_n: The individual values for agents in team.
-            states: The global states.
+            state_features: The outputs of self.state_layers for the global states.
 
         Returns:
             q_tot: The total Q-values for the multi-agent team.
         """
-        states = torch.as_tensor(states, dtype=torch.float32, device=self.device)
-        states = states.reshape(-1, self.dim_state)
+        hidden_w_1, hidden_w_2, b_1, hidden_b_2 = state_features
         agent_qs = values_n.reshape(-1, 1, self.n_agents)
         # First layer
-        w_1 = torch.abs(self.hyper_w_1(states))
+        w_1 = torch.abs(self.hyper_w_1[2](self.hyper_w_1[1](hidden_w_1)))
         w_1 = w_1.view(-1, self.n_agents, self.dim_hidden)
-        b_1 = self.hyper_b_1(states)
         b_1 = b_1.view(-1, 1, self.dim_hidden)
-        hidden = F.elu(torch.bmm(agent_qs, w_1) + b_1)
+        hidden = F.elu(torch.baddbmm(b_1, agent_qs, w_1))
         # Second layer
-        w_2 = torch.abs(self.hyper_w_2(states))
+        w_2 = torch.abs(self.hyper_w_2[2](self.hyper_w_2[1](hidden_w_2)))
         w_2 = w_2.view(-1, self.dim_hidden, 1)
-        b_2 = self.hyper_b_2(states)
+        b_2 = self.hyper_b_2[2](self.hyper_b_2[1](hidden_b_2))
         b_2 = b_2.view(-1, 1, 1)
         # Compute final output
-        y = torch.bmm(hidden, w_2) + b_2
+        y = torch.baddbmm(b_2, hidden, w_2)
         # Reshape and return
         q_tot = y.view(-1, 1)
         return q_tot
 
+    def forward(self, values_n, states):
+        """
+        Returns the total Q-values for multi-agent team.
+
+        Parameters:
+            values_n: The individual values for agents in team.
+            states: The global states.
+
+        Returns:
+            q_tot: The total Q-values for the multi-agent team.
+        """
+        states = torch.as_tensor(states, dtype=torch.float32, device=self.device)
+        states = states.reshape(-1, self.dim_state)
+        return self.mix(values_n, encode_states([(states, self.state_layers)])[0])
+
 
 class QMIX_FF_mixer(nn.Module):
     """
@@ -616,23 +693,41 @@ class QMIX_FF_mixer(nn.Module):
                                          nn.ReLU(),
                                          nn.Linear(self.dim_hidden, 1)).to(self.device)
 
-    def forward(self, values_n, states=None):
+    @property
+    def state_layers(self):
+        """The (weight, bias) of the layers that read the global states, see encode_states."""
+        return [(self.ff_net[0].weight[:, self.n_agents:], self.ff_net[0].bias),
+                (self.ff_net_bias[0].weight, self.ff_net_bias[0].bias)]
+
+    def mix(self, values_n, state_features):
         """
-        Returns the feedforward total Q-values.
+        Returns the feedforward total Q-values from the outputs of the state layers.
 
         Parameters:
             values_n: The individual Q-values.
-            states: The global states.
+            state_features: The outputs of self.state_layers for the global states.
         """
-        states = states.reshape(-1, self.dim_state)
+        hidden_states, hidden_bias = state_features
         agent_qs = values_n.view([-1, self.n_agents])
-        inputs = torch.cat([agent_qs, states], dim=-1).to(self.device)
-        out_put = self.ff_net(inputs)
-        bias = self.ff_net_bias(states)
+        out_put = hidden_states + F.linear(agent_qs, self.ff_net[0].weight[:, :self.n_agents])
+        for layer in self.ff_net[1:]:
+            out_put = layer(out_put)
+        bias = self.ff_net_bias[2](self.ff_net_bias[1](hidden_bias))
         y = out_put + bias
         q_tot = y.view([-1, 1])
         return q_tot
 
+    def forward(self, values_n, states=None):
+        """
+        Returns the feedforward total Q-values.
+
+        Parameters:
+            values_n: The individual Q-values.
+            states: The global states.
+        """
+        states = states.reshape(-1, self.dim_state)
+        return self.mix(values_n, encode_states([(states, self.state_layers)])[0])
+
 
 class QTRAN_base(nn.Module):
     """
@@ -682,7 +777,14 @@ class QTRAN_base(nn.Module):
                                              nn.ReLU(),
                                              nn.Linear(self.dim_ae_input, self.dim_ae_input)).to(device)
 
-    def forward(self, states: Tensor, hidden_state_inputs: Tensor, actions_onehot: Tensor):
+    @property
+    def state_layers(self):
+        """The (weight, bias) of the layers that read the global states, see encode_states."""
+        return [(self.Q_jt[0].weight[:, :self.dim_state], self.Q_jt[0].bias),
+                (self.V_jt[0].weight, self.V_jt[0].bias)]
+
+    def forward(self, states: Tensor, hidden_state_inputs: Tensor, actions_onehot: Tensor,
+                state_features: Optional[List[Tensor]] = None):
         """
         Calculating the joint Q and V values.
 
@@ -690,18 +792,25 @@ class QTRAN_base(nn.Module):
             states (Tensor): The global states.
             hidden_state_inputs (Tensor): The joint hidden states inputs for QTRAN network.
             actions_onehot (Tensor): The joint onehot actions for QTRAN network.
+            state_features (Optional[List[Tensor]]): The outputs of self.state_layers for the states, which can be
+                shared between the calls with the same states, default is None.
 
         Returns:
             q_jt (Tensor): The evaluated joint Q values.
             v_jt (Tensor): The evaluated joint V values.
         """
+        if state_features is None:
+            state_features = encode_states([(states, self.state_layers)])[0]
+        hidden_q, hidden_v = state_features
         h_state_action_input = torch.cat([hidden_state_inputs, actions_onehot], dim=-1)
         h_state_action_encode = self.action_encoding(h_state_action_input).reshape(-1, self.n_agents, self.dim_ae_input)
         h_state_action_encode = h_state_action_encode.sum(dim=1)  # Sum across agents
-        input_q = torch.cat([states, h_state_action_encode], dim=-1)
-        input_v = states
-        q_jt = self.Q_jt(input_q)
-        v_jt = self.V_jt(input_v)
+        q_jt = hidden_q + F.linear(h_state_action_encode, self.Q_jt[0].weight[:, self.dim_state:])
+        for layer in self.Q_jt[1:]:
+            q_jt = layer(q_jt)
+        v_jt = hidden_v
+        for layer in self.V_jt[1:]:
+            v_jt = layer(v_jt)
         return q_jt, v_jt
 
 
@@ -755,32 +864,44 @@ class QTRAN_alt(nn.Module):
                                              nn.ReLU(),
                                              nn.Linear(self.dim_ae_input, self.dim_ae_input)).to(device)
 
-    def forward(self, states: Tensor, hidden_state_inputs: Tensor, actions_onehot: Tensor):
+    @property
+    def state_layers(self):
+        """The (weight, bias) of the layers that read the global states, see encode_states."""
+        return [(self.Q_jt[0].weight[:, :self.dim_state], self.Q_jt[0].bias),
+                (self.V_jt[0].weight, self.V_jt[0].bias)]
+
+    def forward(self, states: Tensor, hidden_state_inputs: Tensor, actions_onehot: Tensor,
+                state_features: Optional[List[Tensor]] = None):
         """Calculating the joint Q and V values.
 
         Parameters:
             states (Tensor): The global states.
             hidden_state_inputs (Tensor): The joint hidden states inputs for QTRAN network.
             actions_onehot (Tensor): The joint onehot actions for QTRAN network.
+            state_features (Optional[List[Tensor]]): The outputs of self.state_layers for the states, which can be
+                shared between the calls with the same states, default is None.
 
         Returns:
             q_jt (Tensor): The evaluated joint Q values.
             v_jt (Tensor): The evaluated joint V values.
         """
+        if state_features is None:
+            state_features = encode_states([(states, self.state_layers)])[0]
+        hidden_q, hidden_v = state_features
         h_state_action_input = torch.cat([hidden_state_inputs, actions_onehot], dim=-1)
         h_state_action_encode = self.action_encoding(h_state_action_input).reshape(-1, self.n_agents, self.dim_ae_input)
-        bs, dim_h = h_state_action_encode.shape[0], h_state_action_encode.shape[-1]
-        agent_ids = torch.eye(self.n_agents, dtype=torch.float32, device=self.device)
-        agent_masks = (1 - agent_ids)
-        repeat_agent_ids = agent_ids.unsqueeze(0).repeat(bs, 1, 1)
-        repeated_agent_masks = agent_masks.unsqueeze(0).unsqueeze(-1).repeat(bs, 1, 1, dim_h)
-        repeated_h_state_action_encode = h_state_action_encode.unsqueeze(2).repeat(1, 1, self.n_agents, 1)
-        h_state_action_encode = repeated_h_state_action_encode * repeated_agent_masks
-        h_state_action_encode = h_state_action_encode.sum(dim=2)  # Sum across other agents
-
-        repeated_states = states.unsqueeze(1).repeat(1, self.n_agents, 1)
-        input_q = torch.cat([repeated_states, h_state_action_encode, repeat_agent_ids], dim=-1)
-        input_v = states
-        q_jt = self.Q_jt(input_q)
-        v_jt = self.V_jt(input_v)
+        # Sum across other agents: the masked sum over the repeated encodings of each agent, (1 - I) * h_i, reduces to
+        # (n_agents - 1) * h_i.
+        h_state_action_encode = h_state_action_encode * (self.n_agents - 1)
+
+        # The states and the agent ids are the same for all agents, so their parts of the first layer of Q_jt are
+        # calculated once and broadcast to the agents instead of repeating the inputs.
+        weight_encode = self.Q_jt[0].weight[:, self.dim_state:self.dim_state + self.dim_ae_input]
+        weight_ids = self.Q_jt[0].weight[:, self.dim_state + self.dim_ae_input:]
+        q_jt = hidden_q.unsqueeze(1) + F.linear(h_state_action_encode, weight_encode) + weight_ids.t().unsqueeze(0)
+        for layer in self.Q_jt[1:]:
+            q_jt = layer(q_jt)
+        v_jt = hidden_v
+        for layer in self.V_jt[1:]:
+            v_jt = layer(v_jt)
         return q_jt, v_jt
@@ -1,12 +1,11 @@
-import os
 import torch
 import numpy as np
 import torch.nn as nn
 from xuance.common import Sequence, Optional, Callable, Union
 from copy import deepcopy
 from gym.spaces import Space, Discrete
-from xuance.torch import Module, Tensor, DistributedDataParallel
-from xuance.torch.utils import ModuleType
+from xuance.torch import Module, Tensor
+from xuance.torch.utils import ModuleType, TargetNetworks
 from .core import BasicQhead, BasicRecurrent, DuelQhead, C51Qhead, QRDQNhead, ActorNet, CriticNet
 
 
@@ -22,7 +21,7 @@ class BasicQnetwork(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -43,13 +42,10 @@ class BasicQnetwork(Module):
                                      normalize, initialize, activation, device)
         self.target_Qhead = deepcopy(self.eval_Qhead)
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.eval_Qhead = DistributedDataParallel(module=self.eval_Qhead, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.representation, self.eval_Qhead],
+                                              target=[self.target_representation, self.target_Qhead])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -86,10 +82,7 @@ class BasicQnetwork(Module):
         return outputs_target, argmax_action.detach(), targetQ.detach()
 
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qhead.parameters(), self.target_Qhead.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
 
 
 class DuelQnetwork(Module):
@@ -104,7 +97,7 @@ class DuelQnetwork(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -124,13 +117,10 @@ class DuelQnetwork(Module):
         self.eval_Qhead = DuelQhead(self.representation.output_shapes['state'][0], self.action_dim, hidden_size,
                                     normalize, initialize, activation, device)
         self.target_Qhead = deepcopy(self.eval_Qhead)
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.eval_Qhead = DistributedDataParallel(module=self.eval_Qhead, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.representation, self.eval_Qhead],
+                                              target=[self.target_representation, self.target_Qhead])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -167,10 +157,7 @@ class DuelQnetwork(Module):
         return outputs_target, argmax_action, targetQ
 
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qhead.parameters(), self.target_Qhead.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
 
 
 class NoisyQnetwork(Module):
@@ -185,7 +172,7 @@ class NoisyQnetwork(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -208,13 +195,10 @@ class NoisyQnetwork(Module):
         self.noise_scale = 0.0
         self.eval_noise_parameter = []
         self.target_noise_parameter = []
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.eval_Qhead = DistributedDataParallel(module=self.eval_Qhead, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.representation, self.eval_Qhead],
+                                              target=[self.target_representation, self.target_Qhead])
 
     def update_noise(self, noisy_bound: float = 0.0):
         """Updates the noises for network parameters."""
@@ -265,10 +249,7 @@ class NoisyQnetwork(Module):
         return outputs, argmax_action, targetQ.detach()
 
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qhead.parameters(), self.target_Qhead.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
 
 
 class C51Qnetwork(Module):
@@ -286,7 +267,7 @@ class C51Qnetwork(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -315,13 +296,10 @@ class C51Qnetwork(Module):
         self.supports = torch.nn.Parameter(torch.linspace(self.v_min, self.v_max, self.atom_num),
                                            requires_grad=False).to(device)
         self.deltaz = (v_max - v_min) / (atom_num - 1)
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.eval_Zhead = DistributedDataParallel(module=self.eval_Zhead, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.representation, self.eval_Zhead],
+                                              target=[self.target_representation, self.target_Zhead])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -360,10 +338,7 @@ class C51Qnetwork(Module):
         return outputs_target, argmax_action, target_Z
 
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Zhead.parameters(), self.target_Zhead.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
 
 
 class QRDQN_Network(Module):
@@ -379,7 +354,7 @@ class QRDQN_Network(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -401,13 +376,10 @@ class QRDQN_Network(Module):
         self.eval_Zhead = QRDQNhead(self.representation.output_shapes['state'][0], self.action_dim, self.quantile_num,
                                     hidden_size, normalize, initialize, activation, device)
         self.target_Zhead = deepcopy(self.eval_Zhead)
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.eval_Zhead = DistributedDataParallel(module=self.eval_Zhead, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.representation, self.eval_Zhead],
+                                              target=[self.target_representation, self.target_Zhead])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -446,10 +418,7 @@ class QRDQN_Network(Module):
         return outputs, argmax_action, target_Z
 
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Zhead.parameters(), self.target_Zhead.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
 
 
 class DDPGPolicy(Module):
@@ -466,7 +435,7 @@ class DDPGPolicy(Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -500,16 +469,12 @@ class DDPGPolicy(Module):
         self.actor_parameters = list(self.actor_representation.parameters()) + list(self.actor.parameters())
         self.critic_parameters = list(self.critic_representation.parameters()) + list(self.critic.parameters())
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.actor_representation._get_name() != "Basic_Identical":
-                self.actor_representation = DistributedDataParallel(self.actor_representation, device_ids=[self.rank])
-            if self.critic_representation._get_name() != "Basic_Identical":
-                self.critic_representation = DistributedDataParallel(self.critic_representation, device_ids=[self.rank])
-            self.actor = DistributedDataParallel(module=self.actor, device_ids=[self.rank])
-            self.critic = DistributedDataParallel(module=self.critic, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.actor_representation, self.actor,
+                                                      self.critic_representation, self.critic],
+                                              target=[self.target_actor_representation, self.target_actor,
+                                                      self.target_critic_representation, self.target_critic])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -549,18 +514,7 @@ class DDPGPolicy(Module):
         return q_eval[:, 0]
 
     def soft_update(self, tau=0.005):
-        for ep, tp in zip(self.actor_representation.parameters(), self.target_actor_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.actor.parameters(), self.target_actor.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_representation.parameters(), self.target_critic_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic.parameters(), self.target_critic.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
+        self.target_networks.soft_update(tau)
 
 
 class TD3Policy(Module):
@@ -577,7 +531,7 @@ class TD3Policy(Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -619,21 +573,14 @@ class TD3Policy(Module):
             self.critic_A.parameters()) + list(self.critic_B_representation.parameters()) + list(
             self.critic_B.parameters())
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.actor_representation._get_name() != "Basic_Identical":
-                self.actor_representation = DistributedDataParallel(self.actor_representation, device_ids=[self.rank])
-            if self.critic_A_representation._get_name() != "Basic_Identical":
-                self.critic_A_representation = DistributedDataParallel(self.critic_A_representation,
-                                                                       device_ids=[self.rank])
-            if self.critic_B_representation._get_name() != "Basic_Identical":
-                self.critic_B_representation = DistributedDataParallel(self.critic_B_representation,
-                                                                       device_ids=[self.rank])
-            self.actor = DistributedDataParallel(module=self.actor, device_ids=[self.rank])
-            self.critic_A = DistributedDataParallel(module=self.critic_A, device_ids=[self.rank])
-            self.critic_B = DistributedDataParallel(module=self.critic_B, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.actor_representation, self.actor,
+                                                      self.critic_A_representation, self.critic_A,
+                                                      self.critic_B_representation, self.critic_B],
+                                              target=[self.target_actor_representation, self.target_actor,
+                                                      self.target_critic_A_representation, self.target_critic_A,
+                                                      self.target_critic_B_representation, self.target_critic_B])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -683,24 +630,7 @@ class TD3Policy(Module):
         return (q_eval_a + q_eval_b) / 2.0
 
     def soft_update(self, tau=0.005):
-        for ep, tp in zip(self.actor_representation.parameters(), self.target_actor_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.actor.parameters(), self.target_actor.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_A_representation.parameters(), self.target_critic_A_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_A.parameters(), self.target_critic_A.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_B_representation.parameters(), self.target_critic_B_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_B.parameters(), self.target_critic_B.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
+        self.target_networks.soft_update(tau)
 
 
 class PDQNPolicy(Module):
@@ -718,7 +648,7 @@ class PDQNPolicy(Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -749,14 +679,11 @@ class PDQNPolicy(Module):
         self.target_conactor = deepcopy(self.conactor)
         self.target_qnetwork = deepcopy(self.qnetwork)
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.qnetwork = DistributedDataParallel(module=self.qnetwork, device_ids=[self.rank])
-            self.conactor = DistributedDataParallel(module=self.conactor, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.representation, self.conactor, self.qnetwork],
+                                              target=[self.target_representation, self.target_conactor,
+                                                      self.target_qnetwork])
 
     def Atarget(self, state):
         target_conact = self.target_conactor(state)
@@ -783,15 +710,7 @@ class PDQNPolicy(Module):
         return policy_q
 
     def soft_update(self, tau=0.005):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.conactor.parameters(), self.target_conactor.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.qnetwork.parameters(), self.target_qnetwork.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
+        self.target_networks.soft_update(tau)
 
 
 class MPDQNPolicy(PDQNPolicy):
@@ -809,7 +728,7 @@ class MPDQNPolicy(PDQNPolicy):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -903,7 +822,7 @@ class SPDQNPolicy(PDQNPolicy):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -935,11 +854,6 @@ class SPDQNPolicy(PDQNPolicy):
         self.offsets = self.conact_sizes.cumsum()
         self.offsets = np.insert(self.offsets, 0, 0)
 
-        # Prepare DDP module.
-        if self.distributed_training:
-            for k in range(self.num_disact):
-                self.qnetwork[k] = DistributedDataParallel(module=self.qnetwork[k], device_ids=[self.rank])
-            self.conactor = DistributedDataParallel(module=self.conactor, device_ids=[self.rank])
 
     def Qtarget(self, state, action):
         target_Q = []
@@ -1002,13 +916,10 @@ class DRQNPolicy(Module):
         self.eval_Qhead = BasicRecurrent(**kwargs)
         self.target_Qhead = deepcopy(self.eval_Qhead)
 
-        # Prepare DDP module.
         self.distributed_training = kwargs['use_distributed_training']
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.eval_Qhead = DistributedDataParallel(module=self.eval_Qhead, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.representation, self.eval_Qhead],
+                                              target=[self.target_representation, self.target_Qhead])
 
     def forward(self, observation: Union[np.ndarray, dict], *rnn_hidden: Tensor):
         """
@@ -1068,7 +979,4 @@ class DRQNPolicy(Module):
             return rnn_hidden
 
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qhead.parameters(), self.target_Qhead.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
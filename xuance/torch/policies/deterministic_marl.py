@@ -1,14 +1,14 @@
-import os
 from operator import itemgetter
 import torch
-from torch.distributions import Categorical
 from torch.nn.functional import one_hot
 from copy import deepcopy
 from gym.spaces import Discrete, Box
 from xuance.common import Sequence, Optional, Callable, Union, Dict, List
 from xuance.torch.policies import BasicQhead, ActorNet, CriticNet, VDN_mixer, QMIX_FF_mixer
-from xuance.torch.utils import ModuleType
-from xuance.torch import Tensor, Module, ModuleDict, DistributedDataParallel
+from xuance.torch.policies.core import encode_states
+from xuance.torch.utils import ModuleType, ModuleEnsemble, TargetNetworks
+from xuance.torch import Tensor, Module, ModuleDict
+from xuance.torch.policies.mean_field import MeanFieldAggregator
 
 
 class BasicQnetwork(Module):
@@ -24,8 +24,9 @@ class BasicQnetwork(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
-        **kwargs: Other arguments.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: Other arguments, use_agent_ensemble stacks the networks of all agents into one ModuleEnsemble when
+            the parameters are not shared.
     """
 
     def __init__(self,
@@ -63,18 +64,30 @@ class BasicQnetwork(Module):
                                               normalize, initialize, activation, device)
             self.target_Qhead[key] = deepcopy(self.eval_Qhead[key])
 
-        # Prepare DDP module.
+        self.use_agent_ensemble = kwargs.get("use_agent_ensemble", False) and not self.use_parameter_sharing
+        if self.use_agent_ensemble:
+            if self.use_rnn:
+                raise AttributeError("The agent ensemble does not support recurrent representations.")
+            self.representation = ModuleEnsemble(self.representation)
+            self.eval_Qhead = ModuleEnsemble(self.eval_Qhead)
+            self.target_representation = deepcopy(self.representation)
+            self.target_Qhead = deepcopy(self.eval_Qhead)
+
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            for key in self.model_keys:
-                if self.representation[key]._get_name() != "Basic_Identical":
-                    self.representation[key] = DistributedDataParallel(module=self.representation[key],
-                                                                       device_ids=[self.rank])
-                self.eval_Qhead[key] = DistributedDataParallel(module=self.eval_Qhead[key], device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.representation, self.eval_Qhead],
+                                              target=[self.target_representation, self.target_Qhead])
+
+    @property
+    def parameters_ensemble(self):
+        """The stacked parameters of all agents when use_agent_ensemble is True."""
+        return list(self.representation.parameters()) + list(self.eval_Qhead.parameters())
 
     @property
     def parameters_model(self):
+        """The parameters of each model. The members of an agent ensemble share the stacked parameters."""
+        if self.use_agent_ensemble:
+            return {key: self.parameters_ensemble for key in self.model_keys}
         parameters_model = {}
         for key in self.model_keys:
             parameters_model[key] = list(self.representation[key].parameters()) + list(
@@ -103,22 +116,30 @@ class BasicQnetwork(Module):
         agent_list = self.model_keys if agent_key is None else [agent_key]
 
         if avail_actions is not None:
-            avail_actions = {key: Tensor(avail_actions[key]) for key in agent_list}
+            avail_actions = {key: torch.as_tensor(avail_actions[key], device=self.device) for key in agent_list}
+
+        if self.use_agent_ensemble:
+            # One vectorized pass evaluates the stacked networks of all agents.
+            outputs = self.representation(observation)
+            evalQ = self.eval_Qhead({key: outputs[key]['state'] for key in self.model_keys})
 
         for key in agent_list:
-            if self.use_rnn:
-                outputs = self.representation[key](observation[key], *rnn_hidden[key])
-                rnn_hidden_new[key] = (outputs['rnn_hidden'], outputs['rnn_cell'])
-            else:
-                outputs = self.representation[key](observation[key])
+            if self.use_agent_ensemble:
                 rnn_hidden_new[key] = [None, None]
-
-            if self.use_parameter_sharing:
-                q_inputs = torch.concat([outputs['state'], agent_ids], dim=-1)
             else:
-                q_inputs = outputs['state']
+                if self.use_rnn:
+                    outputs = self.representation[key](observation[key], *rnn_hidden[key])
+                    rnn_hidden_new[key] = (outputs['rnn_hidden'], outputs['rnn_cell'])
+                else:
+                    outputs = self.representation[key](observation[key])
+                    rnn_hidden_new[key] = [None, None]
 
-            evalQ[key] = self.eval_Qhead[key](q_inputs)
+                if self.use_parameter_sharing:
+                    q_inputs = torch.concat([outputs['state'], agent_ids], dim=-1)
+                else:
+                    q_inputs = outputs['state']
+
+                evalQ[key] = self.eval_Qhead[key](q_inputs)
 
             if avail_actions is not None:
                 evalQ_detach = evalQ[key].clone().detach()
@@ -147,6 +168,10 @@ class BasicQnetwork(Module):
         """
         rnn_hidden_new, q_target = {}, {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            outputs = self.target_representation(observation)
+            q_target = self.target_Qhead({key: outputs[key]['state'] for key in self.model_keys})
+            return {key: None for key in agent_list}, {key: q_target[key] for key in agent_list}
         for key in agent_list:
             if self.use_rnn:
                 outputs = self.target_representation[key](observation[key], *rnn_hidden[key])
@@ -162,10 +187,7 @@ class BasicQnetwork(Module):
         return rnn_hidden_new, q_target
 
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qhead.parameters(), self.target_Qhead.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
 
 
 class MixingQnetwork(BasicQnetwork):
@@ -182,7 +204,7 @@ class MixingQnetwork(BasicQnetwork):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
         **kwargs: Other arguments.
     """
 
@@ -203,8 +225,9 @@ class MixingQnetwork(BasicQnetwork):
                                              **kwargs)
         self.eval_Qtot = mixer
         self.target_Qtot = deepcopy(self.eval_Qtot)
-        if self.distributed_training:
-            self.eval_Qtot = DistributedDataParallel(module=self.eval_Qtot, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.representation, self.eval_Qhead, self.eval_Qtot],
+                                              target=[self.target_representation, self.target_Qhead, self.target_Qtot])
 
     @property
     def parameters_model(self):
@@ -212,6 +235,18 @@ class MixingQnetwork(BasicQnetwork):
             self.eval_Qhead.parameters())
         return parameters_model
 
+    def _individual_inputs(self, individual_values: Dict[str, Tensor]):
+        """
+        From dict to tensor. For example:
+            individual_values: {'agent_0': batch * n_agents * 1} -> individual_inputs: batch * n_agents * 1,
+        with parameter sharing, or
+            individual_values: {'agent_0': batch * 1, 'agent_1': batch * 1} -> individual_inputs: batch * 2 * 1,
+        without parameter sharing.
+        """
+        if self.use_parameter_sharing:
+            return individual_values[self.model_keys[0]].reshape([-1, self.n_agents, 1])
+        return torch.concat([individual_values[k] for k in self.model_keys], dim=-1).reshape([-1, self.n_agents, 1])
+
     def Q_tot(self, individual_values: Dict[str, Tensor], states: Optional[Tensor] = None):
         """
         Returns the total Q values.
@@ -223,22 +258,7 @@ class MixingQnetwork(BasicQnetwork):
         Returns:
             evalQ_tot (Tensor): The evaluated total Q values for the multi-agent team.
         """
-        if self.use_parameter_sharing:
-            """
-            From dict to tensor. For example:
-                individual_values: {'agent_0': batch * n_agents * 1} -> 
-                individual_inputs: batch * n_agents * 1
-            """
-            individual_inputs = individual_values[self.model_keys[0]].reshape([-1, self.n_agents, 1])
-        else:
-            """
-            From dict to tensor. For example: 
-                individual_values: {'agent_0': batch * 1, 'agent_1': batch * 1, 'agent_2': batch * 1} -> 
-                individual_inputs: batch * 2 * 1
-            """
-            individual_inputs = torch.concat([individual_values[k] for k in self.model_keys],
-                                             dim=-1).reshape([-1, self.n_agents, 1])
-        evalQ_tot = self.eval_Qtot(individual_inputs, states)
+        evalQ_tot = self.eval_Qtot(self._individual_inputs(individual_values), states)
         return evalQ_tot
 
     def Qtarget_tot(self,
@@ -254,31 +274,37 @@ class MixingQnetwork(BasicQnetwork):
         Returns:
             q_target_tot (Tensor): The evaluated total Q values calculated by target networks.
         """
-        if self.use_parameter_sharing:
-            """
-            From dict to tensor. For example:
-                individual_values: {'agent_0': batch * n_agents * 1} -> 
-                individual_inputs: batch * n_agents * 1
-            """
-            individual_inputs = individual_values[self.model_keys[0]].reshape([-1, self.n_agents, 1])
-        else:
-            """
-            From dict to tensor. For example: 
-                individual_values: {'agent_0': batch * 1, 'agent_1': batch * 1, 'agent_2': batch * 1} -> 
-                individual_inputs: batch * 2 * 1
-            """
-            individual_inputs = torch.concat([individual_values[k] for k in self.model_keys],
-                                             dim=-1).reshape([-1, self.n_agents, 1])
-        q_target_tot = self.target_Qtot(individual_inputs, states)
+        q_target_tot = self.target_Qtot(self._individual_inputs(individual_values), states)
         return q_target_tot
 
+    def Q_tot_and_target(self,
+                         individual_values: Dict[str, Tensor],
+                         states: Optional[Tensor],
+                         target_individual_values: Dict[str, Tensor],
+                         target_states: Optional[Tensor]):
+        """
+        Returns the total Q values with the eval and the target mixers, i.e., Q_tot and Qtarget_tot.
+
+        The target mixer is evaluated without recording the autograd graph, as its outputs are only used in the
+        (detached) targets of the TD errors.
+
+        Parameters:
+            individual_values (Dict[str, Tensor]): The individual Q values of all agents.
+            states (Optional[Tensor]): The global states for the eval mixer.
+            target_individual_values (Dict[str, Tensor]): The individual target Q values of all agents.
+            target_states (Optional[Tensor]): The global states for the target mixer.
+
+        Returns:
+            evalQ_tot (Tensor): The evaluated total Q values for the multi-agent team.
+            q_target_tot (Tensor): The evaluated total Q values calculated by target networks.
+        """
+        evalQ_tot = self.Q_tot(individual_values, states)
+        with torch.no_grad():
+            q_target_tot = self.Qtarget_tot(target_individual_values, target_states)
+        return evalQ_tot, q_target_tot
+
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qhead.parameters(), self.target_Qhead.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qtot.parameters(), self.target_Qtot.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
 
 
 class Weighted_MixingQnetwork(MixingQnetwork):
@@ -296,7 +322,7 @@ class Weighted_MixingQnetwork(MixingQnetwork):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
         **kwargs: Other arguments.
     """
 
@@ -321,11 +347,12 @@ class Weighted_MixingQnetwork(MixingQnetwork):
         self.ff_mixer = ff_mixer
         self.target_ff_mixer = deepcopy(self.ff_mixer)
 
-        if self.distributed_training:
-            for key in self.model_keys:
-                self.eval_Qhead_centralized[key] = DistributedDataParallel(module=self.eval_Qhead_centralized[key],
-                                                                           device_ids=[self.rank])[key]
-            self.ff_mixer = DistributedDataParallel(module=self.ff_mixer, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.representation, self.eval_Qhead,
+                                                      self.eval_Qhead_centralized, self.eval_Qtot, self.ff_mixer],
+                                              target=[self.target_representation, self.target_Qhead,
+                                                      self.target_Qhead_centralized, self.target_Qtot,
+                                                      self.target_ff_mixer])
 
     @property
     def parameters_model(self):
@@ -415,22 +442,7 @@ class Weighted_MixingQnetwork(MixingQnetwork):
         Returns:
             evalQ_tot (Tensor): The evaluated total Q values for the multi-agent team.
         """
-        if self.use_parameter_sharing:
-            """
-            From dict to tensor. For example:
-                individual_values: {'agent_0': batch * n_agents * 1} -> 
-                individual_inputs: batch * n_agents * 1
-            """
-            individual_inputs = individual_values[self.model_keys[0]].reshape([-1, self.n_agents, 1])
-        else:
-            """
-            From dict to tensor. For example: 
-                individual_values: {'agent_0': batch * 1, 'agent_1': batch * 1, 'agent_2': batch * 1} -> 
-                individual_inputs: batch * 2 * 1
-            """
-            individual_inputs = torch.concat([individual_values[k] for k in self.model_keys],
-                                             dim=-1).reshape([-1, self.n_agents, 1])
-        evalQ_tot = self.ff_mixer(individual_inputs, states)
+        evalQ_tot = self.ff_mixer(self._individual_inputs(individual_values), states)
         return evalQ_tot
 
     def target_q_feedforward(self, individual_values: Dict[str, Tensor], states: Optional[Tensor] = None):
@@ -444,35 +456,49 @@ class Weighted_MixingQnetwork(MixingQnetwork):
         Returns:
             q_target_tot (Tensor): The evaluated total Q values for the multi-agent team.
         """
-        if self.use_parameter_sharing:
-            """
-            From dict to tensor. For example:
-                individual_values: {'agent_0': batch * n_agents * 1} -> 
-                individual_inputs: batch * n_agents * 1
-            """
-            individual_inputs = individual_values[self.model_keys[0]].reshape([-1, self.n_agents, 1])
-        else:
-            """
-            From dict to tensor. For example: 
-                individual_values: {'agent_0': batch * 1, 'agent_1': batch * 1, 'agent_2': batch * 1} -> 
-                individual_inputs: batch * 2 * 1
-            """
-            individual_inputs = torch.concat([individual_values[k] for k in self.model_keys],
-                                             dim=-1).reshape([-1, self.n_agents, 1])
-        q_target_tot = self.target_ff_mixer(individual_inputs, states)
+        q_target_tot = self.target_ff_mixer(self._individual_inputs(individual_values), states)
         return q_target_tot
 
+    def Q_tot_weighted(self,
+                       individual_values: Dict[str, Tensor],
+                       centralized_values: Dict[str, Tensor],
+                       target_centralized_values: Dict[str, Tensor],
+                       states: Tensor,
+                       target_states: Tensor):
+        """
+        Returns the total Q values, the centralised total Q values and the target centralised total Q values, i.e.,
+        Q_tot, q_feedforward and target_q_feedforward.
+
+        The state layers of the eval mixer and the feedforward mixer, which read the same states, are evaluated as one
+        layer (see encode_states), and the target feedforward mixer is evaluated without recording the autograd graph.
+
+        Parameters:
+            individual_values (Dict[str, Tensor]): The individual Q values of all agents.
+            centralized_values (Dict[str, Tensor]): The individual centralised Q values of all agents.
+            target_centralized_values (Dict[str, Tensor]): The individual target centralised Q values of all agents.
+            states (Tensor): The global states for the eval mixer and the feedforward mixer.
+            target_states (Tensor): The global states for the target feedforward mixer.
+
+        Returns:
+            evalQ_tot (Tensor): The evaluated total Q values for the multi-agent team.
+            q_tot_centralized (Tensor): The evaluated centralised total Q values.
+            q_target_tot_centralized (Tensor): The evaluated centralised total Q values with target networks.
+        """
+        if hasattr(self.eval_Qtot, "state_layers"):
+            states = states.reshape(-1, self.ff_mixer.dim_state)
+            features, ff_features = encode_states([(states, self.eval_Qtot.state_layers),
+                                                   (states, self.ff_mixer.state_layers)])
+            evalQ_tot = self.eval_Qtot.mix(self._individual_inputs(individual_values), features)
+            q_tot_centralized = self.ff_mixer.mix(self._individual_inputs(centralized_values), ff_features)
+        else:
+            evalQ_tot = self.Q_tot(individual_values, states)
+            q_tot_centralized = self.q_feedforward(centralized_values, states)
+        with torch.no_grad():
+            q_target_tot_centralized = self.target_q_feedforward(target_centralized_values, target_states)
+        return evalQ_tot, q_tot_centralized, q_target_tot_centralized
+
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qhead.parameters(), self.target_Qhead.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qhead_centralized.parameters(), self.target_Qhead_centralized.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qtot.parameters(), self.target_Qtot.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.ff_mixer.parameters(), self.target_ff_mixer.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
 
 
 class Qtran_MixingQnetwork(BasicQnetwork):
@@ -490,7 +516,7 @@ class Qtran_MixingQnetwork(BasicQnetwork):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation (Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
         **kwargs: Other arguments.
     """
 
@@ -516,9 +542,10 @@ class Qtran_MixingQnetwork(BasicQnetwork):
         self.target_qtran_net = deepcopy(qtran_mixer)
         self.q_tot = mixer
 
-        if self.distributed_training:
-            self.qtran_net = DistributedDataParallel(module=self.qtran_net, device_ids=[self.rank])
-            self.q_tot = DistributedDataParallel(module=self.q_tot, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.representation, self.eval_Qhead, self.qtran_net],
+                                              target=[self.target_representation, self.target_Qhead,
+                                                      self.target_qtran_net])
 
     @property
     def parameters_model(self):
@@ -550,7 +577,7 @@ class Qtran_MixingQnetwork(BasicQnetwork):
         rep_hidden_state = {}
 
         if avail_actions is not None:
-            avail_actions = {key: Tensor(avail_actions[key]) for key in agent_list}
+            avail_actions = {key: torch.as_tensor(avail_actions[key], device=self.device) for key in agent_list}
 
         for key in agent_list:
             if self.use_rnn:
@@ -645,7 +672,8 @@ class Qtran_MixingQnetwork(BasicQnetwork):
         return eval_Q_tot
 
     def Q_tran(self, states: Tensor, hidden_states: Dict[str, Tensor], actions: Dict[str, Tensor],
-               agent_mask: Dict[str, Tensor] = None, avail_actions: Dict[str, Tensor] = None):
+               agent_mask: Dict[str, Tensor] = None, avail_actions: Dict[str, Tensor] = None,
+               state_features: Optional[List[Tensor]] = None):
         """
         Returns the total Q values.
 
@@ -655,6 +683,8 @@ class Qtran_MixingQnetwork(BasicQnetwork):
             actions (Dict[str, Tensor]): The executed actions.
             agent_mask (Dict[str, Tensor]): Agent mask values, default is None.
             avail_actions (Dict[str, Tensor]): Actions mask values, default is None.
+            state_features (Optional[List[Tensor]]): The outputs of the state layers for the states, which are shared
+                between the calls with the same states, see Q_tran_state_features. Default is None.
 
         Returns:
             q_jt (Tensor): The evaluated joint Q values.
@@ -690,11 +720,26 @@ class Qtran_MixingQnetwork(BasicQnetwork):
             hidden_states_input = torch.cat([hidden_states[k].unsqueeze(1) for k in self.model_keys], dim=1)
             actions_onehot = torch.cat([one_hot(actions[k].long(), self.n_actions_max).unsqueeze(1)
                                         for k in self.model_keys], dim=1)
-        q_jt, v_jt = self.qtran_net(states, hidden_states_input, actions_onehot)
+        q_jt, v_jt = self.qtran_net(states, hidden_states_input, actions_onehot, state_features)
         return q_jt, v_jt
 
+    def Q_tran_state_features(self, states: Tensor):
+        """
+        Returns the outputs of the layers of the QTRAN network that read the global states, which can be shared between
+        the calls of Q_tran with the same states but different actions.
+
+        Parameters:
+            states (Tensor): The global states.
+
+        Returns:
+            state_features (List[Tensor]): The outputs of the state layers of self.qtran_net.
+        """
+        states = states.reshape(-1, self.qtran_net.dim_state)
+        return encode_states([(states, self.qtran_net.state_layers)])[0]
+
     def Q_tran_target(self, states: Tensor, hidden_states: Dict[str, Tensor], actions: Dict[str, Tensor],
-                      agent_mask: Dict[str, Tensor] = None, avail_actions: Dict[str, Tensor] = None):
+                      agent_mask: Dict[str, Tensor] = None, avail_actions: Dict[str, Tensor] = None,
+                      state_features: Optional[List[Tensor]] = None):
         """
         Returns the total Q values.
 
@@ -704,6 +749,8 @@ class Qtran_MixingQnetwork(BasicQnetwork):
             actions (Dict[str, Tensor]): The executed actions.
             agent_mask (Dict[str, Tensor]): Agent mask values, default is None.
             avail_actions (Dict[str, Tensor]): Actions mask values, default is None.
+            state_features (Optional[List[Tensor]]): The outputs of the state layers for the states, which are shared
+                between the calls with the same states, see Q_tran_state_features. Default is None.
 
         Returns:
             q_jt (Tensor): The evaluated joint Q values.
@@ -739,16 +786,11 @@ class Qtran_MixingQnetwork(BasicQnetwork):
             hidden_states_input = torch.cat([hidden_states[k].unsqueeze(1) for k in self.model_keys], dim=1)
             actions_onehot = torch.cat([one_hot(actions[k].long(), self.n_actions_max).unsqueeze(1)
                                         for k in self.model_keys], dim=1)
-        q_jt, v_jt = self.target_qtran_net(states, hidden_states_input, actions_onehot)
+        q_jt, v_jt = self.target_qtran_net(states, hidden_states_input, actions_onehot, state_features)
         return q_jt, v_jt
 
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qhead.parameters(), self.target_Qhead.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.qtran_net.parameters(), self.target_qtran_net.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
 
 
 class DCG_policy(Module):
@@ -767,7 +809,7 @@ class DCG_policy(Module):
         initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
         activation(Optional[ModuleType]): The activation function for each layer.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
         **kwargs: Other arguments.
     """
     def __init__(self,
@@ -810,6 +852,13 @@ class DCG_policy(Module):
                                    normalize, initialize, activation, device)
             self.target_bias = deepcopy(self.bias)
 
+        online = [self.representation, self.utility, self.payoffs]
+        target = [self.target_representation, self.target_utility, self.target_payoffs]
+        if self.dcg_s:
+            online.append(self.bias)
+            target.append(self.target_bias)
+        self.target_networks = TargetNetworks(online, target)
+
     @property
     def parameters_model(self):
         parameters_model = list(self.representation.parameters()) + \
@@ -852,75 +901,204 @@ class DCG_policy(Module):
                     outputs = self.representation[key](observation[key])
                 rnn_hidden_new[key] = [None, None]
             hidden_states[key] = outputs['state']
+        return rnn_hidden, self.stack_agents(batch_size, hidden_states, seq_len)
+
+    def stack_agents(self, batch_size: int, values: Dict[str, Tensor], seq_len: int = 1):
+        """
+        Stacks the values of all agents, e.g., their hidden states or observations, along the agents dimension.
+
+        Args:
+            batch_size (int): The batch size.
+            values (Dict[Tensor]): The values of the models, in the layout of the observations.
+            seq_len (int): The length of the sequences if self.use_rnn.
+
+        Returns:
+            values_n: The values with shape [batch_size, n_agents, -1], or [batch_size, seq_len, n_agents, -1] if
+                self.use_rnn.
+        """
         if self.use_parameter_sharing:
-            hidden_states_n = hidden_states[self.model_keys[0]].reshape(batch_size, self.n_agents, seq_len, -1)
+            values_n = values[self.model_keys[0]].reshape(batch_size, self.n_agents, seq_len, -1)
             if self.use_rnn:
-                hidden_states_n = hidden_states_n.transpose(1, 2).reshape(batch_size, seq_len, self.n_agents, -1)
+                values_n = values_n.transpose(1, 2).reshape(batch_size, seq_len, self.n_agents, -1)
             else:
-                hidden_states_n = hidden_states_n.transpose(1, 2).reshape(batch_size, self.n_agents, -1)
+                values_n = values_n.transpose(1, 2).reshape(batch_size, self.n_agents, -1)
         else:
+            values_n = torch.stack(itemgetter(*self.model_keys)(values), dim=-2)
             if self.use_rnn:
-                hidden_states_n = torch.stack(itemgetter(*self.model_keys)(hidden_states), dim=-2)
-                hidden_states_n = hidden_states_n.reshape(batch_size, seq_len, self.n_agents, -1)
+                values_n = values_n.reshape(batch_size, seq_len, self.n_agents, -1)
             else:
-                hidden_states_n = torch.stack(itemgetter(*self.model_keys)(hidden_states), dim=-2)
-                hidden_states_n = hidden_states_n.reshape(batch_size, self.n_agents, -1)
-        return rnn_hidden, hidden_states_n
+                values_n = values_n.reshape(batch_size, self.n_agents, -1)
+        return values_n
 
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.utility.parameters(), self.target_utility.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.payoffs.parameters(), self.target_payoffs.parameters()):
-            tp.data.copy_(ep)
-        if self.dcg_s:
-            for ep, tp in zip(self.bias.parameters(), self.target_bias.parameters()):
-                tp.data.copy_(ep)
+        self.target_networks.hard_update()
+
+
+class MFQnetwork(BasicQnetwork):
+    """
+    The policy of Mean-Field Q-learning, whose Q-values are conditioned on the mean action of the neighbors.
 
+    Args:
+        action_space (Optional[Dict[str, Discrete]]): The action space, which type is gym.spaces.Discrete.
+        n_agents (int): The number of agents.
+        representation (ModuleDict): A dict of the representation module for all agents.
+        mean_field (MeanFieldAggregator): The aggregator that computes the mean actions of the neighbors.
+        hidden_size (Sequence[int]): List of hidden units for fully connect layers.
+        normalize (Optional[ModuleType]): The layer normalization over a minibatch of inputs.
+        initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
+        activation (Optional[ModuleType]): The activation function for each layer.
+        device (Optional[Union[str, int, torch.device]]): The calculating device.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: Other arguments.
+    """
 
-class MFQnetwork(Module):
     def __init__(self,
-                 action_space: Discrete,
+                 action_space: Optional[Dict[str, Discrete]],
                  n_agents: int,
-                 representation: Module,
+                 representation: ModuleDict,
+                 mean_field: MeanFieldAggregator = None,
                  hidden_size: Sequence[int] = None,
                  normalize: Optional[ModuleType] = None,
                  initialize: Optional[Callable[..., Tensor]] = None,
                  activation: Optional[ModuleType] = None,
-                 device: Optional[Union[str, int, torch.device]] = None):
-        super(MFQnetwork, self).__init__()
-        self.device = device
-        self.n_actions = action_space.n
-        self.representation = representation
-        self.target_representation = deepcopy(self.representation)
-        self.representation_info_shape = self.representation.output_shapes
+                 device: Optional[Union[str, int, torch.device]] = None,
+                 use_distributed_training: bool = False,
+                 **kwargs):
+        kwargs['use_agent_ensemble'] = False
+        super(MFQnetwork, self).__init__(action_space, n_agents, representation, hidden_size, normalize, initialize,
+                                         activation, device, use_distributed_training, **kwargs)
+        self.mean_field = mean_field
+        for key in self.model_keys:
+            self.dim_input_Q[key] += self.n_actions[key]
+            self.eval_Qhead[key] = BasicQhead(self.dim_input_Q[key], self.n_actions[key], hidden_size,
+                                              normalize, initialize, activation, device)
+            self.target_Qhead[key] = deepcopy(self.eval_Qhead[key])
+        self.target_networks = TargetNetworks(online=[self.representation, self.eval_Qhead],
+                                              target=[self.target_representation, self.target_Qhead])
 
-        self.eval_Qhead = BasicQhead(self.representation.output_shapes['state'][0] + self.n_actions, self.n_actions,
-                                     n_agents, hidden_size, normalize, initialize, activation, device)
-        self.target_Qhead = deepcopy(self.eval_Qhead)
+    def forward(self, observation: Dict[str, Tensor], actions_mean: Dict[str, Tensor], agent_ids: Tensor = None,
+                avail_actions: Dict[str, Tensor] = None, agent_key: str = None,
+                rnn_hidden: Optional[Dict[str, List[Tensor]]] = None):
+        """
+        Returns actions of the policy.
 
-    def forward(self, observation: Tensor, actions_mean: Tensor, agent_ids: Tensor):
-        outputs = self.representation(observation)
-        q_inputs = torch.concat([outputs['state'], actions_mean, agent_ids], dim=-1)
-        evalQ = self.eval_Qhead(q_inputs)
-        argmax_action = evalQ.argmax(dim=-1, keepdim=False)
-        return outputs, argmax_action, evalQ
+        Parameters:
+            observation (Dict[Tensor]): The input observations for the policies.
+            actions_mean (Dict[Tensor]): The mean actions of the neighbors of the agents.
+            agent_ids (Tensor): The agents' ids (for parameter sharing).
+            avail_actions (Dict[str, Tensor]): Actions mask values, default is None.
+            agent_key (str): Calculate actions for specified agent.
+            rnn_hidden (Optional[Dict[str, List[Tensor]]]): The hidden variables of the RNN.
 
-    def sample_actions(self, logits: Tensor):
-        dist = Categorical(logits=logits)
-        return dist.sample()
+        Returns:
+            rnn_hidden_new (Optional[Dict[str, List[Tensor]]]): The new hidden variables of the RNN.
+            argmax_action (Dict[str, Tensor]): The actions output by the policies.
+            evalQ (Dict[str, Tensor])： The evaluations of observation-action pairs.
+        """
+        rnn_hidden_new, argmax_action, evalQ = {}, {}, {}
+        agent_list = self.model_keys if agent_key is None else [agent_key]
 
-    def target_Q(self, observation: Tensor, actions_mean: Tensor, agent_ids: Tensor):
-        outputs = self.target_representation(observation)
-        q_inputs = torch.concat([outputs['state'], actions_mean, agent_ids], dim=-1)
-        return self.target_Qhead(q_inputs)
+        if avail_actions is not None:
+            avail_actions = {key: torch.as_tensor(avail_actions[key], device=self.device) for key in agent_list}
+
+        for key in agent_list:
+            if self.use_rnn:
+                outputs = self.representation[key](observation[key], *rnn_hidden[key])
+                rnn_hidden_new[key] = (outputs['rnn_hidden'], outputs['rnn_cell'])
+            else:
+                outputs = self.representation[key](observation[key])
+                rnn_hidden_new[key] = [None, None]
+
+            if self.use_parameter_sharing:
+                q_inputs = torch.concat([outputs['state'], actions_mean[key], agent_ids], dim=-1)
+            else:
+                q_inputs = torch.concat([outputs['state'], actions_mean[key]], dim=-1)
+
+            evalQ[key] = self.eval_Qhead[key](q_inputs)
+
+            if avail_actions is not None:
+                evalQ_detach = evalQ[key].clone().detach()
+                evalQ_detach[avail_actions[key] == 0] = -1e10
+                argmax_action[key] = evalQ_detach.argmax(dim=-1, keepdim=False)
+            else:
+                argmax_action[key] = evalQ[key].argmax(dim=-1, keepdim=False)
+
+        return rnn_hidden_new, argmax_action, evalQ
+
+    def Qtarget(self, observation: Dict[str, Tensor], actions_mean: Dict[str, Tensor],
+                agent_ids: Dict[str, Tensor] = None, agent_key: str = None,
+                rnn_hidden: Optional[Dict[str, List[Tensor]]] = None):
+        """
+        Returns the Q^target of next observations and actions pairs.
+
+        Parameters:
+            observation (Dict[Tensor]): The observations.
+            actions_mean (Dict[Tensor]): The mean actions of the neighbors of the agents.
+            agent_ids (Dict[Tensor]): The agents' ids (for parameter sharing).
+            agent_key (str): Calculate actions for specified agent.
+            rnn_hidden (Optional[Dict[str, List[Tensor]]]): The hidden variables of the RNN.
+
+        Returns:
+            rnn_hidden_new (Optional[Dict[str, List[Tensor]]]): The new hidden variables of the RNN.
+            q_target: The evaluations of Q^target.
+        """
+        rnn_hidden_new, q_target = {}, {}
+        agent_list = self.model_keys if agent_key is None else [agent_key]
+        for key in agent_list:
+            if self.use_rnn:
+                outputs = self.target_representation[key](observation[key], *rnn_hidden[key])
+                rnn_hidden_new[key] = (outputs['rnn_hidden'], outputs['rnn_cell'])
+            else:
+                outputs = self.target_representation[key](observation[key])
+                rnn_hidden_new[key] = None
+            if self.use_parameter_sharing:
+                q_inputs = torch.concat([outputs['state'], actions_mean[key], agent_ids], dim=-1)
+            else:
+                q_inputs = torch.concat([outputs['state'], actions_mean[key]], dim=-1)
+            q_target[key] = self.target_Qhead[key](q_inputs)
+        return rnn_hidden_new, q_target
+
+    def boltzmann_policy(self, q_values: Tensor, temperature: float, avail_actions: Optional[Tensor] = None):
+        """Returns the probabilities of the Boltzmann policy of Q-values, softmax(Q / temperature)."""
+        logits = q_values / temperature
+        if avail_actions is not None:
+            logits = logits.masked_fill(Tensor(avail_actions).to(logits.device) == 0, -1e10)
+        return torch.softmax(logits, dim=-1)
+
+    @torch.no_grad()
+    def mean_actions(self, observation: Dict[str, Tensor], agent_ids: Tensor = None,
+                     avail_actions: Dict[str, Tensor] = None, agent_mask: Optional[Tensor] = None,
+                     positions: Optional[Tensor] = None, temperature: float = 1.0):
+        """
+        Returns the mean actions of the neighbors, estimated with the Boltzmann policies of all agents.
+
+        The Boltzmann policy of every agent is evaluated with a uniform mean action, then the mean actions are the
+        means of the action probabilities of the neighbors, computed in one batched call of the aggregator.
+
+        Parameters:
+            observation (Dict[Tensor]): The input observations for the policies.
+            agent_ids (Tensor): The agents' ids (for parameter sharing).
+            avail_actions (Dict[str, Tensor]): Actions mask values, default is None.
+            agent_mask (Optional[Tensor]): The alive agents, (batch_size, n_agents), default is None.
+            positions (Optional[Tensor]): The positions of the agents, (batch_size, n_agents, dim_position).
+            temperature (float): The temperature of the Boltzmann policy.
+
+        Returns:
+            actions_mean (Dict[str, Tensor]): The mean actions of the neighbors of the agents.
+        """
+        actions_uniform = {}
+        for key in self.model_keys:
+            batch_size = len(observation[key])
+            actions_uniform[key] = torch.full((batch_size, self.n_actions[key]), 1.0 / self.n_actions[key],
+                                              device=self.device)
+        _, _, evalQ = self.forward(observation, actions_uniform, agent_ids)
+        probs = {key: self.boltzmann_policy(evalQ[key], temperature,
+                                            None if avail_actions is None else avail_actions[key])
+                 for key in self.model_keys}
+        return self.mean_field.split(self.mean_field(self.mean_field.stack(probs), agent_mask, positions))
 
     def copy_target(self):
-        for ep, tp in zip(self.representation.parameters(), self.target_representation.parameters()):
-            tp.data.copy_(ep)
-        for ep, tp in zip(self.eval_Qhead.parameters(), self.target_Qhead.parameters()):
-            tp.data.copy_(ep)
+        self.target_networks.hard_update()
 
 
 class Independent_DDPG_Policy(Module):
@@ -939,8 +1117,9 @@ class Independent_DDPG_Policy(Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
-        **kwargs: Other arguments.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: Other arguments, use_agent_ensemble stacks the networks of all agents into one ModuleEnsemble when
+            the parameters are not shared.
     """
 
     def __init__(self,
@@ -988,22 +1167,39 @@ class Independent_DDPG_Policy(Module):
             self.target_actor[key] = deepcopy(self.actor[key])
             self.target_critic[key] = deepcopy(self.critic[key])
 
-        # Prepare DDP module.
+        self.use_agent_ensemble = kwargs.get("use_agent_ensemble", False) and not self.use_parameter_sharing
+        if self.use_agent_ensemble:
+            if self.use_rnn:
+                raise AttributeError("The agent ensemble does not support recurrent representations.")
+            self.actor_representation = ModuleEnsemble(self.actor_representation)
+            self.critic_representation = ModuleEnsemble(self.critic_representation)
+            self.actor, self.critic = ModuleEnsemble(self.actor), ModuleEnsemble(self.critic)
+            self.target_actor_representation = deepcopy(self.actor_representation)
+            self.target_critic_representation = deepcopy(self.critic_representation)
+            self.target_actor, self.target_critic = deepcopy(self.actor), deepcopy(self.critic)
+
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            for key in self.model_keys:
-                if self.actor_representation[key]._get_name() != "Basic_Identical":
-                    self.actor_representation[key] = DistributedDataParallel(module=self.actor_representation[key],
-                                                                             device_ids=[self.rank])
-                if self.critic_representation[key]._get_name() != "Basic_Identical":
-                    self.critic_representation[key] = DistributedDataParallel(module=self.critic_representation[key],
-                                                                              device_ids=[self.rank])
-                self.actor[key] = DistributedDataParallel(module=self.actor[key], device_ids=[self.rank])
-                self.critic[key] = DistributedDataParallel(module=self.critic[key], device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.actor_representation, self.critic_representation,
+                                                      self.actor, self.critic],
+                                              target=[self.target_actor_representation,
+                                                      self.target_critic_representation, self.target_actor,
+                                                      self.target_critic])
+
+    @property
+    def parameters_actor_ensemble(self):
+        """The stacked parameters of the actors of all agents when use_agent_ensemble is True."""
+        return list(self.actor_representation.parameters()) + list(self.actor.parameters())
+
+    @property
+    def parameters_critic_ensemble(self):
+        """The stacked parameters of the critics of all agents when use_agent_ensemble is True."""
+        return list(self.critic_representation.parameters()) + list(self.critic.parameters())
 
     @property
     def parameters_actor(self):
+        if self.use_agent_ensemble:
+            return {key: self.parameters_actor_ensemble for key in self.model_keys}
         parameters_actor = {}
         for key in self.model_keys:
             parameters_actor[key] = list(self.actor_representation[key].parameters()) + list(
@@ -1012,6 +1208,8 @@ class Independent_DDPG_Policy(Module):
 
     @property
     def parameters_critic(self):
+        if self.use_agent_ensemble:
+            return {key: self.parameters_critic_ensemble for key in self.model_keys}
         parameters_critic = {}
         for key in self.model_keys:
             parameters_critic[key] = list(self.critic_representation[key].parameters()) + list(
@@ -1057,6 +1255,11 @@ class Independent_DDPG_Policy(Module):
         """
         rnn_hidden_new, actions = deepcopy(rnn_hidden), {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            # One vectorized pass evaluates the stacked networks of all agents.
+            outputs = self.actor_representation(observation)
+            actions = self.actor({key: outputs[key]['state'] for key in self.model_keys})
+            return rnn_hidden_new, {key: actions[key] for key in agent_list}
         for key in agent_list:
             if self.use_rnn:
                 outputs = self.actor_representation[key](observation[key], *rnn_hidden[key])
@@ -1090,6 +1293,11 @@ class Independent_DDPG_Policy(Module):
         """
         rnn_hidden_new, q_eval = deepcopy(rnn_hidden), {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            outputs = self.critic_representation(observation)
+            q_eval = self.critic({key: torch.concat([outputs[key]['state'], actions[key]], dim=-1)
+                                  for key in self.model_keys})
+            return rnn_hidden_new, {key: q_eval[key] for key in agent_list}
 
         for key in agent_list:
             if self.use_rnn:
@@ -1124,6 +1332,11 @@ class Independent_DDPG_Policy(Module):
         """
         rnn_hidden_new, q_target = deepcopy(rnn_hidden), {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            outputs = self.target_critic_representation(next_observation)
+            q_target = self.target_critic({key: torch.concat([outputs[key]['state'], next_actions[key]], dim=-1)
+                                           for key in self.model_keys})
+            return rnn_hidden_new, {key: q_target[key] for key in agent_list}
         for key in agent_list:
             if self.use_rnn:
                 outputs = self.target_critic_representation[key](next_observation[key], *rnn_hidden[key])
@@ -1156,6 +1369,10 @@ class Independent_DDPG_Policy(Module):
         """
         rnn_hidden_new, next_actions = deepcopy(rnn_hidden), {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            outputs = self.target_actor_representation(next_observation)
+            next_actions = self.target_actor({key: outputs[key]['state'] for key in self.model_keys})
+            return rnn_hidden_new, {key: next_actions[key] for key in agent_list}
 
         for key in agent_list:
             if self.use_rnn:
@@ -1172,18 +1389,7 @@ class Independent_DDPG_Policy(Module):
         return rnn_hidden_new, next_actions
 
     def soft_update(self, tau=0.005):
-        for ep, tp in zip(self.actor_representation.parameters(), self.target_actor_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_representation.parameters(), self.target_critic_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.actor.parameters(), self.target_actor.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic.parameters(), self.target_critic.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
+        self.target_networks.soft_update(tau)
 
 
 class MADDPG_Policy(Independent_DDPG_Policy):
@@ -1202,8 +1408,9 @@ class MADDPG_Policy(Independent_DDPG_Policy):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
-        **kwargs: Other arguments.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: Other arguments, use_agent_ensemble stacks the networks of all agents into one ModuleEnsemble when
+            the parameters are not shared.
     """
 
     def __init__(self,
@@ -1246,7 +1453,28 @@ class MADDPG_Policy(Independent_DDPG_Policy):
             dim_critic_in += n_agents
         return dim_actor_in, dim_actor_out, dim_critic_in
 
-    def Qpolicy(self, joint_observation: Tensor, joint_actions: Tensor,
+    def _joint_critic_ensemble(self, representation: ModuleEnsemble, critic: ModuleEnsemble,
+                               joint_observation: Tensor, joint_actions: Union[Tensor, Dict[str, Tensor]]):
+        """
+        Evaluates the centralized critics of all agents in one vectorized pass of an agent ensemble.
+
+        Parameters:
+            representation (ModuleEnsemble): The stacked critic representations.
+            critic (ModuleEnsemble): The stacked critics.
+            joint_observation (Tensor): The joint observations of the team.
+            joint_actions (Union[Tensor, Dict[str, Tensor]]): The joint actions of the team, or a dict of the joint
+                actions evaluated by the critic of each agent.
+
+        Returns:
+            q (Dict[Tensor]): The evaluations of the critic of each agent.
+        """
+        if not isinstance(joint_actions, dict):
+            joint_actions = {key: joint_actions for key in self.model_keys}
+        outputs = representation({key: torch.concat([joint_observation, joint_actions[key]], dim=-1)
+                                  for key in self.model_keys})
+        return critic({key: outputs[key]['state'] for key in self.model_keys})
+
+    def Qpolicy(self, joint_observation: Tensor, joint_actions: Union[Tensor, Dict[str, Tensor]],
                 agent_ids: Tensor = None, agent_key: str = None,
                 rnn_hidden: Optional[Dict[str, List[Tensor]]] = None):
         """
@@ -1254,7 +1482,8 @@ class MADDPG_Policy(Independent_DDPG_Policy):
 
         Parameters:
             joint_observation (Tensor): The joint observations of the team.
-            joint_actions (Tensor): The joint actions of the team.
+            joint_actions (Union[Tensor, Dict[str, Tensor]]): The joint actions of the team, or with an agent ensemble,
+                a dict of the joint actions evaluated by the critic of each agent.
             agent_ids (Dict[Tensor]): The agents' ids (for parameter sharing).
             agent_key (str): Calculate actions for specified agent.
             rnn_hidden (Optional[Dict[str, List[Tensor]]]): The hidden variables of the RNN.
@@ -1265,6 +1494,10 @@ class MADDPG_Policy(Independent_DDPG_Policy):
         """
         rnn_hidden_new, q_eval = deepcopy(rnn_hidden), {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            q_eval = self._joint_critic_ensemble(self.critic_representation, self.critic,
+                                                 joint_observation, joint_actions)
+            return rnn_hidden_new, {key: q_eval[key] for key in agent_list}
         batch_size = joint_observation.shape[0]
         seq_len = joint_observation.shape[1] if self.use_rnn else 1
 
@@ -1314,6 +1547,10 @@ class MADDPG_Policy(Independent_DDPG_Policy):
         """
         rnn_hidden_new, q_target = deepcopy(rnn_hidden), {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            q_target = self._joint_critic_ensemble(self.target_critic_representation, self.target_critic,
+                                                   joint_observation, joint_actions)
+            return rnn_hidden_new, {key: q_target[key] for key in agent_list}
         batch_size = joint_observation.shape[0]
         seq_len = joint_observation.shape[1] if self.use_rnn else 1
 
@@ -1361,8 +1598,9 @@ class MATD3_Policy(MADDPG_Policy, Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
-        **kwargs: Other arguments.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: Other arguments, use_agent_ensemble stacks the networks of all agents into one ModuleEnsemble when
+            the parameters are not shared.
     """
 
     def __init__(self,
@@ -1415,26 +1653,41 @@ class MATD3_Policy(MADDPG_Policy, Module):
             self.target_critic_A[key] = deepcopy(self.critic_A[key])
             self.target_critic_B[key] = deepcopy(self.critic_B[key])
 
-        # Prepare DDP module.
+        self.use_agent_ensemble = kwargs.get("use_agent_ensemble", False) and not self.use_parameter_sharing
+        if self.use_agent_ensemble:
+            if self.use_rnn:
+                raise AttributeError("The agent ensemble does not support recurrent representations.")
+            self.actor_representation = ModuleEnsemble(self.actor_representation)
+            self.critic_A_representation = ModuleEnsemble(self.critic_A_representation)
+            self.critic_B_representation = ModuleEnsemble(self.critic_B_representation)
+            self.actor = ModuleEnsemble(self.actor)
+            self.critic_A, self.critic_B = ModuleEnsemble(self.critic_A), ModuleEnsemble(self.critic_B)
+            self.target_actor_representation = deepcopy(self.actor_representation)
+            self.target_critic_A_representation = deepcopy(self.critic_A_representation)
+            self.target_critic_B_representation = deepcopy(self.critic_B_representation)
+            self.target_actor = deepcopy(self.actor)
+            self.target_critic_A, self.target_critic_B = deepcopy(self.critic_A), deepcopy(self.critic_B)
+
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            for key in self.model_keys:
-                if self.actor_representation[key]._get_name() != "Basic_Identical":
-                    self.actor_representation[key] = DistributedDataParallel(self.actor_representation[key],
-                                                                             device_ids=[self.rank])
-                if self.critic_A_representation[key]._get_name() != "Basic_Identical":
-                    self.critic_A_representation[key] = DistributedDataParallel(self.critic_A_representation[key],
-                                                                                device_ids=[self.rank])
-                if self.critic_B_representation[key]._get_name() != "Basic_Identical":
-                    self.critic_B_representation[key] = DistributedDataParallel(self.critic_B_representation[key],
-                                                                                device_ids=[self.rank])
-                self.actor[key] = DistributedDataParallel(module=self.actor[key], device_ids=[self.rank])
-                self.critic_A[key] = DistributedDataParallel(module=self.critic_A[key], device_ids=[self.rank])
-                self.critic_B[key] = DistributedDataParallel(module=self.critic_B[key], device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.actor_representation, self.critic_A_representation,
+                                                      self.critic_B_representation, self.actor, self.critic_A,
+                                                      self.critic_B],
+                                              target=[self.target_actor_representation,
+                                                      self.target_critic_A_representation,
+                                                      self.target_critic_B_representation, self.target_actor,
+                                                      self.target_critic_A, self.target_critic_B])
+
+    @property
+    def parameters_critic_ensemble(self):
+        """The stacked parameters of the critics of all agents when use_agent_ensemble is True."""
+        return list(self.critic_A_representation.parameters()) + list(self.critic_A.parameters()) + list(
+            self.critic_B_representation.parameters()) + list(self.critic_B.parameters())
 
     @property
     def parameters_critic(self):
+        if self.use_agent_ensemble:
+            return {key: self.parameters_critic_ensemble for key in self.model_keys}
         parameters_critic = {}
         for key in self.model_keys:
             parameters_critic[key] = list(self.critic_A_representation[key].parameters()) + list(
@@ -1442,7 +1695,7 @@ class MATD3_Policy(MADDPG_Policy, Module):
                 self.critic_B[key].parameters())
         return parameters_critic
 
-    def Qpolicy(self, joint_observation: Tensor, joint_actions: Tensor,
+    def Qpolicy(self, joint_observation: Tensor, joint_actions: Union[Tensor, Dict[str, Tensor]],
                 agent_ids: Tensor = None, agent_key: str = None,
                 rnn_hidden: Optional[Dict[str, List[Tensor]]] = None):
         """
@@ -1450,7 +1703,8 @@ class MATD3_Policy(MADDPG_Policy, Module):
 
         Parameters:
             joint_observation (Tensor): The joint observations of the team.
-            joint_actions (Tensor): The joint actions of the team.
+            joint_actions (Union[Tensor, Dict[str, Tensor]]): The joint actions of the team, or with an agent ensemble,
+                a dict of the joint actions evaluated by the critic of each agent.
             agent_ids (Dict[Tensor]): The agents' ids (for parameter sharing).
             agent_key (str): Calculate actions for specified agent.
             rnn_hidden (Optional[Dict[str, List[Tensor]]]): The hidden variables of the RNN.
@@ -1462,6 +1716,13 @@ class MATD3_Policy(MADDPG_Policy, Module):
         """
         q_eval, q_eval_A, q_eval_B = {}, {}, {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            q_eval_A = self._joint_critic_ensemble(self.critic_A_representation, self.critic_A,
+                                                   joint_observation, joint_actions)
+            q_eval_B = self._joint_critic_ensemble(self.critic_B_representation, self.critic_B,
+                                                   joint_observation, joint_actions)
+            return ({key: q_eval_A[key] for key in agent_list}, {key: q_eval_B[key] for key in agent_list},
+                    {key: (q_eval_A[key] + q_eval_B[key]) / 2.0 for key in agent_list})
         batch_size = joint_observation.shape[0]
         seq_len = joint_observation.shape[1] if self.use_rnn else 1
 
@@ -1522,6 +1783,12 @@ class MATD3_Policy(MADDPG_Policy, Module):
         """
         q_target = {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            q_target_A = self._joint_critic_ensemble(self.target_critic_A_representation, self.target_critic_A,
+                                                     joint_observation, joint_actions)
+            q_target_B = self._joint_critic_ensemble(self.target_critic_B_representation, self.target_critic_B,
+                                                     joint_observation, joint_actions)
+            return {key: torch.minimum(q_target_A[key], q_target_B[key]) for key in agent_list}
         batch_size = joint_observation.shape[0]
         seq_len = joint_observation.shape[1] if self.use_rnn else 1
 
@@ -1565,21 +1832,4 @@ class MATD3_Policy(MADDPG_Policy, Module):
         return q_target
 
     def soft_update(self, tau=0.005):
-        for ep, tp in zip(self.actor_representation.parameters(), self.target_actor_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_A_representation.parameters(), self.target_critic_A_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_B_representation.parameters(), self.target_critic_B_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.actor.parameters(), self.target_actor.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_A.parameters(), self.target_critic_A.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_B.parameters(), self.target_critic_B.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
+        self.target_networks.soft_update(tau)
@@ -1,11 +1,10 @@
-import os
 import torch
 import numpy as np
 from xuance.common import Sequence, Optional, Callable, Union
 from copy import deepcopy
 from gym.spaces import Box
-from xuance.torch import Module, Tensor, DistributedDataParallel
-from xuance.torch.utils import ModuleType
+from xuance.torch import Module, Tensor
+from xuance.torch.utils import ModuleType, TargetNetworks
 from .core import GaussianActorNet as ActorNet
 from .core import CriticNet, GaussianActorNet_SAC
 
@@ -23,7 +22,7 @@ class ActorPolicy(Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -44,13 +43,7 @@ class ActorPolicy(Module):
         self.actor = ActorNet(representation.output_shapes['state'][0], self.action_dim, actor_hidden_size,
                               normalize, initialize, activation, activation_action, device)
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.actor = DistributedDataParallel(module=self.actor, device_ids=[self.rank])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -82,7 +75,7 @@ class ActorCriticPolicy(Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -105,14 +98,7 @@ class ActorCriticPolicy(Module):
         self.critic = CriticNet(representation.output_shapes['state'][0], critic_hidden_size,
                                 normalize, initialize, activation, device)
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.actor = DistributedDataParallel(module=self.actor, device_ids=[self.rank])
-            self.critic = DistributedDataParallel(module=self.critic, device_ids=[self.rank])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -146,7 +132,7 @@ class PPGActorCritic(Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -172,15 +158,7 @@ class PPGActorCritic(Module):
         self.aux_critic = CriticNet(representation.output_shapes['state'][0], critic_hidden_size,
                                     normalize, initialize, activation, device)
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.representation._get_name() != "Basic_Identical":
-                self.representation = DistributedDataParallel(module=self.representation, device_ids=[self.rank])
-            self.actor = DistributedDataParallel(module=self.actor, device_ids=[self.rank])
-            self.critic = DistributedDataParallel(module=self.critic, device_ids=[self.rank])
-            self.aux_critic = DistributedDataParallel(module=self.aux_critic, device_ids=[self.rank])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -217,7 +195,7 @@ class SACPolicy(Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
+        use_distributed_training (bool): Whether to use distributed training.
     """
 
     def __init__(self,
@@ -256,21 +234,13 @@ class SACPolicy(Module):
             self.critic_1.parameters()) + list(self.critic_2_representation.parameters()) + list(
             self.critic_2.parameters())
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            if self.actor_representation._get_name() != "Basic_Identical":
-                self.actor_representation = DistributedDataParallel(self.actor_representation, device_ids=[self.rank])
-            if self.critic_1_representation._get_name() != "Basic_Identical":
-                self.critic_1_representation = DistributedDataParallel(self.critic_1_representation,
-                                                                       device_ids=[self.rank])
-            if self.critic_2_representation._get_name() != "Basic_Identical":
-                self.critic_2_representation = DistributedDataParallel(self.critic_2_representation,
-                                                                       device_ids=[self.rank])
-            self.actor = DistributedDataParallel(module=self.actor, device_ids=[self.rank])
-            self.critic_1 = DistributedDataParallel(module=self.critic_1, device_ids=[self.rank])
-            self.critic_2 = DistributedDataParallel(module=self.critic_2, device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.critic_1_representation, self.critic_2_representation,
+                                                      self.critic_1, self.critic_2],
+                                              target=[self.target_critic_1_representation,
+                                                      self.target_critic_2_representation, self.target_critic_1,
+                                                      self.target_critic_2])
 
     def forward(self, observation: Union[np.ndarray, dict]):
         """
@@ -353,15 +323,4 @@ class SACPolicy(Module):
         return q_1[:, 0], q_2[:, 0]
 
     def soft_update(self, tau=0.005):
-        for ep, tp in zip(self.critic_1_representation.parameters(), self.target_critic_1_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_2_representation.parameters(), self.target_critic_2_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_1.parameters(), self.target_critic_1.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_2.parameters(), self.target_critic_2.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
+        self.target_networks.soft_update(tau)
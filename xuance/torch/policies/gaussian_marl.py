@@ -1,11 +1,11 @@
-import os
 import torch
 import numpy as np
 from copy import deepcopy
 from gym.spaces import Box
 from xuance.common import Sequence, Optional, Callable, Union, Dict, List
-from xuance.torch.utils import ModuleType
-from xuance.torch import Tensor, Module, ModuleDict, DistributedDataParallel
+from xuance.torch.utils import ModuleType, ModuleEnsemble, TargetNetworks
+from xuance.torch import Tensor, Module, ModuleDict
+from xuance.torch.communications.base_comm import CommGraph
 from .core import GaussianActorNet, GaussianActorNet_SAC, CriticNet
 
 
@@ -25,8 +25,9 @@ class MAAC_Policy(Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
-        **kwargs: Other arguments.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: Other arguments, use_agent_ensemble stacks the networks of all agents into one ModuleEnsemble when
+            the parameters are not shared.
     """
 
     def __init__(self,
@@ -68,23 +69,20 @@ class MAAC_Policy(Module):
                                                normalize, initialize, activation, activation_action, device)
             self.critic[key] = CriticNet(dim_critic_in, critic_hidden_size, normalize, initialize, activation, device)
 
+        self.use_agent_ensemble = kwargs.get("use_agent_ensemble", False) and not self.use_parameter_sharing
+        if self.use_agent_ensemble:
+            if self.use_rnn:
+                raise AttributeError("The agent ensemble does not support recurrent representations.")
+            # The actors of the ensemble return the parameters of the distributions of the agents.
+            self.actor_dists = {key: self.actor[key].dist for key in self.model_keys}
+            self.actor_representation = ModuleEnsemble(self.actor_representation)
+            self.critic_representation = ModuleEnsemble(self.critic_representation)
+            self.actor = ModuleEnsemble(self.actor, method="dist_param")
+            self.critic = ModuleEnsemble(self.critic)
+
         self.mixer = mixer
 
-        # Prepare DDP module.
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            for key in self.model_keys:
-                if self.actor_representation[key]._get_name() != "Basic_Identical":
-                    self.actor_representation[key] = DistributedDataParallel(module=self.actor_representation[key],
-                                                                             device_ids=[self.rank])
-                if self.critic_representation[key]._get_name() != "Basic_Identical":
-                    self.critic_representation[key] = DistributedDataParallel(module=self.critic_representation[key],
-                                                                              device_ids=[self.rank])
-                self.actor[key] = DistributedDataParallel(module=self.actor[key], device_ids=[self.rank])
-                self.critic[key] = DistributedDataParallel(module=self.critic[key], device_ids=[self.rank])
-            if self.mixer is not None:
-                self.mixer = DistributedDataParallel(module=self.mixer, device_ids=[self.rank])
 
     @property
     def parameters_model(self):
@@ -137,6 +135,14 @@ class MAAC_Policy(Module):
         """
         rnn_hidden_new, pi_dists = deepcopy(rnn_hidden), {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            # One vectorized pass evaluates the stacked networks of all agents.
+            outputs = self.actor_representation(observation)
+            dist_params = self.actor({key: outputs[key]['state'] for key in self.model_keys})
+            for key in agent_list:
+                self.actor_dists[key].set_param(**dist_params[key])
+                pi_dists[key] = self.actor_dists[key]
+            return rnn_hidden, pi_dists
 
         for key in agent_list:
             if self.use_rnn:
@@ -146,7 +152,8 @@ class MAAC_Policy(Module):
                 outputs = self.actor_representation[key](observation[key])
 
             if self.use_parameter_sharing:
-                actor_in = torch.concat([outputs['state'], agent_ids], dim=-1)
+                ids = agent_ids[key] if isinstance(agent_ids, dict) else agent_ids  # A dict with use_group_sharing.
+                actor_in = torch.concat([outputs['state'], ids], dim=-1)
             else:
                 actor_in = outputs['state']
             pi_dists[key] = self.actor[key](actor_in)
@@ -170,6 +177,10 @@ class MAAC_Policy(Module):
         """
         rnn_hidden_new, values = deepcopy(rnn_hidden), {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            outputs = self.critic_representation(observation)
+            values_ensemble = self.critic({key: outputs[key]['state'] for key in self.model_keys})
+            return rnn_hidden_new, {key: values_ensemble[key] for key in agent_list}
 
         for key in agent_list:
             if self.use_rnn:
@@ -179,7 +190,8 @@ class MAAC_Policy(Module):
                 outputs = self.critic_representation[key](observation[key])
 
             if self.use_parameter_sharing:
-                critic_in = torch.concat([outputs['state'], agent_ids], dim=-1)
+                ids = agent_ids[key] if isinstance(agent_ids, dict) else agent_ids  # A dict with use_group_sharing.
+                critic_in = torch.concat([outputs['state'], ids], dim=-1)
             else:
                 critic_in = outputs['state']
 
@@ -193,6 +205,128 @@ class MAAC_Policy(Module):
         return values_n if self.mixer is None else self.mixer(values_n, global_state)
 
 
+class MAAC_Policy_With_Communication(MAAC_Policy):
+    """
+    MAAC_Policy_With_Communication: Multi-Agent Actor-Critic Policy with Gaussian distributions and communication.
+
+    The actor representations of all agents are calculated first, then the communicator exchanges the messages of all
+    environments, agents and time steps at once, and each actor reads its representation with the received messages.
+    The critics are the ones of MAAC_Policy.
+
+    Args:
+        action_space (Box): The continuous action space.
+        n_agents (int): The number of agents.
+        representation_actor (ModuleDict): A dict of representation modules for each agent's actor.
+        representation_critic (ModuleDict): A dict of representation modules for each agent's critic.
+        mixer (Module): The mixer module that mix together the individual values to the total value.
+        communicator (Module): The communication module of the actors, see xuance.torch.communications.
+        actor_hidden_size (Sequence[int]): A list of hidden layer sizes for actor network.
+        critic_hidden_size (Sequence[int]): A list of hidden layer sizes for critic network.
+        normalize (Optional[ModuleType]): The layer normalization over a minibatch of inputs.
+        initialize (Optional[Callable[..., Tensor]]): The parameters initializer.
+        activation (Optional[ModuleType]): The activation function for each layer.
+        activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
+        device (Optional[Union[str, int, torch.device]]): The calculating device.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: Other arguments.
+    """
+
+    def __init__(self,
+                 action_space: Optional[Dict[str, Box]],
+                 n_agents: int,
+                 representation_actor: ModuleDict,
+                 representation_critic: ModuleDict,
+                 mixer: Optional[Module] = None,
+                 communicator: Optional[Module] = None,
+                 actor_hidden_size: Sequence[int] = None,
+                 critic_hidden_size: Sequence[int] = None,
+                 normalize: Optional[ModuleType] = None,
+                 initialize: Optional[Callable[..., Tensor]] = None,
+                 activation: Optional[ModuleType] = None,
+                 activation_action: Optional[ModuleType] = None,
+                 device: Optional[Union[str, int, torch.device]] = None,
+                 use_distributed_training: bool = False,
+                 **kwargs):
+        if communicator is None:
+            raise AttributeError("The policy with communication requires a communicator.")
+        if kwargs.get("use_agent_ensemble", False):
+            raise AttributeError("The policy with communication does not support the agent ensemble.")
+        self.msg_dim = communicator.msg_dim
+        super(MAAC_Policy_With_Communication, self).__init__(action_space, n_agents, representation_actor,
+                                                             representation_critic, mixer, actor_hidden_size,
+                                                             critic_hidden_size, normalize, initialize, activation,
+                                                             activation_action, device, use_distributed_training,
+                                                             **kwargs)
+        self.communicator = communicator
+
+    @property
+    def parameters_model(self):
+        return super(MAAC_Policy_With_Communication, self).parameters_model + list(self.communicator.parameters())
+
+    def _get_actor_critic_input(self, dim_action, dim_actor_rep, dim_critic_rep, n_agents):
+        """
+        Returns the input dimensions of actor netwrok and critic networks.
+
+        Parameters:
+            dim_action: The dimension of actions (continuous), or the number of actions (discrete).
+            dim_actor_rep: The dimension of the output of actor presentation.
+            dim_critic_rep: The dimension of the output of critic presentation.
+            n_agents: The number of agents.
+
+        Returns:
+            dim_actor_in: The dimension of input of the actor networks, with the received messages.
+            dim_actor_out: The dimension of output of the actor networks.
+            dim_critic_in: The dimension of the input of critic networks.
+            dim_critic_out: The dimension of the output of critic networks.
+        """
+        dim_actor_in, dim_actor_out, dim_critic_in, dim_critic_out = super(
+            MAAC_Policy_With_Communication, self)._get_actor_critic_input(dim_action, dim_actor_rep, dim_critic_rep,
+                                                                          n_agents)
+        return dim_actor_in + self.msg_dim, dim_actor_out, dim_critic_in, dim_critic_out
+
+    def forward(self, observation: Dict[str, Tensor], agent_ids: Optional[Tensor] = None,
+                avail_actions: Dict[str, Tensor] = None, agent_key: str = None,
+                rnn_hidden: Optional[Dict[str, List[Tensor]]] = None,
+                agent_mask: Optional[Dict[str, Tensor]] = None, adjacency: CommGraph = None):
+        """
+        Returns actions of the policy.
+
+        Parameters:
+            observation (Dict[str, Tensor]): The input observations for the policies.
+            agent_ids (Tensor): The agents' ids (for parameter sharing).
+            avail_actions (Dict[str, Tensor]): Actions mask values, default is None.
+            agent_key (str): Calculate actions for specified agent (the messages come from all agents).
+            rnn_hidden (Optional[Dict[str, List[Tensor]]]): The RNN hidden states of actor representation.
+            agent_mask (Optional[Dict[str, Tensor]]): The alive agents that send and receive messages, default is None.
+            adjacency (CommGraph): The agent graph of the communication, default is the fully connected graph.
+
+        Returns:
+            rnn_hidden_new (Optional[Dict[str, List[Tensor]]]): The new RNN hidden states of actor representation.
+            pi_dists (dict): The stochastic policy distributions.
+        """
+        rnn_hidden_new, pi_dists, features = deepcopy(rnn_hidden), {}, {}
+        agent_list = self.model_keys if agent_key is None else [agent_key]
+
+        for key in self.model_keys:
+            if self.use_rnn:
+                outputs = self.actor_representation[key](observation[key], *rnn_hidden[key])
+                rnn_hidden_new.update({key: (outputs['rnn_hidden'], outputs['rnn_cell'])})
+            else:
+                outputs = self.actor_representation[key](observation[key])
+
+            if self.use_parameter_sharing:
+                features[key] = torch.concat([outputs['state'], agent_ids], dim=-1)
+            else:
+                features[key] = outputs['state']
+
+        msg_received = self.communicator.communicate(features, agent_mask, adjacency)
+
+        for key in agent_list:
+            pi_dists[key] = self.actor[key](torch.concat([features[key], msg_received[key]], dim=-1))
+
+        return rnn_hidden_new, pi_dists
+
+
 class Basic_ISAC_Policy(Module):
     """
     Basic_ISAC_Policy: The basic policy for independent soft actor-critic.
@@ -209,8 +343,9 @@ class Basic_ISAC_Policy(Module):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
-        **kwargs: Other arguments.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: Other arguments, use_agent_ensemble stacks the networks of all agents into one ModuleEnsemble when
+            the parameters are not shared.
     """
 
     def __init__(self,
@@ -256,26 +391,43 @@ class Basic_ISAC_Policy(Module):
         self.target_critic_1 = deepcopy(self.critic_1)
         self.target_critic_2 = deepcopy(self.critic_2)
 
-        # Prepare DDP module.
+        self.use_agent_ensemble = kwargs.get("use_agent_ensemble", False) and not self.use_parameter_sharing
+        if self.use_agent_ensemble:
+            if self.use_rnn:
+                raise AttributeError("The agent ensemble does not support recurrent representations.")
+            # The actors of the ensemble return the parameters of the distributions of the agents.
+            self.actor_dists = {key: self.actor[key].dist for key in self.model_keys}
+            self.actor_representation = ModuleEnsemble(self.actor_representation)
+            self.actor = ModuleEnsemble(self.actor, method="dist_param")
+            self.critic_1_representation = ModuleEnsemble(self.critic_1_representation)
+            self.critic_2_representation = ModuleEnsemble(self.critic_2_representation)
+            self.critic_1, self.critic_2 = ModuleEnsemble(self.critic_1), ModuleEnsemble(self.critic_2)
+            self.target_critic_1_representation = deepcopy(self.critic_1_representation)
+            self.target_critic_2_representation = deepcopy(self.critic_2_representation)
+            self.target_critic_1, self.target_critic_2 = deepcopy(self.critic_1), deepcopy(self.critic_2)
+
         self.distributed_training = use_distributed_training
-        if self.distributed_training:
-            self.rank = int(os.environ["RANK"])
-            for key in self.model_keys:
-                if self.actor_representation[key]._get_name() != "Basic_Identical":
-                    self.actor_representation[key] = DistributedDataParallel(self.actor_representation[key],
-                                                                             device_ids=[self.rank])
-                if self.critic_1_representation[key]._get_name() != "Basic_Identical":
-                    self.critic_1_representation[key] = DistributedDataParallel(self.critic_1_representation[key],
-                                                                                device_ids=[self.rank])
-                if self.critic_2_representation[key]._get_name() != "Basic_Identical":
-                    self.critic_2_representation[key] = DistributedDataParallel(self.critic_2_representation[key],
-                                                                                device_ids=[self.rank])
-                self.actor[key] = DistributedDataParallel(module=self.actor[key], device_ids=[self.rank])
-                self.critic_1[key] = DistributedDataParallel(module=self.critic_1[key], device_ids=[self.rank])
-                self.critic_2[key] = DistributedDataParallel(module=self.critic_2[key], device_ids=[self.rank])
+
+        self.target_networks = TargetNetworks(online=[self.critic_1_representation, self.critic_1,
+                                                      self.critic_2_representation, self.critic_2],
+                                              target=[self.target_critic_1_representation, self.target_critic_1,
+                                                      self.target_critic_2_representation, self.target_critic_2])
+
+    @property
+    def parameters_actor_ensemble(self):
+        """The stacked parameters of the actors of all agents when use_agent_ensemble is True."""
+        return list(self.actor_representation.parameters()) + list(self.actor.parameters())
+
+    @property
+    def parameters_critic_ensemble(self):
+        """The stacked parameters of the critics of all agents when use_agent_ensemble is True."""
+        return list(self.critic_1_representation.parameters()) + list(self.critic_1.parameters()) + list(
+            self.critic_2_representation.parameters()) + list(self.critic_2.parameters())
 
     @property
     def parameters_actor(self):
+        if self.use_agent_ensemble:
+            return {key: self.parameters_actor_ensemble for key in self.model_keys}
         parameters_actor = {}
         for key in self.model_keys:
             parameters_actor[key] = list(self.actor_representation[key].parameters()) + list(
@@ -284,6 +436,8 @@ class Basic_ISAC_Policy(Module):
 
     @property
     def parameters_critic(self):
+        if self.use_agent_ensemble:
+            return {key: self.parameters_critic_ensemble for key in self.model_keys}
         parameters_critic = {}
         for key in self.model_keys:
             parameters_critic[key] = list(self.critic_1_representation[key].parameters()) + list(
@@ -314,6 +468,23 @@ class Basic_ISAC_Policy(Module):
             dim_critic_in += n_agents
         return dim_actor_in, dim_actor_out, dim_critic_in
 
+    def _critic_ensemble(self, representation: ModuleEnsemble, critic: ModuleEnsemble,
+                         observation: Dict[str, Tensor], actions: Dict[str, Tensor]):
+        """
+        Evaluates the critics of all agents in one vectorized pass of an agent ensemble.
+
+        Parameters:
+            representation (ModuleEnsemble): The stacked critic representations.
+            critic (ModuleEnsemble): The stacked critics.
+            observation (Dict[Tensor]): The observations.
+            actions (Dict[Tensor]): The actions.
+
+        Returns:
+            q (Dict[Tensor]): The evaluations of the critic of each agent.
+        """
+        outputs = representation(observation)
+        return critic({key: torch.concat([outputs[key]['state'], actions[key]], dim=-1) for key in self.model_keys})
+
     def forward(self, observation: Dict[str, Tensor], agent_ids: Tensor = None,
                 avail_actions: Dict[str, Tensor] = None, agent_key: str = None,
                 rnn_hidden: Optional[Dict[str, List[Tensor]]] = None):
@@ -333,6 +504,14 @@ class Basic_ISAC_Policy(Module):
         """
         rnn_hidden_new, act_dists, actions_dict, log_action_prob = deepcopy(rnn_hidden), {}, {}, {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            # One vectorized pass evaluates the stacked networks of all agents.
+            outputs = self.actor_representation(observation)
+            dist_params = self.actor({key: outputs[key]['state'] for key in self.model_keys})
+            for key in agent_list:
+                self.actor_dists[key].set_param(**dist_params[key])
+                actions_dict[key], log_action_prob[key] = self.actor_dists[key].activated_rsample_and_logprob()
+            return rnn_hidden_new, actions_dict, log_action_prob
         for key in agent_list:
             if self.use_rnn:
                 outputs = self.actor_representation[key](observation[key], *rnn_hidden[key])
@@ -373,6 +552,11 @@ class Basic_ISAC_Policy(Module):
         rnn_hidden_critic_new_1, rnn_hidden_critic_new_2 = deepcopy(rnn_hidden_critic_1), deepcopy(rnn_hidden_critic_2)
         q_1, q_2 = {}, {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            q_1 = self._critic_ensemble(self.critic_1_representation, self.critic_1, observation, actions)
+            q_2 = self._critic_ensemble(self.critic_2_representation, self.critic_2, observation, actions)
+            return (rnn_hidden_critic_new_1, rnn_hidden_critic_new_2,
+                    {key: q_1[key] for key in agent_list}, {key: q_2[key] for key in agent_list})
 
         for key in agent_list:
             if self.use_rnn:
@@ -416,6 +600,13 @@ class Basic_ISAC_Policy(Module):
         rnn_hidden_critic_new_1, rnn_hidden_critic_new_2 = deepcopy(rnn_hidden_critic_1), deepcopy(rnn_hidden_critic_2)
         target_q = {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            q_1 = self._critic_ensemble(self.target_critic_1_representation, self.target_critic_1,
+                                        next_observation, next_actions)
+            q_2 = self._critic_ensemble(self.target_critic_2_representation, self.target_critic_2,
+                                        next_observation, next_actions)
+            return (rnn_hidden_critic_new_1, rnn_hidden_critic_new_2,
+                    {key: torch.min(q_1[key], q_2[key]) for key in agent_list})
         for key in agent_list:
             if self.use_rnn:
                 outputs_critic_1 = self.target_critic_1_representation[key](next_observation[key],
@@ -462,6 +653,11 @@ class Basic_ISAC_Policy(Module):
         rnn_hidden_critic_new_1, rnn_hidden_critic_new_2 = deepcopy(rnn_hidden_critic_1), deepcopy(rnn_hidden_critic_2)
         q_1, q_2 = {}, {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            q_1 = self._critic_ensemble(self.critic_1_representation, self.critic_1, observation, actions)
+            q_2 = self._critic_ensemble(self.critic_2_representation, self.critic_2, observation, actions)
+            return (rnn_hidden_critic_new_1, rnn_hidden_critic_new_2,
+                    {key: q_1[key] for key in agent_list}, {key: q_2[key] for key in agent_list})
         for key in agent_list:
             if self.use_rnn:
                 outputs_critic_1 = self.critic_1_representation[key](observation[key], *rnn_hidden_critic_1[key])
@@ -481,18 +677,7 @@ class Basic_ISAC_Policy(Module):
         return rnn_hidden_critic_new_1, rnn_hidden_critic_new_2, q_1, q_2
 
     def soft_update(self, tau=0.005):
-        for ep, tp in zip(self.critic_1_representation.parameters(), self.target_critic_1_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_1.parameters(), self.target_critic_1.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_2_representation.parameters(), self.target_critic_2_representation.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
-        for ep, tp in zip(self.critic_2.parameters(), self.target_critic_2.parameters()):
-            tp.data.mul_(1 - tau)
-            tp.data.add_(tau * ep.data)
+        self.target_networks.soft_update(tau)
 
 
 class MASAC_Policy(Basic_ISAC_Policy):
@@ -511,8 +696,9 @@ class MASAC_Policy(Basic_ISAC_Policy):
         activation (Optional[ModuleType]): The activation function for each layer.
         activation_action (Optional[ModuleType]): The activation of final layer to bound the actions.
         device (Optional[Union[str, int, torch.device]]): The calculating device.
-        use_distributed_training (bool): Whether to use multi-GPU for distributed training.
-        **kwargs: Other arguments.
+        use_distributed_training (bool): Whether to use distributed training.
+        **kwargs: Other arguments, use_agent_ensemble stacks the networks of all agents into one ModuleEnsemble when
+            the parameters are not shared.
     """
 
     def __init__(self,
@@ -557,8 +743,29 @@ class MASAC_Policy(Basic_ISAC_Policy):
             dim_critic_in += n_agents
         return dim_actor_in, dim_actor_out, dim_critic_in
 
+    def _critic_ensemble(self, representation: ModuleEnsemble, critic: ModuleEnsemble,
+                         joint_observation: Tensor, joint_actions: Union[Tensor, Dict[str, Tensor]]):
+        """
+        Evaluates the centralized critics of all agents in one vectorized pass of an agent ensemble.
+
+        Parameters:
+            representation (ModuleEnsemble): The stacked critic representations.
+            critic (ModuleEnsemble): The stacked critics.
+            joint_observation (Tensor): The joint observations of the team.
+            joint_actions (Union[Tensor, Dict[str, Tensor]]): The joint actions of the team, or a dict of the joint
+                actions evaluated by the critic of each agent.
+
+        Returns:
+            q (Dict[Tensor]): The evaluations of the critic of each agent.
+        """
+        if not isinstance(joint_actions, dict):
+            joint_actions = {key: joint_actions for key in self.model_keys}
+        outputs = representation({key: torch.concat([joint_observation, joint_actions[key]], dim=-1)
+                                  for key in self.model_keys})
+        return critic({key: outputs[key]['state'] for key in self.model_keys})
+
     def Qpolicy(self, joint_observation: Optional[Tensor] = None,
-                joint_actions: Optional[Tensor] = None,
+                joint_actions: Optional[Union[Tensor, Dict[str, Tensor]]] = None,
                 agent_ids: Tensor = None, agent_key: str = None,
                 rnn_hidden_critic_1: Optional[Dict[str, List[Tensor]]] = None,
                 rnn_hidden_critic_2: Optional[Dict[str, List[Tensor]]] = None):
@@ -567,7 +774,8 @@ class MASAC_Policy(Basic_ISAC_Policy):
 
         Parameters:
             joint_observation (Optional[Tensor]): The joint observations of the team.
-            joint_actions (Optional[Tensor]): The joint actions of the team.
+            joint_actions (Optional[Union[Tensor, Dict[str, Tensor]]]): The joint actions of the team, or with an agent
+                ensemble, a dict of the joint actions evaluated by the critic of each agent.
             agent_ids (Dict[Tensor]): The agents' ids (for parameter sharing).
             agent_key (str): Calculate actions for specified agent.
             rnn_hidden_critic_1 (Optional[Dict[str, List[Tensor]]]): The RNN hidden states for critic_1 representation.
@@ -582,6 +790,11 @@ class MASAC_Policy(Basic_ISAC_Policy):
         rnn_hidden_critic_new_1, rnn_hidden_critic_new_2 = deepcopy(rnn_hidden_critic_1), deepcopy(rnn_hidden_critic_2)
         q_1, q_2 = {}, {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            q_1 = self._critic_ensemble(self.critic_1_representation, self.critic_1, joint_observation, joint_actions)
+            q_2 = self._critic_ensemble(self.critic_2_representation, self.critic_2, joint_observation, joint_actions)
+            return (rnn_hidden_critic_new_1, rnn_hidden_critic_new_2,
+                    {key: q_1[key] for key in agent_list}, {key: q_2[key] for key in agent_list})
         batch_size = joint_observation.shape[0]
         seq_len = joint_observation.shape[1] if self.use_rnn else 1
 
@@ -653,6 +866,13 @@ class MASAC_Policy(Basic_ISAC_Policy):
         rnn_hidden_critic_new_1, rnn_hidden_critic_new_2 = deepcopy(rnn_hidden_critic_1), deepcopy(rnn_hidden_critic_2)
         target_q = {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            q_1 = self._critic_ensemble(self.target_critic_1_representation, self.target_critic_1,
+                                        joint_observation, joint_actions)
+            q_2 = self._critic_ensemble(self.target_critic_2_representation, self.target_critic_2,
+                                        joint_observation, joint_actions)
+            return (rnn_hidden_critic_new_1, rnn_hidden_critic_new_2,
+                    {key: torch.min(q_1[key], q_2[key]) for key in agent_list})
         batch_size = joint_observation.shape[0]
         seq_len = joint_observation.shape[1] if self.use_rnn else 1
 
@@ -725,6 +945,11 @@ class MASAC_Policy(Basic_ISAC_Policy):
         rnn_hidden_critic_new_1, rnn_hidden_critic_new_2 = deepcopy(rnn_hidden_critic_1), deepcopy(rnn_hidden_critic_2)
         q_1, q_2 = {}, {}
         agent_list = self.model_keys if agent_key is None else [agent_key]
+        if self.use_agent_ensemble:
+            q_1 = self._critic_ensemble(self.critic_1_representation, self.critic_1, joint_observation, joint_actions)
+            q_2 = self._critic_ensemble(self.critic_2_representation, self.critic_2, joint_observation, joint_actions)
+            return (rnn_hidden_critic_new_1, rnn_hidden_critic_new_2,
+                    {key: q_1[key] for key in agent_list}, {key: q_2[key] for key in agent_list})
         batch_size = joint_observation.shape[0]
         seq_len = joint_observation.shape[1] if self.use_rnn else 1
 
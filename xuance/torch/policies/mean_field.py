@@ -0,0 +1,126 @@
+import torch
+from xuance.common import Optional, Union, Sequence, Dict, List
+from xuance.torch import Tensor
+
+
+class MeanFieldAggregator(object):
+    """
+    Computes the mean action of the neighborhood of every agent, for mean-field MARL methods (MFQ, MFAC).
+
+    The means of all agents of a batch are computed at once, from the actions stacked as a tensor with shape
+    (batch_size, n_agents, n_actions), i.e., one-hot actions or action probabilities:
+        "GLOBAL": the neighbors of an agent are all the other agents, the means take O(n_agents * n_actions).
+        "KNN": the neighbors are the n_neighbors nearest agents, whose actions are gathered with the top-k indexes of
+            the distances, without building the (n_agents, n_agents) adjacency.
+        "RANGE": the neighbors are the agents within neighbor_range, whose actions are summed with a batched product
+            of the adjacency matrices.
+    The positions of the agents, needed by "KNN" and "RANGE", are read from the observations at position_index. The
+    dead agents, given by the agent mask, are not neighbors of any agent, and an agent without neighbors has a zero
+    mean action.
+
+    Args:
+        n_agents (int): The number of agents.
+        model_keys (List[str]): The keys of the models, the first one is used with parameter sharing.
+        use_parameter_sharing (bool): Whether the agents share the parameters, i.e., the layout of the policy outputs.
+        neighborhood (str): The type of neighborhood, "GLOBAL", "KNN" or "RANGE", default is "GLOBAL".
+        n_neighbors (int): The number of nearest neighbors of each agent for the "KNN" neighborhood.
+        neighbor_range (float): The distance within which agents are neighbors for the "RANGE" neighborhood.
+        position_index (Optional[Sequence[int]]): The indexes of the positions of an agent in its observation.
+        device (Optional[Union[str, int, torch.device]]): The device of the tensors, default is None.
+    """
+
+    def __init__(self,
+                 n_agents: int,
+                 model_keys: List[str],
+                 use_parameter_sharing: bool = False,
+                 neighborhood: str = "GLOBAL",
+                 n_neighbors: int = 8,
+                 neighbor_range: float = 1.0,
+                 position_index: Optional[Sequence[int]] = None,
+                 device: Optional[Union[str, int, torch.device]] = None):
+        if neighborhood not in ["GLOBAL", "KNN", "RANGE"]:
+            raise AttributeError("There is no mean-field neighborhood named {}!".format(neighborhood))
+        if neighborhood != "GLOBAL" and position_index is None:
+            raise AttributeError(f"The {neighborhood} neighborhood needs the position_index of the agents' positions "
+                                 f"in their observations.")
+        self.n_agents = n_agents
+        self.model_keys = model_keys
+        self.use_parameter_sharing = use_parameter_sharing
+        self.neighborhood = neighborhood
+        self.n_neighbors = min(n_neighbors, n_agents - 1)
+        self.neighbor_range = neighbor_range
+        self.position_index = None if position_index is None else list(position_index)
+        self.device = device
+
+    def stack(self, values: Dict[str, Tensor]) -> Tensor:
+        """
+        Stacks the outputs of the policies, {model_key: Tensor}, as one tensor with shape (batch_size, n_agents, ...).
+        """
+        if self.use_parameter_sharing:
+            values_shared = values[self.model_keys[0]]
+            return values_shared.reshape([-1, self.n_agents] + list(values_shared.shape[1:]))
+        return torch.stack([values[key] for key in self.model_keys], dim=1)
+
+    def split(self, values: Tensor) -> Dict[str, Tensor]:
+        """
+        Splits a tensor with shape (batch_size, n_agents, ...) into the inputs of the policies, {model_key: Tensor}.
+        """
+        if self.use_parameter_sharing:
+            return {self.model_keys[0]: values.reshape([-1] + list(values.shape[2:]))}
+        return {key: values[:, i] for i, key in enumerate(self.model_keys)}
+
+    def get_positions(self, observations: Sequence) -> Optional[Tensor]:
+        """
+        Returns the positions of the agents, with shape (batch_size, n_agents, dim_position).
+
+        Parameters:
+            observations (Sequence): The observations of each agent, arrays or tensors with shape (batch_size, dim_obs).
+
+        Returns:
+            positions (Optional[Tensor]): The positions, None for the "GLOBAL" neighborhood.
+        """
+        if self.neighborhood == "GLOBAL":
+            return None
+        return torch.stack([torch.as_tensor(obs, dtype=torch.float32, device=self.device)[:, self.position_index]
+                            for obs in observations], dim=1)
+
+    def __call__(self, actions: Tensor,
+                 agent_mask: Optional[Tensor] = None,
+                 positions: Optional[Tensor] = None) -> Tensor:
+        """
+        Returns the mean actions of the neighbors of every agent.
+
+        Parameters:
+            actions (Tensor): The one-hot actions or the action probabilities, (batch_size, n_agents, n_actions).
+            agent_mask (Optional[Tensor]): The alive agents, (batch_size, n_agents), default is None (all alive).
+            positions (Optional[Tensor]): The positions of the agents, (batch_size, n_agents, dim_position).
+
+        Returns:
+            actions_mean (Tensor): The mean actions, with the shape of the actions.
+        """
+        batch_size, n_actions = actions.shape[0], actions.shape[-1]
+        if agent_mask is None:
+            alive = actions.new_ones(batch_size, self.n_agents)
+        else:
+            alive = torch.as_tensor(agent_mask, device=actions.device).to(actions.dtype)
+        actions = actions * alive.unsqueeze(-1)
+        if self.neighborhood == "GLOBAL":
+            actions_sum = actions.sum(dim=1, keepdim=True) - actions
+            counts = alive.sum(dim=1, keepdim=True) - alive
+        else:
+            distances = torch.cdist(positions, positions)
+            not_neighbor = (alive == 0).unsqueeze(1) | torch.eye(self.n_agents, dtype=torch.bool,
+                                                                 device=actions.device)
+            distances = distances.masked_fill(not_neighbor, float('inf'))
+            if self.neighborhood == "KNN":
+                distances_knn, index_knn = distances.topk(self.n_neighbors, dim=-1, largest=False)
+                is_neighbor = torch.isfinite(distances_knn).to(actions.dtype)
+                actions_knn = actions.unsqueeze(1).expand(-1, self.n_agents, -1, -1).gather(
+                    2, index_knn.unsqueeze(-1).expand(-1, -1, -1, n_actions))
+                actions_sum = (actions_knn * is_neighbor.unsqueeze(-1)).sum(dim=2)
+                counts = is_neighbor.sum(dim=-1)
+            else:
+                adjacency = (distances <= self.neighbor_range).to(actions.dtype)
+                actions_sum = torch.bmm(adjacency, actions)
+                counts = adjacency.sum(dim=-1)
+        return actions_sum / counts.clamp(min=1).unsqueeze(-1)
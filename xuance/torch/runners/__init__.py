@@ -1,23 +1,30 @@
-from .runner_basic import RunnerBase
-from .runner_drl import RunnerDRL
-from .runner_marl import RunnerMARL
-from .runner_competition import RunnerCompetition
-from .runner_pettingzoo import RunnerPettingzoo
-from .runner_magent import RunnerMAgent
-from .runner_sc2 import RunnerSC2
-from .runner_football import RunnerFootball
+from xuance.common.registry_tools import LazyRegistry, lazy_attributes
 
-REGISTRY_Runner = {
-    "DL_toolbox": "PyTorch",
-    "DRL": RunnerDRL,
-    "MARL": RunnerMARL,
-    "RunnerCompetition": RunnerCompetition,
-    "RunnerPettingzoo": RunnerPettingzoo,
-    "RunnerMAgent": RunnerMAgent,
-    "RunnerStarCraft2": RunnerSC2,
-    "RunnerFootball": RunnerFootball
+# Maps each member to the module that defines it, the module is imported on first access.
+_members = {
+    "RunnerBase": ".runner_basic",
+    "RunnerDRL": ".runner_drl",
+    "RunnerMARL": ".runner_marl",
+    "RunnerCompetition": ".runner_competition",
+    "RunnerPettingzoo": ".runner_pettingzoo",
+    "RunnerMAgent": ".runner_magent",
+    "RunnerSC2": ".runner_sc2",
+    "RunnerFootball": ".runner_football",
 }
 
+__getattr__ = lazy_attributes(__name__, _members)
+
+REGISTRY_Runner = LazyRegistry({
+    "DL_toolbox": "PyTorch",
+    "DRL": "xuance.torch.runners.runner_drl:RunnerDRL",
+    "MARL": "xuance.torch.runners.runner_marl:RunnerMARL",
+    "RunnerCompetition": "xuance.torch.runners.runner_competition:RunnerCompetition",
+    "RunnerPettingzoo": "xuance.torch.runners.runner_pettingzoo:RunnerPettingzoo",
+    "RunnerMAgent": "xuance.torch.runners.runner_magent:RunnerMAgent",
+    "RunnerStarCraft2": "xuance.torch.runners.runner_sc2:RunnerSC2",
+    "RunnerFootball": "xuance.torch.runners.runner_football:RunnerFootball",
+})
+
 __all__ = [
     "RunnerBase",
     "RunnerDRL",
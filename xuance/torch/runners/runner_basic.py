@@ -1,11 +1,13 @@
+import os
 from xuance.environment import make_envs
 from xuance.torch.utils.operations import set_seed
 
 
 class RunnerBase(object):
     def __init__(self, config):
-        # set random seeds
-        set_seed(config.seed)
+        # set random seeds, the processes of distributed training explore with different seeds.
+        rank = int(os.environ['RANK']) if config.distributed_training else 0
+        set_seed(config.seed + rank)
 
         # build environments
         self.envs = make_envs(config)
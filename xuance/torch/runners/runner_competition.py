@@ -17,6 +17,9 @@ class RunnerCompetition(object):
         set_seed(self.configs[0].seed)
 
         # build environments
+        if any(hasattr(config, "use_array_batches") and config.use_array_batches for config in configs):
+            raise AttributeError("The competition runner does not support the array batches of the vectorized "
+                                 "environments.")
         self.envs = make_envs(self.configs[0])
         self.n_envs = self.envs.num_envs
         self.current_step = 0
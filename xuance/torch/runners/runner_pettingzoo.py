@@ -2,7 +2,6 @@ import os
 import socket
 import time
 from pathlib import Path
-import wandb
 from torch.utils.tensorboard import SummaryWriter
 from .runner_basic import RunnerBase, make_envs
 from xuance.torch.agents import REGISTRY_Agents
@@ -57,6 +56,7 @@ class RunnerPettingzoo(RunnerBase):
                 self.current_step, self.current_episode = 0, np.zeros((self.envs.num_envs,), np.int32)
 
                 if self.use_wandb:
+                    import wandb
                     config_dict = vars(arg)
                     wandb_dir = Path(os.path.join(os.getcwd(), arg.log_dir))
                     if not wandb_dir.exists():
@@ -111,6 +111,7 @@ class RunnerPettingzoo(RunnerBase):
         n_steps: current step
         """
         if self.use_wandb:
+            import wandb
             for k, v in info.items():
                 wandb.log({k: v}, step=x_index)
         else:
@@ -122,6 +123,7 @@ class RunnerPettingzoo(RunnerBase):
 
     def log_videos(self, info: dict, fps: int, x_index: int = 0):
         if self.use_wandb:
+            import wandb
             for k, v in info.items():
                 wandb.log({k: wandb.Video(v, fps=fps, format='gif')}, step=x_index)
         else:
@@ -142,6 +144,7 @@ class RunnerPettingzoo(RunnerBase):
     def finish(self):
         self.envs.close()
         if self.use_wandb:
+            import wandb
             wandb.finish()
         else:
             self.writer.close()
@@ -13,6 +13,16 @@ from .operations import (init_distributed_mode, update_linear_decay, set_seed,
                          get_flat_grad, get_flat_params, assign_from_flat_grads,
                          assign_from_flat_params, split_distributions, merge_distributions)
 from .value_norm import ValueNorm
+from .running_norm import RunningNorm
+from .metrics import MetricsAccumulator
+from .trust_region import conjugate_gradient, TrustRegionOptimizer
+from .ensemble import ModuleEnsemble, clip_grad_norm_ensemble_
+from .target_networks import TargetNetworks
+from .compile import compile_module, compile_policy
+from .precision import PrecisionPolicy
+from .minibatch import RolloutMinibatches
+from .distributed import is_distributed, all_reduce_mean, broadcast_module, GradientAllReduce
+from .accumulation import GradientAccumulation
 
 ActivationFunctions = {
     "relu": nn.ReLU,
@@ -0,0 +1,182 @@
+import torch
+import numpy as np
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+
+def _batch_size(samples: dict) -> int:
+    if 'batch_size' in samples:
+        return int(samples['batch_size'])
+    for value in samples.values():
+        if isinstance(value, dict):
+            return _batch_size(value)
+        if isinstance(value, (np.ndarray, torch.Tensor)) and value.ndim > 0:
+            return len(value)
+    raise ValueError("Cannot find the batch size of the samples.")
+
+
+def _slice(data, start: int, end: int, batch_size: int):
+    if isinstance(data, dict):
+        return {key: _slice(value, start, end, batch_size) for key, value in data.items()}
+    if isinstance(data, (np.ndarray, torch.Tensor)) and data.ndim > 0 and len(data) == batch_size:
+        return data[start:end]
+    return data  # None, numbers and the fields without a batch dimension are kept as they are.
+
+
+class GradientAccumulation:
+    """Splits every minibatch of a learner into micro-batches, and accumulates their gradients into one optimizer
+    step, so that the peak activation memory of an update scales with the micro-batch instead of the minibatch.
+
+    The update methods of the learner are called once per micro-batch, with the fields of the samples sliced along
+    their first (batch) dimension. This object replaces the gradient scaler of the learner:
+
+    - scale(loss) weights the loss of a micro-batch by its share of the minibatch, so that the batch means of the
+      micro-batches add up to the mean of the minibatch. The masked means of the MARL learners are corrected by
+      LearnerMAS.mask_sum().
+    - unscale_(optimizer) and step(optimizer) move the gradients of the micro-batches out of the parameters before
+      the learner clips them, and put their sum back before the last micro-batch is unscaled, clipped and applied.
+    - update() only updates the scale of the wrapped scaler after the last micro-batch.
+
+    learner.iterations advances once per minibatch. The learners step their learning rate schedulers only when
+    is_last is True, i.e., once per minibatch. Statistics that the learner updates from the samples (e.g., the value
+    normalizers of the MARL actor-critic learners) must be updated once with the whole minibatch, in the first
+    micro-batch. The returned information averages the values of the micro-batches with the same weights as the
+    losses, i.e., it reports the losses of the whole minibatch, and the gradient norms of the last micro-batch, which
+    clips the accumulated gradients.
+
+    Only the optimizer step is deferred, so the update is the same as with the whole minibatch only for the learners
+    whose losses do not depend on an optimizer step or a target update within the same update, i.e., the on-policy
+    and the value-decomposition learners, see Learner._setup_accumulation.
+
+    Parameters:
+        scaler: The gradient scaler of the learner, e.g., a torch.amp.GradScaler or a GradientAllReduce.
+        n_micro_batches (int): The number of micro-batches of a minibatch.
+    """
+
+    def __init__(self, scaler, n_micro_batches: int):
+        if n_micro_batches < 1:
+            raise ValueError(f"The number of gradient accumulation steps must be positive, got {n_micro_batches}.")
+        self.scaler = scaler
+        self.n_micro_batches = n_micro_batches
+        self.active = False  # Whether a minibatch is being split.
+        self.is_first = True  # Whether the current micro-batch is the first one of the minibatch.
+        self.is_last = True  # Whether the current micro-batch is the last one of the minibatch.
+        self.weight = 1.0  # The share of the current micro-batch in the minibatch.
+        self.samples: Optional[dict] = None  # The samples of the minibatch.
+        self.micro_samples: Optional[dict] = None  # The samples of the current micro-batch.
+        self._shares: Dict[str, float] = {}
+        self._stash: Dict[torch.nn.Parameter, torch.Tensor] = {}
+        self._handled = set()
+
+    def __getattr__(self, name):
+        if name == "scaler":
+            raise AttributeError(name)
+        return getattr(self.scaler, name)
+
+    def apply(self, learner):
+        """Splits the samples of the update methods (named update*) of a learner into micro-batches."""
+        for name in dir(type(learner)):
+            if name.startswith("update") and callable(getattr(type(learner), name)):
+                setattr(learner, name, self._accumulate_method(learner, getattr(learner, name)))
+
+    def share(self, key: str, mask_sum: Callable[[dict], float]) -> float:
+        """The share of the current micro-batch in the sum of a mask over the minibatch.
+
+        Parameters:
+            key (str): The name of the mask, under which the share is cached for the micro-batch.
+            mask_sum (Callable[[dict], float]): Computes the sum of the mask from the raw samples.
+
+        Returns:
+            The share, in [0, 1].
+        """
+        if key not in self._shares:
+            total = mask_sum(self.samples)
+            self._shares[key] = mask_sum(self.micro_samples) / total if total > 0 else 0.0
+        return self._shares[key]
+
+    def _accumulate_method(self, learner, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            if self.active or self.n_micro_batches == 1:  # e.g., update() calling update_rnn().
+                return method(*args, **kwargs)
+            samples = args[0] if len(args) > 0 and isinstance(args[0], dict) else kwargs
+            batch_size = _batch_size(samples)
+            n_micro_batches = min(self.n_micro_batches, batch_size)
+            bounds = np.linspace(0, batch_size, n_micro_batches + 1).astype(int)
+            iterations = learner.iterations
+            info = {}
+            self.active, self.samples = True, samples
+            try:
+                for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+                    micro_samples = _slice(samples, start, end, batch_size)
+                    if 'batch_size' in samples:
+                        micro_samples['batch_size'] = int(end - start)
+                    self.micro_samples, self._shares = micro_samples, {}
+                    self.weight = (end - start) / batch_size
+                    self.is_first, self.is_last = i == 0, i == n_micro_batches - 1
+                    learner.iterations = iterations
+                    if samples is kwargs:
+                        micro_info = method(*args, **micro_samples)
+                    else:
+                        micro_info = method(micro_samples, *args[1:], **kwargs)
+                    self._merge_info(info, micro_info)
+            finally:
+                self.active, self.is_first, self.is_last, self.weight = False, True, True, 1.0
+                self.samples, self.micro_samples, self._shares = None, None, {}
+                self._stash.clear()
+                self._handled.clear()
+            return info
+
+        return wrapper
+
+    def _merge_info(self, info: dict, micro_info):
+        if not isinstance(micro_info, dict):
+            return
+        for key, value in micro_info.items():
+            if "gradient_norm" in key:  # Only the last micro-batch clips the accumulated gradients.
+                info[key] = value
+            elif isinstance(value, (int, float, torch.Tensor, np.ndarray)) and not isinstance(value, bool):
+                info[key] = info.get(key, 0.0) + self.weight * value
+            else:
+                info[key] = value
+
+    @torch.no_grad()
+    def _accumulate(self, optimizer: torch.optim.Optimizer):
+        if id(optimizer) in self._handled:
+            return
+        self._handled.add(id(optimizer))
+        for group in optimizer.param_groups:
+            for param in group['params']:
+                if self.is_last:
+                    stashed = self._stash.pop(param, None)
+                    if stashed is None:
+                        continue
+                    if param.grad is None:
+                        param.grad = stashed
+                    else:
+                        param.grad.add_(stashed)
+                elif param.grad is not None:
+                    if param in self._stash:
+                        self._stash[param].add_(param.grad)
+                    else:
+                        self._stash[param] = param.grad
+                    param.grad = None  # Nothing is clipped or applied before the last micro-batch.
+
+    def scale(self, outputs):
+        return self.scaler.scale(outputs * self.weight if self.weight != 1.0 else outputs)
+
+    def unscale_(self, optimizer: torch.optim.Optimizer):
+        self._accumulate(optimizer)
+        if self.is_last:
+            self.scaler.unscale_(optimizer)
+
+    def step(self, optimizer: torch.optim.Optimizer, *args, **kwargs):
+        self._accumulate(optimizer)
+        self._handled.discard(id(optimizer))
+        if self.is_last:
+            return self.scaler.step(optimizer, *args, **kwargs)
+        return None
+
+    def update(self, new_scale=None):
+        if self.is_last:
+            self.scaler.update(new_scale)
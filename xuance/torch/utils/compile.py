@@ -0,0 +1,83 @@
+import warnings
+import torch
+import torch.nn as nn
+from typing import List, Tuple, Type
+
+
+def _compiler_errors() -> Tuple[Type[Exception], ...]:
+    """The errors raised by torch.compile itself (Dynamo tracing and the backend compilers)."""
+    try:
+        from torch._dynamo.exc import TorchDynamoException
+    except ImportError:  # torch < 2.0
+        return ()
+    errors = [TorchDynamoException]
+    try:
+        from torch._inductor.exc import CppCompileError, InvalidCxxCompiler
+        errors += [CppCompileError, InvalidCxxCompiler]
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def compile_module(module: nn.Module, mode: str = "default", dynamic: bool = True):
+    """Replaces the forward method of a module by its torch.compile version, in place.
+
+    The parameters, the state dict and the other methods of the module are unchanged. With dynamic=True the compiled
+    graph does not specialize on the batch size, so acting with n_envs inputs and training with minibatches share
+    the same graph. If torch.compile fails to trace or compile the forward (on the first call, or when it recompiles
+    for new inputs), the module falls back to eager mode for the rest of the run. The other errors, e.g., of the
+    inputs or of the network itself, are raised unchanged.
+
+    Args:
+        module (nn.Module): The module to compile.
+        mode (str): The torch.compile mode, e.g., "default", "reduce-overhead" or "max-autotune".
+        dynamic (bool): Whether to compile with dynamic shapes.
+    """
+    eager_forward = module.forward
+    compiled_forward = torch.compile(eager_forward, mode=mode, dynamic=dynamic)
+    compiler_errors = _compiler_errors()
+
+    def forward(*args, **kwargs):
+        try:
+            return compiled_forward(*args, **kwargs)
+        except compiler_errors as error:
+            # Dynamo also wraps the errors that the network raises while it is traced, which eager mode raises again.
+            outputs = eager_forward(*args, **kwargs)
+            warnings.warn(f"torch.compile failed for {module._get_name()}, falling back to eager mode: {error}")
+            module.forward = eager_forward
+            return outputs
+
+    module.forward = forward
+
+
+def compile_policy(policy: nn.Module, mode: str = "default") -> List[str]:
+    """Compiles the networks of a policy, i.e., its representations, heads and mixers, with compile_module.
+
+    The networks are compiled one by one rather than the policy as a whole, so that every method of the policy that
+    evaluates them (acting, target values, the losses of the learner) runs the compiled forward and backward, while
+    the Python logic of the policy (dicts of agents, distributions) stays in eager mode.
+
+    Args:
+        policy (nn.Module): The policy whose networks are compiled.
+        mode (str): The torch.compile mode.
+
+    Returns:
+        List[str]: The names of the compiled networks.
+    """
+    if not hasattr(torch, "compile"):
+        warnings.warn("torch.compile requires PyTorch >= 2.0, the policy runs in eager mode.")
+        return []
+    compiled = []
+    for name, child in policy.named_children():
+        if isinstance(child, nn.ModuleDict):
+            members = child.items()
+        elif isinstance(child, nn.ModuleList):
+            members = enumerate(child)
+        else:
+            members = [(None, child)]
+        for key, network in members:
+            if len(list(network.parameters())) == 0:
+                continue
+            compile_module(network, mode)
+            compiled.append(name if key is None else f"{name}.{key}")
+    return compiled
@@ -0,0 +1,120 @@
+import torch
+import torch.distributed as dist
+from typing import Iterable, List, Optional, Union
+from torch._utils import _flatten_dense_tensors, _unflatten_dense_tensors
+
+
+def is_distributed() -> bool:
+    """Whether a process group with more than one process is initialized."""
+    return dist.is_available() and dist.is_initialized() and dist.get_world_size() > 1
+
+
+def distributed_backend(device: Optional[Union[str, int, torch.device]] = None) -> str:
+    """Returns the backend of the process group for a calculating device: "nccl" for CUDA devices, "gloo" for the
+    CPU or when CUDA is not available."""
+    if device is not None and torch.device(device).type == "cuda" and torch.cuda.is_available():
+        return "nccl"
+    return "gloo"
+
+
+@torch.no_grad()
+def all_reduce_mean(tensor: torch.Tensor) -> torch.Tensor:
+    """Averages a tensor over all processes in place, does nothing without a process group.
+
+    Args:
+        tensor (torch.Tensor): The tensor of the current process.
+
+    Returns:
+        torch.Tensor: The same tensor, holding the mean over the processes.
+    """
+    if is_distributed():
+        dist.all_reduce(tensor)
+        tensor.div_(dist.get_world_size())
+    return tensor
+
+
+@torch.no_grad()
+def broadcast_module(module: torch.nn.Module, src: int = 0):
+    """Copies the parameters and buffers of a module from the process src to all the others, so that every process
+    starts from the same networks.
+
+    Args:
+        module (torch.nn.Module): The module, e.g., a policy.
+        src (int): The rank of the process whose values are kept.
+    """
+    if not is_distributed():
+        return
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        dist.broadcast(tensor.data, src=src)
+
+
+class GradientAllReduce:
+    """Wraps the gradient scaler of a learner to average the gradients over all processes before they are applied.
+
+    The learners call scaler.unscale_(optimizer) before clipping and scaler.step(optimizer) to apply the gradients,
+    so the gradients of an optimizer are all-reduced at the first of the two calls after its backward pass. This
+    covers every parameter the optimizer trains, whichever sub-module, per-agent ModuleDict, mixer or learner tensor
+    (e.g., the entropy coefficient) it belongs to, without wrapping the networks in DistributedDataParallel, whose
+    hooks only fire through the forward of the wrapper and not through the policy methods the learners call.
+
+    The gradients are packed into flat buckets of at most bucket_cap_mb megabytes, one all-reduce per bucket, and
+    the all-reduces of all buckets are issued before waiting for the first one.
+
+    Args:
+        scaler: The gradient scaler of the learner, i.e., a torch.amp.GradScaler (a pass-through when disabled).
+        bucket_cap_mb (float): The maximum size of a bucket in megabytes.
+    """
+
+    def __init__(self, scaler, bucket_cap_mb: float = 25.0):
+        self.scaler = scaler
+        self.bucket_cap = int(bucket_cap_mb * 1024 * 1024)
+        self.world_size = dist.get_world_size() if is_distributed() else 1
+        self._reduced = set()
+
+    def __getattr__(self, name):
+        if name == "scaler":
+            raise AttributeError(name)
+        return getattr(self.scaler, name)
+
+    def _buckets(self, grads: Iterable[torch.Tensor]) -> List[List[torch.Tensor]]:
+        buckets, sizes = {}, {}
+        for grad in grads:
+            key = (grad.dtype, grad.device)
+            nbytes = grad.numel() * grad.element_size()
+            if key not in buckets or (sizes[key] + nbytes > self.bucket_cap and len(buckets[key][-1]) > 0):
+                buckets.setdefault(key, []).append([])
+                sizes[key] = 0
+            buckets[key][-1].append(grad)
+            sizes[key] += nbytes
+        return [bucket for key_buckets in buckets.values() for bucket in key_buckets]
+
+    @torch.no_grad()
+    def all_reduce(self, optimizer: torch.optim.Optimizer):
+        """Averages the gradients of the parameters of an optimizer over all processes, once per step."""
+        if self.world_size == 1 or id(optimizer) in self._reduced:
+            return
+        self._reduced.add(id(optimizer))
+        grads = [param.grad for group in optimizer.param_groups for param in group['params']
+                 if param.grad is not None]
+        buckets = [(bucket, _flatten_dense_tensors(bucket)) for bucket in self._buckets(grads)]
+        works = [dist.all_reduce(flat, async_op=True) for _, flat in buckets]
+        for work, (bucket, flat) in zip(works, buckets):
+            work.wait()
+            flat.div_(self.world_size)
+            for grad, averaged in zip(bucket, _unflatten_dense_tensors(flat, bucket)):
+                grad.copy_(averaged)
+
+    def scale(self, outputs):
+        return self.scaler.scale(outputs)
+
+    def unscale_(self, optimizer: torch.optim.Optimizer):
+        self.all_reduce(optimizer)
+        self.scaler.unscale_(optimizer)
+
+    def step(self, optimizer: torch.optim.Optimizer, *args, **kwargs):
+        self.all_reduce(optimizer)
+        self._reduced.discard(id(optimizer))
+        return self.scaler.step(optimizer, *args, **kwargs)
+
+    def update(self, new_scale=None):
+        self.scaler.update(new_scale)
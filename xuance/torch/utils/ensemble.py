@@ -0,0 +1,111 @@
+import torch
+import torch.nn as nn
+from copy import deepcopy
+from typing import Dict, Iterable
+try:
+    from torch.func import functional_call, vmap
+except ImportError:  # torch < 2.0
+    from functorch import vmap
+    from torch.nn.utils.stateless import functional_call
+
+
+class _MemberMethod(nn.Module):
+    """Calls a method of a module as its forward, so that functional_call can evaluate that method."""
+
+    def __init__(self, module: nn.Module, method: str):
+        super(_MemberMethod, self).__init__()
+        self.module = module
+        self.method = method
+
+    def forward(self, *args):
+        return getattr(self.module, self.method)(*args)
+
+
+class ModuleEnsemble(nn.Module):
+    """Identically shaped modules of several agents, with their parameters stacked along a leading member dimension.
+
+    Calling the ensemble evaluates all the members in one vectorized pass, so that every linear layer becomes a single
+    batched matrix multiplication instead of one small multiplication per agent. The members start from the
+    parameters of the given modules, and the gradient of a member only depends on its own inputs, so training the
+    ensemble with a sum of the per-agent losses is equivalent to training the modules independently.
+
+    Parameters:
+        modules (Dict[str, nn.Module]): The modules of the agents, which must have the same architecture.
+        method (str): The method of the members that the ensemble evaluates, e.g., the one returning the parameters
+            of a distribution, as the outputs of the members can only be tensors or dicts of tensors.
+    """
+
+    def __init__(self, modules: Dict[str, nn.Module], method: str = "forward"):
+        super(ModuleEnsemble, self).__init__()
+        self.member_keys = list(modules.keys())
+        members = [modules[key] for key in self.member_keys]
+        if method != "forward":
+            members = [_MemberMethod(m, method) for m in members]
+        self.param_names = [name for name, _ in members[0].named_parameters()]
+        self.buffer_names = [name for name, _ in members[0].named_buffers()]
+        params = [dict(m.named_parameters()) for m in members]
+        buffers = [dict(m.named_buffers()) for m in members]
+        self.params = nn.ParameterList([nn.Parameter(torch.stack([p[name].detach() for p in params]))
+                                        for name in self.param_names])
+        for i, name in enumerate(self.buffer_names):
+            self.register_buffer(f"buffer_{i}", torch.stack([b[name] for b in buffers]))
+        # The structure of the members, kept on the meta device and outside the registered submodules.
+        self.__dict__["base"] = deepcopy(members[0]).to("meta")
+
+    @property
+    def n_members(self):
+        return len(self.member_keys)
+
+    @property
+    def buffers_stacked(self):
+        return [getattr(self, f"buffer_{i}") for i in range(len(self.buffer_names))]
+
+    def _call_member(self, params, buffers, *args):
+        return functional_call(self.base, (dict(zip(self.param_names, params)), dict(zip(self.buffer_names, buffers))),
+                               args)
+
+    def forward(self, *inputs: Dict[str, torch.Tensor]):
+        """
+        Evaluates all the members.
+
+        Parameters:
+            *inputs (Dict[str, Tensor]): The inputs of the members, as dicts of the agent keys.
+
+        Returns:
+            outputs (dict): The output of each member, indexed by the agent keys.
+        """
+        device = self.params[0].device if len(self.params) > 0 else None
+        stacked = [torch.stack([torch.as_tensor(x[key], device=device) for key in self.member_keys]) for x in inputs]
+        outputs = vmap(self._call_member)(tuple(self.params), tuple(self.buffers_stacked), *stacked)
+        if isinstance(outputs, dict):
+            return {key: {name: value[i] for name, value in outputs.items()}
+                    for i, key in enumerate(self.member_keys)}
+        return {key: outputs[i] for i, key in enumerate(self.member_keys)}
+
+    def __getitem__(self, key: str):
+        """Returns a callable that evaluates the member of one agent."""
+        i = self.member_keys.index(key)
+        return lambda *args: self._call_member([p[i] for p in self.params],
+                                               [b[i] for b in self.buffers_stacked], *args)
+
+
+def clip_grad_norm_ensemble_(parameters: Iterable[torch.Tensor], max_norm: float, n_members: int):
+    """Clips the gradient norm of each member of an ensemble separately, as clip_grad_norm_ does for one module.
+
+    Args:
+        parameters (Iterable[torch.Tensor]): The stacked parameters, whose first dimension is the member.
+        max_norm (float): The maximum norm of the gradients of one member.
+        n_members (int): The number of members.
+
+    Returns:
+        torch.Tensor: The gradient norm of each member before clipping.
+    """
+    grads = [p.grad for p in parameters if p.grad is not None]
+    if len(grads) == 0:
+        return torch.zeros(n_members)
+    norms = torch.stack([g.reshape(n_members, -1).square().sum(dim=1) for g in grads]).sum(dim=0).sqrt()
+    coef = torch.clamp(max_norm / (norms + 1e-6), max=1.0)
+    for g in grads:
+        g.mul_(coef.reshape((n_members,) + (1,) * (g.dim() - 1)))
+    return norms
+
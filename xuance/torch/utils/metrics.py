@@ -0,0 +1,66 @@
+import torch
+from typing import Sequence
+
+REDUCTIONS = {
+    "mean": lambda x: x.mean(),
+    "min": lambda x: x.min(),
+    "max": lambda x: x.max(),
+}
+
+
+class MetricsAccumulator:
+    """Collects the metrics of learner updates as device tensors and reduces them once per logging interval.
+
+    The learners return detached tensors instead of calling .item() on every update, so recording a metric never
+    waits for the device. All the statistics of an interval are computed on the device and copied to the host in a
+    single transfer by reduce().
+
+    Parameters:
+        reduce (Sequence[str]): The statistics reported for each metric, any of "mean", "min" and "max". The mean is
+            reported under the name of the metric, the others as "{name}_min" and "{name}_max".
+    """
+
+    def __init__(self, reduce: Sequence[str] = ("mean",)):
+        for name in reduce:
+            if name not in REDUCTIONS:
+                raise ValueError(f"Unknown metric reduction '{name}', the choices are {list(REDUCTIONS.keys())}.")
+        self.reduce_names = list(reduce)
+        self.values = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def record(self, info: dict) -> dict:
+        """Stores the tensor values of the information dict.
+
+        Parameters:
+            info (dict): The information returned by a learner update, or any information to be logged.
+
+        Returns:
+            others (dict): The entries that are not tensors, which can be logged directly.
+        """
+        others = {}
+        for key, value in info.items():
+            if isinstance(value, torch.Tensor):
+                self.values.setdefault(key, []).append(value.detach().float().mean())
+            elif value is not None:
+                others[key] = value
+        return others
+
+    def reduce(self) -> dict:
+        """Reduces the values recorded since the last call, and clears them.
+
+        Returns:
+            info (dict): The reduced statistics as Python floats.
+        """
+        if len(self.values) == 0:
+            return {}
+        names, stats = [], []
+        device = next(iter(self.values.values()))[0].device
+        for key, values in self.values.items():
+            values = torch.stack(values).to(device)
+            for name in self.reduce_names:
+                names.append(key if name == "mean" else f"{key}_{name}")
+                stats.append(REDUCTIONS[name](values))
+        self.values = {}
+        return dict(zip(names, torch.stack(stats).cpu().tolist()))
@@ -0,0 +1,68 @@
+import torch
+import numpy as np
+from typing import Iterator, Optional, Sequence, Union
+
+
+def _to_tensors(data, device):
+    if isinstance(data, dict):
+        return {key: _to_tensors(value, device) for key, value in data.items()}
+    if isinstance(data, np.ndarray) and data.dtype != object:
+        return torch.as_tensor(data, device=device)
+    return data  # None, numbers and object arrays are kept as they are.
+
+
+def _select(data, index: torch.Tensor, index_np: np.ndarray):
+    if isinstance(data, dict):
+        return {key: _select(value, index, index_np) for key, value in data.items()}
+    if isinstance(data, torch.Tensor):
+        return data.index_select(0, index)
+    if isinstance(data, np.ndarray):
+        return data[index_np]
+    return data
+
+
+def _normalize(data):
+    if isinstance(data, dict):
+        return {key: _normalize(value) for key, value in data.items()}
+    return (data - data.mean()) / (data.std(unbiased=False) + 1e-8)
+
+
+class RolloutMinibatches:
+    """Holds an on-policy rollout as tensors on the learner device, and yields shuffled minibatches of it.
+
+    The rollout is converted to tensors once per training iteration, and every minibatch is gathered with a single
+    index_select per field, instead of fancy-indexing the NumPy buffers and converting the result for every
+    minibatch of every epoch. The minibatches have the format of buffer.sample(), with tensors instead of arrays,
+    which the learners accept as they are.
+
+    Parameters:
+        rollout (dict): The data of the rollout, as returned by buffer.rollout(), i.e., nested dicts of arrays whose
+            first dimension is the index of the transition.
+        device (Union[str, int, torch.device]): The device of the learner.
+        normalize (Sequence[str]): The fields normalized within each minibatch, e.g., the advantages.
+    """
+
+    def __init__(self, rollout: dict, device: Union[str, int, torch.device],
+                 normalize: Optional[Sequence[str]] = ()):
+        self.device = device
+        self.data = _to_tensors(rollout, device)
+        self.normalize = list(normalize)
+
+    def minibatches(self, indexes: np.ndarray, batch_size: int) -> Iterator[dict]:
+        """Yields the minibatches of the rollout in the order of a permutation.
+
+        Parameters:
+            indexes (np.ndarray): A permutation of the indexes of the transitions.
+            batch_size (int): The size of the minibatches.
+
+        Returns:
+            samples (Iterator[dict]): The minibatches, with the same keys as the samples of the buffer.
+        """
+        permutation = torch.as_tensor(indexes, device=self.device)
+        for start in range(0, len(indexes), batch_size):
+            index_np = indexes[start:start + batch_size]
+            samples = _select(self.data, permutation[start:start + batch_size], index_np)
+            for key in self.normalize:
+                samples[key] = _normalize(samples[key])
+            samples['batch_size'] = len(index_np)
+            yield samples
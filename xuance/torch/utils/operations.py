@@ -5,26 +5,33 @@ import numpy as np
 import torch.nn as nn
 from torch.distributed import init_process_group
 from .distributions import CategoricalDistribution, DiagGaussianDistribution
+from .distributed import distributed_backend
 
 
-def init_distributed_mode(master_port: str = None):
+def init_distributed_mode(master_port: str = None, backend: str = None, device=None):
     """Initializes the distributed training environment.
 
     This function sets up the necessary environment variables for distributed training,
-    configures the CUDA device for each process, and initializes the process group
-    for communication between GPUs using the NCCL backend.
+    configures the CUDA device for each process when the NCCL backend is used, and initializes
+    the process group for communication between the processes launched by torchrun.
 
     Args:
-        master_port (str, optional): The port number for the master process.
+        master_port (str, optional): The port number for the master process, if the launcher has not set one.
             If not provided, the default value "12355" is used.
+        backend (str, optional): The backend of the process group, "gloo" or "nccl".
+            If not provided, "nccl" is used for CUDA devices and "gloo" for the CPU.
+        device (optional): The calculating device of the current process.
     """
-    rank = os.environ["LOCAL_RANK"]
-    os.environ["MASTER_ADDR"] = "localhost"  # The IP address of the machine that is running the rank 0 process.
-    os.environ["MASTER_PORT"] = "12355" if master_port is None else master_port
-    torch.cuda.set_device(int(os.environ["LOCAL_RANK"]))
-    init_process_group(backend='nccl')
+    rank = int(os.environ["RANK"])
+    # The address of the rank 0 process, unless the launcher (e.g., torchrun) has set its own, which must be kept.
+    os.environ.setdefault("MASTER_ADDR", "localhost")
+    os.environ.setdefault("MASTER_PORT", "12355" if master_port is None else str(master_port))
+    backend = distributed_backend(device) if backend is None else backend
+    if backend == "nccl":
+        torch.cuda.set_device(int(os.environ["LOCAL_RANK"]))
+    init_process_group(backend=backend)
     if rank == 0:
-        print("The distributed process group is initialized.")
+        print(f"The distributed process group is initialized with the {backend} backend.")
 
 
 def update_linear_decay(optimizer, step, total_steps, initial_lr, end_factor):
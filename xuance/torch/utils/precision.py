@@ -0,0 +1,87 @@
+import torch
+import torch.nn as nn
+from functools import wraps
+from typing import Union
+
+PRECISIONS = {
+    "fp32": None,
+    "bf16": torch.bfloat16,
+    "fp16": torch.float16,
+}
+
+
+def _float_outputs(module, inputs, output):
+    """A forward hook that casts the low precision outputs of a network back to float32."""
+    if isinstance(output, torch.Tensor):
+        return output.float() if output.dtype in (torch.bfloat16, torch.float16) else output
+    if isinstance(output, dict):
+        return {k: _float_outputs(module, inputs, v) for k, v in output.items()}
+    if isinstance(output, (tuple, list)):
+        return type(output)(_float_outputs(module, inputs, v) for v in output)
+    return output
+
+
+class PrecisionPolicy:
+    """The numerical precision of the learner updates.
+
+    - "fp32": everything runs in float32.
+    - "bf16": the updates run under torch.autocast with bfloat16, so the matmuls and convolutions of the networks
+      run in bfloat16. bfloat16 has the range of float32, so no loss scaling is needed.
+    - "fp16": as "bf16" with float16, and the losses are scaled with a GradScaler to avoid gradient underflow.
+
+    In both mixed precision modes the outputs of the networks are cast back to float32, so that the TD targets,
+    log-probabilities, advantages and losses are computed in float32. Acting is not affected.
+
+    Parameters:
+        precision (str): One of "fp32", "bf16" and "fp16".
+        device (Union[str, int, torch.device]): The device of the learner.
+    """
+
+    def __init__(self, precision: str = "fp32", device: Union[str, int, torch.device] = "cpu"):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', the choices are {list(PRECISIONS.keys())}.")
+        self.precision = precision
+        self.dtype = PRECISIONS[precision]
+        self.enabled = self.dtype is not None
+        self.device_type = "cuda" if isinstance(device, int) or str(device).startswith("cuda") else "cpu"
+        use_scaler = precision == "fp16"
+        if hasattr(torch.amp, "GradScaler"):
+            self.scaler = torch.amp.GradScaler(self.device_type, enabled=use_scaler)
+        else:  # torch < 2.3
+            if use_scaler and self.device_type != "cuda":
+                raise ValueError(f"The precision 'fp16' needs a gradient scaler, which torch {torch.__version__} "
+                                 f"only provides on CUDA devices. Use 'bf16' on the CPU, or torch >= 2.3.")
+            self.scaler = torch.cuda.amp.GradScaler(enabled=use_scaler)
+
+    def autocast(self):
+        """Returns the autocast context of the updates, which does nothing for "fp32"."""
+        return torch.autocast(self.device_type, dtype=self.dtype, enabled=self.enabled)
+
+    def apply(self, learner, policy: nn.Module):
+        """Casts the outputs of the policy networks to float32, and runs the update methods of the learner under
+        autocast. Does nothing for "fp32".
+
+        Parameters:
+            learner: The learner, whose methods named update* are wrapped.
+            policy (nn.Module): The policy trained by the learner.
+        """
+        if not self.enabled:
+            return
+        for module in [policy] + list(policy.children()):
+            networks = module.values() if isinstance(module, nn.ModuleDict) else [module]
+            for network in networks:
+                network.register_forward_hook(_float_outputs)
+        for module in policy.modules():
+            if isinstance(module, nn.Sequential):  # The heads that return distributions build them from these.
+                module.register_forward_hook(_float_outputs)
+        for name in dir(type(learner)):
+            if name.startswith("update") and callable(getattr(type(learner), name)):
+                setattr(learner, name, self._autocast_method(getattr(learner, name)))
+
+    def _autocast_method(self, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            with self.autocast():
+                return method(*args, **kwargs)
+
+        return wrapper
@@ -0,0 +1,163 @@
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.distributed as dist
+from typing import Optional, Sequence, Union
+
+
+class RunningNorm(nn.Module):
+    """Running mean and variance of a data stream, kept as tensors on the policy device.
+
+    The statistics are merged with batched Welford (Chan et al.) updates, so one call consumes the whole batch of
+    parallel environments at once. Dict spaces are flattened into one contiguous buffer, which lets all keys share
+    a single update and a single normalization kernel.
+
+    In distributed training, the moments of the batches of all processes are gathered and merged at every update, so
+    all processes keep the same statistics of the global data stream. The updates are then collective calls, which
+    every process makes at the same points of its training loop, with a batch that may be empty.
+
+    Parameters:
+        shape (Union[Sequence[int], dict]): The shape of one sample, or a dict of shapes for Dict spaces.
+        epsilon (float): The initial count, avoids division by zero.
+        dtype (torch.dtype): The accumulation dtype of the statistics, torch.float64 or torch.float32.
+        device (Optional[Union[str, int, torch.device]]): The device that holds the statistics.
+        distributed (bool): Whether to merge the updates of all processes of the distributed process group.
+    """
+
+    def __init__(self,
+                 shape: Union[Sequence[int], dict],
+                 epsilon: float = 1e-4,
+                 dtype: torch.dtype = torch.float64,
+                 device: Optional[Union[str, int, torch.device]] = None,
+                 distributed: bool = False):
+        super(RunningNorm, self).__init__()
+        self.shape = shape
+        if isinstance(shape, dict):
+            self.keys = list(shape.keys())
+            self.key_shapes = {k: tuple(shape[k]) for k in self.keys}
+            self.key_sizes = [int(np.prod(self.key_shapes[k])) for k in self.keys]
+            stat_shape = (sum(self.key_sizes),)
+        else:
+            self.keys = None
+            stat_shape = tuple(shape)
+        self.register_buffer("mean", torch.zeros(stat_shape, dtype=dtype, device=device))
+        self.register_buffer("var", torch.ones(stat_shape, dtype=dtype, device=device))
+        self.register_buffer("count", torch.tensor(epsilon, dtype=dtype, device=device))
+        self.n_dims = len(stat_shape)
+        self.frozen = False
+        self.distributed = distributed and dist.is_available() and dist.is_initialized()
+
+    @property
+    def std(self) -> torch.Tensor:
+        return torch.sqrt(self.var)
+
+    def freeze(self):
+        """Stops updating the statistics, e.g. during evaluation."""
+        self.frozen = True
+
+    def unfreeze(self):
+        """Resumes updating the statistics."""
+        self.frozen = False
+
+    def _flatten(self, x) -> torch.Tensor:
+        """Converts the input into one tensor with the statistic dims last, on the device of the statistics."""
+        if self.keys is not None:
+            n = len(x[self.keys[0]])
+            x = np.concatenate([np.asarray(x[k]).reshape(n, -1) for k in self.keys], axis=-1)
+        return torch.as_tensor(x, device=self.mean.device)
+
+    def _unflatten(self, x: torch.Tensor):
+        if self.keys is None:
+            return x
+        batch_shape = x.shape[:-1]
+        return {k: v.reshape(batch_shape + self.key_shapes[k])
+                for k, v in zip(self.keys, torch.split(x, self.key_sizes, dim=-1))}
+
+    def _gather_moments(self, x: torch.Tensor):
+        """Returns the count, mean and variance of the union of the batches of all processes."""
+        count = x.new_tensor([x.shape[0]])
+        if x.shape[0] > 0:
+            var, mean = torch.var_mean(x, dim=0, unbiased=False)
+        else:
+            var, mean = torch.zeros_like(self.mean), torch.zeros_like(self.mean)
+        moments = torch.cat([count, mean.reshape(-1), var.reshape(-1)])
+        gathered = [torch.empty_like(moments) for _ in range(dist.get_world_size())]
+        dist.all_gather(gathered, moments)
+        counts, means, variances = torch.stack(gathered).split([1, mean.numel(), var.numel()], dim=1)
+        total = counts.sum()
+        if total == 0:
+            return 0, None, None
+        weights = counts / total
+        batch_mean = (weights * means).sum(0)
+        batch_var = (weights * (variances + (means - batch_mean).square())).sum(0)
+        return int(total.item()), batch_mean.reshape(self.mean.shape), batch_var.reshape(self.var.shape)
+
+    @torch.no_grad()
+    def update(self, x):
+        """Merges the moments of a batch into the running statistics.
+
+        Parameters:
+            x: A batch of samples (np.ndarray, torch.Tensor or dict of them); all leading dims are batch dims.
+        """
+        if self.frozen:
+            return
+        x = self._flatten(x).to(self.mean.dtype)
+        x = x.reshape((-1,) + x.shape[x.dim() - self.n_dims:])
+        batch_count = x.shape[0]
+        if self.distributed:
+            batch_count, batch_mean, batch_var = self._gather_moments(x)
+        elif batch_count > 0:
+            batch_var, batch_mean = torch.var_mean(x, dim=0, unbiased=False)
+        if batch_count == 0:
+            return
+        delta = batch_mean - self.mean
+        tot_count = self.count + batch_count
+        self.mean.add_(delta * batch_count / tot_count)
+        m2 = self.var * self.count + batch_var * batch_count + delta.square() * self.count * batch_count / tot_count
+        self.var.copy_(m2 / tot_count)
+        self.count.copy_(tot_count)
+
+    @torch.no_grad()
+    def normalize(self, x, clip_range: Optional[float] = None, epsilon: float = 1e-8):
+        """Standardizes the input with the running statistics.
+
+        Parameters:
+            x: The input data (np.ndarray, torch.Tensor or dict of them).
+            clip_range (Optional[float]): If given, the output is clipped into [-clip_range, clip_range].
+            epsilon (float): A small value added to the standard deviation.
+
+        Returns:
+            The normalized data as float32 tensors on the device of the statistics.
+        """
+        x = self._flatten(x).float()
+        out = (x - self.mean.float()) / (self.std.float() + epsilon)
+        if clip_range is not None:
+            out = out.clamp_(-clip_range, clip_range)
+        return self._unflatten(out)
+
+    @torch.no_grad()
+    def scale(self, x, clip_range: Optional[float] = None, min_std: float = 0.1, max_std: float = 100.0):
+        """Divides the input by the clipped running standard deviation, as used for reward scaling."""
+        out = torch.as_tensor(x, device=self.mean.device).float() / self.std.clamp(min_std, max_std).float()
+        if clip_range is not None:
+            out = out.clamp_(-clip_range, clip_range)
+        return out
+
+    def get_statistics(self) -> dict:
+        """Returns the statistics as numpy arrays, split into dicts for Dict spaces."""
+        mean, var = self.mean.cpu().numpy(), self.var.cpu().numpy()
+        if self.keys is not None:
+            splits = np.cumsum(self.key_sizes)[:-1]
+            mean = {k: v.reshape(self.key_shapes[k]) for k, v in zip(self.keys, np.split(mean, splits))}
+            var = {k: v.reshape(self.key_shapes[k]) for k, v in zip(self.keys, np.split(var, splits))}
+        return {'count': self.count.item(), 'mean': mean, 'var': var}
+
+    def set_statistics(self, count, mean, var):
+        """Loads the statistics, e.g. those saved by get_statistics()."""
+        if isinstance(count, dict):
+            count = count[self.keys[0]]
+        self.count.fill_(float(count))
+        self.mean.copy_(self._flatten({k: mean[k][None] for k in self.keys})[0] if self.keys else
+                        torch.as_tensor(mean))
+        self.var.copy_(self._flatten({k: var[k][None] for k in self.keys})[0] if self.keys else
+                       torch.as_tensor(var))
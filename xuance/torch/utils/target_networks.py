@@ -0,0 +1,50 @@
+import torch
+import torch.nn as nn
+from typing import Sequence
+
+
+class TargetNetworks:
+    """Updates the target networks of a policy from their online networks with multi-tensor (foreach) kernels.
+
+    The parameters of all the online and target networks are collected once, so a Polyak update of every network
+    (and of every agent) is a single fused lerp over the two lists, and a hard update is a single fused copy, instead
+    of a few small kernels per parameter tensor.
+
+    Only the parameters are updated, as the per-parameter loops of the policies did. The buffers of the networks, e.g.,
+    the running statistics of BatchNorm layers, are not copied to the target networks, which keep their own.
+
+    Parameters:
+        online (Sequence[nn.Module]): The online networks.
+        target (Sequence[nn.Module]): The target networks, in the same order as the online networks.
+    """
+
+    def __init__(self, online: Sequence[nn.Module], target: Sequence[nn.Module]):
+        self.online_params, self.target_params = [], []
+        for online_net, target_net in zip(online, target):
+            online_params, target_params = list(online_net.parameters()), list(target_net.parameters())
+            if len(online_params) != len(target_params):
+                raise ValueError("The online and the target networks must have the same parameters.")
+            self.online_params.extend(online_params)
+            self.target_params.extend(target_params)
+
+    @torch.no_grad()
+    def soft_update(self, tau: float):
+        """Updates target = (1 - tau) * target + tau * online."""
+        if len(self.target_params) == 0:
+            return
+        if hasattr(torch, "_foreach_lerp_"):
+            torch._foreach_lerp_(self.target_params, self.online_params, tau)
+        else:
+            torch._foreach_mul_(self.target_params, 1 - tau)
+            torch._foreach_add_(self.target_params, self.online_params, alpha=tau)
+
+    @torch.no_grad()
+    def hard_update(self):
+        """Copies the online parameters to the target networks."""
+        if len(self.target_params) == 0:
+            return
+        if hasattr(torch, "_foreach_copy_"):
+            torch._foreach_copy_(self.target_params, self.online_params)
+        else:
+            for tp, ep in zip(self.target_params, self.online_params):
+                tp.copy_(ep)
@@ -0,0 +1,120 @@
+import torch
+import torch.nn as nn
+from typing import Callable
+from torch.nn.utils import parameters_to_vector, vector_to_parameters
+from .distributed import all_reduce_mean
+
+
+def conjugate_gradient(matrix_vector_product: Callable[[torch.Tensor], torch.Tensor],
+                       b: torch.Tensor,
+                       n_iterations: int = 10,
+                       residual_tol: float = 1e-10) -> torch.Tensor:
+    """Solves A x = b for a symmetric positive-definite A that is only available through matrix-vector products.
+
+    Args:
+        matrix_vector_product (Callable): A function that returns A v for a vector v.
+        b (torch.Tensor): The right-hand side of the linear system.
+        n_iterations (int): The maximum number of conjugate gradient iterations.
+        residual_tol (float): The squared norm of the residual below which the iterations stop.
+
+    Returns:
+        torch.Tensor: The approximate solution x.
+    """
+    x = torch.zeros_like(b)
+    r, p = b.clone(), b.clone()
+    r_dot_r = r.dot(r)
+    for _ in range(n_iterations):
+        a_p = matrix_vector_product(p)
+        alpha = r_dot_r / (p.dot(a_p) + 1e-8)
+        x.add_(alpha * p)
+        r.sub_(alpha * a_p)
+        new_r_dot_r = r.dot(r)
+        if new_r_dot_r < residual_tol:
+            break
+        p = r + (new_r_dot_r / r_dot_r) * p
+        r_dot_r = new_r_dot_r
+    return x
+
+
+class TrustRegionOptimizer:
+    """Natural gradient steps on a model, constrained by the mean KL divergence of its policy.
+
+    The natural gradient F^-1 g is solved with conjugate gradient, where the products with the Fisher information
+    matrix F are Hessian-vector products of the mean KL divergence, so F is never built. The full step is scaled to
+    the KL boundary, and a backtracking line search keeps the largest fraction of it that improves the surrogate
+    loss and satisfies the KL constraint.
+
+    In distributed training, the gradient, the Fisher-vector products and the quantities checked by the line search
+    are averaged over the processes, so that all of them take the same step.
+
+    Args:
+        model (nn.Module): The model whose parameters are optimized, e.g., the actor network.
+        max_kl (float): The bound of the mean KL divergence between the old and the new policy.
+        cg_iterations (int): The number of conjugate gradient iterations.
+        cg_damping (float): The damping added to the Fisher-vector products for numerical stability.
+        line_search_steps (int): The maximum number of backtracking steps, 0 takes the full step without checks.
+        line_search_decay (float): The factor by which the step shrinks after each rejected attempt.
+    """
+
+    def __init__(self,
+                 model: nn.Module,
+                 max_kl: float = 0.01,
+                 cg_iterations: int = 10,
+                 cg_damping: float = 0.1,
+                 line_search_steps: int = 10,
+                 line_search_decay: float = 0.5):
+        self.model = model
+        self.params = [param for param in model.parameters() if param.requires_grad]
+        self.max_kl = max_kl
+        self.cg_iterations = cg_iterations
+        self.cg_damping = cg_damping
+        self.line_search_steps = line_search_steps
+        self.line_search_decay = line_search_decay
+
+    def _flat_grad(self, y: torch.Tensor, **kwargs) -> torch.Tensor:
+        grads = torch.autograd.grad(y, self.params, **kwargs)
+        return torch.cat([grad.reshape(-1) for grad in grads])
+
+    @staticmethod
+    def _mean_kl(kl_fn: Callable[[], torch.Tensor]) -> torch.Tensor:
+        """The KL divergence averaged over the samples and the processes, as a scalar tensor."""
+        return all_reduce_mean(kl_fn().mean())
+
+    def step(self, loss_fn: Callable[[], torch.Tensor], kl_fn: Callable[[], torch.Tensor]) -> dict:
+        """Updates the parameters of the model in place.
+
+        Args:
+            loss_fn (Callable): Returns the surrogate loss to minimize, computed with the current parameters.
+            kl_fn (Callable): Returns the KL divergence between the old (fixed) policy and the current one, either
+                averaged or for every sample.
+
+        Returns:
+            dict: The mean KL divergence after the step and the accepted fraction of the full step, as scalar
+                tensors.
+        """
+        loss = loss_fn()
+        loss_grad = all_reduce_mean(self._flat_grad(loss, retain_graph=True))
+        kl_grad = self._flat_grad(kl_fn().mean(), create_graph=True)
+
+        def fisher_vector_product(v):
+            return all_reduce_mean(self._flat_grad(kl_grad.dot(v), retain_graph=True)) + self.cg_damping * v
+
+        step_dir = conjugate_gradient(fisher_vector_product, -loss_grad, self.cg_iterations)
+        shs = 0.5 * step_dir.dot(fisher_vector_product(step_dir))
+        full_step = step_dir * torch.sqrt(self.max_kl / (shs + 1e-8))
+        old_params = parameters_to_vector(self.params).detach().clone()
+
+        loss = all_reduce_mean(loss.detach().clone())
+        fraction = 1.0
+        with torch.no_grad():
+            if self.line_search_steps == 0:
+                vector_to_parameters(old_params + full_step, self.params)
+                return {"kl": self._mean_kl(kl_fn), "step_fraction": torch.tensor(fraction)}
+            for _ in range(self.line_search_steps):
+                vector_to_parameters(old_params + fraction * full_step, self.params)
+                kl = self._mean_kl(kl_fn)
+                if kl <= self.max_kl and all_reduce_mean(loss_fn()) < loss:
+                    return {"kl": kl, "step_fraction": torch.tensor(fraction)}
+                fraction *= self.line_search_decay
+            vector_to_parameters(old_params, self.params)
+        return {"kl": torch.zeros(()), "step_fraction": torch.tensor(0.0)}